@@ -36,6 +36,7 @@ from a_stock_config import (
 
 # 导入数据服务
 from data_services.a_stock_data import get_a_stock_data, get_a_stock_info_tencent, get_index_data
+from data_services.indicator_kernels import compute_indicators
 from data_services.main_fund_flow import MainFundFlowService
 from scripts.stock_radar import generate_html_radar_section
 
@@ -44,7 +45,7 @@ from llm_services.qwen_engine import chat_with_llm
 
 # 尝试导入技术分析模块（用于筹码阻力）
 try:
-    from data_services.technical_analysis import TechnicalAnalyzer
+    from data_services.technical_analysis import calculate_rolling_chip_distribution
     TECHNICAL_ANALYSIS_AVAILABLE = True
 except ImportError:
     TECHNICAL_ANALYSIS_AVAILABLE = False
@@ -288,15 +289,15 @@ def calculate_chip_resistance(stock_code):
         return None
 
     try:
-        analyzer = TechnicalAnalyzer()
         # 获取A股数据
         df = get_a_stock_data(stock_code, period_days=60)
         if df is None or df.empty or len(df) < 20:
             return None
 
-        chip_result = analyzer.get_chip_distribution(df)
-        if chip_result:
-            resistance_ratio = chip_result.get('resistance_ratio', 0.5)
+        # 整段数据作为一个筹码窗口，取最后一日（与 get_chip_distribution(df) 相同）
+        chips = calculate_rolling_chip_distribution(df, window=len(df)).iloc[-1]
+        if not pd.isna(chips['Chip_Resistance_Ratio']):
+            resistance_ratio = float(chips['Chip_Resistance_Ratio'])
             if resistance_ratio < 0.3:
                 resistance_level = '低'
                 resistance_icon = '✅低'
@@ -614,11 +615,11 @@ def get_stock_analysis(stock_code):
     # 获取历史数据
     df = get_a_stock_data(stock_code, period_days=100)
     if df is not None and not df.empty:
-        # 计算技术指标
-        df['MA5'] = df['Close'].rolling(5).mean()
-        df['MA10'] = df['Close'].rolling(10).mean()
-        df['MA20'] = df['Close'].rolling(20).mean()
-        df['MA60'] = df['Close'].rolling(60).mean()
+        # 计算技术指标（均线、RSI、MACD 一次计算）
+        indicators = compute_indicators(df['Close'], ma_periods=(5, 10, 20, 60), rsi_period=14,
+                                        macd_params=(12, 26, 9), macd_adjust=False)
+        for period in (5, 10, 20, 60):
+            df[f'MA{period}'] = indicators[f'MA{period}']
 
         latest = df.iloc[-1]
         result['ma5'] = latest['MA5']
@@ -633,16 +634,12 @@ def get_stock_analysis(stock_code):
             result['return_20d'] = (df['Close'].iloc[-1] / df['Close'].iloc[-20] - 1) * 100
 
         # 计算RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-        rs = gain / loss
-        result['rsi_14'] = 100 - (100 / (1 + rs.iloc[-1]))
+        result['rsi_14'] = indicators['RSI'].iloc[-1]
 
         # 计算MACD
-        df['EMA12'] = df['Close'].ewm(span=12, adjust=False).mean()
-        df['EMA26'] = df['Close'].ewm(span=26, adjust=False).mean()
-        result['macd'] = df['EMA12'].iloc[-1] - df['EMA26'].iloc[-1]
+        df['EMA12'] = indicators['EMA_fast']
+        df['EMA26'] = indicators['EMA_slow']
+        result['macd'] = indicators['MACD'].iloc[-1]
 
     return result
 
@@ -716,7 +713,7 @@ def generate_three_horizon_predictions(stock_list, stock_analyses=None):
         }}
     """
     from a_stock_ml_model import AStockTradingModel
-    import pickle
+    from ml_services.model_registry import model_exists
 
     if stock_analyses is None:
         stock_analyses = {}
@@ -727,46 +724,59 @@ def generate_three_horizon_predictions(stock_list, stock_analyses=None):
     historical_pl_data = load_historical_profit_loss_ratio_a_stock()
 
     # 加载三个周期的模型
+    models = {}
     for horizon in [1, 5, 20]:
         model_path = f'data/a_stock_models/trading_model_catboost_{horizon}d.pkl'
-        if not os.path.exists(model_path):
+        if not model_exists(model_path):
             print(f"⚠️ 模型文件不存在: {model_path}")
             continue
 
         try:
-            # 加载模型
+            # 加载模型（经进程级模型注册表，优先读取原生 .cbm 格式）
             model = AStockTradingModel(horizon=horizon)
-            with open(model_path, 'rb') as f:
-                model_data = pickle.load(f)
-            model.catboost_model = model_data['catboost_model']
-            model.feature_columns = model_data['feature_columns']
-            model.categorical_encoders = model_data.get('categorical_encoders', {})
-            model.community_ids = model_data.get('community_ids', [0, 1, 2, 3, 4, 5, 6])
+            model.load_model(model_path)
+            model.horizon = horizon
+            if model.community_ids is None:
+                model.community_ids = [0, 1, 2, 3, 4, 5, 6]
+            models[horizon] = model
 
             print(f"  ✅ 加载 {horizon}d 模型")
+        except Exception as e:
+            print(f"  ⚠️ 加载模型 {model_path} 失败: {e}")
 
-            # 预测每只股票
-            for code in stock_list:
-                try:
-                    result = model.predict(code=code, mode='production')
-                    if result:
-                        if code not in three_horizon_results:
-                            three_horizon_results[code] = {'predictions': {}}
+    # 每只股票只构建一次特征（特征与周期无关），再由各周期模型批量评分
+    frames = {}
+    if models:
+        feature_model = next(iter(models.values()))
+        market_data = feature_model.load_prediction_market_data(mode='production')
+        for code in stock_list:
+            try:
+                stock_df = feature_model.build_prediction_frame(code, mode='production', market_data=market_data)
+                if stock_df is not None:
+                    frames[code] = stock_df
+            except Exception as e:
+                print(f"  ⚠️ 构建 {code} 特征失败: {e}")
 
-                        prob = result.get('probability', 0.5)
-                        direction = '↑' if prob >= 0.5 else '↓'
+    for horizon, model in models.items():
+        try:
+            predictions = model.predict_from_frames(frames)
+        except Exception as e:
+            print(f"  ⚠️ {horizon}d 模型批量预测失败: {e}")
+            continue
 
-                        three_horizon_results[code]['predictions'][horizon] = {
-                            'direction': direction,
-                            'probability': prob,
-                            'current_price': result.get('current_price'),
-                            'date': result.get('date'),
-                        }
-                except Exception as e:
-                    print(f"  ⚠️ 预测 {code} {horizon}d 失败: {e}")
+        for code, result in predictions.items():
+            if code not in three_horizon_results:
+                three_horizon_results[code] = {'predictions': {}}
 
-        except Exception as e:
-            print(f"  ⚠️ 加载模型 {model_path} 失败: {e}")
+            prob = result.get('probability', 0.5)
+            direction = '↑' if prob >= 0.5 else '↓'
+
+            three_horizon_results[code]['predictions'][horizon] = {
+                'direction': direction,
+                'probability': prob,
+                'current_price': result.get('current_price'),
+                'date': result.get('date'),
+            }
 
     # 计算三周期模式和附加指标
     for code, data in three_horizon_results.items():
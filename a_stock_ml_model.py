@@ -31,7 +31,9 @@ import numpy as np
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 导入港股模型
-from ml_services.ml_trading_model import CatBoostModel, FeatureEngineer, ABSOLUTE_PRICE_FEATURES, logger
+from ml_services.ml_trading_model import CatBoostModel, FeatureEngineer, ABSOLUTE_PRICE_FEATURES, FEATURE_FLOAT32, logger
+from ml_services.feature_engineering.feature_frame import assign_columns, downcast_features, feature_matrix
+from ml_services.warm_start import WARM_START_DIR, WarmStartCatBoost, WarmStartPolicy
 
 # 导入A股配置和数据服务
 from a_stock_config import (
@@ -853,12 +855,12 @@ class AStockTradingModel(CatBoostModel):
     4. 标签标准化（除以滚动波动率）
     """
 
-    def __init__(self, horizon=20):
+    def __init__(self, horizon=20, warm_start=None):
         # 应用 A股数据源替换（延迟执行）
         _apply_a_stock_patch()
 
         # 调用父类初始化
-        super().__init__()
+        super().__init__(warm_start=warm_start)
         self.horizon = horizon
         self.market = 'a_stock'
         self.feature_engineer = AStockFeatureEngineer()
@@ -993,18 +995,15 @@ class AStockTradingModel(CatBoostModel):
 
                 # 基本面特征
                 fundamental_features = self.feature_engineer.create_fundamental_features(code)
-                for key, value in fundamental_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, fundamental_features)
 
                 # 股票类型特征
                 stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-                for key, value in stock_type_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, stock_type_features)
 
                 # 板块特征
                 sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-                for key, value in sector_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, sector_features)
 
                 # 事件驱动特征
                 stock_df = self.feature_engineer.create_event_driven_features(code, stock_df)
@@ -1036,14 +1035,13 @@ class AStockTradingModel(CatBoostModel):
                     # Reindex 并 forward-fill
                     regime_aligned = regime_df_temp.reindex(stock_df_temp.index, method='ffill')
 
-                    for col in regime_aligned.columns:
-                        stock_df[col] = regime_aligned[col].values
+                    stock_df = assign_columns(stock_df, {col: regime_aligned[col].values
+                                                         for col in regime_aligned.columns})
 
                 # ========== 3.5 网络特征（A股路径）==========
                 if network_features_data is not None and code in network_features_data:
                     net_features = network_features_data[code]
-                    for key, value in net_features.items():
-                        stock_df[key] = value
+                    stock_df = assign_columns(stock_df, net_features)
                 else:
                     # 为缺失网络特征的股票提供默认值
                     default_net_features = {
@@ -1063,8 +1061,7 @@ class AStockTradingModel(CatBoostModel):
                         'net_effective_size': 0.0,
                         'net_local_clustering': 0.0,
                     }
-                    for key, value in default_net_features.items():
-                        stock_df[key] = value
+                    stock_df = assign_columns(stock_df, default_net_features)
                     logger.debug(f"股票 {code} 使用默认网络特征")
 
                 # ========== 3.6 交叉特征 ==========
@@ -1075,28 +1072,27 @@ class AStockTradingModel(CatBoostModel):
                     stock_df, community_ids=community_ids)
 
                 # ========== 3.8 异常检测特征 ==========
-                stock_df = self.feature_engineer.create_anomaly_features(stock_df, use_shift=use_shift)
+                stock_df = self.feature_engineer.create_anomaly_features(stock_df, use_shift=use_shift, code=code)
 
                 # ========== 3.9 新闻情感特征 ==========
                 # 情感特征（6个）
                 sentiment_features = self.feature_engineer.create_sentiment_features(code, stock_df)
-                for key, value in sentiment_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, sentiment_features)
 
                 # 主题特征（10个）
                 topic_features = self.feature_engineer.create_topic_features(code, stock_df)
-                for key, value in topic_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, topic_features)
 
                 # 主题情感交互特征（50个）
                 topic_sentiment_interaction = self.feature_engineer.create_topic_sentiment_interaction_features(code, stock_df)
-                for key, value in topic_sentiment_interaction.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, topic_sentiment_interaction)
 
                 # 预期差距特征（5个）
                 expectation_gap = self.feature_engineer.create_expectation_gap_features(code, stock_df)
-                for key, value in expectation_gap.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, expectation_gap)
+
+                if FEATURE_FLOAT32:
+                    stock_df = downcast_features(stock_df)
 
                 # ========== 3.10 创建标签 ==========
                 stock_df = self.feature_engineer.create_label(
@@ -1272,6 +1268,14 @@ class AStockTradingModel(CatBoostModel):
 
         self.catboost_model = CatBoostClassifier(**catboost_params)
 
+        # 增量训练：特征和分类编码与上一次一致时，在上一个模型上追加树（跳过交叉验证）
+        warm_signature = {
+            'features': self.feature_columns,
+            'categories': {col: list(encoder.classes_) for col, encoder in self.categorical_encoders.items()},
+            'params': {k: v for k, v in catboost_params.items() if k != 'verbose'}
+        }
+        warm_continue = self.warm_start is not None and self.warm_start.will_continue(warm_signature)
+
         # 使用时间序列交叉验证
         # 数据已按日期排序，训练集是早期所有股票，验证集是后期所有股票
         # 这样验证集的日期完全是新的，避免市场特征泄漏
@@ -1279,8 +1283,11 @@ class AStockTradingModel(CatBoostModel):
         cv_scores = []
         cv_f1_scores = []
 
-        logger.info("开始时间序列交叉验证...")
-        for fold, (train_idx, val_idx) in enumerate(tscv.split(X), 1):
+        if warm_continue:
+            logger.info("增量训练，跳过时间序列交叉验证")
+        else:
+            logger.info("开始时间序列交叉验证...")
+        for fold, (train_idx, val_idx) in enumerate([] if warm_continue else tscv.split(X), 1):
             X_train_fold, X_val_fold = X[train_idx], X[val_idx]
             y_train_fold, y_val_fold = y[train_idx], y[val_idx]
             weights_train_fold = sample_weights[train_idx]
@@ -1306,23 +1313,28 @@ class AStockTradingModel(CatBoostModel):
             cv_f1_scores.append(f1)
             logger.info(f"   Fold {fold} 验证准确率: {score:.4f}, F1分数: {f1:.4f}")
 
-        mean_accuracy = np.mean(cv_scores)
-        std_accuracy = np.std(cv_scores)
-        mean_f1 = np.mean(cv_f1_scores)
-        std_f1 = np.std(cv_f1_scores)
+        if not warm_continue:
+            mean_accuracy = np.mean(cv_scores)
+            std_accuracy = np.std(cv_scores)
+            mean_f1 = np.mean(cv_f1_scores)
+            std_f1 = np.std(cv_f1_scores)
 
-        logger.info(f"\n✅ 交叉验证完成")
-        logger.info(f"   平均验证准确率: {mean_accuracy:.4f} (+/- {std_accuracy:.4f})")
-        logger.info(f"   平均验证F1分数: {mean_f1:.4f} (+/- {std_f1:.4f})")
+            logger.info(f"\n✅ 交叉验证完成")
+            logger.info(f"   平均验证准确率: {mean_accuracy:.4f} (+/- {std_accuracy:.4f})")
+            logger.info(f"   平均验证F1分数: {mean_f1:.4f} (+/- {std_f1:.4f})")
 
         # 使用全部数据重新训练（带样本权重）
-        full_pool = Pool(
-            data=X,
-            label=y,
-            weight=sample_weights,
-            cat_features=None
-        )
-        self.catboost_model.fit(full_pool, verbose=100)
+        if self.warm_start is not None:
+            self.catboost_model = self.warm_start.fit(catboost_params, X, y, weight=sample_weights,
+                                                      signature=warm_signature, verbose=100)
+        else:
+            full_pool = Pool(
+                data=X,
+                label=y,
+                weight=sample_weights,
+                cat_features=None
+            )
+            self.catboost_model.fit(full_pool, verbose=100)
 
         # 更新实际树数量
         self.actual_n_estimators = self.catboost_model.tree_count_
@@ -1330,6 +1342,11 @@ class AStockTradingModel(CatBoostModel):
         logger.info(f"\n✅ 模型训练完成（样本加权：核心股3.0，扩展股1.0）")
         logger.info(f"   实际训练树数量: {self.actual_n_estimators}")
 
+        if warm_continue:
+            # 沿用上次完整训练时保存的验证指标
+            logger.info(f"   增量训练（{self.warm_start.last_mode}），未更新验证指标")
+            return None
+
         # 保存准确率到文件（供综合分析使用）
         self._save_accuracy(mean_accuracy, std_accuracy, mean_f1, std_f1, horizon)
 
@@ -1430,7 +1447,7 @@ class AStockTradingModel(CatBoostModel):
         if categorical_features:
             logger.info(f"已编码 {len(categorical_features)} 个分类特征")
 
-        X = df[feature_cols].values
+        X = feature_matrix(df, feature_cols, float32=FEATURE_FLOAT32)
         y = df['Label'].values
         sample_weights = df['sample_weight'].values if 'sample_weight' in df.columns else None
 
@@ -1528,20 +1545,25 @@ class AStockTradingModel(CatBoostModel):
 
         # 如果没有指定股票代码，预测股票列表
         if code is None:
-            results = []
+            # 市场级数据只加载一次，所有股票的特征构建完成后批量评分
+            market_data = self.load_prediction_market_data(predict_date, mode)
+            frames = {}
             for stock_code in predict_list:
                 try:
-                    result = self._predict_single_stock(
-                        stock_code, predict_date, horizon,
-                        use_feature_cache, mode
+                    stock_df = self.build_prediction_frame(
+                        stock_code, predict_date, use_feature_cache, mode,
+                        market_data=market_data
                     )
-                    if result is not None:
-                        results.append(result)
+                    if stock_df is not None:
+                        frames[stock_code] = stock_df
                 except Exception as e:
                     logger.warning(f"预测 {stock_code} 失败: {e}")
                     import traceback
                     traceback.print_exc()
-            return results
+            if not hasattr(self, 'feature_columns') or self.feature_columns is None:
+                logger.error("模型未加载特征列，请先加载模型")
+                return []
+            return list(self.predict_from_frames(frames).values())
         else:
             return self._predict_single_stock(
                 code, predict_date, horizon,
@@ -1552,26 +1574,30 @@ class AStockTradingModel(CatBoostModel):
         """
         预测单只A股股票（使用A股特征工程）
         """
-        use_shift = (mode == 'backtest')
-
-        # 获取股票数据
-        stock_df = get_a_stock_data(code, period_days=1460, use_cache=True)
-        if stock_df is None or stock_df.empty:
-            logger.warning(f"无法获取股票 {code} 数据")
+        stock_df = self.build_prediction_frame(code, predict_date, use_feature_cache, mode)
+        if stock_df is None:
             return None
+        if not hasattr(self, 'feature_columns') or self.feature_columns is None:
+            logger.error("模型未加载特征列，请先加载模型")
+            return None
+        return self.predict_from_frames({code: stock_df})[code]
 
-        # 如果指定了预测日期，过滤数据到该日期
+    def load_prediction_market_data(self, predict_date=None, mode='production'):
+        """
+        加载预测所需的市场级数据（指数、美股、市场状态、网络特征），可在多只股票间共用
+
+        Args:
+            predict_date: 预测日期
+            mode: 预测模式（'production' 或 'backtest'）
+
+        Returns:
+            dict: csi1000_df, cyb_df, us_market_df, a_stock_regime_df,
+                  network_features_data, community_ids
+        """
+        use_shift = (mode == 'backtest')
         if predict_date:
-            predict_date = pd.to_datetime(predict_date)
-            predict_date_str = predict_date.strftime('%Y-%m-%d')
-            if not isinstance(stock_df.index, pd.DatetimeIndex):
-                stock_df.index = pd.to_datetime(stock_df.index)
-            stock_df = stock_df[stock_df.index.strftime('%Y-%m-%d') <= predict_date_str]
-            if stock_df.empty:
-                logger.warning(f"股票 {code} 在日期 {predict_date_str} 之前没有数据")
-                return None
+            predict_date_str = pd.to_datetime(predict_date).strftime('%Y-%m-%d')
 
-        # ========== A股特征计算（与训练时一致）==========
         # 获取中证1000和创业板指数据
         from data_services.a_stock_data import get_index_data
         csi1000_df = get_index_data('csi1000', period_days=1460)
@@ -1615,6 +1641,57 @@ class AStockTradingModel(CatBoostModel):
             except Exception as e:
                 logger.debug(f"网络特征加载失败: {e}")
 
+        return {
+            'csi1000_df': csi1000_df,
+            'cyb_df': cyb_df,
+            'us_market_df': us_market_df,
+            'a_stock_regime_df': a_stock_regime_df,
+            'network_features_data': network_features_data,
+            'community_ids': community_ids,
+        }
+
+    def build_prediction_frame(self, code, predict_date=None, use_feature_cache=True, mode='production', market_data=None):
+        """
+        构建单只A股的预测特征（与预测周期无关，可供多个周期的模型共用）
+
+        Args:
+            code: 股票代码
+            predict_date: 预测日期
+            use_feature_cache: 是否使用特征缓存（保留参数，A股预测不使用特征缓存）
+            mode: 预测模式（'production' 或 'backtest'）
+            market_data: load_prediction_market_data 的结果（为 None 时自动加载）
+
+        Returns:
+            DataFrame: 全部特征（每行一个交易日），无数据时返回 None
+        """
+        use_shift = (mode == 'backtest')
+
+        # 获取股票数据
+        stock_df = get_a_stock_data(code, period_days=1460, use_cache=True)
+        if stock_df is None or stock_df.empty:
+            logger.warning(f"无法获取股票 {code} 数据")
+            return None
+
+        # 如果指定了预测日期，过滤数据到该日期
+        if predict_date:
+            predict_date = pd.to_datetime(predict_date)
+            predict_date_str = predict_date.strftime('%Y-%m-%d')
+            if not isinstance(stock_df.index, pd.DatetimeIndex):
+                stock_df.index = pd.to_datetime(stock_df.index)
+            stock_df = stock_df[stock_df.index.strftime('%Y-%m-%d') <= predict_date_str]
+            if stock_df.empty:
+                logger.warning(f"股票 {code} 在日期 {predict_date_str} 之前没有数据")
+                return None
+
+        if market_data is None:
+            market_data = self.load_prediction_market_data(predict_date, mode)
+        csi1000_df = market_data['csi1000_df']
+        cyb_df = market_data['cyb_df']
+        us_market_df = market_data['us_market_df']
+        a_stock_regime_df = market_data['a_stock_regime_df']
+        network_features_data = market_data['network_features_data']
+        community_ids = market_data['community_ids']
+
         # ========== 计算所有特征（与训练时流程一致）==========
         # 技术指标
         stock_df = self.feature_engineer.calculate_technical_features(stock_df, use_shift=use_shift, code=code)
@@ -1627,18 +1704,15 @@ class AStockTradingModel(CatBoostModel):
 
         # 基本面特征
         fundamental_features = self.feature_engineer.create_fundamental_features(code)
-        for key, value in fundamental_features.items():
-            stock_df[key] = value
+        stock_df = assign_columns(stock_df, fundamental_features)
 
         # 股票类型特征
         stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-        for key, value in stock_type_features.items():
-            stock_df[key] = value
+        stock_df = assign_columns(stock_df, stock_type_features)
 
         # 板块特征
         sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-        for key, value in sector_features.items():
-            stock_df[key] = value
+        stock_df = assign_columns(stock_df, sector_features)
 
         # 事件驱动特征
         stock_df = self.feature_engineer.create_event_driven_features(code, stock_df)
@@ -1662,14 +1736,13 @@ class AStockTradingModel(CatBoostModel):
             if hasattr(stock_df_temp.index, 'tz') and stock_df_temp.index.tz is not None:
                 stock_df_temp.index = stock_df_temp.index.tz_localize(None)
             regime_aligned = regime_df_temp.reindex(stock_df_temp.index, method='ffill')
-            for col in regime_aligned.columns:
-                stock_df[col] = regime_aligned[col].values
+            stock_df = assign_columns(stock_df, {col: regime_aligned[col].values
+                                                 for col in regime_aligned.columns})
 
         # 网络特征
         if network_features_data is not None and code in network_features_data:
             net_features = network_features_data[code]
-            for key, value in net_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, net_features)
         else:
             default_net_features = {
                 'net_degree_centrality': 0.0,
@@ -1688,8 +1761,7 @@ class AStockTradingModel(CatBoostModel):
                 'net_effective_size': 0.0,
                 'net_local_clustering': 0.0,
             }
-            for key, value in default_net_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, default_net_features)
 
         # 交叉特征
         stock_df = self.feature_engineer.create_interaction_features(stock_df)
@@ -1699,17 +1771,23 @@ class AStockTradingModel(CatBoostModel):
             stock_df, community_ids=community_ids)
 
         # 异常检测特征
-        stock_df = self.feature_engineer.create_anomaly_features(stock_df, use_shift=use_shift)
+        stock_df = self.feature_engineer.create_anomaly_features(stock_df, use_shift=use_shift, code=code)
+
+        if FEATURE_FLOAT32:
+            stock_df = downcast_features(stock_df)
 
-        # ========== 预测 ==========
+        return stock_df
+
+    def _latest_feature_row(self, stock_df):
+        """
+        取最新一行特征并投影到本模型的 feature_columns
+
+        Returns:
+            tuple: (最新一行 DataFrame, 模型输入数组)
+        """
         # 获取最新一行数据
         latest_data = stock_df.iloc[[-1]].copy()
 
-        # 检查特征列是否存在
-        if not hasattr(self, 'feature_columns') or self.feature_columns is None:
-            logger.error("模型未加载特征列，请先加载模型")
-            return None
-
         # 处理 Market_Regime 字符串特征（转换为数值，与训练时一致）
         if 'Market_Regime' in latest_data.columns and latest_data['Market_Regime'].dtype == 'object':
             latest_data['Market_Regime'] = latest_data['Market_Regime'].map({
@@ -1726,7 +1804,7 @@ class AStockTradingModel(CatBoostModel):
             logger.warning(f"预测时缺失特征已填充默认值: {missing_features[:5]}...")
 
         # 准备预测数据
-        X = latest_data[self.feature_columns].values
+        X = feature_matrix(latest_data, self.feature_columns, float32=FEATURE_FLOAT32)
 
         # 处理分类特征 NaN
         for col in self.categorical_encoders.keys():
@@ -1737,20 +1815,47 @@ class AStockTradingModel(CatBoostModel):
                     lambda x: encoder.transform([x])[0] if x in encoder.classes_ else -1
                 )
 
-        # 预测
-        prediction = self.catboost_model.predict(X)[0]
-        probability = self.catboost_model.predict_proba(X)[0][1]
+        return latest_data, X
 
-        # 获取当前价格
-        current_price = latest_data['Close'].iloc[-1] if 'Close' in latest_data.columns else None
+    def predict_from_frames(self, frames):
+        """
+        对已构建的特征批量预测（所有股票堆叠后一次调用 CatBoost）
 
-        return {
-            'code': code,
-            'date': latest_data.index[-1],
-            'prediction': int(prediction),
-            'probability': float(probability),
-            'current_price': float(current_price) if current_price is not None else None,
-        }
+        Args:
+            frames: {股票代码: build_prediction_frame 返回的特征 DataFrame}
+
+        Returns:
+            dict: {股票代码: 预测结果}，格式与 predict 相同
+        """
+        if not frames:
+            return {}
+
+        codes = list(frames.keys())
+        latest_rows = []
+        X_rows = []
+        for code in codes:
+            latest_data, X = self._latest_feature_row(frames[code])
+            latest_rows.append(latest_data)
+            X_rows.append(X)
+
+        # 预测
+        X = np.vstack(X_rows)
+        predictions = self.catboost_model.predict(X)
+        probabilities = self.catboost_model.predict_proba(X)[:, 1]
+
+        results = {}
+        for i, code in enumerate(codes):
+            latest_data = latest_rows[i]
+            # 获取当前价格
+            current_price = latest_data['Close'].iloc[-1] if 'Close' in latest_data.columns else None
+            results[code] = {
+                'code': code,
+                'date': latest_data.index[-1],
+                'prediction': int(predictions[i]),
+                'probability': float(probabilities[i]),
+                'current_price': float(current_price) if current_price is not None else None,
+            }
+        return results
 
     def get_stock_data(self, stock_code, period_days=500):
         """获取A股股票数据"""
@@ -1786,6 +1891,12 @@ def main():
                        help='使用截面标准化标签（业界推荐用于月度预测）')
     parser.add_argument('--core-only', action='store_true',
                        help='仅预测核心持仓股（4只）')
+    parser.add_argument('--incremental', action='store_true',
+                       help='增量训练：在上一次的模型上追加树（定期完整重训）')
+    parser.add_argument('--added-trees', type=int, default=60,
+                       help='增量训练每次追加的树数量（默认60）')
+    parser.add_argument('--full-refit-every', type=int, default=10,
+                       help='连续增量训练多少次后完整重训一次（默认10）')
 
     args = parser.parse_args()
 
@@ -1795,7 +1906,12 @@ def main():
         codes = args.stocks.split(',')
 
     # 初始化模型
-    model = AStockTradingModel(horizon=args.horizon)
+    warm_start = None
+    if args.incremental:
+        warm_start = WarmStartCatBoost(
+            WarmStartPolicy(added_trees=args.added_trees, full_refit_every=args.full_refit_every),
+            state_dir=WARM_START_DIR, name=f'a_stock_catboost_{args.horizon}d')
+    model = AStockTradingModel(horizon=args.horizon, warm_start=warm_start)
 
     # 模型保存路径
     os.makedirs(A_STOCK_MODEL_DIR, exist_ok=True)
@@ -1839,21 +1955,17 @@ def main():
 
         # 保存预测结果
         if predictions:
-            from datetime import datetime, timedelta
             from a_stock_config import A_STOCK_WATCHLIST
+            from data_services.trading_calendar import get_trading_calendar
 
-            # 计算 target_date
-            def get_target_date(start_date, horizon):
-                """计算目标日期（简化版，实际交易日计算更复杂）"""
-                target = start_date + timedelta(days=horizon)
-                return target.strftime('%Y-%m-%d')
+            calendar = get_trading_calendar('a_stock')
 
             # 构建预测 DataFrame
             pred_data = []
             for pred in predictions:
                 if pred:
                     data_date = pred['date'].strftime('%Y-%m-%d') if hasattr(pred['date'], 'strftime') else str(pred['date'])
-                    target_date = get_target_date(pred['date'], args.horizon) if hasattr(pred['date'], 'timedelta') else data_date
+                    target_date = calendar.add_trading_days(data_date, args.horizon)
 
                     pred_data.append({
                         'Stock_Code': pred['code'],
@@ -106,8 +106,8 @@ class AnomalyIntegrator:
                     z_score=anomaly.get('z_score', 0)
                 )
         
-        # Save cache
-        self.cache._save_cache()
+        # Save cache (one transaction for all new entries)
+        self.cache.flush()
         
         return {
             'has_anomaly': True,
@@ -0,0 +1,264 @@
+"""
+Batch Isolation Forest engine for scoring a whole watchlist in one pass.
+Keeps a persisted pooled (or per-symbol) model that is refit on a schedule,
+scores a stacked feature matrix and filters anomalies by date with array ops.
+"""
+
+import os
+import pickle
+import pandas as pd
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+import logging
+
+from anomaly_detector.isolation_forest_detector import IsolationForestDetector, TimeInterval
+
+logger = logging.getLogger(__name__)
+
+POOLED_MODEL_KEY = '__pooled__'
+
+
+def _standardize_by_symbol(stacked: pd.DataFrame, offsets: np.ndarray) -> pd.DataFrame:
+    """Z-score each symbol's block of the stacked matrix against its own mean and std."""
+    values = stacked.to_numpy(dtype=np.float64, copy=True)
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        block = values[start:end]
+        std = block.std(axis=0)
+        values[start:end] = (block - block.mean(axis=0)) / np.where(std > 0, std, 1.0)
+    return pd.DataFrame(values, columns=stacked.columns)
+
+
+def _index_dates(index: pd.Index) -> np.ndarray:
+    """Get calendar dates of an index in its own timezone (no UTC conversion)."""
+    if isinstance(index, pd.DatetimeIndex):
+        return index.date
+    return np.array([ts.date() if hasattr(ts, 'date') else ts for ts in index], dtype=object)
+
+
+class BatchIsolationForestEngine:
+    """Persisted Isolation Forest models with batched scoring across symbols."""
+
+    def __init__(
+        self,
+        model_dir: str = 'data/anomaly_models',
+        contamination: float = 0.05,
+        random_state: int = 42,
+        refit_days: int = 7,
+        pooled: bool = True,
+        anomaly_type: str = 'stock'
+    ):
+        """
+        Initialize batch engine.
+
+        Args:
+            model_dir: Directory for persisted models (default: 'data/anomaly_models')
+            contamination: Expected proportion of outliers (default: 0.05)
+            random_state: Random seed for reproducibility (default: 42)
+            refit_days: Refit a persisted model once it is older than N days (default: 7)
+            pooled: Use one model for all symbols so fitting and scoring are a single
+                call on the stacked matrix; each symbol's features are standardized
+                against its own history first, so the pooled model still flags days
+                that are unusual for that symbol (default: True; False fits and
+                scores one model per symbol)
+            anomaly_type: Type label for anomalies (default: 'stock')
+
+        Example:
+            >>> engine = BatchIsolationForestEngine(refit_days=7, anomaly_type='stock')
+            >>> anomalies = engine.detect_anomalies_by_date(features_by_symbol, datetime(2026, 4, 3))
+        """
+        self.model_dir = model_dir
+        self.contamination = contamination
+        self.random_state = random_state
+        self.refit_days = refit_days
+        self.pooled = pooled
+        self.anomaly_type = anomaly_type
+        self.detector = IsolationForestDetector(
+            contamination=contamination,
+            random_state=random_state,
+            anomaly_type=anomaly_type
+        )
+        self._models: Dict[str, Dict] = {}
+
+    def _model_path(self, key: str) -> str:
+        """Get file path of a persisted model."""
+        safe_key = key.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.model_dir, f"if_{self.anomaly_type}_{safe_key}.pkl")
+
+    def _is_fresh(self, entry: Optional[Dict], feature_names: List[str]) -> bool:
+        """Check whether a model entry can be reused without refitting."""
+        if not entry:
+            return False
+        if entry.get('feature_names') != feature_names:
+            return False
+        if entry.get('contamination') != self.contamination:
+            return False
+        age = datetime.now() - entry.get('trained_at', datetime.min)
+        return age <= timedelta(days=self.refit_days)
+
+    def _load(self, key: str) -> Optional[Dict]:
+        """Load a persisted model entry from disk."""
+        path = self._model_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load Isolation Forest model {path}: {e}")
+            return None
+
+    def _save(self, key: str, entry: Dict):
+        """Persist a model entry to disk."""
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = self._model_path(key)
+        try:
+            with open(path, 'wb') as f:
+                pickle.dump(entry, f)
+        except Exception as e:
+            logger.warning(f"Failed to save Isolation Forest model {path}: {e}")
+
+    def get_model(self, key: str, features: pd.DataFrame, force_refit: bool = False) -> Optional[IsolationForest]:
+        """
+        Get a model for a symbol, fitting it only when missing or stale.
+
+        Args:
+            key: Symbol code (or POOLED_MODEL_KEY)
+            features: Training features used if a refit is needed
+            force_refit: Ignore persisted model and refit
+
+        Returns:
+            Fitted IsolationForest, or None if features are empty
+        """
+        feature_names = list(features.columns)
+        entry = None if force_refit else self._models.get(key)
+        if not force_refit and not self._is_fresh(entry, feature_names):
+            entry = self._load(key)
+
+        if force_refit or not self._is_fresh(entry, feature_names):
+            if features.empty:
+                logger.warning(f"Empty feature matrix provided for training {key}")
+                return None
+            model = IsolationForest(
+                contamination=self.contamination,
+                random_state=self.random_state,
+                n_estimators=100,
+                max_samples='auto'
+            )
+            model.fit(features)
+            entry = {
+                'model': model,
+                'feature_names': feature_names,
+                'contamination': self.contamination,
+                'trained_at': datetime.now(),
+                'n_samples': len(features)
+            }
+            self._save(key, entry)
+            logger.info(f"Isolation Forest refit for {key} on {len(features)} samples")
+
+        self._models[key] = entry
+        return entry['model']
+
+    def score(self, features_by_symbol: Dict[str, pd.DataFrame], force_refit: bool = False) -> pd.DataFrame:
+        """
+        Score all symbols from one stacked feature matrix.
+
+        Pooled mode standardizes each symbol's block and issues a single
+        decision_function call; per-symbol mode issues one call per persisted
+        model without refitting fresh models.
+
+        Args:
+            features_by_symbol: {symbol: feature matrix indexed by timestamp}
+            force_refit: Refit all models before scoring
+
+        Returns:
+            DataFrame with columns symbol, timestamp, date, anomaly_score, is_anomaly
+            and one row per input sample, in stacking order
+        """
+        frames = {s: f for s, f in features_by_symbol.items() if f is not None and not f.empty}
+        if not frames:
+            return pd.DataFrame(columns=['symbol', 'timestamp', 'date', 'anomaly_score', 'is_anomaly'])
+
+        symbols = list(frames.keys())
+        lengths = np.array([len(frames[s]) for s in symbols])
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        stacked = pd.concat([frames[s] for s in symbols], axis=0, ignore_index=True)
+        scores = np.empty(len(stacked), dtype=np.float64)
+
+        if self.pooled:
+            pooled = _standardize_by_symbol(stacked, offsets)
+            model = self.get_model(POOLED_MODEL_KEY, pooled, force_refit=force_refit)
+            scores[:] = model.decision_function(pooled)
+        else:
+            for i, symbol in enumerate(symbols):
+                block = stacked.iloc[offsets[i]:offsets[i + 1]]
+                model = self.get_model(symbol, block, force_refit=force_refit)
+                scores[offsets[i]:offsets[i + 1]] = model.decision_function(block)
+
+        return pd.DataFrame({
+            'symbol': np.repeat(symbols, lengths),
+            'timestamp': np.concatenate([frames[s].index.to_numpy(dtype=object) for s in symbols]),
+            'date': np.concatenate([_index_dates(frames[s].index) for s in symbols]),
+            'anomaly_score': scores,
+            # IsolationForest.predict returns -1 exactly where decision_function < 0
+            'is_anomaly': scores < 0
+        })
+
+    def detect_anomalies_by_date(
+        self,
+        features_by_symbol: Dict[str, pd.DataFrame],
+        target_date: datetime,
+        time_interval: Optional[Union[str, TimeInterval]] = None,
+        force_refit: bool = False
+    ) -> Dict[str, List[Dict]]:
+        """
+        Detect anomalies on a specific date for every symbol.
+
+        Args:
+            features_by_symbol: {symbol: feature matrix indexed by timestamp}
+            target_date: Target date to check for anomalies
+            time_interval: Time interval type for the data (for metadata)
+            force_refit: Refit all models before scoring
+
+        Returns:
+            {symbol: list of anomaly dicts}, same dict format as
+            IsolationForestDetector.detect_anomalies_by_date
+        """
+        scored = self.score(features_by_symbol, force_refit=force_refit)
+        results = {symbol: [] for symbol in features_by_symbol}
+        if scored.empty:
+            return results
+
+        target_date_only = target_date.date() if hasattr(target_date, 'date') else target_date
+        hits = np.flatnonzero(scored['is_anomaly'].to_numpy(dtype=bool) & (scored['date'].to_numpy() == target_date_only))
+
+        interval_str = (
+            time_interval.value if isinstance(time_interval, TimeInterval)
+            else time_interval if time_interval
+            else 'unknown'
+        )
+
+        for row in hits:
+            symbol = scored['symbol'].iat[row]
+            timestamp = scored['timestamp'].iat[row]
+            score = scored['anomaly_score'].iat[row]
+            feature_values = features_by_symbol[symbol].loc[timestamp]
+            if isinstance(feature_values, pd.DataFrame):
+                feature_values = feature_values.iloc[0]
+            feature_values = feature_values.to_dict()
+            results[symbol].append({
+                'timestamp': timestamp,
+                'anomaly_score': score,
+                'severity': self.detector._get_severity(score),
+                'features': feature_values,
+                'detection_method': 'isolation_forest',
+                'type': self.anomaly_type,
+                'time_interval': interval_str,
+                'feature_count': len(feature_values),
+                'feature_names': list(feature_values.keys())
+            })
+
+        logger.info(f"Batch Isolation Forest: {len(hits)} anomalies across {len(features_by_symbol)} symbols "
+                    f"on {target_date_only}")
+        return results
@@ -1,68 +1,232 @@
 """
 Cache management for anomaly detection.
 Stores reported anomalies to avoid duplicate alerts.
+
+Entries live in SQLite (WAL mode) so concurrent detectors do not serialize on
+one JSON file: writes are buffered and committed in one transaction per flush,
+exists() is an indexed lookup and TTL eviction is a single DELETE.
 """
 
 import json
-import fcntl
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+def _timestamp_epoch(timestamp_str: str) -> Optional[float]:
+    """Parse an ISO timestamp to epoch seconds (naive timestamps are UTC)."""
+    if not timestamp_str:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(timestamp_str)
+    except (TypeError, ValueError):
+        return None
+    # 如果时间戳没有时区信息，假设是 UTC
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def _split_key(cache_key: str) -> Tuple[str, str]:
+    """Split '<type>_<YYYY-MM-DD>' into (type, date_key)."""
+    anomaly_type, _, date_key = cache_key.rpartition('_')
+    return anomaly_type, date_key
+
+
+class _CacheView:
+    """Dict-like view over cache entries (pending writes included)."""
+
+    def __init__(self, owner: 'AnomalyCache'):
+        self._owner = owner
+
+    def __contains__(self, cache_key: str) -> bool:
+        return self._owner._has_key(cache_key)
+
+    def __getitem__(self, cache_key: str) -> Dict:
+        entry = self._owner.get(cache_key)
+        if entry is None:
+            raise KeyError(cache_key)
+        return entry
+
+    def __setitem__(self, cache_key: str, entry: Dict):
+        self._owner._put(cache_key, entry)
+
+    def __delitem__(self, cache_key: str):
+        if cache_key not in self:
+            raise KeyError(cache_key)
+        self._owner._delete(cache_key)
+
+    def __len__(self) -> int:
+        return self._owner.get_cache_size()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([key for key, _ in self.items()])
+
+    def get(self, cache_key: str, default=None):
+        entry = self._owner.get(cache_key)
+        return default if entry is None else entry
+
+    def keys(self) -> List[str]:
+        return list(self)
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        return self._owner.items()
+
 
 class AnomalyCache:
-    """Manages anomaly cache with file-based storage and locking."""
-    
-    def __init__(self, cache_file: str = "data/anomaly_cache.json"):
+    """Manages anomaly cache with SQLite storage and batched writes."""
+
+    def __init__(self, cache_file: str = "data/anomaly_cache.db", batch_size: int = 100):
         """
         Initialize cache.
-        
+
         Args:
-            cache_file: Path to cache file (default: data/anomaly_cache.json)
+            cache_file: Path to cache database (default: data/anomaly_cache.db).
+                A legacy JSON cache at this path, or at the same path with a
+                .json suffix, is imported on first use.
+            batch_size: Pending writes that trigger an automatic flush (default: 100)
         """
         self.cache_file = cache_file
-        self.cache: Dict[str, Dict] = {}
+        self.batch_size = batch_size
+        self._pending: Dict[str, Dict] = {}
         self._ensure_cache_dir()
-        self._load_cache()
-    
+        legacy_entries = self._read_legacy_json()
+        self._conn = sqlite3.connect(self.cache_file, timeout=30)
+        self._init_db()
+        if legacy_entries:
+            self._write_entries(legacy_entries)
+            logger.info(f"Imported {len(legacy_entries)} entries from legacy JSON cache")
+        self.cache = _CacheView(self)
+
     def _ensure_cache_dir(self):
         """Ensure cache directory exists."""
         cache_dir = os.path.dirname(self.cache_file)
         if cache_dir:
             os.makedirs(cache_dir, exist_ok=True)
-    
-    def _load_cache(self):
-        """Load cache from file with file locking."""
-        if not os.path.exists(self.cache_file):
-            self.cache = {}
+
+    def _read_legacy_json(self) -> Dict[str, Dict]:
+        """Read entries of a legacy JSON cache file, moving it out of the way."""
+        root, ext = os.path.splitext(self.cache_file)
+        candidates = [self.cache_file]
+        if ext != '.json':
+            candidates.append(root + '.json')
+
+        for path in candidates:
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                continue
+            with open(path, 'rb') as f:
+                if f.read(len(SQLITE_HEADER)) == SQLITE_HEADER:
+                    continue
+            try:
+                with open(path, 'r') as f:
+                    entries = json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load legacy cache {path}: {e}")
+                entries = {}
+            os.replace(path, path + '.migrated')
+            return entries if isinstance(entries, dict) else {}
+        return {}
+
+    def _init_db(self):
+        """Create schema and enable WAL."""
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS anomalies ("
+                " cache_key TEXT PRIMARY KEY,"
+                " anomaly_type TEXT NOT NULL,"
+                " date_key TEXT NOT NULL,"
+                " timestamp TEXT,"
+                " ts_epoch REAL,"
+                " severity TEXT,"
+                " metadata TEXT)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_anomalies_type_date ON anomalies (anomaly_type, date_key)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_anomalies_ts ON anomalies (ts_epoch)")
+
+    def _write_entries(self, entries: Dict[str, Dict]):
+        """Upsert entries in one transaction."""
+        rows = []
+        for cache_key, entry in entries.items():
+            entry = dict(entry)
+            anomaly_type, date_key = _split_key(cache_key)
+            timestamp_str = str(entry.pop('timestamp', '') or '')
+            severity = entry.pop('severity', None)
+            rows.append((
+                cache_key, anomaly_type, date_key, timestamp_str,
+                _timestamp_epoch(timestamp_str), severity,
+                json.dumps(entry, default=str)
+            ))
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO anomalies "
+                "(cache_key, anomaly_type, date_key, timestamp, ts_epoch, severity, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    @staticmethod
+    def _row_to_entry(row) -> Dict:
+        """Convert a database row to the cache entry dict."""
+        timestamp_str, severity, metadata = row
+        return {
+            'timestamp': timestamp_str,
+            'severity': severity,
+            **(json.loads(metadata) if metadata else {})
+        }
+
+    def _put(self, cache_key: str, entry: Dict):
+        """Buffer an entry write."""
+        self._pending[cache_key] = entry
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _delete(self, cache_key: str):
+        """Delete an entry (pending or stored)."""
+        self._pending.pop(cache_key, None)
+        with self._conn:
+            self._conn.execute("DELETE FROM anomalies WHERE cache_key = ?", (cache_key,))
+
+    def _has_key(self, cache_key: str) -> bool:
+        """Check an entry key (indexed lookup)."""
+        if cache_key in self._pending:
+            return True
+        row = self._conn.execute(
+            "SELECT 1 FROM anomalies WHERE cache_key = ? LIMIT 1", (cache_key,)
+        ).fetchone()
+        return row is not None
+
+    def flush(self):
+        """Write all buffered entries in one transaction."""
+        if not self._pending:
             return
-        
-        try:
-            with open(self.cache_file, 'r') as f:
-                fcntl.flock(f.fileno(), fcntl.LOCK_SH)  # Shared lock
-                self.cache = json.load(f)
-                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-        except Exception as e:
-            logger.error(f"Failed to load cache: {e}")
-            self.cache = {}
-    
-    def _save_cache(self):
-        """Save cache to file with file locking."""
         try:
-            with open(self.cache_file, 'w') as f:
-                fcntl.flock(f.fileno(), fcntl.LOCK_EX)  # Exclusive lock
-                json.dump(self.cache, f, indent=2, default=str)
-                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            self._write_entries(self._pending)
+            logger.info(f"Flushed {len(self._pending)} cache entries")
+            self._pending = {}
         except Exception as e:
             logger.error(f"Failed to save cache: {e}")
-    
+
+    def _save_cache(self):
+        """Save cache (flush buffered writes); kept for backward compatibility."""
+        self.flush()
+
     def add(self, anomaly_type: str, timestamp: datetime, severity: str, **metadata):
         """
         Add anomaly to cache.
-        
+
+        The write is buffered; call flush() (or add_batch) to commit, otherwise
+        it is committed once batch_size writes are pending or the cache is closed.
+
         Args:
             anomaly_type: Type of anomaly (e.g., 'price', 'volume')
             timestamp: When the anomaly was detected
@@ -71,68 +235,125 @@ class AnomalyCache:
         """
         date_key = timestamp.strftime('%Y-%m-%d')
         cache_key = f"{anomaly_type}_{date_key}"
-        
-        self.cache[cache_key] = {
+
+        self._put(cache_key, {
             'timestamp': timestamp.isoformat(),
             'severity': severity,
             **metadata
-        }
-        
-        self._save_cache()
+        })
         logger.info(f"Added to cache: {cache_key}")
-    
+
+    def add_batch(self, anomalies: List[Dict]):
+        """
+        Add several anomalies and commit them in one transaction.
+
+        Args:
+            anomalies: Dicts with anomaly_type, timestamp, severity and
+                optional metadata keys
+        """
+        for anomaly in anomalies:
+            anomaly = dict(anomaly)
+            self.add(
+                anomaly_type=anomaly.pop('anomaly_type'),
+                timestamp=anomaly.pop('timestamp'),
+                severity=anomaly.pop('severity'),
+                **anomaly
+            )
+        self.flush()
+
+    def get(self, cache_key: str) -> Optional[Dict]:
+        """
+        Get a cache entry by key.
+
+        Args:
+            cache_key: Key in '<type>_<YYYY-MM-DD>' format
+
+        Returns:
+            Entry dict, or None if missing
+        """
+        if cache_key in self._pending:
+            return self._pending[cache_key]
+        row = self._conn.execute(
+            "SELECT timestamp, severity, metadata FROM anomalies WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        """
+        Get all cache entries.
+
+        Returns:
+            List of (cache_key, entry dict)
+        """
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT cache_key, timestamp, severity, metadata FROM anomalies ORDER BY cache_key"
+        ).fetchall()
+        return [(row[0], self._row_to_entry(row[1:])) for row in rows]
+
     def exists(self, anomaly_type: str, date: datetime) -> bool:
         """
         Check if anomaly exists in cache.
-        
+
         Args:
             anomaly_type: Type of anomaly
             date: Date to check
-        
+
         Returns:
             True if anomaly exists in cache, False otherwise
         """
         date_key = date.strftime('%Y-%m-%d')
-        cache_key = f"{anomaly_type}_{date_key}"
-        return cache_key in self.cache
-    
+        if f"{anomaly_type}_{date_key}" in self._pending:
+            return True
+        row = self._conn.execute(
+            "SELECT 1 FROM anomalies WHERE anomaly_type = ? AND date_key = ? LIMIT 1",
+            (anomaly_type, date_key)
+        ).fetchone()
+        return row is not None
+
     def cleanup_expired(self, max_age_hours: int = 48):
         """
         Clean up expired cache entries.
-        
+
         Args:
             max_age_hours: Maximum age in hours before cleanup (default: 48)
         """
-        from datetime import timezone
-        now = datetime.now(timezone.utc)  # 使用 UTC 时区
-        expired_keys = []
-        
-        for key, entry in self.cache.items():
-            timestamp_str = entry.get('timestamp', '')
-            if not timestamp_str:
-                expired_keys.append(key)
-                continue
-            
-            try:
-                timestamp = datetime.fromisoformat(timestamp_str)
-                # 如果时间戳没有时区信息，假设是 UTC
-                if timestamp.tzinfo is None:
-                    timestamp = timestamp.replace(tzinfo=timezone.utc)
-                age = now - timestamp
-                
-                if age > timedelta(hours=max_age_hours):
-                    expired_keys.append(key)
-            except Exception as e:
-                logger.warning(f"Failed to parse timestamp for {key}: {e}")
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self.cache[key]
-        
-        if expired_keys:
-            self._save_cache()
-            logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
-    
+        self.flush()
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=max_age_hours)).timestamp()  # 使用 UTC 时区
+
+        try:
+            with self._conn:
+                deleted = self._conn.execute(
+                    "DELETE FROM anomalies WHERE ts_epoch IS NULL OR ts_epoch < ?", (cutoff,)
+                ).rowcount
+        except Exception as e:
+            logger.error(f"Failed to clean up cache: {e}")
+            return
+
+        if deleted:
+            logger.info(f"Cleaned up {deleted} expired cache entries")
+
     def get_cache_size(self) -> int:
         """Get current cache size."""
-        return len(self.cache)
\ No newline at end of file
+        self.flush()
+        return self._conn.execute("SELECT COUNT(*) FROM anomalies").fetchone()[0]
+
+    def close(self):
+        """Flush buffered writes and close the database."""
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+
+    def __enter__(self) -> 'AnomalyCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
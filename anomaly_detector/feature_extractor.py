@@ -9,6 +9,8 @@ from datetime import datetime
 from typing import Dict, Tuple
 import logging
 
+from data_services import indicator_kernels as kernels
+
 logger = logging.getLogger(__name__)
 
 
@@ -49,10 +51,10 @@ class FeatureExtractor:
         
         # Price features
         features['return_rate'] = df['Close'].pct_change()
-        features['volatility_20d'] = df['Close'].pct_change().rolling(20).std()
+        features['volatility_20d'] = kernels.rolling_std(features['return_rate'], 20)
         
         # Volume features
-        volume_ma20 = df['Volume'].rolling(20).mean()
+        volume_ma20 = kernels.rolling_mean(df['Volume'], 20)
         features['volume_ratio'] = df['Volume'] / volume_ma20
         
         # Technical indicators (if available)
@@ -78,16 +80,16 @@ class FeatureExtractor:
         if 'MA20' in df.columns:
             features['ma20_diff'] = (df['Close'] - df['MA20']) / df['MA20']
         else:
-            ma20 = df['Close'].rolling(20).mean()
+            ma20 = kernels.rolling_mean(df['Close'], 20)
             features['ma20_diff'] = (df['Close'] - ma20) / ma20
         
         if 'MA50' in df.columns:
             features['ma50_diff'] = (df['Close'] - df['MA50']) / df['MA50']
             features['ma20_ma50_diff'] = (df['MA20'] - df['MA50']) / df['MA50']
         else:
-            ma50 = df['Close'].rolling(50).mean()
+            ma50 = kernels.rolling_mean(df['Close'], 50)
             features['ma50_diff'] = (df['Close'] - ma50) / ma50
-            ma20 = df['Close'].rolling(20).mean()
+            ma20 = kernels.rolling_mean(df['Close'], 20)
             features['ma20_ma50_diff'] = (ma20 - ma50) / ma50
         
         # Clean and normalize
@@ -103,26 +105,15 @@ class FeatureExtractor:
     
     def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
         """Calculate RSI indicator."""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi.fillna(50)
+        return kernels.rsi(prices, period).fillna(50)
     
     def _calculate_macd(self, prices: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[pd.Series, pd.Series]:
         """Calculate MACD indicator."""
-        exp1 = prices.ewm(span=fast).mean()
-        exp2 = prices.ewm(span=slow).mean()
-        macd = exp1 - exp2
-        macd_signal = macd.ewm(span=signal).mean()
+        macd, macd_signal, _ = kernels.macd(prices, fast, slow, signal)
         return macd.fillna(0), macd_signal.fillna(0)
     
     def _calculate_bb_position(self, prices: pd.Series, period: int = 20, std_dev: float = 2.0) -> pd.Series:
         """Calculate Bollinger Band position."""
-        bb_middle = prices.rolling(window=period).mean()
-        bb_std = prices.rolling(window=period).std()
-        bb_upper = bb_middle + (bb_std * std_dev)
-        bb_lower = bb_middle - (bb_std * std_dev)
+        _, bb_upper, bb_lower, _ = kernels.bollinger_bands(prices, period, std_dev)
         bb_position = (prices - bb_lower) / (bb_upper - bb_lower)
         return bb_position.fillna(0.5)
\ No newline at end of file
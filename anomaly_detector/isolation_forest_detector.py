@@ -204,63 +204,42 @@ class IsolationForestDetector:
             logger.warning("Empty feature matrix provided for detection")
             return []
         
-        # Get anomaly scores and predictions
+        # Get anomaly scores; predict() is -1 exactly where decision_function < 0
         anomaly_scores = self.model.decision_function(features)
-        predictions = self.model.predict(features)
         
-        # Normalize target date to UTC for comparison
-        from datetime import timezone
-        if hasattr(target_date, 'tzinfo') and target_date.tzinfo is not None:
-            target_date_utc = target_date.astimezone(timezone.utc)
+        # 获取目标日期的date部分（不转换时区）
+        target_date_only = target_date.date() if hasattr(target_date, 'date') else target_date
+        
+        # 不转换到UTC，直接使用原始时区比较日期（向量化日期过滤）
+        timestamp_index = pd.Index(timestamps)
+        if isinstance(timestamp_index, pd.DatetimeIndex):
+            timestamp_dates = timestamp_index.date
         else:
-            target_date_utc = target_date.replace(tzinfo=timezone.utc)
+            timestamp_dates = np.array([ts.date() for ts in timestamps], dtype=object)
+        hits = np.flatnonzero((anomaly_scores < 0) & (timestamp_dates == target_date_only))
         
-        # Get date part only for comparison
-        target_date_only = target_date_utc.date()
+        # Determine time interval string
+        interval_str = (
+            time_interval.value if isinstance(time_interval, TimeInterval)
+            else time_interval if time_interval
+            else 'unknown'
+        )
         
-        # Identify anomalies (prediction = -1)
         anomalies = []
-        
-        for i, (score, pred) in enumerate(zip(anomaly_scores, predictions)):
-            if pred == -1:  # Anomaly
-                timestamp = timestamps[i]
-                
-                # 不转换到UTC，直接使用原始时区比较日期
-                # 如果timestamp没有时区，假设是香港时间（数据源默认）
-                if hasattr(timestamp, 'tzinfo') and timestamp.tzinfo is not None:
-                    timestamp_date = timestamp.date()
-                else:
-                    # 没有时区，假设是本地时间
-                    timestamp_date = timestamp.date()
-                
-                # 获取目标日期的date部分（不转换时区）
-                target_date_only = target_date.date() if hasattr(target_date, 'date') else target_date
-                
-                # Only include anomalies on the target date
-                if timestamp_date == target_date_only:
-                    severity = self._get_severity(score)
-                    
-                    # Get feature values
-                    feature_values = features.iloc[i].to_dict()
-                    
-                    # Determine time interval string
-                    interval_str = (
-                        time_interval.value if isinstance(time_interval, TimeInterval)
-                        else time_interval if time_interval
-                        else 'unknown'
-                    )
-                    
-                    anomalies.append({
-                        'timestamp': timestamp,
-                        'anomaly_score': score,
-                        'severity': severity,
-                        'features': feature_values,
-                        'detection_method': 'isolation_forest',
-                        'type': self.anomaly_type,
-                        'time_interval': interval_str,
-                        'feature_count': len(feature_values),
-                        'feature_names': list(feature_values.keys())
-                    })
+        for i in hits:
+            score = anomaly_scores[i]
+            feature_values = features.iloc[i].to_dict()
+            anomalies.append({
+                'timestamp': timestamps[i],
+                'anomaly_score': score,
+                'severity': self._get_severity(score),
+                'features': feature_values,
+                'detection_method': 'isolation_forest',
+                'type': self.anomaly_type,
+                'time_interval': interval_str,
+                'feature_count': len(feature_values),
+                'feature_names': list(feature_values.keys())
+            })
         
         # 调整日志消息：明确显示目标日期和实际检测结果
         if anomalies:
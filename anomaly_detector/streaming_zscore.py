@@ -0,0 +1,411 @@
+"""
+Streaming Z-Score anomaly detector.
+Keeps running window moments in a ring buffer so each new bar is an O(1) update,
+persists the state per (symbol, metric, interval) between runs and offers a
+vectorized batch mode for backfills.
+"""
+
+import json
+import fcntl
+import os
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+import logging
+
+from anomaly_detector.zscore_detector import ZScoreDetector, TimeInterval
+
+logger = logging.getLogger(__name__)
+
+
+def _index_to_utc_naive(index: pd.Index) -> pd.DatetimeIndex:
+    """Normalize a datetime index to naive UTC."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index
+
+
+class RollingMoments:
+    """Fixed-size window mean/variance with O(1) push (sliding Welford)."""
+
+    def __init__(self, window_size: int):
+        """
+        Initialize empty window.
+
+        Args:
+            window_size: Number of observations in the window
+        """
+        self.window_size = window_size
+        self.buffer = np.zeros(window_size, dtype=np.float64)
+        self.head = 0  # Slot the next value is written to
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._pushes = 0
+
+    def push(self, value: float):
+        """
+        Add a value, evicting the oldest one once the window is full.
+
+        Args:
+            value: New observation
+        """
+        value = float(value)
+        if self.count < self.window_size:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        else:
+            old = self.buffer[self.head]
+            old_mean = self.mean
+            self.mean += (value - old) / self.window_size
+            self.m2 += (value - old) * (value - self.mean + old - old_mean)
+        self.buffer[self.head] = value
+        self.head = (self.head + 1) % self.window_size
+
+        # Rebuild from the buffer once per window to stop rounding drift
+        self._pushes += 1
+        if self._pushes >= self.window_size:
+            self._recompute()
+
+    def replace_last(self, value: float):
+        """
+        Overwrite the most recent value (e.g. a still-forming bar that changed).
+
+        Args:
+            value: Updated value of the latest observation
+        """
+        if self.count == 0:
+            self.push(value)
+            return
+        last = (self.head - 1) % self.window_size
+        old = self.buffer[last]
+        value = float(value)
+        old_mean = self.mean
+        self.mean += (value - old) / self.count
+        self.m2 += (value - old) * (value - self.mean + old - old_mean)
+        self.buffer[last] = value
+
+    def _recompute(self):
+        """Recompute moments exactly from the buffer contents."""
+        values = self.values()
+        self.mean = float(values.mean()) if len(values) else 0.0
+        self.m2 = float(((values - self.mean) ** 2).sum()) if len(values) else 0.0
+        self._pushes = 0
+
+    def values(self) -> np.ndarray:
+        """Get window values in chronological order."""
+        if self.count < self.window_size:
+            return self.buffer[:self.count].copy()
+        return np.roll(self.buffer, -self.head)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, same as pandas)."""
+        if self.count < 2:
+            return float('nan')
+        return float(np.sqrt(max(self.m2, 0.0) / (self.count - 1)))
+
+    def to_dict(self) -> Dict:
+        """Serialize window state."""
+        return {'values': self.values().tolist()}
+
+    @classmethod
+    def from_values(cls, window_size: int, values) -> 'RollingMoments':
+        """Build window state from chronological values (only the last window_size are kept)."""
+        moments = cls(window_size)
+        tail = np.asarray(values, dtype=np.float64)[-window_size:]
+        moments.count = len(tail)
+        moments.buffer[:moments.count] = tail
+        moments.head = moments.count % window_size
+        moments._recompute()
+        return moments
+
+
+class StreamingZScoreDetector(ZScoreDetector):
+    """Z-Score detector with persisted per-series running moments."""
+
+    def __init__(
+        self,
+        window_size: int = 30,
+        threshold: float = 3.0,
+        time_interval: Union[str, TimeInterval] = 'day',
+        state_file: str = 'data/zscore_state.json'
+    ):
+        """
+        Initialize streaming detector.
+
+        Args:
+            window_size: Rolling window size (number of intervals)
+            threshold: Z-Score threshold for anomaly detection (default: 3.0)
+            time_interval: Time interval type ('minute', 'hour', 'day', 'week')
+            state_file: Path of the persisted window state (default: data/zscore_state.json)
+
+        Example:
+            >>> detector = StreamingZScoreDetector(window_size=72, time_interval='hour')
+            >>> anomaly = detector.detect_anomaly('price', 65000.0, hist['Close'],
+            ...                                   timestamp=datetime.now(), symbol='BTC-USD')
+            >>> detector.save_state()
+        """
+        super().__init__(window_size=window_size, threshold=threshold, time_interval=time_interval)
+        self.state_file = state_file
+        self._windows: Dict[str, RollingMoments] = {}
+        self._last_timestamps: Dict[str, pd.Timestamp] = {}
+        self._dirty: set = set()
+        self._state: Dict[str, Dict] = {}
+        self._load_state()
+
+    def _state_key(self, symbol: str, metric_name: str, time_interval=None) -> str:
+        """Build the state key for a (symbol, metric, interval) series."""
+        interval = time_interval or self.time_interval
+        interval_str = interval.value if isinstance(interval, TimeInterval) else interval
+        return f"{symbol}|{metric_name}|{interval_str}"
+
+    def _load_state(self):
+        """Load persisted window state with a shared lock."""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+                self._state = json.load(f)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        except Exception as e:
+            logger.error(f"Failed to load Z-Score state: {e}")
+            self._state = {}
+
+    def _get_window(self, key: str) -> Optional[RollingMoments]:
+        """Get in-memory window for a key, restoring it from persisted state."""
+        if key in self._windows:
+            return self._windows[key]
+        entry = self._state.get(key)
+        if not entry or entry.get('window_size') != self.window_size:
+            return None
+        self._windows[key] = RollingMoments.from_values(self.window_size, entry['values'])
+        self._last_timestamps[key] = pd.Timestamp(entry['last_timestamp'])
+        return self._windows[key]
+
+    def has_state(self, symbol: str, metric_name: str, time_interval=None) -> bool:
+        """
+        Check whether a series has a persisted window.
+
+        Args:
+            symbol: Series identifier (e.g. 'BTC-USD', '0700.HK')
+            metric_name: Metric name (e.g. 'price', 'volume')
+            time_interval: Interval (defaults to detector interval)
+
+        Returns:
+            True if an up-to-date window exists for this window size
+        """
+        return self._get_window(self._state_key(symbol, metric_name, time_interval)) is not None
+
+    def update(self, symbol: str, metric_name: str, history: pd.Series, time_interval=None) -> RollingMoments:
+        """
+        Bring a series window up to date with the bars in history.
+
+        Only bars newer than the last seen timestamp are pushed, so a run that
+        sees one new bar costs O(1). A changed value of the last seen bar (a
+        still-forming candle) replaces it in place. If the stored state cannot
+        be continued (no state, or a gap longer than the history), the window
+        is seeded from history.tail(window_size).
+
+        Args:
+            symbol: Series identifier
+            metric_name: Metric name
+            history: Historical data (index: datetime, values: numeric)
+            time_interval: Interval (defaults to detector interval)
+
+        Returns:
+            Updated RollingMoments for the series
+        """
+        key = self._state_key(symbol, metric_name, time_interval)
+        history = history.dropna()
+        if history.empty:
+            return self._get_window(key)
+
+        index = _index_to_utc_naive(history.index)
+        values = history.to_numpy(dtype=np.float64)
+        window = self._get_window(key)
+
+        if window is not None:
+            last_ts = self._last_timestamps[key]
+            first_new = int(np.searchsorted(index.values, np.datetime64(last_ts), side='right'))
+            # The last seen bar must still be in history to continue the stream
+            if first_new > 0 and index[first_new - 1] == last_ts:
+                if values[first_new - 1] != window.buffer[(window.head - 1) % self.window_size]:
+                    window.replace_last(values[first_new - 1])
+                    self._dirty.add(key)
+                for value in values[first_new:]:
+                    window.push(value)
+                if first_new < len(values):
+                    self._last_timestamps[key] = index[-1]
+                    self._dirty.add(key)
+                return window
+            if first_new == len(values):
+                # History ends before the stored state (e.g. a past target date):
+                # score against it without touching the stored stream
+                return RollingMoments.from_values(self.window_size, values)
+
+        window = RollingMoments.from_values(self.window_size, values)
+        self._windows[key] = window
+        self._last_timestamps[key] = index[-1]
+        self._dirty.add(key)
+        return window
+
+    def detect_anomaly(
+        self,
+        metric_name: str,
+        current_value: float,
+        history: pd.Series,
+        timestamp: datetime,
+        time_interval: Optional[Union[str, TimeInterval]] = None,
+        symbol: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Detect anomaly using the persisted running window of a series.
+
+        Same result as ZScoreDetector.detect_anomaly; without a symbol the
+        stateless computation is used.
+
+        Args:
+            metric_name: Name of the metric being monitored (e.g., 'price', 'volume')
+            current_value: Current value of the metric
+            history: Recent historical data (only bars newer than the stored state are read)
+            timestamp: Detection timestamp
+            time_interval: Time interval for window (overrides detector default)
+            symbol: Series identifier for the persisted state
+
+        Returns:
+            Anomaly dict if detected, None otherwise
+        """
+        if symbol is None:
+            return super().detect_anomaly(metric_name, current_value, history, timestamp, time_interval)
+
+        window = self.update(symbol, metric_name, history, time_interval)
+        if window is None or window.count < self.window_size:
+            logger.warning(
+                f"Insufficient data for Z-Score ({symbol} {metric_name}): "
+                f"{0 if window is None else window.count} < {self.window_size}"
+            )
+            return None
+
+        mean = window.mean
+        std = window.std
+        if std == 0 or np.isnan(std):
+            logger.warning(f"Standard deviation is zero for {metric_name}")
+            return None
+
+        z_score = (current_value - mean) / std
+        if abs(z_score) >= self.threshold:
+            interval = time_interval or self.time_interval
+            return {
+                'type': metric_name,
+                'timestamp': timestamp,
+                'severity': self._get_severity(z_score),
+                'z_score': z_score,
+                'value': current_value,
+                'mean': mean,
+                'std': std,
+                'window_size': self.window_size,
+                'time_interval': interval.value if isinstance(interval, TimeInterval) else interval,
+                'detection_method': 'zscore'
+            }
+        return None
+
+    def save_state(self):
+        """
+        Persist updated windows.
+
+        Only windows touched in this run are written; entries written by
+        other processes in the meantime are kept.
+        """
+        if not self._dirty:
+            return
+        state_dir = os.path.dirname(self.state_file)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        try:
+            with open(self.state_file, 'a+') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                f.seek(0)
+                content = f.read()
+                state = json.loads(content) if content.strip() else {}
+                for key in self._dirty:
+                    state[key] = {
+                        **self._windows[key].to_dict(),
+                        'window_size': self.window_size,
+                        'last_timestamp': self._last_timestamps[key].isoformat()
+                    }
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            self._state = state
+            self._dirty.clear()
+        except Exception as e:
+            logger.error(f"Failed to save Z-Score state: {e}")
+
+    def detect_history(self, metric_name: str, history: pd.Series) -> pd.DataFrame:
+        """
+        Flag a whole history in one vectorized pass (for backfills).
+
+        Each bar is scored against the window ending at that bar, which is
+        what detect_anomaly returns when run bar by bar with history up to
+        and including the bar as current value.
+
+        Args:
+            metric_name: Metric name (stored in the 'type' column)
+            history: Historical data (index: datetime, values: numeric)
+
+        Returns:
+            DataFrame indexed like history with columns value, mean, std,
+            z_score, is_anomaly, severity and type
+        """
+        rolling = history.rolling(self.window_size, min_periods=self.window_size)
+        mean = rolling.mean()
+        std = rolling.std()
+        z_score = (history - mean) / std.where(std > 0)
+        abs_z = z_score.abs()
+        severity = np.where(abs_z >= 4.0, 'high', np.where(abs_z >= 3.0, 'medium', 'low'))
+        return pd.DataFrame({
+            'type': metric_name,
+            'value': history,
+            'mean': mean,
+            'std': std,
+            'z_score': z_score,
+            'is_anomaly': (abs_z >= self.threshold).to_numpy(),
+            'severity': np.where(z_score.isna(), None, severity)
+        }, index=history.index)
+
+    def backfill_anomalies(self, metric_name: str, history: pd.Series) -> List[Dict]:
+        """
+        List anomalies of a whole history in ZScoreDetector dict format.
+
+        Args:
+            metric_name: Metric name
+            history: Historical data (index: datetime, values: numeric)
+
+        Returns:
+            List of anomaly dicts, one per flagged bar
+        """
+        flagged = self.detect_history(metric_name, history)
+        flagged = flagged[flagged['is_anomaly']]
+        interval_str = self.time_interval.value if isinstance(self.time_interval, TimeInterval) else self.time_interval
+        return [
+            {
+                'type': metric_name,
+                'timestamp': ts,
+                'severity': row.severity,
+                'z_score': row.z_score,
+                'value': row.value,
+                'mean': row.mean,
+                'std': row.std,
+                'window_size': self.window_size,
+                'time_interval': interval_str,
+                'detection_method': 'zscore'
+            }
+            for ts, row in zip(flagged.index, flagged.itertuples(index=False))
+        ]
@@ -29,6 +29,7 @@ from config import WATCHLIST, STOCK_SECTOR_MAPPING, SECTOR_NAME_MAPPING
 
 # 导入交易日历工具
 from data_services.calendar_features import get_last_trading_day
+from data_services.trading_calendar import get_trading_calendar
 
 # 从WATCHLIST提取股票名称映射
 STOCK_NAMES = WATCHLIST
@@ -44,6 +45,7 @@ except ImportError:
 
 # 股票雷达图模块
 from scripts.stock_radar import compute_hk_stock_dimensions, _generate_radar_png_bytes
+from scripts.chart_service import get_chart_service
 from message_services.email_sender import send_email_with_images
 
 try:
@@ -71,7 +73,8 @@ except ImportError:
 
 # 导入 ML 模型（用于三周期预测）
 try:
-    from ml_services.ml_trading_model import CatBoostModel
+    from ml_services.ml_trading_model import CatBoostModel, predict_multi_horizon
+    from ml_services.model_registry import model_exists
     ML_MODEL_AVAILABLE = True
 except ImportError:
     ML_MODEL_AVAILABLE = False
@@ -261,50 +264,22 @@ def check_transmission_mode(stock_code, data_date):
     import json
     from datetime import datetime, timedelta
 
-    history_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prediction_history.json')
+    history_db = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prediction_history.db')
 
-    # 计算5个交易日前的日期
-    try:
-        import akshare as ak
-        df = ak.tool_trade_date_hist_sina()
-        trading_dates = df['trade_date'].astype(str).tolist()
-
-        # 找到当前日期在交易日列表中的位置，往前推5个交易日
-        current_date_str = data_date if isinstance(data_date, str) else data_date.strftime('%Y-%m-%d')
-
-        # 如果当前日期不在交易日列表中，找最近的交易日
-        if current_date_str in trading_dates:
-            current_idx = trading_dates.index(current_date_str)
-        else:
-            # 找最近的交易日
-            for i, d in enumerate(trading_dates):
-                if d >= current_date_str:
-                    current_idx = i
-                    break
-            else:
-                current_idx = len(trading_dates) - 1
-
-        # 往前推5个交易日
-        target_idx = max(0, current_idx - 5)
-        prediction_date = trading_dates[target_idx]
-    except Exception as e:
-        # 回退到自然日计算
-        if isinstance(data_date, str):
-            data_date_obj = datetime.strptime(data_date, '%Y-%m-%d')
-        else:
-            data_date_obj = data_date
-        prediction_date = (data_date_obj - timedelta(days=7)).strftime('%Y-%m-%d')
+    # 计算5个交易日前的日期（当前日期不是交易日时从下一个交易日往前推）
+    calendar = get_trading_calendar('hk')
+    prediction_date = calendar.add_trading_days(calendar.next_session(data_date, inclusive=True), -5)
 
-    if not os.path.exists(history_file):
+    from ml_services.prediction_store import PredictionStore, history_exists
+    if not history_exists(history_db):
         return {'transmission_mode': False, 'pred_1d_correct': None, 'pred_5d_correct': None, 'pred_20d_correct': None,
                 'pred_1d_direction': None, 'pred_5d_direction': None, 'pred_20d_direction': None,
                 'prediction_date': prediction_date}
 
     try:
-        with open(history_file, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-
-        predictions = history.get('predictions', [])
+        # 按索引只读取预测日期当天的记录
+        with PredictionStore(history_db) as store:
+            predictions = store.load_records(start_date=prediction_date, end_date=prediction_date)
 
         # 查找该股票在5个交易日前的1天、5天、20天预测
         pred_1d = None
@@ -622,7 +597,7 @@ def load_multi_horizon_models():
 
     missing_models = []
     for horizon, filepath in model_files.items():
-        if os.path.exists(filepath):
+        if model_exists(filepath):
             try:
                 model = CatBoostModel()
                 model.load_model(filepath)
@@ -648,23 +623,17 @@ def load_multi_horizon_models():
     return models
 
 
-def predict_three_horizons(stock_code, models=None):
+def _build_three_horizon_result(stock_code, predictions):
     """
-    对单只股票进行三周期预测
+    根据各周期预测结果组装三周期结果和模式
 
     参数:
-    - stock_code: 股票代码（如 '0005.HK'）
-    - models: 模型字典（如果为 None 则自动加载）
+    - stock_code: 股票代码
+    - predictions: {周期: 模型预测结果或 None}
 
     返回:
-    - dict: 包含三个周期预测结果和模式，失败返回 None
+    - dict: 三个周期都预测成功时返回结果，否则返回 None
     """
-    if models is None:
-        models = load_multi_horizon_models()
-
-    if models is None:
-        return None
-
     result = {
         'code': stock_code,
         'predictions': {},
@@ -672,26 +641,16 @@ def predict_three_horizons(stock_code, models=None):
         'pattern_info': None
     }
 
-    # 对每个周期进行预测
     success_count = 0
     for horizon in [1, 5, 20]:
-        if horizon in models:
-            try:
-                pred = models[horizon].predict(stock_code)
-                if pred:
-                    result['predictions'][horizon] = {
-                        'prediction': pred.get('prediction', 0),
-                        'probability': pred.get('probability', 0.5),
-                        'direction': '↑' if pred.get('prediction') == 1 else '↓'
-                    }
-                    success_count += 1
-            except KeyError as e:
-                # 特征不匹配，跳过此周期
-                print(f"  ⚠️ {stock_code} {horizon}d 模型特征不匹配，跳过")
-                result['predictions'][horizon] = None
-            except Exception as e:
-                print(f"  ⚠️ 预测 {stock_code} {horizon}d 失败: {str(e)[:50]}")
-                result['predictions'][horizon] = None
+        pred = predictions.get(horizon)
+        if pred:
+            result['predictions'][horizon] = {
+                'prediction': pred.get('prediction', 0),
+                'probability': pred.get('probability', 0.5),
+                'direction': '↑' if pred.get('prediction') == 1 else '↓'
+            }
+            success_count += 1
         else:
             result['predictions'][horizon] = None
 
@@ -710,6 +669,47 @@ def predict_three_horizons(stock_code, models=None):
     return None
 
 
+def predict_three_horizons_batch(stock_codes, models=None):
+    """
+    对多只股票进行三周期预测（每只股票只构建一次特征，所有周期批量评分）
+
+    参数:
+    - stock_codes: 股票代码列表
+    - models: 模型字典（如果为 None 则自动加载）
+
+    返回:
+    - dict: {股票代码: 三周期结果}，只包含三个周期都预测成功的股票
+    """
+    if models is None:
+        models = load_multi_horizon_models()
+
+    if models is None:
+        return {}
+
+    predictions = predict_multi_horizon(models, stock_codes)
+
+    results = {}
+    for stock_code in stock_codes:
+        result = _build_three_horizon_result(stock_code, predictions.get(stock_code, {}))
+        if result:
+            results[stock_code] = result
+    return results
+
+
+def predict_three_horizons(stock_code, models=None):
+    """
+    对单只股票进行三周期预测
+
+    参数:
+    - stock_code: 股票代码（如 '0005.HK'）
+    - models: 模型字典（如果为 None 则自动加载）
+
+    返回:
+    - dict: 包含三个周期预测结果和模式，失败返回 None
+    """
+    return predict_three_horizons_batch([stock_code], models).get(stock_code)
+
+
 def safe_float_format(value, format_spec='.2f', default=''):
     """
     安全地格式化浮点数值，处理可能的字符串或非数值类型
@@ -1010,13 +1010,11 @@ def extract_ml_predictions(filepath, use_cached_predictions=False):
                 if three_horizon_models:
                     print(f"  ✅ 成功加载 {len([k for k in three_horizon_models.keys() if k != 'loaded'])} 个模型")
                     print("  🔄 进行三周期预测...")
-                    for stock_code in df_catboost['code'].tolist():
-                        try:
-                            pred_result = predict_three_horizons(stock_code, three_horizon_models)
-                            if pred_result:
-                                three_horizon_results[stock_code] = pred_result
-                        except Exception as e:
-                            print(f"  ⚠️ 预测 {stock_code} 失败: {e}")
+                    try:
+                        three_horizon_results = predict_three_horizons_batch(
+                            df_catboost['code'].tolist(), three_horizon_models)
+                    except Exception as e:
+                        print(f"  ⚠️ 三周期批量预测失败: {e}")
                     print(f"  ✅ 完成三周期预测: {len(three_horizon_results)} 只股票")
                 else:
                     print("  ⚠️ 无法加载三周期模型，将仅显示20天预测")
@@ -5692,6 +5690,8 @@ def run_comprehensive_analysis(llm_filepath, ml_filepath, output_filepath=None,
                     if stock_results:
                         # 生成六边形雷达图（嵌入个股卡片）
                         radar_attachments = {}
+                        radar_stocks = []
+                        radar_jobs = []
                         for sd in stock_results:
                             code = sd.get('code', '')
                             if code in three_horizon_results:
@@ -5703,12 +5703,18 @@ def run_comprehensive_analysis(llm_filepath, ml_filepath, output_filepath=None,
                                     )
                                     if max(dims.values()) >= 10:
                                         name = sd.get('name', code)
-                                        png_bytes = _generate_radar_png_bytes(name, code, dims, size=160)
-                                        cid = f"radar_{code.replace('.', '_')}"
-                                        radar_attachments[cid] = png_bytes
-                                        sd['radar_cid'] = cid
+                                        radar_stocks.append(sd)
+                                        radar_jobs.append((_generate_radar_png_bytes, (name, code, dims), {'size': 160}))
                                 except Exception as e:
                                     print(f"  [radar] Warning: {code} radar chart failed: {e}")
+                        # 一次批量渲染（内容哈希缓存，图表多时并行）
+                        for sd, png_bytes in zip(radar_stocks, get_chart_service().render_many(radar_jobs)):
+                            if png_bytes is None:
+                                print(f"  [radar] Warning: {sd.get('code', '')} radar chart failed")
+                                continue
+                            cid = f"radar_{sd.get('code', '').replace('.', '_')}"
+                            radar_attachments[cid] = png_bytes
+                            sd['radar_cid'] = cid
 
                         # 生成详细个股分析 HTML
                         detailed_html = generate_detailed_stock_email(stock_results, market_info, date_str)
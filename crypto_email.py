@@ -24,6 +24,7 @@ except ImportError:
 # Anomaly detection imports
 try:
     from anomaly_detector.zscore_detector import ZScoreDetector
+    from anomaly_detector.streaming_zscore import StreamingZScoreDetector
     from anomaly_detector.isolation_forest_detector import IsolationForestDetector
     from anomaly_detector.feature_extractor import FeatureExtractor
     from anomaly_detector.anomaly_integrator import AnomalyIntegrator
@@ -360,7 +361,8 @@ def _detect_single_crypto_anomaly(crypto_name, crypto_symbol, prices, use_deep_a
     
     try:
         # Initialize components
-        zscore_detector = ZScoreDetector(window_size=72, threshold=3.0, time_interval='hour')
+        # 流式 Z-Score：滚动窗口状态按 (币种, 指标, 周期) 持久化，每次只追加新K线
+        zscore_detector = StreamingZScoreDetector(window_size=72, threshold=3.0, time_interval='hour')
         
         # 只在深度分析模式下初始化 Isolation Forest
         if_detector = None
@@ -377,9 +379,12 @@ def _detect_single_crypto_anomaly(crypto_name, crypto_symbol, prices, use_deep_a
         cache = AnomalyCache()
         integrator = AnomalyIntegrator(cache)
         
-        # Get historical data (小时级数据，1个月)
+        # Get historical data (小时级数据；已有窗口状态时快速模式只需最近几天)
+        has_state = (zscore_detector.has_state(crypto_symbol, 'price')
+                     and zscore_detector.has_state(crypto_symbol, 'volume'))
+        period = "5d" if has_state and not use_deep_analysis else "1mo"
         ticker = yf.Ticker(crypto_symbol)
-        hist = ticker.history(period="1mo", interval='1h')
+        hist = ticker.history(period=period, interval='1h')
         
         if hist.empty:
             print(f"⚠️ {crypto_symbol} 历史数据不可用")
@@ -395,7 +400,8 @@ def _detect_single_crypto_anomaly(crypto_name, crypto_symbol, prices, use_deep_a
             current_value=current_price,
             history=hist['Close'],
             timestamp=target_dt,
-            time_interval='hour'
+            time_interval='hour',
+            symbol=crypto_symbol
         )
         if price_anomaly:
             zscore_anomalies.append(price_anomaly)
@@ -408,11 +414,14 @@ def _detect_single_crypto_anomaly(crypto_name, crypto_symbol, prices, use_deep_a
                 current_value=current_volume,
                 history=hist['Volume'],
                 timestamp=target_dt,
-                time_interval='hour'
+                time_interval='hour',
+                symbol=crypto_symbol
             )
             if volume_anomaly:
                 zscore_anomalies.append(volume_anomaly)
         
+        zscore_detector.save_state()
+        
         # Run Isolation Forest detection (Layer 2)
         if_anomalies = []
         
@@ -13,7 +13,7 @@
 - 台风季效应
 - 当月剩余交易日
 
-数据来源：AKShare 交易日历
+数据来源：本地交易日历服务（data_services/trading_calendar.py）
 """
 
 import os
@@ -25,6 +25,8 @@ from datetime import datetime, timedelta
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from data_services.trading_calendar import HK_HOLIDAYS, get_trading_calendar
+
 # 港股主要假期（每年需更新，此处定义固定规则 + 近年具体日期）
 # 春节通常在1月下旬到2月中旬
 # 国庆节：10月1-7日
@@ -37,51 +39,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 class CalendarFeatureCalculator:
     """港股日历效应特征计算器"""
 
-    # 港股特有假期定义（近3年的具体日期，远期用规则近似）
-    HK_HOLIDAYS_2024 = [
-        '2024-01-01',  # 元旦
-        '2024-02-10', '2024-02-12', '2024-02-13',  # 春节
-        '2024-03-29', '2024-03-30',  # 复活节
-        '2024-04-04',  # 清明节
-        '2024-05-01',  # 劳动节
-        '2024-05-15',  # 佛诞
-        '2024-06-10',  # 端午节
-        '2024-07-01',  # 回归日
-        '2024-09-18',  # 中秋节翌日
-        '2024-10-01',  # 国庆节
-        '2024-10-11',  # 重阳节
-        '2024-12-25', '2024-12-26',  # 圣诞节
-    ]
-
-    HK_HOLIDAYS_2025 = [
-        '2025-01-01',  # 元旦
-        '2025-01-29', '2025-01-30', '2025-01-31',  # 春节
-        '2025-04-04',  # 清明节
-        '2025-04-18', '2025-04-19',  # 复活节
-        '2025-05-01',  # 劳动节
-        '2025-05-05',  # 佛诞
-        '2025-05-31',  # 端午节
-        '2025-07-01',  # 回归日
-        '2025-10-01',  # 国庆节
-        '2025-10-07',  # 重阳节
-        '2025-10-29',  # 中秋节翌日
-        '2025-12-25', '2025-12-26',  # 圣诞节
-    ]
-
-    HK_HOLIDAYS_2026 = [
-        '2026-01-01',  # 元旦
-        '2026-02-17', '2026-02-18', '2026-02-19',  # 春节
-        '2026-04-03',  # 清明节
-        '2026-04-05', '2026-04-06',  # 复活节
-        '2026-05-01',  # 劳动节
-        '2026-05-24',  # 佛诞
-        '2026-06-19',  # 端午节
-        '2026-07-01',  # 回归日
-        '2026-10-01',  # 国庆节
-        '2026-10-25',  # 重阳节
-        '2026-10-06',  # 中秋节翌日
-        '2026-12-25', '2026-12-26',  # 圣诞节
-    ]
+    # 港股特有假期定义（近3年的具体日期，由交易日历服务统一维护）
+    HK_HOLIDAYS_2024 = HK_HOLIDAYS[2024]
+    HK_HOLIDAYS_2025 = HK_HOLIDAYS[2025]
+    HK_HOLIDAYS_2026 = HK_HOLIDAYS[2026]
 
     def __init__(self):
         self._trading_days = None
@@ -99,21 +60,10 @@ class CalendarFeatureCalculator:
         return self._holidays
 
     def _get_trading_days(self):
-        """获取交易日历（使用 AKShare）"""
-        if self._trading_days is not None:
-            return self._trading_days
-
-        try:
-            import akshare as ak
-            # 获取A股交易日历（港股交易日基本与A股重合，主要差异在港股特有假期）
-            df = ak.tool_trade_date_hist_sina()
-            self._trading_days = pd.to_datetime(df['trade_date'])
-        except Exception as e:
-            print(f"  ⚠️ AKShare交易日历获取失败: {e}，使用简单估算")
-            # 回退：生成简单的工作日日历
-            dates = pd.date_range('2020-01-01', '2026-12-31', freq='B')
-            self._trading_days = dates
-
+        """获取港股交易日历（本地交易日历服务，无需网络请求）"""
+        if self._trading_days is None:
+            calendar = get_trading_calendar('hk')
+            self._trading_days = pd.DatetimeIndex(calendar.sessions.astype('datetime64[D]'))
         return self._trading_days
 
     def _get_options_expiry_dates(self, year, month):
@@ -335,32 +285,8 @@ def get_last_trading_day(date=None):
     if current_time < market_open_time:
         date = date - timedelta(days=1)
 
-    date_str = date.strftime('%Y-%m-%d')
-
-    try:
-        import akshare as ak
-        df = ak.tool_trade_date_hist_sina()
-        trading_dates = df['trade_date'].astype(str).tolist()
-
-        # 如果当天是交易日，返回当天
-        if date_str in trading_dates:
-            return date_str
-
-        # 否则找前一个交易日
-        past_trading_dates = [d for d in trading_dates if d <= date_str]
-        if past_trading_dates:
-            return past_trading_dates[-1]
-        else:
-            # 如果没有历史交易日，返回当天
-            return date_str
-
-    except Exception as e:
-        print(f"⚠️ 获取交易日历失败: {e}，使用工作日估算")
-        # 回退：向前找最近的工作日
-        current = date
-        while current.weekday() >= 5:  # 周六=5, 周日=6
-            current -= timedelta(days=1)
-        return current.strftime('%Y-%m-%d')
+    # 当天是交易日则返回当天，否则返回前一个交易日
+    return get_trading_calendar('hk').previous_session(date, inclusive=True)
 
 
 # 日历效应特征配置（用于 FEATURE_CONFIG）
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技术指标计算内核
+
+各分析器（TechnicalAnalyzer、hk_smart_money_tracker、A股综合分析、异常检测特征、恒指邮件）共用的
+均线、RSI、MACD、布林带、ATR、随机指标实现：
+- 输入为 float64 连续数组（一维，或二维 日期×股票），也接受 Series/DataFrame，输出保持相同类型和索引
+- 滚动均值/求和用前缀和一次完成（同一序列的多个周期共享前缀和），滚动标准差/极值用滑动窗口视图
+- EMA 递推按列向量化，安装了 numba 时用 JIT 编译；compute_indicators 把所有 EMA（MACD 快慢线、
+  Wilder RSI、Wilder ATR）合并为一次递推
+- 语义与 pandas 的 rolling / ewm 一致（min_periods、NaN、adjust、窗口内含 inf 时为 NaN、常数窗口），
+  原有各实现的差异（简单平均 RSI 与 Wilder RSI、MACD 是否 adjust、布林带是否滞后一天等）用参数表达
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# ==================== 输入输出 ====================
+
+def _prepare(x):
+    """
+    转换为 (日期, 列) 的 float64 连续数组
+
+    返回:
+    - (二维数组, 还原函数)：还原函数把同形状的二维结果转换回输入的类型（Series/DataFrame/数组）
+    """
+    if isinstance(x, pd.Series):
+        index, name = x.index, x.name
+        return (np.ascontiguousarray(x.to_numpy(dtype=float)).reshape(-1, 1),
+                lambda a: pd.Series(a[:, 0], index=index, name=name))
+    if isinstance(x, pd.DataFrame):
+        index, columns = x.index, x.columns
+        return (np.ascontiguousarray(x.to_numpy(dtype=float)),
+                lambda a: pd.DataFrame(a, index=index, columns=columns))
+    a = np.asarray(x, dtype=float)
+    if a.ndim == 1:
+        return np.ascontiguousarray(a).reshape(-1, 1), lambda r: r[:, 0]
+    return np.ascontiguousarray(a), lambda r: r
+
+
+def _shift(a, periods=1):
+    """沿日期方向平移（空出的位置为 NaN）"""
+    if periods == 0:
+        return a
+    out = np.full_like(a, np.nan)
+    if periods > 0:
+        out[periods:] = a[:-periods]
+    else:
+        out[:periods] = a[-periods:]
+    return out
+
+
+def _window_sum(prefix, window):
+    """由前缀和（首行为 0）得到长度为 window 的窗口和"""
+    n = prefix.shape[0] - 1
+    out = prefix[1:].copy()
+    if window < n:
+        out[window:] -= prefix[1:n + 1 - window]
+    return out
+
+
+# ==================== 滚动统计 ====================
+
+class _PrefixSums:
+    """
+    一个序列的前缀和（同一序列的多个窗口共享）
+
+    以列均值为参考点累加偏差，降低长序列前缀和的舍入误差；同时记录有效值个数、负值个数、
+    inf 个数和连续相同值的长度，用于还原 pandas rolling 的边界语义。
+    """
+
+    def __init__(self, a):
+        finite = np.isfinite(a)
+        observed = ~np.isnan(a)
+        with np.errstate(invalid='ignore'):
+            ref = np.nanmean(np.where(finite, a, np.nan), axis=0) if a.shape[0] else np.zeros(a.shape[1])
+        self.ref = np.nan_to_num(ref)
+        zeros = np.zeros((1, a.shape[1]))
+        self.sum = np.vstack([zeros, np.cumsum(np.where(finite, a - self.ref, 0.0), axis=0)])
+        self.count = np.vstack([zeros, np.cumsum(observed, axis=0)])
+        self.negative = np.vstack([zeros, np.cumsum(observed & (a < 0), axis=0)])
+        self.infinite = np.vstack([zeros, np.cumsum(observed & ~finite, axis=0)])
+
+        # 连续相同值（跳过 NaN）的长度和最近的有效值
+        rows = np.arange(a.shape[0])[:, None]
+        last_pos = np.maximum.accumulate(np.where(observed, rows, -1), axis=0)
+        self.last_value = np.where(last_pos >= 0, a[np.maximum(last_pos, 0), np.arange(a.shape[1])], np.nan)
+        previous = _shift(self.last_value)
+        run_start = observed & ~(a == previous)
+        count = self.count[1:]
+        start_count = np.maximum.accumulate(np.where(run_start, count - 1, 0), axis=0)
+        self.run_length = count - start_count
+
+    def nobs(self, window):
+        return _window_sum(self.count, window)
+
+    def mean(self, window, min_periods=None):
+        """滚动均值（同 pandas rolling(window, min_periods).mean()）"""
+        min_periods = window if min_periods is None else min_periods
+        nobs = self.nobs(window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = _window_sum(self.sum, window) / nobs + self.ref
+        negative = _window_sum(self.negative, window)
+        result = np.where((negative == 0) & (result < 0), 0.0, result)
+        result = np.where((negative == nobs) & (result > 0), 0.0, result)
+        # 窗口内全部为同一个值时直接取该值
+        result = np.where(self.run_length >= nobs, self.last_value, result)
+        invalid = (nobs < max(min_periods, 1)) | (_window_sum(self.infinite, window) > 0)
+        return np.where(invalid, np.nan, result)
+
+    def sum_(self, window, min_periods=None):
+        """滚动求和（同 pandas rolling(window, min_periods).sum()）"""
+        min_periods = window if min_periods is None else min_periods
+        nobs = self.nobs(window)
+        result = _window_sum(self.sum, window) + self.ref * nobs
+        invalid = (nobs < min_periods) | (_window_sum(self.infinite, window) > 0)
+        return np.where(invalid, np.nan, result)
+
+
+def _sliding(a, window):
+    """(日期, 列, 窗口) 滑动窗口视图，前面补 window-1 行 NaN"""
+    padded = np.vstack([np.full((window - 1, a.shape[1]), np.nan), a])
+    return np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+
+
+def rolling_mean(x, window, min_periods=None):
+    """滚动均值，语义同 pandas rolling(window, min_periods).mean()"""
+    a, restore = _prepare(x)
+    return restore(_PrefixSums(a).mean(window, min_periods))
+
+
+def rolling_sum(x, window, min_periods=None):
+    """滚动求和，语义同 pandas rolling(window, min_periods).sum()"""
+    a, restore = _prepare(x)
+    return restore(_PrefixSums(a).sum_(window, min_periods))
+
+
+def _rolling_std(a, window, min_periods=None, ddof=1, prefix=None):
+    min_periods = window if min_periods is None else min_periods
+    prefix = prefix or _PrefixSums(a)
+    nobs = prefix.nobs(window)
+    windows = _sliding(a, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centered = windows - (np.nansum(windows, axis=2) / nobs)[:, :, None]
+        variance = np.nansum(centered * centered, axis=2) / (nobs - ddof)
+    variance = np.where((prefix.run_length >= nobs) | (nobs == 1), 0.0, np.maximum(variance, 0.0))
+    invalid = (nobs < max(min_periods, 1)) | (nobs <= ddof) | (_window_sum(prefix.infinite, window) > 0)
+    return np.where(invalid, np.nan, np.sqrt(variance))
+
+
+def rolling_std(x, window, min_periods=None, ddof=1):
+    """
+    滚动标准差，语义同 pandas rolling(window, min_periods).std(ddof)
+
+    用两遍法计算窗口方差，窗口内全部为同一个值时结果为 0（pandas 的在线算法此时会留下
+    约 1e-8 倍价格的舍入残差）。
+    """
+    a, restore = _prepare(x)
+    return restore(_rolling_std(a, window, min_periods, ddof))
+
+
+def _rolling_extreme(a, window, min_periods, func):
+    min_periods = window if min_periods is None else min_periods
+    nobs = _window_sum(np.vstack([np.zeros((1, a.shape[1])), np.cumsum(~np.isnan(a), axis=0)]), window)
+    result = func.reduce(_sliding(a, window), axis=2)
+    return np.where(nobs < max(min_periods, 1), np.nan, result)
+
+
+def rolling_min(x, window, min_periods=None):
+    """滚动最小值，语义同 pandas rolling(window, min_periods).min()"""
+    a, restore = _prepare(x)
+    return restore(_rolling_extreme(a, window, min_periods, np.fmin))
+
+
+def rolling_max(x, window, min_periods=None):
+    """滚动最大值，语义同 pandas rolling(window, min_periods).max()"""
+    a, restore = _prepare(x)
+    return restore(_rolling_extreme(a, window, min_periods, np.fmax))
+
+
+# ==================== EMA 递推 ====================
+
+def _ewm_numpy(a, alpha, adjust):
+    """EMA 递推（按日期循环，各列向量化），算法与 pandas ewm(ignore_na=False).mean() 相同"""
+    out = np.empty_like(a)
+    old_wt_factor = 1.0 - alpha
+    new_wt = np.where(adjust, 1.0, alpha)
+    weighted = a[0].copy()
+    old_wt = np.ones(a.shape[1])
+    out[0] = weighted
+    for i in range(1, a.shape[0]):
+        cur = a[i]
+        is_observation = cur == cur
+        started = weighted == weighted
+        old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+        observed = started & is_observation
+        with np.errstate(invalid='ignore'):
+            blended = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+        # 与当前值相等时不更新（避免常数序列的舍入误差），但权重照常累计
+        weighted = np.where(observed & (weighted != cur), blended,
+                            np.where(~started & is_observation, cur, weighted))
+        old_wt = np.where(observed, np.where(adjust, old_wt + new_wt, 1.0), old_wt)
+        out[i] = weighted
+    return out
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _ewm_numba(a, alpha, adjust):
+        n, k = a.shape
+        out = np.empty_like(a)
+        for j in range(k):
+            old_wt_factor = 1.0 - alpha[j]
+            new_wt = 1.0 if adjust[j] else alpha[j]
+            weighted = a[0, j]
+            old_wt = 1.0
+            out[0, j] = weighted
+            for i in range(1, n):
+                cur = a[i, j]
+                is_observation = cur == cur
+                if weighted == weighted:
+                    old_wt *= old_wt_factor
+                    if is_observation:
+                        if weighted != cur:
+                            weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+                        if adjust[j]:
+                            old_wt += new_wt
+                        else:
+                            old_wt = 1.0
+                elif is_observation:
+                    weighted = cur
+                out[i, j] = weighted
+        return out
+
+
+def _ewm_alpha(span=None, alpha=None, com=None):
+    """按 pandas 的方式换算平滑系数（span/alpha 先换算为 com，保证与 pandas 逐位一致）"""
+    if span is not None:
+        com = (span - 1) / 2.0
+    elif alpha is not None:
+        com = 1.0 / alpha - 1.0
+    elif com is None:
+        raise ValueError("必须指定 span、alpha 或 com 之一")
+    return 1.0 / (1.0 + com)
+
+
+def _ewm(a, alpha, adjust):
+    """对二维数组各列做 EMA，alpha / adjust 可以按列不同（多条 EMA 合并为一次递推）"""
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=float), (a.shape[1],)).copy()
+    adjust = np.broadcast_to(np.asarray(adjust, dtype=bool), (a.shape[1],)).copy()
+    if a.shape[0] == 0:
+        return a.copy()
+    if NUMBA_AVAILABLE:
+        return _ewm_numba(a, alpha, adjust)
+    return _ewm_numpy(a, alpha, adjust)
+
+
+def ewm_mean(x, span=None, alpha=None, com=None, adjust=True):
+    """指数移动平均，语义同 pandas ewm(span/alpha/com, adjust).mean()"""
+    a, restore = _prepare(x)
+    return restore(_ewm(a, _ewm_alpha(span, alpha, com), adjust))
+
+
+# ==================== 技术指标 ====================
+
+def _rsi_inputs(close, method):
+    """RSI 的上涨/下跌序列（简单平均版把首行 NaN 当作 0，Wilder 版保留 NaN）"""
+    delta = close - _shift(close)
+    with np.errstate(invalid='ignore'):
+        if method == 'sma':
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = -np.where(delta < 0, delta, 0.0)
+        else:
+            gain = np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0))
+            loss = -np.where(np.isnan(delta), np.nan, np.minimum(delta, 0.0))
+    return gain, loss
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def rsi(close, period=14, method='sma', min_periods=None):
+    """
+    RSI
+
+    参数:
+    - close: 收盘价
+    - period: 周期
+    - method: 'sma'（涨跌幅简单移动平均，TechnicalAnalyzer 原实现）或 'wilder'（ewm(alpha=1/period, adjust=False)）
+    - min_periods: 简单平均的最少样本数（默认等于 period）
+    """
+    a, restore = _prepare(close)
+    gain, loss = _rsi_inputs(a, method)
+    if method == 'sma':
+        avg_gain = _PrefixSums(gain).mean(period, min_periods)
+        avg_loss = _PrefixSums(loss).mean(period, min_periods)
+    elif method == 'wilder':
+        averages = _ewm(np.hstack([gain, loss]), _ewm_alpha(alpha=1 / period), False)
+        avg_gain, avg_loss = np.split(averages, 2, axis=1)
+    else:
+        raise ValueError(f"不支持的 RSI 计算方式: {method}")
+    return restore(_rsi_from_averages(avg_gain, avg_loss))
+
+
+def macd(close, fast=12, slow=26, signal=9, adjust=True):
+    """
+    MACD
+
+    返回:
+    - (macd, signal, histogram)
+    """
+    a, restore = _prepare(close)
+    k = a.shape[1]
+    emas = _ewm(np.hstack([a, a]), np.repeat([_ewm_alpha(span=fast), _ewm_alpha(span=slow)], k), adjust)
+    macd_line = emas[:, :k] - emas[:, k:]
+    signal_line = _ewm(macd_line, _ewm_alpha(span=signal), adjust)
+    return restore(macd_line), restore(signal_line), restore(macd_line - signal_line)
+
+
+def bollinger_bands(close, period=20, std_dev=2, min_periods=None, shift=0):
+    """
+    布林带
+
+    参数:
+    - shift: 中轨和标准差滞后的天数（1 表示用截至前一日的数据）
+
+    返回:
+    - (middle, upper, lower, std)
+    """
+    a, restore = _prepare(close)
+    prefix = _PrefixSums(a)
+    middle = _shift(prefix.mean(period, min_periods), shift)
+    std = _shift(_rolling_std(a, period, min_periods, prefix=prefix), shift)
+    return restore(middle), restore(middle + std * std_dev), restore(middle - std * std_dev), restore(std)
+
+
+def _true_range(high, low, close, skipna):
+    previous_close = _shift(close)
+    ranges = (high - low, np.abs(high - previous_close), np.abs(low - previous_close))
+    combine = np.fmax if skipna else np.maximum
+    return combine(ranges[0], combine(ranges[1], ranges[2]))
+
+
+def true_range(high, low, close, skipna=False):
+    """
+    真实波幅
+
+    参数:
+    - skipna: 忽略缺失项取最大值（首日没有前收盘价时取 High-Low，同 DataFrame.max(axis=1)）；
+      False 时任一项缺失结果即为 NaN（同 np.maximum）
+    """
+    h, restore = _prepare(high)
+    return restore(_true_range(h, _prepare(low)[0], _prepare(close)[0], skipna))
+
+
+def atr(high, low, close, period=14, method='sma', min_periods=None, skipna=False):
+    """
+    平均真实波幅
+
+    参数:
+    - method: 'sma'（真实波幅简单移动平均）或 'wilder'（ewm(alpha=1/period, adjust=False)）
+    - min_periods: 简单平均的最少样本数（默认等于 period）
+    - skipna: 见 true_range
+    """
+    h, restore = _prepare(high)
+    tr = _true_range(h, _prepare(low)[0], _prepare(close)[0], skipna)
+    if method == 'sma':
+        return restore(_PrefixSums(tr).mean(period, min_periods))
+    if method == 'wilder':
+        return restore(_ewm(tr, _ewm_alpha(alpha=1 / period), False))
+    raise ValueError(f"不支持的 ATR 计算方式: {method}")
+
+
+def stochastic(high, low, close, k_period=14, d_period=3, min_periods=None):
+    """
+    随机指标
+
+    返回:
+    - (K, D, 区间最低价, 区间最高价)
+    """
+    h, restore = _prepare(high)
+    lowest = _rolling_extreme(_prepare(low)[0], k_period, min_periods, np.fmin)
+    highest = _rolling_extreme(h, k_period, min_periods, np.fmax)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k = 100 * (_prepare(close)[0] - lowest) / (highest - lowest)
+    d = _PrefixSums(k).mean(d_period, None if min_periods is None else min(min_periods, d_period))
+    return restore(k), restore(d), restore(lowest), restore(highest)
+
+
+def compute_indicators(close, high=None, low=None, ma_periods=(), rsi_period=None, rsi_method='sma',
+                       macd_params=None, macd_adjust=True, bollinger_params=None, bollinger_shift=0,
+                       atr_period=None, atr_method='sma', atr_skipna=False, stochastic_params=None,
+                       min_periods=None):
+    """
+    一次计算一组指标（共享前缀和，所有 EMA 合并为一次递推）
+
+    参数:
+    - close / high / low: 价格（一维或 日期×股票 二维，Series/DataFrame/数组）
+    - ma_periods: 均线周期
+    - rsi_period / rsi_method: RSI 周期和计算方式（见 rsi）
+    - macd_params: (fast, slow, signal)；macd_adjust: EMA 是否 adjust
+    - bollinger_params: (period, std_dev)；bollinger_shift: 滞后天数
+    - atr_period / atr_method / atr_skipna: 见 atr
+    - stochastic_params: (k_period, d_period)
+    - min_periods: 均线、布林带、简单平均 RSI/ATR、随机指标的最少样本数（默认等于各自周期）
+
+    返回:
+    - dict: MA{n}, RSI, EMA_fast, EMA_slow, MACD, MACD_signal, MACD_histogram, BB_middle, BB_upper, BB_lower, BB_std,
+      TR, ATR, K, D, Low_Min, High_Max（只包含请求的指标），类型与 close 相同
+    """
+    c, restore = _prepare(close)
+    k = c.shape[1]
+    results = {}
+    close_prefix = _PrefixSums(c)
+
+    for period in ma_periods:
+        results[f'MA{period}'] = close_prefix.mean(period, min_periods)
+
+    if bollinger_params is not None:
+        period, std_dev = bollinger_params
+        middle = _shift(close_prefix.mean(period, min_periods), bollinger_shift)
+        std = _shift(_rolling_std(c, period, min_periods, prefix=close_prefix), bollinger_shift)
+        results.update(BB_middle=middle, BB_upper=middle + std * std_dev, BB_lower=middle - std * std_dev, BB_std=std)
+
+    tr = None
+    if atr_period is not None or stochastic_params is not None:
+        h, l = _prepare(high)[0], _prepare(low)[0]
+    if atr_period is not None:
+        tr = _true_range(h, l, c, atr_skipna)
+        results['TR'] = tr
+
+    # 所有 EMA 一次递推：MACD 快慢线、Wilder RSI 的涨跌均值、Wilder ATR
+    ema_inputs, ema_alphas, ema_adjust, ema_names = [], [], [], []
+    if macd_params is not None:
+        fast, slow, signal = macd_params
+        for name, span in (('fast', fast), ('slow', slow)):
+            ema_inputs.append(c)
+            ema_alphas.append(_ewm_alpha(span=span))
+            ema_adjust.append(macd_adjust)
+            ema_names.append(name)
+    if rsi_period is not None:
+        gain, loss = _rsi_inputs(c, rsi_method)
+        if rsi_method == 'wilder':
+            for name, values in (('gain', gain), ('loss', loss)):
+                ema_inputs.append(values)
+                ema_alphas.append(_ewm_alpha(alpha=1 / rsi_period))
+                ema_adjust.append(False)
+                ema_names.append(name)
+        else:
+            results['RSI'] = _rsi_from_averages(_PrefixSums(gain).mean(rsi_period, min_periods),
+                                                _PrefixSums(loss).mean(rsi_period, min_periods))
+    if atr_period is not None:
+        if atr_method == 'wilder':
+            ema_inputs.append(tr)
+            ema_alphas.append(_ewm_alpha(alpha=1 / atr_period))
+            ema_adjust.append(False)
+            ema_names.append('atr')
+        else:
+            results['ATR'] = _PrefixSums(tr).mean(atr_period, min_periods)
+
+    if ema_inputs:
+        emas = _ewm(np.hstack(ema_inputs), np.repeat(ema_alphas, k), np.repeat(ema_adjust, k))
+        emas = {name: emas[:, i * k:(i + 1) * k] for i, name in enumerate(ema_names)}
+        if macd_params is not None:
+            macd_line = emas['fast'] - emas['slow']
+            signal_line = _ewm(macd_line, _ewm_alpha(span=macd_params[2]), macd_adjust)
+            results.update(EMA_fast=emas['fast'], EMA_slow=emas['slow'], MACD=macd_line,
+                           MACD_signal=signal_line, MACD_histogram=macd_line - signal_line)
+        if 'gain' in emas:
+            results['RSI'] = _rsi_from_averages(emas['gain'], emas['loss'])
+        if 'atr' in emas:
+            results['ATR'] = emas['atr']
+
+    if stochastic_params is not None:
+        k_period, d_period = stochastic_params
+        lowest = _rolling_extreme(l, k_period, min_periods, np.fmin)
+        highest = _rolling_extreme(h, k_period, min_periods, np.fmax)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            k_line = 100 * (c - lowest) / (highest - lowest)
+        d_min_periods = None if min_periods is None else min(min_periods, d_period)
+        results.update(K=k_line, D=_PrefixSums(k_line).mean(d_period, d_min_periods), Low_Min=lowest, High_Max=highest)
+
+    return {name: restore(values) for name, values in results.items()}
@@ -23,6 +23,81 @@ import json
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+try:
+    from data_services import indicator_kernels as kernels
+except ImportError:
+    import indicator_kernels as kernels
+
+# ==================== 买卖信号编码 ====================
+# 每条信号规则占一个比特位，Buy_Signal_Code / Sell_Signal_Code 为每行命中规则的位掩码，
+# 文字描述只在需要展示时由 decode_signal_description 解码
+SIGNAL_TREND = 1 << 0            # 均线交叉（MA20/MA50）
+SIGNAL_MACD = 1 << 1             # MACD 交叉
+SIGNAL_RSI = 1 << 2              # RSI 离开超卖/超买区
+SIGNAL_BOLLINGER = 1 << 3        # 回到布林带内
+SIGNAL_PV_REVERSAL = 1 << 4      # 价量配合反转
+SIGNAL_PV_CONTINUATION = 1 << 5  # 价量配合延续
+SIGNAL_PV_STRONG = 1 << 6        # 价量配合（强）
+SIGNAL_PV_MEDIUM = 1 << 7        # 价量配合（中）
+SIGNAL_PV_WEAK = 1 << 8          # 价量配合（弱）
+
+# 描述模板（按位从低到高拼接）：{level} 为四档成交量等级，{level3} 为三档（普通归入弱）
+BUY_SIGNAL_LABELS = [
+    (SIGNAL_TREND, "上升趋势形成(成交量{level}确认)"),
+    (SIGNAL_MACD, "MACD金叉(成交量{level3}确认)"),
+    (SIGNAL_RSI, "RSI超卖反弹(成交量{level3}确认)"),
+    (SIGNAL_BOLLINGER, "布林带下轨反弹(成交量{level3}确认)"),
+    (SIGNAL_PV_REVERSAL, "价量配合反转({level})"),
+    (SIGNAL_PV_CONTINUATION, "价量配合延续({level})"),
+    (SIGNAL_PV_STRONG, "价量配合上涨(强)"),
+    (SIGNAL_PV_MEDIUM, "价量配合上涨(中)"),
+    (SIGNAL_PV_WEAK, "价量配合上涨(弱)"),
+]
+SELL_SIGNAL_LABELS = [
+    (SIGNAL_TREND, "下降趋势形成(成交量{level}确认)"),
+    (SIGNAL_MACD, "MACD死叉(成交量{level3}确认)"),
+    (SIGNAL_RSI, "RSI超买回落(成交量{level3}确认)"),
+    (SIGNAL_BOLLINGER, "跌破布林带上轨(成交量{level3}确认)"),
+    (SIGNAL_PV_REVERSAL, "价量配合反转({level})"),
+    (SIGNAL_PV_CONTINUATION, "价量配合延续({level})"),
+    (SIGNAL_PV_STRONG, "价量配合下跌(强)"),
+    (SIGNAL_PV_MEDIUM, "价量配合下跌(中)"),
+    (SIGNAL_PV_WEAK, "价量配合下跌(弱)"),
+]
+
+# 成交量等级：0=普通, 1=弱, 2=中, 3=强
+VOLUME_LEVEL_NAMES = ["普通", "弱", "中", "强"]
+
+
+def decode_signal_description(buy_code, sell_code, volume_level=0):
+    """
+    把信号位掩码解码为文字描述
+
+    参数:
+    - buy_code / sell_code: 买入/卖出信号位掩码
+    - volume_level: 成交量等级（0=普通, 1=弱, 2=中, 3=强）
+
+    返回:
+    - str: 例如 "买入信号: MACD金叉(成交量弱确认) | 卖出信号: ..."，无信号时为空字符串
+    """
+    volume_level = int(volume_level)
+    level = VOLUME_LEVEL_NAMES[volume_level]
+    level3 = VOLUME_LEVEL_NAMES[max(volume_level, 1)]
+    parts = []
+    for prefix, code, labels in (("买入信号: ", buy_code, BUY_SIGNAL_LABELS), ("卖出信号: ", sell_code, SELL_SIGNAL_LABELS)):
+        conditions = [label.format(level=level, level3=level3) for bit, label in labels if code & bit]
+        if conditions:
+            parts.append(prefix + ", ".join(conditions))
+    return " | ".join(parts)
+
+
+def _flag_array(df, column):
+    """按真值取布尔列（不存在的列为全 False，NaN 视为 True，与逐行 if row[col] 判断一致）"""
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df[column].to_numpy().astype(bool)
+
+
 class TechnicalAnalyzer:
     def __init__(self):
         pass
@@ -91,8 +166,9 @@ class TechnicalAnalyzer:
         if df.empty:
             return df
         
+        results = kernels.compute_indicators(df['Close'], ma_periods=periods)
         for period in periods:
-            df[f'MA{period}'] = df['Close'].rolling(window=period).mean()
+            df[f'MA{period}'] = results[f'MA{period}']
         
         return df
     
@@ -101,11 +177,7 @@ class TechnicalAnalyzer:
         if df.empty:
             return df
         
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        df['RSI'] = kernels.rsi(df['Close'], period)
         
         return df
     
@@ -114,11 +186,7 @@ class TechnicalAnalyzer:
         if df.empty:
             return df
         
-        exp1 = df['Close'].ewm(span=fast).mean()
-        exp2 = df['Close'].ewm(span=slow).mean()
-        df['MACD'] = exp1 - exp2
-        df['MACD_signal'] = df['MACD'].ewm(span=signal).mean()
-        df['MACD_histogram'] = df['MACD'] - df['MACD_signal']
+        df['MACD'], df['MACD_signal'], df['MACD_histogram'] = kernels.macd(df['Close'], fast, slow, signal)
         
         return df
     
@@ -143,25 +211,24 @@ class TechnicalAnalyzer:
         shift_val = 1 if use_shift else 0
 
         # 使用过去N天的数据计算布林带
-        df['BB_middle'] = df['Close'].rolling(window=period).mean().shift(shift_val)
-        bb_std = df['Close'].rolling(window=period).std().shift(shift_val)
-        df['BB_upper'] = df['BB_middle'] + (bb_std * std_dev)
-        df['BB_lower'] = df['BB_middle'] - (bb_std * std_dev)
-        df['BB_width'] = (df['BB_upper'] - df['BB_lower']) / (df['BB_middle'] + 1e-10)
-        df['BB_position'] = (df['Close'] - df['BB_lower']) / (df['BB_upper'] - df['BB_lower'] + 1e-10)
+        df['BB_middle'], df['BB_upper'], df['BB_lower'], _ = kernels.bollinger_bands(
+            df['Close'], period, std_dev, shift=shift_val)
+        self._add_bollinger_ratios(df)
 
         return df
+
+    @staticmethod
+    def _add_bollinger_ratios(df):
+        """布林带宽度和价格位置"""
+        df['BB_width'] = (df['BB_upper'] - df['BB_lower']) / (df['BB_middle'] + 1e-10)
+        df['BB_position'] = (df['Close'] - df['BB_lower']) / (df['BB_upper'] - df['BB_lower'] + 1e-10)
     
     def calculate_stochastic_oscillator(self, df, k_period=14, d_period=3):
         """计算随机振荡器(KDJ)"""
         if df.empty:
             return df
         
-        low_min = df['Low'].rolling(window=k_period).min()
-        high_max = df['High'].rolling(window=k_period).max()
-        
-        df['K'] = 100 * (df['Close'] - low_min) / (high_max - low_min)
-        df['D'] = df['K'].rolling(window=d_period).mean()
+        df['K'], df['D'], _, _ = kernels.stochastic(df['High'], df['Low'], df['Close'], k_period, d_period)
         df['J'] = 3 * df['K'] - 2 * df['D']
         
         return df
@@ -171,14 +238,35 @@ class TechnicalAnalyzer:
         if df.empty:
             return df
         
-        high_low = df['High'] - df['Low']
-        high_close = np.abs(df['High'] - df['Close'].shift())
-        low_close = np.abs(df['Low'] - df['Close'].shift())
-        
-        true_range = np.maximum(high_low, np.maximum(high_close, low_close))
-        df['ATR'] = true_range.rolling(window=period).mean()
+        df['ATR'] = kernels.atr(df['High'], df['Low'], df['Close'], period)
         
         return df
+
+    def calculate_core_indicators(self, df, ma_periods=(5, 10, 20, 50, 100, 200)):
+        """
+        一次计算均线、RSI、MACD、布林带、KDJ、ATR（共享前缀和，EMA 合并递推）
+
+        结果与依次调用 calculate_moving_averages / calculate_rsi / calculate_macd /
+        calculate_bollinger_bands / calculate_stochastic_oscillator / calculate_atr 相同。
+        """
+        if df.empty:
+            return df
+
+        results = kernels.compute_indicators(
+            df['Close'], df['High'], df['Low'], ma_periods=ma_periods, rsi_period=14,
+            macd_params=(12, 26, 9), bollinger_params=(20, 2), bollinger_shift=1,
+            atr_period=14, stochastic_params=(14, 3))
+        for period in ma_periods:
+            df[f'MA{period}'] = results[f'MA{period}']
+        for column in ('RSI', 'MACD', 'MACD_signal', 'MACD_histogram', 'BB_middle', 'BB_upper', 'BB_lower'):
+            df[column] = results[column]
+        self._add_bollinger_ratios(df)
+        df['K'] = results['K']
+        df['D'] = results['D']
+        df['J'] = 3 * df['K'] - 2 * df['D']
+        df['ATR'] = results['ATR']
+
+        return df
     
     def calculate_volume_indicators(self, df, short_period=10, long_period=20, surge_threshold=1.2, shrink_threshold=0.8,
                               reversal_volume_threshold=1.5, continuation_volume_threshold=1.2):
@@ -546,23 +634,8 @@ class TechnicalAnalyzer:
         if df.empty:
             return df
         
-        # 计算移动平均线
-        df = self.calculate_moving_averages(df)
-        
-        # 计算RSI
-        df = self.calculate_rsi(df)
-        
-        # 计算MACD
-        df = self.calculate_macd(df)
-        
-        # 计算布林带
-        df = self.calculate_bollinger_bands(df)
-        
-        # 计算随机振荡器
-        df = self.calculate_stochastic_oscillator(df)
-        
-        # 计算ATR
-        df = self.calculate_atr(df)
+        # 计算移动平均线、RSI、MACD、布林带、随机振荡器、ATR
+        df = self.calculate_core_indicators(df)
         
         # 计算CCI
         df = self.calculate_cci(df)
@@ -598,8 +671,20 @@ class TechnicalAnalyzer:
         
         return df
     
-    def generate_buy_sell_signals(self, df):
-        """基于技术指标生成买卖信号，包含成交量确认"""
+    def generate_buy_sell_signals(self, df, describe=True):
+        """
+        基于技术指标生成买卖信号，包含成交量确认
+
+        每条规则按列计算为布尔数组，命中的规则以位掩码写入 Buy_Signal_Code / Sell_Signal_Code。
+
+        参数:
+        - df: 已计算技术指标的数据
+        - describe: 是否生成 Signal_Description 文字描述（False 时只写入信号列和位掩码，
+          展示时再用 describe_signals 解码需要的行）
+
+        返回:
+        - DataFrame: 增加 Buy_Signal, Sell_Signal, Signal_Description, Buy_Signal_Code, Sell_Signal_Code 等列
+        """
         if df.empty:
             return df
         
@@ -644,167 +729,114 @@ class TechnicalAnalyzer:
             df['Price_above_BB_upper'] = df['Close'] > df['BB_upper']
             df['Price_below_BB_lower'] = df['Close'] < df['BB_lower']
         
-        # 生成买入信号逻辑
-        for i in range(1, len(df)):
-            buy_conditions = []
-            sell_conditions = []
-            
-            # 分级成交量确认检查
-            def check_volume_confirmation(signal_type, strength='medium'):
-                """检查不同信号类型的成交量确认要求"""
-                if signal_type == 'trend':  # 趋势信号（MA交叉）
-                    if strength == 'weak':
-                        # 趋势信号弱确认：成交量突增(弱)或成交量趋势向上或成交量比率>0.9
-                        return (df.iloc[i].get('Volume_Surge_Weak', False) or 
-                                df.iloc[i].get('Volume_Trend_Up', False) or 
-                                df.iloc[i].get('Volume_Ratio', 0) > 0.9)
-                    elif strength == 'medium':
-                        return df.iloc[i].get('Volume_Surge_Weak', False) or df.iloc[i].get('Volume_Trend_Up', False)
-                    else:  # strong
-                        return df.iloc[i].get('Volume_Surge_Medium', False)
-                
-                elif signal_type == 'momentum':  # 动量信号（MACD、RSI）
-                    if strength == 'weak':
-                        # 动量信号弱确认：成交量突增(弱)或成交量比率>1.0
-                        return (df.iloc[i].get('Volume_Surge_Weak', False) or 
-                                df.iloc[i].get('Volume_Ratio', 0) > 1.0)
-                    elif strength == 'medium':
-                        return df.iloc[i].get('Volume_Surge_Weak', False)
-                    else:  # strong
-                        return df.iloc[i].get('Volume_Surge_Medium', False)
-                
-                elif signal_type == 'price_action':  # 价格行为信号（布林带）
-                    if strength == 'weak':
-                        return df.iloc[i].get('Volume_Surge_Weak', False)
-                    elif strength == 'medium':
-                        return df.iloc[i].get('Volume_Surge_Medium', False)
-                    else:  # strong
-                        return df.iloc[i].get('Volume_Surge_Strong', False)
-                
-                elif signal_type == 'price_volume':  # 价量配合信号
-                    return True  # 价量配合信号本身就是成交量确认的
-                
-                return True  # 默认通过
-            
-            # 条件1: 价格在上升趋势中 (MA20 > MA50) - 趋势信号，使用弱强度确认
-            if ('MA20_above_MA50' in df.columns and df.iloc[i]['MA20_above_MA50'] and 
-                not df.iloc[i-1]['MA20_above_MA50'] and check_volume_confirmation('trend', 'weak')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else ("弱" if df.iloc[i].get('Volume_Surge_Weak', False) else "普通"))
-                buy_conditions.append(f"上升趋势形成(成交量{volume_level}确认)")
-            
-            # 条件2: MACD金叉 - 动量信号，使用弱强度确认
-            if ('MACD_above_signal' in df.columns and df.iloc[i]['MACD_above_signal'] and 
-                not df.iloc[i-1]['MACD_above_signal'] and check_volume_confirmation('momentum', 'weak')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else "弱")
-                buy_conditions.append(f"MACD金叉(成交量{volume_level}确认)")
-            
-            # 条件3: RSI从超卖区域回升 - 动量信号，使用弱强度确认
-            if ('RSI_oversold' in df.columns and not df.iloc[i]['RSI_oversold'] and 
-                df.iloc[i-1]['RSI_oversold'] and check_volume_confirmation('momentum', 'weak')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else "弱")
-                buy_conditions.append(f"RSI超卖反弹(成交量{volume_level}确认)")
-            
-            # 条件4: 价格从布林带下轨反弹 - 价格行为信号，使用中等强度确认
-            if ('Price_below_BB_lower' in df.columns and not df.iloc[i]['Price_below_BB_lower'] and 
-                df.iloc[i-1]['Price_below_BB_lower'] and check_volume_confirmation('price_action', 'medium')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else "弱")
-                buy_conditions.append(f"布林带下轨反弹(成交量{volume_level}确认)")
-            
-            # 条件5: 价量配合买入信号（价格上涨且成交量放大）
-            if ('Close' in df.columns and 
-                df.iloc[i]['Close'] > df.iloc[i-1]['Close'] and 
-                df.iloc[i].get('Price_Volume_Bullish_Weak', False)):
-                
-                # 检查是反转型还是延续型信号
-                if df.iloc[i].get('Price_Volume_Reversal_Bullish', False):
-                    # 反转型信号：前一天下跌，当天上涨
-                    volume_level = self._get_volume_level(df.iloc[i])
-                    buy_conditions.append(f"价量配合反转{volume_level}")
-                elif df.iloc[i].get('Price_Volume_Continuation_Bullish', False):
-                    # 延续型信号：连续上涨，成交量放大
-                    volume_level = self._get_volume_level(df.iloc[i])
-                    buy_conditions.append(f"价量配合延续{volume_level}")
-                else:
-                    # 兼容原有逻辑
-                    if df.iloc[i].get('Price_Volume_Bullish_Strong', False):
-                        buy_conditions.append("价量配合上涨(强)")
-                    elif df.iloc[i].get('Price_Volume_Bullish_Medium', False):
-                        buy_conditions.append("价量配合上涨(中)")
-                    else:
-                        buy_conditions.append("价量配合上涨(弱)")
-            
-            # 生成买入信号
-            if buy_conditions:
-                df.at[df.index[i], 'Buy_Signal'] = True
-                # 如果已有信号描述，先保存
-                existing_desc = df.iloc[i].get('Signal_Description', '')
-                if existing_desc:
-                    # 如果已有描述，说明之前已经有卖出信号，需要合并
-                    df.at[df.index[i], 'Signal_Description'] = existing_desc + " | 买入信号: " + ", ".join(buy_conditions)
-                else:
-                    df.at[df.index[i], 'Signal_Description'] = "买入信号: " + ", ".join(buy_conditions)
-            
-            # 生成卖出信号逻辑
-            # 条件1: 价格在下降趋势中 (MA20 < MA50) - 趋势信号，使用弱强度确认
-            if ('MA20_below_MA50' in df.columns and df.iloc[i]['MA20_below_MA50'] and 
-                not df.iloc[i-1]['MA20_below_MA50'] and check_volume_confirmation('trend', 'weak')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else ("弱" if df.iloc[i].get('Volume_Surge_Weak', False) else "普通"))
-                sell_conditions.append(f"下降趋势形成(成交量{volume_level}确认)")
-            
-            # 条件2: MACD死叉 - 动量信号，使用弱强度确认
-            if ('MACD_below_signal' in df.columns and df.iloc[i]['MACD_below_signal'] and 
-                not df.iloc[i-1]['MACD_below_signal'] and check_volume_confirmation('momentum', 'weak')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else "弱")
-                sell_conditions.append(f"MACD死叉(成交量{volume_level}确认)")
-            
-            # 条件3: RSI从超买区域回落 - 动量信号，使用弱强度确认
-            if ('RSI_overbought' in df.columns and not df.iloc[i]['RSI_overbought'] and 
-                df.iloc[i-1]['RSI_overbought'] and check_volume_confirmation('momentum', 'weak')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else "弱")
-                sell_conditions.append(f"RSI超买回落(成交量{volume_level}确认)")
-            
-            # 条件4: 价格跌破布林带上轨 - 价格行为信号，使用中等强度确认
-            if ('Price_above_BB_upper' in df.columns and not df.iloc[i]['Price_above_BB_upper'] and 
-                df.iloc[i-1]['Price_above_BB_upper'] and check_volume_confirmation('price_action', 'medium')):
-                volume_level = "强" if df.iloc[i].get('Volume_Surge_Strong', False) else ("中" if df.iloc[i].get('Volume_Surge_Medium', False) else "弱")
-                sell_conditions.append(f"跌破布林带上轨(成交量{volume_level}确认)")
-            
-            # 条件5: 价量配合卖出信号（价格下跌且成交量放大）
-            if ('Close' in df.columns and 
-                df.iloc[i]['Close'] < df.iloc[i-1]['Close'] and 
-                df.iloc[i].get('Price_Volume_Bearish_Weak', False)):
-                
-                # 检查是反转型还是延续型信号
-                if df.iloc[i].get('Price_Volume_Reversal_Bearish', False):
-                    # 反转型信号：前一天上涨，当天下跌
-                    volume_level = self._get_volume_level(df.iloc[i])
-                    sell_conditions.append(f"价量配合反转{volume_level}")
-                elif df.iloc[i].get('Price_Volume_Continuation_Bearish', False):
-                    # 延续型信号：连续下跌，成交量放大
-                    volume_level = self._get_volume_level(df.iloc[i])
-                    sell_conditions.append(f"价量配合延续{volume_level}")
-                else:
-                    # 兼容原有逻辑
-                    if df.iloc[i].get('Price_Volume_Bearish_Strong', False):
-                        sell_conditions.append("价量配合下跌(强)")
-                    elif df.iloc[i].get('Price_Volume_Bearish_Medium', False):
-                        sell_conditions.append("价量配合下跌(中)")
-                    else:
-                        sell_conditions.append("价量配合下跌(弱)")
-            
-            # 生成卖出信号
-            if sell_conditions:
-                df.at[df.index[i], 'Sell_Signal'] = True
-                # 如果已有信号描述，先保存
-                existing_desc = df.iloc[i].get('Signal_Description', '')
-                if existing_desc:
-                    # 如果已有描述，说明之前已经有买入信号，需要合并
-                    df.at[df.index[i], 'Signal_Description'] = existing_desc + " | 卖出信号: " + ", ".join(sell_conditions)
-                else:
-                    df.at[df.index[i], 'Signal_Description'] = "卖出信号: " + ", ".join(sell_conditions)
+        # 各规则按列计算（第一行没有前一日数据，不产生信号）
+        n = len(df)
+        has_prev = np.arange(n) >= 1
+        
+        def crossed_into(column):
+            """当日为真、前一日为假"""
+            current = _flag_array(df, column)
+            previous = np.concatenate([[False], current[:-1]])
+            return has_prev & current & ~previous
+        
+        def left(column):
+            """当日为假、前一日为真"""
+            current = _flag_array(df, column)
+            previous = np.concatenate([[False], current[:-1]])
+            return has_prev & ~current & previous
+        
+        surge_weak = _flag_array(df, 'Volume_Surge_Weak')
+        surge_medium = _flag_array(df, 'Volume_Surge_Medium')
+        volume_ratio = pd.to_numeric(df['Volume_Ratio'], errors='coerce').to_numpy(dtype=float) \
+            if 'Volume_Ratio' in df.columns else np.zeros(n)
+        
+        # 分级成交量确认：趋势信号弱确认 / 动量信号弱确认 / 价格行为信号中等确认
+        trend_confirmed = surge_weak | _flag_array(df, 'Volume_Trend_Up') | (volume_ratio > 0.9)
+        momentum_confirmed = surge_weak | (volume_ratio > 1.0)
+        price_action_confirmed = surge_medium
+        
+        if 'Close' in df.columns:
+            close = pd.to_numeric(df['Close'], errors='coerce').to_numpy(dtype=float)
+            previous_close = np.concatenate([[np.nan], close[:-1]])
+            price_up = has_prev & (close > previous_close)
+            price_down = has_prev & (close < previous_close)
+        else:
+            price_up = price_down = np.zeros(n, dtype=bool)
+        
+        def price_volume_code(moved, direction):
+            """价量配合信号：反转型 > 延续型 > 强/中/弱（direction 为 Bullish 或 Bearish）"""
+            active = moved & _flag_array(df, f'Price_Volume_{direction}_Weak')
+            reversal = active & _flag_array(df, f'Price_Volume_Reversal_{direction}')
+            continuation = active & ~reversal & _flag_array(df, f'Price_Volume_Continuation_{direction}')
+            rest = active & ~reversal & ~continuation
+            strong = rest & _flag_array(df, f'Price_Volume_{direction}_Strong')
+            medium = rest & ~strong & _flag_array(df, f'Price_Volume_{direction}_Medium')
+            weak = rest & ~strong & ~medium
+            return (reversal * SIGNAL_PV_REVERSAL | continuation * SIGNAL_PV_CONTINUATION |
+                    strong * SIGNAL_PV_STRONG | medium * SIGNAL_PV_MEDIUM | weak * SIGNAL_PV_WEAK)
+        
+        # 买入：上升趋势形成、MACD金叉、RSI超卖反弹、布林带下轨反弹、价量配合上涨
+        buy_code = (
+            (crossed_into('MA20_above_MA50') & trend_confirmed) * SIGNAL_TREND |
+            (crossed_into('MACD_above_signal') & momentum_confirmed) * SIGNAL_MACD |
+            (left('RSI_oversold') & momentum_confirmed) * SIGNAL_RSI |
+            (left('Price_below_BB_lower') & price_action_confirmed) * SIGNAL_BOLLINGER |
+            price_volume_code(price_up, 'Bullish')
+        )
+        # 卖出：下降趋势形成、MACD死叉、RSI超买回落、跌破布林带上轨、价量配合下跌
+        sell_code = (
+            (crossed_into('MA20_below_MA50') & trend_confirmed) * SIGNAL_TREND |
+            (crossed_into('MACD_below_signal') & momentum_confirmed) * SIGNAL_MACD |
+            (left('RSI_overbought') & momentum_confirmed) * SIGNAL_RSI |
+            (left('Price_above_BB_upper') & price_action_confirmed) * SIGNAL_BOLLINGER |
+            price_volume_code(price_down, 'Bearish')
+        )
+        
+        df['Buy_Signal'] = buy_code != 0
+        df['Sell_Signal'] = sell_code != 0
+        df['Buy_Signal_Code'] = buy_code.astype(np.int64)
+        df['Sell_Signal_Code'] = sell_code.astype(np.int64)
+        
+        if describe:
+            rows = np.flatnonzero((buy_code != 0) | (sell_code != 0))
+            if len(rows):
+                df.iloc[rows, df.columns.get_loc('Signal_Description')] = self.describe_signals(df, rows).to_numpy()
         
         return df
     
+    def _volume_level_array(self, df):
+        """成交量等级（0=普通, 1=弱, 2=中, 3=强，与 _get_volume_level 一致）"""
+        return np.select(
+            [_flag_array(df, 'Volume_Surge_Strong'), _flag_array(df, 'Volume_Surge_Medium'), _flag_array(df, 'Volume_Surge_Weak')],
+            [3, 2, 1], default=0)
+    
+    def describe_signals(self, df, rows=None):
+        """
+        解码信号描述（只处理需要展示的行）
+        
+        参数:
+        - df: generate_buy_sell_signals 的结果
+        - rows: 行位置（整数数组）或布尔掩码，默认所有有信号的行
+        
+        返回:
+        - Series: 信号描述，索引为对应行的索引
+        """
+        buy_code = df['Buy_Signal_Code'].to_numpy()
+        sell_code = df['Sell_Signal_Code'].to_numpy()
+        if rows is None:
+            rows = np.flatnonzero((buy_code != 0) | (sell_code != 0))
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+        
+        volume_level = self._volume_level_array(df.iloc[rows])
+        descriptions = [
+            decode_signal_description(buy, sell, level)
+            for buy, sell, level in zip(buy_code[rows], sell_code[rows], volume_level)
+        ]
+        return pd.Series(descriptions, index=df.index[rows], dtype=object)
+    
     def get_chip_distribution(self, df, num_bins=20):
         """
         计算筹码分布 - 基于成交量的简单分箱法
@@ -830,13 +862,12 @@ class TechnicalAnalyzer:
         # 创建价格区间
         price_bins = np.linspace(price_min, price_max, num_bins + 1)
         
-        # 统计每个价格区间的成交量
-        volume_by_bin = []
-        for i in range(num_bins):
-            mask = (df['Close'] >= price_bins[i]) & (df['Close'] < price_bins[i + 1])
-            volume_by_bin.append(df.loc[mask, 'Volume'].sum())
-        
-        volume_by_bin = np.array(volume_by_bin)
+        # 统计每个价格区间 [price_bins[i], price_bins[i+1]) 的成交量（一次 bincount）
+        close = df['Close'].to_numpy(dtype=float)
+        bin_index = np.searchsorted(price_bins, close, side='right') - 1
+        in_range = (bin_index >= 0) & (bin_index < num_bins)
+        volume_by_bin = np.bincount(bin_index[in_range], weights=np.nan_to_num(df['Volume'].to_numpy(dtype=float))[in_range],
+                                    minlength=num_bins)
         total_volume = volume_by_bin.sum()
         
         if total_volume == 0:
@@ -1205,7 +1236,164 @@ class TAVScorer:
         }
         
         return tav_score, detailed_scores, status
-    
+
+    def score_frame(self, df, asset_type='stock', by=None, thresholds=None):
+        """
+        向量化计算全部历史的TAV评分（每行的结果与用截至该行的数据调用 calculate_tav_score 相同）
+
+        参数:
+        - df: 已计算技术指标的数据，可包含多只股票（按 by 分组，组内按时间排序）
+        - asset_type: 资产类型（决定均线周期、阈值和权重）
+        - by: 分组列名或索引层名（多只股票时使用），None 表示单只股票
+        - thresholds: 信号阈值（默认使用 self.thresholds，回测阈值时可覆盖）
+
+        返回:
+        - DataFrame（与 df 同索引）: TAV_Trend_Score, TAV_Momentum_Score, TAV_Volume_Score,
+          TAV_Score, TAV_Status, TAV_Signal（3=强共振, 2=中等共振, 1=弱共振, 0=无共振）
+        """
+        asset_config = TAVConfig.get_config(asset_type)
+        weights = asset_config['weights']
+        thresholds = thresholds or self.thresholds
+
+        # 每行在所属股票中的序号+1，对应逐行计算时窗口的长度
+        if by is None:
+            length = np.arange(1, len(df) + 1)
+        else:
+            length = df.groupby(by, sort=False).cumcount().to_numpy() + 1
+
+        trend = self._trend_score_array(df, asset_config, length)
+        momentum = self._momentum_score_array(df, asset_config, length)
+        volume = self._volume_score_array(df, asset_config)
+
+        score = np.clip(trend * weights['trend'] + momentum * weights['momentum'] + volume * weights['volume'], 0, 100)
+        signal = np.select(
+            [score >= thresholds['strong_signal'], score >= thresholds['medium_signal'], score >= thresholds['weak_signal']],
+            [3, 2, 1], default=0)
+        status = np.array(["无共振", "弱共振", "中等共振", "强共振"], dtype=object)[signal]
+
+        return pd.DataFrame({
+            'TAV_Trend_Score': trend,
+            'TAV_Momentum_Score': momentum,
+            'TAV_Volume_Score': volume,
+            'TAV_Score': score,
+            'TAV_Status': status,
+            'TAV_Signal': signal
+        }, index=df.index)
+
+    @staticmethod
+    def _column_array(df, column):
+        """取列为 float 数组（不存在的列返回全 NaN）"""
+        if column not in df.columns:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+
+    def _trend_score_array(self, df, config, length):
+        """趋势评分（向量化，逻辑同 _calculate_trend_score）"""
+        n = len(df)
+        close = self._column_array(df, 'Close')
+        ma_periods = config['trend']['ma_periods']
+        mas = {period: self._column_array(df, f'MA{period}') for period in ma_periods}
+        valid = {period: ~np.isnan(values) for period, values in mas.items()}
+        available_count = np.sum([valid[p] for p in ma_periods], axis=0) if ma_periods else np.zeros(n, dtype=int)
+
+        # 双均线分析：按周期取最短的两条可用均线
+        short_ma = np.full(n, np.nan)
+        long_ma = np.full(n, np.nan)
+        for period in sorted(ma_periods):
+            take_short = valid[period] & np.isnan(short_ma)
+            take_long = valid[period] & ~np.isnan(short_ma) & np.isnan(long_ma) & ~take_short
+            long_ma = np.where(take_long, mas[period], long_ma)
+            short_ma = np.where(take_short, mas[period], short_ma)
+        score = np.select(
+            [(close > short_ma) & (short_ma > long_ma), (close < short_ma) & (short_ma < long_ma)],
+            [75, 25], default=50).astype(float)
+
+        # 完整的三均线分析（仅当配置包含 20/50/200 且三条均线都可用时）
+        if {20, 50, 200} <= set(ma_periods):
+            ma20, ma50, ma200 = mas[20], mas[50], mas[200]
+            triple = (available_count >= 3) & (ma20 != 0) & (ma50 != 0) & (ma200 != 0)
+            triple_conditions = [
+                (close > ma20) & (ma20 > ma50) & (ma50 > ma200),
+                (close > ma20) & (ma20 > ma50),
+                ((ma20 < close) & (close < ma50)) | ((ma50 < close) & (close < ma20)),
+                (close < ma20) & (ma20 < ma50)
+            ]
+            triple_score = np.select(triple_conditions, [95, 80, 50, 30], default=np.nan)
+            # 三均线条件都不满足时退回双均线分析
+            score = np.where(triple & ~np.isnan(triple_score), triple_score, score)
+
+        score = np.where(available_count < 2, 30, score)
+        return np.where(length < 20, 0, score)
+
+    def _momentum_score_array(self, df, config, length):
+        """动量评分（向量化，逻辑同 _calculate_momentum_score）"""
+        momentum_config = config['momentum']
+        score = np.full(len(df), 50.0)
+
+        # RSI 评分
+        if 'RSI' in df.columns:
+            rsi = self._column_array(df, 'RSI')
+            score += np.select(
+                [np.isnan(rsi), rsi > momentum_config['rsi_overbought'], rsi < momentum_config['rsi_oversold'], rsi > 50],
+                [0, 15, -15, 10], default=-10)
+
+        # MACD 评分
+        if all(col in df.columns for col in ['MACD', 'MACD_signal', 'MACD_histogram']):
+            macd = self._column_array(df, 'MACD')
+            macd_signal = self._column_array(df, 'MACD_signal')
+            macd_hist = self._column_array(df, 'MACD_histogram')
+            missing = np.isnan(macd) | np.isnan(macd_signal) | np.isnan(macd_hist)
+            score += np.select(
+                [missing, (macd > macd_signal) & (macd_hist > 0), (macd < macd_signal) & (macd_hist < 0),
+                 macd_hist > 0, macd_hist < 0],
+                [0, 20, -20, 10, -10], default=0)
+
+        # 随机振荡器评分
+        if all(col in df.columns for col in ['K', 'D']):
+            k = self._column_array(df, 'K')
+            d = self._column_array(df, 'D')
+            score += np.select(
+                [np.isnan(k) | np.isnan(d), (k > d) & (k > 80), (k < d) & (k < 20), k > d],
+                [0, 15, -15, 5], default=-5)
+
+        return np.where(length < 14, 0, np.clip(score, 0, 100))
+
+    def _volume_score_array(self, df, config):
+        """成交量评分（向量化，逻辑同 _calculate_volume_score）"""
+        if 'Volume' not in df.columns:
+            return np.zeros(len(df))
+
+        volume_config = config['volume']
+        score = np.full(len(df), 40.0)
+
+        # 成交量比率评分
+        if 'Volume_Ratio' in df.columns:
+            volume_ratio = self._column_array(df, 'Volume_Ratio')
+            score += np.select(
+                [np.isnan(volume_ratio),
+                 volume_ratio > volume_config['surge_threshold_strong'],
+                 volume_ratio > volume_config['surge_threshold_medium'],
+                 volume_ratio > volume_config['surge_threshold_weak'],
+                 volume_ratio < volume_config['shrink_threshold']],
+                [0, 40, 25, 15, -20], default=0)
+
+        # 价量配合评分（信号列按真值计数）
+        def count_signals(signals):
+            count = np.zeros(len(df), dtype=int)
+            for signal in signals:
+                if signal in df.columns:
+                    count += df[signal].to_numpy().astype(bool)
+            return count
+
+        bullish = count_signals(['Price_Volume_Bullish_Strong', 'Price_Volume_Bullish_Medium', 'Price_Volume_Bullish_Weak',
+                                 'Price_Volume_Reversal_Bullish', 'Price_Volume_Continuation_Bullish'])
+        bearish = count_signals(['Price_Volume_Bearish_Strong', 'Price_Volume_Bearish_Medium', 'Price_Volume_Bearish_Weak',
+                                 'Price_Volume_Reversal_Bearish', 'Price_Volume_Continuation_Bearish'])
+        score += np.select([bullish > bearish, bearish > bullish],
+                           [np.minimum(20, bullish * 5), -np.minimum(20, bearish * 5)], default=0)
+
+        return np.clip(score, 0, 100)
+
     def _calculate_trend_score(self, df, config):
         """计算趋势评分"""
         if df.empty or len(df) < 20:
@@ -1522,15 +1710,11 @@ class TechnicalAnalyzerV2(TechnicalAnalyzer):
         if df.empty:
             return df
         
-        # 计算TAV评分
-        tav_score, detailed_scores, status = self.tav_scorer.calculate_tav_score(df, asset_type)
-        
-        # 添加TAV指标列
-        df['TAV_Score'] = tav_score
-        df['TAV_Status'] = status
-        df['TAV_Trend_Score'] = detailed_scores['trend']
-        df['TAV_Momentum_Score'] = detailed_scores['momentum']
-        df['TAV_Volume_Score'] = detailed_scores['volume']
+        # 逐行计算TAV评分（每行只使用截至该行的数据）
+        scores = self.tav_scorer.score_frame(df, asset_type)
+        for col in ['TAV_Score', 'TAV_Status', 'TAV_Trend_Score', 'TAV_Momentum_Score', 'TAV_Volume_Score']:
+            df[col] = scores[col]
+        tav_score = scores['TAV_Score']
         
         # 添加TAV信号列
         df['TAV_Strong_Signal'] = tav_score >= 75
@@ -1563,55 +1747,31 @@ class TechnicalAnalyzerV2(TechnicalAnalyzer):
         tav_config = TAVConfig.get_config(asset_type)
         tav_scorer = TAVScorer(tav_config)
         
-        # 为每个数据点计算TAV评分
-        for i in range(len(df)):
-            if i < 50:  # 需要足够的历史数据
-                continue
-            
-            # 获取当前时间窗口的数据
-            window_df = df.iloc[max(0, i-200):i+1].copy()
-            
-            # 计算TAV评分
-            tav_score, detailed_scores, status = tav_scorer.calculate_tav_score(window_df, asset_type)
-            
-            # TAV增强信号逻辑
-            tav_strong = tav_score >= tav_config['thresholds']['strong_signal']
-            tav_medium = tav_score >= tav_config['thresholds']['medium_signal']
-            
-            # 增强买入信号：传统信号 + TAV确认
-            if df.iloc[i].get('Buy_Signal', False):
-                if tav_strong:
-                    df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')} [TAV强共振确认]"
-                elif tav_medium:
-                    df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')} [TAV中等共振]"
-                else:
-                    df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')} [TAV弱共振]"
-            
-            # 增强卖出信号：传统信号 + TAV确认
-            if df.iloc[i].get('Sell_Signal', False):
-                if tav_strong:
-                    df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')} [TAV强共振确认]"
-                elif tav_medium:
-                    df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')} [TAV中等共振]"
-                else:
-                    df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')} [TAV弱共振]"
-            
-            # 如果同时有买入和卖出信号，确保描述包含两种信号
-            if df.iloc[i].get('Buy_Signal', False) and df.iloc[i].get('Sell_Signal', False):
-                # 检查描述是否同时包含买入和卖出信号
-                desc = df.iloc[i].get('Signal_Description', '')
-                if '买入信号:' not in desc or '卖出信号:' not in desc:
-                    # 如果描述不完整，重新生成
-                    original_desc = desc
-                    if tav_strong:
-                        tav_tag = " [TAV强共振确认]"
-                    elif tav_medium:
-                        tav_tag = " [TAV中等共振]"
-                    else:
-                        tav_tag = " [TAV弱共振]"
-                    
-                    # 创建包含两种信号的描述
-                    df.at[df.index[i], 'Signal_Description'] = f"买入信号: RSI超卖反弹(成交量弱确认){tav_tag} | 卖出信号: RSI超买回落(成交量弱确认){tav_tag}"
+        # 一次计算全部历史的TAV评分（前50个数据点历史不足，不做增强）
+        tav_score = tav_scorer.score_frame(df, asset_type)['TAV_Score'].to_numpy()
+        enough_history = np.arange(len(df)) >= 50
+        tav_tag = pd.Series(np.select(
+            [tav_score >= tav_config['thresholds']['strong_signal'], tav_score >= tav_config['thresholds']['medium_signal']],
+            ["[TAV强共振确认]", "[TAV中等共振]"], default="[TAV弱共振]"), index=df.index)
+        
+        buy = df['Buy_Signal'].fillna(False).astype(bool).to_numpy() & enough_history
+        sell = df['Sell_Signal'].fillna(False).astype(bool).to_numpy() & enough_history
+        if not (buy.any() or sell.any()):
+            return df
+        
+        desc = df['Signal_Description'].astype(object)
+        
+        # 增强买入/卖出信号：传统信号 + TAV确认
+        desc[buy] = desc[buy].astype(str) + ' ' + tav_tag[buy]
+        desc[sell] = desc[sell].astype(str) + ' ' + tav_tag[sell]
+        
+        # 如果同时有买入和卖出信号，确保描述包含两种信号
+        both = buy & sell
+        incomplete = both & ~(desc.str.contains('买入信号:', regex=False, na=False) &
+                              desc.str.contains('卖出信号:', regex=False, na=False)).to_numpy()
+        desc[incomplete] = ("买入信号: RSI超卖反弹(成交量弱确认) " + tav_tag[incomplete] +
+                            " | 卖出信号: RSI超买回落(成交量弱确认) " + tav_tag[incomplete])
+        df['Signal_Description'] = desc.astype(df['Signal_Description'].dtype)
         
         return df
     
@@ -1821,6 +1981,28 @@ def calculate_ma_deviation(df, periods=[5, 10, 20, 50]):
     }
 
 
+def _local_extrema(values, kind):
+    """
+    局部极值位置（严格低于/高于前后各两个值，首尾各两个位置不判断）
+
+    参数:
+    - values: 一维数组
+    - kind: 'min' 或 'max'
+
+    返回:
+    - 布尔数组
+    """
+    values = np.asarray(values, dtype=float)
+    mask = np.zeros(len(values), dtype=bool)
+    if len(values) < 5:
+        return mask
+    center = values[2:-2]
+    compare = np.less if kind == 'min' else np.greater
+    mask[2:-2] = (compare(center, values[1:-3]) & compare(center, values[:-4]) &
+                  compare(center, values[3:-1]) & compare(center, values[4:]))
+    return mask
+
+
 def calculate_support_resistance(df, lookback=20, min_touches=2):
     """
     计算支撑阻力位
@@ -1853,25 +2035,9 @@ def calculate_support_resistance(df, lookback=20, min_touches=2):
     recent_df = df.iloc[-lookback:]
     current_price = df.iloc[-1]['Close']
     
-    # 识别局部低点（支撑）
-    support_candidates = []
-    for i in range(2, len(recent_df) - 2):
-        low = recent_df.iloc[i]['Low']
-        if (low < recent_df.iloc[i-1]['Low'] and 
-            low < recent_df.iloc[i-2]['Low'] and
-            low < recent_df.iloc[i+1]['Low'] and 
-            low < recent_df.iloc[i+2]['Low']):
-            support_candidates.append(low)
-    
-    # 识别局部高点（阻力）
-    resistance_candidates = []
-    for i in range(2, len(recent_df) - 2):
-        high = recent_df.iloc[i]['High']
-        if (high > recent_df.iloc[i-1]['High'] and 
-            high > recent_df.iloc[i-2]['High'] and
-            high > recent_df.iloc[i+1]['High'] and 
-            high > recent_df.iloc[i+2]['High']):
-            resistance_candidates.append(high)
+    # 识别局部低点（支撑）和局部高点（阻力）：严格低于/高于前后各两根K线
+    support_candidates = recent_df['Low'].to_numpy()[_local_extrema(recent_df['Low'].to_numpy(), 'min')].tolist()
+    resistance_candidates = recent_df['High'].to_numpy()[_local_extrema(recent_df['High'].to_numpy(), 'max')].tolist()
     
     # 聚类相似价格（误差1%以内）
     def cluster_prices(prices, tolerance=0.01):
@@ -1928,6 +2094,139 @@ def calculate_support_resistance(df, lookback=20, min_touches=2):
     }
 
 
+
+def calculate_rolling_support_resistance(df, lookback=20, tolerance=0.01):
+    """
+    逐日计算最近支撑位和阻力位（一次性计算全部日期）
+
+    每行的结果与用截至该行的数据调用 calculate_support_resistance(df, lookback) 得到的
+    nearest_support / nearest_resistance 相同：局部极值只计算一次，每个回看窗口内的候选价格
+    按列批量排序、聚类（误差 tolerance 以内）。
+
+    参数:
+    - df: 包含 High, Low, Close 的DataFrame
+    - lookback: 回看天数
+    - tolerance: 价格聚类误差
+
+    返回:
+    - DataFrame（与 df 同索引）: Support_Nearest, Resistance_Nearest,
+      Support_Distance_Pct, Resistance_Distance_Pct（相对当前价的百分比距离），数据不足时为 NaN
+    """
+    n = len(df)
+    result = pd.DataFrame(np.nan, index=df.index, columns=[
+        'Support_Nearest', 'Resistance_Nearest', 'Support_Distance_Pct', 'Resistance_Distance_Pct'])
+    width = lookback - 4  # 窗口内可判断极值的位置数
+    if n < lookback or width <= 0:
+        return result
+
+    low = df['Low'].to_numpy(dtype=float)
+    high = df['High'].to_numpy(dtype=float)
+    close = df['Close'].to_numpy(dtype=float)
+    rows = np.arange(lookback - 1, n)
+    price = close[rows]
+
+    def nearest_levels(values, kind):
+        candidates = np.where(_local_extrema(values, kind), values, np.nan)
+        # 截至第 t 行的窗口中，可判断极值的位置为 [t-lookback+3, t-2]
+        windows = np.lib.stride_tricks.sliding_window_view(candidates, width)[rows - lookback + 3]
+        windows = np.sort(windows, axis=1)  # NaN 排在最后
+
+        below = np.full(len(rows), np.nan)
+        above = np.full(len(rows), np.nan)
+
+        def close_cluster(mask, total, count):
+            avg = np.where(mask, total / np.maximum(count, 1), np.nan)
+            np.fmax(below, np.where(avg < price, avg, np.nan), out=below)
+            np.fmin(above, np.where(avg > price, avg, np.nan), out=above)
+
+        # 贪心聚类：与当前聚类首个价格的误差超过 tolerance 时开始新聚类
+        anchor = windows[:, 0]
+        total = np.nan_to_num(anchor)
+        count = (~np.isnan(anchor)).astype(int)
+        for k in range(1, width):
+            value = windows[:, k]
+            valid = ~np.isnan(value)
+            within = valid & (np.abs(value - anchor) / anchor <= tolerance)
+            new_cluster = valid & ~within
+            close_cluster(new_cluster, total, count)
+            total = np.where(within, total + value, np.where(new_cluster, value, total))
+            count = np.where(within, count + 1, np.where(new_cluster, 1, count))
+            anchor = np.where(new_cluster, value, anchor)
+        close_cluster(count > 0, total, count)
+        return below, above
+
+    support, _ = nearest_levels(low, 'min')
+    _, resistance = nearest_levels(high, 'max')
+
+    result.iloc[rows, 0] = support
+    result.iloc[rows, 1] = resistance
+    result.iloc[rows, 2] = (price - support) / price * 100
+    result.iloc[rows, 3] = (resistance - price) / price * 100
+    return result
+
+
+def calculate_rolling_chip_distribution(df, window=60, num_bins=20):
+    """
+    逐日计算筹码分布指标（滚动窗口成交量分价直方图，一次性计算全部日期）
+
+    每行的结果与 TechnicalAnalyzer.get_chip_distribution(截至该行的最近 window 行) 相同：
+    每个窗口按收盘价区间分箱，用一次 bincount 累计各区间成交量。
+
+    参数:
+    - df: 包含 Close 和 Volume 的DataFrame
+    - window: 滚动窗口长度
+    - num_bins: 价格区间数量
+
+    返回:
+    - DataFrame（与 df 同索引）: Chip_Concentration（HHI）, Chip_Resistance_Ratio（当前价上方筹码比例）,
+      Chip_Peak_Low, Chip_Peak_High（筹码最集中的价格区间），数据不足或无法计算时为 NaN
+    """
+    n = len(df)
+    result = pd.DataFrame(np.nan, index=df.index, columns=[
+        'Chip_Concentration', 'Chip_Resistance_Ratio', 'Chip_Peak_Low', 'Chip_Peak_High'])
+    if n < window:
+        return result
+
+    close = df['Close'].to_numpy(dtype=float)
+    volume = np.nan_to_num(df['Volume'].to_numpy(dtype=float))
+    closes = np.lib.stride_tricks.sliding_window_view(close, window)
+    volumes = np.lib.stride_tricks.sliding_window_view(volume, window)
+    m = len(closes)
+
+    # 每个窗口的价格区间边界（与 np.linspace 逐位相同）
+    price_min = closes.min(axis=1)
+    price_max = closes.max(axis=1)
+    step = (price_max - price_min) / num_bins
+    edges = np.arange(num_bins + 1) * step[:, None] + price_min[:, None]
+    edges[:, -1] = price_max
+
+    # 区间 i 为 [edges[i], edges[i+1])，最高价恰好等于上边界时不计入任何区间
+    bin_index = (closes[:, :, None] >= edges[:, None, :]).sum(axis=2) - 1
+    in_range = (bin_index >= 0) & (bin_index < num_bins)
+    flat_index = (np.arange(m)[:, None] * num_bins + bin_index)[in_range]
+    volume_by_bin = np.bincount(flat_index, weights=volumes[in_range], minlength=m * num_bins).reshape(m, num_bins)
+    total_volume = volume_by_bin.sum(axis=1)
+
+    valid = (price_max - price_min >= 1e-6) & (total_volume > 0)
+    safe_total = np.where(total_volume > 0, total_volume, 1)
+    concentration = ((volume_by_bin / safe_total[:, None]) ** 2).sum(axis=1)
+
+    peak = volume_by_bin.argmax(axis=1)
+    peak_low = edges[np.arange(m), peak]
+    peak_high = edges[np.arange(m), peak + 1]
+
+    # 当前价格所在区间及以上的成交量占比（当前价等于最低价时为 0）
+    current_price = close[window - 1:]
+    current_bin = (edges < current_price[:, None]).sum(axis=1) - 1
+    volume_above = np.cumsum(volume_by_bin[:, ::-1], axis=1)[:, ::-1]
+    resistance_volume = np.where(current_bin >= 0, volume_above[np.arange(m), np.clip(current_bin, 0, num_bins - 1)], 0)
+    resistance_ratio = resistance_volume / safe_total
+
+    rows = np.arange(window - 1, n)
+    for col, values in enumerate([concentration, resistance_ratio, peak_low, peak_high]):
+        result.iloc[rows, col] = np.where(valid, values, np.nan)
+    return result
+
 def calculate_relative_strength(stock_df, index_df, period=20):
     """
     计算相对强弱指标（相对于指数）
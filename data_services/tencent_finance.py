@@ -1,5 +1,6 @@
 import requests
 import pandas as pd
+import time
 from datetime import datetime, timedelta
 import json
 
@@ -133,6 +134,188 @@ def get_hk_stock_info_tencent(stock_code):
         print(f"获取股票 {stock_code} 信息失败: {e}")
         return None
 
+def _to_quote_symbol(stock_code):
+    """股票代码转换为 qt.gtimg.cn 港股代码，例如 0700.HK -> hk00700"""
+    return 'hk' + str(stock_code).upper().replace('.HK', '').zfill(5)
+
+
+def _parse_quote_float(value):
+    """解析报价字段，空值或非数字返回 None"""
+    try:
+        return float(value) if value not in ('', None) else None
+    except ValueError:
+        return None
+
+
+def get_hk_quotes_tencent(stock_codes, timeout=10, chunk_size=60):
+    """
+    通过腾讯财经实时行情接口批量获取港股报价（一次请求多只股票）
+
+    Args:
+        stock_codes (list): 股票代码列表，例如 ["0700.HK", "00005"]
+        timeout (int): 请求超时（秒）
+        chunk_size (int): 单次请求的最大股票数
+
+    Returns:
+        dict: {输入的股票代码: 报价字典}，报价字典包括 name, last, prev_close, open,
+              bid, ask, high, low, volume, quote_time；获取失败的股票不出现在结果中
+    """
+    symbol_to_codes = {}
+    for code in stock_codes:
+        symbol_to_codes.setdefault(_to_quote_symbol(code), []).append(code)
+    symbols = list(symbol_to_codes)
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36',
+        'Referer': 'https://stockapp.finance.qq.com/',
+    }
+
+    quotes = {}
+    for i in range(0, len(symbols), chunk_size):
+        chunk = symbols[i:i + chunk_size]
+        try:
+            response = requests.get(f"http://qt.gtimg.cn/q={','.join(chunk)}", headers=headers, timeout=timeout)
+            response.raise_for_status()
+            response.encoding = 'gbk'
+        except Exception as e:
+            print(f"批量获取港股报价失败: {e}")
+            continue
+
+        # 返回格式: v_hk00700="100~腾讯控股~00700~最新价~昨收~今开~成交量~...";（每只股票一行）
+        # 字段: [1]名称 [3]最新价 [4]昨收 [5]今开 [6]成交量 [9]买一价 [19]卖一价 [30]时间 [33]最高 [34]最低
+        for line in response.text.split(';'):
+            line = line.strip()
+            if not line.startswith('v_') or '="' not in line:
+                continue
+            symbol, _, body = line[2:].partition('="')
+            fields = body.rstrip('"').split('~')
+            if symbol not in symbol_to_codes or len(fields) < 7:
+                continue
+
+            last = _parse_quote_float(fields[3])
+            if not last:
+                continue
+            bid = _parse_quote_float(fields[9]) if len(fields) > 9 else None
+            ask = _parse_quote_float(fields[19]) if len(fields) > 19 else None
+            quote = {
+                'name': fields[1],
+                'last': last,
+                'prev_close': _parse_quote_float(fields[4]),
+                'open': _parse_quote_float(fields[5]),
+                # 无挂单（如停牌、收市后）时买卖价回退到最新价
+                'bid': bid or last,
+                'ask': ask or last,
+                'high': _parse_quote_float(fields[33]) if len(fields) > 33 else None,
+                'low': _parse_quote_float(fields[34]) if len(fields) > 34 else None,
+                'volume': _parse_quote_float(fields[6]),
+                'quote_time': fields[30] if len(fields) > 30 else None
+            }
+            for code in symbol_to_codes[symbol]:
+                quotes[code] = quote
+
+    return quotes
+
+
+class TencentQuoteService:
+    """
+    港股实时报价服务（批量请求 + 短时缓存）
+
+    一个交易周期内先用 prefetch() 一次性拉取所有持仓和候选股票的报价，
+    之后在 TTL 内的查询直接命中缓存，不再逐只请求K线。
+    """
+
+    def __init__(self, ttl_seconds=300, fetcher=None, negative_ttl_seconds=30):
+        """
+        Args:
+            ttl_seconds (int): 报价缓存有效期（秒）
+            fetcher (callable): 批量报价函数，默认 get_hk_quotes_tencent
+            negative_ttl_seconds (int): 获取失败（无报价）的缓存有效期（秒），期间不重复请求
+        """
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = min(negative_ttl_seconds, ttl_seconds)
+        self.fetcher = fetcher or get_hk_quotes_tencent
+        self._cache = {}  # {报价代码: (获取时间, 报价字典)}，获取失败时报价字典为 None
+        self.request_count = 0
+
+    def _fresh(self, symbol, now):
+        entry = self._cache.get(symbol)
+        if entry is None:
+            return False
+        ttl = self.ttl_seconds if entry[1] is not None else self.negative_ttl_seconds
+        return now - entry[0] <= ttl
+
+    def prefetch(self, stock_codes):
+        """
+        一次请求拉取缓存中缺失或已过期的报价
+
+        Args:
+            stock_codes (iterable): 股票代码
+
+        Returns:
+            dict: {股票代码: 报价字典}（仅包含获取成功的股票）
+        """
+        now = time.monotonic()
+        stale = {}
+        for code in stock_codes:
+            symbol = _to_quote_symbol(code)
+            if not self._fresh(symbol, now):
+                stale[symbol] = code
+
+        if stale:
+            self.request_count += 1
+            try:
+                fetched = self.fetcher(list(stale.values()))
+            except Exception as e:
+                print(f"批量获取港股报价失败: {e}")
+                fetched = {}
+            fetched_at = time.monotonic()
+            # 未返回报价的股票（停牌、代码错误、请求失败）短时缓存为 None，避免每次查询都重新请求
+            for symbol in stale:
+                self._cache[symbol] = (fetched_at, None)
+            for code, quote in fetched.items():
+                self._cache[_to_quote_symbol(code)] = (fetched_at, quote)
+
+        quotes = {}
+        for code in stock_codes:
+            entry = self._cache.get(_to_quote_symbol(code))
+            if entry is not None and entry[1] is not None:
+                quotes[code] = entry[1]
+        return quotes
+
+    def get_quote(self, stock_code):
+        """
+        获取单只股票报价（缓存未命中时单独请求）
+
+        Returns:
+            dict: 报价字典，获取失败返回 None
+        """
+        return self.prefetch([stock_code]).get(stock_code)
+
+    def get_price(self, stock_code, side=None):
+        """
+        获取成交参考价
+
+        Args:
+            stock_code (str): 股票代码
+            side (str): 'BUY' 返回卖一价，'SELL' 返回买一价，None 返回最新价
+
+        Returns:
+            float: 价格，获取失败返回 None
+        """
+        quote = self.get_quote(stock_code)
+        if quote is None:
+            return None
+        if side == 'BUY':
+            return quote['ask']
+        if side == 'SELL':
+            return quote['bid']
+        return quote['last']
+
+    def invalidate(self):
+        """清空缓存（开始新的交易周期时调用）"""
+        self._cache.clear()
+
+
 def get_hsi_data_tencent(period_days=90):
     """
     通过腾讯财经接口获取恒生指数数据
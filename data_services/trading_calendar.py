@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地交易日历服务（港股 / A股）
+
+各处原来分别推算交易日：从 AKShare 拉取新浪交易日历（A股日历，且每次调用都联网）、
+pandas 工作日或 numpy busday 加港股假期表，结果互不一致。TradingCalendar 按市场
+把交易日一次性生成为有序的 int32 数组（1970-01-01 起的天数），所有查询都是二分查找：
+- add_trading_days：第 N 个交易日（目标日期）
+- count_between：两个日期之间的交易日数量
+- next_session / previous_session：下一个 / 上一个交易日
+- is_half_day、options_expiry：半日市和期权到期日
+
+假期表按年维护（每年需更新），假期表未覆盖的年份按周一至周五近似，查询到这些年份时
+记录一次告警。
+"""
+
+import logging
+from datetime import date as _date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 日历覆盖范围（范围外的日期按周一至周五外推）
+CALENDAR_START = '2000-01-01'
+CALENDAR_END = '2035-12-31'
+
+# 港股假期（周一至周五的休市日）
+HK_HOLIDAYS: Dict[int, List[str]] = {
+    2024: [
+        '2024-01-01',  # 元旦
+        '2024-02-10', '2024-02-12', '2024-02-13',  # 春节
+        '2024-03-29', '2024-03-30', '2024-04-01',  # 复活节
+        '2024-04-04',  # 清明节
+        '2024-05-01',  # 劳动节
+        '2024-05-15',  # 佛诞
+        '2024-06-10',  # 端午节
+        '2024-07-01',  # 回归日
+        '2024-09-18',  # 中秋节翌日
+        '2024-10-01',  # 国庆节
+        '2024-10-11',  # 重阳节
+        '2024-12-25', '2024-12-26',  # 圣诞节
+    ],
+    2025: [
+        '2025-01-01',  # 元旦
+        '2025-01-29', '2025-01-30', '2025-01-31',  # 春节
+        '2025-04-04',  # 清明节
+        '2025-04-18', '2025-04-19', '2025-04-21',  # 复活节
+        '2025-05-01',  # 劳动节
+        '2025-05-05',  # 佛诞
+        '2025-05-31',  # 端午节
+        '2025-07-01',  # 回归日
+        '2025-10-01',  # 国庆节
+        '2025-10-07',  # 中秋节翌日
+        '2025-10-29',  # 重阳节
+        '2025-12-25', '2025-12-26',  # 圣诞节
+    ],
+    2026: [
+        '2026-01-01',  # 元旦
+        '2026-02-17', '2026-02-18', '2026-02-19',  # 春节
+        '2026-04-03', '2026-04-06',  # 复活节
+        '2026-04-07',  # 清明节翌日（清明节 4-05 为周日，翌日与复活节星期一重叠）
+        '2026-05-01',  # 劳动节
+        '2026-05-25',  # 佛诞翌日（佛诞 5-24 为周日）
+        '2026-06-19',  # 端午节
+        '2026-07-01',  # 回归日
+        '2026-10-01',  # 国庆节
+        '2026-10-19',  # 重阳节翌日（重阳节 10-18 为周日；中秋节翌日 9-26 为周六）
+        '2026-12-25',  # 圣诞节（圣诞节翌日 12-26 为周六）
+    ],
+}
+
+# 港股半日市（农历除夕、平安夜、除夕，只有上午交易）
+HK_HALF_DAYS: Dict[int, List[str]] = {
+    2024: ['2024-02-09', '2024-12-24', '2024-12-31'],
+    2025: ['2025-01-28', '2025-12-24', '2025-12-31'],
+    2026: ['2026-02-16', '2026-12-24', '2026-12-31'],
+}
+
+# A股休市日（沪深交易所公告，周一至周五部分；调休的周末也不开市）
+A_STOCK_HOLIDAYS: Dict[int, List[str]] = {
+    2024: [
+        '2024-01-01',  # 元旦
+        '2024-02-09', '2024-02-12', '2024-02-13', '2024-02-14', '2024-02-15', '2024-02-16',  # 春节
+        '2024-04-04', '2024-04-05',  # 清明节
+        '2024-05-01', '2024-05-02', '2024-05-03',  # 劳动节
+        '2024-06-10',  # 端午节
+        '2024-09-16', '2024-09-17',  # 中秋节
+        '2024-10-01', '2024-10-02', '2024-10-03', '2024-10-04', '2024-10-07',  # 国庆节
+    ],
+    2025: [
+        '2025-01-01',  # 元旦
+        '2025-01-28', '2025-01-29', '2025-01-30', '2025-01-31', '2025-02-03', '2025-02-04',  # 春节
+        '2025-04-04',  # 清明节
+        '2025-05-01', '2025-05-02', '2025-05-05',  # 劳动节
+        '2025-06-02',  # 端午节
+        '2025-10-01', '2025-10-02', '2025-10-03', '2025-10-06', '2025-10-07', '2025-10-08',  # 国庆节、中秋节
+    ],
+    2026: [
+        '2026-01-01', '2026-01-02',  # 元旦
+        '2026-02-16', '2026-02-17', '2026-02-18', '2026-02-19', '2026-02-20', '2026-02-23',  # 春节
+        '2026-04-06',  # 清明节
+        '2026-05-01', '2026-05-04', '2026-05-05',  # 劳动节
+        '2026-06-19',  # 端午节
+        '2026-09-25',  # 中秋节
+        '2026-10-01', '2026-10-02', '2026-10-05', '2026-10-06', '2026-10-07',  # 国庆节
+    ],
+}
+
+MARKETS = ('hk', 'a_stock')
+
+_EPOCH_ORDINAL = _date(1970, 1, 1).toordinal()
+
+
+def _to_day(value) -> int:
+    """日期转为 1970-01-01 起的天数（支持 'YYYY-MM-DD'、datetime、date、Timestamp、datetime64）"""
+    if isinstance(value, str):
+        return int(np.datetime64(value[:10], 'D').astype(np.int64))
+    if isinstance(value, (datetime, pd.Timestamp)):
+        value = value.date()
+    if isinstance(value, _date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def _to_str(day: int) -> str:
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _days(dates) -> np.ndarray:
+    return np.array(sorted({_to_day(d) for d in dates}), dtype=np.int32)
+
+
+class TradingCalendar:
+    """单个市场的交易日历（有序 int32 交易日数组）"""
+
+    def __init__(self, market: str, holidays=(), half_days=(),
+                 start: str = CALENDAR_START, end: str = CALENDAR_END, covered_until: Optional[str] = None):
+        """
+        参数:
+        - market: 市场（'hk' / 'a_stock'）
+        - holidays: 休市日列表（周一至周五）
+        - half_days: 半日市列表
+        - start, end: 日历覆盖范围
+        - covered_until: 假期表覆盖的最后一天（之后的日期按周一至周五近似，查询时按年告警一次）
+        """
+        self.market = market
+        self.covered_until = _to_day(covered_until) if covered_until else None
+        self._warned_years = set()
+        self.holidays = _days(holidays)
+        self.half_days = _days(half_days)
+        weekdays = np.arange(_to_day(start), _to_day(end) + 1, dtype=np.int32)
+        # 1970-01-01 是周四：(天数 + 3) % 7 为 0=周一 ... 6=周日
+        weekdays = weekdays[(weekdays + 3) % 7 < 5]
+        self.sessions = weekdays[~np.isin(weekdays, self.holidays)]
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def _day(self, date) -> int:
+        """日期转为天数，超出假期表覆盖范围时告警"""
+        day = _to_day(date)
+        if self.covered_until is not None and day > self.covered_until:
+            year = int(_to_str(day)[:4])
+            if year not in self._warned_years:
+                self._warned_years.add(year)
+                logger.warning(f"{self.market} 假期表未覆盖 {year} 年，交易日按周一至周五近似，"
+                               f"请更新 data_services/trading_calendar.py")
+        return day
+
+    def _session_at(self, idx: int) -> int:
+        """第 idx 个交易日（超出覆盖范围时按周一至周五外推）"""
+        sessions = self.sessions
+        if 0 <= idx < len(sessions):
+            return self._day(int(sessions[idx]))
+        if idx < 0:
+            anchor, offset = int(sessions[0]), idx
+        else:
+            anchor, offset = int(sessions[-1]), idx - len(sessions) + 1
+        return self._day(int(np.busday_offset(np.datetime64(anchor, 'D'), offset).astype(np.int64)))
+
+    # ==================== 查询 ====================
+
+    def is_session(self, date) -> bool:
+        """是否为交易日"""
+        day = self._day(date)
+        idx = np.searchsorted(self.sessions, day)
+        return bool(idx < len(self.sessions) and self.sessions[idx] == day)
+
+    def is_half_day(self, date) -> bool:
+        """是否为半日市"""
+        day = self._day(date)
+        idx = np.searchsorted(self.half_days, day)
+        return bool(idx < len(self.half_days) and self.half_days[idx] == day)
+
+    def add_trading_days(self, date, days: int) -> str:
+        """
+        date 之后第 N 个交易日
+
+        参数:
+        - date: 起始日期（非交易日时从之前最近的交易日起算）
+        - days: 交易日数量（负数为向前）
+
+        返回:
+        - 目标日期 (YYYY-MM-DD)
+        """
+        idx = int(np.searchsorted(self.sessions, self._day(date), side='right')) - 1
+        return _to_str(self._session_at(idx + days))
+
+    def count_between(self, start_date, end_date) -> int:
+        """
+        [start_date, end_date) 之间的交易日数量（end_date 早于 start_date 时为 -count_between(end_date, start_date)）
+        """
+        sessions = self.sessions
+        return int(np.searchsorted(sessions, self._day(end_date)) - np.searchsorted(sessions, self._day(start_date)))
+
+    def next_session(self, date, inclusive: bool = False) -> str:
+        """
+        date 之后的下一个交易日
+
+        参数:
+        - date: 参考日期
+        - inclusive: date 本身是交易日时是否返回 date
+        """
+        side = 'left' if inclusive else 'right'
+        return _to_str(self._session_at(int(np.searchsorted(self.sessions, self._day(date), side=side))))
+
+    def previous_session(self, date, inclusive: bool = False) -> str:
+        """
+        date 之前的上一个交易日
+
+        参数:
+        - date: 参考日期
+        - inclusive: date 本身是交易日时是否返回 date
+        """
+        side = 'right' if inclusive else 'left'
+        return _to_str(self._session_at(int(np.searchsorted(self.sessions, self._day(date), side=side)) - 1))
+
+    def sessions_between(self, start_date, end_date) -> pd.DatetimeIndex:
+        """[start_date, end_date] 之间的全部交易日"""
+        sessions = self.sessions
+        lo = np.searchsorted(sessions, self._day(start_date))
+        hi = np.searchsorted(sessions, self._day(end_date), side='right')
+        return pd.DatetimeIndex(sessions[lo:hi].astype('datetime64[D]'))
+
+    def options_expiry(self, year: int, month: int) -> str:
+        """
+        当月期权到期日
+
+        - 港股（恒指期权）：当月倒数第二个交易日
+        - A股（ETF期权）：当月第四个周三，遇休市顺延至下一个交易日
+        """
+        first = self._day(f'{year:04d}-{month:02d}-01')
+        if self.market == 'hk':
+            next_month = self._day(f'{year + month // 12:04d}-{month % 12 + 1:02d}-01')
+            return _to_str(self._session_at(int(np.searchsorted(self.sessions, next_month)) - 2))
+        first_wednesday = first + (2 - (first + 3) % 7) % 7
+        return self.next_session(_to_str(first_wednesday + 21), inclusive=True)
+
+
+_calendars: Dict[str, TradingCalendar] = {}
+
+
+def get_trading_calendar(market: str = 'hk') -> TradingCalendar:
+    """
+    获取市场交易日历（每个进程只生成一次）
+
+    参数:
+    - market: 'hk'（港股，默认）或 'a_stock'（A股）
+    """
+    if market not in MARKETS:
+        raise ValueError(f"不支持的市场: {market}，支持：{list(MARKETS)}")
+    calendar = _calendars.get(market)
+    if calendar is None:
+        if market == 'hk':
+            calendar = TradingCalendar('hk', _flatten(HK_HOLIDAYS), _flatten(HK_HALF_DAYS),
+                                       covered_until=f'{max(HK_HOLIDAYS)}-12-31')
+        else:
+            calendar = TradingCalendar('a_stock', _flatten(A_STOCK_HOLIDAYS),
+                                       covered_until=f'{max(A_STOCK_HOLIDAYS)}-12-31')
+        _calendars[market] = calendar
+    return calendar
+
+
+def market_for_code(stock_code: Optional[str]) -> str:
+    """按股票代码判断市场（6 位数字或 .SS/.SH/.SZ 后缀为 A股，其余按港股）"""
+    code = str(stock_code or '').upper()
+    if code.endswith(('.SS', '.SH', '.SZ')) or (len(code) == 6 and code.isdigit()):
+        return 'a_stock'
+    return 'hk'
+
+
+def _flatten(by_year: Dict[int, List[str]]) -> List[str]:
+    return [d for year in sorted(by_year) for d in by_year[year]]
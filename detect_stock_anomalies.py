@@ -42,8 +42,10 @@ from data_services.technical_analysis import TechnicalAnalyzerV2
 # Anomaly detection imports
 try:
     from anomaly_detector.zscore_detector import ZScoreDetector
+    from anomaly_detector.streaming_zscore import StreamingZScoreDetector
     from anomaly_detector.isolation_forest_detector import IsolationForestDetector
     from anomaly_detector.feature_extractor import FeatureExtractor
+    from anomaly_detector.batch_isolation_forest import BatchIsolationForestEngine
     from anomaly_detector.anomaly_integrator import AnomalyIntegrator
     from anomaly_detector.cache import AnomalyCache
     ANOMALY_DETECTION_AVAILABLE = True
@@ -82,7 +84,8 @@ class StockAnomalyDetector:
         
         # 使用 anomaly_detector 模块
         if ANOMALY_DETECTION_AVAILABLE:
-            self.zscore_detector = ZScoreDetector(window_size=window_size, threshold=threshold_medium, time_interval=time_interval)
+            # 流式 Z-Score：窗口状态按 (股票, 指标, 周期) 持久化，每次运行只追加新K线
+            self.zscore_detector = StreamingZScoreDetector(window_size=window_size, threshold=threshold_medium, time_interval=time_interval)
             
             # 只在深度分析模式下初始化 Isolation Forest
             if use_deep_analysis:
@@ -94,17 +97,25 @@ class StockAnomalyDetector:
                     anomaly_type=anomaly_type
                 )
                 self.feature_extractor = FeatureExtractor()
+                # 批量引擎：持久化模型按计划重训，整个自选股列表一次评分
+                self.batch_if_engine = BatchIsolationForestEngine(
+                    contamination=0.05,
+                    random_state=42,
+                    anomaly_type=anomaly_type
+                )
                 self.cache = AnomalyCache()
                 self.integrator = AnomalyIntegrator(self.cache)
             else:
                 self.if_detector = None
                 self.feature_extractor = None
+                self.batch_if_engine = None
                 self.cache = None
                 self.integrator = None
         else:
             self.zscore_detector = None
             self.if_detector = None
             self.feature_extractor = None
+            self.batch_if_engine = None
             self.cache = None
             self.integrator = None
 
@@ -154,12 +165,21 @@ class StockAnomalyDetector:
         
         anomalies = []
         
+        # 先获取所有股票数据，Isolation Forest 对整个列表批量评分
+        stock_data = {}
         for stock in stocks:
             try:
                 logger.info(f"检测 {stock} 的异常...")
-                
-                # 获取股票数据
-                df = self.get_stock_data(stock, period)
+                stock_data[stock] = self.get_stock_data(stock, period)
+            except Exception as e:
+                logger.error(f"获取 {stock} 数据时出错: {e}")
+                stock_data[stock] = None
+        
+        if_anomalies_by_stock = self._detect_if_anomalies_batch(stock_data, target_dt)
+        
+        for stock in stocks:
+            try:
+                df = stock_data.get(stock)
                 
                 if df is None or len(df) < self.window_size:
                     logger.warning(f"{stock} 数据不足，跳过")
@@ -179,7 +199,8 @@ class StockAnomalyDetector:
                     metric_name='price',
                     current_value=current_price,
                     history=df['Close'],
-                    timestamp=target_dt
+                    timestamp=target_dt,
+                    symbol=stock
                 )
                 if price_anomaly:
                     zscore_anomalies.append(price_anomaly)
@@ -191,30 +212,14 @@ class StockAnomalyDetector:
                         metric_name='volume',
                         current_value=current_volume,
                         history=df['Volume'],
-                        timestamp=target_dt
+                        timestamp=target_dt,
+                        symbol=stock
                     )
                     if volume_anomaly:
                         zscore_anomalies.append(volume_anomaly)
                 
-                # Isolation Forest 检测（Layer 2） - 仅在深度分析模式下执行
-                if_anomalies = []
-                if self.use_deep_analysis and self.if_detector and self.feature_extractor:
-                    try:
-                        # 提取特征
-                        features, timestamps = self.feature_extractor.extract_features(df)
-                        
-                        if not features.empty:
-                            # 训练模型
-                            self.if_detector.train(features)
-                            
-                            # 检测异常（指定日期）
-                            if_anomalies = self.if_detector.detect_anomalies_by_date(
-                                features=features,
-                                timestamps=timestamps,
-                                target_date=target_dt
-                            )
-                    except Exception as e:
-                        logger.warning(f"{stock} Isolation Forest 检测失败: {e}")
+                # Isolation Forest 检测（Layer 2） - 仅在深度分析模式下执行（已批量完成）
+                if_anomalies = if_anomalies_by_stock.get(stock, [])
                 
                 # 整合结果
                 if self.integrator:
@@ -364,8 +369,44 @@ class StockAnomalyDetector:
                 traceback.print_exc()
                 continue
         
+        if self.zscore_detector:
+            self.zscore_detector.save_state()
+        
         return anomalies
 
+    def _detect_if_anomalies_batch(self, stock_data: Dict[str, Optional[pd.DataFrame]], target_dt: datetime) -> Dict[str, List[Dict]]:
+        """
+        批量 Isolation Forest 检测（Layer 2）
+
+        使用持久化模型（按计划重训）对所有股票的特征矩阵一次评分，并向量化过滤目标日期
+
+        Args:
+            stock_data: {股票代码: 价格数据}
+            target_dt: 目标日期
+
+        Returns:
+            {股票代码: Isolation Forest 异常列表}
+        """
+        if not (self.use_deep_analysis and self.batch_if_engine and self.feature_extractor):
+            return {}
+
+        features_by_stock = {}
+        for stock, df in stock_data.items():
+            if df is None or len(df) < self.window_size:
+                continue
+            try:
+                features, _ = self.feature_extractor.extract_features(df)
+                if not features.empty:
+                    features_by_stock[stock] = features
+            except Exception as e:
+                logger.warning(f"{stock} Isolation Forest 特征提取失败: {e}")
+
+        try:
+            return self.batch_if_engine.detect_anomalies_by_date(features_by_stock, target_dt)
+        except Exception as e:
+            logger.warning(f"批量 Isolation Forest 检测失败: {e}")
+            return {}
+
     def get_stock_data(self, stock: str, period: str = '3mo', interval: str = None) -> Optional[pd.DataFrame]:
         """
         获取股票数据（使用腾讯财经接口，更可靠）
@@ -42,6 +42,9 @@ from data_services.tencent_finance import get_hk_stock_data_tencent, get_hk_stoc
 # 导入大模型服务
 from llm_services import qwen_engine
 
+# 导入技术指标计算内核
+from data_services.indicator_kernels import compute_indicators
+
 # 导入基本面数据模块
 from data_services.fundamental_data import get_comprehensive_fundamental_data
 
@@ -1399,25 +1402,25 @@ def analyze_stock(code, name, run_date=None):
             print(f"⚠️  {name} 清理异常值后数据不足")
             return None
             
+        # 均线、MACD、RSI(Wilder)、ATR、布林带、随机指标一次计算（共用指标内核）
+        indicators = compute_indicators(
+            full_hist['Close'], full_hist['High'], full_hist['Low'], ma_periods=(5, 10, 20),
+            rsi_period=14, rsi_method='wilder', macd_params=(12, 26, 9), macd_adjust=False,
+            bollinger_params=(20, 2), atr_period=14, stochastic_params=(14, 3), min_periods=1)
+
         full_hist['Vol_MA20'] = full_hist['Volume'].rolling(VOL_WINDOW, min_periods=1).mean()
-        full_hist['MA5'] = full_hist['Close'].rolling(5, min_periods=1).mean()
-        full_hist['MA10'] = full_hist['Close'].rolling(10, min_periods=1).mean()
-        full_hist['MA20'] = full_hist['Close'].rolling(20, min_periods=1).mean()
+        full_hist['MA5'] = indicators['MA5']
+        full_hist['MA10'] = indicators['MA10']
+        full_hist['MA20'] = indicators['MA20']
 
         # MACD
-        full_hist['EMA12'] = full_hist['Close'].ewm(span=12, adjust=False).mean()
-        full_hist['EMA26'] = full_hist['Close'].ewm(span=26, adjust=False).mean()
-        full_hist['MACD'] = full_hist['EMA12'] - full_hist['EMA26']
-        full_hist['MACD_Signal'] = full_hist['MACD'].ewm(span=9, adjust=False).mean()
+        full_hist['EMA12'] = indicators['EMA_fast']
+        full_hist['EMA26'] = indicators['EMA_slow']
+        full_hist['MACD'] = indicators['MACD']
+        full_hist['MACD_Signal'] = indicators['MACD_signal']
 
         # RSI (Wilder)
-        delta_full = full_hist['Close'].diff()
-        gain = delta_full.clip(lower=0)
-        loss = -delta_full.clip(upper=0)
-        avg_gain = gain.ewm(alpha=1/14, adjust=False).mean()
-        avg_loss = loss.ewm(alpha=1/14, adjust=False).mean()
-        rs = avg_gain / avg_loss
-        full_hist['RSI'] = 100 - (100 / (1 + rs))
+        full_hist['RSI'] = indicators['RSI']
 
         # Returns & Volatility (年化)
         full_hist['Returns'] = full_hist['Close'].pct_change()
@@ -1429,14 +1432,8 @@ def analyze_stock(code, name, run_date=None):
         full_hist['VWAP'] = (full_hist['TP'] * full_hist['Volume']).rolling(VOL_WINDOW, min_periods=1).sum() / full_hist['Volume'].rolling(VOL_WINDOW, min_periods=1).sum()
         
         # ATR (Average True Range)
-        full_hist['TR'] = np.maximum(
-            np.maximum(
-                full_hist['High'] - full_hist['Low'],
-                np.abs(full_hist['High'] - full_hist['Close'].shift(1))
-            ),
-            np.abs(full_hist['Low'] - full_hist['Close'].shift(1))
-        )
-        full_hist['ATR'] = full_hist['TR'].rolling(14, min_periods=1).mean()
+        full_hist['TR'] = indicators['TR']
+        full_hist['ATR'] = indicators['ATR']
         
         # Chaikin Money Flow (CMF)
         full_hist['MF_Multiplier'] = ((full_hist['Close'] - full_hist['Low']) - (full_hist['High'] - full_hist['Close'])) / (full_hist['High'] - full_hist['Low'])
@@ -1461,9 +1458,9 @@ def analyze_stock(code, name, run_date=None):
         full_hist['ADX'] = dx.ewm(alpha=1/14, adjust=False).mean()
         
         # Bollinger Bands
-        full_hist['BB_Mid'] = full_hist['Close'].rolling(20, min_periods=1).mean()
-        full_hist['BB_Upper'] = full_hist['BB_Mid'] + 2 * full_hist['Close'].rolling(20, min_periods=1).std()
-        full_hist['BB_Lower'] = full_hist['BB_Mid'] - 2 * full_hist['Close'].rolling(20, min_periods=1).std()
+        full_hist['BB_Mid'] = indicators['BB_middle']
+        full_hist['BB_Upper'] = indicators['BB_upper']
+        full_hist['BB_Lower'] = indicators['BB_lower']
         full_hist['BB_Width'] = (full_hist['BB_Upper'] - full_hist['BB_Lower']) / full_hist['BB_Mid']
         
         # Bollinger Band Breakout
@@ -1498,12 +1495,10 @@ def analyze_stock(code, name, run_date=None):
         full_hist['ATR_Ratio'] = full_hist['ATR'] / full_hist['ATR_MA']
         
         # Stochastic Oscillator
-        K_Period = 14
-        D_Period = 3
-        full_hist['Low_Min'] = full_hist['Low'].rolling(window=K_Period, min_periods=1).min()
-        full_hist['High_Max'] = full_hist['High'].rolling(window=K_Period, min_periods=1).max()
-        full_hist['Stoch_K'] = 100 * (full_hist['Close'] - full_hist['Low_Min']) / (full_hist['High_Max'] - full_hist['Low_Min'])
-        full_hist['Stoch_D'] = full_hist['Stoch_K'].rolling(window=D_Period, min_periods=1).mean()
+        full_hist['Low_Min'] = indicators['Low_Min']
+        full_hist['High_Max'] = indicators['High_Max']
+        full_hist['Stoch_K'] = indicators['K']
+        full_hist['Stoch_D'] = indicators['D']
         
         # Williams %R
         full_hist['Williams_R'] = (full_hist['High_Max'] - full_hist['Close']) / (full_hist['High_Max'] - full_hist['Low_Min']) * -100
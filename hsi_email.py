@@ -42,6 +42,9 @@ import numpy as np
 import akshare as ak
 from decimal import Decimal, ROUND_HALF_UP
 
+# 技术指标计算内核
+from data_services import indicator_kernels
+
 # 导入技术分析工具（可选）
 try:
     from data_services.technical_analysis import TechnicalAnalyzer, TechnicalAnalyzerV2, TAVScorer, TAVConfig
@@ -385,14 +388,8 @@ class HSIEmailSystem:
             low = dfc['Low'].astype(float)
             close = dfc['Close'].astype(float)
 
-            prev_close = close.shift(1)
-            tr1 = high - low
-            tr2 = (high - prev_close).abs()
-            tr3 = (low - prev_close).abs()
-            true_range = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-
-            # 使用 Wilder 平滑（EWMA）更稳健
-            atr = true_range.ewm(alpha=1/period, adjust=False).mean()
+            # 使用 Wilder 平滑（EWMA）更稳健；真实波幅忽略缺失的前收盘价
+            atr = indicator_kernels.atr(high, low, close, period, method='wilder', skipna=True)
 
             last_atr = atr.dropna().iloc[-1] if not atr.dropna().empty else 0.0
             return float(last_atr)
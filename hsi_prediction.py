@@ -47,11 +47,16 @@ from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from ml_services.prediction_store import PredictionStore, history_exists
+
 # 获取项目根目录
 script_dir = os.path.dirname(os.path.abspath(__file__))
 data_dir = os.path.join(script_dir, 'data')
 output_dir = os.path.join(script_dir, 'output')
 
+# 预测历史存储（旧 hsi_prediction_history.json 首次打开时自动迁移）
+HISTORY_DB = os.path.join(data_dir, 'hsi_prediction_history.db')
+
 # 确保目录存在
 os.makedirs(data_dir, exist_ok=True)
 os.makedirs(output_dir, exist_ok=True)
@@ -2150,21 +2155,11 @@ class HSI_Predictor:
         - catboost_result: CatBoost 预测结果（可选）
         - multi_horizon_results: 多周期预测结果（可选）
         """
-        history_file = os.path.join(data_dir, 'hsi_prediction_history.json')
-
-        # 加载现有历史记录
-        history = {'predictions': [], 'metadata': {}}
-        if os.path.exists(history_file):
-            try:
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    history = json.load(f)
-            except Exception as e:
-                print(f"⚠️ 加载历史记录失败，创建新文件: {e}")
-
         prediction_date = self.hsi_data.index[-1]
         current_price = float(self.hsi_data['Close'].iloc[-1])
 
         # 保存多周期预测
+        records = []
         if multi_horizon_results:
             for horizon in [1, 5, 20]:
                 if horizon in multi_horizon_results:
@@ -2190,92 +2185,35 @@ class HSI_Predictor:
                     }
 
                     # 添加新记录
-                    history['predictions'].append(record)
+                    records.append(record)
                     print(f"   - 保存 {horizon}天预测: {r['prediction']} ({r['probability']:.1%})")
 
-        # 更新元数据
-        history['metadata']['last_updated'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
-        history['metadata']['total_predictions'] = len(history['predictions'])
-
-        # 保存历史记录
+        # 追加写入历史记录（不再重写整个历史文件）
         try:
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
-            print(f"💾 预测历史已保存到: {history_file}")
-            print(f"   - 历史记录总数: {history['metadata']['total_predictions']}")
+            with PredictionStore(HISTORY_DB) as store:
+                store.append(records)
+                print(f"💾 预测历史已保存到: {store.log_path}")
+                print(f"   - 历史记录总数: {store.count()}")
         except Exception as e:
             print(f"❌ 保存历史记录失败: {e}")
 
     def _calculate_three_horizon_pattern_stats(self):
         """
-        从 hsi_prediction_history.json 实时计算三周期模式统计
+        从预测历史实时计算三周期模式统计
 
         返回:
         - dict: {模式: {total, correct, avg_return, win_rate}}
         """
-        history_file = os.path.join(data_dir, 'hsi_prediction_history.json')
-
-        if not os.path.exists(history_file):
-            return {}
+        from ml_services.performance_monitor import three_horizon_pattern_stats_from_frame
 
         try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        except:
-            return {}
-
-        predictions = history.get('predictions', [])
-        if not predictions:
+            with PredictionStore(HISTORY_DB) as store:
+                df = store.load_frame()
+        except Exception:
             return {}
 
         # 按 data_date 分组
-        from collections import defaultdict
-        grouped = defaultdict(dict)
-        for p in predictions:
-            data_date = p.get('data_date', '')
-            horizon = p.get('horizon')
-            if data_date and horizon:
-                grouped[data_date][horizon] = p
-
-        # 找出有三周期预测的记录，计算各模式统计
-        pattern_stats = defaultdict(lambda: {'total': 0, 'correct': 0, 'returns': []})
-
-        for data_date, horizons in grouped.items():
-            if 1 in horizons and 5 in horizons and 20 in horizons:
-                p1 = horizons[1]
-                p5 = horizons[5]
-                p20 = horizons[20]
-
-                # 只统计 20天已评估的
-                if p20.get('outcome') is None:
-                    continue
-
-                # 编码模式：up=1, down=0
-                pattern = f"{'1' if p1.get('predicted_direction') == 'up' else '0'}{'1' if p5.get('predicted_direction') == 'up' else '0'}{'1' if p20.get('predicted_direction') == 'up' else '0'}"
-
-                pattern_stats[pattern]['total'] += 1
-                if p20.get('outcome') == 'correct':
-                    pattern_stats[pattern]['correct'] += 1
-
-                ret = p20.get('actual_return')
-                if ret is not None:
-                    pattern_stats[pattern]['returns'].append(ret)
-
-        # 计算准确率和平均收益
-        result = {}
-        for pattern, stats in pattern_stats.items():
-            total = stats['total']
-            correct = stats['correct']
-            returns = stats['returns']
-
-            result[pattern] = {
-                'total': total,
-                'correct': correct,
-                'win_rate': correct / total if total > 0 else 0,
-                'avg_return': sum(returns) / len(returns) if returns else 0
-            }
-
-        return result
+        return three_horizon_pattern_stats_from_frame(df, ['data_date'])
 
     def _get_target_date_trading_days(self, date, horizon):
         """
@@ -2288,31 +2226,8 @@ class HSI_Predictor:
         返回:
         - 目标日期字符串 (YYYY-MM-DD)
         """
-        from datetime import timedelta
-
-        if isinstance(date, str):
-            date = datetime.strptime(date, '%Y-%m-%d')
-
-        try:
-            import akshare as ak
-            df = ak.tool_trade_date_hist_sina()
-            trading_dates = set(df['trade_date'].astype(str).tolist())
-
-            count = 0
-            current = date
-
-            while count < horizon:
-                current += timedelta(days=1)
-                date_str = current.strftime('%Y-%m-%d')
-                if date_str in trading_dates:
-                    count += 1
-
-            return current.strftime('%Y-%m-%d')
-
-        except Exception as e:
-            # 回退到自然日
-            target_date = date + timedelta(days=horizon)
-            return target_date.strftime('%Y-%m-%d')
+        from data_services.trading_calendar import get_trading_calendar
+        return get_trading_calendar('hk').add_trading_days(date, horizon)
 
     def _check_hsi_transmission_mode(self, data_date):
         """
@@ -2332,8 +2247,6 @@ class HSI_Predictor:
         """
         from datetime import timedelta
 
-        history_file = os.path.join(data_dir, 'hsi_prediction_history.json')
-
         # 计算5个交易日前的日期（使用香港交易日历）
         current_date_str = data_date if isinstance(data_date, str) else data_date.strftime('%Y-%m-%d')
 
@@ -2364,17 +2277,16 @@ class HSI_Predictor:
                 data_date_obj = data_date
             prediction_date = (data_date_obj - timedelta(days=7)).strftime('%Y-%m-%d')
 
-        if not os.path.exists(history_file):
+        if not history_exists(HISTORY_DB):
             return {'transmission_mode': False, 'pred_1d_correct': None, 'pred_5d_correct': None,
                     'pred_1d_direction': None, 'pred_5d_direction': None,
                     'pred_20d_direction': None, 'prediction_date': prediction_date,
                     'estimated_20d_accuracy': None}
 
         try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-
-            predictions = history.get('predictions', [])
+            # 按索引只读取预测日期当天的记录
+            with PredictionStore(HISTORY_DB) as store:
+                predictions = store.load_records(start_date=prediction_date, end_date=prediction_date)
 
             # 查找5个交易日前的预测
             pred_1d = None
@@ -2540,15 +2452,14 @@ class HSI_Predictor:
             latest_model = max(model_files, key=os.path.getmtime)
             print(f"📂 加载模型: {latest_model}")
 
-            from catboost import CatBoostClassifier
-            model = CatBoostClassifier()
-            model.load_model(latest_model)
+            from ml_services.model_registry import get_model_registry
+            registry = get_model_registry()
+            model = registry.load_catboost(latest_model)
 
             # 加载特征名称
             feature_file = latest_model.replace('.cbm', '.json').replace('hsi_catboost', 'hsi_features')
             if os.path.exists(feature_file):
-                with open(feature_file, 'r') as f:
-                    feature_names = json.load(f)
+                feature_names = list(registry.load_json(feature_file))
             else:
                 print("⚠️ 未找到特征文件，跳过对比")
                 return None
@@ -3081,15 +2992,14 @@ def verify_predictions():
     print("恒指预测验证系统".center(80))
     print("=" * 80)
 
-    history_file = os.path.join(data_dir, 'hsi_prediction_history.json')
-
     # 加载预测历史
-    if not os.path.exists(history_file):
+    if not history_exists(HISTORY_DB):
         print("❌ 未找到预测历史记录文件")
         return
 
-    with open(history_file, 'r', encoding='utf-8') as f:
-        history = json.load(f)
+    # 只在读取和回写时打开存储，不在获取行情数据期间持有连接
+    with PredictionStore(HISTORY_DB) as store:
+        history = store.load_history()
 
     predictions = history.get('predictions', [])
     if not predictions:
@@ -3115,6 +3025,7 @@ def verify_predictions():
     catboost_total = 0
 
     updated_predictions = []
+    changed_predictions = []
 
     for pred in predictions:
         target_date_str = pred.get('target_date')
@@ -3133,6 +3044,7 @@ def verify_predictions():
                 target_date = prediction_date + timedelta(days=horizon)
                 target_date_str = target_date.strftime('%Y-%m-%d')
                 pred['target_date'] = target_date_str
+                changed_predictions.append(pred)
             except:
                 pass
 
@@ -3212,6 +3124,7 @@ def verify_predictions():
                             catboost_correct += 1
 
                     verified_count += 1
+                    changed_predictions.append(pred)
                     print(f"✅ 验证: {prediction_date_str} → {target_date_str}")
                     print(f"   实际收益: {actual_return*100:.2f}%, 方向: {'上涨' if actual_direction_str == 'up' else '下跌'}")
                     print(f"   预测方向: {predicted_direction}, 结果: {'✓ 正确' if is_correct else '✗ 错误'}")
@@ -3221,12 +3134,13 @@ def verify_predictions():
 
         updated_predictions.append(pred)
 
-    # 更新历史记录
+    # 更新历史记录（只回写本次验证的记录）
     history['predictions'] = updated_predictions
     history['metadata']['last_verified'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
 
-    with open(history_file, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    with PredictionStore(HISTORY_DB) as store:
+        store.update_records(changed_predictions)
+        store.set_metadata(last_verified=history['metadata']['last_verified'])
 
     # 输出验证结果
     print("\n" + "=" * 80)
@@ -3252,7 +3166,7 @@ def verify_predictions():
         else:
             print(f"   两模型准确率相同")
 
-    print(f"\n💾 验证结果已保存到: {history_file}")
+    print(f"\n💾 验证结果已保存到: {store.log_path}")
 
 
 def main():
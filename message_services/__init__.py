@@ -18,6 +18,7 @@
     notify_all("标题", "内容")
 """
 
+from .delivery import close_smtp_sessions, get_delivery_metrics, get_delivery_queue
 from .email_sender import EmailSender, send_email, send_email_simple
 from .message_formatter import (
     format_html_report,
@@ -50,6 +51,11 @@ __all__ = [
     'notify_all',
     'notify_email',
     'notify_wechat',
+
+    # 投递（连接复用、后台队列、耗时统计）
+    'get_delivery_metrics',
+    'get_delivery_queue',
+    'close_smtp_sessions',
 ]
 
 
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息投递层
+
+功能：
+- SMTP 会话池：同一账号在一次运行内复用已登录的 SMTP 连接（空闲过久或断开时自动重连）
+- 指数退避重试
+- 有界后台发送队列（报告脚本提交后继续执行，退出前统一等待发送完成）
+- 各渠道耗时统计（次数、成功率、平均 / P95 / 最大耗时）
+- 复用 HTTP 连接的 requests.Session（企微机器人、WxPusher）
+
+使用方法：
+    from message_services.delivery import get_delivery_metrics
+
+    print(get_delivery_metrics().summary())
+"""
+
+import atexit
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+
+def retry_with_backoff(
+    func: Callable[[], bool],
+    max_retries: int = 3,
+    base_delay: float = 2.0,
+    backoff: float = 2.0,
+    max_delay: float = 60.0,
+    label: str = "发送"
+) -> Tuple[bool, int]:
+    """
+    指数退避重试（第 n 次重试前等待 base_delay × backoff^(n-1) 秒，不超过 max_delay）
+
+    参数：
+    - func: 发送函数（返回是否成功）
+    - max_retries: 最大尝试次数
+    - base_delay: 首次重试等待时间（秒）
+    - backoff: 退避倍数
+    - max_delay: 最长等待时间（秒）
+    - label: 日志中的名称
+
+    返回：
+    - (是否成功, 尝试次数)
+    """
+    for attempt in range(max_retries):
+        if func():
+            return True, attempt + 1
+        if attempt < max_retries - 1:
+            delay = min(base_delay * backoff ** attempt, max_delay)
+            print(f"⏳ {label}第 {attempt + 1} 次失败，{delay:.0f} 秒后重试...")
+            time.sleep(delay)
+    return False, max_retries
+
+
+class SMTPSession:
+    """复用的已登录 SMTP 连接（线程安全）"""
+
+    # 空闲超过该时间（秒）的连接先用 NOOP 检查，服务器通常在数分钟后断开空闲连接
+    IDLE_CHECK = 30
+
+    def __init__(self, smtp_server: str, smtp_port: int, use_ssl: bool,
+                 sender: str, password: str, timeout: int = 30):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.use_ssl = use_ssl
+        self.sender = sender
+        self.password = password
+        self.timeout = timeout
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+            server.starttls()
+        server.login(self.sender, self.password)
+        self.connects += 1
+        return server
+
+    def _alive(self) -> bool:
+        if self._server is None:
+            return False
+        if time.monotonic() - self._last_used < self.IDLE_CHECK:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def sendmail(self, to_list: List[str], message: str):
+        """
+        发送邮件（复用连接；连接已断开时重连一次）
+
+        发送中途出现其他异常（超时、协议错误等）时连接状态未知，关闭连接后抛出，
+        下一次发送（如 retry_with_backoff 的重试）重新连接
+
+        参数：
+        - to_list: 收件人列表
+        - message: 邮件全文（msg.as_string()）
+        """
+        with self._lock:
+            for attempt in range(2):
+                if not self._alive():
+                    self._close()
+                    self._server = self._connect()
+                try:
+                    self._server.sendmail(self.sender, to_list, message)
+                    self._last_used = time.monotonic()
+                    return
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    self._close(graceful=False)
+                    if attempt == 1:
+                        raise
+                except Exception:
+                    self._close(graceful=False)
+                    raise
+
+    def _close(self, graceful: bool = True):
+        """关闭连接（graceful=False 时不发送 QUIT，避免在已超时的连接上再等待）"""
+        if self._server is not None:
+            try:
+                if graceful:
+                    self._server.quit()
+                else:
+                    self._server.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+_smtp_sessions: Dict[tuple, SMTPSession] = {}
+_smtp_lock = threading.Lock()
+
+
+def get_smtp_session(smtp_server: str, smtp_port: int, use_ssl: bool,
+                     sender: str, password: str, timeout: int = 30) -> SMTPSession:
+    """获取进程内共享的 SMTP 会话（同一服务器和账号只登录一次）"""
+    key = (smtp_server, smtp_port, use_ssl, sender, password)
+    with _smtp_lock:
+        session = _smtp_sessions.get(key)
+        if session is None:
+            session = SMTPSession(smtp_server, smtp_port, use_ssl, sender, password, timeout)
+            _smtp_sessions[key] = session
+        return session
+
+
+def close_smtp_sessions():
+    """关闭全部 SMTP 会话"""
+    with _smtp_lock:
+        sessions = list(_smtp_sessions.values())
+        _smtp_sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+_http_local = threading.local()
+
+
+def get_http_session() -> requests.Session:
+    """当前线程的 requests.Session（复用 HTTP 连接）"""
+    session = getattr(_http_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _http_local.session = session
+    return session
+
+
+class DeliveryMetrics:
+    """各渠道发送耗时统计"""
+
+    def __init__(self):
+        self._records: Dict[str, List[Tuple[float, bool, int]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, channel: str, seconds: float, success: bool, attempts: int = 1):
+        with self._lock:
+            self._records.setdefault(channel, []).append((seconds, success, attempts))
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        返回：
+        - dict: {渠道: {count, success, attempts, mean_ms, p95_ms, max_ms}}
+        """
+        summary = {}
+        with self._lock:
+            records = {channel: list(rows) for channel, rows in self._records.items()}
+        for channel, rows in records.items():
+            latencies = sorted(seconds * 1000 for seconds, _, _ in rows)
+            summary[channel] = {
+                'count': len(rows),
+                'success': sum(1 for _, success, _ in rows if success),
+                'attempts': sum(attempts for _, _, attempts in rows),
+                'mean_ms': sum(latencies) / len(latencies),
+                'p95_ms': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+                'max_ms': latencies[-1],
+            }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+
+
+_metrics = DeliveryMetrics()
+
+
+def get_delivery_metrics() -> DeliveryMetrics:
+    """进程级渠道耗时统计"""
+    return _metrics
+
+
+class DeliveryQueue:
+    """有界后台发送队列（队列满时 submit 阻塞，起到背压作用）"""
+
+    def __init__(self, maxsize: int = 32, workers: int = 2):
+        """
+        参数：
+        - maxsize: 队列容量
+        - workers: 后台发送线程数
+        """
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._run, name=f'delivery-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _run(self):
+        while True:
+            future, func, args, kwargs = self._queue.get()
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """提交发送任务，返回 Future（结果为发送函数的返回值）"""
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def flush(self):
+        """等待已提交的任务全部完成"""
+        self._queue.join()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+_delivery_queue: Optional[DeliveryQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_delivery_queue() -> DeliveryQueue:
+    """进程级后台发送队列（首次使用时启动）"""
+    global _delivery_queue
+    with _queue_lock:
+        if _delivery_queue is None:
+            _delivery_queue = DeliveryQueue()
+        return _delivery_queue
+
+
+@atexit.register
+def _shutdown():
+    """进程退出前等待后台发送完成并关闭 SMTP 连接"""
+    if _delivery_queue is not None:
+        _delivery_queue.flush()
+    close_smtp_sessions()
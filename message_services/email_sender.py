@@ -7,7 +7,9 @@
 - 支持 HTML 和纯文本邮件
 - 支持多收件人
 - 自动 SSL/TLS 检测
-- 重试机制
+- 复用已登录的 SMTP 连接（同一运行内多封邮件只握手、登录一次）
+- 指数退避重试
+- 后台发送（send_async）
 - 超时处理
 
 环境变量：
@@ -30,11 +32,14 @@
 import os
 import smtplib
 import time
+from concurrent.futures import Future
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from typing import Optional, List, Union, Dict
 
+from .delivery import SMTPSession, get_delivery_metrics, get_delivery_queue, get_smtp_session, retry_with_backoff
+
 
 class EmailSender:
     """统一邮件发送器"""
@@ -49,7 +54,8 @@ class EmailSender:
         smtp_port: Optional[int] = None,
         sender: Optional[str] = None,
         password: Optional[str] = None,
-        recipients: Optional[List[str]] = None
+        recipients: Optional[List[str]] = None,
+        persistent: bool = True
     ):
         """
         初始化邮件发送器
@@ -60,10 +66,12 @@ class EmailSender:
         - sender: 发件人邮箱（默认从环境变量读取）
         - password: 邮箱密码（默认从环境变量读取）
         - recipients: 收件人列表（默认从环境变量读取）
+        - persistent: 是否复用进程内共享的 SMTP 连接（False 时每封邮件单独连接）
         """
         self.smtp_server = smtp_server or os.environ.get("SMTP_SERVER", "smtp.163.com")
         self.sender = sender or os.environ.get("EMAIL_SENDER")
         self.password = password or os.environ.get("EMAIL_PASSWORD")
+        self.persistent = persistent
 
         # 解析收件人
         if recipients:
@@ -154,15 +162,7 @@ class EmailSender:
         msg = self._build_message(subject, content, html_content, to_list)
 
         try:
-            if self.use_ssl:
-                server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=timeout)
-            else:
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=timeout)
-                server.starttls()
-
-            server.login(self.sender, self.password)
-            server.sendmail(self.sender, to_list, msg.as_string())
-            server.quit()
+            self.deliver(to_list, msg.as_string(), timeout)
 
             print(f"✅ 邮件发送成功: {subject}")
             return True
@@ -174,6 +174,26 @@ class EmailSender:
             print(f"❌ 发送失败: {e}")
             return False
 
+    def deliver(self, to_list: List[str], message: str, timeout: int = 30):
+        """
+        投递已构建的邮件（失败时抛出异常）
+
+        参数：
+        - to_list: 收件人列表
+        - message: 邮件全文（msg.as_string()）
+        - timeout: 超时时间（秒）
+        """
+        if self.persistent:
+            session = get_smtp_session(self.smtp_server, self.smtp_port, self.use_ssl,
+                                       self.sender, self.password, timeout)
+            session.sendmail(to_list, message)
+            return
+        session = SMTPSession(self.smtp_server, self.smtp_port, self.use_ssl, self.sender, self.password, timeout)
+        try:
+            session.sendmail(to_list, message)
+        finally:
+            session.close()
+
     def send_with_retry(
         self,
         subject: str,
@@ -181,32 +201,52 @@ class EmailSender:
         html_content: Optional[str] = None,
         recipients: Optional[List[str]] = None,
         max_retries: int = 3,
-        retry_delay: int = 5
+        retry_delay: float = 5,
+        backoff: float = 2.0
     ) -> bool:
         """
-        带重试机制的邮件发送
+        带重试机制的邮件发送（指数退避）
 
         参数：
         - subject: 邮件主题
         - content: 纯文本内容
         - html_content: HTML 内容（可选）
         - recipients: 收件人列表（可选）
-        - max_retries: 最大重试次数
-        - retry_delay: 重试间隔（秒）
+        - max_retries: 最大尝试次数
+        - retry_delay: 首次重试等待时间（秒）
+        - backoff: 退避倍数（第 n 次重试等待 retry_delay × backoff^(n-1) 秒）
 
         返回：
         - bool: 是否发送成功
         """
-        for attempt in range(max_retries):
-            if self.send(subject, content, html_content, recipients):
-                return True
-
-            if attempt < max_retries - 1:
-                print(f"⏳ 第 {attempt + 1} 次重试，等待 {retry_delay} 秒...")
-                time.sleep(retry_delay)
+        start = time.perf_counter()
+        success, attempts = retry_with_backoff(
+            lambda: self.send(subject, content, html_content, recipients),
+            max_retries=max_retries, base_delay=retry_delay, backoff=backoff, label="邮件发送"
+        )
+        get_delivery_metrics().record('email', time.perf_counter() - start, success, attempts)
+
+        if not success:
+            print(f"❌ 重试 {max_retries} 次后仍失败")
+        return success
+
+    def send_async(
+        self,
+        subject: str,
+        content: str,
+        html_content: Optional[str] = None,
+        recipients: Optional[List[str]] = None,
+        **retry_kwargs
+    ) -> Future:
+        """
+        后台发送邮件（提交到有界发送队列，进程退出前自动等待发送完成）
 
-        print(f"❌ 重试 {max_retries} 次后仍失败")
-        return False
+        返回：
+        - Future: 结果为是否发送成功
+        """
+        return get_delivery_queue().submit(
+            self.send_with_retry, subject, content, html_content, recipients, **retry_kwargs
+        )
 
 
 def send_email_with_images(
@@ -259,26 +299,20 @@ def send_email_with_images(
             img.add_header("Content-Disposition", "inline", filename=f"{cid}.png")
             msg.attach(img)
 
+    start = time.perf_counter()
     try:
-        if sender.use_ssl:
-            server = smtplib.SMTP_SSL(sender.smtp_server, sender.smtp_port, timeout=30)
-        else:
-            server = smtplib.SMTP(sender.smtp_server, sender.smtp_port, timeout=30)
-            server.starttls()
-
-        server.login(sender.sender, sender.password)
-        server.sendmail(sender.sender, to_list, msg.as_string())
-        server.quit()
+        sender.deliver(to_list, msg.as_string())
+        get_delivery_metrics().record('email', time.perf_counter() - start, True)
 
         print(f"✅ 邮件发送成功（含 {len(inline_images) if inline_images else 0} 张内嵌图片）: {subject}")
         return True
 
     except smtplib.SMTPException as e:
         print(f"❌ SMTP 错误: {e}")
-        return False
     except Exception as e:
         print(f"❌ 发送失败: {e}")
-        return False
+    get_delivery_metrics().record('email', time.perf_counter() - start, False)
+    return False
 
 
 def send_email(
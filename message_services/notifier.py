@@ -5,8 +5,9 @@
 
 功能：
 - 统一管理邮件、企微机器人、WxPusher 等通知渠道
-- 一键发送到多个渠道
-- 渠道状态检测
+- 一键发送到多个渠道（各渠道并发发送，失败按指数退避重试）
+- 后台发送（notify_async）
+- 渠道状态检测、各渠道耗时统计
 
 使用方法：
     from message_services import Notifier, notify_all
@@ -20,9 +21,12 @@
 """
 
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Optional, Dict
 from datetime import datetime
 
+from .delivery import get_delivery_metrics, get_delivery_queue, retry_with_backoff
 from .email_sender import EmailSender
 from .message_formatter import format_html_report
 
@@ -36,7 +40,9 @@ class Notifier:
     def __init__(
         self,
         channels: Optional[List[str]] = None,
-        email_sender: Optional[EmailSender] = None
+        email_sender: Optional[EmailSender] = None,
+        parallel: bool = True,
+        max_retries: int = 3
     ):
         """
         初始化通知管理器
@@ -44,9 +50,13 @@ class Notifier:
         参数：
         - channels: 启用的通知渠道列表（默认全部）
         - email_sender: 自定义邮件发送器（可选）
+        - parallel: 是否并发发送到各渠道
+        - max_retries: 各渠道最大尝试次数（指数退避重试）
         """
         # 默认启用所有渠道
         self.channels = channels or self.AVAILABLE_CHANNELS.copy()
+        self.parallel = parallel
+        self.max_retries = max_retries
 
         # 初始化邮件发送器
         self._email_sender = email_sender or EmailSender()
@@ -95,20 +105,56 @@ class Notifier:
         - dict: 各渠道发送结果 {'email': True, 'wechat_work': False, ...}
         """
         target_channels = channels or self.channels
+        senders = {
+            'email': lambda: self.notify_email(title, content, html_content),
+            'wechat_work': lambda: self.notify_wechat_work(title, content),
+            'wxpusher': lambda: self.notify_wxpusher(title, content),
+        }
         results = {}
 
         for channel in target_channels:
-            if channel == 'email':
-                results['email'] = self.notify_email(title, content, html_content)
-            elif channel == 'wechat_work':
-                results['wechat_work'] = self.notify_wechat_work(title, content)
-            elif channel == 'wxpusher':
-                results['wxpusher'] = self.notify_wxpusher(title, content)
-            else:
+            if channel not in senders:
                 print(f"⚠️ 未知的通知渠道: {channel}")
                 results[channel] = False
+        known = [channel for channel in target_channels if channel in senders]
+
+        if self.parallel and len(known) > 1:
+            # 各渠道是独立的网络请求，并发发送，总耗时取决于最慢的渠道
+            with ThreadPoolExecutor(max_workers=len(known), thread_name_prefix='notify') as executor:
+                futures = {channel: executor.submit(senders[channel]) for channel in known}
+            for channel, future in futures.items():
+                try:
+                    results[channel] = bool(future.result())
+                except Exception as e:
+                    print(f"❌ {channel} 发送异常: {e}")
+                    results[channel] = False
+        else:
+            for channel in known:
+                results[channel] = senders[channel]()
+
+        return {channel: results[channel] for channel in target_channels}
+
+    def notify_async(
+        self,
+        title: str,
+        content: str,
+        channels: Optional[List[str]] = None,
+        html_content: Optional[str] = None
+    ) -> Future:
+        """
+        后台发送通知（提交到有界发送队列，进程退出前自动等待发送完成）
 
-        return results
+        返回：
+        - Future: 结果为各渠道发送结果
+        """
+        return get_delivery_queue().submit(self.notify, title, content, channels, html_content)
+
+    def _send_with_retry(self, channel: str, send) -> bool:
+        """按指数退避重试发送并记录渠道耗时"""
+        start = time.perf_counter()
+        success, attempts = retry_with_backoff(send, max_retries=self.max_retries, label=f"{channel} ")
+        get_delivery_metrics().record(channel, time.perf_counter() - start, success, attempts)
+        return success
 
     def notify_email(
         self,
@@ -127,7 +173,7 @@ class Notifier:
         返回：
         - bool: 是否发送成功
         """
-        return self._email_sender.send_with_retry(title, content, html_content)
+        return self._email_sender.send_with_retry(title, content, html_content, max_retries=self.max_retries)
 
     def notify_wechat_work(self, title: str, content: str) -> bool:
         """
@@ -146,7 +192,7 @@ class Notifier:
 
         # 格式化为 Markdown
         msg = f"## {title}\n\n{content}\n\n> 时间: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        return bot.send_markdown(msg)
+        return self._send_with_retry('wechat_work', lambda: bot.send_markdown(msg))
 
     def notify_wxpusher(self, title: str, content: str) -> bool:
         """
@@ -165,8 +211,9 @@ class Notifier:
 
         # 格式化为 Markdown
         msg = f"# {title}\n\n{content}\n\n---\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        result = pusher.send_markdown(msg, summary=title)
-        return result.get('success', False)
+        return self._send_with_retry(
+            'wxpusher', lambda: pusher.send_markdown(msg, summary=title).get('success', False)
+        )
 
     def check_channels(self) -> Dict[str, bool]:
         """
@@ -205,6 +252,16 @@ class Notifier:
         status = self.check_channels()
         return [ch for ch, configured in status.items() if configured]
 
+    @staticmethod
+    def get_metrics() -> Dict[str, Dict]:
+        """
+        获取各渠道发送耗时统计（进程内累计）
+
+        返回：
+        - dict: {渠道: {count, success, attempts, mean_ms, p95_ms, max_ms}}
+        """
+        return get_delivery_metrics().summary()
+
 
 def notify_all(title: str, content: str, html_content: Optional[str] = None) -> Dict[str, bool]:
     """
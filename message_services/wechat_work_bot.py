@@ -26,6 +26,8 @@ import json
 from datetime import datetime
 from typing import Optional, List, Dict
 
+from .delivery import get_http_session
+
 
 class WeChatWorkBot:
     """企业微信机器人"""
@@ -50,7 +52,7 @@ class WeChatWorkBot:
             return False
 
         try:
-            response = requests.post(
+            response = get_http_session().post(
                 self.webhook_url,
                 json=data,
                 timeout=10
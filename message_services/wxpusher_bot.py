@@ -30,6 +30,8 @@ import json
 from datetime import datetime
 from typing import Optional, List, Union
 
+from .delivery import get_http_session
+
 
 class WxPusher:
     """WxPusher 推送客户端"""
@@ -98,7 +100,7 @@ class WxPusher:
             payload["url"] = url
 
         try:
-            response = requests.post(
+            response = get_http_session().post(
                 self.API_URL,
                 json=payload,
                 headers={"Content-Type": "application/json"},
@@ -26,6 +26,9 @@ logger = get_logger('backtest_20d_horizon')
 # 股票名称映射
 STOCK_NAMES = STOCK_LIST
 
+# 持有期（交易日）：逐股票和向量化两个回测引擎都固定持有 20 天；--horizon 只选择模型和标签周期
+HOLD_DAYS = 20
+
 
 class Backtest20DHoldPeriod:
     """20天持有期回测器 - 符合CatBoost 20天模型的实际预测逻辑
@@ -148,7 +151,7 @@ class Backtest20DHoldPeriod:
         else:
             predictions = self.model.predict_proba(X_test)[:, 1]
 
-        horizon = 20
+        horizon = HOLD_DAYS
         capital = 100000
         trades = []
 
@@ -781,19 +784,45 @@ def generate_text_report(metrics, df):
     return report
 
 
-def main():
+def parse_args(argv=None):
+    """解析命令行参数"""
     parser = argparse.ArgumentParser(description='20天持有期回测 CatBoost 20天模型')
     parser.add_argument('--horizon', type=int, default=20, help='预测周期（天）')
     parser.add_argument('--confidence-threshold', type=float, default=0.55, help='置信度阈值')
     parser.add_argument('--start-date', type=str, default='2026-01-01', help='开始日期 (YYYY-MM-DD)')
     parser.add_argument('--end-date', type=str, default='2026-01-31', help='结束日期 (YYYY-MM-DD)')
     parser.add_argument('--enable-dynamic-risk-control', action='store_true', help='启用动态风险控制（业界标准）')
+    parser.add_argument('--vectorized', action='store_true', help='使用向量化回测引擎（整个面板只预测一次）')
+    return parser.parse_args(argv)
 
-    args = parser.parse_args()
+
+def create_backtester(model, args):
+    """
+    按命令行参数创建回测器
+
+    两个引擎的持有期都是 HOLD_DAYS，同一命令行得到相同的交易明细（与 --horizon 无关）
+    """
+    if args.vectorized:
+        from ml_services.vectorized_backtest import VectorizedBacktest20D
+        return VectorizedBacktest20D(
+            model=model,
+            confidence_threshold=args.confidence_threshold,
+            enable_dynamic_risk_control=args.enable_dynamic_risk_control,
+            horizon=HOLD_DAYS
+        )
+    return Backtest20DHoldPeriod(
+        model=model,
+        confidence_threshold=args.confidence_threshold,
+        enable_dynamic_risk_control=args.enable_dynamic_risk_control
+    )
+
+
+def main():
+    args = parse_args()
 
     logger.info(f"开始20天持有期回测")
     print(f"   模型类型: CatBoost {args.horizon}天")
-    print(f"   持有期: {args.horizon}天（符合模型预测周期）")
+    print(f"   持有期: {HOLD_DAYS}天")
     print(f"   置信度阈值: {args.confidence_threshold}")
     print(f"   回测日期范围: {args.start_date} 至 {args.end_date}")
     if args.enable_dynamic_risk_control:
@@ -826,11 +855,7 @@ def main():
     print(f"✅ 测试数据准备完成: {len(test_df)} 条，特征列数: {len(feature_columns)}（全量特征）")
 
     # 创建回测器
-    backtester = Backtest20DHoldPeriod(
-        model=model,
-        confidence_threshold=args.confidence_threshold,
-        enable_dynamic_risk_control=args.enable_dynamic_risk_control
-    )
+    backtester = create_backtester(model, args)
 
     # 运行回测
     print(f"\n🚀 开始20天持有期回测...")
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CatBoost 低延迟评分（单行 / 小批量）
+
+CatBoostModel.predict / predict_proba 每次调用都复制 DataFrame、逐列做 LabelEncoder 转换并重建 Pool，
+单行评分的固定开销在毫秒级，无法在行情更新时盘中重新评分。FastScorer 在加载模型后一次性准备：
+- 分类编码表：{类别字符串: 编码} 字典，按列预先编好
+- 列映射：输入列到模型特征列的下标数组（按输入列布局缓存）
+- 预分配的输入缓冲区（float32，与 CatBoost 内部精度一致）
+- CompiledCatBoost：把对称树（oblivious trees）导出为 numpy 数组（分裂特征、阈值、叶子值），
+  一次向量化比较 + 查表完成评分，不经过 Pool；模型含分类特征或非对称树时回退到 CatBoost predict
+- 可选概率校准（isotonic / Platt）
+
+export() 可导出 CatBoost 原生的 ONNX / C++ / Python 模型，供其他运行时使用。
+"""
+
+import json
+import os
+import tempfile
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ml_services.logger_config import get_logger
+
+logger = get_logger('fast_scorer')
+
+
+class CompiledCatBoost:
+    """对称树 CatBoost 二分类模型的 numpy 评分器"""
+
+    def __init__(self, split_features: np.ndarray, borders: np.ndarray, leaf_values: np.ndarray,
+                 nan_fill: np.ndarray, scale: float = 1.0, bias: float = 0.0):
+        """
+        参数:
+        - split_features: (树数 × 深度) 每层分裂的特征下标
+        - borders: (树数 × 深度) 每层分裂阈值（特征值 > 阈值 为 1）
+        - leaf_values: (树数 × 2^深度) 叶子值（第 d 层分裂对应叶子下标的第 d 位）
+        - nan_fill: (特征数,) NaN 的替换值（-inf 表示 NaN 视为最小值，+inf 表示视为最大值）
+        - scale, bias: 原始分数 = scale × 叶子值之和 + bias
+        """
+        self.split_features = split_features
+        self.borders = borders
+        self.leaf_values = leaf_values
+        self.nan_fill = nan_fill
+        self.scale = scale
+        self.bias = bias
+        self._powers = (1 << np.arange(split_features.shape[1])).astype(np.int64)
+        self._tree_index = np.arange(split_features.shape[0])
+
+    @classmethod
+    def from_model(cls, catboost_model) -> Optional['CompiledCatBoost']:
+        """
+        从 CatBoostClassifier 导出（不支持时返回 None）
+
+        只支持只含数值特征的对称树二分类模型（本项目的分类特征都已用 LabelEncoder 编码为数值）
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'model.json')
+            catboost_model.save_model(path, format='json')
+            with open(path, 'r', encoding='utf-8') as f:
+                model_json = json.load(f)
+
+        features_info = model_json.get('features_info', {})
+        trees = model_json.get('oblivious_trees')
+        if not trees or features_info.get('categorical_features') or 'ctr_data' in model_json:
+            return None
+        scale, bias = model_json.get('scale_and_bias', [1.0, [0.0]])
+        if isinstance(bias, list):
+            if len(bias) != 1:
+                return None
+            bias = bias[0]
+        if any(len(tree['leaf_values']) != 1 << len(tree['splits']) for tree in trees):
+            return None
+
+        float_features = features_info.get('float_features', [])
+        n_features = max([feature['flat_feature_index'] for feature in float_features], default=-1) + 1
+        nan_fill = np.full(n_features, -np.inf, dtype=np.float32)
+        for feature in float_features:
+            if feature.get('nan_value_treatment') == 'AsTrue':
+                nan_fill[feature['flat_feature_index']] = np.inf
+        float_to_flat = {feature['feature_index']: feature['flat_feature_index'] for feature in float_features}
+
+        depth = max(len(tree['splits']) for tree in trees)
+        split_features = np.zeros((len(trees), depth), dtype=np.int64)
+        # 深度不足的树用永不成立的分裂补齐（x > +inf 恒为 False，叶子下标高位为 0）
+        borders = np.full((len(trees), depth), np.inf, dtype=np.float32)
+        leaf_values = np.zeros((len(trees), 1 << depth), dtype=np.float64)
+        for t, tree in enumerate(trees):
+            for d, split in enumerate(tree['splits']):
+                if split.get('split_type') != 'FloatFeature':
+                    return None
+                split_features[t, d] = float_to_flat[split['float_feature_index']]
+                borders[t, d] = split['border']
+            leaf_values[t, :len(tree['leaf_values'])] = tree['leaf_values']
+        return cls(split_features, borders, leaf_values, nan_fill, float(scale), float(bias))
+
+    @property
+    def num_features(self) -> int:
+        return len(self.nan_fill)
+
+    def raw_score(self, X: np.ndarray) -> np.ndarray:
+        """原始分数（logit），X 为 (样本数 × 特征数) float32 数组"""
+        X = np.where(np.isnan(X), self.nan_fill, X)
+        bits = X[:, self.split_features] > self.borders
+        leaves = bits.astype(np.int64) @ self._powers
+        return self.leaf_values[self._tree_index, leaves].sum(axis=1) * self.scale + self.bias
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """上涨概率（样本数,）"""
+        return 1.0 / (1.0 + np.exp(-self.raw_score(X)))
+
+
+class ProbabilityCalibrator:
+    """概率校准（在时间上晚于训练集的验证集上拟合）"""
+
+    def __init__(self, method: str = 'isotonic'):
+        """
+        参数:
+        - method: 'isotonic'（保序回归）或 'sigmoid'（Platt 缩放，对 logit 做逻辑回归）
+        """
+        if method not in ('isotonic', 'sigmoid'):
+            raise ValueError(f"不支持的校准方法: {method}")
+        self.method = method
+        self._model = None
+
+    def fit(self, proba: np.ndarray, y: np.ndarray) -> 'ProbabilityCalibrator':
+        proba = np.asarray(proba, dtype=np.float64)
+        if self.method == 'isotonic':
+            from sklearn.isotonic import IsotonicRegression
+            self._model = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip').fit(proba, y)
+        else:
+            from sklearn.linear_model import LogisticRegression
+            self._model = LogisticRegression().fit(_logit(proba).reshape(-1, 1), y)
+        return self
+
+    def transform(self, proba: np.ndarray) -> np.ndarray:
+        proba = np.asarray(proba, dtype=np.float64)
+        if self.method == 'isotonic':
+            return self._model.predict(proba)
+        return self._model.predict_proba(_logit(proba).reshape(-1, 1))[:, 1]
+
+
+def _logit(proba: np.ndarray) -> np.ndarray:
+    proba = np.clip(proba, 1e-6, 1 - 1e-6)
+    return np.log(proba / (1 - proba))
+
+
+class FastScorer:
+    """CatBoostModel 的低延迟评分器（只读；模型重新训练或加载后需重新创建）"""
+
+    def __init__(self, catboost_model, feature_columns: Sequence[str],
+                 categorical_encoders: Optional[Dict] = None, calibrator: Optional[ProbabilityCalibrator] = None,
+                 max_batch: int = 64, unknown_category: int = 0, fill_value: float = 0.0):
+        """
+        参数:
+        - catboost_model: 训练好的 CatBoostClassifier
+        - feature_columns: 模型特征列（顺序与训练时一致）
+        - categorical_encoders: {列名: LabelEncoder}
+        - calibrator: 概率校准器（可选）
+        - max_batch: 预分配缓冲区的行数（更大的批次临时分配）
+        - unknown_category: 未见过的类别的编码（与生产预测路径一致，默认 0）
+        - fill_value: 数值特征缺失值（与生产预测路径一致，默认 0.0）
+        """
+        self.catboost_model = catboost_model
+        self.feature_columns = list(feature_columns)
+        self.calibrator = calibrator
+        self.unknown_category = unknown_category
+        self.fill_value = fill_value
+        self.compiled = CompiledCatBoost.from_model(catboost_model)
+        if self.compiled is None:
+            logger.info("模型不是纯数值特征的对称树，评分回退到 CatBoost predict")
+        elif self.compiled.num_features > len(self.feature_columns):
+            raise ValueError(f"模型有 {self.compiled.num_features} 个特征，特征列只有 {len(self.feature_columns)} 个")
+
+        column_index = {col: i for i, col in enumerate(self.feature_columns)}
+        self._category_maps = {}
+        for col, encoder in (categorical_encoders or {}).items():
+            if col in column_index:
+                classes = [str(value) for value in np.asarray(encoder.classes_).tolist()]
+                self._category_maps[column_index[col]] = {value: code for code, value in enumerate(classes)}
+        self._numeric_index = np.array([i for i in range(len(self.feature_columns))
+                                        if i not in self._category_maps], dtype=np.int64)
+        self._buffer = np.empty((max_batch, len(self.feature_columns)), dtype=np.float32)
+        self._layouts: Dict[tuple, tuple] = {}
+
+    @classmethod
+    def from_model(cls, model, **kwargs) -> 'FastScorer':
+        """由 CatBoostModel（含特征列和分类编码）创建"""
+        return cls(model.catboost_model, model.feature_columns, model.categorical_encoders, **kwargs)
+
+    # ==================== 输入 ====================
+
+    def _encode_category(self, mapping: Dict[str, int], value) -> int:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            value = 'unknown'
+        return mapping.get(str(value), self.unknown_category)
+
+    def _rows(self, n: int) -> np.ndarray:
+        return self._buffer[:n] if n <= len(self._buffer) else np.empty((n, self._buffer.shape[1]), np.float32)
+
+    def _layout(self, columns: Sequence[str]) -> tuple:
+        """输入列布局 -> (数值列的 [模型下标, 输入下标], 分类列的 [(模型下标, 输入下标)])"""
+        key = tuple(columns)
+        layout = self._layouts.get(key)
+        if layout is None:
+            source_index = {col: i for i, col in enumerate(columns)}
+            numeric = [(i, source_index[self.feature_columns[i]]) for i in self._numeric_index
+                       if self.feature_columns[i] in source_index]
+            numeric = np.array(numeric, dtype=np.int64).reshape(-1, 2)
+            categorical = [(i, source_index.get(self.feature_columns[i], -1)) for i in self._category_maps]
+            layout = (numeric[:, 0], numeric[:, 1], categorical)
+            self._layouts[key] = layout
+        return layout
+
+    def encode_values(self, values, columns: Sequence[str]) -> np.ndarray:
+        """
+        按输入列布局把原始特征值编码为模型输入（写入预分配缓冲区）
+
+        参数:
+        - values: (行数 × 输入列数) 数组或单行一维数组，分类列可以是原始字符串
+        - columns: 输入列名（布局按列名缓存，同一布局只计算一次映射）
+
+        返回:
+        - (行数 × 模型特征数) float32 数组（缓冲区视图，下一次评分前有效）
+        """
+        values = np.asarray(values)
+        if values.ndim == 1:
+            values = values.reshape(1, -1)
+        model_idx, source_idx, categorical = self._layout(columns)
+        X = self._rows(len(values))
+        X[:] = self.fill_value
+        numeric = values[:, source_idx]
+        if numeric.dtype == object:
+            numeric = pd.DataFrame(numeric).apply(pd.to_numeric, errors='coerce').to_numpy()
+        X[:, model_idx] = numeric
+        X[:, model_idx] = np.where(np.isnan(X[:, model_idx]), self.fill_value, X[:, model_idx])
+        for target, source in categorical:
+            mapping = self._category_maps[target]
+            if source < 0:
+                X[:, target] = self._encode_category(mapping, None)
+            else:
+                X[:, target] = [self._encode_category(mapping, value) for value in values[:, source]]
+        return X
+
+    def encode_row(self, row: Mapping) -> np.ndarray:
+        """单行 {特征名: 值}（dict 或 Series）编码为 (1 × 模型特征数) 模型输入"""
+        X = self._rows(1)
+        for i, col in enumerate(self.feature_columns):
+            value = row.get(col)
+            mapping = self._category_maps.get(i)
+            if mapping is not None:
+                X[0, i] = self._encode_category(mapping, value)
+            elif value is None or value != value:
+                X[0, i] = self.fill_value
+            else:
+                X[0, i] = value
+        return X
+
+    # ==================== 评分 ====================
+
+    def predict_encoded(self, X: np.ndarray) -> np.ndarray:
+        """
+        已编码的模型输入（样本数 × 模型特征数）-> 上涨概率（样本数,）
+
+        分类列应已是 LabelEncoder 编码，数值列的缺失值按 CatBoost 规则处理
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if self.compiled is not None:
+            proba = self.compiled.predict_proba(X[:, :self.compiled.num_features])
+        else:
+            proba = self.catboost_model.predict(X, prediction_type='Probability', thread_count=1)[:, 1]
+        if self.calibrator is not None:
+            proba = self.calibrator.transform(proba)
+        return proba
+
+    def score_row(self, row: Mapping) -> float:
+        """单行评分（dict / Series，键为特征名）"""
+        return float(self.predict_encoded(self.encode_row(row))[0])
+
+    def score_values(self, values, columns: Sequence[str]) -> np.ndarray:
+        """按输入列布局评分（行情更新时复用同一布局，避免每次按列名对齐）"""
+        return self.predict_encoded(self.encode_values(values, columns))
+
+    def score_frame(self, frame: pd.DataFrame, rows: int = 1) -> np.ndarray:
+        """特征 DataFrame 最后 rows 行评分"""
+        tail = frame.iloc[-rows:]
+        return self.score_values(tail.to_numpy(), list(tail.columns))
+
+    def fit_calibrator(self, X: np.ndarray, y: np.ndarray, method: str = 'isotonic') -> ProbabilityCalibrator:
+        """
+        在验证集（已编码的模型输入）上拟合概率校准器，之后的评分返回校准后的概率
+
+        参数:
+        - X: 验证集模型输入（时间上晚于训练集）
+        - y: 验证集标签
+        - method: 'isotonic' 或 'sigmoid'
+        """
+        self.calibrator = None
+        self.calibrator = ProbabilityCalibrator(method).fit(self.predict_encoded(X), y)
+        return self.calibrator
+
+    def export(self, path: str, format: str = 'onnx'):
+        """导出 CatBoost 原生格式（onnx / cpp / python / json / cbm），供其他运行时加载"""
+        self.catboost_model.save_model(path, format=format)
+        logger.info(f"模型已导出: {path} ({format})")
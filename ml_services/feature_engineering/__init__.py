@@ -4,8 +4,10 @@
 
 包含各类特征计算模块：
 - behavioral_factors: 行为金融因子
+- feature_frame: 特征帧批量装配（避免逐列插入导致的碎片化，float32 存储）
 """
 
 from .behavioral_factors import BehavioralFactorCalculator
+from .feature_frame import FeatureBatch, assign_columns, downcast_features, feature_matrix
 
-__all__ = ['BehavioralFactorCalculator']
\ No newline at end of file
+__all__ = ['BehavioralFactorCalculator', 'FeatureBatch', 'assign_columns', 'downcast_features', 'feature_matrix']
\ No newline at end of file
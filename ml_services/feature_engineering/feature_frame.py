@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+特征帧批量装配
+
+逐列 df[col] = value 插入时 pandas 为每个新列单独建一个内存块，几百个特征就是几百个块，
+之后的切片、复制、concat 都要反复合并这些块（并触发 PerformanceWarning）。
+本模块把新列先收集起来，再一次拼接成连续的块：
+- FeatureBatch：在计算过程中代替 DataFrame 读写特征列，flush() 时一次性拼接
+- assign_columns：把特征字典（create_*_features 的返回值）一次性写入 DataFrame
+- downcast_features / feature_matrix：float32 模式下的特征存储与模型输入
+"""
+
+import numpy as np
+import pandas as pd
+
+# float32 模式下保持 float64 的列（原始行情，用于标签和价格展示）
+FLOAT64_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'Prev_Close', 'Future_Return')
+
+
+class FeatureBatch:
+    """特征列批量写入器
+
+    用法与 DataFrame 的列读写相同：batch[col] = value 暂存新列，batch[col] 优先读取暂存的列，
+    flush() 把暂存的列一次拼接到 DataFrame 并返回结果。覆盖已有列时保持原列的位置。
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._pending = {}
+
+    def __setitem__(self, key, value):
+        if not isinstance(value, pd.Series):
+            value = pd.Series(value, index=self._df.index)
+        self._pending[key] = value
+
+    def __getitem__(self, key):
+        if isinstance(key, list):
+            if any(k in self._pending for k in key):
+                return pd.DataFrame({k: self[k] for k in key}, index=self._df.index)
+            return self._df[key]
+        if key in self._pending:
+            return self._pending[key]
+        return self._df[key]
+
+    def __contains__(self, key):
+        return key in self._pending or key in self._df.columns
+
+    def __len__(self):
+        return len(self._df)
+
+    @property
+    def index(self):
+        return self._df.index
+
+    @property
+    def columns(self):
+        return self._df.columns.append(pd.Index([k for k in self._pending if k not in self._df.columns]))
+
+    def update(self, columns):
+        """暂存多个列（字典）"""
+        for key, value in columns.items():
+            self[key] = value
+
+    def pipe(self, func, *args, **kwargs):
+        """先拼接暂存的列，再调用 func(df, *args, **kwargs)，以其返回值作为新的 DataFrame"""
+        self._df = func(self.flush(), *args, **kwargs)
+        return self._df
+
+    def flush(self) -> pd.DataFrame:
+        """把暂存的列一次拼接到 DataFrame 并返回"""
+        if self._pending:
+            self._df = assign_columns(self._df, self._pending)
+            self._pending = {}
+        return self._df
+
+
+def assign_columns(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    一次性写入多个列（代替 for key, value in columns.items(): df[key] = value）
+
+    参数:
+    - df: 目标 DataFrame（不会被修改）
+    - columns: {列名: Series/数组/标量}，标量广播到所有行
+
+    返回:
+    - 新的 DataFrame：已有列原位替换，新列按字典顺序追加在末尾
+    """
+    if not columns:
+        return df
+    new = pd.DataFrame({key: _column_values(value, df.index) for key, value in columns.items()}, index=df.index)
+    replaced = [c for c in new.columns if c in df.columns]
+    if not replaced:
+        return pd.concat([df, new], axis=1)
+    order = list(df.columns) + [c for c in new.columns if c not in df.columns]
+    return pd.concat([df.drop(columns=replaced), new], axis=1)[order]
+
+
+def _column_values(value, index):
+    """与 index 对齐的 Series 取底层数组（跳过 DataFrame 构造时逐列的索引对齐）"""
+    if isinstance(value, pd.Series) and (value.index is index or value.index.equals(index)):
+        return value.array if isinstance(value.dtype, pd.api.extensions.ExtensionDtype) else value.to_numpy()
+    return value
+
+
+def downcast_features(df: pd.DataFrame, keep=FLOAT64_COLUMNS) -> pd.DataFrame:
+    """
+    float64 特征列转为 float32（一次拼接，不逐列 astype）
+
+    参数:
+    - df: 特征 DataFrame
+    - keep: 保持 float64 的列（原始行情等）
+
+    返回:
+    - 新的 DataFrame（列顺序不变）
+    """
+    keep = set(keep)
+    float_cols = [c for c, dtype in df.dtypes.items() if dtype == np.float64 and c not in keep]
+    if not float_cols:
+        return df
+    downcast = pd.DataFrame(df[float_cols].to_numpy(dtype=np.float32), index=df.index, columns=float_cols)
+    return pd.concat([df.drop(columns=float_cols), downcast], axis=1)[df.columns]
+
+
+def feature_matrix(df: pd.DataFrame, columns, float32: bool = False) -> np.ndarray:
+    """
+    模型输入矩阵
+
+    参数:
+    - df: 特征 DataFrame（分类特征已编码为数值）
+    - columns: 特征列
+    - float32: True 时返回 float32 矩阵（CatBoost 原生支持），否则与 df[columns].values 相同
+    """
+    if float32:
+        try:
+            return df[columns].to_numpy(dtype=np.float32)
+        except (TypeError, ValueError):
+            # 仍有未编码的字符串列，交给调用方按原逻辑处理
+            pass
+    return df[columns].values
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+特征依赖图注册表
+
+把特征工程流水线拆成声明式节点，按模型实际使用的特征只计算需要的部分：
+- FeatureNode：一组特征的生产者（如技术指标、资金流向），声明依赖的节点
+- ColumnFamilyNode：可以逐列生成的特征族（如类别×数值交叉特征），只生成请求的列
+- 节点产出哪些列由完整计算时记录的清单（manifest）确定，清单持久化为 JSON
+- resolve() 把请求的特征列解析为最小节点集合（含传递依赖），evaluate() 按注册顺序执行
+- 每个节点的输出按 (节点, 缓存键) 缓存在内存中，同一股票同一日期的多次请求可复用
+
+无法解析的列（清单中没有记录，也不属于任何特征族）会退回完整计算，并在完整计算后更新清单。
+"""
+
+import json
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from ml_services.logger_config import get_logger
+
+logger = get_logger('feature_registry')
+
+
+class FeatureNode:
+    """特征节点：一组特征的生产者"""
+
+    def __init__(self, name: str, producer: Callable, depends_on: Iterable[str] = (),
+                 outputs: Optional[Iterable[str]] = None):
+        """
+        参数:
+        - name: 节点名称
+        - producer: producer(df, context) -> df，在 df 上添加特征列
+        - depends_on: 依赖的节点名称（producer 会读取这些节点产出的列）
+        - outputs: 静态声明的输出列（可选，未声明时以完整计算时记录的清单为准）
+        """
+        self.name = name
+        self.producer = producer
+        self.depends_on = list(depends_on)
+        self.outputs = list(outputs) if outputs is not None else []
+
+    def run(self, df: pd.DataFrame, context: Dict, keys=None) -> pd.DataFrame:
+        return self.producer(df, context)
+
+
+class ColumnFamilyNode(FeatureNode):
+    """按列生成的特征族：只计算请求的列"""
+
+    def __init__(self, name: str, producer: Callable, parse: Callable, inputs: Callable,
+                 depends_on: Iterable[str] = ()):
+        """
+        参数:
+        - name: 节点名称
+        - producer: producer(df, context, keys) -> df，keys 为 None 时生成全部列
+        - parse: parse(column) -> key，列属于本特征族时返回生成该列所需的参数，否则返回 None
+        - inputs: inputs(key) -> 生成该 key 所需的输入列
+        - depends_on: 额外依赖的节点名称
+        """
+        super().__init__(name, producer, depends_on)
+        self.parse = parse
+        self.inputs = inputs
+
+    def run(self, df: pd.DataFrame, context: Dict, keys=None) -> pd.DataFrame:
+        return self.producer(df, context, keys)
+
+
+class FeatureRegistry:
+    """特征节点注册表（注册顺序即执行顺序，依赖必须先注册）"""
+
+    def __init__(self, manifest_path: Optional[str] = None, cache_size: int = 128):
+        """
+        参数:
+        - manifest_path: 列清单 JSON 路径（None 表示不持久化）
+        - cache_size: 内存中缓存的节点输出个数上限（LRU）
+        """
+        self.manifest_path = manifest_path
+        self.cache_size = cache_size
+        self._nodes: "OrderedDict[str, FeatureNode]" = OrderedDict()
+        self._manifest: Optional[Dict[str, List[str]]] = None
+        self._cache: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+
+    # ==================== 注册 ====================
+
+    def register(self, node: FeatureNode) -> FeatureNode:
+        """注册节点"""
+        if node.name in self._nodes:
+            raise ValueError(f"特征节点已存在: {node.name}")
+        missing = [dep for dep in node.depends_on if dep not in self._nodes]
+        if missing:
+            raise ValueError(f"特征节点 {node.name} 的依赖未注册: {missing}")
+        self._nodes[node.name] = node
+        return node
+
+    def add(self, name: str, producer: Callable, depends_on: Iterable[str] = (),
+            outputs: Optional[Iterable[str]] = None) -> FeatureNode:
+        """注册一组特征"""
+        return self.register(FeatureNode(name, producer, depends_on, outputs))
+
+    def add_family(self, name: str, producer: Callable, parse: Callable, inputs: Callable,
+                   depends_on: Iterable[str] = ()) -> ColumnFamilyNode:
+        """注册按列生成的特征族"""
+        return self.register(ColumnFamilyNode(name, producer, parse, inputs, depends_on))
+
+    @property
+    def node_names(self) -> List[str]:
+        return list(self._nodes)
+
+    # ==================== 列清单 ====================
+
+    @property
+    def manifest(self) -> Dict[str, List[str]]:
+        """{节点名称: 产出的列}（合并静态声明和完整计算时的记录）"""
+        if self._manifest is None:
+            self._manifest = {}
+            if self.manifest_path and os.path.exists(self.manifest_path):
+                try:
+                    with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                        self._manifest = json.load(f)
+                except Exception as e:
+                    logger.warning(f"加载特征清单失败: {e}")
+        return self._manifest
+
+    def _column_owners(self) -> Dict[str, str]:
+        """列 -> 产出该列的节点（按执行顺序，后写入的节点覆盖先写入的）"""
+        owners = {}
+        for name, node in self._nodes.items():
+            for column in list(node.outputs) + self.manifest.get(name, []):
+                owners[column] = name
+        return owners
+
+    def _save_manifest(self):
+        if not self.manifest_path:
+            return
+        try:
+            manifest_dir = os.path.dirname(self.manifest_path)
+            if manifest_dir:
+                os.makedirs(manifest_dir, exist_ok=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, ensure_ascii=False, indent=1)
+        except Exception as e:
+            logger.warning(f"保存特征清单失败: {e}")
+
+    # ==================== 解析 ====================
+
+    def resolve(self, columns: Iterable[str], available: Iterable[str] = ()) -> Optional[List[Tuple]]:
+        """
+        把请求的特征列解析为最小执行计划
+
+        参数:
+        - columns: 请求的特征列
+        - available: 输入数据中已有的列（如 OHLCV）
+
+        返回:
+        - [(节点, keys)]（按执行顺序，keys 为特征族需要生成的参数集合，None 表示全部），
+          存在无法解析的列时返回 None（需要完整计算）
+        """
+        available = set(available)
+        owners = self._column_owners()
+        families = [node for node in self._nodes.values() if isinstance(node, ColumnFamilyNode)]
+
+        needed = set()
+        family_keys: Dict[str, set] = {}
+        pending = list(columns)
+        seen = set()
+        while pending:
+            column = pending.pop()
+            if column in seen or column in available:
+                continue
+            seen.add(column)
+
+            for family in families:
+                key = family.parse(column)
+                if key is not None:
+                    family_keys.setdefault(family.name, set()).add(key)
+                    needed.add(family.name)
+                    pending.extend(family.inputs(key))
+                    break
+            else:
+                owner = owners.get(column)
+                if owner is None:
+                    logger.debug(f"特征 {column} 无法解析到节点，需要完整计算")
+                    return None
+                needed.add(owner)
+
+        # 加入传递依赖（依赖节点完整计算）
+        stack = list(needed)
+        while stack:
+            for dep in self._nodes[stack.pop()].depends_on:
+                if dep not in needed:
+                    needed.add(dep)
+                    stack.append(dep)
+
+        # 被其他节点依赖的特征族需要完整生成
+        depended = {dep for name in needed for dep in self._nodes[name].depends_on}
+        return [(node, None if name in depended else family_keys.get(name))
+                for name, node in self._nodes.items() if name in needed]
+
+    # ==================== 执行 ====================
+
+    def evaluate(self, df: pd.DataFrame, context: Dict, columns: Optional[Iterable[str]] = None,
+                 nodes: Optional[Iterable[str]] = None, plan: Optional[List[Tuple]] = None) -> pd.DataFrame:
+        """
+        计算特征
+
+        参数:
+        - df: 输入数据（OHLCV）
+        - context: 节点共享的参数（股票代码、市场数据等）；包含 'cache_key' 时启用节点缓存
+        - columns: 只计算这些特征列及其依赖（None 表示全部）
+        - nodes: 只执行这些节点（不加依赖，用于刷新部分特征）
+        - plan: resolve() 返回的执行计划（优先于 columns）
+
+        返回:
+        - 添加了特征列的 DataFrame
+        """
+        full = False
+        if plan is None:
+            if nodes is not None:
+                plan = [(self._nodes[name], None) for name in self._nodes if name in set(nodes)]
+            elif columns is not None:
+                plan = self.resolve(columns, df.columns)
+            if plan is None:
+                plan = [(node, None) for node in self._nodes.values()]
+                full = True
+
+        record = full and self.manifest_path is not None
+        manifest = self.manifest
+        cache_key = context.get('cache_key')
+
+        for node, keys in plan:
+            node_key = (node.name, cache_key, frozenset(keys) if keys is not None else None)
+            if cache_key is not None and node_key in self._cache:
+                self._cache.move_to_end(node_key)
+                cached = self._cache[node_key]
+                df = pd.concat([df.drop(columns=[c for c in cached.columns if c in df.columns]), cached], axis=1)
+                continue
+
+            before = df
+            before_columns = set(df.columns)
+            df = node.run(df.copy() if record else df, context, keys)
+
+            outputs = [c for c in df.columns if c not in before_columns]
+            if record and not isinstance(node, ColumnFamilyNode):
+                # 记录新增列和被改写的列
+                outputs += [c for c in before.columns if c in df.columns and not df[c].equals(before[c])]
+                # 与已有记录合并（不同股票可能产出不同的列，如缺少市场数据时）
+                manifest[node.name] = list(dict.fromkeys(manifest.get(node.name, []) + outputs))
+            elif not isinstance(node, ColumnFamilyNode):
+                outputs += [c for c in manifest.get(node.name, []) if c in before_columns and c in df.columns]
+
+            if cache_key is not None:
+                self._cache[node_key] = df[outputs].copy()
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        if record:
+            self._save_manifest()
+        return df
+
+    def clear_cache(self):
+        """清空节点输出缓存"""
+        self._cache.clear()
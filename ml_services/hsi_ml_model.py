@@ -42,6 +42,8 @@ from data_services.regime_detector import RegimeDetector, REGIME_FEATURE_CONFIG
 from data_services.multiscale_features import MultiscaleFeatureCalculator, MULTISCALE_FEATURE_CONFIG
 # 导入信息衰减分析（Tier 1 新增，2026-04-27）
 from data_services.info_decay_analyzer import InfoDecayAnalyzer, INFO_DECAY_FEATURE_CONFIG
+from ml_services.warm_start import WarmStartCatBoost, WarmStartPolicy
+from ml_services.model_registry import get_model_registry
 
 # ========== 配置 ==========
 HSI_SYMBOL = "^HSI"
@@ -182,8 +184,14 @@ CATBOOST_PARAMS = {
 class HSICatBoostModel:
     """恒生指数 CatBoost 预测模型"""
 
-    def __init__(self, horizon=20):
+    def __init__(self, horizon=20, warm_start=None):
+        """
+        参数:
+        - horizon: 预测周期（天）
+        - warm_start: WarmStartCatBoost 增量训练器（可选，滚动训练时在上一次的模型上追加树）
+        """
         self.horizon = horizon
+        self.warm_start = warm_start
         self.model = None
         self.feature_names = None
         self.scaler = None
@@ -860,20 +868,20 @@ class HSICatBoostModel:
                 return False
             model_path = max(models, key=os.path.getmtime)
 
-        self.model = CatBoostClassifier()
-        self.model.load_model(model_path)
+        # 经进程级模型注册表加载（同一文件只加载一次）
+        registry = get_model_registry()
+        self.model = registry.load_catboost(model_path)
 
         # 加载特征名称
         feature_path = model_path.replace('.cbm', '.json').replace('hsi_catboost', 'hsi_features')
         if os.path.exists(feature_path):
-            with open(feature_path, 'r') as f:
-                self.feature_names = json.load(f)
+            self.feature_names = list(registry.load_json(feature_path))
 
         print(f"✅ 模型已加载: {model_path}")
         return True
 
     def walk_forward_validation(self, start_date='2020-01-01', end_date='2025-12-31',
-                                 train_window=12, test_window=3):
+                                 train_window=12, test_window=3, incremental=False):
         """
         Walk-forward 验证
 
@@ -882,6 +890,7 @@ class HSICatBoostModel:
         - end_date: 结束日期
         - train_window: 训练窗口（月）
         - test_window: 测试窗口（月），默认3个月（约60个样本/Fold）
+        - incremental: 是否增量训练（每个 Fold 在上一个 Fold 的模型上追加树，按策略定期完整重训）
         """
         print("=" * 60)
         print("🔄 Walk-forward 验证")
@@ -907,6 +916,12 @@ class HSICatBoostModel:
         results = []
         fold = 0
 
+        # 增量训练只在本次验证内保留上一 Fold 的模型（不读写磁盘状态）
+        fold_warm_start = None
+        if incremental:
+            policy = self.warm_start.policy if self.warm_start is not None else WarmStartPolicy()
+            fold_warm_start = WarmStartCatBoost(policy, name=f'hsi_{self.horizon}d_walk_forward')
+
         # 滚动验证
         for i in range(train_days, len(dates) - test_days, test_days):
             fold += 1
@@ -925,8 +940,11 @@ class HSICatBoostModel:
             wf_params = CATBOOST_PARAMS.copy()
             wf_params['use_best_model'] = False
             wf_params['early_stopping_rounds'] = None
-            model = CatBoostClassifier(**wf_params)
-            model.fit(X_train, y_train, verbose=0)
+            if fold_warm_start is not None:
+                model = fold_warm_start.fit(wf_params, X_train, y_train, verbose=0)
+            else:
+                model = CatBoostClassifier(**wf_params)
+                model.fit(X_train, y_train, verbose=0)
 
             # 预测
             y_prob = model.predict_proba(X_test)[:, 1]
@@ -986,6 +1004,9 @@ class HSICatBoostModel:
         print(f"  高置信度准确率: {results_df['accuracy_high_conf'].mean():.2%}")
         print(f"  平均 AUC: {results_df['auc'].mean():.4f}")
         print(f"  Fold 数量: {len(results_df)}")
+        if fold_warm_start is not None:
+            for mode, stats in fold_warm_start.summary().items():
+                print(f"  {mode} 训练: {stats['count']} 次，平均 {stats['avg_seconds']:.2f}s")
 
         return results_df
 
@@ -1050,16 +1071,20 @@ class HSICatBoostModel:
         print(f"  上涨: {train_up} ({train_up/len(y_train)*100:.1f}%)")
         print(f"  下跌: {train_down} ({train_down/len(y_train)*100:.1f}%)")
 
-        # 创建 CatBoost 模型
-        self.model = CatBoostClassifier(**CATBOOST_PARAMS)
-
         # 训练
         print(f"\n🚀 开始训练...")
-        self.model.fit(
-            X_train, y_train,
-            eval_set=(X_val, y_val),
-            verbose=100
-        )
+        if self.warm_start is not None:
+            # 增量训练：在上一次滚动训练的模型上追加树
+            self.model = self.warm_start.fit(CATBOOST_PARAMS, X_train, y_train,
+                                             eval_set=(X_val, y_val), verbose=100)
+            print(f"  训练方式: {self.warm_start.last_mode}，共 {self.model.tree_count_} 棵树")
+        else:
+            self.model = CatBoostClassifier(**CATBOOST_PARAMS)
+            self.model.fit(
+                X_train, y_train,
+                eval_set=(X_val, y_val),
+                verbose=100
+            )
 
         # 评估
         y_pred = self.model.predict(X_val)
@@ -1099,11 +1124,22 @@ def main():
                         help='滚动训练窗口大小（月）')
     parser.add_argument('--test-window', type=int, default=3,
                         help='Walk-forward 测试窗口大小（月），默认3个月')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量训练（rolling/validate 模式）：在上一次的模型上追加树，定期完整重训')
+    parser.add_argument('--added-trees', type=int, default=60,
+                        help='增量训练每次追加的树数量（默认60）')
+    parser.add_argument('--full-refit-every', type=int, default=10,
+                        help='连续增量训练多少次后完整重训一次（默认10）')
 
     args = parser.parse_args()
 
     # 创建模型
-    model = HSICatBoostModel(horizon=args.horizon)
+    warm_start = None
+    if args.incremental:
+        warm_start = WarmStartCatBoost(
+            WarmStartPolicy(added_trees=args.added_trees, full_refit_every=args.full_refit_every),
+            state_dir=os.path.join(MODEL_DIR, 'warm_start'), name=f'hsi_{args.horizon}d')
+    model = HSICatBoostModel(horizon=args.horizon, warm_start=warm_start)
 
     if args.mode == 'train':
         model.train(start_date=args.start_date, end_date=args.end_date)
@@ -1114,7 +1150,7 @@ def main():
         model.predict_multi_horizon(horizons=[1, 5, 20])
     elif args.mode == 'validate':
         model.walk_forward_validation(start_date=args.start_date, end_date=args.end_date,
-                                       test_window=args.test_window)
+                                       test_window=args.test_window, incremental=args.incremental)
     elif args.mode == 'rolling':
         model.train_rolling(window_months=args.window)
     elif args.mode == 'compare':
@@ -45,6 +45,11 @@ from data_services.fundamental_data import get_comprehensive_fundamental_data
 from ml_services.ml_trading_model import FeatureEngineer
 from ml_services.backtest_evaluator import BacktestEvaluator
 from ml_services.logger_config import get_logger
+from ml_services.sequence_windows import SequenceWindows
+from ml_services.torch_runtime import (
+    CPUPerformanceConfig, add_cpu_performance_arguments, configure_cpu_threads, cpu_config_from_args,
+    make_loader, prepare_inference_model, run_parallel
+)
 from config import WATCHLIST as STOCK_LIST
 
 # 获取日志记录器
@@ -66,6 +71,7 @@ def setup_reproducibility(seed=42):
 # ========== 配置参数 ==========
 SEQUENCE_LENGTH = 30  # LSTM输入序列长度（使用过去30天数据）
 BATCH_SIZE = 32
+PREDICT_BATCH_SIZE = 1024  # 预测时每批物化的窗口数
 LEARNING_RATE = 0.001
 EPOCHS = 50
 EARLY_STOPPING_PATIENCE = 10
@@ -187,21 +193,24 @@ class LSTMModel(nn.Module):
 
 # ========== 数据集类 ==========
 class StockPriceDataset(Dataset):
-    """股票价格数据集"""
+    """股票价格数据集（按需从共享的特征矩阵切出窗口，不复制全部序列）"""
     
-    def __init__(self, sequences: np.ndarray, labels: np.ndarray, stock_ids: np.ndarray = None):
-        self.sequences = torch.FloatTensor(sequences)
-        self.labels = torch.FloatTensor(labels)
-        self.stock_ids = torch.LongTensor(stock_ids) if stock_ids is not None else None
+    def __init__(self, windows: SequenceWindows):
+        self.windows = windows
+        self.labels = windows.labels.astype(np.float32)
         
     def __len__(self):
-        return len(self.sequences)
+        return len(self.windows)
     
     def __getitem__(self, idx):
-        if self.stock_ids is not None:
-            return self.sequences[idx], self.labels[idx], self.stock_ids[idx]
-        else:
-            return self.sequences[idx], self.labels[idx]
+        if isinstance(idx, (list, np.ndarray)):
+            # 按批取（BatchSampler）：一次切出整批窗口
+            return (torch.from_numpy(np.ascontiguousarray(self.windows.windows(idx))),
+                    torch.from_numpy(self.labels[idx]),
+                    torch.from_numpy(self.windows.stock_ids[idx]))
+        return (torch.from_numpy(self.windows.window(idx)),
+                torch.tensor(self.labels[idx]),
+                torch.tensor(self.windows.stock_ids[idx]))
 
 
 # ========== 数据预处理 ==========
@@ -266,8 +275,8 @@ class LSTMDataPreprocessor:
         logger.info(f"  特征生成完成，共 {len(df.columns)} 列")
         return df
     
-    def create_sequences(self, df: pd.DataFrame, horizon: int = 1) -> Tuple[np.ndarray, np.ndarray]:
-        """创建LSTM序列数据 - 使用所有可用特征"""
+    def create_sequences(self, df: pd.DataFrame, horizon: int = 1, stock_id: int = 0) -> SequenceWindows:
+        """创建LSTM序列数据 - 使用所有可用特征（窗口按需切片，不复制重叠序列）"""
 
         # 排除非数值列和目标列
         exclude_columns = ['Date', 'Target', 'target']
@@ -279,43 +288,37 @@ class LSTMDataPreprocessor:
 
         # 确保所有特征列存在
         available_features = [col for col in feature_columns if col in df.columns]
-        feature_data = df[available_features].values
+        feature_data = df[available_features].to_numpy(dtype=np.float64)
 
         # 处理无穷大值和NaN
-        feature_data = np.nan_to_num(feature_data, nan=0.0, posinf=1e6, neginf=-1e6)
+        feature_data = np.nan_to_num(feature_data, nan=0.0, posinf=1e6, neginf=-1e6, copy=False)
 
         # 裁剪极端值（防止数值溢出）
-        feature_data = np.clip(feature_data, -1e6, 1e6)
-
-        # 创建序列
-        sequences = []
-        labels = []
-
-        for i in range(len(feature_data) - self.sequence_length - horizon):
-            # 输入序列：过去sequence_length天的数据
-            seq = feature_data[i:i + self.sequence_length]
-            sequences.append(seq)
+        np.clip(feature_data, -1e6, 1e6, out=feature_data)
 
-            # 标签：未来horizon天的涨跌
-            future_price = df['Close'].iloc[i + self.sequence_length + horizon - 1]
-            current_price = df['Close'].iloc[i + self.sequence_length - 1]
-            label = 1 if future_price > current_price else 0
-            labels.append(label)
+        # 窗口 i：第 i 到 i+sequence_length-1 天；标签：未来horizon天的涨跌
+        windows = SequenceWindows.from_array(feature_data, df['Close'].to_numpy(),
+                                             self.sequence_length, horizon, stock_id=stock_id)
 
-        logger.info(f"  生成 {len(sequences)} 个序列")
-        return np.array(sequences), np.array(labels)
+        logger.info(f"  生成 {len(windows)} 个序列")
+        return windows
 
 
 # ========== LSTM训练器 ==========
 class LSTMTrainer:
     """LSTM模型训练器"""
     
-    def __init__(self, input_size: int, model_params: Dict = None, num_stocks: int = None):
+    def __init__(self, input_size: int, model_params: Dict = None, num_stocks: int = None,
+                 cpu_config: CPUPerformanceConfig = None):
         if not PYTORCH_AVAILABLE:
             raise ImportError("PyTorch未安装，请运行: pip install torch")
         
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         logger.info(f"使用设备: {self.device}")
+        self.cpu_config = cpu_config or CPUPerformanceConfig()
+        self._inference_model = None  # 训练完成后按需构建（TorchScript/编译/量化）
+        # 每个进程使用独立的最佳模型检查点（并行实验时互不覆盖）
+        self.checkpoint_path = f'best_lstm_model_{os.getpid()}.pth'
         
         # 初始化模型
         if model_params is None:
@@ -352,6 +355,7 @@ class LSTMTrainer:
     def train(self, train_loader: DataLoader, val_loader: DataLoader = None):
         """训练模型"""
         self.model.train()
+        self._inference_model = None
         
         best_val_loss = float('inf')
         patience_counter = 0
@@ -403,7 +407,7 @@ class LSTMTrainer:
                     best_val_loss = val_loss
                     patience_counter = 0
                     # 保存最佳模型（包含模型状态和元数据）
-                    self.save_model_with_metadata('best_lstm_model.pth')
+                    self.save_model_with_metadata(self.checkpoint_path)
                 else:
                     patience_counter += 1
                     if patience_counter >= EARLY_STOPPING_PATIENCE:
@@ -413,9 +417,9 @@ class LSTMTrainer:
                 logger.info(f"Epoch {epoch+1}/{EPOCHS} - Train Loss: {avg_train_loss:.4f}")
         
         # 加载最佳模型
-        if val_loader and os.path.exists('best_lstm_model.pth'):
-            self.load_model_with_metadata('best_lstm_model.pth')
-            os.remove('best_lstm_model.pth')
+        if val_loader and os.path.exists(self.checkpoint_path):
+            self.load_model_with_metadata(self.checkpoint_path)
+            os.remove(self.checkpoint_path)
     
     def save_model_with_metadata(self, path: str):
         """保存模型及其元数据"""
@@ -437,6 +441,7 @@ class LSTMTrainer:
         
         model_data = torch.load(path, map_location=self.device)
         self.model.load_state_dict(model_data['state_dict'])
+        self._inference_model = None
         
         # 更新元数据
         if 'metadata' in model_data:
@@ -485,21 +490,29 @@ class LSTMTrainer:
         return val_loss / len(val_loader)
     
     def predict(self, X: np.ndarray, stock_ids: np.ndarray = None) -> np.ndarray:
-        """预测"""
+        """预测（X 为 SequenceWindows 时分批物化窗口）"""
+        if isinstance(X, SequenceWindows):
+            return np.concatenate([np.atleast_1d(self.predict(X.windows(batch), X.stock_ids[batch]))
+                                   for batch in X.batches(PREDICT_BATCH_SIZE)])
+
         self.model.eval()
         
         X_tensor = torch.FloatTensor(X).to(self.device)
+        inputs = (X_tensor,) if stock_ids is None else (X_tensor, torch.LongTensor(stock_ids).to(self.device))
         
         with torch.no_grad():
-            if stock_ids is not None:
-                stock_ids_tensor = torch.LongTensor(stock_ids).to(self.device)
-                predictions = self.model(X_tensor, stock_ids_tensor)
-            else:
-                predictions = self.model(X_tensor)
+            predictions = self.inference_model(inputs)(*inputs)
             predictions = predictions.cpu().numpy()
         
         return predictions
     
+    def inference_model(self, example_inputs):
+        """推理模型（CPU 性能模式下为 TorchScript/编译/量化后的模型，首次预测时构建）"""
+        if self._inference_model is None:
+            self._inference_model = prepare_inference_model(self.model, example_inputs,
+                                                            self.cpu_config, self.device)
+        return self._inference_model
+    
     def predict_proba(self, X: np.ndarray, stock_ids: np.ndarray = None) -> np.ndarray:
         """预测概率"""
         return self.predict(X, stock_ids)
@@ -509,9 +522,11 @@ class LSTMTrainer:
 class LSTMExperiment:
     """LSTM对比实验"""
     
-    def __init__(self, stock_codes: List[str] = None, horizon: int = 1):
+    def __init__(self, stock_codes: List[str] = None, horizon: int = 1,
+                 cpu_config: CPUPerformanceConfig = None):
         self.stock_codes = stock_codes or TEST_STOCKS
         self.horizon = horizon
+        self.cpu_config = cpu_config or CPUPerformanceConfig()
         self.preprocessor = LSTMDataPreprocessor()
         self.results = {}
         
@@ -534,12 +549,12 @@ class LSTMExperiment:
             # 准备特征（传入stock_code用于生成股票类型特征）
             stock_df = self.preprocessor.prepare_features(stock_df, stock_code)
             
-            # 创建序列
-            sequences, labels = self.preprocessor.create_sequences(stock_df, self.horizon)
-            logger.info(f"序列数据形状: {sequences.shape}, 标签形状: {labels.shape}")
+            # 创建序列（单个股票的ID始终为0，因为只训练一个股票）
+            windows = self.preprocessor.create_sequences(stock_df, self.horizon, stock_id=0)
+            logger.info(f"序列数据形状: {windows.shape}, 标签形状: {windows.labels.shape}")
             
-            if len(sequences) < 100:
-                logger.warning(f"数据量不足: {len(sequences)} < 100")
+            if len(windows) < 100:
+                logger.warning(f"数据量不足: {len(windows)} < 100")
                 return None
             
             # 使用时间序列交叉验证
@@ -548,70 +563,40 @@ class LSTMExperiment:
             
             # 为简单起见，我们仍使用80/20分割，但使用TimeSeriesSplit来确保正确的分割方式
             # 在实际应用中，可以使用多个fold进行更稳健的评估
-            splits = list(tscv.split(sequences))
+            splits = list(tscv.split(np.arange(len(windows))))
             if len(splits) > 0:
                 # 使用最后一个split作为最终的train/test分割
                 train_idx, test_idx = splits[-1]
-                train_sequences = sequences[train_idx]
-                train_labels = labels[train_idx]
-                test_sequences = sequences[test_idx]
-                test_labels = labels[test_idx]
             else:
                 # 如果数据量太少无法进行TimeSeriesSplit，则使用简单的80/20分割
-                split_idx = int(len(sequences) * 0.8)
-                train_sequences = sequences[:split_idx]
-                train_labels = labels[:split_idx]
-                test_sequences = sequences[split_idx:]
-                test_labels = labels[split_idx:]
+                split_idx = int(len(windows) * 0.8)
+                train_idx, test_idx = np.arange(split_idx), np.arange(split_idx, len(windows))
             
             # 训练集再分割为训练集和验证集（保持时间顺序）
-            if len(train_sequences) > 0:
-                val_split_idx = int(len(train_sequences) * 0.8)
-                val_sequences = train_sequences[val_split_idx:]
-                val_labels = train_labels[val_split_idx:]
-                train_sequences = train_sequences[:val_split_idx]
-                train_labels = train_labels[:val_split_idx]
-            
-            # 为单个股票创建股票ID（始终为0，因为只训练一个股票）
-            stock_id = 0  # 单个股票的ID始终为0
-            train_stock_ids = np.full((len(train_sequences),), stock_id)
-            val_stock_ids = np.full((len(val_sequences),), stock_id)
-            test_stock_ids = np.full((len(test_sequences),), stock_id)
-            
-            # 处理特征标准化 - 只在训练集上拟合，然后应用到验证集和测试集
-            # 首先重塑数据以便标准化
-            seq_shape = train_sequences.shape
-            reshaped_train = train_sequences.reshape(-1, seq_shape[2])
-            
-            # 在训练数据上拟合并变换
-            normalized_train = self.preprocessor.feature_scaler.fit_transform(reshaped_train)
-            normalized_train = normalized_train.reshape(seq_shape)
-            
-            # 对验证集进行标准化
-            val_seq_shape = val_sequences.shape
-            reshaped_val = val_sequences.reshape(-1, val_seq_shape[2])
-            normalized_val = self.preprocessor.feature_scaler.transform(reshaped_val)
-            normalized_val = normalized_val.reshape(val_seq_shape)
+            val_split_idx = int(len(train_idx) * 0.8)
+            train_idx, val_idx = train_idx[:val_split_idx], train_idx[val_split_idx:]
             
-            # 对测试集进行标准化
-            test_seq_shape = test_sequences.shape
-            reshaped_test = test_sequences.reshape(-1, test_seq_shape[2])
-            normalized_test = self.preprocessor.feature_scaler.transform(reshaped_test)
-            normalized_test = normalized_test.reshape(test_seq_shape)
+            # 处理特征标准化 - 只在训练窗口覆盖的行上拟合，然后对整个特征矩阵变换一次
+            self.preprocessor.feature_scaler.fit(windows.subset(train_idx).rows())
+            normalized = windows.transform(self.preprocessor.feature_scaler)
+            train_windows = normalized.subset(train_idx)
+            val_windows = normalized.subset(val_idx)
+            test_windows = normalized.subset(test_idx)
+            test_labels = test_windows.labels
             
             # 创建数据加载器，包含股票ID
-            train_dataset = StockPriceDataset(normalized_train, train_labels, train_stock_ids)
-            val_dataset = StockPriceDataset(normalized_val, val_labels, val_stock_ids)
-            train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=False)  # 时间序列不应shuffle
-            val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE, shuffle=False)
+            train_dataset = StockPriceDataset(train_windows)
+            val_dataset = StockPriceDataset(val_windows)
+            train_loader = make_loader(train_dataset, BATCH_SIZE, self.cpu_config)  # 时间序列不应shuffle
+            val_loader = make_loader(val_dataset, BATCH_SIZE, self.cpu_config)
             
             # 训练LSTM，指定只有1只股票
-            input_size = normalized_train.shape[2]
-            trainer = LSTMTrainer(input_size, num_stocks=1)
+            input_size = normalized.num_features
+            trainer = LSTMTrainer(input_size, num_stocks=1, cpu_config=self.cpu_config)
             trainer.train(train_loader, val_loader)
             
             # 预测
-            lstm_predictions = trainer.predict_proba(normalized_test, test_stock_ids)
+            lstm_predictions = trainer.predict_proba(test_windows)
             lstm_pred_labels = (lstm_predictions > 0.5).astype(int)
             
             # 计算指标
@@ -649,7 +634,7 @@ class LSTMExperiment:
             try:
                 backtest_results = evaluator.backtest_model(
                     model=mock_lstm_model,
-                    test_data=test_sequences,  # 使用测试特征数据
+                    test_data=test_windows,  # 使用测试特征数据
                     test_labels=pd.Series(test_labels),  # 测试标签
                     test_prices=test_price_data,  # 测试价格数据
                     confidence_threshold=0.55  # 置信度阈值
@@ -666,7 +651,7 @@ class LSTMExperiment:
             self.save_model(trainer, stock_code)
             
             # 加载CatBoost模型对比
-            catboost_result = self.compare_with_catboost(stock_code, normalized_test, test_labels)
+            catboost_result = self.compare_with_catboost(stock_code, test_windows, test_labels)
             
             return {
                 'stock_code': stock_code,
@@ -689,7 +674,7 @@ class LSTMExperiment:
             logger.debug(traceback.format_exc())
             return None
     
-    def compare_with_catboost(self, stock_code: str, test_sequences: np.ndarray, 
+    def compare_with_catboost(self, stock_code: str, test_sequences: SequenceWindows, 
                              test_labels: np.ndarray) -> Dict:
         """与CatBoost模型对比"""
         try:
@@ -743,9 +728,7 @@ class LSTMExperiment:
         stock_to_id = {stock_code: idx for idx, stock_code in enumerate(self.stock_codes)}
         logger.info(f"股票到ID的映射: {stock_to_id}")
         
-        all_sequences = []
-        all_labels = []
-        all_stock_ids = []  # 保存每条序列对应的股票ID
+        all_windows = []  # 每只股票的窗口（合并时保留各股票的行边界）
         stock_data_dict = {}  # 保存每只股票的数据用于测试
         
         for stock_code in self.stock_codes:
@@ -763,108 +746,69 @@ class LSTMExperiment:
             # 准备特征（传入stock_code用于生成股票类型特征）
             stock_df = self.preprocessor.prepare_features(stock_df, stock_code)
             
-            # 创建序列
-            sequences, labels = self.preprocessor.create_sequences(stock_df, self.horizon)
-            logger.info(f"股票 {stock_code} 序列数据形状: {sequences.shape}, 标签形状: {labels.shape}")
+            # 创建序列，每个序列带上当前股票的ID
+            stock_id = stock_to_id[stock_code]
+            windows = self.preprocessor.create_sequences(stock_df, self.horizon, stock_id=stock_id)
+            logger.info(f"股票 {stock_code} 序列数据形状: {windows.shape}, 标签形状: {windows.labels.shape}")
             
-            if len(sequences) < 100:
-                logger.warning(f"股票 {stock_code} 数据量不足: {len(sequences)} < 100")
+            if len(windows) < 100:
+                logger.warning(f"股票 {stock_code} 数据量不足: {len(windows)} < 100")
                 continue
             
-            # 获取当前股票的ID
-            stock_id = stock_to_id[stock_code]
-            stock_ids = np.full((len(sequences),), stock_id)  # 为每个序列分配股票ID
-            
             # 保存股票数据用于后续测试
             stock_data_dict[stock_code] = {
                 'df': stock_df,
-                'sequences': sequences,
-                'labels': labels,
-                'stock_ids': stock_ids
+                'stock_id': stock_id
             }
             
             # 将数据添加到总数据集中
-            all_sequences.append(sequences)
-            all_labels.append(labels)
-            all_stock_ids.append(stock_ids)
+            all_windows.append(windows)
         
-        if not all_sequences:
+        if not all_windows:
             logger.error("没有足够的数据进行训练")
             return {}
         
-        # 合并所有股票的数据
-        combined_sequences = np.concatenate(all_sequences, axis=0)
-        combined_labels = np.concatenate(all_labels, axis=0)
-        combined_stock_ids = np.concatenate(all_stock_ids, axis=0)
+        # 合并所有股票的数据（特征矩阵按行拼接，窗口不跨越股票边界）
+        combined = SequenceWindows.concat(all_windows)
         
-        logger.info(f"合并后总数据形状: 序列 {combined_sequences.shape}, 标签 {combined_labels.shape}, 股票ID {combined_stock_ids.shape}")
+        logger.info(f"合并后总数据形状: 序列 {combined.shape}, 标签 {combined.labels.shape}, 股票ID {combined.stock_ids.shape}")
         
         # 使用时间序列交叉验证进行数据分割
         from sklearn.model_selection import TimeSeriesSplit
         tscv = TimeSeriesSplit(n_splits=5)
         
         # 使用最后一个split作为train/test分割，保留时间顺序
-        splits = list(tscv.split(combined_sequences))
+        splits = list(tscv.split(np.arange(len(combined))))
         if len(splits) > 0:
             train_idx, test_idx = splits[-1]
-            train_sequences = combined_sequences[train_idx]
-            train_labels = combined_labels[train_idx]
-            train_stock_ids = combined_stock_ids[train_idx]
-            test_sequences = combined_sequences[test_idx]
-            test_labels = combined_labels[test_idx]
-            test_stock_ids = combined_stock_ids[test_idx]
         else:
             # 如果数据量不够分5折，则使用简单的80/20分割
-            split_idx = int(len(combined_sequences) * 0.8)
-            train_sequences = combined_sequences[:split_idx]
-            train_labels = combined_labels[:split_idx]
-            train_stock_ids = combined_stock_ids[:split_idx]
-            test_sequences = combined_sequences[split_idx:]
-            test_labels = combined_labels[split_idx:]
-            test_stock_ids = combined_stock_ids[split_idx:]
+            split_idx = int(len(combined) * 0.8)
+            train_idx, test_idx = np.arange(split_idx), np.arange(split_idx, len(combined))
         
         # 训练集再分割为训练集和验证集（保持时间顺序）
-        val_split_idx = int(len(train_sequences) * 0.8)
-        val_sequences = train_sequences[val_split_idx:]
-        val_labels = train_labels[val_split_idx:]
-        val_stock_ids = train_stock_ids[val_split_idx:]
-        train_sequences = train_sequences[:val_split_idx]
-        train_labels = train_labels[:val_split_idx]
-        train_stock_ids = train_stock_ids[:val_split_idx]
-        
-        # 进行特征标准化 - 只在训练集上拟合，然后应用到验证集和测试集
-        seq_shape = train_sequences.shape
-        reshaped_train = train_sequences.reshape(-1, seq_shape[2])
-        
-        # 在训练数据上拟合并变换
-        normalized_train = self.preprocessor.feature_scaler.fit_transform(reshaped_train)
-        normalized_train = normalized_train.reshape(seq_shape)
-        
-        # 对验证集进行标准化
-        val_seq_shape = val_sequences.shape
-        reshaped_val = val_sequences.reshape(-1, val_seq_shape[2])
-        normalized_val = self.preprocessor.feature_scaler.transform(reshaped_val)
-        normalized_val = normalized_val.reshape(val_seq_shape)
-        
-        # 对测试集进行标准化
-        test_seq_shape = test_sequences.shape
-        reshaped_test = test_sequences.reshape(-1, test_seq_shape[2])
-        normalized_test = self.preprocessor.feature_scaler.transform(reshaped_test)
-        normalized_test = normalized_test.reshape(test_seq_shape)
+        val_split_idx = int(len(train_idx) * 0.8)
+        train_idx, val_idx = train_idx[:val_split_idx], train_idx[val_split_idx:]
+        
+        # 进行特征标准化 - 只在训练窗口覆盖的行上拟合，然后对整个特征矩阵变换一次
+        self.preprocessor.feature_scaler.fit(combined.subset(train_idx).rows())
+        normalized = combined.transform(self.preprocessor.feature_scaler)
+        test_windows = normalized.subset(test_idx)
+        test_labels = test_windows.labels
         
         # 创建数据加载器
-        train_dataset = StockPriceDataset(normalized_train, train_labels, train_stock_ids)
-        val_dataset = StockPriceDataset(normalized_val, val_labels, val_stock_ids)
-        train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=False)  # 时间序列不应shuffle
-        val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE, shuffle=False)
+        train_dataset = StockPriceDataset(normalized.subset(train_idx))
+        val_dataset = StockPriceDataset(normalized.subset(val_idx))
+        train_loader = make_loader(train_dataset, BATCH_SIZE, self.cpu_config)  # 时间序列不应shuffle
+        val_loader = make_loader(val_dataset, BATCH_SIZE, self.cpu_config)
         
         # 训练LSTM - 使用合并后的数据训练单个模型，包含股票数量信息
-        input_size = normalized_train.shape[2]
-        trainer = LSTMTrainer(input_size, num_stocks=len(self.stock_codes))
+        input_size = normalized.num_features
+        trainer = LSTMTrainer(input_size, num_stocks=len(self.stock_codes), cpu_config=self.cpu_config)
         trainer.train(train_loader, val_loader)
         
         # 在测试集上评估模型性能
-        combined_predictions = trainer.predict_proba(normalized_test, test_stock_ids)
+        combined_predictions = trainer.predict_proba(test_windows)
         combined_pred_labels = (combined_predictions > 0.5).astype(int)
         
         # 计算整体性能
@@ -883,18 +827,11 @@ class LSTMExperiment:
         all_results = {}
         for stock_code, stock_data in stock_data_dict.items():
             stock_df = stock_data['df']
-            stock_sequences = stock_data['sequences']
-            stock_labels = stock_data['labels']
-            stock_stock_ids = stock_data['stock_ids']
-            
-            # 为每只股票的序列数据进行标准化
-            stock_seq_shape = stock_sequences.shape
-            reshaped_stock = stock_sequences.reshape(-1, stock_seq_shape[2])
-            normalized_stock = self.preprocessor.feature_scaler.transform(reshaped_stock)
-            normalized_stock = normalized_stock.reshape(stock_seq_shape)
+            stock_windows = normalized.stock_subset(stock_data['stock_id'])
+            stock_labels = stock_windows.labels
             
             # 使用训练好的模型对单只股票进行预测，传入股票ID
-            stock_predictions = trainer.predict_proba(normalized_stock, stock_stock_ids)
+            stock_predictions = trainer.predict_proba(stock_windows)
             stock_pred_labels = (stock_predictions > 0.5).astype(int)
             
             # 计算单只股票的性能
@@ -925,7 +862,7 @@ class LSTMExperiment:
                 
                 backtest_results = evaluator.backtest_model(
                     model=mock_lstm_model,
-                    test_data=stock_sequences,  # 使用测试特征数据
+                    test_data=stock_windows,  # 使用测试特征数据
                     test_labels=pd.Series(stock_labels),  # 测试标签
                     test_prices=test_price_data,  # 测试价格数据
                     confidence_threshold=0.55  # 置信度阈值
@@ -947,7 +884,7 @@ class LSTMExperiment:
                     'true_labels': stock_labels.tolist(),
                     'backtest_results': backtest_results
                 },
-                'catboost': self.compare_with_catboost(stock_code, normalized_stock, stock_labels)
+                'catboost': self.compare_with_catboost(stock_code, stock_windows, stock_labels)
             }
         
         # 保存训练好的合并模型
@@ -1072,6 +1009,13 @@ class LSTMExperiment:
         logger.info(f"模型已保存到: {model_file}")
 
 
+def _run_single_stock_process(stock_code: str, horizon: int, seed: int, cpu_config: CPUPerformanceConfig) -> Dict:
+    """子进程入口：独立训练和评估一只股票"""
+    setup_reproducibility(seed)
+    experiment = LSTMExperiment(stock_codes=[stock_code], horizon=horizon, cpu_config=cpu_config)
+    return experiment.run_single_stock(stock_code)
+
+
 # ========== 主函数 ==========
 def main():
     parser = argparse.ArgumentParser(description='LSTM模型对比实验')
@@ -1089,6 +1033,7 @@ def main():
                        help='随机种子（默认42）')
     parser.add_argument('--training-method', type=str, choices=['combined', 'individual'], 
                        default='combined', help='训练方法: combined(合并所有股票数据训练单个模型) 或 individual(逐个股票训练)')
+    add_cpu_performance_arguments(parser)
     
     args = parser.parse_args()
     
@@ -1096,13 +1041,17 @@ def main():
         print("❌ PyTorch未安装，请运行: pip install torch")
         return
     
+    cpu_config = cpu_config_from_args(args)
+    processes = cpu_config.processes if args.training_method == 'individual' else 1
+    configure_cpu_threads(cpu_config, max(1, processes))
+    
     # 设置随机种子以确保可复现性
     setup_reproducibility(args.seed)
     
     logger.info("LSTM对比实验开始")
     
     # 运行实验
-    experiment = LSTMExperiment(stock_codes=args.stocks, horizon=args.horizon)
+    experiment = LSTMExperiment(stock_codes=args.stocks, horizon=args.horizon, cpu_config=cpu_config)
     
     if args.training_method == 'combined':
         logger.info("使用合并所有股票数据的训练方法")
@@ -1111,11 +1060,13 @@ def main():
         experiment.save_results(all_results)
     else:
         logger.info("使用逐个股票的训练方法")
-        all_results = {}
-        for stock_code in experiment.stock_codes:
-            result = experiment.run_single_stock(stock_code)
-            if result:
-                all_results[stock_code] = result
+        if cpu_config.enabled and cpu_config.processes > 1:
+            # 各股票的实验互不依赖，分布到多个进程
+            results = run_parallel(_run_single_stock_process, experiment.stock_codes, cpu_config,
+                                   horizon=args.horizon, seed=args.seed, cpu_config=cpu_config)
+        else:
+            results = {stock_code: experiment.run_single_stock(stock_code) for stock_code in experiment.stock_codes}
+        all_results = {stock_code: result for stock_code, result in results.items() if result}
         experiment.summarize_results(all_results)
         experiment.save_results(all_results)
     
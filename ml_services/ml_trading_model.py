@@ -35,18 +35,29 @@ FEATURE_CACHE_DIR = 'data/feature_cache'  # 特征缓存目录
 STOCK_DATA_CACHE_DAYS = 7  # 股票历史数据缓存7天
 FEATURE_CACHE_DAYS = 7     # 特征缓存7天（与数据缓存一致）
 HSI_DATA_CACHE_HOURS = 1   # 恒生指数数据缓存1小时
+FEATURE_MANIFEST_FILE = os.path.join(FEATURE_CACHE_DIR, 'feature_manifest.json')  # 特征节点产出列清单
+NETWORK_FEATURES_FILE = 'data/network_features/network_features_for_ml.json'  # 网络特征（stock_network_analysis.py 生成）
+FEATURE_FLOAT32 = os.getenv('FEATURE_FLOAT32', '0') == '1'  # 特征以 float32 存储（特征缓存与 CatBoost 输入），默认 float64
 
 # 导入项目模块
 from data_services.tencent_finance import get_hk_stock_data_tencent, get_hsi_data_tencent
-from data_services.technical_analysis import TechnicalAnalyzer
+from data_services.technical_analysis import (
+    TechnicalAnalyzer, calculate_rolling_chip_distribution, calculate_rolling_support_resistance
+)
 from data_services.fundamental_data import get_comprehensive_fundamental_data
 from data_services.volatility_model import GARCHVolatilityModel
 from ml_services.hybrid_volatility_model import HybridGARCHLSTM
 from data_services.regime_detector import RegimeDetector
 from data_services.calendar_features import CalendarFeatureCalculator
+from data_services.trading_calendar import get_trading_calendar, market_for_code
 from ml_services.base_model_processor import BaseModelProcessor
 from ml_services.us_market_data import us_market_data
 from ml_services.logger_config import get_logger
+from ml_services.feature_registry import FeatureRegistry
+from ml_services.feature_engineering.feature_frame import FeatureBatch, assign_columns, downcast_features, feature_matrix
+from ml_services.warm_start import WARM_START_DIR, WarmStartCatBoost, WarmStartPolicy
+from ml_services.model_registry import get_model_registry, model_exists, save_native
+from ml_services.fast_scorer import FastScorer
 from config import WATCHLIST as STOCK_LIST, TRAINING_STOCKS, STOCK_SECTOR_MAPPING
 
 # 股票名称映射（预测用核心28只）
@@ -253,6 +264,128 @@ MARKET_FEATURE_MONOTONICITY = {
     'DOW_Cos': 'NEUTRAL',
 }
 
+# ========== 交叉特征定义（create_interaction_features） ==========
+# 类别型特征（8个，已删除5个RS_Signal重复特征）
+INTERACTION_CATEGORICAL_FEATURES = [
+    'Outperforms_HSI',
+    'Strong_Volume_Up',
+    'Weak_Volume_Down',
+    '3d_Trend', '5d_Trend', '10d_Trend', '20d_Trend', '60d_Trend'
+]
+
+# 方案1：定义重要的数值型特征（精选特征）
+# 基于特征重要性实验和历史数据选择
+# 注意：特征名必须与实际计算名称完全匹配
+INTERACTION_NUMERIC_FEATURES = [
+    # 技术指标（使用标准化特征，避免绝对值）
+    'RSI', 'RSI_ROC', 'RSI_Deviation',  # RSI 系列（0-100 标准化）
+    'MACD_Hist', 'MACD_Hist_ROC',  # MACD 柱状图（差值，相对稳定）
+    'MACD_Low_5d_History', 'MACD_High_5d_History',  # MACD 历史极值
+    'RSI_Low_5d_History', 'RSI_High_5d_History',  # RSI 历史极值
+    'ATR_Pct', 'ATR_Ratio',  # ATR 标准化（百分比）
+    'BB_Width', 'BB_Position',  # 布林带宽度和位置
+    'Volume_Ratio_7d', 'Volume_Ratio_20d',  # 成交量比率
+    'OBV_Trend', 'OBV_Change_5d',  # OBV 趋势（标准化）
+    'VWAP_Ratio',  # VWAP 相对位置
+    'Trend_Slope_5d', 'Trend_Slope_20d', 'Trend_Slope_60d',  # 趋势斜率（标准化）
+    'Price_Ratio_MA5', 'Price_Ratio_MA20', 'Price_Ratio_MA50',  # 价格相对均线
+    'Volatility_5d', 'Volatility_20d', 'Volatility_60d',  # 波动率
+    'Kurtosis_20d', 'Skewness_20d',  # 高阶矩
+    'Price_Percentile', 'High_Position_60d',  # 价格位置
+    'Upper_Shadow', 'Lower_Shadow', 'Intraday_Amplitude',  # 日内形态
+    'Gap_Up', 'Gap_Down', 'Gap_Size',  # 缺口
+    'MACD_Bullish_Divergence', 'MACD_Bearish_Divergence',  # MACD 背离
+    'RSI_Bullish_Divergence', 'RSI_Bearish_Divergence',  # RSI 背离
+
+    # 市场环境特征（扩展）
+    'VIX', 'VIX_Change_5d', 'VIX_Level',
+    'HSI_Return_5d', 'HSI_Return_20d', 'HSI_Return_60d',
+    'SP500_Return_5d', 'SP500_Return_20d', 'NASDAQ_Return_5d', 'NASDAQ_Return_20d',
+    # 多期限美债收益率
+    'US_2Y_Yield', 'US_10Y_Yield', 'US_30Y_Yield',
+    # 中国国债收益率
+    'CN_10Y_Yield',
+    # 美债期限利差（收益率曲线形态）
+    'US_2Y_10Y_Spread', 'US_10Y_30Y_Spread',
+    # 中美利差（核心特征）
+    'CN_US_10Y_Spread', 'CN_US_Spread_Z_Score',
+    'Market_Regime_Ranging', 'Market_Regime_Normal', 'Market_Regime_Trending',
+    'GARCH_Conditional_Vol', 'GARCH_Vol_Ratio', 'GARCH_Vol_Change_5d',
+    # 已删除 GARCH_Persistence：交叉后与基础版 r=1.0
+    'HSI_Regime_Prob_0', 'HSI_Regime_Prob_1', 'HSI_Regime_Prob_2',
+    'HSI_Regime_Duration', 'HSI_Regime_Transition_Prob',
+    'Volume_Confirmation_Adaptive',
+    # 已删除 False_Breakout_Signal_Adaptive：跨周期完全相同
+    # 已删除 Confidence_Threshold_Multiplier：与 Market_Regime_Encoded r=-1.0
+    'ATR_Risk_Score',
+
+    # 基本面特征（20个）
+    'PE_Ratio', 'PB_Ratio', 'ROE', 'ROA', 'Net_Margin',
+    'Gross_Margin', 'EPS_Growth', 'Revenue_Growth',
+    'Dividend_Yield', 'Beta',
+    'PE_vs_Mean', 'PB_vs_Mean', 'ROE_vs_Mean', 'ROA_vs_Mean',
+    'PE_Ranking_Percentile', 'PB_Ranking_Percentile',
+    'Fundamental_Score', 'Valuation_Score', 'Growth_Score', 'Quality_Score',
+
+    # 资金流向特征（15个）
+    'Net_Flow_Ratio_5d', 'Net_Flow_Ratio_20d', 'Smart_Money_Indicator',
+    'Price_Position_5d', 'Price_Position_20d', 'Price_Position_60d',
+    'Volume_Signal_5d', 'Volume_Signal_20d', 'Momentum_Signal_5d',
+    'Institutional_Holding', 'Insider_Trading_Signal',
+    'Short_Interest_Ratio', 'Margin_Debt_Ratio', 'Put_Call_Ratio',
+    'Money_Flow_Index', 'Accumulation_Distribution',
+
+    # 风险管理特征（14个，已删除 Consecutive_Ranging_Days：与 Ranging_Fatigue_Index r=1.0）
+    'ATR_Stop_Loss_Distance', 'ATR_Change_5d', 'ATR_Change_10d',
+    'Ranging_Fatigue_Index',
+    'Consecutive_Trending_Days', 'Trending_Momentum_Index',
+    'Risk_Reward_Ratio', 'Expected_Value_Score',
+    'Win_Loss_Ratio_5d', 'Win_Loss_Ratio_20d',
+    'Max_Drawdown_20d', 'Max_Drawdown_60d',
+    'Value_at_Risk_5d', 'Value_at_Risk_20d',
+    'Expected_Shortfall_5d', 'Expected_Shortfall_20d',
+
+    # 股票类型特征（10个）
+    'Stock_Type_Bank', 'Stock_Type_Tech', 'Stock_Type_Semiconductor',
+    'Stock_Type_AI', 'Stock_Type_Energy', 'Stock_Type_Insurance',
+    'Stock_Type_Biotech', 'Stock_Type_RealEstate', 'Stock_Type_Utility',
+    'Sector_Leader'
+]
+
+# 交叉特征排除的基础列（不作为特征使用的列）
+INTERACTION_BASE_EXCLUDE = ['Code', 'Open', 'High', 'Low', 'Close', 'Volume',
+                            'Future_Return', 'Label', 'Prev_Close',
+                            'Vol_MA20', 'Returns', 'TP', 'MF_Multiplier', 'MF_Volume']
+
+# ========== 网络特征定义 ==========
+# 市场-网络交叉所需的网络特征（连续值）
+NETWORK_INTERACTION_BASE_FEATURES = [
+    'net_community_id', 'net_inter_community_ratio',
+    'net_sector_cohesion', 'net_composite_centrality',
+    'net_community_centrality_rank',
+    'net_constraint', 'net_effective_size', 'net_local_clustering'
+]
+
+# 缺失网络特征的股票使用的默认值
+DEFAULT_NETWORK_FEATURES = {
+    'net_degree_centrality': 0.0,
+    'net_betweenness_centrality': 0.0,
+    'net_eigenvector_centrality': 0.0,
+    'net_closeness_centrality': 0.0,
+    'net_composite_centrality': 0.0,
+    'net_community_id': -1,  # -1 表示未知社区
+    'net_community_size': 0,
+    'net_community_centrality_rank': -1,  # -1表示未知社区
+    'net_sector_cohesion': 0.0,
+    'net_mst_degree': 0,
+    'net_mst_neighbor_sectors': 0,
+    'net_inter_community_ratio': 0.0,
+    # 结构洞特征默认值
+    'net_constraint': 1.0,  # 高约束=无机会
+    'net_effective_size': 0.0,
+    'net_local_clustering': 0.0,
+}
+
 # 获取日志记录器
 logger = get_logger('ml_trading_model')
 
@@ -400,16 +533,6 @@ def save_prediction_to_history(predictions, horizon=20, predict_date=None):
     - predict_date: 预测日期字符串
     """
     try:
-        # 历史文件路径
-        history_file = 'data/prediction_history.json'
-        
-        # 加载现有历史
-        if os.path.exists(history_file):
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        else:
-            history = {'predictions': [], 'metadata': {}}
-        
         # 当前时间戳
         now = datetime.now()
         timestamp = now.strftime('%Y-%m-%dT%H:%M:%S')
@@ -457,24 +580,15 @@ def save_prediction_to_history(predictions, horizon=20, predict_date=None):
                 'evaluated_at': None
             }
             
-            # 检查是否已存在相同 prediction_id 的记录
-            existing_ids = {p['prediction_id'] for p in history['predictions']}
-            if record['prediction_id'] not in existing_ids:
-                new_records.append(record)
-        
-        # 添加新记录
-        history['predictions'].extend(new_records)
-        
-        # 更新元数据
-        history['metadata']['last_updated'] = timestamp
-        history['metadata']['total_predictions'] = len(history['predictions'])
-        
-        # 保存历史
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
+            new_records.append(record)
         
-        logger.info(f"已保存 {len(new_records)} 条预测记录到 {history_file}")
-        return len(new_records)
+        # 追加写入历史存储（跳过已存在相同 prediction_id 的记录）
+        from ml_services.performance_monitor import get_prediction_store
+        with get_prediction_store() as store:
+            saved = store.append(new_records, skip_existing_ids=True)
+
+        logger.info(f"已保存 {saved} 条预测记录到 {store.log_path}")
+        return saved
         
     except Exception as e:
         logger.error(f"保存预测历史失败: {e}")
@@ -501,43 +615,12 @@ def get_target_date_trading_days(date, horizon, stock_code='^HSI'):
     参数:
     - date: 数据日期（datetime 或 'YYYY-MM-DD' 字符串）
     - horizon: 交易日数量
-    - stock_code: 股票代码（保留参数，兼容性）
+    - stock_code: 股票代码（决定使用港股还是A股交易日历）
 
     返回:
     - 目标日期字符串 (YYYY-MM-DD)
     """
-    if isinstance(date, str):
-        date = datetime.strptime(date, '%Y-%m-%d')
-
-    try:
-        # 使用 akshare 获取交易日历（更可靠）
-        import akshare as ak
-        df = ak.tool_trade_date_hist_sina()
-        trading_dates = set(df['trade_date'].astype(str).tolist())
-
-        # 找到第 horizon 个交易日后的日期
-        count = 0
-        current = date
-
-        while count < horizon:
-            current += timedelta(days=1)
-            date_str = current.strftime('%Y-%m-%d')
-            if date_str in trading_dates:
-                count += 1
-
-        return current.strftime('%Y-%m-%d')
-
-    except Exception as e:
-        # 回退到 pandas 工作日（不包含节假日，但比自然日准确）
-        logger.warning(f"获取交易日历失败，回退到工作日计算: {e}")
-        try:
-            from pandas.tseries.offsets import BDay
-            target = date + horizon * BDay()
-            return target.strftime('%Y-%m-%d')
-        except:
-            # 最终回退到自然日
-            target_date = date + timedelta(days=horizon)
-            return target_date.strftime('%Y-%m-%d')
+    return get_trading_calendar(market_for_code(stock_code)).add_trading_days(date, horizon)
 
 
 # ========== 缓存辅助函数 ==========
@@ -720,6 +803,8 @@ class FeatureEngineer:
         # 新闻数据缓存（避免重复加载）
         self._news_data_cache = None
         self._news_data_days = 30
+        # 异常检测批量引擎（延迟初始化）
+        self._anomaly_engine = None
 
     def detect_market_regime(self, df):
         """
@@ -803,155 +888,154 @@ class FeatureEngineer:
         # 根据 use_shift 参数确定 shift 值
         shift_val = 1 if use_shift else 0
 
+        # 新特征列先暂存，批量拼接到 df（避免逐列插入导致的内存碎片化）
+        batch = FeatureBatch(df)
+
         # ========== 基础移动平均线 ==========
-        df = self.tech_analyzer.calculate_moving_averages(df, periods=[5, 10, 20, 50, 100, 200])
+        batch.pipe(self.tech_analyzer.calculate_moving_averages, periods=[5, 10, 20, 50, 100, 200])
 
         # ========== RSI (Wilder 平滑) ==========
-        df = self.tech_analyzer.calculate_rsi(df, period=14)
+        batch.pipe(self.tech_analyzer.calculate_rsi, period=14)
         # RSI 变化率
-        df['RSI_ROC'] = df['RSI'].pct_change()
+        batch['RSI_ROC'] = batch['RSI'].pct_change()
         # RSI偏离度（震荡市超买超卖识别特征）
-        df['RSI_Deviation'] = abs(df['RSI'] - 50)  # RSI偏离50的程度
-        df['RSI_Deviation_MA20'] = df['RSI_Deviation'].rolling(window=20, min_periods=1).mean().shift(shift_val)
-        df['RSI_Deviation_Normalized'] = (df['RSI_Deviation'].shift(shift_val) - df['RSI_Deviation_MA20']) / (df['RSI_Deviation'].rolling(20, min_periods=1).std().shift(shift_val) + 1e-10)
+        batch['RSI_Deviation'] = abs(batch['RSI'] - 50)  # RSI偏离50的程度
+        batch['RSI_Deviation_MA20'] = batch['RSI_Deviation'].rolling(window=20, min_periods=1).mean().shift(shift_val)
+        batch['RSI_Deviation_Normalized'] = (batch['RSI_Deviation'].shift(shift_val) - batch['RSI_Deviation_MA20']) / (batch['RSI_Deviation'].rolling(20, min_periods=1).std().shift(shift_val) + 1e-10)
         # 价格高低点定义（用于背离检测，使用滞后数据避免数据泄漏）
         lookback = 5
-        df['Price_Low_5d'] = df['Close'].rolling(window=lookback, min_periods=1).min().shift(shift_val)
-        df['Price_High_5d'] = df['Close'].rolling(window=lookback, min_periods=1).max().shift(shift_val)
+        batch['Price_Low_5d'] = batch['Close'].rolling(window=lookback, min_periods=1).min().shift(shift_val)
+        batch['Price_High_5d'] = batch['Close'].rolling(window=lookback, min_periods=1).max().shift(shift_val)
         # RSI背离检测（震荡市假突破识别特征，使用滞后数据避免数据泄漏）
         # 看涨背离：价格创新低，但RSI未创新低
-        df['RSI_Low_5d_History'] = df['RSI'].rolling(window=lookback, min_periods=1).min().shift(shift_val)
-        df['RSI_Bullish_Divergence'] = (
-            (df['Close'].shift(shift_val) == df['Price_Low_5d']) &  # 昨日价格创5日新低
-            (df['RSI'] > df['RSI_Low_5d_History'])  # RSI未创5日新低（对比历史最低点）
+        batch['RSI_Low_5d_History'] = batch['RSI'].rolling(window=lookback, min_periods=1).min().shift(shift_val)
+        batch['RSI_Bullish_Divergence'] = (
+            (batch['Close'].shift(shift_val) == batch['Price_Low_5d']) &  # 昨日价格创5日新低
+            (batch['RSI'] > batch['RSI_Low_5d_History'])  # RSI未创5日新低（对比历史最低点）
         ).astype(int)
         # 看跌背离：价格创新高，但RSI未创新高
-        df['RSI_High_5d_History'] = df['RSI'].rolling(window=lookback, min_periods=1).max().shift(shift_val)
-        df['RSI_Bearish_Divergence'] = (
-            (df['Close'].shift(shift_val) == df['Price_High_5d']) &  # 昨日价格创5日新高
-            (df['RSI'] < df['RSI_High_5d_History'])  # RSI未创5日新高（对比历史最高点）
+        batch['RSI_High_5d_History'] = batch['RSI'].rolling(window=lookback, min_periods=1).max().shift(shift_val)
+        batch['RSI_Bearish_Divergence'] = (
+            (batch['Close'].shift(shift_val) == batch['Price_High_5d']) &  # 昨日价格创5日新高
+            (batch['RSI'] < batch['RSI_High_5d_History'])  # RSI未创5日新高（对比历史最高点）
         ).astype(int)
 
         # ========== MACD ==========
-        df = self.tech_analyzer.calculate_macd(df)
+        batch.pipe(self.tech_analyzer.calculate_macd)
         # MACD 柱状图
-        df['MACD_Hist'] = df['MACD'] - df['MACD_signal']
+        batch['MACD_Hist'] = batch['MACD'] - batch['MACD_signal']
         # MACD 柱状图变化率
-        df['MACD_Hist_ROC'] = df['MACD_Hist'].pct_change()
+        batch['MACD_Hist_ROC'] = batch['MACD_Hist'].pct_change()
         # MACD背离检测（震荡市假突破识别特征，使用滞后数据避免数据泄漏）
         # 使用5日窗口检测背离
         lookback = 5
         # 看涨背离：价格创新低，但MACD未创新低
-        df['MACD_Low_5d_History'] = df['MACD'].rolling(window=lookback, min_periods=1).min().shift(shift_val)
-        df['MACD_Bullish_Divergence'] = (
-            (df['Close'] == df['Price_Low_5d']) &  # 价格创5日新低
-            (df['MACD'] > df['MACD_Low_5d_History'])  # MACD未创5日新低（对比历史最低点）
+        batch['MACD_Low_5d_History'] = batch['MACD'].rolling(window=lookback, min_periods=1).min().shift(shift_val)
+        batch['MACD_Bullish_Divergence'] = (
+            (batch['Close'] == batch['Price_Low_5d']) &  # 价格创5日新低
+            (batch['MACD'] > batch['MACD_Low_5d_History'])  # MACD未创5日新低（对比历史最低点）
         ).astype(int)
         # 看跌背离：价格创新高，但MACD未创新高
-        df['MACD_High_5d_History'] = df['MACD'].rolling(window=lookback, min_periods=1).max().shift(shift_val)
-        df['MACD_Bearish_Divergence'] = (
-            (df['Close'] == df['Price_High_5d']) &  # 价格创5日新高
-            (df['MACD'] < df['MACD_High_5d_History'])  # MACD未创5日新高（对比历史最高点）
+        batch['MACD_High_5d_History'] = batch['MACD'].rolling(window=lookback, min_periods=1).max().shift(shift_val)
+        batch['MACD_Bearish_Divergence'] = (
+            (batch['Close'] == batch['Price_High_5d']) &  # 价格创5日新高
+            (batch['MACD'] < batch['MACD_High_5d_History'])  # MACD未创5日新高（对比历史最高点）
         ).astype(int)
 
         # ========== 布林带 ==========
-        df = self.tech_analyzer.calculate_bollinger_bands(df, period=20, std_dev=2, use_shift=use_shift)
+        batch.pipe(self.tech_analyzer.calculate_bollinger_bands, period=20, std_dev=2, use_shift=use_shift)
         # 布林带宽度（震荡市识别特征）
-        df['BB_Width'] = (df['BB_upper'] - df['BB_lower']) / df['BB_middle']
+        batch['BB_Width'] = (batch['BB_upper'] - batch['BB_lower']) / batch['BB_middle']
         # 标准化特征：布林带相对位置（跨股票可比）
-        prev_close = df['Close'].shift(shift_val)
-        df['BB_Upper_Ratio'] = df['BB_upper'] / prev_close
-        df['BB_Lower_Ratio'] = df['BB_lower'] / prev_close
-        df['BB_Middle_Ratio'] = df['BB_middle'] / prev_close
+        prev_close = batch['Close'].shift(shift_val)
+        batch['BB_Upper_Ratio'] = batch['BB_upper'] / prev_close
+        batch['BB_Lower_Ratio'] = batch['BB_lower'] / prev_close
+        batch['BB_Middle_Ratio'] = batch['BB_middle'] / prev_close
         # 布林带宽度归一化（相对于60日均值，使用滞后数据避免数据泄漏）
-        df['BB_Width_MA60'] = df['BB_Width'].rolling(window=60, min_periods=1).mean().shift(shift_val)
-        df['BB_Width_Normalized'] = (df['BB_Width'].shift(shift_val) - df['BB_Width_MA60']) / (df['BB_Width'].rolling(60, min_periods=1).std().shift(shift_val) + 1e-10)
+        batch['BB_Width_MA60'] = batch['BB_Width'].rolling(window=60, min_periods=1).mean().shift(shift_val)
+        batch['BB_Width_Normalized'] = (batch['BB_Width'].shift(shift_val) - batch['BB_Width_MA60']) / (batch['BB_Width'].rolling(60, min_periods=1).std().shift(shift_val) + 1e-10)
         # 布林带突破（已删除：与 BB_Position 公式相同，保留 BB_Position）
 
         # ========== ATR ==========
-        df = self.tech_analyzer.calculate_atr(df, period=14)
+        batch.pipe(self.tech_analyzer.calculate_atr, period=14)
         # ATR 比率（ATR相对于10日均线的比率，使用滞后数据避免数据泄漏）
-        df['ATR_MA'] = df['ATR'].rolling(window=10, min_periods=1).mean().shift(shift_val)
-        df['ATR_Ratio'] = df['ATR'] / df['ATR_MA']
+        batch['ATR_MA'] = batch['ATR'].rolling(window=10, min_periods=1).mean().shift(shift_val)
+        batch['ATR_Ratio'] = batch['ATR'] / batch['ATR_MA']
         # 标准化特征：ATP百分比（ATR/价格，跨股票可比）
-        prev_close = df['Close'].shift(shift_val)
-        df['ATR_Pct'] = df['ATR'] / prev_close
+        prev_close = batch['Close'].shift(shift_val)
+        batch['ATR_Pct'] = batch['ATR'] / prev_close
 
         # ========== 成交量相关 ==========
-        df['Vol_MA20'] = df['Volume'].rolling(window=20, min_periods=1).mean().shift(shift_val)
-        df['Vol_Ratio'] = df['Volume'] / df['Vol_MA20']
+        batch['Vol_MA20'] = batch['Volume'].rolling(window=20, min_periods=1).mean().shift(shift_val)
+        batch['Vol_Ratio'] = batch['Volume'] / batch['Vol_MA20']
         # 成交量 z-score（使用滞后数据避免数据泄漏）
-        df['Vol_Mean_20'] = df['Volume'].rolling(20, min_periods=1).mean().shift(shift_val)
-        df['Vol_Std_20'] = df['Volume'].rolling(20, min_periods=1).std().shift(shift_val)
-        df['Vol_Z_Score'] = (df['Volume'] - df['Vol_Mean_20']) / df['Vol_Std_20']
+        batch['Vol_Mean_20'] = batch['Volume'].rolling(20, min_periods=1).mean().shift(shift_val)
+        batch['Vol_Std_20'] = batch['Volume'].rolling(20, min_periods=1).std().shift(shift_val)
+        batch['Vol_Z_Score'] = (batch['Volume'] - batch['Vol_Mean_20']) / batch['Vol_Std_20']
         # 成交额
-        df['Turnover'] = df['Close'] * df['Volume']
+        batch['Turnover'] = batch['Close'] * batch['Volume']
         # 成交额 z-score（使用滞后数据避免数据泄漏）
-        df['Turnover_Mean_20'] = df['Turnover'].rolling(20, min_periods=1).mean().shift(shift_val)
-        df['Turnover_Std_20'] = df['Turnover'].rolling(20, min_periods=1).std().shift(shift_val)
-        df['Turnover_Z_Score'] = (df['Turnover'] - df['Turnover_Mean_20']) / df['Turnover_Std_20']
+        batch['Turnover_Mean_20'] = batch['Turnover'].rolling(20, min_periods=1).mean().shift(shift_val)
+        batch['Turnover_Std_20'] = batch['Turnover'].rolling(20, min_periods=1).std().shift(shift_val)
+        batch['Turnover_Z_Score'] = (batch['Turnover'] - batch['Turnover_Mean_20']) / batch['Turnover_Std_20']
         # 成交额变化率（多周期）
-        df['Turnover_Change_1d'] = df['Turnover'].pct_change()
-        df['Turnover_Change_5d'] = df['Turnover'].pct_change(5)
-        df['Turnover_Change_10d'] = df['Turnover'].pct_change(10)
-        df['Turnover_Change_20d'] = df['Turnover'].pct_change(20)
+        batch['Turnover_Change_1d'] = batch['Turnover'].pct_change()
+        batch['Turnover_Change_5d'] = batch['Turnover'].pct_change(5)
+        batch['Turnover_Change_10d'] = batch['Turnover'].pct_change(10)
+        batch['Turnover_Change_20d'] = batch['Turnover'].pct_change(20)
         # 换手率（假设总股本为常数，这里使用成交额/价格作为近似）
-        df['Turnover_Rate'] = (df['Turnover'] / (df['Close'] * 1000000)) * 100
+        batch['Turnover_Rate'] = (batch['Turnover'] / (batch['Close'] * 1000000)) * 100
         # 换手率变化率
-        df['Turnover_Rate_Change_5d'] = df['Turnover_Rate'].pct_change(5)
-        df['Turnover_Rate_Change_20d'] = df['Turnover_Rate'].pct_change(20)
+        batch['Turnover_Rate_Change_5d'] = batch['Turnover_Rate'].pct_change(5)
+        batch['Turnover_Rate_Change_20d'] = batch['Turnover_Rate'].pct_change(20)
 
         # ========== VWAP (成交量加权平均价，使用滞后数据避免数据泄漏) ==========
-        df['TP'] = (df['High'].shift(shift_val) + df['Low'].shift(shift_val) + df['Close'].shift(shift_val)) / 3
-        df['VWAP'] = (df['TP'] * df['Volume']).rolling(window=20, min_periods=1).sum() / df['Volume'].rolling(window=20, min_periods=1).sum()
+        batch['TP'] = (batch['High'].shift(shift_val) + batch['Low'].shift(shift_val) + batch['Close'].shift(shift_val)) / 3
+        batch['VWAP'] = (batch['TP'] * batch['Volume']).rolling(window=20, min_periods=1).sum() / batch['Volume'].rolling(window=20, min_periods=1).sum()
         # VWAP 标准化特征（当前价格相对VWAP位置，跨股票可比）
-        df['VWAP_Ratio'] = df['Close'].shift(shift_val) / df['VWAP']
+        batch['VWAP_Ratio'] = batch['Close'].shift(shift_val) / batch['VWAP']
 
         # ========== OBV (能量潮) ==========
-        df['OBV'] = 0.0
-        for i in range(1, len(df)):
-            if df['Close'].iloc[i] > df['Close'].iloc[i-1]:
-                df['OBV'].iloc[i] = df['OBV'].iloc[i-1] + df['Volume'].iloc[i]
-            elif df['Close'].iloc[i] < df['Close'].iloc[i-1]:
-                df['OBV'].iloc[i] = df['OBV'].iloc[i-1] - df['Volume'].iloc[i]
-            else:
-                df['OBV'].iloc[i] = df['OBV'].iloc[i-1]
+        # 收盘价上涨累加成交量、下跌累减成交量、持平不变
+        # （原逐行 df['OBV'].iloc[i] = ... 为链式赋值，pandas 3 写时复制下不生效，OBV 恒为 0）
+        obv_direction = np.sign(batch['Close'].diff()).fillna(0)
+        batch['OBV'] = (obv_direction * batch['Volume']).cumsum()
 
         # ========== CMF (Chaikin Money Flow) ==========
         # 使用滞后High/Low避免数据泄漏
-        df['MF_Multiplier'] = ((df['Close'] - df['Low'].shift(shift_val)) - (df['High'].shift(shift_val) - df['Close'])) / (df['High'].shift(shift_val) - df['Low'].shift(shift_val))
-        df['MF_Volume'] = df['MF_Multiplier'] * df['Volume']
-        df['CMF'] = df['MF_Volume'].rolling(20, min_periods=1).sum() / df['Volume'].rolling(20, min_periods=1).sum()
+        batch['MF_Multiplier'] = ((batch['Close'] - batch['Low'].shift(shift_val)) - (batch['High'].shift(shift_val) - batch['Close'])) / (batch['High'].shift(shift_val) - batch['Low'].shift(shift_val))
+        batch['MF_Volume'] = batch['MF_Multiplier'] * batch['Volume']
+        batch['CMF'] = batch['MF_Volume'].rolling(20, min_periods=1).sum() / batch['Volume'].rolling(20, min_periods=1).sum()
         # CMF 信号线（使用滞后数据避免数据泄漏）
-        df['CMF_Signal'] = df['CMF'].rolling(5, min_periods=1).mean().shift(shift_val)
+        batch['CMF_Signal'] = batch['CMF'].rolling(5, min_periods=1).mean().shift(shift_val)
 
         # ========== ADX (平均趋向指数) ==========
         # +DM and -DM (使用滞后数据避免数据泄漏)
-        up_move = df['High'].diff().shift(shift_val)
-        down_move = -df['Low'].diff().shift(shift_val)
-        df['+DM'] = np.where((up_move > down_move) & (up_move > 0), up_move, 0)
-        df['-DM'] = np.where((down_move > up_move) & (down_move > 0), down_move, 0)
+        up_move = batch['High'].diff().shift(shift_val)
+        down_move = -batch['Low'].diff().shift(shift_val)
+        batch['+DM'] = np.where((up_move > down_move) & (up_move > 0), up_move, 0)
+        batch['-DM'] = np.where((down_move > up_move) & (down_move > 0), down_move, 0)
         # +DI and -DI
-        df['+DI'] = 100 * (df['+DM'].ewm(alpha=1/14, adjust=False).mean() / df['ATR'])
-        df['-DI'] = 100 * (df['-DM'].ewm(alpha=1/14, adjust=False).mean() / df['ATR'])
+        batch['+DI'] = 100 * (batch['+DM'].ewm(alpha=1/14, adjust=False).mean() / batch['ATR'])
+        batch['-DI'] = 100 * (batch['-DM'].ewm(alpha=1/14, adjust=False).mean() / batch['ATR'])
         # ADX
-        dx = 100 * (np.abs(df['+DI'] - df['-DI']) / (df['+DI'] + df['-DI']))
-        df['ADX'] = dx.ewm(alpha=1/14, adjust=False).mean()
+        dx = 100 * (np.abs(batch['+DI'] - batch['-DI']) / (batch['+DI'] + batch['-DI']))
+        batch['ADX'] = dx.ewm(alpha=1/14, adjust=False).mean()
 
         # ========== 随机振荡器 (Stochastic Oscillator) ==========
         K_Period = 14
         D_Period = 3
         # 使用滞后数据避免数据泄漏（昨日的14日高低点）
-        df['Low_Min'] = df['Low'].rolling(window=K_Period, min_periods=1).min().shift(shift_val)
-        df['High_Max'] = df['High'].rolling(window=K_Period, min_periods=1).max().shift(shift_val)
-        df['Stoch_K'] = 100 * (df['Close'] - df['Low_Min']) / (df['High_Max'] - df['Low_Min'])
-        df['Stoch_D'] = df['Stoch_K'].rolling(window=D_Period, min_periods=1).mean().shift(shift_val)
+        batch['Low_Min'] = batch['Low'].rolling(window=K_Period, min_periods=1).min().shift(shift_val)
+        batch['High_Max'] = batch['High'].rolling(window=K_Period, min_periods=1).max().shift(shift_val)
+        batch['Stoch_K'] = 100 * (batch['Close'] - batch['Low_Min']) / (batch['High_Max'] - batch['Low_Min'])
+        batch['Stoch_D'] = batch['Stoch_K'].rolling(window=D_Period, min_periods=1).mean().shift(shift_val)
 
         # ========== Williams %R ==========
-        df['Williams_R'] = (df['High_Max'] - df['Close']) / (df['High_Max'] - df['Low_Min']) * -100
+        batch['Williams_R'] = (batch['High_Max'] - batch['Close']) / (batch['High_Max'] - batch['Low_Min']) * -100
 
         # ========== ROC (价格变化率) ==========
-        df['ROC'] = df['Close'].pct_change(periods=12)
+        batch['ROC'] = batch['Close'].pct_change(periods=12)
 
         # ========== 波动率（年化） ==========
         # 已删除 Returns 和 Volatility：与 Return_1d 和 Volatility_20d 完全相同
@@ -959,59 +1043,59 @@ class FeatureEngineer:
         # ========== 价格位置特征 ==========
         # 已删除 MA5_Deviation 和 MA10_Deviation：与 BIAS6 和 BIAS12 公式相同
         # 价格百分位（相对于60日窗口，使用滞后数据避免数据泄漏）
-        df['Price_Percentile'] = df['Close'].rolling(window=60, min_periods=1).apply(
+        batch['Price_Percentile'] = batch['Close'].rolling(window=60, min_periods=1).apply(
             lambda x: (x.iloc[-1] - x.min()) / (x.max() - x.min()) * 100
         ).shift(shift_val)
         # 价格通道位置（震荡市识别特征，使用滞后数据避免数据泄漏）
         # 保留中间变量用于计算其他特征，但不作为模型特征
-        df['Channel_High_20d'] = df['High'].rolling(window=20, min_periods=1).max().shift(shift_val)
-        df['Channel_Low_20d'] = df['Low'].rolling(window=20, min_periods=1).min().shift(shift_val)
+        batch['Channel_High_20d'] = batch['High'].rolling(window=20, min_periods=1).max().shift(shift_val)
+        batch['Channel_Low_20d'] = batch['Low'].rolling(window=20, min_periods=1).min().shift(shift_val)
         # 标准化特征：价格通道相对位置（跨股票可比）
-        prev_close = df['Close'].shift(shift_val)
-        df['Channel_High_Ratio_20d'] = df['Channel_High_20d'] / prev_close
-        df['Channel_Low_Ratio_20d'] = df['Channel_Low_20d'] / prev_close
-        df['Channel_Width_Ratio_20d'] = (df['Channel_High_20d'] - df['Channel_Low_20d']) / prev_close
+        prev_close = batch['Close'].shift(shift_val)
+        batch['Channel_High_Ratio_20d'] = batch['Channel_High_20d'] / prev_close
+        batch['Channel_Low_Ratio_20d'] = batch['Channel_Low_20d'] / prev_close
+        batch['Channel_Width_Ratio_20d'] = (batch['Channel_High_20d'] - batch['Channel_Low_20d']) / prev_close
         # 价格在通道中的位置（0-1标准化）
-        df['Price_Channel_Position_20d'] = (df['Close'] - df['Channel_Low_20d']) / (df['Channel_High_20d'] - df['Channel_Low_20d'] + 1e-10)
+        batch['Price_Channel_Position_20d'] = (batch['Close'] - batch['Channel_Low_20d']) / (batch['Channel_High_20d'] - batch['Channel_Low_20d'] + 1e-10)
         # 价格在通道中的位置（靠近上轨/下轨/中轨）
-        df['Price_Channel_Zone'] = np.where(
-            df['Price_Channel_Position_20d'] > 0.7, 1,  # 靠近上轨
+        batch['Price_Channel_Zone'] = np.where(
+            batch['Price_Channel_Position_20d'] > 0.7, 1,  # 靠近上轨
             np.where(
-                df['Price_Channel_Position_20d'] < 0.3, -1,  # 靠近下轨
+                batch['Price_Channel_Position_20d'] < 0.3, -1,  # 靠近下轨
                 0  # 中轨
             )
         )
         # 布林带位置（使用滞后数据避免数据泄漏）
-        df['BB_Position'] = (df['Close'] - df['BB_lower'].shift(shift_val)) / (df['BB_upper'].shift(shift_val) - df['BB_lower'].shift(shift_val) + 1e-10)
+        batch['BB_Position'] = (batch['Close'] - batch['BB_lower'].shift(shift_val)) / (batch['BB_upper'].shift(shift_val) - batch['BB_lower'].shift(shift_val) + 1e-10)
 
         # ========== 多周期收益率 ==========
-        df['Return_1d'] = df['Close'].pct_change()
-        df['Return_3d'] = df['Close'].pct_change(3)
-        df['Return_5d'] = df['Close'].pct_change(5)
-        df['Return_10d'] = df['Close'].pct_change(10)
-        df['Return_20d'] = df['Close'].pct_change(20)
-        df['Return_60d'] = df['Close'].pct_change(60)
+        batch['Return_1d'] = batch['Close'].pct_change()
+        batch['Return_3d'] = batch['Close'].pct_change(3)
+        batch['Return_5d'] = batch['Close'].pct_change(5)
+        batch['Return_10d'] = batch['Close'].pct_change(10)
+        batch['Return_20d'] = batch['Close'].pct_change(20)
+        batch['Return_60d'] = batch['Close'].pct_change(60)
 
         # ========== 价格相对于均线的比率（使用滞后Close避免数据泄漏） ==========
-        df['Price_Ratio_MA5'] = df['Close'].shift(shift_val) / df['MA5']
-        df['Price_Ratio_MA20'] = df['Close'].shift(shift_val) / df['MA20']
-        df['Price_Ratio_MA50'] = df['Close'].shift(shift_val) / df['MA50']
+        batch['Price_Ratio_MA5'] = batch['Close'].shift(shift_val) / batch['MA5']
+        batch['Price_Ratio_MA20'] = batch['Close'].shift(shift_val) / batch['MA20']
+        batch['Price_Ratio_MA50'] = batch['Close'].shift(shift_val) / batch['MA50']
 
         # ========== 高优先级：滚动统计特征 ==========
         # 均线偏离度（标准化，使用滞后数据避免数据泄漏）
-        df['MA5_Deviation_Std'] = (df['Close'] - df['MA5']) / df['Close'].rolling(5).std().shift(shift_val)
-        df['MA20_Deviation_Std'] = (df['Close'] - df['MA20']) / df['Close'].rolling(20).std().shift(shift_val)
+        batch['MA5_Deviation_Std'] = (batch['Close'] - batch['MA5']) / batch['Close'].rolling(5).std().shift(shift_val)
+        batch['MA20_Deviation_Std'] = (batch['Close'] - batch['MA20']) / batch['Close'].rolling(20).std().shift(shift_val)
 
         # 滚动波动率（多周期，使用滞后数据避免数据泄漏）
-        df['Volatility_5d'] = df['Close'].pct_change().rolling(5).std().shift(shift_val)
-        df['Volatility_10d'] = df['Close'].pct_change().rolling(10).std().shift(shift_val)
-        df['Volatility_20d'] = df['Close'].pct_change().rolling(20).std().shift(shift_val)
+        batch['Volatility_5d'] = batch['Close'].pct_change().rolling(5).std().shift(shift_val)
+        batch['Volatility_10d'] = batch['Close'].pct_change().rolling(10).std().shift(shift_val)
+        batch['Volatility_20d'] = batch['Close'].pct_change().rolling(20).std().shift(shift_val)
 
         # ========== GARCH 波动率特征（per-stock，2026-04-27 新增）==========
         # GARCH(1,1) 条件波动率，捕捉波动率聚类和持续性
         try:
             garch_model = GARCHVolatilityModel()
-            df = garch_model.calculate_features(df, return_col='Return_1d', use_shift=use_shift)
+            batch.pipe(garch_model.calculate_features, return_col='Return_1d', use_shift=use_shift)
             # 填充开头可能存在的 NaN（shift 导致）
             garch_defaults = {
                 'GARCH_Conditional_Vol': 0.0,
@@ -1020,8 +1104,8 @@ class FeatureEngineer:
                 'GARCH_Persistence': 0.8,
             }
             for col, default_val in garch_defaults.items():
-                if col in df.columns:
-                    df[col] = df[col].fillna(default_val)
+                if col in batch:
+                    batch[col] = batch[col].fillna(default_val)
         except Exception as e:
             logger.warning(f"GARCH 特征计算失败，使用默认值: {e}")
 
@@ -1038,8 +1122,8 @@ class FeatureEngineer:
                 use_lstm=True,  # 启用 LSTM 混合模式
                 cache_dir='data/feature_cache'
             )
-            df = hybrid_model.calculate_features(
-                df,
+            batch.pipe(
+                hybrid_model.calculate_features,
                 return_col='Return_1d',
                 use_shift=use_shift,
                 symbol=code,  # 用于模型缓存
@@ -1053,88 +1137,88 @@ class FeatureEngineer:
                 'Hybrid_Vol_Trend': 0.0,
             }
             for col, default_val in hybrid_defaults.items():
-                if col in df.columns:
-                    df[col] = df[col].fillna(default_val)
+                if col in batch:
+                    batch[col] = batch[col].fillna(default_val)
         except Exception as e:
             logger.warning(f"LSTM-GARCH 混合特征计算失败，使用默认值: {e}")
 
         # 滚动偏度/峰度（业界常用，使用滞后数据避免数据泄漏）
-        df['Skewness_20d'] = df['Close'].pct_change().rolling(20).skew().shift(shift_val)
-        df['Kurtosis_20d'] = df['Close'].pct_change().rolling(20).kurt().shift(shift_val)
+        batch['Skewness_20d'] = batch['Close'].pct_change().rolling(20).skew().shift(shift_val)
+        batch['Kurtosis_20d'] = batch['Close'].pct_change().rolling(20).kurt().shift(shift_val)
 
         # 动量加速度（业界重要特征）
-        df['Momentum_Accel_5d'] = df['Return_5d'] - df['Return_5d'].shift(5)
-        df['Momentum_Accel_10d'] = df['Return_10d'] - df['Return_10d'].shift(5)
+        batch['Momentum_Accel_5d'] = batch['Return_5d'] - batch['Return_5d'].shift(5)
+        batch['Momentum_Accel_10d'] = batch['Return_10d'] - batch['Return_10d'].shift(5)
 
         # ========== 高优先级：价格形态特征 ==========
         # N日高低点位置（0-1之间，1表示在最高点，使用滞后数据避免泄漏）
         # 已删除 High_Position_20d：与 Price_Channel_Position_20d 公式相同
-        df['High_Position_60d'] = (df['Close'] - df['Low'].rolling(60).min().shift(shift_val)) / (df['High'].rolling(60).max().shift(shift_val) - df['Low'].rolling(60).min().shift(shift_val))
+        batch['High_Position_60d'] = (batch['Close'] - batch['Low'].rolling(60).min().shift(shift_val)) / (batch['High'].rolling(60).max().shift(shift_val) - batch['Low'].rolling(60).min().shift(shift_val))
 
         # 距离近期高点/低点的天数（业界常用，使用滞后数据避免数据泄漏）
-        df['Days_Since_High_20d'] = df['Close'].shift(shift_val).rolling(20).apply(lambda x: 20 - np.argmax(x), raw=False)
-        df['Days_Since_Low_20d'] = df['Close'].shift(shift_val).rolling(20).apply(lambda x: 20 - np.argmin(x), raw=False)
+        batch['Days_Since_High_20d'] = batch['Close'].shift(shift_val).rolling(20).apply(lambda x: 20 - np.argmax(x), raw=False)
+        batch['Days_Since_Low_20d'] = batch['Close'].shift(shift_val).rolling(20).apply(lambda x: 20 - np.argmin(x), raw=False)
 
         # 日内特征（业界核心信号，使用滞后High/Low避免数据泄漏）
-        df['Intraday_Range'] = (df['High'].shift(shift_val) - df['Low'].shift(shift_val)) / df['Close']
-        df['Intraday_Range_MA5'] = df['Intraday_Range'].rolling(5).mean().shift(shift_val)
-        df['Intraday_Range_MA20'] = df['Intraday_Range'].rolling(20).mean().shift(shift_val)
+        batch['Intraday_Range'] = (batch['High'].shift(shift_val) - batch['Low'].shift(shift_val)) / batch['Close']
+        batch['Intraday_Range_MA5'] = batch['Intraday_Range'].rolling(5).mean().shift(shift_val)
+        batch['Intraday_Range_MA20'] = batch['Intraday_Range'].rolling(20).mean().shift(shift_val)
 
         # 收盘位置（阳线/阴线强度，0-1之间，使用滞后High/Low避免数据泄漏）
-        df['Close_Position'] = (df['Close'] - df['Low'].shift(shift_val)) / (df['High'].shift(shift_val) - df['Low'].shift(shift_val))
+        batch['Close_Position'] = (batch['Close'] - batch['Low'].shift(shift_val)) / (batch['High'].shift(shift_val) - batch['Low'].shift(shift_val))
         # 上影线/下影线比例（使用滞后High/Low）
-        df['Upper_Shadow'] = (df['High'].shift(shift_val) - df[['Close', 'Open']].max(axis=1)) / (df['High'].shift(shift_val) - df['Low'].shift(shift_val) + 1e-10)
-        df['Lower_Shadow'] = (df[['Close', 'Open']].min(axis=1) - df['Low'].shift(shift_val)) / (df['High'].shift(shift_val) - df['Low'].shift(shift_val) + 1e-10)
+        batch['Upper_Shadow'] = (batch['High'].shift(shift_val) - batch[['Close', 'Open']].max(axis=1)) / (batch['High'].shift(shift_val) - batch['Low'].shift(shift_val) + 1e-10)
+        batch['Lower_Shadow'] = (batch[['Close', 'Open']].min(axis=1) - batch['Low'].shift(shift_val)) / (batch['High'].shift(shift_val) - batch['Low'].shift(shift_val) + 1e-10)
 
         # 开盘缺口
-        df['Gap_Size'] = (df['Open'] - df['Close'].shift(shift_val)) / df['Close'].shift(shift_val)
-        df['Gap_Up'] = (df['Gap_Size'] > 0.01).astype(int)  # 跳空高开 >1%
-        df['Gap_Down'] = (df['Gap_Size'] < -0.01).astype(int)  # 跳空低开 >1%
+        batch['Gap_Size'] = (batch['Open'] - batch['Close'].shift(shift_val)) / batch['Close'].shift(shift_val)
+        batch['Gap_Up'] = (batch['Gap_Size'] > 0.01).astype(int)  # 跳空高开 >1%
+        batch['Gap_Down'] = (batch['Gap_Size'] < -0.01).astype(int)  # 跳空低开 >1%
 
         # ========== 业界推荐：隔夜与日内特征（研究显示预测有效） ==========
         # 隔夜收益（收盘到次日开盘的收益，使用滞后数据避免泄漏）
-        df['Overnight_Return'] = (df['Open'].shift(shift_val) - df['Close'].shift(shift_val + 1)) / df['Close'].shift(shift_val + 1)
+        batch['Overnight_Return'] = (batch['Open'].shift(shift_val) - batch['Close'].shift(shift_val + 1)) / batch['Close'].shift(shift_val + 1)
         # 日内收益（开盘到收盘的收益，使用滞后数据）
-        df['Intraday_Return'] = (df['Close'].shift(shift_val) - df['Open'].shift(shift_val)) / df['Open'].shift(shift_val)
+        batch['Intraday_Return'] = (batch['Close'].shift(shift_val) - batch['Open'].shift(shift_val)) / batch['Open'].shift(shift_val)
         # 隔夜/日内收益比率（衡量隔夜信息消化程度）
-        df['Overnight_Intraday_Ratio'] = df['Overnight_Return'] / (df['Intraday_Return'].abs() + 1e-10)
+        batch['Overnight_Intraday_Ratio'] = batch['Overnight_Return'] / (batch['Intraday_Return'].abs() + 1e-10)
 
         # 开盘收盘关系（研究显示：收高于开表示买方力量强）
-        df['Open_Close_Ratio'] = df['Close'].shift(shift_val) / df['Open'].shift(shift_val)
+        batch['Open_Close_Ratio'] = batch['Close'].shift(shift_val) / batch['Open'].shift(shift_val)
         # 连续阳线/阴线天数（使用滞后数据）
-        df['Consecutive_Up_Days'] = df['Return_1d'].shift(shift_val).gt(0).astype(int).groupby(df['Return_1d'].shift(shift_val).le(0).cumsum()).cumsum()
-        df['Consecutive_Down_Days'] = df['Return_1d'].shift(shift_val).lt(0).astype(int).groupby(df['Return_1d'].shift(shift_val).ge(0).cumsum()).cumsum()
+        batch['Consecutive_Up_Days'] = batch['Return_1d'].shift(shift_val).gt(0).astype(int).groupby(batch['Return_1d'].shift(shift_val).le(0).cumsum()).cumsum()
+        batch['Consecutive_Down_Days'] = batch['Return_1d'].shift(shift_val).lt(0).astype(int).groupby(batch['Return_1d'].shift(shift_val).ge(0).cumsum()).cumsum()
 
         # 日内波动率与隔夜波动率对比（使用滞后数据）
-        df['Intraday_Vol_5d'] = df['Intraday_Return'].rolling(5).std().shift(shift_val)
-        df['Overnight_Vol_5d'] = df['Overnight_Return'].rolling(5).std().shift(shift_val)
+        batch['Intraday_Vol_5d'] = batch['Intraday_Return'].rolling(5).std().shift(shift_val)
+        batch['Overnight_Vol_5d'] = batch['Overnight_Return'].rolling(5).std().shift(shift_val)
 
         # ========== 中优先级：量价关系特征 ==========
         # 量价背离（业界重要信号）
-        df['Price_Up_Volume_Down'] = ((df['Return_1d'] > 0) & (df['Turnover'].pct_change() < 0)).astype(int)
-        df['Price_Down_Volume_Up'] = ((df['Return_1d'] < 0) & (df['Turnover'].pct_change() > 0)).astype(int)
+        batch['Price_Up_Volume_Down'] = ((batch['Return_1d'] > 0) & (batch['Turnover'].pct_change() < 0)).astype(int)
+        batch['Price_Down_Volume_Up'] = ((batch['Return_1d'] < 0) & (batch['Turnover'].pct_change() > 0)).astype(int)
 
         # OBV 趋势（使用滞后数据避免数据泄漏）
-        df['OBV_MA5'] = df['OBV'].rolling(5).mean().shift(shift_val)
-        df['OBV_Trend'] = (df['OBV'] > df['OBV_MA5']).astype(int)
+        batch['OBV_MA5'] = batch['OBV'].rolling(5).mean().shift(shift_val)
+        batch['OBV_Trend'] = (batch['OBV'] > batch['OBV_MA5']).astype(int)
         # OBV 变化率标准化特征（跨股票可比）
-        df['OBV_Change_5d'] = df['OBV'].pct_change(5).shift(shift_val)
+        batch['OBV_Change_5d'] = batch['OBV'].pct_change(5).shift(shift_val)
 
         # 成交量波动率（使用滞后数据避免数据泄漏）
-        df['Volume_Volatility'] = df['Turnover'].shift(shift_val).rolling(20).std() / (df['Turnover'].shift(shift_val).rolling(20).mean() + 1e-10)
+        batch['Volume_Volatility'] = batch['Turnover'].shift(shift_val).rolling(20).std() / (batch['Turnover'].shift(shift_val).rolling(20).mean() + 1e-10)
 
         # 成交量比率（多周期）
-        df['Volume_Ratio_5d'] = df['Volume'] / df['Volume'].rolling(5).mean()
-        df['Volume_Ratio_20d'] = df['Volume'] / df['Volume'].rolling(20).mean()
+        batch['Volume_Ratio_5d'] = batch['Volume'] / batch['Volume'].rolling(5).mean()
+        batch['Volume_Ratio_20d'] = batch['Volume'] / batch['Volume'].rolling(20).mean()
 
         # ========== 长期趋势特征（专门优化一个月模型） ==========
         # 长期均线（120日半年线、250日年线，使用滞后数据避免数据泄漏）
-        df['MA120'] = df['Close'].rolling(window=120, min_periods=1).mean().shift(shift_val)
-        df['MA250'] = df['Close'].rolling(window=250, min_periods=1).mean().shift(shift_val)
+        batch['MA120'] = batch['Close'].rolling(window=120, min_periods=1).mean().shift(shift_val)
+        batch['MA250'] = batch['Close'].rolling(window=250, min_periods=1).mean().shift(shift_val)
         # 标准化特征：均线相对位置（跨股票可比）
-        prev_close = df['Close'].shift(shift_val)
-        df['MA_Ratio_120d'] = df['MA120'] / prev_close
-        df['MA_Ratio_250d'] = df['MA250'] / prev_close
+        prev_close = batch['Close'].shift(shift_val)
+        batch['MA_Ratio_120d'] = batch['MA120'] / prev_close
+        batch['MA_Ratio_250d'] = batch['MA250'] / prev_close
 
         # ========== 新增指标：趋势斜率 ==========
         # 计算趋势斜率（线性回归斜率）
@@ -1150,163 +1234,173 @@ class FeatureEngineer:
             except:
                 return 0.0
 
-        df['Trend_Slope_5d'] = df['Close'].rolling(window=5, min_periods=2).apply(calc_trend_slope, raw=True)
-        df['Trend_Slope_20d'] = df['Close'].rolling(window=20, min_periods=2).apply(calc_trend_slope, raw=True)
-        df['Trend_Slope_60d'] = df['Close'].rolling(window=60, min_periods=2).apply(calc_trend_slope, raw=True)
+        batch['Trend_Slope_5d'] = batch['Close'].rolling(window=5, min_periods=2).apply(calc_trend_slope, raw=True)
+        batch['Trend_Slope_20d'] = batch['Close'].rolling(window=20, min_periods=2).apply(calc_trend_slope, raw=True)
+        batch['Trend_Slope_60d'] = batch['Close'].rolling(window=60, min_periods=2).apply(calc_trend_slope, raw=True)
 
         # ========== 新增指标：乖离率 ==========
         # 计算乖离率
-        df['BIAS6'] = ((df['Close'] - df['MA5']) / (df['MA5'] + 1e-10)) * 100
-        df['BIAS12'] = ((df['Close'] - df['MA10']) / (df['MA10'] + 1e-10)) * 100
-        df['BIAS24'] = ((df['Close'] - df['MA20']) / (df['MA20'] + 1e-10)) * 100
+        batch['BIAS6'] = ((batch['Close'] - batch['MA5']) / (batch['MA5'] + 1e-10)) * 100
+        batch['BIAS12'] = ((batch['Close'] - batch['MA10']) / (batch['MA10'] + 1e-10)) * 100
+        batch['BIAS24'] = ((batch['Close'] - batch['MA20']) / (batch['MA20'] + 1e-10)) * 100
 
         # ========== 新增指标：均线排列 ==========
         # 判断均线排列
-        df['MA_Alignment_Bullish_20_50'] = (df['MA20'] > df['MA50']) & (df['MA50'] > df['MA200'])
-        df['MA_Alignment_Bearish_20_50'] = (df['MA20'] < df['MA50']) & (df['MA50'] < df['MA200'])
+        batch['MA_Alignment_Bullish_20_50'] = (batch['MA20'] > batch['MA50']) & (batch['MA50'] > batch['MA200'])
+        batch['MA_Alignment_Bearish_20_50'] = (batch['MA20'] < batch['MA50']) & (batch['MA50'] < batch['MA200'])
 
         # 均线排列强度（多头排列的数量减去空头排列的数量）
-        df['MA_Alignment_Strength'] = (
-            (df['MA20'] > df['MA50']).astype(int) +
-            (df['MA50'] > df['MA200']).astype(int) -
-            (df['MA20'] < df['MA50']).astype(int) -
-            (df['MA50'] < df['MA200']).astype(int)
+        batch['MA_Alignment_Strength'] = (
+            (batch['MA20'] > batch['MA50']).astype(int) +
+            (batch['MA50'] > batch['MA200']).astype(int) -
+            (batch['MA20'] < batch['MA50']).astype(int) -
+            (batch['MA50'] < batch['MA200']).astype(int)
         )
 
         # ========== 新增指标：日内振幅（更精确的计算） ==========
         # 计算日内振幅（相对于开盘价，使用滞后数据避免数据泄漏）
-        df['Intraday_Amplitude'] = ((df['High'].shift(shift_val) - df['Low'].shift(shift_val)) / (df['Open'] + 1e-10)) * 100
+        batch['Intraday_Amplitude'] = ((batch['High'].shift(shift_val) - batch['Low'].shift(shift_val)) / (batch['Open'] + 1e-10)) * 100
 
         # ========== 新增指标：多周期波动率 ==========
         # 补充10日和60日波动率（使用滞后数据避免数据泄漏）
-        df['Volatility_10d'] = df['Close'].pct_change().rolling(10).std().shift(shift_val)
-        df['Volatility_60d'] = df['Close'].pct_change().rolling(60).std().shift(shift_val)
+        batch['Volatility_10d'] = batch['Close'].pct_change().rolling(10).std().shift(shift_val)
+        batch['Volatility_60d'] = batch['Close'].pct_change().rolling(60).std().shift(shift_val)
 
         # ========== 新增指标：多周期偏度和峰度 ==========
         # 补充多周期偏度和峰度
-        df['Skewness_5d'] = df['Close'].pct_change().rolling(5).skew()
-        df['Skewness_10d'] = df['Close'].pct_change().rolling(10).skew()
-        df['Kurtosis_5d'] = df['Close'].pct_change().rolling(5).kurt()
-        df['Kurtosis_10d'] = df['Close'].pct_change().rolling(10).kurt()
+        batch['Skewness_5d'] = batch['Close'].pct_change().rolling(5).skew()
+        batch['Skewness_10d'] = batch['Close'].pct_change().rolling(10).skew()
+        batch['Kurtosis_5d'] = batch['Close'].pct_change().rolling(5).kurt()
+        batch['Kurtosis_10d'] = batch['Close'].pct_change().rolling(10).kurt()
 
         # 价格相对长期均线的比率（业界长期趋势指标，使用滞后数据避免数据泄漏）
-        df['Price_Ratio_MA120'] = df['Close'].shift(shift_val) / df['MA120']
-        df['Price_Ratio_MA250'] = df['Close'].shift(shift_val) / df['MA250']
+        batch['Price_Ratio_MA120'] = batch['Close'].shift(shift_val) / batch['MA120']
+        batch['Price_Ratio_MA250'] = batch['Close'].shift(shift_val) / batch['MA250']
 
         # 长期收益率（业界核心长期特征）
-        df['Return_120d'] = df['Close'].pct_change(120)
-        df['Return_250d'] = df['Close'].pct_change(250)
+        batch['Return_120d'] = batch['Close'].pct_change(120)
+        batch['Return_250d'] = batch['Close'].pct_change(250)
 
         # 长期动量（已删除 Momentum_120d 和 Momentum_250d：与 Return_120d 和 Return_250d 公式相同）
 
         # 长期动量加速度（趋势变化的二阶导数）
-        df['Momentum_Accel_120d'] = df['Return_120d'] - df['Return_120d'].shift(30)
+        batch['Momentum_Accel_120d'] = batch['Return_120d'] - batch['Return_120d'].shift(30)
 
         # 长期均线斜率（趋势强度指标）
-        df['MA120_Slope'] = (df['MA120'] - df['MA120'].shift(10)) / df['MA120'].shift(10)
-        df['MA250_Slope'] = (df['MA250'] - df['MA250'].shift(20)) / df['MA250'].shift(20)
+        batch['MA120_Slope'] = (batch['MA120'] - batch['MA120'].shift(10)) / batch['MA120'].shift(10)
+        batch['MA250_Slope'] = (batch['MA250'] - batch['MA250'].shift(20)) / batch['MA250'].shift(20)
 
         # 长期均线排列（多头/空头/混乱）
-        df['MA_Alignment_Long'] = np.where(
-            (df['MA50'] > df['MA120']) & (df['MA120'] > df['MA250']), 1,  # 多头排列
+        batch['MA_Alignment_Long'] = np.where(
+            (batch['MA50'] > batch['MA120']) & (batch['MA120'] > batch['MA250']), 1,  # 多头排列
             np.where(
-                (df['MA50'] < df['MA120']) & (df['MA120'] < df['MA250']), -1,  # 空头排列
+                (batch['MA50'] < batch['MA120']) & (batch['MA120'] < batch['MA250']), -1,  # 空头排列
                 0  # 混乱排列
             )
         )
 
         # 长期均线乖离率（价格偏离长期均线的程度）
-        df['MA120_Deviation'] = (df['Close'] - df['MA120']) / df['MA120'] * 100
-        df['MA250_Deviation'] = (df['Close'] - df['MA250']) / df['MA250'] * 100
+        batch['MA120_Deviation'] = (batch['Close'] - batch['MA120']) / batch['MA120'] * 100
+        batch['MA250_Deviation'] = (batch['Close'] - batch['MA250']) / batch['MA250'] * 100
 
         # 长期波动率（风险指标，使用滞后数据避免数据泄漏）
-        df['Volatility_60d'] = df['Close'].pct_change().rolling(60).std().shift(shift_val)
-        df['Volatility_120d'] = df['Close'].pct_change().rolling(120).std().shift(shift_val)
+        batch['Volatility_60d'] = batch['Close'].pct_change().rolling(60).std().shift(shift_val)
+        batch['Volatility_120d'] = batch['Close'].pct_change().rolling(120).std().shift(shift_val)
 
         # 长期ATR（长期风险，使用滞后数据避免数据泄漏）
-        df['ATR_MA60'] = df['ATR'].rolling(60, min_periods=1).mean().shift(shift_val)
-        df['ATR_MA120'] = df['ATR'].rolling(120, min_periods=1).mean().shift(shift_val)
-        df['ATR_Ratio_60d'] = df['ATR'] / df['ATR_MA60']
-        df['ATR_Ratio_120d'] = df['ATR'] / df['ATR_MA120']
+        batch['ATR_MA60'] = batch['ATR'].rolling(60, min_periods=1).mean().shift(shift_val)
+        batch['ATR_MA120'] = batch['ATR'].rolling(120, min_periods=1).mean().shift(shift_val)
+        batch['ATR_Ratio_60d'] = batch['ATR'] / batch['ATR_MA60']
+        batch['ATR_Ratio_120d'] = batch['ATR'] / batch['ATR_MA120']
 
         # 长期成交量趋势（使用滞后数据避免数据泄漏）
-        df['Volume_MA120'] = df['Volume'].rolling(120, min_periods=1).mean().shift(shift_val)
-        df['Volume_MA250'] = df['Volume'].rolling(250, min_periods=1).mean().shift(shift_val)
-        df['Volume_Ratio_120d'] = df['Volume'] / df['Volume_MA120']
-        df['Volume_Trend_Long'] = np.where(
-            df['Volume_MA120'] > df['Volume_MA250'], 1, -1
+        batch['Volume_MA120'] = batch['Volume'].rolling(120, min_periods=1).mean().shift(shift_val)
+        batch['Volume_MA250'] = batch['Volume'].rolling(250, min_periods=1).mean().shift(shift_val)
+        batch['Volume_Ratio_120d'] = batch['Volume'] / batch['Volume_MA120']
+        batch['Volume_Trend_Long'] = np.where(
+            batch['Volume_MA120'] > batch['Volume_MA250'], 1, -1
         )
 
         # 长期支撑阻力位（基于120日高低点，使用滞后数据避免数据泄漏）
         # 保留中间变量用于计算盈亏比，但不作为模型特征
-        df['Support_120d'] = df['Low'].rolling(120, min_periods=1).min().shift(shift_val)
-        df['Resistance_120d'] = df['High'].rolling(120, min_periods=1).max().shift(shift_val)
+        batch['Support_120d'] = batch['Low'].rolling(120, min_periods=1).min().shift(shift_val)
+        batch['Resistance_120d'] = batch['High'].rolling(120, min_periods=1).max().shift(shift_val)
         # 标准化特征：支撑阻力相对位置（跨股票可比）
-        prev_close = df['Close'].shift(shift_val)
-        df['Support_Ratio_120d'] = df['Support_120d'] / prev_close
-        df['Resistance_Ratio_120d'] = df['Resistance_120d'] / prev_close
-        df['Distance_Support_120d'] = (df['Close'] - df['Support_120d']) / df['Close']
-        df['Distance_Resistance_120d'] = (df['Resistance_120d'] - df['Close']) / df['Close']
+        prev_close = batch['Close'].shift(shift_val)
+        batch['Support_Ratio_120d'] = batch['Support_120d'] / prev_close
+        batch['Resistance_Ratio_120d'] = batch['Resistance_120d'] / prev_close
+        batch['Distance_Support_120d'] = (batch['Close'] - batch['Support_120d']) / batch['Close']
+        batch['Distance_Resistance_120d'] = (batch['Resistance_120d'] - batch['Close']) / batch['Close']
+
+        # 短期支撑阻力位（20日局部极值聚类）和筹码分布（60日成交量分价），逐日一次性计算
+        # 基于滞后K线计算；只保留相对距离和比例特征（绝对价位跨股票不可比）
+        lagged_bars = batch[['High', 'Low', 'Close', 'Volume']].shift(shift_val)
+        levels = calculate_rolling_support_resistance(lagged_bars, lookback=20)
+        chips = calculate_rolling_chip_distribution(lagged_bars, window=60)
+        batch['Support_Distance_Pct'] = levels['Support_Distance_Pct']
+        batch['Resistance_Distance_Pct'] = levels['Resistance_Distance_Pct']
+        batch['Chip_Concentration'] = chips['Chip_Concentration']
+        batch['Chip_Resistance_Ratio'] = chips['Chip_Resistance_Ratio']
 
         # 长期RSI（基于120日）
-        df['RSI_120'] = self.tech_analyzer.calculate_rsi(df.copy(), period=120)['RSI']
+        batch['RSI_120'] = self.tech_analyzer.calculate_rsi(batch[['Close']].copy(), period=120)['RSI']
 
         # ========== 自适应成交量确认过滤器（实验性方案）==========
         # 7日成交量均值（业界常用周期，使用滞后数据避免数据泄漏）
-        df['Volume_MA7'] = df['Volume'].rolling(window=7, min_periods=1).mean().shift(shift_val)
+        batch['Volume_MA7'] = batch['Volume'].rolling(window=7, min_periods=1).mean().shift(shift_val)
         # 成交量比率（当前成交量/7日均量）
-        df['Volume_Ratio_7d'] = df['Volume'] / df['Volume_MA7']
+        batch['Volume_Ratio_7d'] = batch['Volume'] / batch['Volume_MA7']
         
         # 市场环境识别（基于ADX）
-        market_regime = self.detect_market_regime(df)
+        market_regime = self.detect_market_regime(batch)
         
         # 根据市场环境动态调整阈值
         if market_regime == 'ranging':
             # 震荡市：放宽过滤（1.2倍 → 1.0倍）
             volume_threshold = 1.0
-            df['Market_Regime'] = 2  # 标记为震荡市
+            batch['Market_Regime'] = 2  # 标记为震荡市
         elif market_regime == 'trending':
             # 趋势市：严格过滤（1.2倍 → 1.4倍）
             volume_threshold = 1.4
-            df['Market_Regime'] = 1  # 标记为趋势市
+            batch['Market_Regime'] = 1  # 标记为趋势市
         else:
             # 正常市：标准过滤
             volume_threshold = 1.2
-            df['Market_Regime'] = 0  # 标记为正常市
+            batch['Market_Regime'] = 0  # 标记为正常市
         
         # 成交量确认信号：根据市场环境动态调整阈值
-        df['Volume_Confirmation'] = (df['Volume_Ratio_7d'] >= volume_threshold).astype(int)
+        batch['Volume_Confirmation'] = (batch['Volume_Ratio_7d'] >= volume_threshold).astype(int)
         # 成交量确认强度（0-1标准化）
-        df['Volume_Confirmation_Strength'] = np.minimum(df['Volume_Ratio_7d'] / 2.0, 1.0)
+        batch['Volume_Confirmation_Strength'] = np.minimum(batch['Volume_Ratio_7d'] / 2.0, 1.0)
 
         # ========== 新增特征：假突破检测（符合Bookmap 3点检查清单）==========
         # 1. 价格突破但成交量萎缩检测
-        df['Price_Breakout'] = (df['Close'] > df['BB_upper'].shift(shift_val)).astype(int)
-        df['False_Breakout_Volume'] = (
-            (df['Price_Breakout'] == 1) & (df['Volume_Ratio_7d'] < 0.8)
+        batch['Price_Breakout'] = (batch['Close'] > batch['BB_upper'].shift(shift_val)).astype(int)
+        batch['False_Breakout_Volume'] = (
+            (batch['Price_Breakout'] == 1) & (batch['Volume_Ratio_7d'] < 0.8)
         ).astype(int)
 
         # 2. MACD顶背离检测（价格新高但MACD未新高）
-        df['Price_Higher_High'] = (df['Close'] > df['Close'].rolling(5, min_periods=1).max().shift(shift_val)).astype(int)
-        df['MACD_Higher_High'] = (df['MACD_Hist'] > df['MACD_Hist'].rolling(5, min_periods=1).max().shift(shift_val)).astype(int)
-        df['MACD_Top_Divergence'] = (
-            (df['Price_Higher_High'] == 1) & (df['MACD_Higher_High'] == 0) &
-            (df['MACD_Hist'] > 0)  # 只在MACD正值区域检测顶背离
+        batch['Price_Higher_High'] = (batch['Close'] > batch['Close'].rolling(5, min_periods=1).max().shift(shift_val)).astype(int)
+        batch['MACD_Higher_High'] = (batch['MACD_Hist'] > batch['MACD_Hist'].rolling(5, min_periods=1).max().shift(shift_val)).astype(int)
+        batch['MACD_Top_Divergence'] = (
+            (batch['Price_Higher_High'] == 1) & (batch['MACD_Higher_High'] == 0) &
+            (batch['MACD_Hist'] > 0)  # 只在MACD正值区域检测顶背离
         ).astype(int)
 
         # 3. RSI背离检测（价格新高但RSI未新高，或价格新低但RSI未新低）
-        df['RSI_Higher_High'] = (df['RSI'] > df['RSI'].rolling(5, min_periods=1).max().shift(shift_val)).astype(int)
-        df['RSI_Lower_Low'] = (df['RSI'] < df['RSI'].rolling(5, min_periods=1).min().shift(shift_val)).astype(int)
-        df['Price_Lower_Low'] = (df['Close'] < df['Close'].rolling(5, min_periods=1).min().shift(shift_val)).astype(int)
+        batch['RSI_Higher_High'] = (batch['RSI'] > batch['RSI'].rolling(5, min_periods=1).max().shift(shift_val)).astype(int)
+        batch['RSI_Lower_Low'] = (batch['RSI'] < batch['RSI'].rolling(5, min_periods=1).min().shift(shift_val)).astype(int)
+        batch['Price_Lower_Low'] = (batch['Close'] < batch['Close'].rolling(5, min_periods=1).min().shift(shift_val)).astype(int)
 
-        df['RSI_Top_Divergence'] = (
-            (df['Price_Higher_High'] == 1) & (df['RSI_Higher_High'] == 0) &
-            (df['RSI'] > 50)  # 只在RSI>50时检测顶背离
+        batch['RSI_Top_Divergence'] = (
+            (batch['Price_Higher_High'] == 1) & (batch['RSI_Higher_High'] == 0) &
+            (batch['RSI'] > 50)  # 只在RSI>50时检测顶背离
         ).astype(int)
 
-        df['RSI_Bottom_Divergence'] = (
-            (df['Price_Lower_Low'] == 1) & (df['RSI_Lower_Low'] == 0) &
-            (df['RSI'] < 50)  # 只在RSI<50时检测底背离
+        batch['RSI_Bottom_Divergence'] = (
+            (batch['Price_Lower_Low'] == 1) & (batch['RSI_Lower_Low'] == 0) &
+            (batch['RSI'] < 50)  # 只在RSI<50时检测底背离
         ).astype(int)
 
         # 自适应假突破检测（根据市场环境动态调整阈值）
@@ -1318,199 +1412,199 @@ class FeatureEngineer:
             breakout_threshold = 2
         
         # 综合假突破信号（3点检查清单满足阈值即触发）
-        df['False_Breakout_Signal'] = (
-            (df['False_Breakout_Volume'] + df['MACD_Top_Divergence'] + df['RSI_Top_Divergence']) >= breakout_threshold
+        batch['False_Breakout_Signal'] = (
+            (batch['False_Breakout_Volume'] + batch['MACD_Top_Divergence'] + batch['RSI_Top_Divergence']) >= breakout_threshold
         ).astype(int)
 
         # ========== 新增特征：增强的MA排列（符合掘金量化多周期共振标准）==========
         # 三周期均线排列（5/20/60日MA，与业界标准一致）
-        df['MA5'] = df['Close'].rolling(window=5, min_periods=1).mean().shift(shift_val)
-        df['MA60'] = df['Close'].rolling(window=60, min_periods=1).mean().shift(shift_val)
+        batch['MA5'] = batch['Close'].rolling(window=5, min_periods=1).mean().shift(shift_val)
+        batch['MA60'] = batch['Close'].rolling(window=60, min_periods=1).mean().shift(shift_val)
         # 标准化特征：均线相对位置（跨股票可比）
-        prev_close = df['Close'].shift(shift_val)
-        df['MA_Ratio_5d'] = df['MA5'] / prev_close
-        df['MA_Ratio_60d'] = df['MA60'] / prev_close
+        prev_close = batch['Close'].shift(shift_val)
+        batch['MA_Ratio_5d'] = batch['MA5'] / prev_close
+        batch['MA_Ratio_60d'] = batch['MA60'] / prev_close
 
         # 三周期多头排列（5>20>60）
-        df['MA_Alignment_Bullish_5_20_60'] = (
-            (df['MA5'] > df['MA20']) & (df['MA20'] > df['MA60'])
+        batch['MA_Alignment_Bullish_5_20_60'] = (
+            (batch['MA5'] > batch['MA20']) & (batch['MA20'] > batch['MA60'])
         ).astype(int)
 
         # 三周期空头排列（5<20<60）
-        df['MA_Alignment_Bearish_5_20_60'] = (
-            (df['MA5'] < df['MA20']) & (df['MA20'] < df['MA60'])
+        batch['MA_Alignment_Bearish_5_20_60'] = (
+            (batch['MA5'] < batch['MA20']) & (batch['MA20'] < batch['MA60'])
         ).astype(int)
 
         # 多周期共振得分（已删除 MA_Bullish_Resonance：与 MA_Trend_Consistency 完全相同）
 
         # 趋势一致性得分（-3到3分，多头排列减去空头排列）
-        df['MA_Trend_Consistency'] = (
-            (df['MA5'] > df['MA20']).astype(int) -
-            (df['MA5'] < df['MA20']).astype(int) +
-            (df['MA20'] > df['MA50']).astype(int) -
-            (df['MA20'] < df['MA50']).astype(int) +
-            (df['MA50'] > df['MA200']).astype(int) -
-            (df['MA50'] < df['MA200']).astype(int)
+        batch['MA_Trend_Consistency'] = (
+            (batch['MA5'] > batch['MA20']).astype(int) -
+            (batch['MA5'] < batch['MA20']).astype(int) +
+            (batch['MA20'] > batch['MA50']).astype(int) -
+            (batch['MA20'] < batch['MA50']).astype(int) +
+            (batch['MA50'] > batch['MA200']).astype(int) -
+            (batch['MA50'] < batch['MA200']).astype(int)
         )
 
         # ========== 新增特征：市场环境自适应过滤（符合QuantInsti HMM标准）==========
         # 多维度市场状态识别（ADX + 波动率双因子）
         # 计算波动率分位数（基于60日滚动窗口，使用滞后数据避免数据泄漏）
-        df['Volatility_60d'] = df['Close'].pct_change().rolling(60).std().shift(shift_val) * np.sqrt(252)
-        df['Volatility_30pct'] = df['Volatility_60d'].rolling(120, min_periods=60).quantile(0.3).shift(shift_val)
-        df['Volatility_70pct'] = df['Volatility_60d'].rolling(120, min_periods=60).quantile(0.7).shift(shift_val)
+        batch['Volatility_60d'] = batch['Close'].pct_change().rolling(60).std().shift(shift_val) * np.sqrt(252)
+        batch['Volatility_30pct'] = batch['Volatility_60d'].rolling(120, min_periods=60).quantile(0.3).shift(shift_val)
+        batch['Volatility_70pct'] = batch['Volatility_60d'].rolling(120, min_periods=60).quantile(0.7).shift(shift_val)
 
         # 市场状态分类（ADX + 波动率）
-        df['Market_Regime'] = np.where(
-            (df['ADX'] < 20) & (df['Volatility_60d'] < df['Volatility_30pct']), 'ranging',
+        batch['Market_Regime'] = np.where(
+            (batch['ADX'] < 20) & (batch['Volatility_60d'] < batch['Volatility_30pct']), 'ranging',
             np.where(
-                (df['ADX'] > 30) & (df['Volatility_60d'] > df['Volatility_70pct']), 'trending',
+                (batch['ADX'] > 30) & (batch['Volatility_60d'] > batch['Volatility_70pct']), 'trending',
                 'normal'
             )
         )
 
         # 动态成交量阈值（根据市场状态调整）
-        df['Volume_Threshold_Adaptive'] = np.where(
-            df['Market_Regime'] == 'ranging', 1.0,      # 震荡市放宽至1.0倍
+        batch['Volume_Threshold_Adaptive'] = np.where(
+            batch['Market_Regime'] == 'ranging', 1.0,      # 震荡市放宽至1.0倍
             np.where(
-                df['Market_Regime'] == 'trending', 1.1,  # 趋势市略放宽至1.1倍（趋势已确认）
+                batch['Market_Regime'] == 'trending', 1.1,  # 趋势市略放宽至1.1倍（趋势已确认）
                 1.2                                      # 正常市标准1.2倍
             )
         )
 
         # 自适应成交量确认信号
-        df['Volume_Confirmation_Adaptive'] = (
-            df['Volume_Ratio_7d'] >= df['Volume_Threshold_Adaptive']
+        batch['Volume_Confirmation_Adaptive'] = (
+            batch['Volume_Ratio_7d'] >= batch['Volume_Threshold_Adaptive']
         ).astype(int)
 
         # 自适应成交量确认强度（0-1标准化，考虑市场状态）
-        df['Volume_Confirmation_Strength_Adaptive'] = np.where(
-            df['Market_Regime'] == 'ranging',
-            np.minimum(df['Volume_Ratio_7d'] / 1.5, 1.0),   # 震荡市更容易达到满强度
+        batch['Volume_Confirmation_Strength_Adaptive'] = np.where(
+            batch['Market_Regime'] == 'ranging',
+            np.minimum(batch['Volume_Ratio_7d'] / 1.5, 1.0),   # 震荡市更容易达到满强度
             np.where(
-                df['Market_Regime'] == 'trending',
-                np.minimum(df['Volume_Ratio_7d'] / 1.8, 1.0),  # 趋势市标准
-                np.minimum(df['Volume_Ratio_7d'] / 2.0, 1.0)   # 正常市严格标准
+                batch['Market_Regime'] == 'trending',
+                np.minimum(batch['Volume_Ratio_7d'] / 1.8, 1.0),  # 趋势市标准
+                np.minimum(batch['Volume_Ratio_7d'] / 2.0, 1.0)   # 正常市严格标准
             )
         )
 
         # 自适应假突破检测（震荡市放宽假突破检测）
-        df['False_Breakout_Signal_Adaptive'] = np.where(
-            df['Market_Regime'] == 'ranging',
+        batch['False_Breakout_Signal_Adaptive'] = np.where(
+            batch['Market_Regime'] == 'ranging',
             # 震荡市：更宽松的假突破检测（3点中满足1点即触发）
-            (df['False_Breakout_Volume'] + df['MACD_Top_Divergence'] + df['RSI_Top_Divergence']) >= 1,
+            (batch['False_Breakout_Volume'] + batch['MACD_Top_Divergence'] + batch['RSI_Top_Divergence']) >= 1,
             np.where(
-                df['Market_Regime'] == 'trending',
+                batch['Market_Regime'] == 'trending',
                 # 趋势市：更严格的假突破检测（3点中满足2点才触发，但减少假信号）
-                (df['False_Breakout_Volume'] + df['MACD_Top_Divergence'] + df['RSI_Top_Divergence']) >= 2,
+                (batch['False_Breakout_Volume'] + batch['MACD_Top_Divergence'] + batch['RSI_Top_Divergence']) >= 2,
                 # 正常市：标准假突破检测
-                (df['False_Breakout_Volume'] + df['MACD_Top_Divergence'] + df['RSI_Top_Divergence']) >= 2
+                (batch['False_Breakout_Volume'] + batch['MACD_Top_Divergence'] + batch['RSI_Top_Divergence']) >= 2
             )
         ).astype(int)
 
         # 动态置信度阈值乘数（用于后续模型预测）
-        df['Confidence_Threshold_Multiplier'] = np.where(
-            df['Market_Regime'] == 'ranging', 1.09,   # 震荡市提高阈值（更严格）
+        batch['Confidence_Threshold_Multiplier'] = np.where(
+            batch['Market_Regime'] == 'ranging', 1.09,   # 震荡市提高阈值（更严格）
             np.where(
-                df['Market_Regime'] == 'trending', 0.91,  # 趋势市降低阈值（更宽松）
+                batch['Market_Regime'] == 'trending', 0.91,  # 趋势市降低阈值（更宽松）
                 1.0                                       # 正常市标准
             )
         )
 
         # 市场状态编码（数值型，用于机器学习）
-        df['Market_Regime_Encoded'] = np.where(
-            df['Market_Regime'] == 'ranging', 0,
-            np.where(df['Market_Regime'] == 'normal', 1, 2)
+        batch['Market_Regime_Encoded'] = np.where(
+            batch['Market_Regime'] == 'ranging', 0,
+            np.where(batch['Market_Regime'] == 'normal', 1, 2)
         )
 
         # ========== 新增特征：ATR动态止损与风险管理（解决盈亏比问题）==========
         # ATR止损距离（基于2倍ATR的止损位与当前价格距离）
-        df['ATR_Stop_Loss_Distance'] = (df['Close'] - (df['Close'] - 2 * df['ATR'])) / df['Close']
+        batch['ATR_Stop_Loss_Distance'] = (batch['Close'] - (batch['Close'] - 2 * batch['ATR'])) / batch['Close']
         
         # 近期ATR变化率（ATR趋势）
-        df['ATR_Change_5d'] = df['ATR'].pct_change(5)
-        df['ATR_Change_10d'] = df['ATR'].pct_change(10)
+        batch['ATR_Change_5d'] = batch['ATR'].pct_change(5)
+        batch['ATR_Change_10d'] = batch['ATR'].pct_change(10)
         
         # 波动率扩张/收缩信号（使用滞后数据避免数据泄漏）
-        df['Volatility_Expansion'] = (df['ATR'] > df['ATR'].shift(shift_val).rolling(20).mean() * 1.2).astype(int)
-        df['Volatility_Contraction'] = (df['ATR'] < df['ATR'].shift(shift_val).rolling(20).mean() * 0.8).astype(int)
+        batch['Volatility_Expansion'] = (batch['ATR'] > batch['ATR'].shift(shift_val).rolling(20).mean() * 1.2).astype(int)
+        batch['Volatility_Contraction'] = (batch['ATR'] < batch['ATR'].shift(shift_val).rolling(20).mean() * 0.8).astype(int)
 
         # 基于ATR的动态风险评分（0-1，越高风险越大，使用滞后数据避免数据泄漏）
-        atr_percentile = df['ATR'].rolling(60, min_periods=20).apply(
+        atr_percentile = batch['ATR'].rolling(60, min_periods=20).apply(
             lambda x: (x.iloc[-1] - x.min()) / (x.max() - x.min() + 1e-10), raw=False
         ).shift(shift_val)
-        df['ATR_Risk_Score'] = atr_percentile.fillna(0.5)
+        batch['ATR_Risk_Score'] = atr_percentile.fillna(0.5)
 
         # ========== 新增特征：连续市场状态记忆（解决连续震荡市问题）==========
         # 连续震荡市天数（过去20天内）
-        df['Consecutive_Ranging_Days'] = df['Market_Regime_Encoded'].rolling(20).apply(
+        batch['Consecutive_Ranging_Days'] = batch['Market_Regime_Encoded'].rolling(20).apply(
             lambda x: (x == 0).sum(), raw=True
         )
         
         # 连续趋势市天数（过去20天内）
-        df['Consecutive_Trending_Days'] = df['Market_Regime_Encoded'].rolling(20).apply(
+        batch['Consecutive_Trending_Days'] = batch['Market_Regime_Encoded'].rolling(20).apply(
             lambda x: (x == 2).sum(), raw=True
         )
         
         # 市场状态转换频率（过去20天内状态变化次数）
-        df['Market_Regime_Change_Freq'] = df['Market_Regime_Encoded'].diff().rolling(20).apply(
+        batch['Market_Regime_Change_Freq'] = batch['Market_Regime_Encoded'].diff().rolling(20).apply(
             lambda x: (x != 0).sum(), raw=True
         )
         
         # 近期市场状态连续性评分（简化版：当前状态与前一日一致的比例）
-        df['Market_Continuity_Score'] = (
-            df['Market_Regime_Encoded'] == df['Market_Regime_Encoded'].shift(shift_val)
+        batch['Market_Continuity_Score'] = (
+            batch['Market_Regime_Encoded'] == batch['Market_Regime_Encoded'].shift(shift_val)
         ).rolling(10).mean()
         
         # 震荡市疲劳指数（在震荡市中停留时间占比，0-1连续值，避免硬阈值）
-        df['Ranging_Fatigue_Index'] = df['Consecutive_Ranging_Days'] / 20.0
+        batch['Ranging_Fatigue_Index'] = batch['Consecutive_Ranging_Days'] / 20.0
 
         # ========== 新增特征：盈亏比与交易质量评估（解决高胜率低收益问题）==========
         # 基于支撑阻力位的潜在盈亏比（Support_120d和Resistance_120d已滞后，无需额外shift）
-        potential_reward = df['Resistance_120d'] - df['Close']
-        potential_risk = df['Close'] - df['Support_120d']
-        df['Risk_Reward_Ratio'] = np.where(
+        potential_reward = batch['Resistance_120d'] - batch['Close']
+        potential_risk = batch['Close'] - batch['Support_120d']
+        batch['Risk_Reward_Ratio'] = np.where(
             potential_risk > 0,
             potential_reward / potential_risk,
             0
         )
         
         # 盈亏比质量评分（0-1）
-        df['RR_Quality_Score'] = np.where(
-            df['Risk_Reward_Ratio'] >= 2.0, 1.0,
-            np.where(df['Risk_Reward_Ratio'] >= 1.0, 0.5, 0.0)
+        batch['RR_Quality_Score'] = np.where(
+            batch['Risk_Reward_Ratio'] >= 2.0, 1.0,
+            np.where(batch['Risk_Reward_Ratio'] >= 1.0, 0.5, 0.0)
         )
         
         # 价格位置风险评分（接近支撑位=低风险，接近阻力位=高风险）
         # Distance_Support_120d和Distance_Resistance_120d已基于滞后数据计算
-        df['Price_Position_Risk'] = (
-            df['Distance_Support_120d'] / 
-            (df['Distance_Support_120d'] + df['Distance_Resistance_120d'] + 1e-10)
+        batch['Price_Position_Risk'] = (
+            batch['Distance_Support_120d'] / 
+            (batch['Distance_Support_120d'] + batch['Distance_Resistance_120d'] + 1e-10)
         )
         
         # 综合交易质量评分（结合胜率预期和盈亏比）
         # 假设模型准确率约60%，计算期望收益
         win_prob = 0.6
-        df['Expected_Value_Score'] = (
-            win_prob * df['Risk_Reward_Ratio'] - (1 - win_prob)
-        ) * df['Volume_Confirmation_Adaptive']
+        batch['Expected_Value_Score'] = (
+            win_prob * batch['Risk_Reward_Ratio'] - (1 - win_prob)
+        ) * batch['Volume_Confirmation_Adaptive']
         
         # 高潜力交易标记（盈亏比>2且成交量确认）
-        df['High_Potential_Trade'] = (
-            (df['Risk_Reward_Ratio'] >= 2.0) & 
-            (df['Volume_Confirmation_Adaptive'] == 1)
+        batch['High_Potential_Trade'] = (
+            (batch['Risk_Reward_Ratio'] >= 2.0) & 
+            (batch['Volume_Confirmation_Adaptive'] == 1)
         ).astype(int)
         
         # 趋势强度与风险匹配度（强趋势应配低波动，弱趋势应配高波动）
-        trend_strength = np.abs(df['Trend_Slope_20d'])
-        volatility_normalized = df['ATR_Risk_Score']
-        df['Trend_Vol_Match'] = np.where(
+        trend_strength = np.abs(batch['Trend_Slope_20d'])
+        volatility_normalized = batch['ATR_Risk_Score']
+        batch['Trend_Vol_Match'] = np.where(
             trend_strength > 0.01,
             1 - np.abs(volatility_normalized - 0.5) * 2,  # 趋势强时，中等波动最佳
             volatility_normalized  # 趋势弱时，高波动可能有机会
         )
 
-        return df
+        return batch.flush()
 
     def create_fundamental_features(self, code):
         """创建基本面特征（只使用实际可用的数据）"""
@@ -1804,8 +1898,8 @@ class FeatureEngineer:
             hsi_regime_aligned = hsi_regime_aligned.reindex(stock_idx, method='ffill')
 
             # 合并到个股 DataFrame
-            for col in hsi_regime_aligned.columns:
-                stock_df[col] = hsi_regime_aligned[col].values
+            stock_df = assign_columns(stock_df, {col: hsi_regime_aligned[col].values
+                                                 for col in hsi_regime_aligned.columns})
 
             # 填充开头可能存在的 NaN（reindex ffill 无法填充开头）
             regime_defaults = {
@@ -1833,8 +1927,7 @@ class FeatureEngineer:
                 'HSI_Regime_Duration': 0.0,
                 'HSI_Regime_Transition_Prob': 0.0,
             }
-            for col, default_val in defaults.items():
-                stock_df[col] = default_val
+            stock_df = assign_columns(stock_df, defaults)
 
         return stock_df
 
@@ -2526,7 +2619,7 @@ class FeatureEngineer:
                 'sector_outperform_hsi': 0
             }
 
-    def create_anomaly_features(self, df: pd.DataFrame, use_shift: bool = True) -> pd.DataFrame:
+    def create_anomaly_features(self, df: pd.DataFrame, use_shift: bool = True, code: str = None) -> pd.DataFrame:
         """
         创建异常检测特征（向量化实现，性能优化）
 
@@ -2535,6 +2628,8 @@ class FeatureEngineer:
             use_shift: 是否使用滞后数据
                 - True: Walk-forward 验证，使用 T-1 数据（避免泄漏）
                 - False: 收市后预测，使用当日数据
+            code: 股票代码（可选）。提供时复用该股票的持久化 Isolation Forest 模型
+                （按计划重训），不再每次调用都重新训练
 
         Returns:
             添加异常特征的 DataFrame
@@ -2601,13 +2696,18 @@ class FeatureEngineer:
             features, timestamps = feature_extractor.extract_features(df)
 
             if not features.empty:
-                if_detector = IsolationForestDetector(
-                    contamination=0.05, random_state=42, anomaly_type='stock'
-                )
-                if_detector.train(features)
+                if code is not None:
+                    # 持久化模型：按计划重训，避免每只股票每次都重新训练
+                    if_model = self._get_anomaly_engine().get_model(code, features)
+                else:
+                    if_detector = IsolationForestDetector(
+                        contamination=0.05, random_state=42, anomaly_type='stock'
+                    )
+                    if_detector.train(features)
+                    if_model = if_detector.model
 
                 # 一次性获取所有样本的异常分数
-                all_scores = if_detector.model.decision_function(features)
+                all_scores = if_model.decision_function(features)
 
                 # 将分数映射到原始 DataFrame 的索引
                 # features 的行数可能与 df 不同（FeatureExtractor 可能过滤某些行）
@@ -2668,6 +2768,16 @@ class FeatureEngineer:
         logger.debug(f"异常检测特征计算完成（use_shift={use_shift}，向量化实现）")
         return df
 
+    def _get_anomaly_engine(self):
+        """获取批量 Isolation Forest 引擎（延迟初始化，进程内复用已加载模型）"""
+        if self._anomaly_engine is None:
+            from anomaly_detector.batch_isolation_forest import BatchIsolationForestEngine
+            # 特征按股票逐只计算，每只股票使用自己的持久化模型
+            self._anomaly_engine = BatchIsolationForestEngine(
+                contamination=0.05, random_state=42, anomaly_type='stock', pooled=False
+            )
+        return self._anomaly_engine
+
     def _get_default_anomaly_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """返回默认异常特征值"""
         defaults = {
@@ -3048,7 +3158,7 @@ class FeatureEngineer:
 
         return df
 
-    def create_interaction_features(self, df, limit_interaction_features=True):
+    def create_interaction_features(self, df, limit_interaction_features=True, pairs=None):
         """创建交叉特征（类别型 × 数值型）
 
         生成策略（优化版）：
@@ -3058,104 +3168,26 @@ class FeatureEngineer:
         参数:
             df: 数据框
             limit_interaction_features: 是否限制交叉特征数量（默认True，启用优化）
+            pairs: 只生成这些 (类别特征, 数值特征) 交叉（默认 None 生成全部）
         """
         if df.empty:
             return df
 
-        # 类别型特征（8个，已删除5个RS_Signal重复特征）
-        categorical_features = [
-            'Outperforms_HSI',
-            'Strong_Volume_Up',
-            'Weak_Volume_Down',
-            '3d_Trend', '5d_Trend', '10d_Trend', '20d_Trend', '60d_Trend'
-        ]
-
-        # 方案1：定义重要的数值型特征（精选特征）
-        # 基于特征重要性实验和历史数据选择
-        # 注意：特征名必须与实际计算名称完全匹配
-        important_numeric_features = [
-            # 技术指标（使用标准化特征，避免绝对值）
-            'RSI', 'RSI_ROC', 'RSI_Deviation',  # RSI 系列（0-100 标准化）
-            'MACD_Hist', 'MACD_Hist_ROC',  # MACD 柱状图（差值，相对稳定）
-            'MACD_Low_5d_History', 'MACD_High_5d_History',  # MACD 历史极值
-            'RSI_Low_5d_History', 'RSI_High_5d_History',  # RSI 历史极值
-            'ATR_Pct', 'ATR_Ratio',  # ATR 标准化（百分比）
-            'BB_Width', 'BB_Position',  # 布林带宽度和位置
-            'Volume_Ratio_7d', 'Volume_Ratio_20d',  # 成交量比率
-            'OBV_Trend', 'OBV_Change_5d',  # OBV 趋势（标准化）
-            'VWAP_Ratio',  # VWAP 相对位置
-            'Trend_Slope_5d', 'Trend_Slope_20d', 'Trend_Slope_60d',  # 趋势斜率（标准化）
-            'Price_Ratio_MA5', 'Price_Ratio_MA20', 'Price_Ratio_MA50',  # 价格相对均线
-            'Volatility_5d', 'Volatility_20d', 'Volatility_60d',  # 波动率
-            'Kurtosis_20d', 'Skewness_20d',  # 高阶矩
-            'Price_Percentile', 'High_Position_60d',  # 价格位置
-            'Upper_Shadow', 'Lower_Shadow', 'Intraday_Amplitude',  # 日内形态
-            'Gap_Up', 'Gap_Down', 'Gap_Size',  # 缺口
-            'MACD_Bullish_Divergence', 'MACD_Bearish_Divergence',  # MACD 背离
-            'RSI_Bullish_Divergence', 'RSI_Bearish_Divergence',  # RSI 背离
-            
-            # 市场环境特征（扩展）
-            'VIX', 'VIX_Change_5d', 'VIX_Level',
-            'HSI_Return_5d', 'HSI_Return_20d', 'HSI_Return_60d',
-            'SP500_Return_5d', 'SP500_Return_20d', 'NASDAQ_Return_5d', 'NASDAQ_Return_20d',
-            # 多期限美债收益率
-            'US_2Y_Yield', 'US_10Y_Yield', 'US_30Y_Yield',
-            # 中国国债收益率
-            'CN_10Y_Yield',
-            # 美债期限利差（收益率曲线形态）
-            'US_2Y_10Y_Spread', 'US_10Y_30Y_Spread',
-            # 中美利差（核心特征）
-            'CN_US_10Y_Spread', 'CN_US_Spread_Z_Score',
-            'Market_Regime_Ranging', 'Market_Regime_Normal', 'Market_Regime_Trending',
-            'GARCH_Conditional_Vol', 'GARCH_Vol_Ratio', 'GARCH_Vol_Change_5d',
-            # 已删除 GARCH_Persistence：交叉后与基础版 r=1.0
-            'HSI_Regime_Prob_0', 'HSI_Regime_Prob_1', 'HSI_Regime_Prob_2',
-            'HSI_Regime_Duration', 'HSI_Regime_Transition_Prob',
-            'Volume_Confirmation_Adaptive',
-            # 已删除 False_Breakout_Signal_Adaptive：跨周期完全相同
-            # 已删除 Confidence_Threshold_Multiplier：与 Market_Regime_Encoded r=-1.0
-            'ATR_Risk_Score',
-            
-            # 基本面特征（20个）
-            'PE_Ratio', 'PB_Ratio', 'ROE', 'ROA', 'Net_Margin',
-            'Gross_Margin', 'EPS_Growth', 'Revenue_Growth',
-            'Dividend_Yield', 'Beta',
-            'PE_vs_Mean', 'PB_vs_Mean', 'ROE_vs_Mean', 'ROA_vs_Mean',
-            'PE_Ranking_Percentile', 'PB_Ranking_Percentile',
-            'Fundamental_Score', 'Valuation_Score', 'Growth_Score', 'Quality_Score',
-            
-            # 资金流向特征（15个）
-            'Net_Flow_Ratio_5d', 'Net_Flow_Ratio_20d', 'Smart_Money_Indicator',
-            'Price_Position_5d', 'Price_Position_20d', 'Price_Position_60d',
-            'Volume_Signal_5d', 'Volume_Signal_20d', 'Momentum_Signal_5d',
-            'Institutional_Holding', 'Insider_Trading_Signal',
-            'Short_Interest_Ratio', 'Margin_Debt_Ratio', 'Put_Call_Ratio',
-            'Money_Flow_Index', 'Accumulation_Distribution',
-            
-            # 风险管理特征（14个，已删除 Consecutive_Ranging_Days：与 Ranging_Fatigue_Index r=1.0）
-            'ATR_Stop_Loss_Distance', 'ATR_Change_5d', 'ATR_Change_10d',
-            'Ranging_Fatigue_Index',
-            'Consecutive_Trending_Days', 'Trending_Momentum_Index',
-            'Risk_Reward_Ratio', 'Expected_Value_Score',
-            'Win_Loss_Ratio_5d', 'Win_Loss_Ratio_20d',
-            'Max_Drawdown_20d', 'Max_Drawdown_60d',
-            'Value_at_Risk_5d', 'Value_at_Risk_20d',
-            'Expected_Shortfall_5d', 'Expected_Shortfall_20d',
-            
-            # 股票类型特征（10个）
-            'Stock_Type_Bank', 'Stock_Type_Tech', 'Stock_Type_Semiconductor',
-            'Stock_Type_AI', 'Stock_Type_Energy', 'Stock_Type_Insurance',
-            'Stock_Type_Biotech', 'Stock_Type_RealEstate', 'Stock_Type_Utility',
-            'Sector_Leader'
-        ]
+        categorical_features = INTERACTION_CATEGORICAL_FEATURES
+        important_numeric_features = INTERACTION_NUMERIC_FEATURES
 
         # 排除列表（基础列 + 绝对价格特征 + 分类特征）
-        # 基础列：不作为特征使用的列
-        base_exclude = ['Code', 'Open', 'High', 'Low', 'Close', 'Volume',
-                       'Future_Return', 'Label', 'Prev_Close',
-                       'Vol_MA20', 'Returns', 'TP', 'MF_Multiplier', 'MF_Volume']
         # 使用模块级常量，避免重复定义
-        exclude_columns = base_exclude + ABSOLUTE_PRICE_FEATURES + categorical_features
+        exclude_columns = INTERACTION_BASE_EXCLUDE + ABSOLUTE_PRICE_FEATURES + categorical_features
+
+        if pairs is not None:
+            # 只生成请求的交叉特征（特征依赖图按模型使用的特征计算）
+            interactions = {}
+            for cat_feat, num_feat in pairs:
+                if cat_feat in df.columns and num_feat in df.columns and num_feat not in exclude_columns:
+                    interactions[f"{cat_feat}_{num_feat}"] = df[cat_feat] * df[num_feat]
+            logger.debug(f"按需生成 {len(interactions)} 个交叉特征")
+            return assign_columns(df, interactions)
 
         if limit_interaction_features:
             # 方案1：只对重要的数值型特征生成交叉特征
@@ -3169,8 +3201,8 @@ class FeatureEngineer:
         if limit_interaction_features:
             print(f"  💡 优化模式：只对 {len(numeric_features)} 个重要数值型特征生成交叉特征")
 
-        # 生成所有交叉特征
-        interaction_count = 0
+        # 生成所有交叉特征（收集后一次性拼接）
+        interactions = {}
         for cat_feat in categorical_features:
             if cat_feat not in df.columns:
                 continue
@@ -3181,11 +3213,10 @@ class FeatureEngineer:
 
                 # 交叉特征命名：类别_数值
                 interaction_name = f"{cat_feat}_{num_feat}"
-                df[interaction_name] = df[cat_feat] * df[num_feat]
-                interaction_count += 1
+                interactions[interaction_name] = df[cat_feat] * df[num_feat]
 
-        logger.info(f"成功生成 {interaction_count} 个交叉特征")
-        return df
+        logger.info(f"成功生成 {len(interactions)} 个交叉特征")
+        return assign_columns(df, interactions)
 
     @staticmethod
     def create_monotonic_interaction(df, feat1, feat2, name1, name2,
@@ -3259,16 +3290,14 @@ class FeatureEngineer:
             market_features = MARKET_LEVEL_FEATURES
 
         # 检查网络特征是否存在（使用新的连续值特征）
-        network_features = ['net_community_id', 'net_inter_community_ratio',
-                           'net_sector_cohesion', 'net_composite_centrality',
-                           'net_community_centrality_rank',
-                           'net_constraint', 'net_effective_size', 'net_local_clustering']
-        missing = [f for f in network_features if f not in df.columns]
+        missing = [f for f in NETWORK_INTERACTION_BASE_FEATURES if f not in df.columns]
         if missing:
             logger.debug(f"网络特征缺失，跳过市场-网络交叉: {missing}")
             return df
 
         interaction_count = 0
+        # 交叉特征先暂存，最后一次性拼接
+        batch = FeatureBatch(df)
 
         # 1. 社区 ID One-Hot 编码并交叉（保持不变）
         if 'net_community_id' in df.columns:
@@ -3286,13 +3315,13 @@ class FeatureEngineer:
                     continue
                 comm_col = f'net_comm_{int(comm_id)}'
                 # One-Hot 编码：如果股票属于该社区则为 1，否则为 0
-                df[comm_col] = (df['net_community_id'] == comm_id).astype(int)
+                batch[comm_col] = (df['net_community_id'] == comm_id).astype(int)
 
                 # 与市场级特征交叉
                 for market_feat in market_features:
                     if market_feat in df.columns:
                         interaction_name = f'{comm_col}_{market_feat}'
-                        df[interaction_name] = df[comm_col] * df[market_feat]
+                        batch[interaction_name] = batch[comm_col] * df[market_feat]
                         interaction_count += 1
 
         # 2. 跨社区连接比例与市场特征交叉（正向特征）
@@ -3307,7 +3336,7 @@ class FeatureEngineer:
                         mono_net, mono_market
                     )
                     if feat_name:
-                        df[feat_name] = feat_value
+                        batch[feat_name] = feat_value
                         interaction_count += 1
 
         # 3. 板块内聚度与市场特征交叉（正向特征）
@@ -3322,7 +3351,7 @@ class FeatureEngineer:
                         mono_net, mono_market
                     )
                     if feat_name:
-                        df[feat_name] = feat_value
+                        batch[feat_name] = feat_value
                         interaction_count += 1
 
         # 4. 中心性与市场特征交叉（正向特征）
@@ -3337,7 +3366,7 @@ class FeatureEngineer:
                         mono_net, mono_market
                     )
                     if feat_name:
-                        df[feat_name] = feat_value
+                        batch[feat_name] = feat_value
                         interaction_count += 1
 
         # 5. 社区内中心性排名与市场特征交叉（正向特征）
@@ -3352,7 +3381,7 @@ class FeatureEngineer:
                         mono_net, mono_market
                     )
                     if feat_name:
-                        df[feat_name] = feat_value
+                        batch[feat_name] = feat_value
                         interaction_count += 1
 
         # 6. 结构洞约束 × 市场特征（负向特征）
@@ -3369,7 +3398,7 @@ class FeatureEngineer:
                         mono_net, mono_market
                     )
                     if feat_name:
-                        df[feat_name] = feat_value
+                        batch[feat_name] = feat_value
                         interaction_count += 1
 
         # 7. 有效规模 × 市场特征（正向特征）
@@ -3384,7 +3413,7 @@ class FeatureEngineer:
                         mono_net, mono_market
                     )
                     if feat_name:
-                        df[feat_name] = feat_value
+                        batch[feat_name] = feat_value
                         interaction_count += 1
 
         # 8. 局部聚类系数 × 市场特征（中性特征）
@@ -3400,11 +3429,147 @@ class FeatureEngineer:
                         mono_net, mono_market
                     )
                     if feat_name:
-                        df[feat_name] = feat_value
+                        batch[feat_name] = feat_value
                         interaction_count += 1
 
         logger.info(f"成功生成 {interaction_count} 个市场-网络交叉特征")
-        return df
+        return batch.flush()
+
+
+# ========== 特征依赖图 ==========
+# 使用特征缓存时需要重新计算的节点：网络特征是跨截面的（文件可能已更新），
+# 市场-网络交叉特征依赖网络特征和模型的社区 ID，异常检测特征依赖持久化的检测模型
+CACHE_REFRESH_NODES = ('network', 'market_network', 'anomaly')
+
+# 市场级特征按名称长度降序（解析交叉特征名时优先匹配最长的后缀）
+_MARKET_FEATURES_BY_LENGTH = sorted(MARKET_LEVEL_FEATURES, key=len, reverse=True)
+
+
+def _parse_interaction_column(column):
+    """类别×数值交叉特征名 -> (类别特征, 数值特征)，不是交叉特征时返回 None"""
+    for cat_feat in INTERACTION_CATEGORICAL_FEATURES:
+        if column.startswith(cat_feat + '_'):
+            num_feat = column[len(cat_feat) + 1:]
+            if num_feat in INTERACTION_NUMERIC_FEATURES and num_feat not in ABSOLUTE_PRICE_FEATURES:
+                return cat_feat, num_feat
+    return None
+
+
+def _parse_market_network_column(column):
+    """市场-网络交叉特征名 -> 市场级特征（社区 One-Hot 列返回空字符串），不是交叉特征时返回 None"""
+    if not column.startswith('net_'):
+        return None
+    for market_feat in _MARKET_FEATURES_BY_LENGTH:
+        if column.endswith('_' + market_feat):
+            return market_feat
+    if column.startswith('net_comm_') and column[len('net_comm_'):].isdigit():
+        return ''
+    return None
+
+
+def _market_network_inputs(market_feat):
+    """市场-网络交叉特征的输入列"""
+    if not market_feat:
+        return ['net_community_id']
+    return NETWORK_INTERACTION_BASE_FEATURES + [market_feat]
+
+
+def _load_network_features(filepath=NETWORK_FEATURES_FILE):
+    """加载预计算的网络特征 {股票代码: 特征字典}，文件不存在或加载失败时返回 None"""
+    if not os.path.exists(filepath):
+        return None
+    try:
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"网络特征加载失败: {e}")
+        return None
+
+
+def _add_network_features(df, code, network_features_data):
+    """添加网络特征，缺失网络特征的股票使用默认值（社区 ID = -1）"""
+    net_features = network_features_data.get(code) if network_features_data else None
+    if net_features is None:
+        net_features = DEFAULT_NETWORK_FEATURES
+        logger.debug(f"股票 {code} 使用默认网络特征（社区 ID = -1）")
+    return assign_columns(df, net_features)
+
+
+def build_feature_registry(feature_engineer, manifest_path=FEATURE_MANIFEST_FILE):
+    """构建港股特征依赖图（节点顺序即原特征流水线的计算顺序）
+
+    Args:
+        feature_engineer: FeatureEngineer 实例
+        manifest_path: 节点产出列清单路径
+
+    Returns:
+        FeatureRegistry: 节点的 context 字段为 code, use_shift, hsi_df, us_market_df,
+            hsi_regime_df, network_features, community_ids, cache_key（可选，启用节点缓存）
+    """
+    fe = feature_engineer
+    registry = FeatureRegistry(manifest_path)
+
+    def technical(df, context):
+        return fe.calculate_technical_features(df, use_shift=context['use_shift'], code=context['code'])
+
+    def relative_strength(df, context):
+        if context.get('hsi_df') is None:
+            return df
+        return fe.calculate_relative_strength(df, context['hsi_df'])
+
+    def hsi_regime(df, context):
+        if context.get('hsi_regime_df') is None:
+            return df
+        return fe.calculate_hsi_regime_features(df, context['hsi_regime_df'])
+
+    def market_environment(df, context):
+        if context.get('hsi_df') is None:
+            return df
+        return fe.create_market_environment_features(
+            df, context['hsi_df'], context.get('us_market_df'), use_shift=context['use_shift'])
+
+    def feature_dict(create, with_df=True):
+        """返回特征字典的 create_* 方法 -> 节点 producer"""
+        def producer(df, context):
+            features = create(context['code'], df) if with_df else create(context['code'])
+            return assign_columns(df, features)
+        return producer
+
+    def interactions(df, context, pairs):
+        return fe.create_interaction_features(df, pairs=pairs)
+
+    def market_network(df, context, keys):
+        market_features = None if keys is None else [k for k in keys if k]
+        return fe.create_market_network_interaction_features(
+            df, market_features=market_features, community_ids=context.get('community_ids'))
+
+    registry.add('technical', technical)
+    registry.add('multi_period', lambda df, context: fe.calculate_multi_period_metrics(df),
+                 depends_on=['technical'])
+    registry.add('relative_strength', relative_strength, depends_on=['technical'])
+    registry.add('hsi_regime', hsi_regime)
+    registry.add('smart_money', lambda df, context: fe.create_smart_money_features(df, use_shift=context['use_shift']),
+                 depends_on=['technical'])
+    registry.add('market_environment', market_environment, depends_on=['technical', 'relative_strength'])
+    registry.add('fundamental', feature_dict(fe.create_fundamental_features, with_df=False))
+    registry.add('stock_type', feature_dict(fe.create_stock_type_features), depends_on=['technical'])
+    registry.add('sentiment', feature_dict(fe.create_sentiment_features))
+    registry.add('topic', feature_dict(fe.create_topic_features))
+    registry.add('topic_sentiment', feature_dict(fe.create_topic_sentiment_interaction_features))
+    registry.add('expectation_gap', feature_dict(fe.create_expectation_gap_features))
+    registry.add('sector', feature_dict(fe.create_sector_features))
+    registry.add('event_driven', lambda df, context: fe.create_event_driven_features(context['code'], df))
+    registry.add('technical_fundamental', lambda df, context: fe.create_technical_fundamental_interactions(df),
+                 depends_on=['technical', 'fundamental'])
+    registry.add_family('interaction', interactions, parse=_parse_interaction_column, inputs=list)
+    registry.add('network', lambda df, context: _add_network_features(
+        df, context['code'], context.get('network_features')))
+    registry.add_family('market_network', market_network, parse=_parse_market_network_column,
+                        inputs=_market_network_inputs)
+    # Isolation Forest 的输入包含 RSI、MACD、布林带和均线（technical 节点产出）
+    registry.add('anomaly', lambda df, context: fe.create_anomaly_features(
+        df, use_shift=context['use_shift'], code=context['code']), depends_on=['technical'])
+    return registry
 
 
 class BaseTradingModel:
@@ -3714,36 +3879,29 @@ class LightGBMModel(BaseTradingModel):
 
                 # 添加基本面特征
                 fundamental_features = self.feature_engineer.create_fundamental_features(code)
-                for key, value in fundamental_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, fundamental_features)
 
                 # 添加股票类型特征
                 stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-                for key, value in stock_type_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, stock_type_features)
 
                 # 添加情感特征
                 sentiment_features = self.feature_engineer.create_sentiment_features(code, stock_df)
-                for key, value in sentiment_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, sentiment_features)
 
                 # 添加主题特征（LDA主题建模）
                 topic_features = self.feature_engineer.create_topic_features(code, stock_df)
-                for key, value in topic_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, topic_features)
                 # 添加主题情感交互特征
                 topic_sentiment_interaction = self.feature_engineer.create_topic_sentiment_interaction_features(code, stock_df)
-                for key, value in topic_sentiment_interaction.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, topic_sentiment_interaction)
                 # 添加预期差距特征
                 expectation_gap = self.feature_engineer.create_expectation_gap_features(code, stock_df)
-                for key, value in expectation_gap.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, expectation_gap)
 
                 # 添加板块特征
                 sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-                for key, value in sector_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, sector_features)
 
                 # 添加股票代码
                 stock_df['Code'] = code
@@ -4107,38 +4265,31 @@ class LightGBMModel(BaseTradingModel):
 
             # 添加基本面特征
             fundamental_features = self.feature_engineer.create_fundamental_features(code)
-            for key, value in fundamental_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, fundamental_features)
 
             # 添加股票类型特征
             stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-            for key, value in stock_type_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, stock_type_features)
 
             # 添加情感特征
             sentiment_features = self.feature_engineer.create_sentiment_features(code, stock_df)
-            for key, value in sentiment_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, sentiment_features)
 
             # 添加主题特征（LDA主题建模）
             topic_features = self.feature_engineer.create_topic_features(code, stock_df)
-            for key, value in topic_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, topic_features)
 
             # 添加主题情感交互特征（移到循环外，避免重复调用）
             topic_sentiment_interaction = self.feature_engineer.create_topic_sentiment_interaction_features(code, stock_df)
-            for key, value in topic_sentiment_interaction.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, topic_sentiment_interaction)
 
             # 添加预期差距特征（移到循环外，避免重复调用）
             expectation_gap = self.feature_engineer.create_expectation_gap_features(code, stock_df)
-            for key, value in expectation_gap.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, expectation_gap)
 
             # 添加板块特征
             sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-            for key, value in sector_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, sector_features)
 
             # 生成技术指标与基本面交互特征（与训练时保持一致）
             stock_df = self.feature_engineer.create_technical_fundamental_interactions(stock_df)
@@ -4196,13 +4347,12 @@ class LightGBMModel(BaseTradingModel):
         print(f"模型已保存到 {filepath}")
 
     def load_model(self, filepath):
-        """加载模型"""
-        with open(filepath, 'rb') as f:
-            model_data = pickle.load(f)
+        """加载模型（经进程级模型注册表，同一文件只反序列化一次）"""
+        model_data = get_model_registry().load_model_data(filepath)
         self.model = model_data['model']
         self.scaler = model_data['scaler']
         self.feature_columns = model_data['feature_columns']
-        self.categorical_encoders = model_data.get('categorical_encoders', {})
+        self.categorical_encoders = dict(model_data.get('categorical_encoders', {}))
         print(f"模型已从 {filepath} 加载")
 
 
@@ -4371,42 +4521,34 @@ class GBDTModel(BaseTradingModel):
                 
                 # 添加股票类型特征
                 stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-                for key, value in stock_type_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, stock_type_features)
                 stock_df = self.feature_engineer.create_label(stock_df, horizon=horizon, for_backtest=for_backtest, min_return_threshold=min_return_threshold)
 
                 # 添加基本面特征
                 fundamental_features = self.feature_engineer.create_fundamental_features(code)
-                for key, value in fundamental_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, fundamental_features)
 
                 # 添加股票类型特征
                 stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-                for key, value in stock_type_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, stock_type_features)
 
                 # 添加情感特征
                 sentiment_features = self.feature_engineer.create_sentiment_features(code, stock_df)
-                for key, value in sentiment_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, sentiment_features)
 
                 # 添加主题特征（LDA主题建模）
                 topic_features = self.feature_engineer.create_topic_features(code, stock_df)
-                for key, value in topic_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, topic_features)
                 # 添加主题情感交互特征
                 topic_sentiment_interaction = self.feature_engineer.create_topic_sentiment_interaction_features(code, stock_df)
-                for key, value in topic_sentiment_interaction.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, topic_sentiment_interaction)
                 # 添加预期差距特征
                 expectation_gap = self.feature_engineer.create_expectation_gap_features(code, stock_df)
-                for key, value in expectation_gap.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, expectation_gap)
 
                 # 添加板块特征
                 sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-                for key, value in sector_features.items():
-                    stock_df[key] = value
+                stock_df = assign_columns(stock_df, sector_features)
 
                 # 添加股票代码
                 stock_df['Code'] = code
@@ -4788,38 +4930,31 @@ class GBDTModel(BaseTradingModel):
 
             # 添加基本面特征
             fundamental_features = self.feature_engineer.create_fundamental_features(code)
-            for key, value in fundamental_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, fundamental_features)
 
             # 添加股票类型特征
             stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-            for key, value in stock_type_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, stock_type_features)
 
             # 添加情感特征
             sentiment_features = self.feature_engineer.create_sentiment_features(code, stock_df)
-            for key, value in sentiment_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, sentiment_features)
 
             # 添加主题特征（LDA主题建模）
             topic_features = self.feature_engineer.create_topic_features(code, stock_df)
-            for key, value in topic_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, topic_features)
 
             # 添加主题情感交互特征（移到循环外，避免重复调用）
             topic_sentiment_interaction = self.feature_engineer.create_topic_sentiment_interaction_features(code, stock_df)
-            for key, value in topic_sentiment_interaction.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, topic_sentiment_interaction)
 
             # 添加预期差距特征（移到循环外，避免重复调用）
             expectation_gap = self.feature_engineer.create_expectation_gap_features(code, stock_df)
-            for key, value in expectation_gap.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, expectation_gap)
 
             # 添加板块特征
             sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-            for key, value in sector_features.items():
-                stock_df[key] = value
+            stock_df = assign_columns(stock_df, sector_features)
 
             # 生成技术指标与基本面交互特征（与训练时保持一致）
             stock_df = self.feature_engineer.create_technical_fundamental_interactions(stock_df)
@@ -4885,13 +5020,12 @@ class GBDTModel(BaseTradingModel):
         print(f"GBDT 模型已保存到 {filepath}")
 
     def load_model(self, filepath):
-        """加载模型"""
-        with open(filepath, 'rb') as f:
-            model_data = pickle.load(f)
+        """加载模型（经进程级模型注册表，同一文件只反序列化一次）"""
+        model_data = get_model_registry().load_model_data(filepath)
         self.gbdt_model = model_data['gbdt_model']
         self.feature_columns = model_data['feature_columns']
         self.actual_n_estimators = model_data['actual_n_estimators']
-        self.categorical_encoders = model_data.get('categorical_encoders', {})
+        self.categorical_encoders = dict(model_data.get('categorical_encoders', {}))
         print(f"GBDT 模型已从 {filepath} 加载")
 
 
@@ -4906,7 +5040,7 @@ class CatBoostModel(BaseTradingModel):
     """
     _deprecation_warning_shown = False  # 类变量，控制弃用警告只显示一次
 
-    def __init__(self, class_weight='balanced', use_dynamic_threshold=False, fp_penalty=None):
+    def __init__(self, class_weight='balanced', use_dynamic_threshold=False, fp_penalty=None, warm_start=None):
         """初始化 CatBoost 模型
 
         Args:
@@ -4920,6 +5054,9 @@ class CatBoostModel(BaseTradingModel):
                 - None: 不使用额外惩罚
                 - float (如 2.5): 对类别0（下跌）施加 fp_penalty 倍惩罚
                 - 效果：class_weights = {0: fp_penalty, 1: 1.0}，惩罚预测涨但实际跌的错误
+            warm_start: WarmStartCatBoost 增量训练器（可选）
+                - None: 每次从头训练
+                - 设置后：在上一窗口的模型上追加树（跳过交叉验证，沿用上次完整训练的验证指标）
         """
         super().__init__()  # 调用基类初始化
         self.catboost_model = None
@@ -4927,6 +5064,8 @@ class CatBoostModel(BaseTradingModel):
         self.model_type = 'catboost'  # 模型类型标识
         self.use_dynamic_threshold = use_dynamic_threshold
         self.fp_penalty = fp_penalty
+        self.warm_start = warm_start
+        self._fast_scorer = None
 
         # 如果设置了 fp_penalty，覆盖 class_weight（非对称损失函数）
         if fp_penalty is not None:
@@ -4937,6 +5076,9 @@ class CatBoostModel(BaseTradingModel):
 
         logger.info(f"CatBoostModel 初始化: class_weight={self.class_weight}, use_dynamic_threshold={use_dynamic_threshold}, fp_penalty={fp_penalty}")
 
+        # 特征依赖图（预测时只计算模型使用的特征）
+        self.feature_registry = build_feature_registry(self.feature_engineer)
+
     def load_selected_features(self, filepath=None, current_feature_names=None):
         """加载选择的特征列表（使用特征名称交集，确保特征存在）
 
@@ -5073,17 +5215,20 @@ class CatBoostModel(BaseTradingModel):
 
         # 加载网络特征（跨截面特征，所有股票共享）
         # 网络特征文件由 stock_network_analysis.py 生成
-        network_features_file = 'data/network_features/network_features_for_ml.json'
-        network_features_data = None
-        try:
-            if os.path.exists(network_features_file):
-                with open(network_features_file, 'r') as f:
-                    network_features_data = json.load(f)
-                print(f"  ✅ 网络特征加载完成（{len(network_features_data)} 只股票）")
-            else:
-                print("  ⚠️ 网络特征文件不存在，将跳过网络特征")
-        except Exception as e:
-            print(f"  ⚠️ 网络特征加载失败: {e}")
+        network_features_data = _load_network_features()
+        if network_features_data is not None:
+            print(f"  ✅ 网络特征加载完成（{len(network_features_data)} 只股票）")
+        else:
+            print("  ⚠️ 网络特征文件不存在或加载失败，将使用默认网络特征")
+
+        feature_context = {
+            'use_shift': use_shift,
+            'hsi_df': hsi_df,
+            'us_market_df': us_market_df,
+            'hsi_regime_df': hsi_regime_df,
+            'network_features': network_features_data,
+            'community_ids': community_ids,
+        }
 
         cache_hits = 0
         cache_misses = 0
@@ -5124,112 +5269,19 @@ class CatBoostModel(BaseTradingModel):
                             print(f"  ✅ 使用特征缓存")
                             logger.debug(f"特征缓存命中: {cache_key}")
 
+                feature_context['code'] = code
                 if not use_cache:
-                    # 计算特征
+                    # 计算全部特征（按特征依赖图的注册顺序）
                     cache_misses += 1
-
-                    # 计算技术指标（80个指标）
-                    stock_df = self.feature_engineer.calculate_technical_features(stock_df, use_shift=use_shift, code=code)
-
-                    # 计算多周期指标
-                    stock_df = self.feature_engineer.calculate_multi_period_metrics(stock_df)
-
-                    # 计算相对强度指标
-                    if hsi_df is not None:
-                        stock_df = self.feature_engineer.calculate_relative_strength(stock_df, hsi_df)
-
-                    # 合并 HSI 市场状态特征
-                    if hsi_regime_df is not None:
-                        stock_df = self.feature_engineer.calculate_hsi_regime_features(stock_df, hsi_regime_df)
-
-                    # 创建资金流向特征
-                    stock_df = self.feature_engineer.create_smart_money_features(stock_df, use_shift=use_shift)
-
-                    # 创建市场环境特征（包含港股和美股）
-                    if hsi_df is not None:
-                        stock_df = self.feature_engineer.create_market_environment_features(stock_df, hsi_df, us_market_df, use_shift=use_shift)
-
-                    # 添加基本面特征
-                    fundamental_features = self.feature_engineer.create_fundamental_features(code)
-                    for key, value in fundamental_features.items():
-                        stock_df[key] = value
-
-                    # 添加股票类型特征
-                    stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-                    for key, value in stock_type_features.items():
-                        stock_df[key] = value
-
-                    # 添加情感特征
-                    sentiment_features = self.feature_engineer.create_sentiment_features(code, stock_df)
-                    for key, value in sentiment_features.items():
-                        stock_df[key] = value
-
-                    # 添加主题特征（LDA主题建模）
-                    topic_features = self.feature_engineer.create_topic_features(code, stock_df)
-                    for key, value in topic_features.items():
-                        stock_df[key] = value
-                    # 添加主题情感交互特征
-                    topic_sentiment_interaction = self.feature_engineer.create_topic_sentiment_interaction_features(code, stock_df)
-                    for key, value in topic_sentiment_interaction.items():
-                        stock_df[key] = value
-                    # 添加预期差距特征
-                    expectation_gap = self.feature_engineer.create_expectation_gap_features(code, stock_df)
-                    for key, value in expectation_gap.items():
-                        stock_df[key] = value
-
-                    # 添加板块特征
-                    sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-                    for key, value in sector_features.items():
-                        stock_df[key] = value
-
-                    # 添加事件驱动特征（9个）
-                    stock_df = self.feature_engineer.create_event_driven_features(code, stock_df)
-
-                    # 生成技术指标与基本面交互特征（与训练时保持一致）
-                    stock_df = self.feature_engineer.create_technical_fundamental_interactions(stock_df)
-
-                    # 生成交叉特征（与训练时保持一致）
-                    stock_df = self.feature_engineer.create_interaction_features(stock_df)
-
-                # ========== 网络特征和交叉特征（无论缓存是否命中都需要更新）==========
-                # 原因：网络特征文件可能已更新，导致社区 ID 列表变化
-                # 必须使用预加载的 community_ids 确保训练/预测一致性
-
-                # 添加网络特征（从预计算文件加载）
-                if network_features_data is not None and code in network_features_data:
-                    net_features = network_features_data[code]
-                    for key, value in net_features.items():
-                        stock_df[key] = value
+                    stock_df = self.feature_registry.evaluate(stock_df, feature_context)
                 else:
-                    # 为缺失网络特征的股票提供默认值
-                    default_net_features = {
-                        'net_degree_centrality': 0.0,
-                        'net_betweenness_centrality': 0.0,
-                        'net_eigenvector_centrality': 0.0,
-                        'net_closeness_centrality': 0.0,
-                        'net_composite_centrality': 0.0,
-                        'net_community_id': -1,  # -1 表示未知社区
-                        'net_community_size': 0,
-                        'net_community_centrality_rank': -1,  # -1表示未知社区
-                        'net_sector_cohesion': 0.0,
-                        'net_mst_degree': 0,
-                        'net_mst_neighbor_sectors': 0,
-                        'net_inter_community_ratio': 0.0,
-                        # 结构洞特征默认值
-                        'net_constraint': 1.0,  # 高约束=无机会
-                        'net_effective_size': 0.0,
-                        'net_local_clustering': 0.0,
-                    }
-                    for key, value in default_net_features.items():
-                        stock_df[key] = value
-                    logger.debug(f"股票 {code} 使用默认网络特征（社区 ID = -1）")
+                    # ========== 网络特征和交叉特征（缓存命中时也需要更新）==========
+                    # 原因：网络特征文件可能已更新，导致社区 ID 列表变化
+                    # 必须使用预加载的 community_ids 确保训练/预测一致性
+                    stock_df = self.feature_registry.evaluate(stock_df, feature_context, nodes=CACHE_REFRESH_NODES)
 
-                # 生成市场-网络交叉特征（使用预加载的 community_ids）
-                stock_df = self.feature_engineer.create_market_network_interaction_features(
-                    stock_df, community_ids=community_ids)
-
-                # 添加异常检测特征（复用 use_shift）
-                stock_df = self.feature_engineer.create_anomaly_features(stock_df, use_shift=use_shift)
+                if FEATURE_FLOAT32:
+                    stock_df = downcast_features(stock_df)
 
                 # 保存/更新特征缓存（包含最新的网络交叉特征，保存 use_shift 信息）
                 if use_feature_cache:
@@ -5460,7 +5512,7 @@ class CatBoostModel(BaseTradingModel):
                 # 记录分类特征的索引（用于CatBoost）
                 categorical_features_indices.append(self.feature_columns.index(col))
 
-        X = df[self.feature_columns].values
+        X = feature_matrix(df, self.feature_columns, float32=FEATURE_FLOAT32)
         y = df['Label'].values
 
         # 关键：分类特征已被LabelEncoder编码为整数，numpy会自动转为float
@@ -5549,12 +5601,21 @@ class CatBoostModel(BaseTradingModel):
 
         self.catboost_model = CatBoostClassifier(**catboost_params)
 
+        # 增量训练：特征和分类编码与上一窗口一致时，在上一个模型上追加树
+        warm_signature = {
+            'features': self.feature_columns,
+            'categories': {col: list(encoder.classes_) for col, encoder in self.categorical_encoders.items()},
+            'params': {k: v for k, v in catboost_params.items() if k != 'verbose'}
+        }
+        warm_continue = self.warm_start is not None and self.warm_start.will_continue(warm_signature)
+
         # 使用时间序列交叉验证（添加 gap 参数避免短期依赖）
+        # 增量训练时跳过（上一窗口的模型已见过验证段，交叉验证分数会偏高）
         tscv = TimeSeriesSplit(n_splits=5, gap=horizon)
         catboost_scores = []
         catboost_f1_scores = []
 
-        for fold, (train_idx, val_idx) in enumerate(tscv.split(X), 1):
+        for fold, (train_idx, val_idx) in enumerate([] if warm_continue else tscv.split(X), 1):
             X_train_fold, X_val_fold = X[train_idx], X[val_idx]
             y_train_fold, y_val_fold = y[train_idx], y[val_idx]
 
@@ -5577,49 +5638,55 @@ class CatBoostModel(BaseTradingModel):
             print(f"   Fold {fold} 验证准确率: {score:.4f}, 验证F1分数: {f1:.4f}")
 
         # 使用全部数据重新训练
-        full_pool = Pool(data=X, label=y)
-        self.catboost_model.fit(full_pool, verbose=100)
+        if self.warm_start is not None:
+            self.catboost_model = self.warm_start.fit(catboost_params, X, y, signature=warm_signature, verbose=100)
+        else:
+            full_pool = Pool(data=X, label=y)
+            self.catboost_model.fit(full_pool, verbose=100)
 
         # 获取实际训练的树数量
         self.actual_n_estimators = self.catboost_model.tree_count_
-        mean_accuracy = np.mean(catboost_scores)
-        std_accuracy = np.std(catboost_scores)
-        mean_f1 = np.mean(catboost_f1_scores)
-        std_f1 = np.std(catboost_f1_scores)
         print(f"\n✅ CatBoost 训练完成")
         print(f"   实际训练树数量: {self.actual_n_estimators} (原计划: {n_estimators})")
-        print(f"   平均验证准确率: {mean_accuracy:.4f} (+/- {std_accuracy:.4f})")
-        print(f"   平均验证F1分数: {mean_f1:.4f} (+/- {std_f1:.4f})")
-
-        # 保存准确率到文件（供综合分析使用）
-        accuracy_info = {
-            'model_type': 'catboost',
-            'horizon': horizon,
-            'accuracy': float(mean_accuracy),
-            'std': float(std_accuracy),
-            'f1_score': float(mean_f1),
-            'f1_std': float(std_f1),
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        accuracy_file = 'data/model_accuracy.json'
-        try:
-            # 读取现有数据
-            if os.path.exists(accuracy_file):
-                with open(accuracy_file, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-            else:
-                existing_data = {}
+        if warm_continue:
+            print(f"   增量训练（{self.warm_start.last_mode}），跳过交叉验证，沿用上次完整训练的验证指标")
+        else:
+            mean_accuracy = np.mean(catboost_scores)
+            std_accuracy = np.std(catboost_scores)
+            mean_f1 = np.mean(catboost_f1_scores)
+            std_f1 = np.std(catboost_f1_scores)
+            print(f"   平均验证准确率: {mean_accuracy:.4f} (+/- {std_accuracy:.4f})")
+            print(f"   平均验证F1分数: {mean_f1:.4f} (+/- {std_f1:.4f})")
+
+            # 保存准确率到文件（供综合分析使用）
+            accuracy_info = {
+                'model_type': 'catboost',
+                'horizon': horizon,
+                'accuracy': float(mean_accuracy),
+                'std': float(std_accuracy),
+                'f1_score': float(mean_f1),
+                'f1_std': float(std_f1),
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            accuracy_file = 'data/model_accuracy.json'
+            try:
+                # 读取现有数据
+                if os.path.exists(accuracy_file):
+                    with open(accuracy_file, 'r', encoding='utf-8') as f:
+                        existing_data = json.load(f)
+                else:
+                    existing_data = {}
             
-            # 更新当前模型的准确率
-            key = f'catboost_{horizon}d'
-            existing_data[key] = accuracy_info
+                # 更新当前模型的准确率
+                key = f'catboost_{horizon}d'
+                existing_data[key] = accuracy_info
             
-            # 保存回文件
-            with open(accuracy_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_data, f, indent=2, ensure_ascii=False)
-            logger.info(f"准确率已保存到 {accuracy_file}")
-        except Exception as e:
-            logger.warning(f"保存准确率失败: {e}")
+                # 保存回文件
+                with open(accuracy_file, 'w', encoding='utf-8') as f:
+                    json.dump(existing_data, f, indent=2, ensure_ascii=False)
+                logger.info(f"准确率已保存到 {accuracy_file}")
+            except Exception as e:
+                logger.warning(f"保存准确率失败: {e}")
 
         # ========== 输出 CatBoost 特征重要性 ==========
         print("\n" + "="*70)
@@ -5684,369 +5751,289 @@ class CatBoostModel(BaseTradingModel):
         if horizon is None:
             horizon = self.horizon
 
-        # 根据 mode 确定 use_shift
-        use_shift = (mode == 'backtest')
-
         try:
-            # 移除代码中的.HK后缀
-            stock_code = code.replace('.HK', '')
-
-            # 获取股票数据
-            stock_df = get_hk_stock_data_tencent(stock_code, period_days=1460)
-            if stock_df is None or stock_df.empty:
+            stock_df = self.build_prediction_frame(
+                code, predict_date=predict_date, use_feature_cache=use_feature_cache, mode=mode,
+                feature_columns=self.feature_columns or None)
+            if stock_df is None:
                 return None
+            return self.predict_from_frames({code: stock_df})[code]
 
-            # 如果指定了预测日期，过滤数据到该日期
-            if predict_date:
-                predict_date = pd.to_datetime(predict_date)
-                predict_date_str = predict_date.strftime('%Y-%m-%d')
-
-                # 确保索引是 datetime 类型
-                if not isinstance(stock_df.index, pd.DatetimeIndex):
-                    stock_df.index = pd.to_datetime(stock_df.index)
-
-                # 使用字符串比较避免时区问题
-                stock_df = stock_df[stock_df.index.strftime('%Y-%m-%d') <= predict_date_str]
-
-                if stock_df.empty:
-                    logger.warning(f"股票 {code} 在日期 {predict_date_str} 之前没有数据")
-                    return None
-
-            # 获取数据最后日期作为缓存键
-            last_date = stock_df.index[-1].strftime('%Y%m%d') if hasattr(stock_df.index[-1], 'strftime') else str(stock_df.index[-1])[:10].replace('-', '')
-
-            # 尝试加载特征缓存（使用 use_shift 参数生成缓存键）
-            cache_key = _get_feature_cache_key(stock_code, last_date, use_shift=use_shift)
-            cache_file_path = _get_feature_cache_file_path(cache_key)
-
-            use_cache_predict = False
-            if use_feature_cache and _is_feature_cache_valid(cache_file_path):
-                # 使用缓存（验证 use_shift 是否匹配）
-                cached_data = _load_feature_cache(cache_file_path, use_shift=use_shift)
-                if cached_data is not None and 'stock_df' in cached_data:
-                    cached_df = cached_data['stock_df']
-                    # 检查新特征列是否存在（GARCH + HSI Regime）
-                    required_new_cols = ['GARCH_Conditional_Vol', 'HSI_Market_Regime', 'net_composite_centrality']
-                    missing_cols = [c for c in required_new_cols if c not in cached_df.columns]
-                    if missing_cols:
-                        logger.debug(f"预测缓存缺少新特征: {missing_cols}，重新计算...")
-                    else:
-                        stock_df = cached_df
-                        logger.debug(f"预测使用特征缓存: {cache_key}")
-                        use_cache_predict = True
-                        # 即使使用缓存，也要加载网络特征（因为网络特征是跨截面的，可能已更新）
-                        # 如果股票没有网络特征，使用默认值
-                        network_features_file = 'data/network_features/network_features_for_ml.json'
-                        has_network_features = False
-                        if os.path.exists(network_features_file):
-                            try:
-                                with open(network_features_file, 'r') as f:
-                                    network_features_data = json.load(f)
-                                if code in network_features_data:
-                                    net_features = network_features_data[code]
-                                    for key, value in net_features.items():
-                                        stock_df[key] = value
-                                    has_network_features = True
-                                    logger.debug(f"网络特征已加载到缓存数据")
-                            except Exception as e:
-                                logger.debug(f"网络特征加载失败: {e}")
-
-                        if not has_network_features:
-                            # 为缺失网络特征的股票提供默认值（使用新的连续值特征）
-                            default_net_features = {
-                                'net_degree_centrality': 0.0,
-                                'net_betweenness_centrality': 0.0,
-                                'net_eigenvector_centrality': 0.0,
-                                'net_closeness_centrality': 0.0,
-                                'net_composite_centrality': 0.0,
-                                'net_community_id': -1,  # -1 表示未知社区
-                                'net_community_size': 0,
-                                'net_community_centrality_rank': -1,  # -1表示未知社区
-                                'net_sector_cohesion': 0.0,
-                                'net_mst_degree': 0,
-                                'net_mst_neighbor_sectors': 0,
-                                'net_inter_community_ratio': 0.0,
-                                # 结构洞特征默认值
-                                'net_constraint': 1.0,  # 高约束=无机会
-                                'net_effective_size': 0.0,
-                                'net_local_clustering': 0.0,
-                            }
-                            for key, value in default_net_features.items():
-                                stock_df[key] = value
-                            logger.debug(f"股票 {code} 使用默认网络特征（社区 ID = -1）")
-
-                        # 使用缓存时，也需要重新生成市场-网络交叉特征
-                        # 因为网络特征可能已更新，且交叉特征依赖于网络特征
-                        stock_df = self.feature_engineer.create_market_network_interaction_features(
-                            stock_df, community_ids=self.community_ids)
-
-                        # 使用缓存时，也需要重新生成异常检测特征
-                        stock_df = self.feature_engineer.create_anomaly_features(stock_df, use_shift=use_shift)
-
-            # 注意：非缓存情况下，市场-网络交叉特征和异常检测特征在特征计算完成后生成
-
-            if not use_cache_predict:
-                # 计算特征
-                # 获取恒生指数数据
-                hsi_df = get_hsi_data_tencent(period_days=1460)
-                if hsi_df is None or hsi_df.empty:
-                    hsi_df = None
-
-                # 获取美股市场数据
-                us_market_df = us_market_data.get_all_us_market_data(period_days=1460)
+        except Exception as e:
+            print(f"预测失败 {code}: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
 
-                # 如果指定了预测日期，过滤数据到该日期
-                if predict_date and hsi_df is not None:
-                    if not isinstance(hsi_df.index, pd.DatetimeIndex):
-                        hsi_df.index = pd.to_datetime(hsi_df.index)
-                    hsi_df = hsi_df[hsi_df.index.strftime('%Y-%m-%d') <= predict_date_str]
-                    if us_market_df is not None and not isinstance(us_market_df.index, pd.DatetimeIndex):
-                        us_market_df.index = pd.to_datetime(us_market_df.index)
-                    if us_market_df is not None:
-                        us_market_df = us_market_df[us_market_df.index.strftime('%Y-%m-%d') <= predict_date_str]
+    def build_prediction_frame(self, code, predict_date=None, use_feature_cache=True, mode='production',
+                               feature_columns=None):
+        """构建单只股票的预测特征（与预测周期无关，可供多个周期的模型共用）
 
-                # 计算技术指标（80个指标）
-                stock_df = self.feature_engineer.calculate_technical_features(stock_df, use_shift=use_shift, code=code)
+        Args:
+            code: 股票代码
+            predict_date: 预测日期 (YYYY-MM-DD)，默认使用最新交易日
+            use_feature_cache: 是否使用特征缓存（默认True）
+            mode: 预测模式（'production' 使用当日数据，'backtest' 使用 T-1 数据）
+            feature_columns: 只计算这些特征及其依赖（默认 None 计算全部特征）；
+                无法解析到特征节点的特征会退回完整计算
 
-                # 计算多周期指标
-                stock_df = self.feature_engineer.calculate_multi_period_metrics(stock_df)
+        Returns:
+            DataFrame: 特征（每行一个交易日），无数据时返回 None
+        """
+        # 根据 mode 确定 use_shift
+        use_shift = (mode == 'backtest')
 
-                # 计算相对强度指标
-                if hsi_df is not None:
-                    stock_df = self.feature_engineer.calculate_relative_strength(stock_df, hsi_df)
+        # 移除代码中的.HK后缀
+        stock_code = code.replace('.HK', '')
 
-                    # 合并 HSI 市场状态特征
-                    hsi_regime_df_predict = None
-                    try:
-                        regime_detector = RegimeDetector()
-                        hsi_with_regime = regime_detector.calculate_features(hsi_df.copy(), use_shift=use_shift)
-                        rename_map = {c: f'HSI_{c}' for c in RegimeDetector.get_feature_names()}
-                        hsi_regime_df_predict = hsi_with_regime[RegimeDetector.get_feature_names()].rename(columns=rename_map)
-                    except Exception as e:
-                        logger.warning(f"HSI 市场状态特征计算失败: {e}")
-                    if hsi_regime_df_predict is not None:
-                        stock_df = self.feature_engineer.calculate_hsi_regime_features(stock_df, hsi_regime_df_predict)
+        # 获取股票数据
+        stock_df = get_hk_stock_data_tencent(stock_code, period_days=1460)
+        if stock_df is None or stock_df.empty:
+            return None
 
-                # 创建资金流向特征
-                stock_df = self.feature_engineer.create_smart_money_features(stock_df, use_shift=use_shift)
+        # 如果指定了预测日期，过滤数据到该日期
+        if predict_date:
+            predict_date = pd.to_datetime(predict_date)
+            predict_date_str = predict_date.strftime('%Y-%m-%d')
 
-                # 创建市场环境特征（包含港股和美股）
-                if hsi_df is not None:
-                    stock_df = self.feature_engineer.create_market_environment_features(stock_df, hsi_df, us_market_df, use_shift=use_shift)
+            # 确保索引是 datetime 类型
+            if not isinstance(stock_df.index, pd.DatetimeIndex):
+                stock_df.index = pd.to_datetime(stock_df.index)
 
-                # 添加基本面特征
-                fundamental_features = self.feature_engineer.create_fundamental_features(code)
-                for key, value in fundamental_features.items():
-                    stock_df[key] = value
+            # 使用字符串比较避免时区问题
+            stock_df = stock_df[stock_df.index.strftime('%Y-%m-%d') <= predict_date_str]
 
-                # 添加股票类型特征
-                stock_type_features = self.feature_engineer.create_stock_type_features(code, stock_df)
-                for key, value in stock_type_features.items():
-                    stock_df[key] = value
+            if stock_df.empty:
+                logger.warning(f"股票 {code} 在日期 {predict_date_str} 之前没有数据")
+                return None
 
-                # 添加情感特征
-                sentiment_features = self.feature_engineer.create_sentiment_features(code, stock_df)
-                for key, value in sentiment_features.items():
-                    stock_df[key] = value
+        # 获取数据最后日期作为缓存键
+        last_date = stock_df.index[-1].strftime('%Y%m%d') if hasattr(stock_df.index[-1], 'strftime') else str(stock_df.index[-1])[:10].replace('-', '')
+
+        # 尝试加载特征缓存（使用 use_shift 参数生成缓存键）
+        cache_key = _get_feature_cache_key(stock_code, last_date, use_shift=use_shift)
+        cache_file_path = _get_feature_cache_file_path(cache_key)
+
+        use_cache_predict = False
+        if use_feature_cache and _is_feature_cache_valid(cache_file_path):
+            # 使用缓存（验证 use_shift 是否匹配）
+            cached_data = _load_feature_cache(cache_file_path, use_shift=use_shift)
+            if cached_data is not None and 'stock_df' in cached_data:
+                cached_df = cached_data['stock_df']
+                # 检查新特征列是否存在（GARCH + HSI Regime）
+                required_new_cols = ['GARCH_Conditional_Vol', 'HSI_Market_Regime', 'net_composite_centrality']
+                missing_cols = [c for c in required_new_cols if c not in cached_df.columns]
+                if missing_cols:
+                    logger.debug(f"预测缓存缺少新特征: {missing_cols}，重新计算...")
+                else:
+                    stock_df = cached_df
+                    logger.debug(f"预测使用特征缓存: {cache_key}")
+                    use_cache_predict = True
+                    # 即使使用缓存，也要重新生成网络特征（跨截面的，可能已更新）、
+                    # 市场-网络交叉特征（使用训练时保存的社区 ID）和异常检测特征
+                    refresh_context = {
+                        'code': code,
+                        'use_shift': use_shift,
+                        'network_features': _load_network_features(),
+                        'community_ids': self.community_ids,
+                    }
+                    stock_df = self.feature_registry.evaluate(stock_df, refresh_context, nodes=CACHE_REFRESH_NODES)
+                    if FEATURE_FLOAT32:
+                        stock_df = downcast_features(stock_df)
 
-                # 添加主题特征（LDA主题建模）
-                topic_features = self.feature_engineer.create_topic_features(code, stock_df)
-                for key, value in topic_features.items():
-                    stock_df[key] = value
+        if not use_cache_predict:
+            # 计算特征
+            # 获取恒生指数数据
+            hsi_df = get_hsi_data_tencent(period_days=1460)
+            if hsi_df is None or hsi_df.empty:
+                hsi_df = None
 
-                # 添加主题情感交互特征（移到循环外，避免重复调用）
-                topic_sentiment_interaction = self.feature_engineer.create_topic_sentiment_interaction_features(code, stock_df)
-                for key, value in topic_sentiment_interaction.items():
-                    stock_df[key] = value
+            # 获取美股市场数据
+            us_market_df = us_market_data.get_all_us_market_data(period_days=1460)
 
-                # 添加预期差距特征（移到循环外，避免重复调用）
-                expectation_gap = self.feature_engineer.create_expectation_gap_features(code, stock_df)
-                for key, value in expectation_gap.items():
-                    stock_df[key] = value
+            # 如果指定了预测日期，过滤数据到该日期
+            if predict_date and hsi_df is not None:
+                if not isinstance(hsi_df.index, pd.DatetimeIndex):
+                    hsi_df.index = pd.to_datetime(hsi_df.index)
+                hsi_df = hsi_df[hsi_df.index.strftime('%Y-%m-%d') <= predict_date_str]
+                if us_market_df is not None and not isinstance(us_market_df.index, pd.DatetimeIndex):
+                    us_market_df.index = pd.to_datetime(us_market_df.index)
+                if us_market_df is not None:
+                    us_market_df = us_market_df[us_market_df.index.strftime('%Y-%m-%d') <= predict_date_str]
 
-                # 添加板块特征
-                sector_features = self.feature_engineer.create_sector_features(code, stock_df)
-                for key, value in sector_features.items():
-                    stock_df[key] = value
-
-                # 添加网络特征（从预计算文件加载，与训练时保持一致）
-                # 如果股票没有网络特征，使用默认值（社区 ID = -1 表示未知）
-                network_features_file = 'data/network_features/network_features_for_ml.json'
-                has_network_features = False
-                if os.path.exists(network_features_file):
-                    try:
-                        with open(network_features_file, 'r') as f:
-                            network_features_data = json.load(f)
-                        if code in network_features_data:
-                            net_features = network_features_data[code]
-                            for key, value in net_features.items():
-                                stock_df[key] = value
-                            has_network_features = True
-                    except Exception as e:
-                        logger.debug(f"网络特征加载失败: {e}")
-
-                if not has_network_features:
-                    # 为缺失网络特征的股票提供默认值（使用新的连续值特征）
-                    default_net_features = {
-                        'net_degree_centrality': 0.0,
-                        'net_betweenness_centrality': 0.0,
-                        'net_eigenvector_centrality': 0.0,
-                        'net_closeness_centrality': 0.0,
-                        'net_composite_centrality': 0.0,
-                        'net_community_id': -1,  # -1 表示未知社区
-                        'net_community_size': 0,
-                        'net_community_centrality_rank': -1,  # -1表示未知社区
-                        'net_sector_cohesion': 0.0,
-                        'net_mst_degree': 0,
-                        'net_mst_neighbor_sectors': 0,
-                        'net_inter_community_ratio': 0.0,
-                        # 结构洞特征默认值
-                        'net_constraint': 1.0,  # 高约束=无机会
-                        'net_effective_size': 0.0,
-                        'net_local_clustering': 0.0,
-                    }
-                    for key, value in default_net_features.items():
-                        stock_df[key] = value
-                    logger.debug(f"股票 {code} 使用默认网络特征（社区 ID = -1）")
+            # 计算 HSI 市场状态特征
+            hsi_regime_df_predict = None
+            if hsi_df is not None:
+                try:
+                    regime_detector = RegimeDetector()
+                    hsi_with_regime = regime_detector.calculate_features(hsi_df.copy(), use_shift=use_shift)
+                    rename_map = {c: f'HSI_{c}' for c in RegimeDetector.get_feature_names()}
+                    hsi_regime_df_predict = hsi_with_regime[RegimeDetector.get_feature_names()].rename(columns=rename_map)
+                except Exception as e:
+                    logger.warning(f"HSI 市场状态特征计算失败: {e}")
 
-                # 添加事件驱动特征（9个，与训练时保持一致）
-                stock_df = self.feature_engineer.create_event_driven_features(code, stock_df)
+            feature_context = {
+                'code': code,
+                'use_shift': use_shift,
+                'hsi_df': hsi_df,
+                'us_market_df': us_market_df,
+                'hsi_regime_df': hsi_regime_df_predict,
+                'network_features': _load_network_features(),
+                # 市场-网络交叉特征依赖社区 ID，节点缓存键需要包含
+                'community_ids': self.community_ids,
+                'cache_key': (cache_key, tuple(self.community_ids or ())),
+            }
 
-                # 生成技术指标与基本面交互特征（与训练时保持一致）
-                stock_df = self.feature_engineer.create_technical_fundamental_interactions(stock_df)
+            # 只计算模型使用的特征（使用训练时记录的特征清单解析依赖）
+            plan = None
+            if feature_columns:
+                plan = self.feature_registry.resolve(feature_columns, stock_df.columns)
+                if plan is not None:
+                    logger.debug(f"按需计算特征节点: {[node.name for node, _ in plan]}")
+            stock_df = self.feature_registry.evaluate(stock_df, feature_context, plan=plan)
+            if FEATURE_FLOAT32:
+                stock_df = downcast_features(stock_df)
+
+            # 保存特征缓存（只保存完整特征，训练时会读取；保存 use_shift 信息）
+            if use_feature_cache and plan is None:
+                _save_feature_cache(cache_file_path, {'stock_df': stock_df}, use_shift=use_shift)
+                logger.debug(f"特征缓存已保存: {cache_key}")
 
-                # 生成交叉特征（与训练时保持一致）
-                stock_df = self.feature_engineer.create_interaction_features(stock_df)
+        return stock_df
 
-                # 生成市场-网络交叉特征（需要在所有市场特征添加之后）
-                # 使用训练时保存的社区 ID 列表，确保特征一致性
-                stock_df = self.feature_engineer.create_market_network_interaction_features(
-                    stock_df, community_ids=self.community_ids)
+    def _latest_feature_row(self, stock_df):
+        """取最新一行特征，补齐缺失特征、编码分类特征并投影到本模型的 feature_columns
 
-                # 添加异常检测特征（复用 use_shift）
-                stock_df = self.feature_engineer.create_anomaly_features(stock_df, use_shift=use_shift)
+        Returns:
+            tuple: (最新一行 DataFrame, 模型输入数组)
+        """
+        # 获取最新数据（复制，避免多个模型共用同一特征帧时互相修改）
+        latest_data = stock_df.iloc[-1:].copy()
+
+        # 确保所有事件驱动特征都存在（容错处理）
+        event_features = [
+            'Ex_Dividend_In_7d', 'Ex_Dividend_In_30d', 'Dividend_Frequency_12m',
+            'Earnings_Announcement_In_7d', 'Earnings_Announcement_In_30d', 'Days_Since_Last_Earnings',
+            'Earnings_Surprise_Score', 'Earnings_Surprise_Avg_3', 'Earnings_Surprise_Trend'
+        ]
+        # Days_Since_Last_Earnings 使用 -1 表示未知，其他使用 0
+        for feat in event_features:
+            if feat not in latest_data.columns:
+                if feat == 'Days_Since_Last_Earnings':
+                    logger.warning(f"警告: 事件驱动特征 {feat} 不存在，使用默认值-1（未知）")
+                    latest_data[feat] = -1
+                else:
+                    logger.warning(f"警告: 事件驱动特征 {feat} 不存在，使用默认值0")
+                    latest_data[feat] = 0.0
 
-                # 保存特征缓存（保存 use_shift 信息）
-                if use_feature_cache:
-                    _save_feature_cache(cache_file_path, {'stock_df': stock_df}, use_shift=use_shift)
-                    logger.debug(f"特征缓存已保存: {cache_key}")
+        # 确保所有基本面特征都存在（容错处理）
+        # 当 create_fundamental_features 获取数据失败时，需要提供默认值
+        # 使用 NaN 表示缺失，让 CatBoost 自动学习缺失模式
+        fundamental_features_default = {
+            'PE': float('nan'), 'PB': float('nan'), 'Market_Cap': float('nan'),
+            'ROE': float('nan'), 'ROA': float('nan'), 'Dividend_Yield': 0.0,
+            'EPS': float('nan'), 'Net_Margin': float('nan'), 'Gross_Margin': float('nan')
+        }
+        for feat, default_val in fundamental_features_default.items():
+            if feat not in latest_data.columns:
+                logger.warning(f"警告: 基本面特征 {feat} 不存在，使用默认值{default_val}")
+                latest_data[feat] = default_val
+
+        # 确保所有基本面交互特征都存在（容错处理）
+        # 这些特征由 create_interaction_features 生成，当基本面数据缺失时需要默认值
+        interaction_features_default = [
+            # Outperforms_HSI 系列
+            'Outperforms_HSI_ROE', 'Outperforms_HSI_ROA', 'Outperforms_HSI_Net_Margin',
+            'Outperforms_HSI_Gross_Margin', 'Outperforms_HSI_Dividend_Yield',
+            # Strong_Volume_Up 系列
+            'Strong_Volume_Up_ROE', 'Strong_Volume_Up_ROA', 'Strong_Volume_Up_Net_Margin',
+            'Strong_Volume_Up_Gross_Margin', 'Strong_Volume_Up_Dividend_Yield',
+            # Weak_Volume_Down 系列
+            'Weak_Volume_Down_ROE', 'Weak_Volume_Down_ROA', 'Weak_Volume_Down_Net_Margin',
+            'Weak_Volume_Down_Gross_Margin', 'Weak_Volume_Down_Dividend_Yield',
+            # Trend 系列 (3d, 5d, 10d, 20d, 60d)
+            '3d_Trend_ROE', '3d_Trend_ROA', '3d_Trend_Net_Margin', '3d_Trend_Gross_Margin', '3d_Trend_Dividend_Yield',
+            '5d_Trend_ROE', '5d_Trend_ROA', '5d_Trend_Net_Margin', '5d_Trend_Gross_Margin', '5d_Trend_Dividend_Yield',
+            '10d_Trend_ROE', '10d_Trend_ROA', '10d_Trend_Net_Margin', '10d_Trend_Gross_Margin', '10d_Trend_Dividend_Yield',
+            '20d_Trend_ROE', '20d_Trend_ROA', '20d_Trend_Net_Margin', '20d_Trend_Gross_Margin', '20d_Trend_Dividend_Yield',
+            '60d_Trend_ROE', '60d_Trend_ROA', '60d_Trend_Net_Margin', '60d_Trend_Gross_Margin', '60d_Trend_Dividend_Yield',
+        ]
+        for feat in interaction_features_default:
+            if feat not in latest_data.columns:
+                logger.debug(f"基本面交互特征 {feat} 不存在，使用默认值0")
+                latest_data[feat] = 0.0
+
+        # 准备特征
+        if len(self.feature_columns) == 0:
+            raise ValueError("模型未训练，请先调用train()方法")
+
+        # 处理分类特征（使用训练时的编码器）
+        for col, encoder in self.categorical_encoders.items():
+            if col in latest_data.columns:
+                try:
+                    # 先填充NaN值为'unknown'，避免CatBoost分类特征NaN错误
+                    latest_data[col] = latest_data[col].fillna('unknown').astype(str)
+                    latest_data[col] = encoder.transform(latest_data[col])
+                except ValueError:
+                    # 处理未见过的类别，映射到0
+                    logger.warning(f"警告: 分类特征 {col} 包含训练时未见过的类别，使用默认值")
+                    latest_data[col] = 0
 
-            # 获取最新数据
-            latest_data = stock_df.iloc[-1:]
+        X = latest_data[self.feature_columns].values
+        # 确保X中没有NaN值（除了分类特征已处理，数值特征可能也有NaN）
 
-            # 确保所有事件驱动特征都存在（容错处理）
-            event_features = [
-                'Ex_Dividend_In_7d', 'Ex_Dividend_In_30d', 'Dividend_Frequency_12m',
-                'Earnings_Announcement_In_7d', 'Earnings_Announcement_In_30d', 'Days_Since_Last_Earnings',
-                'Earnings_Surprise_Score', 'Earnings_Surprise_Avg_3', 'Earnings_Surprise_Trend'
-            ]
-            # Days_Since_Last_Earnings 使用 -1 表示未知，其他使用 0
-            for feat in event_features:
-                if feat not in latest_data.columns:
-                    if feat == 'Days_Since_Last_Earnings':
-                        logger.warning(f"警告: 事件驱动特征 {feat} 不存在，使用默认值-1（未知）")
-                        latest_data[feat] = -1
-                    else:
-                        logger.warning(f"警告: 事件驱动特征 {feat} 不存在，使用默认值0")
-                        latest_data[feat] = 0.0
-
-            # 确保所有基本面特征都存在（容错处理）
-            # 当 create_fundamental_features 获取数据失败时，需要提供默认值
-            # 使用 NaN 表示缺失，让 CatBoost 自动学习缺失模式
-            fundamental_features_default = {
-                'PE': float('nan'), 'PB': float('nan'), 'Market_Cap': float('nan'),
-                'ROE': float('nan'), 'ROA': float('nan'), 'Dividend_Yield': 0.0,
-                'EPS': float('nan'), 'Net_Margin': float('nan'), 'Gross_Margin': float('nan')
-            }
-            for feat, default_val in fundamental_features_default.items():
-                if feat not in latest_data.columns:
-                    logger.warning(f"警告: 基本面特征 {feat} 不存在，使用默认值{default_val}")
-                    latest_data[feat] = default_val
-
-            # 确保所有基本面交互特征都存在（容错处理）
-            # 这些特征由 create_interaction_features 生成，当基本面数据缺失时需要默认值
-            interaction_features_default = [
-                # Outperforms_HSI 系列
-                'Outperforms_HSI_ROE', 'Outperforms_HSI_ROA', 'Outperforms_HSI_Net_Margin',
-                'Outperforms_HSI_Gross_Margin', 'Outperforms_HSI_Dividend_Yield',
-                # Strong_Volume_Up 系列
-                'Strong_Volume_Up_ROE', 'Strong_Volume_Up_ROA', 'Strong_Volume_Up_Net_Margin',
-                'Strong_Volume_Up_Gross_Margin', 'Strong_Volume_Up_Dividend_Yield',
-                # Weak_Volume_Down 系列
-                'Weak_Volume_Down_ROE', 'Weak_Volume_Down_ROA', 'Weak_Volume_Down_Net_Margin',
-                'Weak_Volume_Down_Gross_Margin', 'Weak_Volume_Down_Dividend_Yield',
-                # Trend 系列 (3d, 5d, 10d, 20d, 60d)
-                '3d_Trend_ROE', '3d_Trend_ROA', '3d_Trend_Net_Margin', '3d_Trend_Gross_Margin', '3d_Trend_Dividend_Yield',
-                '5d_Trend_ROE', '5d_Trend_ROA', '5d_Trend_Net_Margin', '5d_Trend_Gross_Margin', '5d_Trend_Dividend_Yield',
-                '10d_Trend_ROE', '10d_Trend_ROA', '10d_Trend_Net_Margin', '10d_Trend_Gross_Margin', '10d_Trend_Dividend_Yield',
-                '20d_Trend_ROE', '20d_Trend_ROA', '20d_Trend_Net_Margin', '20d_Trend_Gross_Margin', '20d_Trend_Dividend_Yield',
-                '60d_Trend_ROE', '60d_Trend_ROA', '60d_Trend_Net_Margin', '60d_Trend_Gross_Margin', '60d_Trend_Dividend_Yield',
-            ]
-            for feat in interaction_features_default:
-                if feat not in latest_data.columns:
-                    logger.debug(f"基本面交互特征 {feat} 不存在，使用默认值0")
-                    latest_data[feat] = 0.0
+        # 使用 DataFrame 来安全处理混合类型数据
+        df_temp = pd.DataFrame(X, columns=self.feature_columns)
 
-            # 准备特征
-            if len(self.feature_columns) == 0:
-                raise ValueError("模型未训练，请先调用train()方法")
+        # 分别处理数值列和分类列
+        categorical_cols = list(self.categorical_encoders.keys())
+        numeric_cols = [col for col in self.feature_columns if col not in categorical_cols]
 
-            # 处理分类特征（使用训练时的编码器）
-            for col, encoder in self.categorical_encoders.items():
-                if col in latest_data.columns:
-                    try:
-                        # 先填充NaN值为'unknown'，避免CatBoost分类特征NaN错误
-                        latest_data[col] = latest_data[col].fillna('unknown').astype(str)
-                        latest_data[col] = encoder.transform(latest_data[col])
-                    except ValueError:
-                        # 处理未见过的类别，映射到0
-                        logger.warning(f"警告: 分类特征 {col} 包含训练时未见过的类别，使用默认值")
-                        latest_data[col] = 0
+        # 填充数值列的 NaN
+        for col in numeric_cols:
+            if col in df_temp.columns:
+                df_temp[col] = df_temp[col].fillna(0.0)
 
-            X = latest_data[self.feature_columns].values
-            # 确保X中没有NaN值（除了分类特征已处理，数值特征可能也有NaN）
-            import numpy as np
-            import pandas as pd
+        # 分类列已经在前面处理过（用 LabelEncoder 转换），这里不需要再处理
+        # 转换回 numpy 数组
+        X = feature_matrix(df_temp, self.feature_columns, float32=FEATURE_FLOAT32)
 
-            # 使用 DataFrame 来安全处理混合类型数据
-            df_temp = pd.DataFrame(X, columns=self.feature_columns)
+        return latest_data, X
 
-            # 分别处理数值列和分类列
-            categorical_cols = list(self.categorical_encoders.keys())
-            numeric_cols = [col for col in self.feature_columns if col not in categorical_cols]
+    def predict_from_frames(self, frames):
+        """对已构建的特征批量预测（所有股票堆叠后一次调用 CatBoost）
 
-            # 填充数值列的 NaN
-            for col in numeric_cols:
-                if col in df_temp.columns:
-                    df_temp[col] = df_temp[col].fillna(0.0)
+        Args:
+            frames: {股票代码: build_prediction_frame 返回的特征 DataFrame}
 
-            # 分类列已经在前面处理过（用 LabelEncoder 转换），这里不需要再处理
-            # 转换回 numpy 数组
-            X = df_temp.values
+        Returns:
+            dict: {股票代码: 预测结果}，格式与 predict 相同
+        """
+        if not frames:
+            return {}
 
-            # 使用 CatBoost 模型直接预测
-            from catboost import Pool
+        codes = list(frames.keys())
+        latest_rows = []
+        X_rows = []
+        for code in codes:
+            latest_data, X = self._latest_feature_row(frames[code])
+            latest_rows.append(latest_data)
+            X_rows.append(X)
 
-            # 分类特征已用 LabelEncoder 编码为数值，不使用 cat_features 参数
-            # 因为 X 是 float 类型的 numpy 数组，CatBoost 不接受 cat_features
-            test_pool = Pool(data=X)
-            proba = self.catboost_model.predict_proba(test_pool)[0]
-            prediction = self.catboost_model.predict(test_pool)[0]
+        # 分类特征已用 LabelEncoder 编码为数值，使用编译后的评分器（不重建 Pool）
+        proba = self.get_fast_scorer().predict_encoded(np.vstack(X_rows))
 
-            return {
+        return {
+            code: {
                 'code': code,
                 'name': STOCK_NAMES.get(code, code),
-                'prediction': int(prediction),
-                'probability': float(proba[1]),
-                'current_price': float(latest_data['Close'].values[0]),
-                'date': latest_data.index[0]
+                'prediction': int(proba[i] > 0.5),
+                'probability': float(proba[i]),
+                'current_price': float(latest_rows[i]['Close'].values[0]),
+                'date': latest_rows[i].index[0]
             }
-
-        except Exception as e:
-            print(f"预测失败 {code}: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+            for i, code in enumerate(codes)
+        }
 
     def save_model(self, filepath):
         """保存模型"""
@@ -6061,24 +6048,42 @@ class CatBoostModel(BaseTradingModel):
         }
         with open(filepath, 'wb') as f:
             pickle.dump(model_data, f)
+        # 同时保存原生格式（.cbm + .meta.json），加载时优先使用，无需 pickle
+        save_native(filepath, model_data)
         print(f"CatBoost 模型已保存到 {filepath}")
 
     def load_model(self, filepath):
-        """加载模型"""
-        with open(filepath, 'rb') as f:
-            model_data = pickle.load(f)
+        """加载模型（优先读取原生 .cbm 格式；经进程级模型注册表，同一文件只加载一次）"""
+        model_data = get_model_registry().load_model_data(filepath)
         self.catboost_model = model_data['catboost_model']
         self.feature_columns = model_data['feature_columns']
         self.actual_n_estimators = model_data['actual_n_estimators']
         self.horizon = model_data.get('horizon', 1)
         self.model_type = model_data.get('model_type', 'catboost')
-        self.categorical_encoders = model_data.get('categorical_encoders', {})
+        self.categorical_encoders = dict(model_data.get('categorical_encoders', {}))
         self.community_ids = model_data.get('community_ids', None)  # 恢复社区 ID 列表
         if self.community_ids:
             print(f"CatBoost 模型已从 {filepath} 加载（社区 ID: {self.community_ids}）")
         else:
             print(f"CatBoost 模型已从 {filepath} 加载")
 
+    def get_fast_scorer(self, **kwargs):
+        """低延迟评分器（编码表、列映射和树结构只编译一次；模型重新训练或加载后自动重建）
+
+        Args:
+            **kwargs: 传给 FastScorer（如 calibrator、max_batch）；指定时总是重建
+
+        Returns:
+            FastScorer: 单行 / 小批量评分器
+        """
+        if self.catboost_model is None:
+            raise ValueError("模型未训练，请先调用train()方法")
+        scorer = getattr(self, '_fast_scorer', None)
+        if kwargs or scorer is None or scorer.catboost_model is not self.catboost_model:
+            scorer = FastScorer.from_model(self, **kwargs)
+            self._fast_scorer = scorer
+        return scorer
+
     def predict_proba(self, X):
         """
         预测概率（用于回测评估器）
@@ -6191,6 +6196,72 @@ class CatBoostModel(BaseTradingModel):
         return round(threshold, 2)
 
 
+def predict_multi_horizon(models, codes, predict_date=None, use_feature_cache=True, mode='production'):
+    """多周期批量预测：每只股票只构建一次特征，所有周期、所有股票批量评分
+
+    特征与预测周期无关（只有标签依赖周期），因此用一个模型构建特征帧，
+    再投影到各周期模型的 feature_columns 和分类编码器上。
+
+    Args:
+        models: {周期: CatBoostModel}（可包含 'loaded' 等非模型键，会被忽略）
+        codes: 股票代码列表
+        predict_date: 预测日期 (YYYY-MM-DD)，默认使用最新交易日
+        use_feature_cache: 是否使用特征缓存（默认True）
+        mode: 预测模式（'production' 或 'backtest'）
+
+    Returns:
+        dict: {股票代码: {周期: 预测结果或 None}}
+    """
+    horizon_models = {h: m for h, m in models.items() if isinstance(h, int) and m is not None}
+    results = {code: {h: None for h in horizon_models} for code in codes}
+    if not horizon_models:
+        return results
+
+    base_model = horizon_models[max(horizon_models)]
+
+    # 只计算各周期模型用到的特征（并集）
+    feature_columns = list(dict.fromkeys(
+        col for model in horizon_models.values() for col in (model.feature_columns or [])))
+
+    frames = {}
+    for code in codes:
+        try:
+            stock_df = base_model.build_prediction_frame(
+                code, predict_date=predict_date, use_feature_cache=use_feature_cache, mode=mode,
+                feature_columns=feature_columns or None)
+            if stock_df is not None and not stock_df.empty:
+                frames[code] = stock_df
+        except Exception as e:
+            logger.warning(f"构建 {code} 预测特征失败: {e}")
+
+    for horizon, model in horizon_models.items():
+        model_frames = frames
+        if model.community_ids != base_model.community_ids:
+            # 市场-网络交叉特征依赖模型训练时的社区 ID，只需对最新一行重新生成
+            model_frames = {
+                code: model.feature_engineer.create_market_network_interaction_features(
+                    stock_df.iloc[-1:].copy(), community_ids=model.community_ids)
+                for code, stock_df in frames.items()
+            }
+
+        try:
+            predictions = model.predict_from_frames(model_frames)
+        except Exception as e:
+            # 批量失败时逐只预测，避免单只股票的特征问题影响全部
+            logger.warning(f"{horizon}d 模型批量预测失败，改为逐只预测: {e}")
+            predictions = {}
+            for code, stock_df in model_frames.items():
+                try:
+                    predictions.update(model.predict_from_frames({code: stock_df}))
+                except Exception as single_error:
+                    logger.warning(f"预测 {code} {horizon}d 失败: {single_error}")
+
+        for code, prediction in predictions.items():
+            results[code][horizon] = prediction
+
+    return results
+
+
 class DynamicMarketStrategy:
     """动态市场策略 - 根据市场状态动态选择融合方法
     
@@ -6713,7 +6784,7 @@ class EnsembleModel:
         
         # 加载 CatBoost 模型
         catboost_path = f'data/ml_trading_model_catboost{horizon_suffix}.pkl'
-        if os.path.exists(catboost_path):
+        if model_exists(catboost_path):
             self.catboost_model.load_model(catboost_path)
             logger.info(f"CatBoost 模型已加载")
         else:
@@ -7062,6 +7133,12 @@ def main():
     parser.add_argument('--fusion-method', type=str, default='weighted', 
                        choices=['average', 'weighted', 'voting', 'dynamic-market', 'advanced-dynamic'],
                        help='融合方法: average=简单平均, weighted=加权平均（基于准确率）, voting=投票机制, dynamic-market=动态市场策略（默认weighted）')
+    parser.add_argument('--incremental', action='store_true',
+                       help='CatBoost 增量训练：在上一次的模型上追加树（定期完整重训）')
+    parser.add_argument('--added-trees', type=int, default=60,
+                       help='增量训练每次追加的树数量（默认60）')
+    parser.add_argument('--full-refit-every', type=int, default=10,
+                       help='连续增量训练多少次后完整重训一次（默认10）')
 
     args = parser.parse_args()
 
@@ -7088,7 +7165,12 @@ def main():
         logger.info("=" * 70)
         lgbm_model = None
         gbdt_model = None
-        catboost_model = CatBoostModel()
+        warm_start = None
+        if args.incremental:
+            warm_start = WarmStartCatBoost(
+                WarmStartPolicy(added_trees=args.added_trees, full_refit_every=args.full_refit_every),
+                state_dir=WARM_START_DIR, name=f'catboost_{args.horizon}d')
+        catboost_model = CatBoostModel(warm_start=warm_start)
         ensemble_model = None
     else:
         logger.info("=" * 70)
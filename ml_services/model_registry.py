@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程级模型注册表
+
+同一个模型文件（如 data/ml_trading_model_catboost_20d.pkl）原来在综合分析、融合模型、
+回测和 walk-forward 工具中各自反序列化，每次还要重新读取特征列和分类编码。
+ModelRegistry 按 (路径, 文件修改时间) 缓存加载结果，每个进程只加载一次，文件更新后自动重新加载：
+- CatBoost 模型使用原生 .cbm 格式 + 小的 JSON 元数据文件（特征列、分类编码、社区ID 等），
+  加载时不再经过 pickle；没有原生文件时回退到旧的 pickle 文件
+- preload() 在 fork 工作进程前预加载并冻结 GC，子进程以只读方式共享父进程内存中的模型
+
+使用方法：
+  python3 ml_services/model_registry.py --convert data/ml_trading_model_catboost_*.pkl
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import pickle
+import sys
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_services.logger_config import get_logger
+
+logger = get_logger('model_registry')
+
+NATIVE_SUFFIX = '.cbm'
+META_SUFFIX = '.meta.json'
+
+
+def native_paths(filepath: str):
+    """模型文件对应的原生模型文件和元数据文件路径（xxx.pkl -> xxx.cbm, xxx.meta.json）"""
+    base = os.path.splitext(filepath)[0]
+    return base + NATIVE_SUFFIX, base + META_SUFFIX
+
+
+def has_native(filepath: str) -> bool:
+    """是否存在不旧于 pickle 文件的原生模型文件"""
+    model_path, meta_path = native_paths(filepath)
+    if not (os.path.exists(model_path) and os.path.exists(meta_path)):
+        return False
+    if os.path.exists(filepath) and filepath != model_path:
+        return os.path.getmtime(meta_path) >= os.path.getmtime(filepath)
+    return True
+
+
+def model_exists(filepath: str) -> bool:
+    """模型文件（pickle 或原生格式）是否存在"""
+    return os.path.exists(filepath) or has_native(filepath)
+
+
+def save_native(filepath: str, model_data: Dict):
+    """
+    以原生格式保存 CatBoost 模型
+
+    参数:
+    - filepath: 模型路径（.pkl 路径，原生文件保存在同名 .cbm / .meta.json）
+    - model_data: 与 pickle 文件相同的字典（catboost_model 为 CatBoostClassifier）
+    """
+    model_path, meta_path = native_paths(filepath)
+    model_data['catboost_model'].save_model(model_path)
+    meta = {key: value for key, value in model_data.items() if key != 'catboost_model'}
+    meta['categorical_encoders'] = {col: np.asarray(encoder.classes_).tolist()
+                                    for col, encoder in (meta.get('categorical_encoders') or {}).items()}
+    # 元数据最后写入：has_native 以元数据文件的修改时间判断原生文件是否完整且最新
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, default=_json_default)
+    os.replace(tmp_path, meta_path)
+
+
+def load_native(filepath: str) -> Dict:
+    """读取原生格式的 CatBoost 模型（返回与 pickle 文件相同结构的字典）"""
+    from catboost import CatBoostClassifier
+    from sklearn.preprocessing import LabelEncoder
+
+    model_path, meta_path = native_paths(filepath)
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        model_data = json.load(f)
+    model = CatBoostClassifier()
+    model.load_model(model_path)
+    model_data['catboost_model'] = model
+
+    encoders = {}
+    for col, classes in (model_data.get('categorical_encoders') or {}).items():
+        encoder = LabelEncoder()
+        encoder.classes_ = np.asarray(classes)
+        encoders[col] = encoder
+    model_data['categorical_encoders'] = encoders
+    return model_data
+
+
+def _load_pickle(filepath: str):
+    with open(filepath, 'rb') as f:
+        return pickle.load(f)
+
+
+def _json_default(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class ModelRegistry:
+    """按 (路径, 修改时间) 缓存的模型注册表（进程内共享，只读使用）"""
+
+    def __init__(self):
+        self._entries: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stamp(paths: Iterable[str]) -> tuple:
+        stamp = []
+        for path in paths:
+            stat = os.stat(path)
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamp)
+
+    def get(self, filepath: str, loader: Callable, kind: str = 'object', stamp_paths=None):
+        """
+        获取缓存的加载结果（文件修改后重新加载）
+
+        参数:
+        - filepath: 模型文件路径
+        - loader: 加载函数 loader(filepath)
+        - kind: 缓存类别（同一文件的不同加载方式分开缓存）
+        - stamp_paths: 用于判断文件是否更新的路径（默认 filepath）
+        """
+        key = (kind, os.path.abspath(filepath))
+        stamp = self._stamp(stamp_paths or [filepath])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return entry[1]
+            value = loader(filepath)
+            self._entries[key] = (stamp, value)
+            self.misses += 1
+        logger.debug(f"加载模型: {filepath}")
+        return value
+
+    def load_model_data(self, filepath: str) -> Dict:
+        """
+        加载模型字典（CatBoost 优先读取原生格式，否则读取 pickle）
+
+        返回的字典及其中的模型在进程内共享，调用方不应修改
+        """
+        if has_native(filepath):
+            return self.get(filepath, load_native, kind='native', stamp_paths=native_paths(filepath))
+        return self.get(filepath, _load_pickle, kind='pickle')
+
+    def load_catboost(self, model_path: str):
+        """加载 .cbm 文件为 CatBoostClassifier（如恒指模型）"""
+        def _load(path):
+            from catboost import CatBoostClassifier
+            model = CatBoostClassifier()
+            model.load_model(path)
+            return model
+        return self.get(model_path, _load, kind='cbm')
+
+    def load_json(self, path: str):
+        """加载 JSON 元数据（如特征列表）"""
+        def _load(p):
+            with open(p, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return self.get(path, _load, kind='json')
+
+    def preload(self, filepaths: Iterable[str], freeze: bool = True):
+        """
+        预加载模型（在 fork 工作进程之前调用）
+
+        参数:
+        - filepaths: 模型路径列表（不存在的文件跳过）
+        - freeze: 是否冻结 GC（gc.freeze），避免子进程的垃圾回收触碰共享对象导致内存页被复制
+        """
+        for filepath in filepaths:
+            if model_exists(filepath):
+                self.load_model_data(filepath)
+        if freeze and hasattr(gc, 'freeze'):
+            gc.collect()
+            gc.freeze()
+
+    def evict(self, filepath: str):
+        """移除某个文件的全部缓存"""
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == path]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """进程级模型注册表（fork 出的子进程继承父进程已加载的模型）"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+def convert_to_native(filepath: str) -> bool:
+    """
+    把 pickle 格式的 CatBoost 模型转换为原生格式
+
+    返回:
+    - 是否转换（非 CatBoost 模型文件返回 False）
+    """
+    model_data = _load_pickle(filepath)
+    if not isinstance(model_data, dict) or 'catboost_model' not in model_data:
+        return False
+    save_native(filepath, model_data)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模型注册表工具')
+    parser.add_argument('--convert', type=str, nargs='+', required=True,
+                        help='把 pickle 格式的 CatBoost 模型转换为原生 .cbm + .meta.json（支持通配符）')
+    args = parser.parse_args()
+
+    for pattern in args.convert:
+        for filepath in sorted(glob.glob(pattern)):
+            try:
+                if convert_to_native(filepath):
+                    logger.info(f"已转换: {filepath} -> {native_paths(filepath)[0]}")
+                else:
+                    logger.info(f"跳过（不是 CatBoost 模型）: {filepath}")
+            except Exception as e:
+                logger.error(f"转换失败 {filepath}: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,58 +18,121 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 from config import STOCK_SECTOR_MAPPING
+from ml_services.prediction_store import PredictionStore
+from data_services.trading_calendar import get_trading_calendar, market_for_code
 
-# 历史文件路径
+# 历史存储路径（纳入 git 的是同名 .jsonl 变更日志，SQLite 为本地索引；旧 JSON 文件首次加载时自动迁移）
+HISTORY_DB = 'data/prediction_history.db'
 HISTORY_FILE = 'data/prediction_history.json'
 REPORT_OUTPUT_DIR = 'output'
 
 
+def get_prediction_store() -> PredictionStore:
+    """打开预测历史存储"""
+    return PredictionStore(HISTORY_DB, legacy_json=HISTORY_FILE)
+
+
 def load_prediction_history() -> Dict:
-    """加载预测历史数据"""
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {'predictions': [], 'metadata': {}}
+    """加载预测历史数据（记录带 _row_id，用于评估结果回写）"""
+    with get_prediction_store() as store:
+        return store.load_history()
 
 
-def save_prediction_history(history: Dict):
-    """保存预测历史数据"""
-    history['metadata']['last_updated'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
-    history['metadata']['total_predictions'] = len(history['predictions'])
+def save_prediction_history(history: Dict, records: Optional[List[Dict]] = None):
+    """
+    保存预测历史数据
     
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    参数:
+    - history: 预测历史数据
+    - records: 只回写这些记录（默认回写全部记录）
+    """
+    with get_prediction_store() as store:
+        store.update_records(history['predictions'] if records is None else records)
+        history['metadata']['last_updated'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+        store.set_metadata(last_updated=history['metadata']['last_updated'])
+        history['metadata']['total_predictions'] = store.count()
+
+
+# 价格面板查询时向前容忍的自然日数（目标日非交易日时取此前最近交易日）
+PRICE_ASOF_TOLERANCE_DAYS = 5
 
 
-def count_trading_days(start_date: str, end_date: str, stock_code: str) -> int:
+def count_trading_days(start_date: str, end_date: str, stock_code: str = None) -> int:
     """
-    计算两个日期之间的实际交易日数量
+    计算两个日期之间的实际交易日数量（使用本地交易日历）
     
     参数:
     - start_date: 开始日期 (YYYY-MM-DD)
-    - end_date: 结束日期 (YYYY-MM-DD)
-    - stock_code: 股票代码（用于获取交易日历）
+    - end_date: 结束日期 (YYYY-MM-DD)，不含
+    - stock_code: 股票代码（决定使用港股还是A股交易日历，默认港股）
     
     返回:
     - 交易日数量
     """
-    try:
-        # 使用 yfinance 获取股票数据
-        ticker = yf.Ticker(stock_code)
-        df = ticker.history(start=start_date, end=end_date)
-        return len(df)
-    except Exception as e:
-        print(f"⚠️ 获取交易日历失败: {e}")
-        # 回退到估算（工作日）
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        days = 0
-        current = start
-        while current <= end:
-            if current.weekday() < 5:  # 周一到周五
-                days += 1
-            current += timedelta(days=1)
-        return days
+    return get_trading_calendar(market_for_code(stock_code)).count_between(start_date, end_date)
+
+
+def add_trading_days(date: str, days: int, stock_code: str = None) -> str:
+    """
+    计算 date 之后第 N 个交易日（使用本地交易日历）
+    
+    参数:
+    - date: 起始日期 (YYYY-MM-DD)
+    - days: 交易日数量
+    - stock_code: 股票代码（决定使用港股还是A股交易日历，默认港股）
+    
+    返回:
+    - 目标日期 (YYYY-MM-DD)
+    """
+    return get_trading_calendar(market_for_code(stock_code)).add_trading_days(date, days)
+
+
+def load_price_panel(date_ranges: Dict[str, Tuple[str, str]]) -> Dict[str, pd.Series]:
+    """
+    按股票批量加载收盘价面板（每只股票一次请求，覆盖所需的全部日期）
+    
+    参数:
+    - date_ranges: {股票代码: (最早目标日期, 最晚目标日期)}
+    
+    返回:
+    - {股票代码: 收盘价 Series（索引为 datetime64[D] 交易日，升序）}
+    """
+    panel = {}
+    for stock_code, (first_date, last_date) in date_ranges.items():
+        start = (datetime.strptime(first_date, '%Y-%m-%d') - timedelta(days=PRICE_ASOF_TOLERANCE_DAYS)).strftime('%Y-%m-%d')
+        end = (datetime.strptime(last_date, '%Y-%m-%d') + timedelta(days=PRICE_ASOF_TOLERANCE_DAYS)).strftime('%Y-%m-%d')
+        try:
+            df = yf.Ticker(stock_code).history(start=start, end=end)
+        except Exception as e:
+            print(f"⚠️ 获取 {stock_code} 价格失败: {e}")
+            continue
+        if df.empty:
+            continue
+        # 使用交易所本地日期，避免时区转换导致日期偏移
+        dates = pd.to_datetime(df.index.strftime('%Y-%m-%d')).values.astype('datetime64[D]')
+        closes = pd.Series(df['Close'].to_numpy(dtype=float), index=dates)
+        panel[stock_code] = closes[~closes.index.duplicated(keep='last')].sort_index()
+    return panel
+
+
+def lookup_prices_asof(closes: pd.Series, target_dates: List[str]) -> np.ndarray:
+    """
+    向量化 as-of 查询：目标日收盘价，非交易日取此前最近交易日（容忍 PRICE_ASOF_TOLERANCE_DAYS 天）
+    
+    参数:
+    - closes: load_price_panel 返回的收盘价 Series
+    - target_dates: 目标日期列表 (YYYY-MM-DD)
+    
+    返回:
+    - 收盘价数组，无有效价格处为 NaN
+    """
+    targets = np.array(target_dates, dtype='datetime64[D]')
+    dates = closes.index.values.astype('datetime64[D]')
+    idx = np.searchsorted(dates, targets, side='right') - 1
+    found = idx >= 0
+    safe_idx = np.where(found, idx, 0)
+    found &= (targets - dates[safe_idx]) <= np.timedelta64(PRICE_ASOF_TOLERANCE_DAYS, 'D')
+    return np.where(found, closes.to_numpy(dtype=float)[safe_idx], np.nan)
 
 
 def fetch_price(stock_code: str, date: str) -> Optional[float]:
@@ -83,42 +146,20 @@ def fetch_price(stock_code: str, date: str) -> Optional[float]:
     返回:
     - 收盘价，如果获取失败返回 None
     """
-    try:
-        # 转换股票代码格式: 0700.HK -> 0700.HK (yfinance 格式)
-        ticker = yf.Ticker(stock_code)
-        
-        # 获取日期前后的数据（处理非交易日）
-        date_obj = datetime.strptime(date, '%Y-%m-%d')
-        start = (date_obj - timedelta(days=5)).strftime('%Y-%m-%d')
-        end = (date_obj + timedelta(days=5)).strftime('%Y-%m-%d')
-        
-        df = ticker.history(start=start, end=end)
-        
-        if df.empty:
-            return None
-        
-        # 找到最接近目标日期的交易日
-        df['date'] = df.index.strftime('%Y-%m-%d')
-        target_date = date
-        
-        if target_date in df['date'].values:
-            return float(df[df['date'] == target_date]['Close'].iloc[0])
-        else:
-            # 返回最接近的交易日收盘价
-            closest_dates = df[df.index <= date_obj]
-            if not closest_dates.empty:
-                return float(closest_dates['Close'].iloc[-1])
-            return None
-            
-    except Exception as e:
-        print(f"⚠️ 获取 {stock_code} 价格失败: {e}")
+    panel = load_price_panel({stock_code: (date, date)})
+    if stock_code not in panel:
         return None
+    price = lookup_prices_asof(panel[stock_code], [date])[0]
+    return None if np.isnan(price) else float(price)
 
 
 def evaluate_predictions(history: Dict, horizon: int = 20, force: bool = False) -> Tuple[Dict, Dict]:
     """
     评估已到期的预测
     
+    先收集所有到期的 (股票, 目标日期)，每只股票只加载一次价格面板，
+    再用向量化 as-of 查询得到退出价格。
+    
     参数:
     - history: 预测历史数据
     - horizon: 预测周期
@@ -128,7 +169,6 @@ def evaluate_predictions(history: Dict, horizon: int = 20, force: bool = False)
     - 更新后的历史数据和统计信息
     """
     now = datetime.now()
-    evaluated_count = 0
     stats = {
         'total': 0,
         'evaluated': 0,
@@ -137,6 +177,8 @@ def evaluate_predictions(history: Dict, horizon: int = 20, force: bool = False)
         'wrong': 0
     }
     
+    due = []
+    changed = []
     for pred in history['predictions']:
         # 只处理指定周期的预测
         if pred.get('horizon') != horizon:
@@ -157,17 +199,16 @@ def evaluate_predictions(history: Dict, horizon: int = 20, force: bool = False)
         # 步骤1：使用已存储的 target_date
         target_date = pred.get('target_date')
         
-        # 步骤2：如果没有存储，则根据 data_date + horizon 计算
+        # 步骤2：如果没有存储，则根据 data_date + horizon 个交易日计算（本地交易日历）
         if not target_date:
             data_date = pred.get('data_date', pred.get('timestamp', '').split('T')[0])
             if data_date:
                 try:
-                    data_date_obj = datetime.strptime(data_date, '%Y-%m-%d')
-                    # 简单计算：data_date + horizon 天（近似交易日）
-                    target_date_obj = data_date_obj + timedelta(days=horizon)
-                    target_date = target_date_obj.strftime('%Y-%m-%d')
+                    datetime.strptime(data_date, '%Y-%m-%d')
+                    target_date = add_trading_days(data_date, horizon, pred.get('stock_code'))
                     # 更新预测记录
                     pred['target_date'] = target_date
+                    changed.append(pred)
                 except ValueError:
                     stats['pending'] += 1
                     continue
@@ -183,22 +224,45 @@ def evaluate_predictions(history: Dict, horizon: int = 20, force: bool = False)
             stats['pending'] += 1
             continue
 
-        # 获取目标日期的收盘价（直接检查是否有价格数据）
-        exit_price = fetch_price(pred['stock_code'], target_date)
+        due.append(pred)
+
+    if not due:
+        if changed:
+            save_prediction_history(history, records=changed)
+        return history, stats
+
+    # 每只股票加载一次价格面板，覆盖其所有到期预测的目标日期
+    due_df = pd.DataFrame({
+        'stock_code': [pred['stock_code'] for pred in due],
+        'target_date': [pred['target_date'] for pred in due],
+    })
+    date_ranges = {
+        code: (group['target_date'].min(), group['target_date'].max())
+        for code, group in due_df.groupby('stock_code')
+    }
+    panel = load_price_panel(date_ranges)
 
-        # NaN 价格视同缺失：否则 NaN 收益会被误判为 'down' 方向，污染准确率统计
-        if exit_price is None or np.isnan(exit_price):
-            print(f"⚠️ 无法获取 {pred['stock_code']} 在 {target_date} 的有效价格")
-            stats['pending'] += 1
-            continue
-        
-        # 计算实际收益
-        entry_price = pred.get('entry_price', 0)
-        if entry_price <= 0:
+    exit_prices = np.full(len(due_df), np.nan)
+    for code, group in due_df.groupby('stock_code'):
+        if code in panel:
+            exit_prices[group.index.to_numpy()] = lookup_prices_asof(panel[code], group['target_date'].tolist())
+
+    entry_prices = np.array([pred.get('entry_price', 0) or 0 for pred in due], dtype=float)
+    # NaN 价格视同缺失：否则 NaN 收益会被误判为 'down' 方向，污染准确率统计
+    valid = ~np.isnan(exit_prices) & (entry_prices > 0)
+    actual_returns = np.divide(exit_prices - entry_prices, entry_prices,
+                               out=np.full(len(due), np.nan), where=entry_prices > 0)
+
+    evaluated_at = now.strftime('%Y-%m-%dT%H:%M:%S')
+    evaluated_count = 0
+    for i, pred in enumerate(due):
+        if not valid[i]:
+            if np.isnan(exit_prices[i]):
+                print(f"⚠️ 无法获取 {pred['stock_code']} 在 {pred['target_date']} 的有效价格")
             stats['pending'] += 1
             continue
-            
-        actual_return = (exit_price - entry_price) / entry_price
+
+        actual_return = float(actual_returns[i])
         actual_direction = 'up' if actual_return > 0 else 'down'
         
         # 判断预测是否正确
@@ -209,7 +273,8 @@ def evaluate_predictions(history: Dict, horizon: int = 20, force: bool = False)
         pred['outcome'] = outcome
         pred['actual_return'] = round(actual_return, 4)
         pred['actual_direction'] = actual_direction
-        pred['evaluated_at'] = now.strftime('%Y-%m-%dT%H:%M:%S')
+        pred['evaluated_at'] = evaluated_at
+        changed.append(pred)
         
         evaluated_count += 1
         stats['evaluated'] += 1
@@ -218,13 +283,88 @@ def evaluate_predictions(history: Dict, horizon: int = 20, force: bool = False)
         else:
             stats['wrong'] += 1
     
-    # 保存更新后的历史
+    # 保存更新后的记录
     if evaluated_count > 0:
-        save_prediction_history(history)
+        save_prediction_history(history, records=changed)
     
     return history, stats
 
 
+def _predictions_frame(history: Dict) -> pd.DataFrame:
+    """预测记录 -> DataFrame（补齐指标计算需要的列）"""
+    df = pd.DataFrame(history.get('predictions', []))
+    for col in ('outcome', 'actual_return', 'predicted_direction', 'horizon', 'target_date',
+                'timestamp', 'data_date', 'stock_code'):
+        if col not in df.columns:
+            df[col] = None
+    return df
+
+
+def _grouped_metrics(df: pd.DataFrame, keys: List[str]) -> Dict:
+    """
+    向量化计算分组指标（与 calculate_metrics 口径一致）
+    
+    参数:
+    - df: 已评估的预测记录
+    - keys: 分组列，为空时整体计算
+    
+    返回:
+    - {分组值: 指标字典}（keys 为空时为 {None: 指标字典}）
+    """
+    if df.empty:
+        return {}
+
+    # 收益指标剔除 NaN，避免无效退出价格污染统计 —— 历史数据中存在 NaN actual_return
+    work = pd.DataFrame({
+        'correct': (df['outcome'] == 'correct').to_numpy(),
+        'ret': pd.to_numeric(df['actual_return'], errors='coerce').to_numpy(dtype=float),
+        'buy': (df['predicted_direction'] == 'up').to_numpy(),
+    }, index=df.index)
+    work['buy_correct'] = work['buy'] & work['correct']
+    work['buy_ret'] = work['ret'].where(work['buy'])
+    if keys:
+        for key in keys:
+            work[key] = df[key].fillna('unknown').to_numpy()
+        grouped = work.groupby(keys, sort=False)
+    else:
+        grouped = work.groupby(np.zeros(len(work), dtype=int), sort=False)
+
+    agg = grouped.agg(
+        total=('correct', 'size'),
+        correct=('correct', 'sum'),
+        n_returns=('ret', 'count'),
+        avg_return=('ret', 'mean'),
+        median_return=('ret', 'median'),
+        std_return=('ret', lambda r: r.std(ddof=0)),
+        buy_signal_count=('buy', 'sum'),
+        buy_wins=('buy_correct', 'sum'),
+        buy_avg_return=('buy_ret', 'mean'),
+    )
+    agg[['avg_return', 'median_return', 'buy_avg_return']] = agg[['avg_return', 'median_return', 'buy_avg_return']].fillna(0.0)
+    agg.loc[agg['n_returns'] <= 1, 'std_return'] = 0.0
+    agg['std_return'] = agg['std_return'].fillna(0.0)
+    agg['accuracy'] = agg['correct'] / agg['total']
+    agg['sharpe_ratio'] = np.where(agg['std_return'] > 0, agg['avg_return'] / agg['std_return'].where(agg['std_return'] > 0), 0.0)
+    agg['buy_win_rate'] = np.where(agg['buy_signal_count'] > 0, agg['buy_wins'] / agg['buy_signal_count'].clip(lower=1), 0.0)
+
+    result = {}
+    for group, row in agg.iterrows():
+        metrics = {
+            'total_predictions': int(row['total']),
+            'correct_predictions': int(row['correct']),
+            'accuracy': round(float(row['accuracy']), 4),
+            'avg_return': round(float(row['avg_return']), 4),
+            'median_return': round(float(row['median_return']), 4),
+            'std_return': round(float(row['std_return']), 4),
+            'sharpe_ratio': round(float(row['sharpe_ratio']), 4),
+            'buy_signal_count': int(row['buy_signal_count']),
+            'buy_win_rate': round(float(row['buy_win_rate']), 4),
+            'buy_avg_return': round(float(row['buy_avg_return']), 4)
+        }
+        result[group if keys else None] = metrics
+    return result
+
+
 def calculate_metrics(predictions: List[Dict]) -> Dict:
     """
     计算性能指标
@@ -235,54 +375,9 @@ def calculate_metrics(predictions: List[Dict]) -> Dict:
     返回:
     - 性能指标字典
     """
-    evaluated = [p for p in predictions if p.get('outcome') is not None]
-    
-    if not evaluated:
-        return {}
-    
-    df = pd.DataFrame(evaluated)
-    
-    # 基础指标
-    total = len(df)
-    correct = len(df[df['outcome'] == 'correct'])
-    accuracy = correct / total if total > 0 else 0
-
-    # 收益指标（剔除 NaN，避免无效退出价格污染统计 —— 历史数据中存在 NaN actual_return）
-    if 'actual_return' in df.columns:
-        returns_series = pd.to_numeric(df['actual_return'], errors='coerce').dropna()
-    else:
-        returns_series = pd.Series(dtype=float)
-    returns = returns_series.values
-    avg_return = float(np.mean(returns)) if len(returns) > 0 else 0
-    median_return = float(np.median(returns)) if len(returns) > 0 else 0
-
-    # 风险指标
-    std_return = float(np.std(returns)) if len(returns) > 1 else 0
-    sharpe = avg_return / std_return if std_return > 0 else 0
-
-    # 买入信号分析（只看预测上涨的）
-    buy_signals = df[df['predicted_direction'] == 'up']
-    if len(buy_signals) > 0:
-        buy_wins = len(buy_signals[buy_signals['outcome'] == 'correct'])
-        buy_win_rate = buy_wins / len(buy_signals)
-        buy_returns = pd.to_numeric(buy_signals['actual_return'], errors='coerce').dropna()
-        buy_avg_return = float(buy_returns.mean()) if len(buy_returns) > 0 else 0
-    else:
-        buy_win_rate = 0
-        buy_avg_return = 0
-    
-    return {
-        'total_predictions': total,
-        'correct_predictions': correct,
-        'accuracy': round(accuracy, 4),
-        'avg_return': round(avg_return, 4),
-        'median_return': round(median_return, 4),
-        'std_return': round(std_return, 4),
-        'sharpe_ratio': round(sharpe, 4),
-        'buy_signal_count': len(buy_signals),
-        'buy_win_rate': round(buy_win_rate, 4),
-        'buy_avg_return': round(buy_avg_return, 4)
-    }
+    df = _predictions_frame({'predictions': predictions})
+    df = df[df['outcome'].notna()]
+    return _grouped_metrics(df, []).get(None, {})
 
 
 # ── 共享指标计算（Markdown 报告与可视化报告复用，单一真相源） ──
@@ -298,20 +393,22 @@ TIME_WINDOWS = [
 WINDOW_ORDER = {'1个月': 1, '3个月': 2, '6个月': 3}
 
 
+def _evaluated_frame(history: Dict) -> pd.DataFrame:
+    """已评估预测的 DataFrame，附加窗口过滤用的日期列（target_date，缺失时取 timestamp 日期）"""
+    df = _predictions_frame(history)
+    df = df[df['outcome'].notna()].copy()
+    df['_eval_date'] = df['target_date'].fillna(df['timestamp'].fillna('').astype(str).str.split('T').str[0])
+    return df
+
+
 def _filter_evaluated(history: Dict, start_date_str: str, end_date_str: str,
                       horizon: Optional[int] = None) -> List[Dict]:
     """筛选日期范围 [start, end] 内已评估的预测（可按周期过滤）"""
-    result = []
-    for p in history['predictions']:
-        if p.get('outcome') is None:
-            continue
-        d = p.get('target_date', p.get('timestamp', '').split('T')[0])
-        if not (start_date_str <= d <= end_date_str):
-            continue
-        if horizon is not None and p.get('horizon') != horizon:
-            continue
-        result.append(p)
-    return result
+    df = _evaluated_frame(history)
+    mask = (df['_eval_date'] >= start_date_str) & (df['_eval_date'] <= end_date_str)
+    if horizon is not None:
+        mask &= df['horizon'] == horizon
+    return [history['predictions'][i] for i in df.index[mask]]
 
 
 def compute_window_horizon_metrics(history: Dict, time_windows: Optional[List] = None,
@@ -327,18 +424,14 @@ def compute_window_horizon_metrics(history: Dict, time_windows: Optional[List] =
         now = datetime.now()
     end_str = now.strftime('%Y-%m-%d')
 
+    df = _evaluated_frame(history)
     result = {}
     for days, _ in time_windows:
         start_str = (now - timedelta(days=days)).strftime('%Y-%m-%d')
-        preds = _filter_evaluated(history, start_str, end_str)
-
-        by_horizon = {1: [], 5: [], 20: []}
-        for p in preds:
-            h = p.get('horizon', 20)
-            if h in by_horizon:
-                by_horizon[h].append(p)
-
-        result[days] = {h: calculate_metrics(ps) for h, ps in by_horizon.items()}
+        window = df[(df['_eval_date'] >= start_str) & (df['_eval_date'] <= end_str)]
+        # 缺失周期的旧记录按 20天统计
+        by_horizon = _grouped_metrics(window.assign(horizon=window['horizon'].fillna(20)), ['horizon'])
+        result[days] = {h: by_horizon.get(h, {}) for h in [1, 5, 20]}
     return result
 
 
@@ -354,13 +447,11 @@ def compute_grouped_metrics(history: Dict, days: int, horizon: int,
     end_str = now.strftime('%Y-%m-%d')
     start_str = (now - timedelta(days=days)).strftime('%Y-%m-%d')
 
-    preds = _filter_evaluated(history, start_str, end_str, horizon=horizon)
-    groups = {}
-    for p in preds:
-        g = p.get(group_key, 'unknown')
-        groups.setdefault(g, []).append(p)
-
-    return {g: calculate_metrics(ps) for g, ps in groups.items() if ps}
+    df = _evaluated_frame(history)
+    if group_key not in df.columns:
+        df[group_key] = 'unknown'
+    window = df[(df['_eval_date'] >= start_str) & (df['_eval_date'] <= end_str) & (df['horizon'] == horizon)]
+    return _grouped_metrics(window, [group_key])
 
 
 def collect_group_detail(history: Dict, group_key: str,
@@ -377,26 +468,31 @@ def collect_group_detail(history: Dict, group_key: str,
         now = datetime.now()
     end_str = now.strftime('%Y-%m-%d')
 
+    df = _evaluated_frame(history)
+    if group_key not in df.columns:
+        df[group_key] = 'unknown'
+    df[group_key] = df[group_key].fillna('unknown')
+
     rows = []
     for h in [1, 5, 20]:
+        by_horizon = df[df['horizon'] == h]
         for days, window_name in time_windows:
             start_str = (now - timedelta(days=days)).strftime('%Y-%m-%d')
-            preds = _filter_evaluated(history, start_str, end_str, horizon=h)
-
-            groups = {}
-            for p in preds:
-                g = p.get(group_key, 'unknown')
-                groups.setdefault(g, []).append(p)
+            window = by_horizon[(by_horizon['_eval_date'] >= start_str) & (by_horizon['_eval_date'] <= end_str)]
+            if window.empty:
+                continue
 
-            for g, gps in groups.items():
-                metrics = calculate_metrics(gps)
+            metrics_by_group = _grouped_metrics(window, [group_key])
+            first_rows = window.groupby(group_key, sort=False).head(1)
+            for g, first_index in zip(first_rows[group_key], first_rows.index):
+                metrics = metrics_by_group.get(g, {})
                 if metrics.get('total_predictions', 0) > 0:
                     rows.append({
                         'group': g,
                         'horizon': h,
                         'window': window_name,
                         'metrics': metrics,
-                        'sample_pred': gps[0],
+                        'sample_pred': history['predictions'][first_index],
                     })
     return rows
 
@@ -452,7 +548,7 @@ def get_sector_type(sector_code: str) -> str:
 
 def calculate_three_horizon_pattern_stats(history: Dict, start_date: Optional[str] = None) -> Dict:
     """
-    从 prediction_history.json 实时计算三周期模式统计
+    从预测历史实时计算三周期模式统计
 
     参数:
     - history: 预测历史数据
@@ -461,63 +557,70 @@ def calculate_three_horizon_pattern_stats(history: Dict, start_date: Optional[st
     返回:
     - dict: {模式: {total, correct, avg_return, win_rate}}
     """
-    from collections import defaultdict
-
-    predictions = history.get('predictions', [])
-    if not predictions:
-        return {}
+    return three_horizon_pattern_stats_from_frame(_predictions_frame(history), ['data_date', 'stock_code'],
+                                                  start_date=start_date)
 
-    # 按 data_date + stock_code 分组
-    grouped = defaultdict(dict)
-    for p in predictions:
-        data_date = p.get('data_date', '')
-        stock_code = p.get('stock_code', '')
-        horizon = p.get('horizon')
 
-        # 时间范围过滤
-        if start_date and data_date < start_date:
-            continue
-
-        if data_date and stock_code and horizon:
-            key = f"{data_date}_{stock_code}"
-            grouped[key][horizon] = p
+def three_horizon_pattern_stats_from_frame(df: pd.DataFrame, group_keys: List[str],
+                                           start_date: Optional[str] = None) -> Dict:
+    """
+    三周期模式统计（向量化实现，个股历史与恒指历史共用）
 
-    # 找出有三周期预测的记录，计算各模式统计
-    pattern_stats = defaultdict(lambda: {'total': 0, 'correct': 0, 'returns': []})
+    参数:
+    - df: 预测记录 DataFrame（按写入顺序）
+    - group_keys: 一次三周期预测的分组列（个股为 data_date + stock_code，恒指为 data_date）
+    - start_date: 起始日期 (YYYY-MM-DD)，None 表示不限制
 
-    for key, horizons in grouped.items():
-        if 1 in horizons and 5 in horizons and 20 in horizons:
-            p1 = horizons[1]
-            p5 = horizons[5]
-            p20 = horizons[20]
+    返回:
+    - dict: {模式: {total, correct, avg_return, win_rate}}
+    """
+    if df.empty:
+        return {}
 
-            # 只统计 20天已评估的
-            if p20.get('outcome') is None:
-                continue
+    valid = df['horizon'].notna() & (df['horizon'] != 0)
+    for key in group_keys:
+        valid &= df[key].fillna('') != ''
+    if start_date:
+        valid &= df['data_date'].fillna('') >= start_date
+    df = df[valid]
+    if df.empty:
+        return {}
 
-            # 编码模式：up=1, down=0
-            pattern = f"{'1' if p1.get('predicted_direction') == 'up' else '0'}{'1' if p5.get('predicted_direction') == 'up' else '0'}{'1' if p20.get('predicted_direction') == 'up' else '0'}"
+    # 按分组列分组（按首次出现顺序编号），同一周期重复记录取最后一条
+    df = df.assign(_group=df.groupby(group_keys, sort=False).ngroup().to_numpy())
+    df = df.drop_duplicates(['_group', 'horizon'], keep='last')
+    df = df[df['horizon'].isin([1, 5, 20])]
+    wide = df.pivot(index='_group', columns='horizon')
 
-            pattern_stats[pattern]['total'] += 1
-            if p20.get('outcome') == 'correct':
-                pattern_stats[pattern]['correct'] += 1
+    # 找出有三周期预测的记录，只统计 20天已评估的
+    if not {1, 5, 20}.issubset(set(wide.columns.get_level_values('horizon'))):
+        return {}
+    wide = wide[wide[('data_date', 1)].notna() & wide[('data_date', 5)].notna()
+                & wide[('data_date', 20)].notna() & wide[('outcome', 20)].notna()]
+    if wide.empty:
+        return {}
 
-            ret = p20.get('actual_return')
-            if ret is not None:
-                pattern_stats[pattern]['returns'].append(ret)
+    # 编码模式：up=1, down=0
+    pattern = np.where(wide[('predicted_direction', 1)] == 'up', '1', '0').astype(object) \
+        + np.where(wide[('predicted_direction', 5)] == 'up', '1', '0') \
+        + np.where(wide[('predicted_direction', 20)] == 'up', '1', '0')
+    stats = pd.DataFrame({
+        'pattern': pattern,
+        'correct': (wide[('outcome', 20)] == 'correct').to_numpy(),
+        'ret': pd.to_numeric(wide[('actual_return', 20)], errors='coerce').to_numpy(dtype=float),
+    }).groupby('pattern', sort=False).agg(
+        total=('correct', 'size'), correct=('correct', 'sum'), avg_return=('ret', 'mean'))
 
     # 计算准确率和平均收益
     result = {}
-    for pattern, stats in pattern_stats.items():
-        total = stats['total']
-        correct = stats['correct']
-        returns = stats['returns']
-
-        result[pattern] = {
+    for pattern_key, row in stats.iterrows():
+        total = int(row['total'])
+        correct = int(row['correct'])
+        result[pattern_key] = {
             'total': total,
             'correct': correct,
             'win_rate': correct / total if total > 0 else 0,
-            'avg_return': sum(returns) / len(returns) if returns else 0
+            'avg_return': float(row['avg_return']) if pd.notna(row['avg_return']) else 0
         }
 
     return result
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预测历史列式存储
+
+用 SQLite（WAL）替代整文件重写的 prediction_history.json：
+- 新预测只追加行，不再读写整个历史文件
+- 常用字段为强类型列，按 (data_date, horizon, stock_code) 建索引
+- 读出为 DataFrame，指标计算可直接用向量化 groupby
+- 首次打开时自动从旧 JSON 历史迁移
+
+纳入 git 的是同名的 .jsonl 变更日志（文本可合并），SQLite 数据库只是本地索引：
+- 每条记录有稳定的日志键（uuid），新记录追加一行完整记录，评估回写只追加变化的字段
+- 打开时按日志键回放尚未导入的行（upsert），并发运行各自追加的记录合并后不会互相覆盖
+- 已导入部分的内容（SHA-256）变化时（git 合并在中间插入行、日志被重写）从日志重建数据库
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ml_services.logger_config import get_logger
+
+logger = get_logger('prediction_store')
+
+# 强类型列（其余字段以 JSON 保存在 extra 列中）
+TYPED_COLUMNS = {
+    'prediction_id': 'TEXT',
+    'timestamp': 'TEXT',
+    'stock_code': 'TEXT',
+    'stock_name': 'TEXT',
+    'sector': 'TEXT',
+    'horizon': 'INTEGER',
+    'predicted_direction': 'TEXT',
+    'prediction_probability': 'REAL',
+    'confidence_level': 'TEXT',
+    'entry_price': 'REAL',
+    'model_type': 'TEXT',
+    'data_date': 'TEXT',
+    'target_date': 'TEXT',
+    'outcome': 'TEXT',
+    'actual_return': 'REAL',
+    'actual_direction': 'TEXT',
+    'evaluated_at': 'TEXT',
+    'verified': 'INTEGER',
+}
+
+# 评估结果字段：即使为空也保留在记录中（兼容旧代码的 p.get('outcome') 判断）
+OUTCOME_COLUMNS = ['outcome', 'actual_return', 'actual_direction']
+
+# 行标识（不写入 JSON/extra）
+ROW_ID = '_row_id'
+
+# 变更日志中的记录键（数据库 log_key 列；旧日志行没有键，用 row:<_row_id>）
+LOG_KEY = '_key'
+
+# 变更日志中的元数据行标识
+LOG_METADATA = '_metadata'
+
+# 评估回写行：{_key, _update: {变化的字段}, _unset: [删除的字段]}
+LOG_UPDATE = '_update'
+LOG_UNSET = '_unset'
+
+# 已回放的日志字节数及其内容摘要（内部元数据，不写入日志、不返回给调用方）
+LOG_OFFSET_KEY = '_log_offset'
+LOG_DIGEST_KEY = '_log_digest'
+INTERNAL_METADATA = (LOG_OFFSET_KEY, LOG_DIGEST_KEY)
+
+
+def _to_sql_value(value):
+    """转换为 SQLite 可存储的值（NaN 存为 NULL）"""
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return int(value)
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    return value
+
+
+def _same_value(old, new) -> bool:
+    """日志记录字段是否未变化（按 JSON 文本比较，NaN 等同于 NaN）"""
+    return old == new or json.dumps(old, default=str) == json.dumps(new, default=str)
+
+
+def history_exists(db_path: str) -> bool:
+    """预测历史是否存在（数据库、变更日志或旧 JSON 任一存在）"""
+    base = os.path.splitext(db_path)[0]
+    return any(os.path.exists(path) for path in (db_path, base + '.jsonl', base + '.json'))
+
+
+class PredictionStore:
+    """追加写入的预测历史存储（可用作上下文管理器，退出时关闭连接）"""
+
+    def __init__(self, db_path: str = 'data/prediction_history.db', legacy_json: Optional[str] = None,
+                 log_path: Optional[str] = None):
+        """
+        参数:
+        - db_path: SQLite 数据库路径
+        - legacy_json: 旧 JSON 历史文件路径（数据库为空时自动迁移，默认与 db_path 同名的 .json）
+        - log_path: JSONL 变更日志路径（纳入 git 的历史文件，默认与 db_path 同名的 .jsonl）
+        """
+        self.db_path = db_path
+        base = os.path.splitext(db_path)[0]
+        self.legacy_json = legacy_json if legacy_json is not None else base + '.json'
+        self.log_path = log_path if log_path is not None else base + '.jsonl'
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30)
+        self._init_db()
+        if os.path.exists(self.log_path):
+            self.sync_log()
+        elif self.count() > 0:
+            # 已有数据库但还没有变更日志：导出一次现有记录
+            rows = self._conn.execute(
+                f"SELECT log_key, {', '.join(TYPED_COLUMNS)}, extra FROM predictions ORDER BY rowid").fetchall()
+            self._write_log([{LOG_KEY: row[0], **self._entry(row[1:])} for row in rows], self.get_metadata())
+        if self.count() == 0 and os.path.exists(self.legacy_json):
+            self.migrate_from_json(self.legacy_json)
+        elif not os.path.exists(self.log_path):
+            open(self.log_path, 'a').close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _init_db(self):
+        """建表、建索引、开启 WAL"""
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = ', '.join(f'{name} {sql_type}' for name, sql_type in TYPED_COLUMNS.items())
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS predictions ({columns}, extra TEXT, log_key TEXT)")
+            existing = [row[1] for row in self._conn.execute("PRAGMA table_info(predictions)")]
+            if 'log_key' not in existing:
+                # 旧数据库：日志键沿用行标识（与旧日志行的 row:<_row_id> 一致）
+                self._conn.execute("ALTER TABLE predictions ADD COLUMN log_key TEXT")
+                self._conn.execute("UPDATE predictions SET log_key = 'row:' || rowid")
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_predictions_log_key ON predictions (log_key)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_predictions_key ON predictions (data_date, horizon, stock_code)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_id ON predictions (prediction_id)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def count(self) -> int:
+        """预测记录总数"""
+        return self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def _row_values(self, record: Dict) -> List:
+        """记录字典 -> 行值（强类型列 + extra JSON）"""
+        values = [_to_sql_value(record.get(name)) for name in TYPED_COLUMNS]
+        extra = {k: v for k, v in record.items() if k not in TYPED_COLUMNS and not k.startswith('_')}
+        values.append(json.dumps(extra, ensure_ascii=False, default=str) if extra else None)
+        return values
+
+    @staticmethod
+    def _entry(values: List) -> Dict:
+        """行值（强类型列 + extra JSON）-> 日志记录（与 load_records() 相同的字段，按存储后的值）"""
+        entry = {}
+        for name, value in zip(TYPED_COLUMNS, values):
+            if value is not None or name in OUTCOME_COLUMNS:
+                entry[name] = value
+        if values[len(TYPED_COLUMNS)]:
+            entry.update(json.loads(values[len(TYPED_COLUMNS)]))
+        return entry
+
+    def _log_entry(self, record: Dict) -> Dict:
+        """记录字典 -> 日志记录"""
+        return self._entry(self._row_values(record))
+
+    def _load_entries(self, column: str, ids: List) -> Dict:
+        """按 rowid 或 log_key 读出已存储的记录，返回 {id: (log_key, 日志记录)}"""
+        select = f"SELECT {column}, log_key, {', '.join(TYPED_COLUMNS)}, extra FROM predictions"
+        entries = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = self._conn.execute(f"{select} WHERE {column} IN ({','.join('?' * len(chunk))})", chunk)
+            for row in rows:
+                entries[row[0]] = (row[1], self._entry(row[2:]))
+        return entries
+
+    def _write_log(self, entries: List[Dict], metadata: Optional[Dict] = None):
+        """追加日志行，然后回放（包括其他进程在此期间写入的行）"""
+        lines = [json.dumps(entry, ensure_ascii=False, default=str) for entry in entries]
+        if metadata:
+            metadata = {k: v for k, v in metadata.items() if k != 'total_predictions'}
+            lines.append(json.dumps({LOG_METADATA: metadata}, ensure_ascii=False, default=str))
+        if lines:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(line + '\n' for line in lines))
+        self.sync_log()
+
+    def sync_log(self) -> int:
+        """
+        回放变更日志中尚未导入数据库的行（按日志键 upsert，评估回写行只更新变化的字段）
+
+        已导入部分的内容与导入时不同（git 合并在中间插入行、日志被重写或回退）时，
+        清空数据库后完整重建。
+
+        返回:
+        - 回放的日志行数
+        """
+        if not os.path.exists(self.log_path):
+            return 0
+        with open(self.log_path, 'rb') as f:
+            data = f.read()
+        state = dict(self._conn.execute(
+            f"SELECT key, value FROM metadata WHERE key IN ({','.join('?' * len(INTERNAL_METADATA))})",
+            INTERNAL_METADATA).fetchall())
+        offset = json.loads(state.get(LOG_OFFSET_KEY, '0'))
+        digest = json.loads(state[LOG_DIGEST_KEY]) if LOG_DIGEST_KEY in state else None
+        if offset and (len(data) < offset or hashlib.sha256(data[:offset]).hexdigest() != digest):
+            logger.warning(f"{self.log_path} 已导入的部分发生变化，从日志重建 {self.db_path}")
+            with self._conn:
+                self._conn.execute("DELETE FROM predictions")
+                self._conn.execute("DELETE FROM metadata")
+            offset = 0
+        # 只回放完整的行（其他进程可能正在写入最后一行）
+        end = data.rfind(b'\n', offset) + 1
+        if end <= offset:
+            return 0
+
+        lines = [json.loads(line) for line in data[offset:end].decode('utf-8').splitlines() if line.strip()]
+        update_keys = list({line[LOG_KEY] for line in lines if LOG_UPDATE in line})
+        stored = {key: entry for key, entry in self._load_entries('log_key', update_keys).values()}
+        entries = {}
+        metadata = {}
+        for line in lines:
+            if LOG_METADATA in line:
+                metadata.update(line[LOG_METADATA])
+                continue
+            key = line.pop(LOG_KEY, None) or f"row:{line.pop(ROW_ID)}"
+            if LOG_UPDATE not in line:
+                entries[key] = line
+                continue
+            entry = entries.get(key, stored.get(key))
+            if entry is None:
+                logger.warning(f"{self.log_path} 中的评估回写找不到记录 {key}，已跳过")
+                continue
+            entry = dict(entry, **line[LOG_UPDATE])
+            for name in line.get(LOG_UNSET, []):
+                entry.pop(name, None)
+            entries[key] = entry
+
+        columns = ', '.join(TYPED_COLUMNS)
+        placeholders = ', '.join('?' * (len(TYPED_COLUMNS) + 2))
+        assignments = ', '.join(f'{name} = excluded.{name}' for name in list(TYPED_COLUMNS) + ['extra'])
+        metadata[LOG_OFFSET_KEY] = end
+        metadata[LOG_DIGEST_KEY] = hashlib.sha256(data[:end]).hexdigest()
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO predictions ({columns}, extra, log_key) VALUES ({placeholders}) "
+                f"ON CONFLICT (log_key) DO UPDATE SET {assignments}",
+                [self._row_values(entry) + [key] for key, entry in entries.items()])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False, default=str)) for key, value in metadata.items()])
+        return len(lines)
+
+    def append(self, records: Iterable[Dict], skip_existing_ids: bool = False) -> int:
+        """
+        追加预测记录（单个事务）
+
+        参数:
+        - records: 预测记录字典列表（与旧 JSON 历史记录格式相同）
+        - skip_existing_ids: 跳过 prediction_id 已存在的记录
+
+        返回:
+        - 实际写入的记录数
+        """
+        records = list(records)
+        if skip_existing_ids and records:
+            ids = list({r.get('prediction_id') for r in records if r.get('prediction_id')})
+            existing = set()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT prediction_id FROM predictions WHERE prediction_id IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                existing.update(row[0] for row in rows)
+            records = [r for r in records if r.get('prediction_id') not in existing]
+
+        if not records:
+            return 0
+
+        self._write_log([{LOG_KEY: uuid.uuid4().hex, **self._log_entry(r)} for r in records],
+                        {'last_updated': datetime.now().strftime('%Y-%m-%dT%H:%M:%S')})
+        return len(records)
+
+    def update_records(self, records: Iterable[Dict]) -> int:
+        """
+        按行标识更新记录（评估结果回写），无行标识的记录作为新记录追加
+
+        变更日志只追加有变化的记录，每行只含变化的字段。
+
+        参数:
+        - records: 由 load_history() 读出的记录字典（含 _row_id）
+
+        返回:
+        - 有变化的记录数与追加的记录数之和
+        """
+        updates = []
+        inserts = []
+        for record in records:
+            if record.get(ROW_ID) is None:
+                inserts.append(record)
+            else:
+                updates.append(record)
+
+        stored = self._load_entries('rowid', list({int(r[ROW_ID]) for r in updates}))
+        changes = []
+        for record in updates:
+            if int(record[ROW_ID]) not in stored:
+                continue
+            key, old = stored[int(record[ROW_ID])]
+            new = self._log_entry(record)
+            changed = {name: value for name, value in new.items() if name not in old or not _same_value(old[name], value)}
+            unset = [name for name in old if name not in new]
+            if changed or unset:
+                change = {LOG_KEY: key, LOG_UPDATE: changed}
+                if unset:
+                    change[LOG_UNSET] = unset
+                changes.append(change)
+        if changes:
+            self._write_log(changes)
+        return len(changes) + self.append(inserts)
+
+    def load_frame(self, horizon: Optional[int] = None, start_date: Optional[str] = None,
+                   end_date: Optional[str] = None, date_column: str = 'data_date',
+                   evaluated_only: bool = False) -> pd.DataFrame:
+        """
+        读出预测记录为 DataFrame（一列一个字段，_row_id 为行标识）
+
+        参数:
+        - horizon: 只读取指定周期
+        - start_date / end_date: 日期范围 [start, end]（YYYY-MM-DD）
+        - date_column: 日期范围作用的列（'data_date' 或 'target_date'）
+        - evaluated_only: 只读取已评估（outcome 非空）的记录
+
+        返回:
+        - DataFrame，按写入顺序排列
+        """
+        if date_column not in ('data_date', 'target_date'):
+            raise ValueError(f"不支持的日期列: {date_column}")
+
+        conditions = []
+        params = []
+        if horizon is not None:
+            conditions.append("horizon = ?")
+            params.append(int(horizon))
+        if start_date:
+            conditions.append(f"{date_column} >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append(f"{date_column} <= ?")
+            params.append(end_date)
+        if evaluated_only:
+            conditions.append("outcome IS NOT NULL")
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        df = pd.read_sql_query(
+            f"SELECT rowid AS {ROW_ID}, {', '.join(TYPED_COLUMNS)}, extra FROM predictions{where} ORDER BY rowid",
+            self._conn, params=params)
+        for col in ('prediction_probability', 'entry_price', 'actual_return'):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
+
+    def load_records(self, **filters) -> List[Dict]:
+        """
+        读出预测记录为旧 JSON 历史格式的字典列表（空字段不出现，评估结果字段保留为 None）
+
+        参数:
+        - filters: 传给 load_frame() 的过滤条件
+
+        返回:
+        - 记录字典列表，每条带 _row_id，修改后可用 update_records() 回写
+        """
+        df = self.load_frame(**filters)
+        extras = df.pop('extra').tolist()
+        columns = list(df.columns)
+        records = []
+        for values, extra in zip(df.itertuples(index=False, name=None), extras):
+            record = {}
+            for name, value in zip(columns, values):
+                if value is None or (isinstance(value, float) and np.isnan(value)):
+                    if name in OUTCOME_COLUMNS:
+                        record[name] = None
+                    continue
+                if isinstance(value, np.integer):
+                    value = int(value)
+                elif isinstance(value, np.floating):
+                    value = float(value)
+                if name == 'verified':
+                    value = bool(value)
+                record[name] = value
+            if isinstance(extra, str) and extra:
+                record.update(json.loads(extra))
+            records.append(record)
+        return records
+
+    def load_history(self) -> Dict:
+        """
+        读出为旧 JSON 历史格式 {'predictions': [...], 'metadata': {...}}
+
+        每条记录带 _row_id，修改后可用 update_records() 回写。
+        """
+        return {'predictions': self.load_records(), 'metadata': self.get_metadata()}
+
+    def get_metadata(self) -> Dict:
+        """读取元数据"""
+        rows = self._conn.execute(
+            f"SELECT key, value FROM metadata WHERE key NOT IN ({','.join('?' * len(INTERNAL_METADATA))})",
+            INTERNAL_METADATA).fetchall()
+        metadata = {key: json.loads(value) for key, value in rows}
+        metadata['total_predictions'] = self.count()
+        return metadata
+
+    def set_metadata(self, **values):
+        """写入元数据（同时追加到变更日志）"""
+        self._write_log([], values)
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        一次性从旧 JSON 历史迁移（迁移后原文件重命名为 *.migrated）
+
+        参数:
+        - json_path: JSON 历史文件路径
+
+        返回:
+        - 迁移的记录数
+        """
+        with open(json_path, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+
+        count = self.append(history.get('predictions', []))
+        metadata = history.get('metadata', {})
+        if metadata:
+            self.set_metadata(**metadata)
+        os.replace(json_path, json_path + '.migrated')
+        logger.info(f"已从 {json_path} 迁移 {count} 条预测记录到 {self.db_path}")
+        return count
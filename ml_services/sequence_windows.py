@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滑动窗口序列数据集
+
+LSTM/Transformer 的输入是 (样本数 × 序列长度 × 特征数) 的重叠窗口，逐个复制窗口时
+内存是原始 (天数 × 特征数) 矩阵的 sequence_length 倍（1000 个特征、60 天窗口时整个股票池放不进内存）。
+SequenceWindows 只保存一份特征矩阵和每个窗口的起始行：
+- 窗口按需切片（单个窗口是视图，批量窗口通过 sliding_window_view 只复制该批）
+- 标签按收盘价向量化计算
+- 多只股票拼接成一个矩阵，窗口不跨越股票边界
+- subset() 划分训练/验证/测试集时共享同一份矩阵，标准化也只作用于这份矩阵
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class SequenceWindows:
+    """共享特征矩阵的滑动窗口集合"""
+
+    def __init__(self, data: np.ndarray, starts: np.ndarray, labels: np.ndarray, stock_ids: np.ndarray,
+                 sequence_length: int, categorical: Optional[Dict[str, np.ndarray]] = None,
+                 segments: Optional[List[tuple]] = None):
+        """
+        参数:
+        - data: (总天数 × 特征数) 特征矩阵（多只股票按行拼接）
+        - starts: 每个窗口在 data 中的起始行
+        - labels: 每个窗口的标签
+        - stock_ids: 每个窗口的股票ID
+        - sequence_length: 窗口长度
+        - categorical: {名称: (总天数,) 整数数组}，与 data 按行对齐的分类特征
+        - segments: [(股票ID, 起始行, 结束行)]，每只股票在 data 中的行范围
+        """
+        self.data = data
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.labels = labels
+        self.stock_ids = np.asarray(stock_ids, dtype=np.int64)
+        self.sequence_length = sequence_length
+        self.categorical = categorical or {}
+        self.segments = segments or []
+
+    @classmethod
+    def from_array(cls, features: np.ndarray, close: np.ndarray, sequence_length: int, horizon: int = 1,
+                   stock_id: int = 0, categorical: Optional[Dict[str, np.ndarray]] = None) -> 'SequenceWindows':
+        """
+        单只股票的窗口集合
+
+        参数:
+        - features: (天数 × 特征数) 特征矩阵（以 float32 保存）
+        - close: 收盘价，用于计算标签
+        - sequence_length: 窗口长度
+        - horizon: 预测周期（标签为 horizon 天后收盘价是否高于窗口最后一天的收盘价）
+        - stock_id: 股票ID
+        - categorical: 与 features 按行对齐的分类特征
+
+        返回:
+        - SequenceWindows（窗口 i 覆盖第 i 到 i + sequence_length - 1 行）
+        """
+        data = np.ascontiguousarray(features, dtype=np.float32)
+        close = np.asarray(close, dtype=np.float64)
+        count = max(len(data) - sequence_length - horizon, 0)
+
+        current = close[sequence_length - 1:sequence_length - 1 + count]
+        future = close[sequence_length + horizon - 1:sequence_length + horizon - 1 + count]
+        labels = (future > current).astype(np.int64)
+
+        categorical = {name: np.asarray(values, dtype=np.int64) for name, values in (categorical or {}).items()}
+        return cls(data, np.arange(count), labels, np.full(count, stock_id), sequence_length,
+                   categorical, [(stock_id, 0, len(data))])
+
+    @classmethod
+    def concat(cls, parts: Iterable['SequenceWindows']) -> 'SequenceWindows':
+        """
+        拼接多只股票（各自的窗口保持在各自的行范围内）
+
+        参数:
+        - parts: 各股票的 SequenceWindows（窗口长度必须相同）
+
+        返回:
+        - 合并后的 SequenceWindows，窗口顺序与逐个拼接各股票的窗口相同
+        """
+        parts = list(parts)
+        if not parts:
+            raise ValueError("没有可拼接的序列")
+        sequence_length = parts[0].sequence_length
+        if any(part.sequence_length != sequence_length for part in parts):
+            raise ValueError("序列长度不一致，无法拼接")
+
+        offsets = np.cumsum([0] + [len(part.data) for part in parts[:-1]])
+        names = [name for name in parts[0].categorical if all(name in part.categorical for part in parts)]
+        return cls(
+            np.concatenate([part.data for part in parts]),
+            np.concatenate([part.starts + offset for part, offset in zip(parts, offsets)]),
+            np.concatenate([part.labels for part in parts]),
+            np.concatenate([part.stock_ids for part in parts]),
+            sequence_length,
+            {name: np.concatenate([part.categorical[name] for part in parts]) for name in names},
+            [(stock_id, start + offset, end + offset)
+             for part, offset in zip(parts, offsets) for stock_id, start, end in part.segments]
+        )
+
+    # ==================== 访问 ====================
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def shape(self):
+        """与物化后的窗口数组相同的形状 (样本数, 序列长度, 特征数)"""
+        return (len(self.starts), self.sequence_length, self.data.shape[1])
+
+    @property
+    def num_features(self) -> int:
+        return self.data.shape[1]
+
+    def window(self, i: int) -> np.ndarray:
+        """第 i 个窗口（视图，不复制）"""
+        start = self.starts[i]
+        return self.data[start:start + self.sequence_length]
+
+    def categorical_window(self, name: str, i: int) -> np.ndarray:
+        """第 i 个窗口的分类特征序列（视图）"""
+        start = self.starts[i]
+        return self.categorical[name][start:start + self.sequence_length]
+
+    def windows(self, idx=None) -> np.ndarray:
+        """
+        批量取窗口（只复制所取的窗口）
+
+        参数:
+        - idx: 窗口下标（切片/数组，None 表示全部）
+
+        返回:
+        - (批大小 × 序列长度 × 特征数) 数组
+        """
+        starts = self.starts if idx is None else self.starts[idx]
+        view = sliding_window_view(self.data, self.sequence_length, axis=0)
+        return view[starts].transpose(0, 2, 1)
+
+    def categorical_windows(self, name: str, idx=None) -> np.ndarray:
+        """批量取分类特征序列 (批大小 × 序列长度)"""
+        starts = self.starts if idx is None else self.starts[idx]
+        return sliding_window_view(self.categorical[name], self.sequence_length)[starts]
+
+    def window_stock_ids(self, idx=None) -> np.ndarray:
+        """批量取逐时间步的股票ID (批大小 × 序列长度)"""
+        stock_ids = self.stock_ids if idx is None else self.stock_ids[idx]
+        return np.repeat(stock_ids[:, None], self.sequence_length, axis=1)
+
+    def batches(self, batch_size: int):
+        """按顺序分批产出窗口下标（切片）"""
+        for start in range(0, len(self), batch_size):
+            yield slice(start, start + batch_size)
+
+    # ==================== 划分与标准化 ====================
+
+    def subset(self, idx) -> 'SequenceWindows':
+        """取部分窗口（共享特征矩阵）"""
+        return SequenceWindows(self.data, self.starts[idx], self.labels[idx], self.stock_ids[idx],
+                               self.sequence_length, self.categorical, self.segments)
+
+    def stock_subset(self, stock_id: int) -> 'SequenceWindows':
+        """某只股票的全部窗口"""
+        return self.subset(np.flatnonzero(self.stock_ids == stock_id))
+
+    def covered_rows(self) -> np.ndarray:
+        """被窗口覆盖的行（布尔掩码）"""
+        counts = np.zeros(len(self.data) + 1, dtype=np.int64)
+        np.add.at(counts, self.starts, 1)
+        np.add.at(counts, self.starts + self.sequence_length, -1)
+        return np.cumsum(counts[:-1]) > 0
+
+    def rows(self) -> np.ndarray:
+        """
+        窗口覆盖的特征行（每行只出现一次）
+
+        按行拟合的标准化器（MinMaxScaler/StandardScaler）只需要这些行；对 MinMaxScaler 而言，
+        结果与在展开后的全部窗口 (样本数 × 序列长度, 特征数) 上拟合完全相同。
+        """
+        return self.data[self.covered_rows()]
+
+    def transform(self, scaler) -> 'SequenceWindows':
+        """
+        对特征矩阵做一次逐行变换（如已拟合的 scaler），窗口、标签和划分不变
+
+        参数:
+        - scaler: 具有 transform 方法的已拟合标准化器
+
+        返回:
+        - 使用变换后矩阵的新 SequenceWindows
+        """
+        data = np.asarray(scaler.transform(self.data), dtype=np.float32)
+        return SequenceWindows(data, self.starts, self.labels, self.stock_ids, self.sequence_length,
+                               self.categorical, self.segments)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PyTorch CPU 运行配置（LSTM/Transformer 实验共用）
+
+CPU 性能模式（TORCH_CPU_PERF=1 或命令行 --cpu-perf）：
+- 显式设置 intra-op / inter-op 线程数（多进程并行时按进程数分配 CPU 核）
+- DataLoader 按批取样本（数据集一次切出整批窗口），可选 worker 进程；GPU 上启用 pinned memory
+- 推理模型：TorchScript（trace）或 torch.compile，可选 LSTM/Linear 层动态 int8 量化
+- 互不依赖的单股票实验分布到多个进程并行执行
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    import torch
+    import torch.nn as nn
+    from torch.utils.data import BatchSampler, DataLoader, RandomSampler, SequentialSampler
+    PYTORCH_AVAILABLE = True
+except ImportError:
+    PYTORCH_AVAILABLE = False
+
+from ml_services.logger_config import get_logger
+
+logger = get_logger('torch_runtime')
+
+# ========== 默认配置（环境变量） ==========
+CPU_PERF_MODE = os.getenv('TORCH_CPU_PERF', '0') == '1'
+TORCH_NUM_THREADS = int(os.getenv('TORCH_NUM_THREADS', '0'))  # 0 表示按 CPU 核数 / 并行进程数分配
+TORCH_INTEROP_THREADS = int(os.getenv('TORCH_INTEROP_THREADS', '1'))
+DATALOADER_WORKERS = int(os.getenv('TORCH_DATALOADER_WORKERS', '0'))
+INFERENCE_BACKEND = os.getenv('TORCH_INFERENCE_BACKEND', 'script')  # eager / script / compile
+QUANTIZE_INFERENCE = os.getenv('TORCH_QUANTIZE', '0') == '1'
+PARALLEL_PROCESSES = int(os.getenv('TORCH_PARALLEL_PROCESSES', '0'))  # 0 表示不并行
+
+
+class CPUPerformanceConfig:
+    """CPU 性能模式配置（enabled=False 时保持普通 eager 训练和推理）"""
+
+    def __init__(self, enabled: bool = CPU_PERF_MODE, num_threads: int = TORCH_NUM_THREADS,
+                 interop_threads: int = TORCH_INTEROP_THREADS, dataloader_workers: int = DATALOADER_WORKERS,
+                 inference_backend: str = INFERENCE_BACKEND, quantize: bool = QUANTIZE_INFERENCE,
+                 processes: int = PARALLEL_PROCESSES):
+        """
+        参数:
+        - enabled: 是否启用 CPU 性能模式
+        - num_threads: 每个进程的 intra-op 线程数（0 表示 CPU 核数 / 并行进程数）
+        - interop_threads: 每个进程的 inter-op 线程数
+        - dataloader_workers: DataLoader worker 进程数（0 表示在主进程取数据）
+        - inference_backend: 推理模型 eager / script（TorchScript trace）/ compile（torch.compile）
+        - quantize: 推理时对 LSTM/Linear 层做动态 int8 量化
+        - processes: 单股票实验并行进程数（0/1 表示顺序执行）
+        """
+        if inference_backend not in ('eager', 'script', 'compile'):
+            raise ValueError(f"不支持的推理后端: {inference_backend}")
+        self.enabled = enabled
+        self.num_threads = num_threads
+        self.interop_threads = interop_threads
+        self.dataloader_workers = dataloader_workers
+        self.inference_backend = inference_backend
+        self.quantize = quantize
+        self.processes = processes
+
+    def threads_per_process(self, processes: int = 1) -> int:
+        if self.num_threads > 0:
+            return self.num_threads
+        return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+
+def add_cpu_performance_arguments(parser):
+    """为实验脚本添加 CPU 性能模式的命令行参数"""
+    parser.add_argument('--cpu-perf', action='store_true',
+                        help='CPU性能模式（线程配置、TorchScript推理等，也可设置 TORCH_CPU_PERF=1）')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='每个进程的PyTorch线程数（默认: CPU核数/并行进程数）')
+    parser.add_argument('--loader-workers', type=int, default=None,
+                        help='DataLoader worker进程数')
+    parser.add_argument('--inference-backend', type=str, choices=['eager', 'script', 'compile'], default=None,
+                        help='推理模型后端（默认script）')
+    parser.add_argument('--quantize', action='store_true',
+                        help='推理时对LSTM/Linear层做动态int8量化')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='逐只股票实验的并行进程数')
+
+
+def cpu_config_from_args(args) -> CPUPerformanceConfig:
+    """由命令行参数构建配置（未指定的参数使用环境变量中的默认值）"""
+    config = CPUPerformanceConfig()
+    config.enabled = config.enabled or args.cpu_perf
+    config.quantize = config.quantize or args.quantize
+    for attr, value in (('num_threads', args.threads), ('dataloader_workers', args.loader_workers),
+                        ('inference_backend', args.inference_backend), ('processes', args.processes)):
+        if value is not None:
+            setattr(config, attr, value)
+    return config
+
+
+def configure_cpu_threads(config: CPUPerformanceConfig, processes: int = 1):
+    """
+    设置当前进程的 PyTorch 线程数（性能模式关闭时不做任何修改）
+
+    参数:
+    - config: CPU 性能模式配置
+    - processes: 同时运行的进程数（用于分配 CPU 核）
+    """
+    if not (PYTORCH_AVAILABLE and config.enabled):
+        return
+    threads = config.threads_per_process(processes)
+    torch.set_num_threads(threads)
+    try:
+        # inter-op 线程池只能在首次并行计算前设置一次
+        torch.set_num_interop_threads(config.interop_threads)
+    except RuntimeError as e:
+        logger.debug(f"inter-op 线程数未修改: {e}")
+    logger.info(f"PyTorch 线程: intra-op={threads}, inter-op={torch.get_num_interop_threads()}")
+
+
+def make_loader(dataset, batch_size: int, config: Optional[CPUPerformanceConfig] = None,
+                device=None, shuffle: bool = False):
+    """
+    按批取样本的 DataLoader
+
+    数据集的 __getitem__ 接收一批下标并直接返回整批张量（一次切片代替逐个样本取出再拼接），
+    批次划分与 DataLoader(dataset, batch_size, shuffle) 相同。
+
+    参数:
+    - dataset: 支持按下标列表取整批的数据集
+    - batch_size: 批大小
+    - config: CPU 性能模式配置（决定 worker 数）
+    - device: 训练设备（CUDA 时启用 pinned memory）
+    - shuffle: 是否打乱
+    """
+    config = config or CPUPerformanceConfig()
+    sampler = BatchSampler(RandomSampler(dataset) if shuffle else SequentialSampler(dataset),
+                           batch_size, drop_last=False)
+    workers = config.dataloader_workers if config.enabled else 0
+    return DataLoader(dataset, batch_size=None, sampler=sampler, num_workers=workers,
+                      pin_memory=device is not None and device.type == 'cuda',
+                      persistent_workers=workers > 0)
+
+
+def prepare_inference_model(model, example_inputs: Tuple, config: CPUPerformanceConfig, device=None):
+    """
+    构建推理用模型
+
+    参数:
+    - model: 训练好的模型（不会被修改）
+    - example_inputs: 一批示例输入（用于 trace / 预热编译）
+    - config: CPU 性能模式配置
+    - device: 模型所在设备（量化和编译只在 CPU 上使用）
+
+    返回:
+    - 可调用的推理模型；性能模式关闭、非 CPU 设备或转换失败时返回原模型
+    """
+    model.eval()
+    if not (config.enabled and (device is None or device.type == 'cpu')):
+        return model
+
+    inference_model = model
+    if config.quantize:
+        try:
+            quantization = getattr(torch, 'ao', torch).quantization
+            inference_model = quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+            logger.info("推理模型已做动态 int8 量化（LSTM/Linear）")
+        except Exception as e:
+            logger.warning(f"动态量化失败，使用 fp32 模型: {e}")
+            inference_model = model
+
+    try:
+        with torch.no_grad():
+            if config.inference_backend == 'script':
+                traced = torch.jit.trace(inference_model, example_inputs, check_trace=False)
+                try:
+                    traced = torch.jit.freeze(traced)
+                except Exception as e:
+                    logger.debug(f"TorchScript freeze 失败，使用未冻结的模型: {e}")
+                traced(*example_inputs)
+                return traced
+            if config.inference_backend == 'compile':
+                compiled = torch.compile(inference_model, dynamic=True)
+                compiled(*example_inputs)  # 预热，编译失败在这里暴露
+                return compiled
+    except Exception as e:
+        logger.warning(f"推理模型{config.inference_backend}转换失败，使用 eager 模式: {e}")
+    return inference_model
+
+
+def _init_worker(config: CPUPerformanceConfig, processes: int):
+    configure_cpu_threads(config, processes)
+
+
+def run_parallel(func: Callable, items: Iterable, config: CPUPerformanceConfig, **kwargs) -> Dict:
+    """
+    多进程并行执行互不依赖的任务（如逐只股票的实验）
+
+    参数:
+    - func: 模块级函数 func(item, **kwargs)（需可被子进程导入）
+    - items: 任务列表
+    - config: CPU 性能模式配置（processes 为进程数，每个进程平分 CPU 核）
+    - kwargs: 传给 func 的其他参数
+
+    返回:
+    - {item: 结果}（按 items 顺序；任务出错时结果为 None）
+    """
+    items = list(items)
+    processes = min(config.processes, len(items))
+    results = {}
+    if processes <= 1:
+        for item in items:
+            try:
+                results[item] = func(item, **kwargs)
+            except Exception as e:
+                logger.error(f"任务 {item} 执行失败: {e}")
+                results[item] = None
+        return results
+
+    logger.info(f"并行执行 {len(items)} 个任务，{processes} 个进程")
+    # spawn：避免 fork 已初始化的 OpenMP 线程池导致子进程死锁
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=_init_worker, initargs=(config, processes)) as executor:
+        futures = {item: executor.submit(func, item, **kwargs) for item in items}
+        for item, future in futures.items():
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                logger.error(f"任务 {item} 执行失败: {e}")
+                results[item] = None
+    return results
@@ -46,6 +46,11 @@ from data_services.fundamental_data import get_comprehensive_fundamental_data
 from ml_services.ml_trading_model import FeatureEngineer
 from ml_services.backtest_evaluator import BacktestEvaluator
 from ml_services.logger_config import get_logger
+from ml_services.sequence_windows import SequenceWindows
+from ml_services.torch_runtime import (
+    CPUPerformanceConfig, add_cpu_performance_arguments, configure_cpu_threads, cpu_config_from_args,
+    make_loader, prepare_inference_model, run_parallel
+)
 from config import WATCHLIST as STOCK_LIST
 
 # 获取日志记录器
@@ -67,6 +72,7 @@ def setup_reproducibility(seed=42):
 # ========== 配置参数 ==========
 SEQUENCE_LENGTH = 30  # Transformer输入序列长度（使用过去30天数据）
 BATCH_SIZE = 32
+PREDICT_BATCH_SIZE = 1024  # 预测时每批物化的窗口数
 LEARNING_RATE = 0.0001  # Transformer通常需要较小的学习率
 EPOCHS = 50
 EARLY_STOPPING_PATIENCE = 10
@@ -210,26 +216,27 @@ class StockTransformer(nn.Module):
 
 # ========== 数据集类 ==========
 class StockPriceTransformerDataset(Dataset):
-    """股票价格数据集 - Transformer版本"""
+    """股票价格数据集 - Transformer版本（按需从共享的特征矩阵切出窗口）"""
     
-    def __init__(self, 
-                 continuous_features: np.ndarray,
-                 stock_type_ids: np.ndarray,
-                 stock_ids: np.ndarray,
-                 labels: np.ndarray):
-        self.continuous_features = torch.FloatTensor(continuous_features)
-        self.stock_type_ids = torch.LongTensor(stock_type_ids)
-        self.stock_ids = torch.LongTensor(stock_ids)
-        self.labels = torch.FloatTensor(labels)
+    def __init__(self, windows: SequenceWindows):
+        self.windows = windows
+        self.labels = windows.labels.astype(np.float32)
         
     def __len__(self):
         return len(self.labels)
     
     def __getitem__(self, idx):
-        return (self.continuous_features[idx], 
-                self.stock_type_ids[idx], 
-                self.stock_ids[idx], 
-                self.labels[idx])
+        if isinstance(idx, (list, np.ndarray)):
+            # 按批取（BatchSampler）：一次切出整批窗口
+            return (torch.from_numpy(np.ascontiguousarray(self.windows.windows(idx))),
+                    torch.from_numpy(np.ascontiguousarray(self.windows.categorical_windows('stock_type', idx))),
+                    torch.from_numpy(self.windows.window_stock_ids(idx)),
+                    torch.from_numpy(self.labels[idx]))
+        stock_id = self.windows.stock_ids[idx]
+        return (torch.from_numpy(self.windows.window(idx)), 
+                torch.from_numpy(self.windows.categorical_window('stock_type', idx)), 
+                torch.full((self.windows.sequence_length,), stock_id, dtype=torch.long), 
+                torch.tensor(self.labels[idx]))
 
 
 # ========== 数据预处理 ==========
@@ -406,169 +413,72 @@ class TransformerDataPreprocessor:
         logger.info(f"  特征生成完成，共 {len(df.columns)} 列")
         return df
     
-    def create_sequences(self, df: pd.DataFrame, horizon: int = 1, stock_code: str = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    
-            """创建Transformer序列数据 - 分离连续特征和分类特征"""
-    
-            
-    
-            if not self._fitted and stock_code is not None:
-    
-                self.fit_categorical_encoders(df, stock_code)
-    
-            
-    
-            # 排除非数值列和目标列
-    
-            exclude_columns = ['Date', 'Target', 'target']
-    
-            
-    
-            # 如果启用特征选择，使用精选特征
-    
-            if self.use_feature_selection and self.selected_features is not None:
-    
-                # 使用精选特征
-    
-                feature_columns = [col for col in self.selected_features if col in df.columns]
-    
-                logger.info(f"  使用精选特征: {len(feature_columns)} 个")
-    
-            else:
-    
-                # 使用所有数值特征
-    
-                feature_columns = [col for col in df.columns
-    
-                                  if col not in exclude_columns
-    
-                                  and df[col].dtype in ['float64', 'int64', 'float32', 'int32']]
-    
-                logger.info(f"  使用所有特征: {len(feature_columns)} 个")
-    
-            
-    
-            # 确保所有特征列存在
-    
-            available_features = [col for col in feature_columns if col in df.columns]
-    
-            feature_data = df[available_features].values
-    
-            
-    
-            # 处理无穷大值和NaN
-    
-            continuous_data = np.nan_to_num(feature_data, nan=0.0, posinf=1e6, neginf=-1e6)
-    
-            continuous_data = np.clip(continuous_data, -1e6, 1e6)
-    
-            
-    
-            # 处理分类特征
-    
-            stock_type_data = []
-    
-            stock_id_data = []
-    
-            
-    
-            if 'StockType_Stock_Type' in df.columns:
-    
-                # 对股票类型进行编码
-    
-                stock_type_encoded = self.stock_type_encoder.transform(
-    
-                    df['StockType_Stock_Type'].astype(str).fillna('unknown')
-    
-                )
-    
-                stock_type_data = stock_type_encoded
-    
-            
-    
-            # 对股票ID进行编码 - 使用简单的哈希映射避免LabelEncoder的限制
-    
-            # 将股票代码映射为整数ID
-    
-            stock_id_map = {code: idx for idx, code in enumerate(sorted(self.all_stock_codes))}
-    
-            stock_id = stock_id_map.get(stock_code, 0)  # 默认为0
-    
-            stock_id_data = np.full(len(df), stock_id)
-    
-            
-    
-            # 创建序列
-    
-            sequences = []
-    
-            stock_type_sequences = []
-    
-            stock_id_sequences = []
-    
-            labels = []
-    
-    
-    
-            for i in range(len(continuous_data) - self.sequence_length - horizon):
-    
-                # 连续特征序列
-    
-                seq = continuous_data[i:i + self.sequence_length]
-    
-                sequences.append(seq)
-    
-                
-    
-                # 分类特征序列
-    
-                stock_type_seq = stock_type_data[i:i + self.sequence_length]
-    
-                stock_type_sequences.append(stock_type_seq)
-    
-                
-    
-                stock_id_seq = stock_id_data[i:i + self.sequence_length]
-    
-                stock_id_sequences.append(stock_id_seq)
-    
-                
-    
-                # 标签
-    
-                future_price = df['Close'].iloc[i + self.sequence_length + horizon - 1]
-    
-                current_price = df['Close'].iloc[i + self.sequence_length - 1]
-    
-                label = 1 if future_price > current_price else 0
-    
-                labels.append(label)
-    
-    
-    
-            logger.info(f"  生成 {len(sequences)} 个序列")
-    
-            
-    
-            return (np.array(sequences), 
-    
-                    np.array(stock_type_sequences), 
-    
-                    np.array(stock_id_sequences), 
-    
-                    np.array(labels))
+    def create_sequences(self, df: pd.DataFrame, horizon: int = 1, stock_code: str = None) -> SequenceWindows:
+        """创建Transformer序列数据 - 分离连续特征和分类特征（窗口按需切片，不复制重叠序列）"""
+
+        if not self._fitted and stock_code is not None:
+            self.fit_categorical_encoders(df, stock_code)
+
+        # 排除非数值列和目标列
+        exclude_columns = ['Date', 'Target', 'target']
+
+        # 如果启用特征选择，使用精选特征
+        if self.use_feature_selection and self.selected_features is not None:
+            # 使用精选特征
+            feature_columns = [col for col in self.selected_features if col in df.columns]
+            logger.info(f"  使用精选特征: {len(feature_columns)} 个")
+        else:
+            # 使用所有数值特征
+            feature_columns = [col for col in df.columns
+                              if col not in exclude_columns
+                              and df[col].dtype in ['float64', 'int64', 'float32', 'int32']]
+            logger.info(f"  使用所有特征: {len(feature_columns)} 个")
+
+        # 确保所有特征列存在
+        available_features = [col for col in feature_columns if col in df.columns]
+        continuous_data = df[available_features].to_numpy(dtype=np.float64)
+
+        # 处理无穷大值和NaN
+        continuous_data = np.nan_to_num(continuous_data, nan=0.0, posinf=1e6, neginf=-1e6, copy=False)
+        np.clip(continuous_data, -1e6, 1e6, out=continuous_data)
+
+        # 处理分类特征（按天编码，窗口切片时再取序列）
+        if 'StockType_Stock_Type' in df.columns:
+            stock_type_data = self.stock_type_encoder.transform(
+                df['StockType_Stock_Type'].astype(str).fillna('unknown')
+            )
+        else:
+            stock_type_data = np.zeros(len(df), dtype=np.int64)
+
+        # 对股票ID进行编码 - 使用简单的哈希映射避免LabelEncoder的限制
+        # 将股票代码映射为整数ID
+        stock_id_map = {code: idx for idx, code in enumerate(sorted(self.all_stock_codes))}
+        stock_id = stock_id_map.get(stock_code, 0)  # 默认为0
+
+        # 窗口 i：第 i 到 i+sequence_length-1 天；标签：未来horizon天的涨跌
+        windows = SequenceWindows.from_array(continuous_data, df['Close'].to_numpy(), self.sequence_length,
+                                             horizon, stock_id=stock_id,
+                                             categorical={'stock_type': stock_type_data})
+
+        logger.info(f"  生成 {len(windows)} 个序列")
+        return windows
 
 
 # ========== Transformer训练器 ==========
 class TransformerTrainer:
     """Transformer模型训练器"""
     
-    def __init__(self, num_continuous_features: int, num_stock_types: int, num_stocks: int):
+    def __init__(self, num_continuous_features: int, num_stock_types: int, num_stocks: int,
+                 cpu_config: CPUPerformanceConfig = None):
         if not PYTORCH_AVAILABLE:
             raise ImportError("PyTorch未安装，请运行: pip install torch")
         
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         logger.info(f"使用设备: {self.device}")
+        self.cpu_config = cpu_config or CPUPerformanceConfig()
+        self._inference_model = None  # 训练完成后按需构建（TorchScript/编译/量化）
+        # 每个进程使用独立的最佳模型检查点（并行实验时互不覆盖）
+        self.checkpoint_path = f'best_transformer_model_{os.getpid()}.pth'
         
         # 初始化模型
         self.model = StockTransformer(
@@ -608,6 +518,7 @@ class TransformerTrainer:
     def train(self, train_loader: DataLoader, val_loader: DataLoader = None):
         """训练模型"""
         self.model.train()
+        self._inference_model = None
         
         best_val_loss = float('inf')
         patience_counter = 0
@@ -650,7 +561,7 @@ class TransformerTrainer:
                 if val_loss < best_val_loss:
                     best_val_loss = val_loss
                     patience_counter = 0
-                    self.save_model_with_metadata('best_transformer_model.pth')
+                    self.save_model_with_metadata(self.checkpoint_path)
                 else:
                     patience_counter += 1
                     if patience_counter >= EARLY_STOPPING_PATIENCE:
@@ -660,9 +571,9 @@ class TransformerTrainer:
                 logger.info(f"Epoch {epoch+1}/{EPOCHS} - Train Loss: {avg_train_loss:.4f}")
         
         # 加载最佳模型
-        if val_loader and os.path.exists('best_transformer_model.pth'):
-            self.load_model_with_metadata('best_transformer_model.pth')
-            os.remove('best_transformer_model.pth')
+        if val_loader and os.path.exists(self.checkpoint_path):
+            self.load_model_with_metadata(self.checkpoint_path)
+            os.remove(self.checkpoint_path)
     
     def save_model_with_metadata(self, path: str):
         """保存模型及其元数据"""
@@ -684,6 +595,7 @@ class TransformerTrainer:
         
         model_data = torch.load(path, map_location=self.device)
         self.model.load_state_dict(model_data['state_dict'])
+        self._inference_model = None
         
         if 'metadata' in model_data:
             self.model_metadata.update(model_data['metadata'])
@@ -717,24 +629,42 @@ class TransformerTrainer:
         return val_loss / len(val_loader)
     
     def predict(self, continuous_features: np.ndarray, 
-                stock_type_ids: np.ndarray,
-                stock_ids: np.ndarray) -> np.ndarray:
-        """预测"""
+                stock_type_ids: np.ndarray = None,
+                stock_ids: np.ndarray = None) -> np.ndarray:
+        """预测（continuous_features 为 SequenceWindows 时分批物化窗口）"""
+        if isinstance(continuous_features, SequenceWindows):
+            windows = continuous_features
+            return np.concatenate([
+                np.atleast_1d(self.predict(windows.windows(batch),
+                                           windows.categorical_windows('stock_type', batch),
+                                           windows.window_stock_ids(batch)))
+                for batch in windows.batches(PREDICT_BATCH_SIZE)
+            ])
+
         self.model.eval()
         
         continuous_tensor = torch.FloatTensor(continuous_features).to(self.device)
         stock_type_tensor = torch.LongTensor(stock_type_ids).to(self.device)
         stock_id_tensor = torch.LongTensor(stock_ids).to(self.device)
         
+        inputs = (continuous_tensor, stock_type_tensor, stock_id_tensor)
+        
         with torch.no_grad():
-            predictions = self.model(continuous_tensor, stock_type_tensor, stock_id_tensor)
+            predictions = self.inference_model(inputs)(*inputs)
             predictions = predictions.cpu().numpy()
         
         return predictions
     
+    def inference_model(self, example_inputs):
+        """推理模型（CPU 性能模式下为 TorchScript/编译/量化后的模型，首次预测时构建）"""
+        if self._inference_model is None:
+            self._inference_model = prepare_inference_model(self.model, example_inputs,
+                                                            self.cpu_config, self.device)
+        return self._inference_model
+    
     def predict_proba(self, continuous_features: np.ndarray,
-                     stock_type_ids: np.ndarray,
-                     stock_ids: np.ndarray) -> np.ndarray:
+                     stock_type_ids: np.ndarray = None,
+                     stock_ids: np.ndarray = None) -> np.ndarray:
         """预测概率"""
         return self.predict(continuous_features, stock_type_ids, stock_ids)
 
@@ -744,10 +674,13 @@ class TransformerExperiment:
     """Transformer对比实验"""
     
     def __init__(self, stock_codes: List[str] = None, horizon: int = 1, 
-                 use_feature_selection: bool = True, features_file: str = None):
+                 use_feature_selection: bool = True, features_file: str = None,
+                 cpu_config: CPUPerformanceConfig = None, seed: int = 42):
         self.stock_codes = stock_codes or TEST_STOCKS
         self.horizon = horizon
         self.use_feature_selection = use_feature_selection  # 默认启用特征选择
+        self.cpu_config = cpu_config or CPUPerformanceConfig()
+        self.seed = seed  # 并行执行时子进程的随机种子
         self.features_file = features_file or 'data/feature_selection/statistical_features_latest.txt'  # 默认特征文件
         self.preprocessor = TransformerDataPreprocessor(use_feature_selection=use_feature_selection)
         self.results = {}
@@ -791,93 +724,54 @@ class TransformerExperiment:
             stock_df = self.preprocessor.prepare_features(stock_df, stock_code, hsi_df, us_market_df)
             
             # 创建序列
-            continuous_seq, stock_type_seq, stock_id_seq, labels = \
-                self.preprocessor.create_sequences(stock_df, self.horizon, stock_code)
+            windows = self.preprocessor.create_sequences(stock_df, self.horizon, stock_code)
             
             logger.info(f"序列数据形状:")
-            logger.info(f"  连续特征: {continuous_seq.shape}")
-            logger.info(f"  股票类型: {stock_type_seq.shape}")
-            logger.info(f"  股票ID: {stock_id_seq.shape}")
-            logger.info(f"  标签: {labels.shape}")
+            logger.info(f"  连续特征: {windows.shape}")
+            logger.info(f"  股票类型: {windows.shape[:2]}")
+            logger.info(f"  股票ID: {windows.shape[:2]}")
+            logger.info(f"  标签: {windows.labels.shape}")
             
-            if len(continuous_seq) < 100:
-                logger.warning(f"数据量不足: {len(continuous_seq)} < 100")
+            if len(windows) < 100:
+                logger.warning(f"数据量不足: {len(windows)} < 100")
                 return None
             
             # 时间序列分割
             tscv = TimeSeriesSplit(n_splits=5)
-            splits = list(tscv.split(continuous_seq))
+            splits = list(tscv.split(np.arange(len(windows))))
             
             if len(splits) > 0:
                 train_idx, test_idx = splits[-1]
-                train_continuous = continuous_seq[train_idx]
-                train_stock_type = stock_type_seq[train_idx]
-                train_stock_id = stock_id_seq[train_idx]
-                train_labels = labels[train_idx]
-                test_continuous = continuous_seq[test_idx]
-                test_stock_type = stock_type_seq[test_idx]
-                test_stock_id = stock_id_seq[test_idx]
-                test_labels = labels[test_idx]
             else:
-                split_idx = int(len(continuous_seq) * 0.8)
-                train_continuous = continuous_seq[:split_idx]
-                train_stock_type = stock_type_seq[:split_idx]
-                train_stock_id = stock_id_seq[:split_idx]
-                train_labels = labels[:split_idx]
-                test_continuous = continuous_seq[split_idx:]
-                test_stock_type = stock_type_seq[split_idx:]
-                test_stock_id = stock_id_seq[split_idx:]
-                test_labels = labels[split_idx:]
+                split_idx = int(len(windows) * 0.8)
+                train_idx, test_idx = np.arange(split_idx), np.arange(split_idx, len(windows))
             
             # 训练集分割为训练集和验证集
-            val_split_idx = int(len(train_continuous) * 0.8)
-            val_continuous = train_continuous[val_split_idx:]
-            val_stock_type = train_stock_type[val_split_idx:]
-            val_stock_id = train_stock_id[val_split_idx:]
-            val_labels = train_labels[val_split_idx:]
-            train_continuous = train_continuous[:val_split_idx]
-            train_stock_type = train_stock_type[:val_split_idx]
-            train_stock_id = train_stock_id[:val_split_idx]
-            train_labels = train_labels[:val_split_idx]
+            val_split_idx = int(len(train_idx) * 0.8)
+            train_idx, val_idx = train_idx[:val_split_idx], train_idx[val_split_idx:]
             
-            # 特征标准化
-            seq_shape = train_continuous.shape
-            reshaped_train = train_continuous.reshape(-1, seq_shape[2])
-            normalized_train = self.preprocessor.feature_scaler.fit_transform(reshaped_train)
-            normalized_train = normalized_train.reshape(seq_shape)
-            
-            val_seq_shape = val_continuous.shape
-            reshaped_val = val_continuous.reshape(-1, val_seq_shape[2])
-            normalized_val = self.preprocessor.feature_scaler.transform(reshaped_val)
-            normalized_val = normalized_val.reshape(val_seq_shape)
-            
-            test_seq_shape = test_continuous.shape
-            reshaped_test = test_continuous.reshape(-1, test_seq_shape[2])
-            normalized_test = self.preprocessor.feature_scaler.transform(reshaped_test)
-            normalized_test = normalized_test.reshape(test_seq_shape)
+            # 特征标准化 - 只在训练窗口覆盖的行上拟合，然后对整个特征矩阵变换一次
+            self.preprocessor.feature_scaler.fit(windows.subset(train_idx).rows())
+            normalized = windows.transform(self.preprocessor.feature_scaler)
+            test_windows = normalized.subset(test_idx)
+            test_labels = test_windows.labels
             
             # 创建数据加载器
-            train_dataset = StockPriceTransformerDataset(
-                normalized_train, train_stock_type, train_stock_id, train_labels
-            )
-            val_dataset = StockPriceTransformerDataset(
-                normalized_val, val_stock_type, val_stock_id, val_labels
-            )
-            train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=False)
-            val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE, shuffle=False)
+            train_dataset = StockPriceTransformerDataset(normalized.subset(train_idx))
+            val_dataset = StockPriceTransformerDataset(normalized.subset(val_idx))
+            train_loader = make_loader(train_dataset, BATCH_SIZE, self.cpu_config)
+            val_loader = make_loader(val_dataset, BATCH_SIZE, self.cpu_config)
             
             # 训练Transformer
-            input_size = normalized_train.shape[2]
+            input_size = normalized.num_features
             num_stock_types = len(self.preprocessor.stock_type_encoder.classes_)
             num_stocks = len(self.preprocessor.all_stock_codes)  # 使用已注册的股票数量
             
-            trainer = TransformerTrainer(input_size, num_stock_types, num_stocks)
+            trainer = TransformerTrainer(input_size, num_stock_types, num_stocks, cpu_config=self.cpu_config)
             trainer.train(train_loader, val_loader)
             
             # 预测
-            transformer_predictions = trainer.predict_proba(
-                normalized_test, test_stock_type, test_stock_id
-            )
+            transformer_predictions = trainer.predict_proba(test_windows)
             transformer_pred_labels = (transformer_predictions > 0.5).astype(int)
             
             # 计算指标
@@ -910,7 +804,7 @@ class TransformerExperiment:
                 
                 backtest_results = evaluator.backtest_model(
                     model=mock_model,
-                    test_data=test_continuous,
+                    test_data=test_windows,
                     test_labels=pd.Series(test_labels),
                     test_prices=test_price_data,
                     confidence_threshold=0.55
@@ -998,12 +892,15 @@ class TransformerExperiment:
         logger.info(f"序列长度: {SEQUENCE_LENGTH}天")
         logger.info(f"训练轮数: {EPOCHS}\n")
         
-        all_results = {}
-        
-        for stock_code in self.stock_codes:
-            result = self.run_single_stock(stock_code)
-            if result:
-                all_results[stock_code] = result
+        if self.cpu_config.enabled and self.cpu_config.processes > 1:
+            # 各股票的实验互不依赖，分布到多个进程
+            results = run_parallel(_run_single_stock_process, self.stock_codes, self.cpu_config,
+                                   horizon=self.horizon, use_feature_selection=self.use_feature_selection,
+                                   features_file=self.features_file, cpu_config=self.cpu_config,
+                                   seed=self.seed)
+        else:
+            results = {stock_code: self.run_single_stock(stock_code) for stock_code in self.stock_codes}
+        all_results = {stock_code: result for stock_code, result in results.items() if result}
         
         # 汇总结果
         self.summarize_results(all_results)
@@ -1100,6 +997,16 @@ class TransformerExperiment:
         logger.info(f"模型已保存到: {model_file}")
 
 
+def _run_single_stock_process(stock_code: str, horizon: int, use_feature_selection: bool,
+                              features_file: str, cpu_config: CPUPerformanceConfig, seed: int = 42) -> Dict:
+    """子进程入口：独立训练和评估一只股票"""
+    setup_reproducibility(seed)
+    experiment = TransformerExperiment(stock_codes=[stock_code], horizon=horizon,
+                                       use_feature_selection=use_feature_selection,
+                                       features_file=features_file, cpu_config=cpu_config)
+    return experiment.run_single_stock(stock_code)
+
+
 # ========== 主函数 ==========
 def main():
     parser = argparse.ArgumentParser(description='Transformer模型对比实验')
@@ -1121,6 +1028,7 @@ def main():
                        help='禁用特征选择（使用所有特征）')
     parser.add_argument('--features-file', type=str, default='data/feature_selection/statistical_features_latest.txt',
                        help='精选特征文件路径（默认: data/feature_selection/statistical_features_latest.txt）')
+    add_cpu_performance_arguments(parser)
     
     args = parser.parse_args()
     
@@ -1131,6 +1039,9 @@ def main():
     # 处理特征选择参数
     use_feature_selection = args.use_feature_selection and not args.no_feature_selection
     
+    cpu_config = cpu_config_from_args(args)
+    configure_cpu_threads(cpu_config, max(1, cpu_config.processes))
+    
     # 设置随机种子
     setup_reproducibility(args.seed)
     
@@ -1144,7 +1055,9 @@ def main():
         stock_codes=args.stocks, 
         horizon=args.horizon,
         use_feature_selection=use_feature_selection,
-        features_file=args.features_file
+        features_file=args.features_file,
+        cpu_config=cpu_config,
+        seed=args.seed
     )
     all_results = experiment.run_all()
     
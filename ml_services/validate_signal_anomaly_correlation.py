@@ -32,6 +32,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from data_services.technical_analysis import TechnicalAnalyzer, TechnicalAnalyzerV2
 from anomaly_detector.zscore_detector import ZScoreDetector
 from anomaly_detector.isolation_forest_detector import IsolationForestDetector
+from anomaly_detector.cache import AnomalyCache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -62,7 +63,7 @@ class SignalAnomalyCorrelationValidator:
         symbol: str,
         start_date: str,
         end_date: str,
-        cache_file: str = 'data/anomaly_cache.json'
+        cache_file: str = 'data/anomaly_cache.db'
     ):
         """
         初始化验证器
@@ -109,12 +110,13 @@ class SignalAnomalyCorrelationValidator:
         """从缓存加载异常数据"""
         anomalies_list = []
         
-        if os.path.exists(self.cache_file):
+        legacy_json = os.path.splitext(self.cache_file)[0] + '.json'
+        if os.path.exists(self.cache_file) or os.path.exists(legacy_json):
             try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    cache = json.load(f)
+                with AnomalyCache(self.cache_file) as cache:
+                    entries = cache.items()
                 
-                for key, value in cache.items():
+                for key, value in entries:
                     # 解析异常类型和日期
                     parts = key.split('_')
                     if len(parts) >= 2:
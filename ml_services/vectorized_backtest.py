@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量化20天持有期回测引擎 - 整个测试面板只预测一次
+
+与 backtest_20d_horizon.Backtest20DHoldPeriod 的逐股票、逐日循环不同：
+- 分类特征编码和模型预测在整个多股票面板上只执行一次
+- 面板按 (股票, 日期) 排序后展平，买入/卖出索引通过数组平移（i → i+horizon）得到，
+  跨股票边界的配对用掩码剔除
+- 佣金/滑点、自适应置信度阈值、动态风险控制全部以数组运算完成
+- 市场环境数据按交易日去重后只查询一次，再广播到当天所有股票
+
+输出与 Backtest20DHoldPeriod.backtest_all_stocks 相同格式的交易列表，
+可直接传给 calculate_performance_metrics。
+
+sweep_holding_period_backtest 在同一份缓存概率上一次性评估
+(持有期 × 交易成本 × 置信度阈值) 网格，用于每周阈值校准：
+python3 ml_services/vectorized_backtest.py --horizon 20 --thresholds 0.50,0.55,0.60,0.65,0.70
+"""
+
+import os
+import sys
+import time
+import pandas as pd
+import numpy as np
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_services.backtest_20d_horizon import Backtest20DHoldPeriod
+from ml_services.logger_config import get_logger
+
+logger = get_logger('vectorized_backtest')
+
+# 市场状态数值编码（与 Backtest20DHoldPeriod 保持一致）
+REGIME_CODE_MAP = {0: 'ranging', 1: 'normal', 2: 'trending'}
+
+# 市场状态对应的阈值乘数（与 Backtest20DHoldPeriod 保持一致）
+REGIME_THRESHOLD_MULTIPLIERS = {
+    'ranging': 1.09,    # 震荡市更严格
+    'normal': 1.0,      # 正常市标准
+    'trending': 0.91    # 趋势市更宽松
+}
+
+
+def encode_categorical_features(X, categorical_encoders):
+    """
+    使用训练时的 LabelEncoder 对整个面板的分类特征编码一次
+
+    未见过的类别编码为 0（与逐股票回测的回退值一致，但只影响该行而非整列）
+
+    参数:
+    - X: 特征 DataFrame（会被原地修改）
+    - categorical_encoders: {列名: LabelEncoder}
+
+    返回:
+    DataFrame: 编码后的特征
+    """
+    for col_name, encoder in categorical_encoders.items():
+        if col_name not in X.columns:
+            continue
+        class_to_code = {cls: code for code, cls in enumerate(encoder.classes_)}
+        values = X[col_name].fillna('unknown').astype(str)
+        X[col_name] = values.map(class_to_code).fillna(0).astype(np.int32)
+    return X
+
+
+def score_test_panel(model, panel_df, feature_columns):
+    """
+    对整个多股票面板执行一次预测
+
+    参数:
+    - model: 训练好的模型（CatBoostModel 或实现 predict_proba 的模型）
+    - panel_df: 面板数据（多只股票）
+    - feature_columns: 特征列名列表
+
+    返回:
+    np.ndarray: 与 panel_df 行对齐的上涨概率
+    """
+    if len(panel_df) == 0:
+        return np.array([], dtype=np.float64)
+
+    if hasattr(model, 'catboost_model'):
+        from catboost import Pool
+        model_features = getattr(model, 'feature_columns', []) or list(feature_columns)
+        categorical_encoders = getattr(model, 'categorical_encoders', {})
+
+        # 缺失特征补0后一次性按模型特征顺序取列
+        X = panel_df.reindex(columns=model_features, fill_value=0.0)
+        X = encode_categorical_features(X, categorical_encoders)
+        return model.catboost_model.predict_proba(Pool(data=X))[:, 1]
+
+    return model.predict_proba(panel_df[feature_columns])[:, 1]
+
+
+def prepare_backtest_panel(test_df, start_date, end_date):
+    """
+    过滤日期范围并按 (股票, 日期) 稳定排序，得到展平的 (股票 × 日期) 面板
+
+    参数:
+    - test_df: 测试数据（包含 Code 列，索引为日期）
+    - start_date: 开始日期
+    - end_date: 结束日期
+
+    返回:
+    DataFrame: 排序后的面板（相同股票的行连续排列）
+    """
+    panel = test_df
+    if hasattr(panel.index, 'tz') and panel.index.tz is not None:
+        panel = panel.copy()
+        panel.index = panel.index.tz_localize(None)
+
+    start_ts = pd.Timestamp(start_date).tz_localize(None)
+    end_ts = pd.Timestamp(end_date).tz_localize(None)
+    panel = panel[(panel.index >= start_ts) & (panel.index <= end_ts)]
+
+    panel = panel.rename_axis('_date').sort_values(['Code', '_date'], kind='mergesort')
+    return panel.rename_axis(test_df.index.name)
+
+
+def holding_period_pairs(codes, horizon=20):
+    """
+    通过数组平移计算买入/卖出行位置（i → i+horizon），剔除跨股票配对
+
+    数据不足 horizon+2 天（1天买入 + horizon天持有 + 1天卖出）的股票不参与回测。
+
+    参数:
+    - codes: 已排序面板的股票代码数组
+    - horizon: 持有期（交易日）
+
+    返回:
+    tuple: (买入行位置数组, 卖出行位置数组)
+    """
+    n = len(codes)
+    if n <= horizon:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty
+
+    stock_size = pd.Series(codes).groupby(codes).transform('size').to_numpy()
+    entry_idx = np.arange(n - horizon)
+    exit_idx = entry_idx + horizon
+    valid = (codes[entry_idx] == codes[exit_idx]) & (stock_size[entry_idx] >= horizon + 2)
+    return entry_idx[valid], exit_idx[valid]
+
+
+def build_holding_panel(test_df, start_date, end_date, horizon=20):
+    """
+    构建 (股票 × 日期) 展平面板，并计算每个买入日对应的卖出位置
+
+    参数:
+    - test_df: 测试数据（包含 Code 列，索引为日期）
+    - start_date: 开始日期
+    - end_date: 结束日期
+    - horizon: 持有期（交易日）
+
+    返回:
+    tuple: (排序后的面板 DataFrame, 买入行位置数组, 卖出行位置数组)
+    """
+    panel = prepare_backtest_panel(test_df, start_date, end_date)
+
+    # 数据不足的股票不进入面板，避免无谓的预测
+    counts = panel.groupby('Code')['Close'].transform('size')
+    panel = panel[counts.values >= horizon + 2]
+
+    entry_idx, exit_idx = holding_period_pairs(panel['Code'].to_numpy(), horizon)
+    return panel, entry_idx, exit_idx
+
+
+def compute_trade_returns(buy_price, sell_price, commission, slippage):
+    """
+    计算原始与含成本的持有期收益（数组运算）
+
+    参数:
+    - buy_price: 买入收盘价数组
+    - sell_price: 卖出收盘价数组
+    - commission: 交易佣金（双边合计）
+    - slippage: 滑点
+
+    返回:
+    dict: 实际成交价、收益率与涨跌方向数组
+    """
+    actual_buy_price = buy_price * (1 + slippage) * (1 + commission / 2)
+    actual_sell_price = sell_price * (1 - slippage) * (1 - commission / 2)
+    actual_change = (sell_price - buy_price) / buy_price
+    actual_change_with_cost = (actual_sell_price - actual_buy_price) / actual_buy_price
+    return {
+        'actual_buy_price': actual_buy_price,
+        'actual_sell_price': actual_sell_price,
+        'actual_change': actual_change,
+        'actual_change_with_cost': actual_change_with_cost,
+        'actual_direction': (actual_change > 0).astype(np.int64),
+        'actual_direction_with_cost': (actual_change_with_cost > 0).astype(np.int64),
+    }
+
+
+def _regime_name(value):
+    """将 Market_Regime 取值（字符串或数值编码）转换为市场状态名称"""
+    if isinstance(value, str):
+        return value
+    try:
+        return REGIME_CODE_MAP.get(int(value), 'normal')
+    except (TypeError, ValueError):
+        return 'normal'
+
+
+def threshold_multipliers(entry_rows):
+    """
+    计算每个买入行的置信度阈值乘数和市场状态（数组运算）
+
+    优先使用 Confidence_Threshold_Multiplier 特征，否则按 Market_Regime 查表。
+
+    参数:
+    - entry_rows: 买入行面板数据
+
+    返回:
+    tuple: (阈值乘数数组, 市场状态数组)
+    """
+    n = len(entry_rows)
+    if 'Market_Regime' in entry_rows.columns:
+        regime_raw = entry_rows['Market_Regime']
+        mapping = {value: _regime_name(value) for value in pd.unique(regime_raw)}
+        market_regime = regime_raw.map(mapping).to_numpy(dtype=object)
+    else:
+        market_regime = np.full(n, 'normal', dtype=object)
+
+    if 'Confidence_Threshold_Multiplier' in entry_rows.columns:
+        multiplier = entry_rows['Confidence_Threshold_Multiplier'].fillna(1.0).to_numpy(dtype=np.float64)
+    else:
+        multiplier = pd.Series(market_regime).map(REGIME_THRESHOLD_MULTIPLIERS).fillna(1.0).to_numpy()
+
+    return multiplier, market_regime
+
+
+class VectorizedBacktest20D(Backtest20DHoldPeriod):
+    """向量化20天持有期回测器
+
+    复用 Backtest20DHoldPeriod 的参数、动态风险控制和市场数据缓存，
+    但把逐股票、逐日的循环替换为整个面板上的一次预测和数组运算。
+    """
+
+    def __init__(self, model, confidence_threshold=0.55, commission=0.001, slippage=0.001,
+                 enable_dynamic_risk_control=True, horizon=20):
+        """
+        初始化回测器
+
+        参数:
+        - model: 训练好的模型
+        - confidence_threshold: 置信度阈值
+        - commission: 交易佣金
+        - slippage: 滑点
+        - enable_dynamic_risk_control: 是否启用动态风险控制
+        - horizon: 持有期（交易日）
+        """
+        super().__init__(
+            model,
+            confidence_threshold=confidence_threshold,
+            commission=commission,
+            slippage=slippage,
+            enable_dynamic_risk_control=enable_dynamic_risk_control
+        )
+        self.horizon = horizon
+
+    def adaptive_thresholds(self, entry_rows):
+        """
+        计算每个买入行的自适应置信度阈值（数组运算）
+
+        参数:
+        - entry_rows: 买入行面板数据
+
+        返回:
+        tuple: (阈值数组, 市场状态数组)
+        """
+        multiplier, market_regime = threshold_multipliers(entry_rows)
+        return self.confidence_threshold * multiplier, market_regime
+
+    def market_context_by_date(self, buy_dates):
+        """
+        按交易日去重获取市场环境，并广播到每个买入行
+
+        参数:
+        - buy_dates: 买入日期数组
+
+        返回:
+        dict: 与 buy_dates 对齐的 is_extreme / market_env_score / market_regime / vix_level 数组
+        """
+        date_codes, unique_dates = pd.factorize(pd.DatetimeIndex(buy_dates), sort=True)
+        n_dates = len(unique_dates)
+
+        is_extreme = np.zeros(n_dates, dtype=bool)
+        env_score = np.zeros(n_dates, dtype=np.int64)
+        vix_level = np.zeros(n_dates, dtype=np.float64)
+        market_regime = np.empty(n_dates, dtype=object)
+
+        for k, buy_date in enumerate(unique_dates):
+            market_data = self.get_market_data_at_date(buy_date, None, None)
+            extreme, _, _ = self.risk_control.detect_extreme_market_conditions(
+                market_data['hsi_data'],
+                market_data['vix_level'],
+                market_data['stock_data']
+            )
+            is_extreme[k] = extreme
+            env_score[k] = self.risk_control.assess_market_environment(
+                market_data['hsi_data'],
+                market_data['vix_level']
+            )
+            vix_level[k] = market_data['vix_level']
+            market_regime[k] = market_data['market_regime']
+
+        return {
+            'is_extreme': is_extreme[date_codes],
+            'market_env_score': env_score[date_codes],
+            'market_regime': market_regime[date_codes],
+            'vix_level': vix_level[date_codes],
+        }
+
+    def risk_levels(self, market_env_score, prob):
+        """
+        DynamicRiskControl.determine_risk_level 的向量化版本
+
+        参数:
+        - market_env_score: 市场环境评分数组
+        - prob: 预测概率数组
+
+        返回:
+        tuple: (风险等级数组, 仓位大小数组)
+        """
+        risk_level = np.select(
+            [
+                market_env_score < 30,
+                (market_env_score < 50) & (prob > 0.75),
+                market_env_score < 50,
+                (market_env_score < 70) & (prob > 0.70),
+                market_env_score < 70,
+            ],
+            ['CRITICAL', 'MEDIUM', 'HIGH', 'LOW', 'MEDIUM'],
+            default='LOW'
+        ).astype(object)
+        multipliers = {level: cfg['position_multiplier'] for level, cfg in self.risk_control.risk_levels.items()}
+        position_size = pd.Series(risk_level).map(multipliers).to_numpy(dtype=np.float64)
+        return risk_level, position_size
+
+    def backtest_panel(self, test_df, feature_columns, start_date, end_date, probabilities=None):
+        """
+        对整个面板进行向量化回测，返回交易明细 DataFrame
+
+        参数:
+        - test_df: 测试数据（包含多只股票）
+        - feature_columns: 特征列名列表
+        - start_date: 开始日期
+        - end_date: 结束日期
+        - probabilities: 可选，预先计算好的与过滤后面板对齐的概率（跳过预测）
+
+        返回:
+        DataFrame: 每行一个交易机会，列与 backtest_single_stock 的交易记录一致
+        """
+        panel, entry_idx, exit_idx = build_holding_panel(test_df, start_date, end_date, self.horizon)
+        if len(entry_idx) == 0:
+            return pd.DataFrame()
+
+        if probabilities is None:
+            probabilities = score_test_panel(self.model, panel, feature_columns)
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+
+        close = panel['Close'].to_numpy(dtype=np.float64)
+        dates = panel.index.to_numpy()
+        buy_price = close[entry_idx]
+        sell_price = close[exit_idx]
+        prob = probabilities[entry_idx]
+
+        trades = pd.DataFrame({
+            'stock_code': panel['Code'].to_numpy()[entry_idx],
+            'buy_date': pd.DatetimeIndex(dates[entry_idx]).strftime('%Y-%m-%d'),
+            'sell_date': pd.DatetimeIndex(dates[exit_idx]).strftime('%Y-%m-%d'),
+            'buy_price': buy_price,
+            'sell_price': sell_price,
+        })
+        returns = compute_trade_returns(buy_price, sell_price, self.commission, self.slippage)
+        trades['actual_buy_price'] = returns['actual_buy_price']
+        trades['actual_sell_price'] = returns['actual_sell_price']
+
+        if self.enable_dynamic_risk_control and self.risk_control is not None:
+            context = self.market_context_by_date(dates[entry_idx])
+            risk_level, position_size = self.risk_levels(context['market_env_score'], prob)
+
+            # 极端市场环境或仓位为0：跳过该交易
+            keep = ~context['is_extreme'] & (position_size > 0)
+            signal = (prob > 0.5).astype(np.int64)  # 动态风险管理下，使用0.5作为基础阈值
+
+            trades['prediction'] = signal
+            trades['probability'] = prob
+            trades['adjusted_probability'] = prob
+            self._add_outcome_columns(trades, returns, signal)
+            trades['position_size'] = position_size
+            trades['risk_level'] = risk_level
+            trades['market_env_score'] = context['market_env_score']
+            trades['market_regime'] = context['market_regime']
+            trades['vix_level'] = context['vix_level']
+            trades = trades[keep]
+        else:
+            threshold, market_regime = self.adaptive_thresholds(panel.iloc[entry_idx])
+            signal = (prob > threshold).astype(np.int64)
+
+            trades['prediction'] = signal
+            trades['probability'] = prob
+            trades['adaptive_threshold'] = threshold
+            trades['market_regime'] = market_regime
+            self._add_outcome_columns(trades, returns, signal)
+
+        return trades.reset_index(drop=True)
+
+    @staticmethod
+    def _add_outcome_columns(trades, returns, signal):
+        """写入实际涨跌与预测正确性列"""
+        trades['actual_change'] = returns['actual_change']
+        trades['actual_change_with_cost'] = returns['actual_change_with_cost']
+        trades['actual_direction'] = returns['actual_direction']
+        trades['actual_direction_with_cost'] = returns['actual_direction_with_cost']
+        trades['prediction_correct'] = signal == returns['actual_direction']
+        trades['prediction_correct_with_cost'] = signal == returns['actual_direction_with_cost']
+
+    def backtest_all_stocks(self, test_df, feature_columns, start_date, end_date):
+        """
+        对所有股票进行向量化回测
+
+        参数:
+        - test_df: 测试数据
+        - feature_columns: 特征列名列表
+        - start_date: 开始日期
+        - end_date: 结束日期
+
+        返回:
+        list: 交易记录列表（与 Backtest20DHoldPeriod.backtest_all_stocks 格式一致）
+        """
+        t0 = time.time()
+        trades = self.backtest_panel(test_df, feature_columns, start_date, end_date)
+        logger.info(f"向量化回测完成: {test_df['Code'].nunique()} 只股票, "
+                    f"{len(trades)} 个交易机会, 耗时 {time.time() - t0:.2f} 秒")
+        return trades.to_dict('records')
+
+
+def _masked_scenario_metrics(returns, signal, direction, order, horizon, prefix=''):
+    """
+    对一组阈值场景同时计算 calculate_performance_metrics 的核心指标
+
+    参数:
+    - returns: 交易机会收益率数组 (n,)
+    - signal: 买入信号矩阵 (n, k)，每列对应一个阈值
+    - direction: 实际涨跌方向数组 (n,)
+    - order: 按买入日期稳定排序的行顺序
+    - horizon: 持有期（用于年化夏普比率）
+    - prefix: 指标名后缀（如 '_with_cost'）
+
+    返回:
+    dict: {指标名: (k,) 数组}
+    """
+    n_trades = len(returns)
+    n_buy = signal.sum(axis=0)
+    safe_buy = np.maximum(n_buy, 1)
+
+    correct = (signal == direction[:, None]).sum(axis=0)
+    n_up = direction.sum()
+    precision = np.where(n_buy > 0, correct / safe_buy, 0.0)
+    recall = correct / n_up if n_up > 0 else np.zeros_like(precision)
+    pr_sum = precision + recall
+    f1 = np.where(pr_sum > 0, 2 * precision * recall / np.where(pr_sum > 0, pr_sum, 1), 0.0)
+
+    masked = np.where(signal, returns[:, None], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(masked, axis=0) if n_trades else np.full(signal.shape[1], np.nan)
+        median = np.nanmedian(masked, axis=0) if n_trades else mean
+        std = np.nanstd(masked, axis=0, ddof=1)
+        std_pop = np.nanstd(masked, axis=0)
+        sharpe = np.where(std_pop > 0, mean / std_pop * np.sqrt(252 / horizon), 0.0)
+    positive = ((returns[:, None] > 0) & signal).sum(axis=0)
+
+    # 最大回撤：未选中的交易在对数空间记为0，不影响累计净值；
+    # 历史最高点从每列第一笔选中交易之后的净值开始（与 cumprod().expanding().max() 一致）
+    selected = signal[order]
+    log_growth = np.where(selected, np.log1p(returns)[order][:, None], 0.0)
+    cumulative = np.cumsum(log_growth, axis=0)
+    running_max = np.maximum.accumulate(np.where(selected, cumulative, -np.inf), axis=0)
+    with np.errstate(invalid='ignore'):
+        drawdown = np.where(selected, np.expm1(cumulative - running_max), 0.0)
+    max_drawdown = drawdown.min(axis=0) if n_trades else np.zeros(signal.shape[1])
+
+    return {
+        f'correct_predictions{prefix}': correct,
+        f'accuracy{prefix}': correct / n_trades if n_trades else np.zeros(signal.shape[1]),
+        f'precision{prefix}': precision,
+        f'recall{prefix}': recall,
+        f'f1_score{prefix}': f1,
+        f'avg_return{prefix}': mean,
+        f'median_return{prefix}': median,
+        f'std_return{prefix}': std,
+        f'positive_trades{prefix}': positive,
+        f'negative_trades{prefix}': n_buy - positive,
+        f'win_rate{prefix}': np.where(n_buy > 0, positive / safe_buy, 0.0),
+        f'sharpe_ratio{prefix}': sharpe,
+        f'max_drawdown{prefix}': max_drawdown,
+    }
+
+
+def sweep_holding_period_backtest(model, test_df, feature_columns, start_date, end_date,
+                                  thresholds, horizons=(20,), costs=((0.001, 0.001),),
+                                  probabilities=None, adaptive_threshold=True):
+    """
+    参数扫描：一次预测，计算所有 (持有期 × 交易成本 × 置信度阈值) 场景
+
+    - 整个面板只调用一次模型（或直接使用传入的缓存概率）
+    - 持有期收益通过对数价格的数组平移得到，任意持有期无需重新遍历
+    - 交易成本化为收益乘数：(1+r) × (1-s)(1-c/2) / ((1+s)(1+c/2)) - 1
+    - 所有阈值通过一个 (交易机会 × 阈值) 布尔矩阵同时评估
+
+    指标口径与 backtest_20d_horizon.calculate_performance_metrics 一致（不含动态风险控制），
+    区别：夏普比率按实际持有期年化（sqrt(252/horizon)）；同一买入日的交易按股票代码稳定排序后计算回撤。
+
+    参数:
+    - model: 训练好的模型（probabilities 已提供时可为 None）
+    - test_df: 测试数据（包含多只股票）
+    - feature_columns: 特征列名列表
+    - start_date: 开始日期
+    - end_date: 结束日期
+    - thresholds: 置信度阈值列表，如 [0.50, 0.55, 0.60, 0.65, 0.70]
+    - horizons: 持有期列表（交易日）
+    - costs: (佣金, 滑点) 组合列表
+    - probabilities: 可选，与 prepare_backtest_panel 输出对齐的缓存概率
+    - adaptive_threshold: 是否按市场状态调整阈值（与 Backtest20DHoldPeriod 传统模式一致）
+
+    返回:
+    DataFrame: 每行一个场景（horizon, commission, slippage, threshold + 指标列）
+    """
+    t0 = time.time()
+    panel = prepare_backtest_panel(test_df, start_date, end_date)
+    if probabilities is None:
+        probabilities = score_test_panel(model, panel, feature_columns)
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+
+    codes = panel['Code'].to_numpy()
+    log_close = np.log(panel['Close'].to_numpy(dtype=np.float64))
+    dates = panel.index.to_numpy()
+    if adaptive_threshold:
+        multiplier_all, _ = threshold_multipliers(panel)
+    else:
+        multiplier_all = np.ones(len(panel))
+    thresholds = np.asarray(sorted(thresholds), dtype=np.float64)
+
+    rows = []
+    for horizon in horizons:
+        entry_idx, exit_idx = holding_period_pairs(codes, horizon)
+        if len(entry_idx) == 0:
+            logger.warning(f"持有期 {horizon} 天：没有有效的交易机会")
+            continue
+
+        gross = np.exp(log_close[exit_idx] - log_close[entry_idx])
+        actual_change = gross - 1
+        direction = (actual_change > 0).astype(np.int64)
+        prob = probabilities[entry_idx]
+        signal = prob[:, None] > thresholds[None, :] * multiplier_all[entry_idx][:, None]
+        order = np.argsort(dates[entry_idx], kind='mergesort')
+        base = _masked_scenario_metrics(actual_change, signal, direction, order, horizon)
+
+        for commission, slippage in costs:
+            cost_factor = (1 - slippage) * (1 - commission / 2) / ((1 + slippage) * (1 + commission / 2))
+            change_with_cost = gross * cost_factor - 1
+            direction_with_cost = (change_with_cost > 0).astype(np.int64)
+            with_cost = _masked_scenario_metrics(
+                change_with_cost, signal, direction_with_cost, order, horizon, prefix='_with_cost'
+            )
+
+            for k, threshold in enumerate(thresholds):
+                row = {
+                    'horizon': horizon,
+                    'commission': commission,
+                    'slippage': slippage,
+                    'threshold': threshold,
+                    'total_trades': len(entry_idx),
+                    'buy_signals': int(signal[:, k].sum()),
+                }
+                row.update({key: values[k] for key, values in base.items()})
+                row.update({key: values[k] for key, values in with_cost.items()})
+                rows.append(row)
+
+    results = pd.DataFrame(rows)
+    logger.info(f"参数扫描完成: {len(results)} 个场景, 耗时 {time.time() - t0:.2f} 秒")
+    return results
+
+
+def _parse_float_list(value):
+    """解析逗号分隔的数值列表"""
+    return [float(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    import argparse
+    from datetime import datetime
+    from ml_services.ml_trading_model import CatBoostModel
+    from config import WATCHLIST
+
+    parser = argparse.ArgumentParser(description='持有期回测参数扫描（一次预测，多场景评估）')
+    parser.add_argument('--horizon', type=int, default=20, help='模型预测周期（天）')
+    parser.add_argument('--thresholds', type=str, default='0.50,0.55,0.60,0.65,0.70', help='置信度阈值列表')
+    parser.add_argument('--holding-periods', type=str, default=None, help='持有期列表（默认等于模型周期）')
+    parser.add_argument('--commissions', type=str, default='0.001', help='佣金列表')
+    parser.add_argument('--slippages', type=str, default='0.001', help='滑点列表')
+    parser.add_argument('--start-date', type=str, default='2026-01-01', help='开始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=str, default='2026-01-31', help='结束日期 (YYYY-MM-DD)')
+    parser.add_argument('--fixed-threshold', action='store_true', help='不按市场状态调整阈值')
+    args = parser.parse_args()
+
+    holding_periods = [int(h) for h in _parse_float_list(args.holding_periods)] if args.holding_periods else [args.horizon]
+    costs = [(c, s) for c in _parse_float_list(args.commissions) for s in _parse_float_list(args.slippages)]
+
+    model = CatBoostModel()
+    model.load_model(f'data/ml_trading_model_catboost_{args.horizon}d.pkl')
+    test_df = model.prepare_data(codes=list(WATCHLIST.keys()), horizon=args.horizon, for_backtest=True)
+    if test_df is None or len(test_df) == 0:
+        logger.error("错误：没有可用数据")
+        return
+
+    results = sweep_holding_period_backtest(
+        model, test_df, model.feature_columns, args.start_date, args.end_date,
+        thresholds=_parse_float_list(args.thresholds),
+        horizons=holding_periods,
+        costs=costs,
+        adaptive_threshold=not args.fixed_threshold
+    )
+
+    os.makedirs('output', exist_ok=True)
+    output_file = os.path.join('output', f"backtest_sweep_{args.horizon}d_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    results.to_csv(output_file, index=False, encoding='utf-8')
+    print(results[['horizon', 'commission', 'slippage', 'threshold', 'buy_signals',
+                   'accuracy', 'avg_return_with_cost', 'win_rate_with_cost',
+                   'sharpe_ratio_with_cost', 'max_drawdown_with_cost']].to_string(index=False))
+    print(f"\n✅ 参数扫描结果已保存到: {output_file}")
+
+
+if __name__ == '__main__':
+    main()
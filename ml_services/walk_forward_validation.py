@@ -40,6 +40,7 @@ warnings.filterwarnings('ignore')
 from ml_services.ml_trading_model import CatBoostModel, LightGBMModel, GBDTModel, FeatureEngineer
 from ml_services.logger_config import get_logger
 from ml_services.market_regime import MarketSentimentFilter
+from ml_services.warm_start import WarmStartCatBoost, WarmStartPolicy
 from config import TRAINING_STOCKS as STOCK_LIST
 
 # 获取日志记录器
@@ -59,7 +60,9 @@ class WalkForwardValidator:
         confidence_threshold: float = 0.55,
         use_feature_selection: bool = True,
         min_train_samples: int = 100,
-        fp_penalty: float = None           # False Positive 惩罚系数（非对称损失函数）
+        fp_penalty: float = None,          # False Positive 惩罚系数（非对称损失函数）
+        incremental: bool = False,         # CatBoost 增量训练（相邻 fold 热启动）
+        warm_start_policy: WarmStartPolicy = None
     ):
         """
         初始化 Walk-forward 验证器
@@ -76,6 +79,10 @@ class WalkForwardValidator:
             fp_penalty: False Positive 惩罚系数（非对称损失函数）
                 - None: 不使用额外惩罚
                 - float (如 2.5): 对类别0（下跌）施加 fp_penalty 倍惩罚
+            incremental: 是否增量训练（仅 catboost）
+                - False: 每个fold从头训练
+                - True: 每个fold在上一个fold的模型上追加树，按策略定期完整重训
+            warm_start_policy: 增量训练策略（None 使用默认策略）
         """
         self.model_type = model_type.lower()
         self.train_window_months = train_window_months
@@ -100,6 +107,14 @@ class WalkForwardValidator:
         self.model_class = self.model_classes[self.model_type]
         self.feature_engineer = FeatureEngineer()
 
+        # 增量训练器只在本次验证内保留上一个fold的模型（不读写磁盘状态）
+        self.warm_start = None
+        if incremental:
+            if self.model_type == 'catboost':
+                self.warm_start = WarmStartCatBoost(warm_start_policy, name=f'walk_forward_catboost_{horizon}d')
+            else:
+                logger.warning(f"增量训练仅支持 catboost，{self.model_type} 每个fold从头训练")
+
         # 市场情绪过滤器（使用滞后数据避免前瞻性偏差）
         self.market_filter = None
         self.use_market_filter = True  # 默认启用
@@ -112,6 +127,9 @@ class WalkForwardValidator:
         logger.info(f"预测周期: {horizon} 天")
         if self.fp_penalty is not None:
             logger.info(f"非对称损失函数: FP惩罚={self.fp_penalty}x")
+        if self.warm_start is not None:
+            logger.info(f"增量训练: 每个fold追加 {self.warm_start.policy.added_trees} 棵树，"
+                        f"每 {self.warm_start.policy.full_refit_every} 个fold完整重训")
 
         # 预加载社区 ID（确保训练/预测一致性）
         self.preloaded_community_ids = None
@@ -254,6 +272,8 @@ class WalkForwardValidator:
             'fold_results': all_fold_results,
             'overall_metrics': overall_result
         }
+        if self.warm_start is not None:
+            report['warm_start'] = self.warm_start.summary()
 
         print(f"\n{'='*80}")
         print("📊 Walk-forward 验证完成")
@@ -293,12 +313,14 @@ class WalkForwardValidator:
         """
         print(f"\n  🔄 准备训练数据...")
 
-        # 创建模型实例（支持非对称损失函数）
+        # 创建模型实例（支持非对称损失函数、增量训练）
+        model_kwargs = {}
         if self.fp_penalty is not None:
-            model = self.model_class(fp_penalty=self.fp_penalty)
+            model_kwargs['fp_penalty'] = self.fp_penalty
             print(f"  ⚠️ 使用非对称损失函数: FP惩罚={self.fp_penalty}x")
-        else:
-            model = self.model_class()
+        if self.warm_start is not None:
+            model_kwargs['warm_start'] = self.warm_start
+        model = self.model_class(**model_kwargs)
 
         # 准备训练数据
         train_codes = stock_list
@@ -1507,6 +1529,14 @@ def main():
     parser.add_argument('--fp-penalty', type=float, default=None,
                        help='False Positive 惩罚系数（非对称损失函数），如 2.5 表示对FP错误施加2.5倍惩罚')
 
+    # 增量训练参数
+    parser.add_argument('--incremental', action='store_true',
+                       help='CatBoost 增量训练：每个fold在上一个fold的模型上追加树')
+    parser.add_argument('--added-trees', type=int, default=60,
+                       help='增量训练每个fold追加的树数量（默认: 60）')
+    parser.add_argument('--full-refit-every', type=int, default=10,
+                       help='连续增量训练多少个fold后完整重训一次（默认: 10）')
+
     args = parser.parse_args()
 
     # 获取股票列表
@@ -1531,7 +1561,9 @@ def main():
         horizon=args.horizon,
         confidence_threshold=args.confidence_threshold,
         use_feature_selection=args.use_feature_selection,
-        fp_penalty=args.fp_penalty
+        fp_penalty=args.fp_penalty,
+        incremental=args.incremental,
+        warm_start_policy=WarmStartPolicy(added_trees=args.added_trees, full_refit_every=args.full_refit_every)
     )
 
     # 执行验证
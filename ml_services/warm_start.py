@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CatBoost 增量训练（滚动窗口热启动）
+
+滚动训练的相邻窗口（walk-forward 的相邻 fold、每天的重训）数据大部分重叠，
+从头训练每次都要重新拟合全部树。增量模式在上一个窗口的模型上继续训练（CatBoost init_model），
+只追加少量新树：
+- WarmStartPolicy：每次追加的树数量、定期完整重训、树数量上限、漂移检查的频率和容差
+- WarmStartCatBoost：记住上一次的模型和状态（可持久化到磁盘，供每日重训跨进程使用），
+  按策略决定完整训练还是增量训练；漂移检查时同时完整训练一次，比较两者的预测概率，
+  超出容差则改用完整训练的模型
+
+特征列或分类编码与上一个模型不一致时（特征选择变化、出现新类别）自动退回完整训练。
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ml_services.logger_config import get_logger
+
+logger = get_logger('warm_start')
+
+WARM_START_DIR = 'data/warm_start'
+
+
+class WarmStartPolicy:
+    """增量训练策略"""
+
+    def __init__(self, added_trees: int = 60, full_refit_every: int = 10, max_trees: int = 1200,
+                 drift_check_every: int = 5, drift_tolerance: float = 0.05,
+                 learning_rate: Optional[float] = None):
+        """
+        参数:
+        - added_trees: 每次增量训练追加的树数量
+        - full_refit_every: 连续增量训练多少次后完整重训一次（0 表示不定期重训）
+        - max_trees: 模型树数量上限，追加后超过上限则完整重训
+        - drift_check_every: 每隔多少次增量训练做一次漂移检查（0 表示不检查）
+        - drift_tolerance: 漂移容差（增量模型与完整重训模型预测概率的平均绝对差）
+        - learning_rate: 增量训练的学习率（None 表示与完整训练相同）
+        """
+        self.added_trees = added_trees
+        self.full_refit_every = full_refit_every
+        self.max_trees = max_trees
+        self.drift_check_every = drift_check_every
+        self.drift_tolerance = drift_tolerance
+        self.learning_rate = learning_rate
+
+
+class WarmStartCatBoost:
+    """基于上一窗口模型继续训练的 CatBoost 训练器"""
+
+    def __init__(self, policy: Optional[WarmStartPolicy] = None, state_dir: Optional[str] = None,
+                 name: str = 'catboost'):
+        """
+        参数:
+        - policy: 增量训练策略
+        - state_dir: 模型和状态的保存目录（None 表示只在内存中保留，如一次 walk-forward 验证内的各 fold）
+        - name: 状态文件名前缀（区分市场和预测周期，如 catboost_20d）
+        """
+        self.policy = policy or WarmStartPolicy()
+        self.state_dir = state_dir
+        self.name = name
+        self.model = None
+        self.signature = None
+        self.steps_since_refit = 0
+        self.history: List[Dict] = []
+        self.last_mode = None
+        if state_dir:
+            self._load_state()
+
+    # ==================== 状态 ====================
+
+    @property
+    def _model_path(self):
+        return os.path.join(self.state_dir, f'{self.name}.cbm')
+
+    @property
+    def _state_path(self):
+        return os.path.join(self.state_dir, f'{self.name}.json')
+
+    def _load_state(self):
+        if not (os.path.exists(self._model_path) and os.path.exists(self._state_path)):
+            return
+        try:
+            from catboost import CatBoostClassifier
+            with open(self._state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            model = CatBoostClassifier()
+            model.load_model(self._model_path)
+            self.model = model
+            self.signature = state.get('signature')
+            self.steps_since_refit = state.get('steps_since_refit', 0)
+            self.history = state.get('history', [])
+            logger.info(f"加载增量训练状态 {self.name}: {model.tree_count_} 棵树，"
+                        f"距上次完整训练 {self.steps_since_refit} 次")
+        except Exception as e:
+            logger.warning(f"加载增量训练状态失败，将完整训练: {e}")
+            self.model = None
+
+    def _save_state(self):
+        if not self.state_dir:
+            return
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            self.model.save_model(self._model_path)
+            with open(self._state_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'signature': self.signature,
+                    'steps_since_refit': self.steps_since_refit,
+                    'history': self.history[-100:]
+                }, f, ensure_ascii=False, indent=1)
+        except Exception as e:
+            logger.warning(f"保存增量训练状态失败: {e}")
+
+    def reset(self):
+        """丢弃上一次的模型（下一次训练为完整训练）"""
+        self.model = None
+        self.signature = None
+        self.steps_since_refit = 0
+
+    # ==================== 训练 ====================
+
+    def will_continue(self, signature) -> bool:
+        """
+        下一次训练是否为增量训练
+
+        参数:
+        - signature: 本次训练的特征签名（特征列、分类编码等，可 JSON 序列化）
+        """
+        policy = self.policy
+        if self.model is None or self.signature != _jsonable(signature):
+            return False
+        if policy.full_refit_every and self.steps_since_refit >= policy.full_refit_every:
+            return False
+        if policy.max_trees and self.model.tree_count_ + policy.added_trees > policy.max_trees:
+            return False
+        return True
+
+    def fit(self, params: Dict, X, y, weight=None, eval_set=None, signature=None, verbose=False):
+        """
+        训练（按策略选择完整训练或在上一个模型上追加树）
+
+        参数:
+        - params: 完整训练的 CatBoostClassifier 参数
+        - X, y: 训练数据（numpy 数组或 DataFrame）
+        - weight: 样本权重（可选）
+        - eval_set: 验证集 (X_val, y_val)（可选，用于早停和漂移检查）
+        - signature: 特征签名（None 时使用 DataFrame 的列名）
+        - verbose: CatBoost 训练日志
+
+        返回:
+        - 训练好的 CatBoostClassifier（last_mode 为 'full' / 'warm' / 'warm_drift_refit'）
+        """
+        if signature is None:
+            signature = list(X.columns) if isinstance(X, pd.DataFrame) else None
+        signature = _jsonable(signature)
+
+        start = time.perf_counter()
+        record = {'step': len(self.history) + 1, 'samples': int(len(y))}
+        if self.will_continue(signature):
+            model = self._fit_warm(params, X, y, weight, eval_set, verbose)
+            self.steps_since_refit += 1
+            mode = 'warm'
+
+            policy = self.policy
+            if policy.drift_check_every and self.steps_since_refit % policy.drift_check_every == 0:
+                full_model = self._fit_full(params, X, y, weight, eval_set, verbose)
+                drift_X = eval_set[0] if eval_set is not None else _tail(X, max(1, len(y) // 5))
+                drift = float(np.mean(np.abs(model.predict_proba(drift_X)[:, 1]
+                                             - full_model.predict_proba(drift_X)[:, 1])))
+                record['drift'] = drift
+                if drift > policy.drift_tolerance:
+                    logger.warning(f"{self.name} 增量模型漂移 {drift:.4f} > {policy.drift_tolerance}，改用完整训练的模型")
+                    model, mode = full_model, 'warm_drift_refit'
+                    self.steps_since_refit = 0
+                else:
+                    logger.info(f"{self.name} 漂移检查通过: {drift:.4f} <= {policy.drift_tolerance}")
+        else:
+            model = self._fit_full(params, X, y, weight, eval_set, verbose)
+            self.steps_since_refit = 0
+            mode = 'full'
+
+        self.model = model
+        self.signature = signature
+        self.last_mode = mode
+        record.update({'mode': mode, 'trees': int(model.tree_count_),
+                       'seconds': round(time.perf_counter() - start, 3)})
+        self.history.append(record)
+        logger.info(f"{self.name} {mode} 训练完成: {model.tree_count_} 棵树，{record['seconds']:.1f}s")
+        self._save_state()
+        return model
+
+    def _fit_full(self, params, X, y, weight, eval_set, verbose):
+        from catboost import CatBoostClassifier, Pool
+        model = CatBoostClassifier(**params)
+        model.fit(Pool(data=X, label=y, weight=weight), eval_set=_eval_pool(eval_set), verbose=verbose)
+        return model
+
+    def _fit_warm(self, params, X, y, weight, eval_set, verbose):
+        from catboost import CatBoostClassifier, Pool
+        warm_params = dict(params)
+        tree_key = next((key for key in ('n_estimators', 'iterations', 'num_boost_round', 'num_trees')
+                         if key in warm_params), 'iterations')
+        warm_params[tree_key] = self.policy.added_trees
+        if self.policy.learning_rate is not None:
+            warm_params['learning_rate'] = self.policy.learning_rate
+        model = CatBoostClassifier(**warm_params)
+        model.fit(Pool(data=X, label=y, weight=weight), eval_set=_eval_pool(eval_set),
+                  init_model=self.model, verbose=verbose)
+        return model
+
+    def summary(self) -> Dict:
+        """各模式的训练次数和平均耗时"""
+        summary = {}
+        for record in self.history:
+            stats = summary.setdefault(record['mode'], {'count': 0, 'seconds': 0.0})
+            stats['count'] += 1
+            stats['seconds'] += record['seconds']
+        for stats in summary.values():
+            stats['avg_seconds'] = stats['seconds'] / stats['count']
+        return summary
+
+
+def _eval_pool(eval_set):
+    if eval_set is None:
+        return None
+    from catboost import Pool
+    return Pool(data=eval_set[0], label=eval_set[1])
+
+
+def _tail(X, n):
+    return X.iloc[-n:] if isinstance(X, pd.DataFrame) else X[-n:]
+
+
+def _jsonable(value):
+    """签名转为 JSON 可比较的形式（与从状态文件读回的结果相同）"""
+    return json.loads(json.dumps(value, default=lambda v: v.tolist() if hasattr(v, 'tolist') else str(v)))
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告图表渲染服务 (Chart Service)
+
+A股 / 港股个股雷达、性能报告雷达与排名条形图原来逐只新建 matplotlib figure、
+按顺序渲染。ChartService 统一负责：
+  - 雷达图模板：同一样式 + 尺寸只建一次 figure/axes（网格、刻度、标签），
+    每张图只更新多边形数据、颜色和标题后输出 PNG
+  - 内容哈希缓存：按 (渲染函数, 参数, 样式) 的哈希缓存 PNG（内存 + data/chart_cache），
+    维度分数未变化的图表直接复用，不再渲染；渲染函数用 @chart_style 声明样式依赖，
+    样式或函数源码修改后旧缓存自动失效
+  - 进程池：待渲染图表较多时分发到工作进程，字体在每个工作进程初始化时只注册一次
+
+使用方法：
+    from scripts.chart_service import get_chart_service
+
+    pngs = get_chart_service().render_many([(render_func, args, kwargs), ...])
+"""
+
+import atexit
+import hashlib
+import inspect
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.font_manager as fm
+
+# 中文字体（WenQuanYi Micro Hei，缺失时回退 DejaVu Sans）
+CN_FONT_PATH = '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc'
+
+# PNG 磁盘缓存目录；修改本模块的模板代码（RadarTemplate 等）时递增 CHART_CACHE_VERSION 使旧缓存失效
+# （渲染函数及其 @chart_style 声明的样式已计入缓存键）
+CHART_CACHE_DIR = 'data/chart_cache'
+CHART_CACHE_VERSION = 1
+
+_fonts_ready = False
+
+
+def setup_fonts():
+    """注册中文字体并设置 rcParams（每个进程只执行一次）"""
+    global _fonts_ready
+    if _fonts_ready:
+        return
+    if os.path.exists(CN_FONT_PATH):
+        fm.fontManager.addfont(CN_FONT_PATH)
+        plt.rcParams['font.family'] = 'WenQuanYi Micro Hei, DejaVu Sans, sans-serif'
+    else:
+        plt.rcParams['font.family'] = 'DejaVu Sans, sans-serif'
+    plt.rcParams['axes.unicode_minus'] = False
+    _fonts_ready = True
+
+
+# ════════════════════════════════════════════════════════════
+# 雷达图模板
+# ════════════════════════════════════════════════════════════
+
+class RadarTemplate:
+    """
+    预先配置好的极坐标雷达图（网格圈、轴标签、刻度只设置一次）
+
+    样式 style 为 dict：
+    - grid_linewidth / grid_alpha: 背景网格圈
+    - axes_grid_alpha: 坐标轴网格
+    - fill_alpha: 多边形填充透明度
+    - line: 多边形描边参数（linewidth、markersize、markeredgecolor 等）
+    - xtick_fontsize / xtick_color、ytick_fontsize / ytick_color: 轴标签
+    - title_fontsize / title_pad / title_color: 标题
+    - dpi / pad_inches: 输出参数
+    """
+
+    GRID_LEVELS = [20, 40, 60, 80]
+
+    def __init__(self, style: Dict, categories: Sequence[str], size: int):
+        setup_fonts()
+        self.style = style
+        n = len(categories)
+        angles = [i / float(n) * 2 * np.pi for i in range(n)]
+        self.angles_closed = np.array(angles + angles[:1])
+
+        figsize = size / 100.0
+        self.fig, ax = plt.subplots(figsize=(figsize, figsize), subplot_kw=dict(polar=True), facecolor='white')
+        ax.set_ylim(0, 100)
+        for gv in self.GRID_LEVELS:
+            ax.plot(self.angles_closed, [gv] * (n + 1), color=style['grid_color'],
+                    linewidth=style['grid_linewidth'], alpha=style['grid_alpha'], zorder=1)
+
+        # 数据多边形（渲染时只替换顶点和颜色）
+        zeros = np.zeros(n + 1)
+        self.fill = ax.fill(self.angles_closed, zeros, alpha=style['fill_alpha'], zorder=3)[0]
+        self.line = ax.plot(self.angles_closed, zeros, 'o-', zorder=4, **style['line'])[0]
+
+        ax.set_xticks(angles)
+        ax.set_xticklabels(categories, fontsize=style['xtick_fontsize'], color=style['xtick_color'])
+        ax.set_yticks(self.GRID_LEVELS)
+        ax.set_yticklabels([str(gv) for gv in self.GRID_LEVELS],
+                           fontsize=style['ytick_fontsize'], color=style['ytick_color'])
+        ax.set_rlabel_position(0)
+        # 占位标题：让 tight_layout 按有标题的版式预留上边距
+        self.title = ax.set_title('X', fontsize=style['title_fontsize'], pad=style['title_pad'],
+                                  color=style['title_color'])
+        ax.grid(True, alpha=style['axes_grid_alpha'], color=style['grid_color'])
+        self.fig.tight_layout(pad=0.5)
+
+    def render(self, values: Sequence[float], color: str, title: str) -> bytes:
+        """更新多边形、颜色和标题，返回 PNG bytes"""
+        values = list(values)
+        closed = np.array(values + values[:1], dtype=float)
+        self.fill.set_xy(np.column_stack([self.angles_closed, closed]))
+        self.fill.set_color(color)
+        self.line.set_data(self.angles_closed, closed)
+        self.line.set_color(color)
+        if 'markeredgecolor' in self.style['line']:
+            self.line.set_markerfacecolor(color)
+        self.title.set_text(title)
+
+        buf = io.BytesIO()
+        self.fig.savefig(buf, format='png', dpi=self.style['dpi'], bbox_inches='tight',
+                         facecolor='white', edgecolor='none', pad_inches=self.style['pad_inches'])
+        return buf.getvalue()
+
+
+_templates: Dict[tuple, RadarTemplate] = {}
+
+
+def render_radar(style: Dict, categories: Sequence[str], values: Sequence[float],
+                 color: str, title: str, size: int) -> bytes:
+    """
+    用（进程内缓存的）模板渲染一张雷达图
+
+    参数:
+    - style: 样式 dict（见 RadarTemplate），需含唯一的 'name'
+    - categories: 轴标签
+    - values: 各轴 0-100 分数
+    - color: 多边形颜色
+    - title: 标题
+    - size: 图片尺寸（像素，换算为 figsize）
+
+    返回: PNG bytes
+    """
+    key = (style['name'], tuple(categories), size)
+    template = _templates.get(key)
+    if template is None:
+        template = RadarTemplate(style, categories, size)
+        _templates[key] = template
+    return template.render(values, color, title)
+
+
+# ════════════════════════════════════════════════════════════
+# 渲染服务：内容哈希缓存 + 进程池
+# ════════════════════════════════════════════════════════════
+
+ChartJob = Tuple[Callable, tuple, dict]
+
+
+def chart_style(*parts):
+    """
+    声明渲染函数的样式依赖（计入 chart_key，修改后旧缓存自动失效）
+
+    参数:
+    - parts: 样式 dict / 颜色常量列表（按内容计入），或样式辅助函数（按源码计入）
+
+    用法:
+        @chart_style(STOCK_RADAR_STYLE, _get_color, [COLOR_GREEN, COLOR_RED])
+        def _generate_radar_png_bytes(...): ...
+    """
+    def decorate(func):
+        func.chart_styles = parts
+        return func
+    return decorate
+
+
+_sources: Dict[object, str] = {}
+
+
+def _source(obj) -> str:
+    """函数/类源码（进程内缓存；取不到源码时退回限定名）"""
+    source = _sources.get(obj)
+    if source is None:
+        try:
+            source = inspect.getsource(obj)
+        except (OSError, TypeError):
+            source = f'{obj.__module__}.{obj.__qualname__}'
+        _sources[obj] = source
+    return source
+
+
+def _style_fingerprint(func: Callable) -> list:
+    """渲染函数源码 + 声明的样式 + 中文字体是否可用"""
+    parts = [_source(func)]
+    for part in getattr(func, 'chart_styles', ()):
+        parts.append(_source(part) if callable(part) else part)
+    return [parts, os.path.exists(CN_FONT_PATH)]
+
+
+def chart_key(func: Callable, args: tuple = (), kwargs: Optional[dict] = None) -> str:
+    """图表内容哈希（渲染函数 + 参数 + 样式 + 字体 + 缓存版本 + matplotlib 版本）"""
+    payload = json.dumps(
+        [CHART_CACHE_VERSION, matplotlib.__version__, func.__module__, func.__qualname__,
+         _style_fingerprint(func), list(args), kwargs or {}],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _init_worker():
+    """工作进程初始化：注册字体一次"""
+    setup_fonts()
+
+
+def _run_job(func: Callable, args: tuple, kwargs: dict) -> bytes:
+    return func(*args, **kwargs)
+
+
+class ChartService:
+    """图表渲染服务（内容哈希缓存 + 进程池）"""
+
+    def __init__(self, workers: Optional[int] = None, cache_dir: Optional[str] = CHART_CACHE_DIR,
+                 min_parallel: int = 8, memory_items: int = 512, max_cache_files: int = 5000):
+        """
+        参数:
+        - workers: 工作进程数（默认 min(4, CPU 核数)；1 为在当前进程渲染）
+        - cache_dir: PNG 磁盘缓存目录（None 只使用内存缓存）
+        - min_parallel: 待渲染图表数不少于该值时才使用进程池
+        - memory_items: 内存缓存条数
+        - max_cache_files: 磁盘缓存文件数上限（超出时删除最旧的文件）
+        """
+        self.workers = workers if workers is not None else min(4, os.cpu_count() or 1)
+        self.cache_dir = cache_dir
+        self.min_parallel = min_parallel
+        self.memory_items = memory_items
+        self.max_cache_files = max_cache_files
+        self._memory: Dict[str, bytes] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.hits = 0
+        self.rendered = 0
+
+    # ── 缓存 ──
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.png')
+
+    def _get_cached(self, key: str) -> Optional[bytes]:
+        png = self._memory.get(key)
+        if png is None and self.cache_dir:
+            try:
+                with open(self._cache_path(key), 'rb') as f:
+                    png = f.read()
+            except OSError:
+                return None
+            self._remember(key, png)
+        return png
+
+    def _remember(self, key: str, png: bytes):
+        if len(self._memory) >= self.memory_items:
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[key] = png
+
+    def _store(self, key: str, png: bytes):
+        self._remember(key, png)
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._cache_path(key) + f'.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, self._cache_path(key))
+        except OSError as e:
+            print(f'  [chart] 缓存写入失败: {e}')
+
+    def prune(self):
+        """磁盘缓存超过上限时删除最旧的文件"""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith('.png')]
+        if len(files) <= self.max_cache_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_cache_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ── 渲染 ──
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._pool
+
+    def render(self, func: Callable, *args, **kwargs) -> bytes:
+        """渲染单张图表（命中缓存时直接返回；失败时抛出异常）"""
+        key = chart_key(func, args, kwargs)
+        png = self._get_cached(key)
+        if png is not None:
+            self.hits += 1
+            return png
+        png = func(*args, **kwargs)
+        self.rendered += 1
+        self._store(key, png)
+        return png
+
+    def render_many(self, jobs: Sequence[ChartJob]) -> List[Optional[bytes]]:
+        """
+        批量渲染图表
+
+        参数:
+        - jobs: [(渲染函数, args, kwargs)]，渲染函数须为模块级函数（可被工作进程导入），返回 PNG bytes
+
+        返回: 与 jobs 同序的 PNG bytes 列表（渲染失败的为 None，并打印警告）
+        """
+        results: List[Optional[bytes]] = [None] * len(jobs)
+        pending = {}
+        for i, (func, args, kwargs) in enumerate(jobs):
+            key = chart_key(func, args, kwargs)
+            png = self._get_cached(key)
+            if png is not None:
+                self.hits += 1
+                results[i] = png
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if not pending:
+            return results
+
+        keys = list(pending)
+        if self.workers > 1 and len(keys) >= self.min_parallel:
+            pool = self._get_pool()
+            futures = [pool.submit(_run_job, *jobs[pending[key][0]]) for key in keys]
+            outputs = []
+            for key, future in zip(keys, futures):
+                try:
+                    outputs.append(future.result())
+                except Exception as e:
+                    print(f'  [chart] 渲染失败 ({jobs[pending[key][0]][0].__name__}): {e}')
+                    outputs.append(None)
+        else:
+            outputs = []
+            for key in keys:
+                try:
+                    outputs.append(_run_job(*jobs[pending[key][0]]))
+                except Exception as e:
+                    print(f'  [chart] 渲染失败 ({jobs[pending[key][0]][0].__name__}): {e}')
+                    outputs.append(None)
+
+        for key, png in zip(keys, outputs):
+            if png is None:
+                continue
+            self.rendered += 1
+            self._store(key, png)
+            for i in pending[key]:
+                results[i] = png
+        self.prune()
+        return results
+
+    def close(self):
+        """关闭进程池"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+_service: Optional[ChartService] = None
+
+
+def get_chart_service() -> ChartService:
+    """进程级图表渲染服务（工作进程数可用环境变量 CHART_WORKERS 指定）"""
+    global _service
+    if _service is None:
+        workers = os.environ.get('CHART_WORKERS')
+        _service = ChartService(workers=int(workers) if workers else None)
+        atexit.register(_service.close)
+    return _service
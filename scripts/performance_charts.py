@@ -37,6 +37,7 @@ from scripts.stock_radar import (  # noqa: E402
     COLOR_RED,
     COLOR_GRID,
 )
+from scripts.chart_service import chart_style, get_chart_service, render_radar  # noqa: E402
 
 # ── 配置 ──
 # 周期颜色：顺序蓝色色带，浅→深 = 1天→20天（明度单调，符合顺序编码）
@@ -86,6 +87,27 @@ RETURN_BOUND = 0.15      # 平均收益 / 买入平均收益 ±15% 映射到 [0,
 #     居中后负值显示为 <50、不再被截断贴底，轴才有区分度。
 SHARPE_BOUND = 1.0
 
+# 性能雷达模板样式（见 scripts.chart_service.RadarTemplate）
+PERF_RADAR_STYLE = {
+    'name': 'perf_radar',
+    'grid_color': COLOR_GRID,
+    'grid_linewidth': 0.5,
+    'grid_alpha': 0.30,
+    'axes_grid_alpha': 0.25,
+    'fill_alpha': 0.20,
+    # 细描边 + 白边标记点 = relief
+    'line': {'linewidth': 1.8, 'markeredgecolor': 'white', 'markeredgewidth': 0.6, 'markersize': 4},
+    'xtick_fontsize': 8,
+    'xtick_color': INK,
+    'ytick_fontsize': 5.5,
+    'ytick_color': INK_FAINT,
+    'title_fontsize': 9.5,
+    'title_pad': 14,
+    'title_color': INK,
+    'dpi': 150,
+    'pad_inches': 0.12,
+}
+
 # 章节标题样式（与 A股邮件一致）
 _SECTION_H2 = ('<h2 style="color: #007bff; margin-top: 30px; '
                'border-bottom: 1px solid #ddd; padding-bottom: 5px;">{title}</h2>')
@@ -163,6 +185,7 @@ def _strip_unsafe_glyphs(text):
 # 基础渲染：单系列雷达图 PNG
 # ════════════════════════════════════════════════════════════
 
+@chart_style(PERF_RADAR_STYLE)
 def _render_single_radar_png_bytes(title, dimensions, color, size=220, composite=None):
     """
     渲染单系列多边形雷达图，返回 PNG bytes（轴数 = PERF_DIMENSIONS 维度数）。
@@ -175,53 +198,10 @@ def _render_single_radar_png_bytes(title, dimensions, color, size=220, composite
     - composite: 标题"综合 X"用的标量；None 时回退 5 维等权均值（兼容旧调用）。
       调用方应传加权综合分 composite_score(dimensions)，使标题与排名口径一致。
     """
-    categories = PERF_DIMENSIONS
-    n = len(categories)
-
-    values = [dimensions.get(c, 0) for c in categories]
+    values = [dimensions.get(c, 0) for c in PERF_DIMENSIONS]
     avg = composite if composite is not None else float(np.mean(values))
-    values_closed = values + values[:1]
-    angles = [i / float(n) * 2 * np.pi for i in range(n)]
-    angles_closed = angles + angles[:1]
-
-    figsize = size / 100.0
-    fig, ax = plt.subplots(
-        figsize=(figsize, figsize),
-        subplot_kw=dict(polar=True),
-        facecolor='white',
-    )
-
-    ax.set_ylim(0, 100)
-
-    # 背景网格圈（recessive）
-    for gv in [20, 40, 60, 80]:
-        ax.plot(angles_closed, [gv] * (n + 1), color=COLOR_GRID,
-                linewidth=0.5, alpha=0.30, zorder=1)
-
-    # 数据多边形（细描边 + 浅色填充 + 白边标记点 = relief）
-    ax.fill(angles_closed, values_closed, alpha=0.20, color=color, zorder=3)
-    ax.plot(angles_closed, values_closed, 'o-', linewidth=1.8, color=color,
-            markerfacecolor=color, markeredgecolor='white', markeredgewidth=0.6,
-            markersize=4, zorder=4)
-
-    # 轴标签（墨色）
-    ax.set_xticks(angles)
-    ax.set_xticklabels(categories, fontsize=8, color=INK)
-    ax.set_yticks([20, 40, 60, 80])
-    ax.set_yticklabels(['20', '40', '60', '80'], fontsize=5.5, color=INK_FAINT)
-    ax.set_rlabel_position(0)
-
-    # 标题（含综合分，墨色）
-    ax.set_title(f'{title}（综合 {avg:.0f}）', fontsize=9.5, pad=14, color=INK)
-
-    ax.grid(True, alpha=0.25, color=COLOR_GRID)
-    plt.tight_layout(pad=0.5)
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight',
-                facecolor='white', edgecolor='none', pad_inches=0.12)
-    plt.close(fig)
-    return buf.getvalue()
+    # 模板复用 figure/axes（网格、轴标签只设置一次），只更新多边形、颜色和标题（含综合分）
+    return render_radar(PERF_RADAR_STYLE, PERF_DIMENSIONS, values, color, f'{title}（综合 {avg:.0f}）', size)
 
 
 def _save_png_bytes(fig):
@@ -260,17 +240,20 @@ def generate_overall_radar_section(horizon_metrics, window_name='3个月'):
     """
     cells = []
     attachments = {}
-
-    for h in HORIZONS:
-        m = horizon_metrics.get(h) or {}
-        if m.get('total_predictions', 0) == 0:
+    horizons = [h for h in HORIZONS if (horizon_metrics.get(h) or {}).get('total_predictions', 0) > 0]
+    jobs = []
+    for h in horizons:
+        dims = metrics_to_dimensions(horizon_metrics[h])
+        jobs.append((_render_single_radar_png_bytes, (f'{HORIZON_NAMES[h]}周期', dims, HORIZON_COLORS[h]),
+                     {'size': 230, 'composite': composite_score(dims)}))
+    pngs = get_chart_service().render_many(jobs)
+
+    for h, png in zip(horizons, pngs):
+        if png is None:
             continue
-        dims = metrics_to_dimensions(m)
-        color = HORIZON_COLORS[h]
+        m = horizon_metrics[h]
         cid = f'perf_radar_{h}d'
-        attachments[cid] = _render_single_radar_png_bytes(
-            f'{HORIZON_NAMES[h]}周期', dims, color, size=230,
-            composite=composite_score(dims))
+        attachments[cid] = png
 
         # 关键指标（墨色文本，准确率按状态上色并带数值 = 非颜色唯一编码）
         acc = m.get('accuracy', 0)
@@ -434,13 +417,6 @@ def generate_sector_radar_section(sector_metrics, min_samples=5, items_per_row=4
         dims = metrics_to_dimensions(m)
         avg = composite_score(dims)  # 加权综合分（胜率为主、准确率为辅）
         color = _get_color(avg)  # 状态三色：≥60 绿 / 40-60 橙 / <40 红
-        cid = f'perf_sector_{sector}'
-        try:
-            attachments[cid] = _render_single_radar_png_bytes(name, dims, color, size=190, composite=avg)
-        except Exception as e:  # 单板块失败不影响整体
-            print(f'  [perf-radar] 板块图表生成失败: {name} {e}')
-            continue
-
         items.append({
             'name': name,
             'avg': avg,
@@ -448,13 +424,25 @@ def generate_sector_radar_section(sector_metrics, min_samples=5, items_per_row=4
             'accuracy': m.get('accuracy', 0),
             'avg_return': m.get('avg_return', 0),
             'buy_avg_return': m.get('buy_avg_return', 0),
-            'cid': cid,
+            'cid': f'perf_sector_{sector}',
+            'job': (_render_single_radar_png_bytes, (name, dims, color), {'size': 190, 'composite': avg}),
         })
 
     # 被过滤板块明确记录（不做静默截断）
     for name, total in dropped:
         print(f'  [perf-radar] 板块样本不足跳过: {name} (n={total} < {min_samples})')
 
+    # 一次批量渲染（内容哈希缓存，图表多时并行）；单板块失败不影响整体
+    pngs = get_chart_service().render_many([it['job'] for it in items])
+    rendered = []
+    for it, png in zip(items, pngs):
+        if png is None:
+            print(f"  [perf-radar] 板块图表生成失败: {it['name']}")
+            continue
+        attachments[it['cid']] = png
+        rendered.append(it)
+    items = rendered
+
     if not items:
         return '', {}
 
@@ -580,6 +568,8 @@ def _sanitize_cid_code(code):
     return re.sub(r'[^A-Za-z0-9]', '', str(code))
 
 
+@chart_style(_get_color, _style_bar_axis, _save_png_bytes,
+             [COLOR_GREEN, COLOR_ORANGE, COLOR_RED, COLOR_GRID, INK, INK_MUTED, INK_FAINT])
 def _stock_rank_bar_png_bytes(items):
     """
     渲染「全部个股综合分排名」水平条形图，返回 PNG bytes。
@@ -668,7 +658,8 @@ def generate_stock_section(stock_bundle, min_samples=5, top_n=10, items_per_row=
 
     # ── 5.1 全部个股综合分排名条形图 ──
     ranked_asc = sorted(items, key=lambda it: it['avg'])  # barh 最高分落在顶部
-    attachments['perf_stock_rank'] = _stock_rank_bar_png_bytes(ranked_asc)
+    rank_rows = [{'label': it['label'], 'avg': it['avg'], 'total': it['total']} for it in ranked_asc]
+    attachments['perf_stock_rank'] = get_chart_service().render(_stock_rank_bar_png_bytes, rank_rows)
 
     html = _SECTION_H2.format(title='五、个股表现')
     html += _CAPTION.format(
@@ -684,19 +675,25 @@ def generate_stock_section(stock_bundle, min_samples=5, top_n=10, items_per_row=
 
     # ── 5.2 Top N 个股雷达网格 ──
     top_items = sorted(items, key=lambda it: it['avg'], reverse=True)[:top_n]
+    pngs = get_chart_service().render_many([
+        (_render_single_radar_png_bytes, (it['name'], it['dims'], _get_color(it['avg'])),
+         {'size': 185, 'composite': it['avg']})
+        for it in top_items
+    ])
+    rendered = []
+    for it, png in zip(top_items, pngs):
+        if png is None:  # 单只失败不影响整体
+            print(f"  [perf-stock] 个股图表生成失败: {it['name']}")
+            continue
+        attachments[f"perf_stock_{_sanitize_cid_code(it['code'])}"] = png
+        rendered.append(it)
+    top_items = rendered
     html += '    <table style="border: 0; border-collapse: collapse; width: 100%;">\n        <tr>\n'
 
     for i, it in enumerate(top_items):
         if i % items_per_row == 0 and i > 0:
             html += '        </tr><tr>\n'
         cid = f"perf_stock_{_sanitize_cid_code(it['code'])}"
-        try:
-            attachments[cid] = _render_single_radar_png_bytes(
-                it['name'], it['dims'], _get_color(it['avg']), size=185,
-                composite=it['avg'])
-        except Exception as e:  # 单只失败不影响整体
-            print(f"  [perf-stock] 个股图表生成失败: {it['name']} {e}")
-            continue
 
         avg_color = (COLOR_GREEN if it['avg'] >= 60
                      else COLOR_ORANGE if it['avg'] >= 40 else COLOR_RED)
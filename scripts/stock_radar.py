@@ -20,27 +20,17 @@ A股六边形强度图生成器 (Hexagonal Stock Strength Radar Chart)
 import os
 import sys
 import base64
-import io
 import json
 import argparse
 from datetime import datetime
 
 import numpy as np
 
-# ── matplotlib setup ──
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-
-# Register Chinese font (WenQuanYi Micro Hei)
-_CN_FONT_PATH = '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc'
-if os.path.exists(_CN_FONT_PATH):
-    fm.fontManager.addfont(_CN_FONT_PATH)
-    plt.rcParams['font.family'] = 'WenQuanYi Micro Hei, DejaVu Sans, sans-serif'
-else:
-    plt.rcParams['font.family'] = 'DejaVu Sans, sans-serif'
-plt.rcParams['axes.unicode_minus'] = False
+# ── matplotlib setup (Agg backend + Chinese font, registered once per process) ──
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.chart_service import chart_style, get_chart_service, render_radar, setup_fonts  # noqa: E402
+
+setup_fonts()
 
 # ── Configuration ──
 DIMENSIONS = ['Trend', 'Return', 'Risk', 'Tech', 'Momentum', 'Signal']
@@ -50,6 +40,26 @@ COLOR_ORANGE = '#ea580c'
 COLOR_RED = '#dc2626'
 COLOR_GRID = '#cccccc'
 
+# Radar template style (see scripts.chart_service.RadarTemplate)
+STOCK_RADAR_STYLE = {
+    'name': 'stock_radar',
+    'grid_color': COLOR_GRID,
+    'grid_linewidth': 0.4,
+    'grid_alpha': 0.25,
+    'axes_grid_alpha': 0.2,
+    'fill_alpha': 0.18,
+    'line': {'linewidth': 1.5, 'markersize': 3},
+    'xtick_fontsize': 6.5,
+    'xtick_color': '#444',
+    'ytick_fontsize': 5,
+    'ytick_color': '#999',
+    'title_fontsize': 7.5,
+    'title_pad': 12,
+    'title_color': '#333',
+    'dpi': 140,
+    'pad_inches': 0.1,
+}
+
 
 def _parse_pl_ratio(val, default=1.0):
     """Parse profit/loss ratio from various formats (number, '2.38:1', etc.)."""
@@ -209,59 +219,8 @@ def generate_radar_png_base64(name, code, dimensions, size=180):
     Returns:
         str: base64-encoded PNG
     """
-    categories = DIMENSIONS
-    N = len(categories)
-
-    values = [dimensions.get(d.lower(), 50) for d in categories]
-    avg_score = float(np.mean(values))
-    main_color = _get_color(avg_score)
-
-    # Close the polygon
-    values_closed = values + values[:1]
-    angles = [n / float(N) * 2 * np.pi for n in range(N)]
-    angles_closed = angles + angles[:1]
-
-    figsize = size / 100.0
-    fig, ax = plt.subplots(
-        figsize=(figsize, figsize),
-        subplot_kw=dict(polar=True),
-        facecolor='white'
-    )
-
-    ax.set_ylim(0, 100)
-
-    # Background grid lines
-    for gv in [20, 40, 60, 80]:
-        ax.plot(angles_closed, [gv] * (N + 1), color=COLOR_GRID, linewidth=0.4, alpha=0.25, zorder=1)
-
-    # Data polygon
-    ax.fill(angles_closed, values_closed, alpha=0.18, color=main_color, zorder=3)
-    ax.plot(angles_closed, values_closed, 'o-', linewidth=1.5, color=main_color,
-            markersize=3, zorder=4)
-
-    # Axis labels
-    ax.set_xticks(angles)
-    ax.set_xticklabels(categories, fontsize=6.5, color='#444')
-
-    # Y-axis labels
-    ax.set_yticks([20, 40, 60, 80])
-    ax.set_yticklabels(['20', '40', '60', '80'], fontsize=5, color='#999')
-    ax.set_rlabel_position(0)
-
-    # Title
-    plt.title(f'{name} ({code})', fontsize=7.5, pad=12, color='#333')
-
-    ax.grid(True, alpha=0.2, color=COLOR_GRID)
-
-    plt.tight_layout(pad=0.5)
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=140, bbox_inches='tight',
-                facecolor='white', edgecolor='none', pad_inches=0.1)
-    plt.close()
-    buf.seek(0)
-
-    return base64.b64encode(buf.read()).decode('utf-8')
+    png_bytes = get_chart_service().render(_generate_radar_png_bytes, name, code, dimensions, size=size)
+    return base64.b64encode(png_bytes).decode('utf-8')
 
 
 def generate_html_radar_section(three_horizon_results, stock_analyses, max_stocks=None):
@@ -282,6 +241,7 @@ def generate_html_radar_section(three_horizon_results, stock_analyses, max_stock
 
     radar_items = []
     attachments = {}
+    jobs = []
 
     for code, data in three_horizon_results.items():
         analysis = stock_analyses.get(code, {})
@@ -303,22 +263,24 @@ def generate_html_radar_section(three_horizon_results, stock_analyses, max_stock
 
         name = analysis.get('name', code)
         avg_score = float(np.mean(list(dims.values())))
-
-        # Generate chart as PNG bytes (not base64)
-        try:
-            png_bytes = _generate_radar_png_bytes(name, code, dims, size=180)
-            cid = f"radar_{code}"
-            attachments[cid] = png_bytes
-            radar_items.append({
-                'code': code,
-                'name': name,
-                'avg_score': avg_score,
-                'cid': cid,
-                'dims': dims
-            })
-        except Exception as e:
-            print(f"  [radar] Warning: {code} {name} chart failed: {e}")
+        radar_items.append({
+            'code': code,
+            'name': name,
+            'avg_score': avg_score,
+            'cid': f"radar_{code}",
+            'dims': dims
+        })
+        jobs.append((_generate_radar_png_bytes, (name, code, dims), {'size': 180}))
+
+    # Render all charts as PNG bytes (not base64) in one batch: cached by content, parallel when many
+    rendered = []
+    for item, png_bytes in zip(radar_items, get_chart_service().render_many(jobs)):
+        if png_bytes is None:
+            print(f"  [radar] Warning: {item['code']} {item['name']} chart failed")
             continue
+        attachments[item['cid']] = png_bytes
+        rendered.append(item)
+    radar_items = rendered
 
     if not radar_items:
         return '', {}
@@ -373,45 +335,12 @@ def generate_html_radar_section(three_horizon_results, stock_analyses, max_stock
     return html, attachments
 
 
+@chart_style(STOCK_RADAR_STYLE, _get_color, [COLOR_GREEN, COLOR_ORANGE, COLOR_RED])
 def _generate_radar_png_bytes(name, code, dimensions, size=180):
     """Generate radar chart, return raw PNG bytes (for CID email embedding)."""
-    categories = DIMENSIONS
-    N = len(categories)
-
-    values = [dimensions.get(d.lower(), 50) for d in categories]
-    avg_score = float(np.mean(values))
-    main_color = _get_color(avg_score)
-
-    values_closed = values + values[:1]
-    angles = [n / float(N) * 2 * np.pi for n in range(N)]
-    angles_closed = angles + angles[:1]
-
-    figsize = size / 100.0
-    fig, ax = plt.subplots(
-        figsize=(figsize, figsize),
-        subplot_kw=dict(polar=True),
-        facecolor='white'
-    )
-
-    ax.set_ylim(0, 100)
-    for gv in [20, 40, 60, 80]:
-        ax.plot(angles_closed, [gv] * (N + 1), color=COLOR_GRID, linewidth=0.4, alpha=0.25, zorder=1)
-    ax.fill(angles_closed, values_closed, alpha=0.18, color=main_color, zorder=3)
-    ax.plot(angles_closed, values_closed, 'o-', linewidth=1.5, color=main_color, markersize=3, zorder=4)
-    ax.set_xticks(angles)
-    ax.set_xticklabels(categories, fontsize=6.5, color='#444')
-    ax.set_yticks([20, 40, 60, 80])
-    ax.set_yticklabels(['20', '40', '60', '80'], fontsize=5, color='#999')
-    ax.set_rlabel_position(0)
-    plt.title(f'{name} ({code})', fontsize=7.5, pad=12, color='#333')
-    ax.grid(True, alpha=0.2, color=COLOR_GRID)
-    plt.tight_layout(pad=0.5)
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=140, bbox_inches='tight',
-                facecolor='white', edgecolor='none', pad_inches=0.1)
-    plt.close()
-    return buf.getvalue()
+    values = [dimensions.get(d.lower(), 50) for d in DIMENSIONS]
+    main_color = _get_color(float(np.mean(values)))
+    return render_radar(STOCK_RADAR_STYLE, DIMENSIONS, values, main_color, f'{name} ({code})', size)
 
 
 def compute_hk_stock_dimensions(stock_data=None, three_horizon_entry=None, risk_reward_entry=None):
@@ -537,6 +466,8 @@ def main():
         with open(args.batch, 'r') as f:
             stocks_data = json.load(f)
         os.makedirs(args.output_dir, exist_ok=True)
+        labels = []
+        jobs = []
         for item in stocks_data:
             dims = compute_a_stock_dimensions(
                 analysis=item.get('analysis', {}),
@@ -547,10 +478,14 @@ def main():
             )
             name = item.get('name', item.get('analysis', {}).get('name', 'N/A'))
             code = item.get('code', 'unknown')
-            b64 = generate_radar_png_base64(name, code, dims)
+            labels.append((code, name))
+            jobs.append((_generate_radar_png_bytes, (name, code, dims), {}))
+        for (code, name), png_bytes in zip(labels, get_chart_service().render_many(jobs)):
+            if png_bytes is None:
+                continue
             out_path = os.path.join(args.output_dir, f"{code}.png")
             with open(out_path, 'wb') as f:
-                f.write(base64.b64decode(b64))
+                f.write(png_bytes)
             print(f"  {code} {name} -> {out_path}")
         return
 
@@ -44,7 +44,7 @@ except ImportError:
 
 
 # ============== 配置 ==============
-PREDICTION_HISTORY_FILE = "data/hsi_prediction_history.json"
+PREDICTION_HISTORY_DB = "data/hsi_prediction_history.db"
 OUTPUT_DIR = "output/hsi_prediction_visualization"
 
 # 颜色配置
@@ -68,9 +68,10 @@ HORIZON_COLORS = {
 
 def load_prediction_history():
     """加载预测历史数据"""
-    with open(PREDICTION_HISTORY_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data['predictions']
+    from ml_services.prediction_store import PredictionStore
+
+    with PredictionStore(PREDICTION_HISTORY_DB) as store:
+        return store.load_records()
 
 
 def get_hsi_price_data(start_date, end_date):
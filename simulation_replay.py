@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+港股模拟交易离线回放
+
+用本地历史K线驱动 SimulationTrader 的同一套决策流程（分析 → 大模型 → 解析 → 下单），
+按 CPU 速度推进回放时钟，不依赖实时行情、交易时段和网络：
+1. 时钟：回放时钟替代 datetime.now()，交易时段判断、日志和交易记录时间都取回放时间
+2. 行情：从本地价格缓存（data/stock_cache）读取日线或小时线，按回放时间提供报价（无未来数据）
+3. 大模型：使用录制的响应（simulation_trader.py --record-llm 生成的 JSONL）或自定义桩函数
+4. 输出：与实时运行相同的事件日志、交易日志和 CSV，写入独立的输出目录
+
+用法:
+    python simulation_replay.py --start 2026-03-01 --end 2026-06-30 --llm-responses data/llm_responses.jsonl
+"""
+
+import os
+import glob
+import json
+import pickle
+import argparse
+from datetime import datetime, time as dt_time, timedelta
+
+import pandas as pd
+
+import hk_smart_money_tracker
+from simulation_trader import SimulationTrader, TencentQuoteService
+
+# 港股交易时段
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+
+# 日线回放时每个交易日的决策时间（开盘后，使用当日开盘价成交）
+DEFAULT_CYCLE_TIME = dt_time(10, 30)
+
+# 没有可用录制响应时返回的空推荐
+EMPTY_RECOMMENDATIONS = '{"buy": [], "sell": []}'
+
+
+class ReplayClock:
+    """可手动推进的回放时钟"""
+
+    def __init__(self, start):
+        self.current = start
+
+    def set(self, timestamp):
+        self.current = timestamp
+
+    def __call__(self):
+        return self.current
+
+
+class HistoricalBarStore:
+    """
+    本地历史K线（日线或小时线），按回放时钟提供报价和简要分析
+
+    日线：回放时间在开盘后取当日开盘价，收盘后取当日收盘价，开盘前取上一交易日收盘价；
+    小时线：取时间戳（K线结束时间）不晚于回放时间的最新一根K线收盘价。
+    """
+
+    def __init__(self, bars, clock):
+        """
+        Args:
+            bars (dict): {股票代码: DataFrame}，列包括 Open, High, Low, Close, Volume，索引为时间
+            clock (callable): 回放时钟
+        """
+        self.clock = clock
+        self.bars = {}
+        for code, df in bars.items():
+            if df is None or df.empty:
+                continue
+            df = df.sort_index()
+            index = pd.DatetimeIndex(df.index)
+            if index.tz is not None:
+                index = index.tz_convert('Asia/Hong_Kong').tz_localize(None)
+            self.bars[code] = df.set_axis(index)
+        self.intraday = any((df.index != df.index.normalize()).any() for df in self.bars.values())
+
+    @classmethod
+    def from_stock_cache(cls, codes, clock, cache_dir='data/stock_cache'):
+        """
+        从本地价格缓存加载（ml_trading_model.get_stock_data_with_cache 写入的 pkl 文件）
+
+        Args:
+            codes (iterable): 股票代码，例如 "0700.HK"
+            clock (callable): 回放时钟
+            cache_dir (str): 缓存目录
+
+        Returns:
+            HistoricalBarStore
+        """
+        bars = {}
+        for code in codes:
+            stock_code = code.replace('.HK', '')
+            paths = glob.glob(os.path.join(cache_dir, f"{stock_code}_*d.pkl"))
+            if not paths:
+                continue
+            # 同一股票有多个周期的缓存时取数据最长的
+            best = None
+            for path in paths:
+                try:
+                    with open(path, 'rb') as f:
+                        df = pickle.load(f)['data']
+                except Exception:
+                    continue
+                if df is not None and (best is None or len(df) > len(best)):
+                    best = df
+            if best is not None:
+                bars[code] = best
+        return cls(bars, clock)
+
+    def trading_sessions(self, start, end):
+        """回放区间内所有K线时间（日线为交易日日期）"""
+        stamps = sorted(set().union(*[set(df.index) for df in self.bars.values()])) if self.bars else []
+        return [ts for ts in stamps if start <= ts.to_pydatetime() <= end + timedelta(days=1) - timedelta(microseconds=1)]
+
+    def _visible(self, code):
+        """回放时间可见的K线（不含未来数据）和当前价格"""
+        df = self.bars.get(code)
+        if df is None:
+            return None, None
+        now = self.clock()
+        if self.intraday:
+            visible = df.loc[:now]
+            if visible.empty:
+                return None, None
+            return visible, float(visible['Close'].iloc[-1])
+
+        today = pd.Timestamp(now.date())
+        if now.time() >= MARKET_CLOSE:
+            visible = df.loc[:today]
+            price_field = 'Close'
+        else:
+            visible = df.loc[:today - pd.Timedelta(days=1)]
+            price_field = 'Close'
+            if now.time() >= MARKET_OPEN and today in df.index:
+                # 开盘后只知道当日开盘价
+                visible = pd.concat([visible, df.loc[[today]].assign(
+                    High=df.at[today, 'Open'], Low=df.at[today, 'Open'], Close=df.at[today, 'Open'], Volume=0)])
+        if visible.empty:
+            return None, None
+        return visible, float(visible[price_field].iloc[-1])
+
+    def quotes(self, stock_codes):
+        """
+        按回放时间报价（与 get_hk_quotes_tencent 返回格式相同）
+
+        Args:
+            stock_codes (list): 股票代码
+
+        Returns:
+            dict: {股票代码: 报价字典}
+        """
+        result = {}
+        for code in stock_codes:
+            visible, price = self._visible(code)
+            if price is None:
+                continue
+            prev_close = float(visible['Close'].iloc[-2]) if len(visible) > 1 else price
+            result[code] = {
+                'name': hk_smart_money_tracker.WATCHLIST.get(code, code),
+                'last': price,
+                'prev_close': prev_close,
+                'open': float(visible['Open'].iloc[-1]),
+                'bid': price,
+                'ask': price,
+                'high': float(visible['High'].iloc[-1]),
+                'low': float(visible['Low'].iloc[-1]),
+                'volume': float(visible['Volume'].iloc[-1]),
+                'quote_time': visible.index[-1].strftime('%Y/%m/%d %H:%M:%S')
+            }
+        return result
+
+    def analyze(self, code, name):
+        """
+        基于可见K线的简要技术分析（替代需要联网的 hk_smart_money_tracker.analyze_stock）
+
+        Returns:
+            dict: 分析结果，数据不足时返回 None
+        """
+        visible, price = self._visible(code)
+        if visible is None or len(visible) < 21:
+            return None
+        close = visible['Close']
+        volume = visible['Volume']
+        avg_volume = volume.iloc[-21:-1].mean()
+        return {
+            'code': code,
+            'name': name,
+            'last_close': round(price, 3),
+            'change_1d_pct': round((close.iloc[-1] / close.iloc[-2] - 1) * 100, 2),
+            'change_5d_pct': round((close.iloc[-1] / close.iloc[-6] - 1) * 100, 2),
+            'change_20d_pct': round((close.iloc[-1] / close.iloc[-21] - 1) * 100, 2),
+            'ma20': round(close.iloc[-20:].mean(), 3),
+            'high_20d': round(visible['High'].iloc[-20:].max(), 3),
+            'low_20d': round(visible['Low'].iloc[-20:].min(), 3),
+            'volume_ratio': round(volume.iloc[-1] / avg_volume, 2) if avg_volume > 0 else None
+        }
+
+
+def build_replay_prompt(results, run_date=None, market_metrics=None, investor_type='conservative'):
+    """回放用分析提示词（与 build_llm_analysis_prompt 签名相同，内容为各股票K线摘要的 JSON）"""
+    return "港股自选股K线摘要（离线回放）:\n" + json.dumps(results, ensure_ascii=False, indent=2) + \
+        f"\n投资者类型: {investor_type}"
+
+
+def hold_llm(prompt, kind):
+    """桩大模型：始终不给出买卖建议"""
+    return EMPTY_RECOMMENDATIONS if kind == 'format' else "观望"
+
+
+class RecordedLLM:
+    """
+    回放录制的大模型响应（simulation_trader.py --record-llm 生成的 JSONL）
+
+    每次调用返回同类型（analysis/format）中时间不晚于回放时钟、且尚未使用过的最新一条响应；
+    没有可用响应时返回空推荐，保证回放结果确定。
+    """
+
+    def __init__(self, path, clock):
+        self.clock = clock
+        self.responses = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                self.responses.setdefault(record['kind'], []).append(
+                    (datetime.fromisoformat(record['timestamp']), record['response']))
+        for records in self.responses.values():
+            records.sort(key=lambda r: r[0])
+        self._last_used = {}
+
+    def __call__(self, prompt, kind):
+        now = self.clock()
+        last_used = self._last_used.get(kind)
+        chosen = None
+        for timestamp, response in self.responses.get(kind, []):
+            if timestamp > now:
+                break
+            if last_used is None or timestamp > last_used:
+                chosen = (timestamp, response)
+        if chosen is None:
+            return EMPTY_RECOMMENDATIONS if kind == 'format' else ""
+        self._last_used[kind] = chosen[0]
+        return chosen[1]
+
+
+class SimulationReplay:
+    """离线回放引擎：按历史K线推进回放时钟，逐个交易周期调用 SimulationTrader.execute_trades"""
+
+    def __init__(self, bar_store, clock, llm=None, output_dir='output/simulation_replay',
+                 initial_capital=1000000, investor_type="进取型", cycle_time=DEFAULT_CYCLE_TIME):
+        """
+        Args:
+            bar_store (HistoricalBarStore): 历史K线
+            clock (ReplayClock): 回放时钟（与 bar_store 共用）
+            llm (callable): 大模型 llm(prompt, kind)，默认 hold_llm
+            output_dir (str): 事件日志、交易日志和 CSV 输出目录（每次回放前清空旧状态）
+            initial_capital (float): 初始资金
+            investor_type (str): 投资者风险偏好
+            cycle_time (datetime.time): 日线回放时每个交易日的决策时间
+        """
+        self.bar_store = bar_store
+        self.clock = clock
+        self.cycle_time = cycle_time
+        os.makedirs(output_dir, exist_ok=True)
+        for name in ('simulation_state.db', 'simulation_state.db-wal', 'simulation_state.db-shm',
+                     'simulation_transactions.csv', 'simulation_portfolio.csv'):
+            path = os.path.join(output_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.trader = SimulationTrader(
+            initial_capital=initial_capital,
+            investor_type=investor_type,
+            data_dir=output_dir,
+            clock=clock,
+            llm=llm or hold_llm,
+            analyzer=bar_store.analyze,
+            prompt_builder=build_replay_prompt,
+            # 回放时报价来自本地K线，每次按回放时间重新读取
+            quote_service=TencentQuoteService(ttl_seconds=0, fetcher=bar_store.quotes),
+            notify=False
+        )
+
+    def cycle_times(self, start, end):
+        """回放区间内的交易周期时间"""
+        sessions = self.bar_store.trading_sessions(start, end)
+        if self.bar_store.intraday:
+            return [ts.to_pydatetime() for ts in sessions
+                    if ts.weekday() < 5 and MARKET_OPEN <= ts.time() <= MARKET_CLOSE]
+        return [datetime.combine(ts.date(), self.cycle_time) for ts in sessions if ts.weekday() < 5]
+
+    def run(self, start, end):
+        """
+        回放 [start, end] 区间
+
+        Args:
+            start (datetime): 开始日期
+            end (datetime): 结束日期
+
+        Returns:
+            dict: 回放结果摘要
+        """
+        cycles = self.cycle_times(start, end)
+        trader = self.trader
+        for i, cycle_time in enumerate(cycles):
+            self.clock.set(cycle_time)
+            trader.execute_trades()
+
+            # 每个交易日最后一个周期后做收盘总结
+            if i == len(cycles) - 1 or cycles[i + 1].date() != cycle_time.date():
+                self.clock.set(datetime.combine(cycle_time.date(), dt_time(16, 5)))
+                trader.run_daily_summary()
+
+        trader.generate_final_report()
+        final_value = trader.get_portfolio_value()
+        return {
+            'cycles': len(cycles),
+            'transactions': len(trader.transaction_history),
+            'final_value': final_value,
+            'total_return_pct': (final_value - trader.initial_capital) / trader.initial_capital * 100
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='港股模拟交易离线回放')
+    parser.add_argument('--start', type=str, required=True, help='回放开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', type=str, required=True, help='回放结束日期 YYYY-MM-DD')
+    parser.add_argument('--llm-responses', type=str, default=None, help='录制的大模型响应 JSONL（默认不交易的桩响应）')
+    parser.add_argument('--cache-dir', type=str, default='data/stock_cache', help='本地价格缓存目录')
+    parser.add_argument('--output-dir', type=str, default='output/simulation_replay', help='回放输出目录')
+    parser.add_argument('--initial-capital', type=float, default=1000000, help='初始资金')
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, '%Y-%m-%d')
+    end = datetime.strptime(args.end, '%Y-%m-%d')
+    clock = ReplayClock(start)
+    bar_store = HistoricalBarStore.from_stock_cache(hk_smart_money_tracker.WATCHLIST.keys(), clock, cache_dir=args.cache_dir)
+    if not bar_store.bars:
+        print(f"❌ {args.cache_dir} 中没有自选股的历史K线")
+        return
+
+    llm = RecordedLLM(args.llm_responses, clock) if args.llm_responses else None
+    replay = SimulationReplay(bar_store, clock, llm=llm, output_dir=args.output_dir, initial_capital=args.initial_capital)
+    summary = replay.run(start, end)
+
+    print(f"✅ 回放完成: {summary['cycles']} 个交易周期, {summary['transactions']} 笔交易记录")
+    print(f"   最终价值: HK${summary['final_value']:,.2f}, 总收益率: {summary['total_return_pct']:.2f}%")
+    print(f"   输出目录: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
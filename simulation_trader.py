@@ -10,12 +10,15 @@
 
 # 全局参数配置
 DEFAULT_ANALYSIS_FREQUENCY = 120  # 默认分析频率（分钟，2小时）
+DEFAULT_SNAPSHOT_INTERVAL = 100  # 每累计多少个事件写入一次压缩快照
+DEFAULT_QUOTE_TTL = 300  # 实时报价缓存有效期（秒），覆盖一个交易周期
 
 import os
 import sys
 import time
 import json
 import random
+import sqlite3
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -31,10 +34,238 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # 导入hk_smart_money_tracker模块和腾讯财经接口
 import hk_smart_money_tracker
-from data_services.tencent_finance import get_hk_stock_data_tencent
+from data_services.tencent_finance import get_hk_stock_data_tencent, TencentQuoteService
+
+class SimulationEventStore:
+    """
+    模拟交易事件日志（SQLite，WAL）
+
+    交易、决策和投资组合快照以事件形式逐条追加（每个事件一次 INSERT），
+    并定期写入压缩快照（资金、持仓、决策历史）。启动时从最新快照开始重放后续事件，
+    不再每笔交易都重写整个 simulation_state.json。
+    """
+
+    # 保留的历史快照数量（更早的快照在写入新快照时删除）
+    KEEP_SNAPSHOTS = 3
+
+    def __init__(self, db_path, legacy_state_file=None):
+        """
+        Args:
+            db_path (str): 事件日志数据库路径
+            legacy_state_file (str): 旧 JSON 状态文件路径（数据库为空时一次性导入）
+        """
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL,"
+                " tag TEXT,"
+                " ts TEXT,"
+                " ts_epoch REAL,"
+                " retain INTEGER,"
+                " payload TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_kind_ts ON events (kind, tag, ts_epoch)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " last_seq INTEGER NOT NULL,"
+                " created_at TEXT,"
+                " state TEXT NOT NULL)"
+            )
+
+        if legacy_state_file and os.path.exists(legacy_state_file) and self.is_empty():
+            self.import_legacy_state(legacy_state_file)
+
+    @staticmethod
+    def _epoch(timestamp_str):
+        """解析时间戳为 epoch 秒（本地时间），无法解析时返回 None"""
+        try:
+            if 'Z' in timestamp_str:
+                return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).timestamp()
+            return datetime.fromisoformat(timestamp_str).timestamp()
+        except (TypeError, ValueError):
+            return None
+
+    def _event_row(self, kind, payload, retain=None):
+        timestamp_str = str(payload.get('timestamp', ''))
+        return (kind, payload.get('type'), timestamp_str, self._epoch(timestamp_str), retain,
+                json.dumps(payload, ensure_ascii=False, default=str))
+
+    def is_empty(self):
+        """是否没有任何事件和快照"""
+        has_event = self._conn.execute("SELECT 1 FROM events LIMIT 1").fetchone()
+        has_snapshot = self._conn.execute("SELECT 1 FROM snapshots LIMIT 1").fetchone()
+        return has_event is None and has_snapshot is None
+
+    def append(self, kind, payload, retain=None):
+        """
+        追加一个事件
+
+        Args:
+            kind (str): 事件类型（'transaction'、'portfolio'、'decision'）
+            payload (dict): 事件内容（与旧状态文件中的记录格式相同）
+            retain (int): 决策事件重放后内存中保留的决策历史条数
+
+        Returns:
+            int: 事件序号
+        """
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO events (kind, tag, ts, ts_epoch, retain, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                self._event_row(kind, payload, retain))
+        return cursor.lastrowid
+
+    def last_seq(self):
+        """最新事件序号"""
+        row = self._conn.execute("SELECT MAX(seq) FROM events").fetchone()
+        return row[0] or 0
+
+    def latest_snapshot(self):
+        """
+        最新快照
+
+        Returns:
+            tuple: (last_seq, state)，没有快照时返回 (0, None)
+        """
+        row = self._conn.execute("SELECT last_seq, state FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            return 0, None
+        return row[0], json.loads(row[1])
+
+    def events_since_snapshot(self):
+        """最新快照之后的事件数"""
+        last_seq, _ = self.latest_snapshot()
+        return self._conn.execute("SELECT COUNT(*) FROM events WHERE seq > ?", (last_seq,)).fetchone()[0]
+
+    def write_snapshot(self, state, created_at=None):
+        """
+        写入压缩快照（覆盖到当前最新事件），并删除较早的快照
+
+        Args:
+            state (dict): 资金、持仓、决策历史等可重放状态
+            created_at (str): 快照时间，默认当前系统时间（离线回放时传入回放时间）
+        """
+        created_at = created_at or datetime.now().isoformat()
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO snapshots (last_seq, created_at, state) VALUES (?, ?, ?)",
+                (self.last_seq(), created_at, json.dumps(state, ensure_ascii=False, default=str)))
+            self._conn.execute(
+                "DELETE FROM snapshots WHERE id NOT IN (SELECT id FROM snapshots ORDER BY id DESC LIMIT ?)",
+                (self.KEEP_SNAPSHOTS,))
+
+    def iter_events(self, after_seq=0, kinds=None):
+        """
+        按序号顺序遍历事件
+
+        Args:
+            after_seq (int): 只返回序号大于该值的事件
+            kinds (list): 只返回这些类型的事件
+
+        Returns:
+            iterator: (kind, retain, payload)
+        """
+        sql = "SELECT kind, retain, payload FROM events WHERE seq > ?"
+        params = [after_seq]
+        if kinds:
+            sql += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        for kind, retain, payload in self._conn.execute(sql + " ORDER BY seq", params):
+            yield kind, retain, json.loads(payload)
+
+    def load_payloads(self, kind):
+        """读取某类事件的全部记录（按写入顺序）"""
+        return [payload for _, _, payload in self.iter_events(kinds=[kind])]
+
+    def count(self, kind, tags=None):
+        """
+        某类事件的数量
+
+        Args:
+            kind (str): 事件类型
+            tags (list): 只统计这些子类型（如 ['BUY']）
+
+        Returns:
+            int: 事件数
+        """
+        sql = "SELECT COUNT(*) FROM events WHERE kind = ?"
+        params = [kind]
+        if tags:
+            sql += f" AND tag IN ({','.join('?' * len(tags))})"
+            params.extend(tags)
+        return self._conn.execute(sql, params).fetchone()[0]
+
+    def tail(self, kind, n):
+        """某类事件最近 n 条记录（按写入顺序）"""
+        rows = self._conn.execute(
+            "SELECT payload FROM events WHERE kind = ? ORDER BY seq DESC LIMIT ?", (kind, n)).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def query_window(self, kind, since, until=None, tags=None):
+        """
+        按时间窗口查询事件（走 (kind, tag, ts_epoch) 索引）
+
+        Args:
+            kind (str): 事件类型
+            since (datetime): 窗口起点
+            until (datetime): 窗口终点（默认不限）
+            tags (list): 只返回这些子类型（如 ['BUY', 'SELL']）
+
+        Returns:
+            list: 事件记录（按写入顺序）
+        """
+        sql = "SELECT payload FROM events WHERE kind = ? AND ts_epoch >= ?"
+        params = [kind, since.timestamp()]
+        if until is not None:
+            sql += " AND ts_epoch <= ?"
+            params.append(until.timestamp())
+        if tags:
+            sql += f" AND tag IN ({','.join('?' * len(tags))})"
+            params.extend(tags)
+        return [json.loads(row[0]) for row in self._conn.execute(sql + " ORDER BY seq", params)]
+
+    def import_legacy_state(self, state_file):
+        """
+        一次性导入旧 JSON 状态文件（导入后重命名为 *.migrated）
+
+        Args:
+            state_file (str): 旧状态文件路径
+        """
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        rows = [self._event_row('transaction', t) for t in state.get('transaction_history', [])]
+        rows += [self._event_row('portfolio', p) for p in state.get('portfolio_history', [])]
+        rows += [self._event_row('decision', d) for d in state.get('decision_history', [])]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO events (kind, tag, ts, ts_epoch, retain, payload) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+        self.write_snapshot({
+            'initial_capital': state.get('initial_capital'),
+            'capital': state.get('capital'),
+            'positions': state.get('positions', {}),
+            'decision_history': state.get('decision_history', []),
+            'start_date': state.get('start_date')
+        })
+        os.replace(state_file, state_file + '.migrated')
+
+    def close(self):
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
 
 class SimulationTrader:
-    def __init__(self, initial_capital=1000000, analysis_frequency=DEFAULT_ANALYSIS_FREQUENCY, investor_type="进取型"):
+    def __init__(self, initial_capital=1000000, analysis_frequency=DEFAULT_ANALYSIS_FREQUENCY, investor_type="进取型",
+                 data_dir="data", clock=None, llm=None, analyzer=None, prompt_builder=None, quote_service=None,
+                 notify=True, llm_record_file=None):
         """
         初始化模拟交易系统
         
@@ -42,32 +273,55 @@ class SimulationTrader:
             initial_capital (float): 初始资金，默认100万港元
             analysis_frequency (int): 分析频率（分钟），默认15分钟
             investor_type (str): 投资者风险偏好，默认为"进取型"
+            data_dir (str): 状态、交易日志和CSV的输出目录，默认 data
+            clock (callable): 返回当前时间的函数，默认 datetime.now（离线回放时注入回放时钟）
+            llm (callable): 大模型调用 llm(prompt, kind)，kind 为 'analysis' 或 'format'，默认调用 qwen_engine
+            analyzer (callable): 单只股票分析 analyzer(code, name)，默认 hk_smart_money_tracker.analyze_stock
+            prompt_builder (callable): 分析提示词构建函数，默认 hk_smart_money_tracker.build_llm_analysis_prompt
+            quote_service: 报价服务（需提供 prefetch/get_price/invalidate），默认腾讯财经实时报价
+            notify (bool): 是否发送邮件通知
+            llm_record_file (str): 记录大模型响应的 JSONL 文件（可用于离线回放）
         """
+        self.clock = clock or datetime.now
+        self.llm = llm
+        self.analyzer = analyzer or hk_smart_money_tracker.analyze_stock
+        self.prompt_builder = prompt_builder or hk_smart_money_tracker.build_llm_analysis_prompt
+        self.notify = notify
+        self.llm_record_file = llm_record_file
         self.initial_capital = initial_capital
         self.capital = initial_capital
         self.positions = {}  # 持仓 {code: {'shares': 数量, 'avg_price': 平均买入价, 'stop_loss_price': 止损价格}}
-        self.transaction_history = []  # 交易历史
-        self.portfolio_history = []  # 投资组合价值历史
-        self.start_date = datetime.now()
+        self._transaction_history = None  # 交易历史（首次访问时从事件日志读取）
+        self._portfolio_history = None  # 投资组合价值历史（首次访问时从事件日志读取）
+        self.start_date = self.now()
         self.is_trading_hours = True  # 模拟港股交易时间 (9:30-16:00)
         self.analysis_frequency = analysis_frequency  # 分析频率（分钟）
         self.investor_type = investor_type  # 投资者风险偏好
         self.decision_history = []  # 存储历史决策以供大模型分析
         
         # 确保data目录存在
-        self.data_dir = "data"
+        self.data_dir = data_dir
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
         
-        # 持久化文件
-        self.state_file = os.path.join(self.data_dir, "simulation_state.json")
+        # 持久化文件（事件日志 + 定期快照；旧 JSON 状态文件首次启动时自动导入）
+        self.state_file = os.path.join(self.data_dir, "simulation_state.db")
+        self.legacy_state_file = os.path.join(self.data_dir, "simulation_state.json")
+        self.snapshot_interval = DEFAULT_SNAPSHOT_INTERVAL
+        self.event_store = SimulationEventStore(self.state_file, legacy_state_file=self.legacy_state_file)
+        self._csv_columns = {}  # CSV 文件已有表头缓存，用于逐行追加
+        
+        # 实时报价服务（一个交易周期内批量拉取一次，TTL 内复用）
+        self.quote_service = quote_service or TencentQuoteService(ttl_seconds=DEFAULT_QUOTE_TTL)
+        # 注入的报价服务（如离线回放的本地K线）是唯一价格来源，报价缺失时不回退到联网获取K线
+        self.kline_price_fallback = quote_service is None
         # 日志文件路径会在需要时动态生成
         
         # 尝试从文件恢复状态
         self.load_state()
         
         # 如果是新开始，在当天的日志文件中记录初始信息
-        if not self.transaction_history:
+        if self.event_store.count('transaction') == 0:
             today_log_file = self.get_daily_log_file()
             with open(today_log_file, "w", encoding="utf-8") as f:
                 f.write(f"模拟交易日志 - 开始时间: {self.start_date}\n")
@@ -92,6 +346,52 @@ class SimulationTrader:
         }
         return type_mapping.get(investor_type, 'moderate')
     
+    def now(self):
+        """当前时间（实时运行为系统时间，离线回放为回放时钟）"""
+        return self.clock()
+
+    @property
+    def transaction_history(self):
+        """完整交易历史（首次访问时从事件日志读取，启动时不加载）"""
+        if self._transaction_history is None:
+            self._transaction_history = [
+                {k: v for k, v in payload.items() if k != 'position_after'}
+                for payload in self.event_store.load_payloads('transaction')]
+        return self._transaction_history
+
+    @property
+    def portfolio_history(self):
+        """完整投资组合价值历史（首次访问时从事件日志读取，启动时不加载）"""
+        if self._portfolio_history is None:
+            self._portfolio_history = self.event_store.load_payloads('portfolio')
+        return self._portfolio_history
+    
+    def chat_with_llm(self, prompt, kind):
+        """
+        调用大模型（可注入录制或桩响应），并按需记录响应
+        
+        Args:
+            prompt (str): 提示词
+            kind (str): 调用类型，'analysis'（分析报告）或 'format'（格式化买卖信号）
+            
+        Returns:
+            str: 大模型响应
+        """
+        if self.llm is None:
+            from llm_services import qwen_engine
+            response = qwen_engine.chat_with_llm(prompt)
+        else:
+            response = self.llm(prompt, kind)
+        
+        if self.llm_record_file:
+            try:
+                with open(self.llm_record_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'timestamp': self.now().isoformat(), 'kind': kind, 'response': response},
+                                       ensure_ascii=False) + "\n")
+            except Exception as e:
+                self.log_message(f"记录大模型响应失败: {e}")
+        return response
+    
     def send_email_notification(self, subject, content):
         """
         发送邮件通知
@@ -100,6 +400,8 @@ class SimulationTrader:
             subject (str): 邮件主题
             content (str): 邮件内容
         """
+        if not self.notify:
+            return False
         try:
             smtp_server = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
             smtp_user = os.environ.get("EMAIL_SENDER")
@@ -175,6 +477,9 @@ class SimulationTrader:
             notification_type (str): 通知类型
             **kwargs: 其他参数，根据通知类型而定
         """
+        if not self.notify:
+            return False
+        
         # 构建持仓详情文本
         positions_detail = self.build_positions_detail()
         
@@ -200,7 +505,7 @@ class SimulationTrader:
 买入数量：{shares} 股
 买入金额：HK${amount:.2f}
 买入原因：{reason if reason else '未提供理由'}
-交易时间：{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+交易时间：{self.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 当前资金：HK${self.capital:,.2f}
 
@@ -231,7 +536,7 @@ class SimulationTrader:
 平均成本：HK${avg_price:.2f}
 盈亏金额：HK${profit_loss:+.2f} ({profit_loss_status})
 卖出原因：{reason if reason else '未提供理由'}
-交易时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+交易时间：{self.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 当前资金：HK${self.capital:,.2f}
 
@@ -254,7 +559,7 @@ class SimulationTrader:
 大模型建议卖出理由：{reason}
 是否止损触发：{stop_loss_triggered}
 无法卖出原因：未持有该股票
-交易时间：{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+交易时间：{self.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 {positions_detail}
             """
@@ -275,7 +580,7 @@ class SimulationTrader:
 当前价格：HK${current_price:.2f}
 止损价格：HK${stop_loss_price:.2f}
 触发原因：当前价格跌破止损价格
-交易时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+交易时间：{self.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 {positions_detail}
             """
@@ -300,7 +605,7 @@ class SimulationTrader:
 建议止损价格：{stop_loss_price}
 建议买入金额：HK${required_amount:.2f}
 无法买入原因：资金不足
-交易时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+交易时间：{self.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 当前资金：HK${self.capital:,.2f}
 
@@ -325,7 +630,7 @@ class SimulationTrader:
 资金分配比例：{allocation_pct}
 建议止损价格：{stop_loss_price}
 无法买入原因：当前持仓价值已达到大模型建议的比例上限
-交易时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+交易时间：{self.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 当前资金：HK${self.capital:,.2f}
 
@@ -350,7 +655,7 @@ class SimulationTrader:
 资金分配比例：{allocation_pct}
 建议止损价格：{stop_loss_price}
 无法买入原因：交易执行失败
-交易时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+交易时间：{self.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 当前资金：HK${self.capital:,.2f}
 
@@ -369,7 +674,7 @@ class SimulationTrader:
 股票名称：{name}
 股票代码：{code}
 无法卖出原因：未持有该股票
-交易时间：{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+交易时间：{self.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 {positions_detail}
             """
@@ -380,7 +685,7 @@ class SimulationTrader:
 这是港股模拟交易系统的邮件功能测试邮件。
 
 投资者风险偏好：{self.investor_type}
-时间：{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+时间：{self.now().strftime("%Y-%m-%d %H:%M:%S")}
 系统状态：
 - 初始资金: HK${self.initial_capital:,.2f}
 - 当前资金: HK${self.capital:,.2f}
@@ -397,12 +702,12 @@ class SimulationTrader:
     
     def get_daily_log_file(self):
         """获取当天的日志文件路径"""
-        today = datetime.now().strftime("%Y%m%d")
+        today = self.now().strftime("%Y%m%d")
         return os.path.join(self.data_dir, f"simulation_trade_log_{today}.txt")
     
     def log_message(self, message):
         """记录交易日志"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = self.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
         
         # 获取当天的日志文件路径
@@ -412,62 +717,133 @@ class SimulationTrader:
         with open(today_log_file, "a", encoding="utf-8") as f:
             f.write(log_entry + "\n")
     
-    def save_state(self):
-        """保存交易状态到文件"""
+    def save_state(self, force_snapshot=False):
+        """
+        保存交易状态
+
+        交易、决策和投资组合记录在发生时已逐条追加到事件日志，这里只在累计事件数
+        达到 snapshot_interval（或尚无快照、或 force_snapshot）时写入压缩快照。
+
+        Args:
+            force_snapshot (bool): 是否强制写入快照
+        """
         try:
-            state = {
-                'initial_capital': self.initial_capital,
-                'capital': self.capital,
-                'positions': self.positions,
-                'transaction_history': self.transaction_history,
-                'portfolio_history': self.portfolio_history,
-                'decision_history': self.decision_history,
-                'start_date': self.start_date.isoformat() if isinstance(self.start_date, datetime) else str(self.start_date)
-            }
-            
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(state, f, ensure_ascii=False, indent=2, default=str)
+            if force_snapshot or self.event_store.latest_snapshot()[1] is None \
+                    or self.event_store.events_since_snapshot() >= self.snapshot_interval:
+                self.event_store.write_snapshot(self._snapshot_state(), created_at=self.now().isoformat())
         except Exception as e:
             self.log_message(f"保存状态失败: {e}")
-    
+
+    def _snapshot_state(self):
+        """可重放状态（快照内容）"""
+        return {
+            'initial_capital': self.initial_capital,
+            'capital': self.capital,
+            'positions': self.positions,
+            'decision_history': self.decision_history,
+            'start_date': self.start_date.isoformat() if isinstance(self.start_date, datetime) else str(self.start_date)
+        }
+
+    def _apply_event(self, kind, retain, payload):
+        """重放单个事件到资金、持仓和决策历史"""
+        if kind == 'portfolio':
+            self.capital = payload.get('capital', self.capital)
+            self.positions = {k: dict(v) for k, v in payload.get('positions', {}).items()}
+        elif kind == 'transaction':
+            self.capital = payload.get('capital_after', self.capital)
+            # 成交后的持仓（None 表示已清仓），旧记录没有该字段时由随后的 portfolio 事件恢复
+            if 'position_after' in payload:
+                position = payload['position_after']
+                if position is None:
+                    self.positions.pop(payload['code'], None)
+                else:
+                    self.positions[payload['code']] = dict(position)
+        elif kind == 'decision':
+            self.decision_history.append(payload)
+            if retain and len(self.decision_history) > retain:
+                self.decision_history = self.decision_history[-retain:]
+
     def load_state(self):
-        """从文件加载交易状态"""
+        """从最新快照开始重放事件日志，恢复交易状态"""
         try:
-            if os.path.exists(self.state_file):
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
-                
+            last_seq, state = self.event_store.latest_snapshot()
+            if state is None and self.event_store.is_empty():
+                return False
+
+            if state is not None:
                 self.initial_capital = state.get('initial_capital', self.initial_capital)
                 self.capital = state.get('capital', self.initial_capital)
                 self.positions = {k: v for k, v in state.get('positions', {}).items()}
-                self.transaction_history = state.get('transaction_history', [])
-                self.portfolio_history = state.get('portfolio_history', [])
                 self.decision_history = state.get('decision_history', [])
-                
+
                 # 恢复开始日期
                 start_date_str = state.get('start_date')
                 if start_date_str:
                     try:
                         self.start_date = datetime.fromisoformat(start_date_str)
                     except:
-                        self.start_date = datetime.now()
-                
-                self.log_message(f"从文件恢复状态成功: {len(self.transaction_history)} 笔交易, {len(self.positions)} 个持仓, {len(self.decision_history)} 条决策历史")
-                return True
+                        self.start_date = self.now()
+
+            # 重放快照之后的事件
+            replayed = 0
+            for kind, retain, payload in self.event_store.iter_events(after_seq=last_seq):
+                self._apply_event(kind, retain, payload)
+                replayed += 1
+
+            self.log_message(f"从文件恢复状态成功: {self.event_store.count('transaction')} 笔交易, {len(self.positions)} 个持仓, {len(self.decision_history)} 条决策历史（重放 {replayed} 个事件）")
+            return True
         except Exception as e:
             self.log_message(f"加载状态失败: {e}")
         return False
+
+    def _record_decision(self, record, retain):
+        """追加一条决策历史（内存中只保留最近 retain 条，完整记录在事件日志中）"""
+        self.decision_history.append(record)
+        if len(self.decision_history) > retain:
+            self.decision_history = self.decision_history[-retain:]
+        try:
+            self.event_store.append('decision', record, retain=retain)
+        except Exception as e:
+            self.log_message(f"保存决策事件失败: {e}")
+
+    def _record_portfolio_snapshot(self):
+        """记录当前投资组合价值（追加事件并追加一行到CSV）"""
+        portfolio_value = self.get_portfolio_value()
+        record = {
+            'timestamp': self.now().isoformat(),
+            'capital': self.capital,
+            'portfolio_value': portfolio_value,
+            'positions': {k: dict(v) for k, v in self.positions.items()}
+        }
+        if self._portfolio_history is not None:
+            self._portfolio_history.append(record)
+        try:
+            self.event_store.append('portfolio', record)
+        except Exception as e:
+            self.log_message(f"保存投资组合事件失败: {e}")
+        self._append_csv_row("simulation_portfolio.csv", record, lambda: self.portfolio_history)
     
-    def get_current_stock_price(self, code):
+    def get_current_stock_price(self, code, side=None):
         """
-        获取股票当前价格（使用腾讯财经接口）
+        获取股票当前价格（优先使用缓存的腾讯财经实时报价，失败时回退到K线收盘价）
         
         Args:
             code (str): 股票代码
+            side (str): 成交方向，'BUY' 取卖一价，'SELL' 取买一价，None 取最新价
             
         Returns:
             float: 当前价格，如果获取失败返回None
         """
+        try:
+            price = self.quote_service.get_price(code, side=side)
+            if price is not None:
+                return price
+        except Exception as e:
+            self.log_message(f"获取股票 {code} 实时报价失败: {e}")
+        
+        if not self.kline_price_fallback:
+            return None
+        
         try:
             # 移除代码中的.HK后缀，腾讯财经接口不需要
             stock_code = code.replace('.HK', '')
@@ -481,6 +857,18 @@ class SimulationTrader:
             self.log_message(f"获取股票 {code} 价格失败: {e}")
         return None
     
+    def prefetch_quotes(self, codes):
+        """
+        批量拉取报价到缓存（缓存中已有且未过期的不再请求）
+        
+        Args:
+            codes (iterable): 股票代码
+        """
+        try:
+            self.quote_service.prefetch(list(codes))
+        except Exception as e:
+            self.log_message(f"批量获取报价失败: {e}")
+    
     def get_portfolio_value(self):
         """
         计算当前投资组合总价值
@@ -490,6 +878,9 @@ class SimulationTrader:
         """
         total_value = self.capital
         
+        # 一次请求拉取所有持仓报价
+        self.prefetch_quotes(self.positions.keys())
+        
         # 计算持仓价值
         for code, position in self.positions.items():
             current_price = self.get_current_stock_price(code)
@@ -714,18 +1105,11 @@ class SimulationTrader:
         # 记录交易
         self.record_transaction('BUY', code, name, shares, current_price, actual_invest, reason, True, stop_loss_price=stop_loss_price, current_price=current_price, target_price=target_price, validity_period=validity_period)
         
-        # 记录投资组合价值
-        portfolio_value = self.get_portfolio_value()
-        self.portfolio_history.append({
-            'timestamp': datetime.now().isoformat(),
-            'capital': self.capital,
-            'portfolio_value': portfolio_value,
-            'positions': dict(self.positions)
-        })
+        # 记录投资组合价值（立即追加到事件日志和CSV）
+        self._record_portfolio_snapshot()
         
         # 保存状态
         self.save_state()
-        self.save_portfolio_to_csv()  # 立即保存投资组合历史到CSV
         
         self.log_message(f"买入 {shares} 股 {name} ({code}) @ HK${current_price:.2f}, 总金额: HK${actual_invest:.2f}")
         
@@ -778,7 +1162,7 @@ class SimulationTrader:
             
         position = self.positions[code]
         avg_price = position['avg_price']
-        current_price = self.get_current_stock_price(code)
+        current_price = self.get_current_stock_price(code, side='SELL')
         if current_price is None:
             self.log_message(f"无法获取 {name} ({code}) 的当前价格，跳过卖出")
             
@@ -817,18 +1201,11 @@ class SimulationTrader:
         # 记录交易
         self.record_transaction('SELL', code, name, shares_to_sell, current_price, sell_amount, reason, True, profit_loss, current_price=current_price)
         
-        # 记录投资组合价值
-        portfolio_value = self.get_portfolio_value()
-        self.portfolio_history.append({
-            'timestamp': datetime.now().isoformat(),
-            'capital': self.capital,
-            'portfolio_value': portfolio_value,
-            'positions': dict(self.positions)
-        })
+        # 记录投资组合价值（立即追加到事件日志和CSV）
+        self._record_portfolio_snapshot()
         
         # 保存状态
         self.save_state()
-        self.save_portfolio_to_csv()  # 立即保存投资组合历史到CSV
         
         # 确定盈亏状态文本
         profit_loss_status = "盈利" if profit_loss >= 0 else "亏损"
@@ -858,7 +1235,7 @@ class SimulationTrader:
         Returns:
             bool: 是否为交易时间
         """
-        now = datetime.now()
+        now = self.now()
         weekday = now.weekday()  # 0=Monday, 6=Sunday
         
         # 周末不交易
@@ -946,40 +1323,30 @@ class SimulationTrader:
             return "无历史决策记录。"
         
         # 获取当前时间
-        now = datetime.now()
-        today = now.date()
+        now = self.now()
+        
+        # 按时间窗口查询最近24小时的交易记录（只包含BUY和SELL，不包含持仓信息）
+        try:
+            window_records = self.event_store.query_window('decision', now - timedelta(hours=24), now, tags=['BUY', 'SELL'])
+        except Exception as e:
+            self.log_message(f"查询决策历史失败: {e}")
+            window_records = []
         
-        # 筛选出交易记录（只包含BUY和SELL，不包含持仓信息）
         trade_records = []
-        for record in self.decision_history:
-            timestamp_str = record.get('timestamp', '未知时间')
-            decision_type = record.get('type', '未知类型')
+        for record in window_records:
+            timestamp_str = record.get('timestamp', '')
+            if 'Z' in timestamp_str:
+                decision_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+            else:
+                decision_time = datetime.fromisoformat(timestamp_str)
+            if decision_time.tzinfo is not None:
+                decision_time = decision_time.astimezone().replace(tzinfo=None)
             
-            # 只处理交易记录（BUY和SELL），忽略其他类型
-            if decision_type in ['BUY', 'SELL']:
-                try:
-                    # 解析时间戳
-                    if 'Z' in timestamp_str:
-                        decision_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    else:
-                        decision_time = datetime.fromisoformat(timestamp_str)
-                    
-                    # 计算时间差
-                    time_diff = now - decision_time
-                    hours_diff = time_diff.total_seconds() / 3600
-                    
-                    # 添加时间差信息
-                    record_copy = record.copy()
-                    record_copy['hours_diff'] = hours_diff
-                    record_copy['datetime'] = decision_time
-                    
-                    trade_records.append(record_copy)
-                except:
-                    # 如果时间戳格式不正确，尝试直接检查日期部分
-                    if timestamp_str.startswith(today.strftime('%Y-%m-%d')):
-                        record_copy = record.copy()
-                        record_copy['hours_diff'] = 24  # 假设是今天但无法解析具体时间
-                        trade_records.append(record_copy)
+            # 添加时间差信息
+            record_copy = record.copy()
+            record_copy['hours_diff'] = (now - decision_time).total_seconds() / 3600
+            record_copy['datetime'] = decision_time
+            trade_records.append(record_copy)
         
         if not trade_records:
             return "今天无交易记录。"
@@ -1065,7 +1432,7 @@ class SimulationTrader:
             validity_period (int, optional): 有效期（天数）
         """
         transaction = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': self.now().isoformat(),
             'type': transaction_type,
             'code': code,
             'name': name,
@@ -1080,12 +1447,22 @@ class SimulationTrader:
             'target_price': target_price,
             'validity_period': validity_period
         }
-        self.transaction_history.append(transaction)
-        self.save_transactions_to_csv()  # 立即保存到CSV
+        if self._transaction_history is not None:
+            self._transaction_history.append(transaction)
+        event = transaction
+        if success:
+            # 事件中附带成交后的持仓，重放交易事件即可恢复持仓（不依赖随后的 portfolio 事件）
+            position = self.positions.get(code)
+            event = dict(transaction, position_after=dict(position) if position is not None else None)
+        try:
+            self.event_store.append('transaction', event)
+        except Exception as e:
+            self.log_message(f"保存交易事件失败: {e}")
+        self._append_csv_row("simulation_transactions.csv", transaction, lambda: self.transaction_history)  # 立即追加到CSV
         
         # 将交易记录添加到决策历史中
         trade_record = {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': self.now().strftime('%Y-%m-%d %H:%M:%S'),
             'type': transaction_type,
             'code': code,
             'name': name,
@@ -1105,11 +1482,8 @@ class SimulationTrader:
         if transaction_type == 'SELL' and profit_loss is not None:
             trade_record['profit_loss'] = profit_loss
             
-        self.decision_history.append(trade_record)
-        
         # 限制决策历史记录数量，只保留最近的50条记录
-        if len(self.decision_history) > 50:
-            self.decision_history = self.decision_history[-50:]
+        self._record_decision(trade_record, retain=50)
 
     def execute_trades(self):
         """执行交易决策"""
@@ -1134,7 +1508,7 @@ class SimulationTrader:
             self.log_message("正在分析股票...")
             results = []
             for code, name in hk_smart_money_tracker.WATCHLIST.items():
-                res = hk_smart_money_tracker.analyze_stock(code, name)
+                res = self.analyzer(code, name)
                 if res:
                     results.append(res)
                     
@@ -1145,14 +1519,12 @@ class SimulationTrader:
             # 构建大模型分析提示
             # 转换投资者类型为英文
             investor_type_english = self.convert_investor_type_to_english(self.investor_type)
-            llm_prompt = hk_smart_money_tracker.build_llm_analysis_prompt(results, None, None, investor_type_english)
+            llm_prompt = self.prompt_builder(results, None, None, investor_type_english)
             
             # 调用大模型分析（真实调用）
             self.log_message("正在调用大模型分析...")
         
-            # 导入大模型服务
-            from llm_services import qwen_engine
-            llm_analysis = qwen_engine.chat_with_llm(llm_prompt)
+            llm_analysis = self.chat_with_llm(llm_prompt, 'analysis')
             self.log_message("大模型分析调用成功")
             self.log_message(f"大模型分析结果:\n{llm_analysis}")
                 
@@ -1252,7 +1624,7 @@ class SimulationTrader:
 """
                 
             self.log_message("正在请求大模型以固定格式输出买卖信号...")
-            formatted_output = qwen_engine.chat_with_llm(format_prompt)
+            formatted_output = self.chat_with_llm(format_prompt, 'format')
             self.log_message(f"格式化输出结果:\n{formatted_output}")
                 
             # 将大模型的格式化输出传递给解析函数
@@ -1268,15 +1640,12 @@ class SimulationTrader:
             
             # 保存决策历史记录
             decision_record = {
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'timestamp': self.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'buy': recommendations.get('buy', []),
                 'sell': recommendations.get('sell', [])
             }
-            self.decision_history.append(decision_record)
-            
             # 限制决策历史记录数量，只保留最近的10次决策
-            if len(self.decision_history) > 10:
-                self.decision_history = self.decision_history[-10:]
+            self._record_decision(decision_record, retain=10)
             
             # 如果没有推荐，跳过本次交易
             if not recommendations['buy'] and not recommendations['sell']:
@@ -1285,6 +1654,11 @@ class SimulationTrader:
         except Exception as e:
             self.log_message(f"解析大模型推荐失败: {e}")
             return
+        
+        # 新交易周期：一次请求拉取所有持仓和候选股票的实时报价
+        self.quote_service.invalidate()
+        candidate_codes = [stock['code'] for stock in recommendations['buy'] + recommendations['sell'] if stock.get('code')]
+        self.prefetch_quotes(list(self.positions.keys()) + candidate_codes)
             
         # 执行卖出操作（严格按照大模型建议）
         for stock in recommendations['sell']:
@@ -1373,8 +1747,8 @@ class SimulationTrader:
                     )
                     continue
                 
-                # 获取当前价格
-                current_price = self.get_current_stock_price(code)
+                # 获取当前价格（按卖一价成交）
+                current_price = self.get_current_stock_price(code, side='BUY')
                 if current_price is None:
                     self.log_message(f"无法获取 {name} ({code}) 的当前价格，跳过买入")
                     # 发送无法买入通知邮件
@@ -1461,7 +1835,8 @@ class SimulationTrader:
         
     def run_daily_summary(self):
         """每日总结"""
-        if not self.portfolio_history:
+        recent = self.event_store.tail('portfolio', 2)
+        if not recent:
             return
             
         self.log_message("="*90)
@@ -1469,9 +1844,9 @@ class SimulationTrader:
         self.log_message("="*90)
         
         # 计算当日收益
-        if len(self.portfolio_history) >= 2:
-            today_value = self.portfolio_history[-1]['portfolio_value']
-            yesterday_value = self.portfolio_history[-2]['portfolio_value']
+        if len(recent) >= 2:
+            today_value = recent[-1]['portfolio_value']
+            yesterday_value = recent[-2]['portfolio_value']
             daily_return = (today_value - yesterday_value) / yesterday_value * 100
             self.log_message(f"当日收益率: {daily_return:.2f}%")
             
@@ -1522,20 +1897,13 @@ class SimulationTrader:
             current_prices = {}
             total_stock_value = 0
             
-            # 股票代码列表
-            stock_codes = []
+            # 获取所有股票的当前价格（一次批量请求，缓存内直接复用）
+            self.prefetch_quotes(self.positions.keys())
             for code in self.positions.keys():
                 stock_code = code.replace('.HK', '')
-                stock_codes.append(stock_code)
-                
-            # 获取所有股票的当前价格
-            for stock_code in stock_codes:
                 try:
-                    hist = get_hk_stock_data_tencent(stock_code, period_days=3)
-                    if hist is not None and not hist.empty:
-                        current_prices[stock_code] = hist['Close'].iloc[-1]
-                    else:
-                        current_prices[stock_code] = 0
+                    current_price = self.get_current_stock_price(code)
+                    current_prices[stock_code] = current_price if current_price is not None else 0
                 except:
                     current_prices[stock_code] = 0
             
@@ -1640,11 +2008,38 @@ class SimulationTrader:
         
         return positions_detail
     
+    def _append_csv_row(self, filename, row, history):
+        """
+        追加一行到CSV文件；文件不存在或表头不兼容时按完整历史重写
+
+        Args:
+            filename (str): data 目录下的CSV文件名
+            row (dict): 新记录
+            history (callable): 返回完整历史的函数（只在重写时调用）
+        """
+        path = os.path.join(self.data_dir, filename)
+        try:
+            columns = self._csv_columns.get(filename)
+            if columns is None and os.path.exists(path) and os.path.getsize(path) > 0:
+                columns = list(pd.read_csv(path, nrows=0, encoding="utf-8").columns)
+
+            if columns is not None and set(row).issubset(columns):
+                pd.DataFrame([row]).reindex(columns=columns).to_csv(
+                    path, mode='a', header=False, index=False, encoding="utf-8")
+            else:
+                df = pd.DataFrame(history())
+                df.to_csv(path, index=False, encoding="utf-8")
+                columns = list(df.columns)
+            self._csv_columns[filename] = columns
+        except Exception as e:
+            self.log_message(f"保存 {filename} 失败: {e}")
+
     def save_transactions_to_csv(self):
         """将交易历史保存到CSV文件"""
         try:
             df_transactions = pd.DataFrame(self.transaction_history)
             df_transactions.to_csv(os.path.join(self.data_dir, "simulation_transactions.csv"), index=False, encoding="utf-8")
+            self._csv_columns["simulation_transactions.csv"] = list(df_transactions.columns)
             # 不打印日志，避免重复输出
         except Exception as e:
             self.log_message(f"保存交易历史失败: {e}")
@@ -1654,14 +2049,15 @@ class SimulationTrader:
         try:
             df_portfolio = pd.DataFrame(self.portfolio_history)
             df_portfolio.to_csv(os.path.join(self.data_dir, "simulation_portfolio.csv"), index=False, encoding="utf-8")
+            self._csv_columns["simulation_portfolio.csv"] = list(df_portfolio.columns)
             # 不打印日志，避免重复输出
         except Exception as e:
             self.log_message(f"保存投资组合历史失败: {e}")
     
     def generate_final_report(self):
         """生成最终报告"""
-        # 保存最终状态
-        self.save_state()
+        # 保存最终状态（写入压缩快照）
+        self.save_state(force_snapshot=True)
         
         self.log_message("="*60)
         self.log_message("模拟交易最终报告")
@@ -1676,9 +2072,9 @@ class SimulationTrader:
         self.log_message(f"总收益率: {total_return:.2f}%")
         
         # 交易统计
-        buy_count = sum(1 for t in self.transaction_history if t['type'] == 'BUY')
-        sell_count = sum(1 for t in self.transaction_history if t['type'] == 'SELL')
-        self.log_message(f"总交易次数: {len(self.transaction_history)} (买入: {buy_count}, 卖出: {sell_count})")
+        buy_count = self.event_store.count('transaction', tags=['BUY'])
+        sell_count = self.event_store.count('transaction', tags=['SELL'])
+        self.log_message(f"总交易次数: {self.event_store.count('transaction')} (买入: {buy_count}, 卖出: {sell_count})")
         
         # 持仓情况
         self.log_message(f"最终持仓: {self.positions}")
@@ -1687,7 +2083,7 @@ class SimulationTrader:
         self.log_message("模拟交易系统最终报告生成完成")
             
         # 投资组合历史已在每次交易后保存，这里仅作最终确认
-        self.log_message("投资组合历史已保存到 data/simulation_portfolio.csv")
+        self.log_message(f"投资组合历史已保存到 {os.path.join(self.data_dir, 'simulation_portfolio.csv')}")
 
     def manual_sell_stock(self, code, percentage=1.0):
         """
@@ -1734,7 +2130,7 @@ class SimulationTrader:
             self.log_message("邮件功能测试失败")
         return success
 
-def run_simulation(duration_days=30, analysis_frequency=DEFAULT_ANALYSIS_FREQUENCY, investor_type="进取型"):
+def run_simulation(duration_days=30, analysis_frequency=DEFAULT_ANALYSIS_FREQUENCY, investor_type="进取型", llm_record_file=None):
     """
     运行模拟交易
     
@@ -1742,9 +2138,11 @@ def run_simulation(duration_days=30, analysis_frequency=DEFAULT_ANALYSIS_FREQUEN
         duration_days (int): 模拟天数，默认30天
         analysis_frequency (int): 分析频率（分钟），默认15分钟
         investor_type (str): 投资者风险偏好，默认为"进取型"
+        llm_record_file (str): 记录大模型响应的 JSONL 文件（供 simulation_replay 离线回放）
     """
     # 创建模拟交易器
-    trader = SimulationTrader(initial_capital=1000000, analysis_frequency=analysis_frequency, investor_type=investor_type)
+    trader = SimulationTrader(initial_capital=1000000, analysis_frequency=analysis_frequency, investor_type=investor_type,
+                              llm_record_file=llm_record_file)
     
     # 记录开始信息
     trader.log_message(f"开始港股模拟交易，模拟周期: {duration_days} 天")
@@ -1802,6 +2200,7 @@ if __name__ == "__main__":
     parser.add_argument('--manual-sell', type=str, help='手工卖出股票代码（例如：0700.HK）')
     parser.add_argument('--sell-percentage', type=float, default=1.0, help='卖出比例（0.0-1.0），默认1.0（100%）')
     parser.add_argument('--investor-type', type=str, default='moderate', choices=['aggressive', 'moderate', 'conservative'], help='投资者风险偏好：aggressive(进取型)、moderate(稳健型)、conservative(保守型)，默认为稳健型')
+    parser.add_argument('--record-llm', type=str, default=None, help='将大模型响应记录到 JSONL 文件（供离线回放使用）')
     args = parser.parse_args()
     
     # 如果指定了手工卖出股票，则执行手工卖出
@@ -1818,4 +2217,5 @@ if __name__ == "__main__":
         exit(0)
     
     # 运行模拟交易
-    run_simulation(duration_days=args.duration_days, analysis_frequency=args.analysis_frequency, investor_type=args.investor_type)
+    run_simulation(duration_days=args.duration_days, analysis_frequency=args.analysis_frequency, investor_type=args.investor_type,
+                   llm_record_file=args.record_llm)
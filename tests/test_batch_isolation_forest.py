@@ -0,0 +1,135 @@
+"""
+Tests for batch Isolation Forest engine.
+"""
+
+import os
+import pickle
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from anomaly_detector.batch_isolation_forest import BatchIsolationForestEngine, POOLED_MODEL_KEY
+from anomaly_detector.isolation_forest_detector import IsolationForestDetector
+
+
+@pytest.fixture
+def features_by_symbol():
+    """Create feature matrices for several symbols with an outlier on the last day."""
+    rng = np.random.RandomState(42)
+    dates = pd.date_range(start='2026-01-01', periods=100)
+    result = {}
+    for symbol in ['0700.HK', '0939.HK', '1398.HK']:
+        data = rng.randn(len(dates), 5)
+        data[-1] = 8.0  # Extreme values on the last day
+        result[symbol] = pd.DataFrame(data, columns=[f'feature_{i}' for i in range(5)], index=dates)
+    return result
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Create a per-symbol batch engine with a temporary model directory."""
+    return BatchIsolationForestEngine(model_dir=str(tmp_path), contamination=0.05, random_state=42, pooled=False)
+
+
+def test_models_are_persisted(engine, features_by_symbol, tmp_path):
+    """Test per-symbol models are saved to disk."""
+    engine.score(features_by_symbol)
+
+    saved = sorted(os.listdir(tmp_path))
+    assert len(saved) == 3
+    assert all(name.startswith('if_stock_') for name in saved)
+
+
+def test_fresh_model_is_reused(engine, features_by_symbol, tmp_path):
+    """Test a fresh persisted model is loaded instead of refitted."""
+    engine.score(features_by_symbol)
+    reloaded = BatchIsolationForestEngine(model_dir=str(tmp_path), contamination=0.05, pooled=False)
+    reloaded.score(features_by_symbol)
+
+    for symbol in features_by_symbol:
+        assert reloaded._models[symbol]['trained_at'] == engine._models[symbol]['trained_at']
+
+
+def test_stale_model_is_refit(engine, features_by_symbol):
+    """Test models older than refit_days are refitted."""
+    engine.score(features_by_symbol)
+    path = engine._model_path('0700.HK')
+    with open(path, 'rb') as f:
+        entry = pickle.load(f)
+    entry['trained_at'] = datetime.now() - timedelta(days=30)
+    with open(path, 'wb') as f:
+        pickle.dump(entry, f)
+
+    engine._models.clear()
+    engine.score(features_by_symbol)
+
+    assert datetime.now() - engine._models['0700.HK']['trained_at'] < timedelta(minutes=1)
+
+
+def test_scores_match_single_detector(engine, features_by_symbol):
+    """Test batch scores match a per-stock IsolationForestDetector."""
+    scored = engine.score(features_by_symbol)
+
+    detector = IsolationForestDetector(contamination=0.05, random_state=42)
+    detector.train(features_by_symbol['0939.HK'])
+    expected = detector.model.decision_function(features_by_symbol['0939.HK'])
+
+    actual = scored[scored['symbol'] == '0939.HK']['anomaly_score'].to_numpy()
+    np.testing.assert_allclose(actual, expected)
+
+
+def test_pooled_mode_uses_single_model(tmp_path, features_by_symbol):
+    """Test pooled mode (the default) fits one model for all symbols."""
+    engine = BatchIsolationForestEngine(model_dir=str(tmp_path))
+    scored = engine.score(features_by_symbol)
+
+    assert engine.pooled
+    assert list(engine._models.keys()) == [POOLED_MODEL_KEY]
+    assert os.listdir(tmp_path) == [f'if_stock_{POOLED_MODEL_KEY}.pkl']
+    assert len(scored) == sum(len(f) for f in features_by_symbol.values())
+
+
+def test_pooled_mode_is_scale_invariant(tmp_path, features_by_symbol):
+    """Test pooled scores do not depend on a symbol's price scale."""
+    scored = BatchIsolationForestEngine(model_dir=str(tmp_path / 'a')).score(features_by_symbol)
+
+    rescaled = dict(features_by_symbol)
+    rescaled['0700.HK'] = features_by_symbol['0700.HK'] * 100 + 50
+    rescored = BatchIsolationForestEngine(model_dir=str(tmp_path / 'b')).score(rescaled)
+
+    np.testing.assert_allclose(rescored['anomaly_score'], scored['anomaly_score'])
+
+
+def test_pooled_detect_anomalies_by_date(tmp_path, features_by_symbol):
+    """Test the pooled model still flags each symbol's outlier day."""
+    engine = BatchIsolationForestEngine(model_dir=str(tmp_path))
+    results = engine.detect_anomalies_by_date(features_by_symbol, datetime(2026, 4, 10))
+
+    assert all(len(anomalies) == 1 for anomalies in results.values())
+
+
+def test_detect_anomalies_by_date(engine, features_by_symbol):
+    """Test date filtering returns the outlier day for every symbol."""
+    target_date = datetime(2026, 4, 10)  # Last day of the fixture
+    results = engine.detect_anomalies_by_date(features_by_symbol, target_date, time_interval='day')
+
+    assert set(results.keys()) == set(features_by_symbol.keys())
+    for anomalies in results.values():
+        assert len(anomalies) == 1
+        assert anomalies[0]['timestamp'].date() == target_date.date()
+        assert anomalies[0]['detection_method'] == 'isolation_forest'
+        assert anomalies[0]['time_interval'] == 'day'
+        assert anomalies[0]['feature_count'] == 5
+
+
+def test_detect_anomalies_by_date_no_match(engine, features_by_symbol):
+    """Test a date outside the data returns empty lists."""
+    results = engine.detect_anomalies_by_date(features_by_symbol, datetime(2025, 1, 1))
+
+    assert all(anomalies == [] for anomalies in results.values())
+
+
+def test_empty_input(engine):
+    """Test scoring with no symbols."""
+    assert engine.score({}).empty
+    assert engine.detect_anomalies_by_date({}, datetime(2026, 4, 10)) == {}
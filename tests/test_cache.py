@@ -4,6 +4,7 @@ Tests for anomaly cache module.
 
 import pytest
 import os
+import json
 import tempfile
 from datetime import datetime, timedelta
 from anomaly_detector.cache import AnomalyCache
@@ -95,4 +96,60 @@ def test_cleanup_expired_entries(temp_cache_file):
     
     # Only recent anomaly should remain
     assert cache.get_cache_size() == 1
-    assert cache.exists('volume', recent_timestamp.date())
\ No newline at end of file
+    assert cache.exists('volume', recent_timestamp.date())
+
+def test_add_batch_persists(temp_cache_file):
+    """Test batched inserts are visible from a new cache instance."""
+    cache = AnomalyCache(temp_cache_file)
+    timestamp = datetime(2026, 4, 3, 10, 0, 0)
+    cache.add_batch([
+        {'anomaly_type': f'price_{i}', 'timestamp': timestamp, 'severity': 'medium', 'z_score': 3.1}
+        for i in range(50)
+    ])
+    
+    reopened = AnomalyCache(temp_cache_file)
+    assert reopened.get_cache_size() == 50
+    assert reopened.exists('price_7', timestamp)
+    assert reopened.cache['price_7_2026-04-03']['z_score'] == 3.1
+
+
+def test_writes_are_buffered_until_flush(temp_cache_file):
+    """Test add() is coalesced and only committed on flush."""
+    cache = AnomalyCache(temp_cache_file)
+    timestamp = datetime(2026, 4, 3, 10, 0, 0)
+    cache.add(anomaly_type='price', timestamp=timestamp, severity='high', z_score=4.5)
+    
+    # Visible to the writer, not yet to other processes
+    assert cache.exists('price', timestamp)
+    assert not AnomalyCache(temp_cache_file).exists('price', timestamp)
+    
+    cache.flush()
+    assert AnomalyCache(temp_cache_file).exists('price', timestamp)
+
+
+def test_dict_view_compatibility(temp_cache_file):
+    """Test the dict-style cache attribute used by AnomalyIntegrator."""
+    cache = AnomalyCache(temp_cache_file)
+    cache.cache['if_2026-04-03'] = {
+        'timestamp': datetime(2026, 4, 3).isoformat(),
+        'severity': 'high',
+        'anomaly_score': -0.2
+    }
+    
+    assert 'if_2026-04-03' in cache.cache
+    cache._save_cache()
+    assert dict(AnomalyCache(temp_cache_file).cache.items())['if_2026-04-03']['anomaly_score'] == -0.2
+
+
+def test_legacy_json_is_imported(tmp_path):
+    """Test an existing JSON cache is migrated into the database."""
+    legacy = tmp_path / 'anomaly_cache.json'
+    legacy.write_text(json.dumps({
+        'price_2026-04-03': {'timestamp': '2026-04-03T10:00:00', 'severity': 'high', 'z_score': 4.5}
+    }))
+    
+    cache = AnomalyCache(str(tmp_path / 'anomaly_cache.db'))
+    
+    assert cache.exists('price', datetime(2026, 4, 3))
+    assert cache.cache['price_2026-04-03']['severity'] == 'high'
+    assert not legacy.exists()
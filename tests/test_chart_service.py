@@ -0,0 +1,99 @@
+"""
+报告图表渲染服务测试
+
+覆盖：
+1. 雷达图模板复用 figure 后输出稳定（前一张图的数据不残留）
+2. 内容哈希缓存：相同维度分数不重复渲染，新进程通过磁盘缓存复用
+3. 进程池渲染与当前进程渲染结果一致
+4. 缓存键包含样式和字体：修改样式 dict 或字体可用性后不复用旧缓存
+"""
+
+import numpy as np
+
+from scripts import chart_service
+from scripts.chart_service import ChartService, chart_key
+from scripts.stock_radar import DIMENSIONS, STOCK_RADAR_STYLE, _generate_radar_png_bytes
+from scripts.performance_charts import (
+    COLOR_GRID, PERF_DIMENSIONS, PERF_RADAR_STYLE, _render_single_radar_png_bytes, _stock_rank_bar_png_bytes
+)
+
+
+def _dims(seed):
+    rng = np.random.RandomState(seed)
+    return {d.lower(): float(rng.uniform(0, 100)) for d in DIMENSIONS}
+
+
+def test_template_output_is_stable():
+    """同一输入在模板渲染过其他图表后输出相同；不同输入输出不同"""
+    first = _generate_radar_png_bytes('PingAn', '000001', _dims(0))
+    other = _generate_radar_png_bytes('Moutai', '600519', _dims(1))
+    assert _generate_radar_png_bytes('PingAn', '000001', _dims(0)) == first
+    assert other != first
+
+    perf_dims = {d: 30.0 + 10 * i for i, d in enumerate(PERF_DIMENSIONS)}
+    perf = _render_single_radar_png_bytes('Bank', perf_dims, '#16a34a', size=190, composite=55.0)
+    _render_single_radar_png_bytes('Tech', perf_dims, '#dc2626', size=190, composite=20.0)
+    assert _render_single_radar_png_bytes('Bank', perf_dims, '#16a34a', size=190, composite=55.0) == perf
+
+
+def test_content_hash_cache(tmp_path):
+    """相同参数只渲染一次；磁盘缓存跨实例复用；维度变化时重新渲染"""
+    service = ChartService(workers=1, cache_dir=str(tmp_path))
+    jobs = [(_generate_radar_png_bytes, ('PingAn', '000001', _dims(0)), {'size': 180}),
+            (_generate_radar_png_bytes, ('PingAn', '000001', _dims(0)), {'size': 180}),
+            (_generate_radar_png_bytes, ('Moutai', '600519', _dims(1)), {'size': 180})]
+    pngs = service.render_many(jobs)
+    assert service.rendered == 2 and pngs[0] == pngs[1] and pngs[0] != pngs[2]
+    assert len(list(tmp_path.glob('*.png'))) == 2
+
+    fresh = ChartService(workers=1, cache_dir=str(tmp_path))
+    assert fresh.render_many(jobs) == pngs
+    assert fresh.rendered == 0 and fresh.hits == 3
+
+    changed = dict(_dims(0), trend=1.0)
+    assert chart_key(_generate_radar_png_bytes, ('PingAn', '000001', changed), {'size': 180}) != \
+        chart_key(*jobs[0])
+    fresh.render(_generate_radar_png_bytes, 'PingAn', '000001', changed, size=180)
+    assert fresh.rendered == 1
+
+    # 渲染失败返回 None，不影响其他图表
+    bad = (_generate_radar_png_bytes, ('Bad', '000002', None), {})
+    assert fresh.render_many([bad, jobs[2]]) == [None, pngs[2]]
+
+
+def test_process_pool_matches_in_process():
+    """进程池渲染结果与当前进程一致"""
+    jobs = [(_generate_radar_png_bytes, (f'S{i}', f'{i:06d}', _dims(i)), {'size': 160}) for i in range(4)]
+    serial = ChartService(workers=1, cache_dir=None).render_many(jobs)
+    service = ChartService(workers=2, cache_dir=None, min_parallel=2)
+    try:
+        assert service.render_many(jobs) == serial
+    finally:
+        service.close()
+
+
+def test_key_includes_style_and_font(monkeypatch):
+    """样式 dict、颜色常量或字体可用性变化时缓存键变化"""
+    job = (_generate_radar_png_bytes, ('PingAn', '000001', _dims(0)), {'size': 180})
+    perf_job = (_render_single_radar_png_bytes, ('Bank', {d: 50.0 for d in PERF_DIMENSIONS}, '#16a34a'), {})
+    bar_job = (_stock_rank_bar_png_bytes, ([{'label': 'A', 'avg': 55.0, 'total': 10}],), {})
+    before = [chart_key(*j) for j in (job, perf_job, bar_job)]
+    assert len(set(before)) == 3
+
+    monkeypatch.setitem(STOCK_RADAR_STYLE, 'fill_alpha', 0.5)
+    monkeypatch.setitem(PERF_RADAR_STYLE['line'], 'linewidth', 3.0)
+    assert chart_key(*job) != before[0] and chart_key(*perf_job) != before[1]
+    assert chart_key(*bar_job) == before[2]
+    monkeypatch.undo()
+    assert [chart_key(*j) for j in (job, perf_job, bar_job)] == before
+
+    bar_styles = _stock_rank_bar_png_bytes.chart_styles
+    monkeypatch.setattr(_stock_rank_bar_png_bytes, 'chart_styles',
+                        bar_styles[:-1] + ([c if c != COLOR_GRID else '#eeeeee' for c in bar_styles[-1]],))
+    assert chart_key(*bar_job) != before[2]
+    monkeypatch.undo()
+
+    monkeypatch.setattr(chart_service, 'CN_FONT_PATH', '/nonexistent/font.ttc')
+    fallback = chart_key(*job)
+    monkeypatch.setattr(chart_service, 'CN_FONT_PATH', chart_service.__file__)
+    assert chart_key(*job) != fallback
@@ -0,0 +1,158 @@
+"""
+消息投递层测试
+
+覆盖：
+1. 同一运行内多封邮件复用一个已登录的 SMTP 连接；连接断开后自动重连，
+   发送超时等其他异常后关闭连接，下一次重试重新连接
+2. 指数退避重试的等待时间
+3. 各渠道并发发送、后台队列和耗时统计
+"""
+
+import smtplib
+import socket
+import threading
+
+import pytest
+
+from message_services import delivery
+from message_services.delivery import DeliveryQueue, close_smtp_sessions, get_delivery_metrics, retry_with_backoff
+from message_services.email_sender import EmailSender
+from message_services.notifier import Notifier
+
+
+class FakeSMTP:
+    """记录连接、登录和发送的 SMTP 替身"""
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.logins = 0
+        self.sent = []
+        self.disconnected = False
+        self.fail_with = None
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        return (250, b'OK')
+
+    def sendmail(self, sender, to_list, message):
+        if self.closed:
+            raise AssertionError('复用了已关闭的连接')
+        if self.disconnected:
+            raise smtplib.SMTPServerDisconnected('closed')
+        if self.fail_with is not None:
+            raise self.fail_with
+        self.sent.append(to_list)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(smtplib, 'SMTP_SSL', FakeSMTP)
+    close_smtp_sessions()
+    get_delivery_metrics().reset()
+    yield FakeSMTP
+    close_smtp_sessions()
+
+
+def _sender(**kwargs):
+    return EmailSender(smtp_server='smtp.163.com', sender='a@163.com', password='x',
+                       recipients=['b@163.com'], **kwargs)
+
+
+def test_smtp_session_reused(fake_smtp):
+    """多封邮件（含不同 EmailSender 实例）只连接、登录一次；断开后重连"""
+    for i in range(3):
+        assert _sender().send(f"报告 {i}", "内容")
+    assert len(fake_smtp.instances) == 1
+    assert fake_smtp.instances[0].logins == 1 and len(fake_smtp.instances[0].sent) == 3
+
+    fake_smtp.instances[0].disconnected = True
+    assert _sender().send("报告 3", "内容")
+    assert len(fake_smtp.instances) == 2 and len(fake_smtp.instances[1].sent) == 1
+
+    # persistent=False 时每封邮件单独连接
+    assert _sender(persistent=False).send("报告 4", "内容")
+    assert len(fake_smtp.instances) == 3
+
+
+@pytest.mark.parametrize('error', [socket.timeout('timed out'), smtplib.SMTPDataError(451, b'busy')])
+def test_smtp_session_reconnects_after_error(fake_smtp, monkeypatch, error):
+    """发送超时或其他 SMTP 错误后关闭连接，重试时重新连接而不是复用状态未知的连接"""
+    monkeypatch.setattr(delivery.time, 'sleep', lambda seconds: None)
+    assert _sender().send("报告 0", "内容")
+    first = fake_smtp.instances[0]
+    first.fail_with = error
+
+    assert _sender().send_with_retry("报告 1", "内容", max_retries=2)
+    assert first.closed and first.sent == [['b@163.com']]
+    assert len(fake_smtp.instances) == 2
+    assert fake_smtp.instances[1].logins == 1 and len(fake_smtp.instances[1].sent) == 1
+
+
+def test_retry_with_backoff(monkeypatch):
+    """第 n 次重试等待 base × backoff^(n-1)，不超过 max_delay"""
+    delays = []
+    monkeypatch.setattr(delivery.time, 'sleep', delays.append)
+    outcomes = iter([False, False, False, True])
+    assert retry_with_backoff(lambda: next(outcomes), max_retries=5, base_delay=2, max_delay=5) == (True, 4)
+    assert delays == [2, 4, 5]
+
+    delays.clear()
+    assert retry_with_backoff(lambda: False, max_retries=3, base_delay=1) == (False, 3)
+    assert delays == [1, 2]
+
+
+def test_parallel_fan_out_and_queue(fake_smtp, monkeypatch):
+    """各渠道并发发送；后台队列和耗时统计"""
+    notifier = Notifier(channels=['email', 'wechat_work', 'wxpusher'], email_sender=_sender())
+
+    # 三个渠道都到达屏障后才返回：串行发送时第一个渠道等待超时（BrokenBarrierError）
+    barrier = threading.Barrier(3, timeout=5)
+
+    def concurrent(result):
+        def send(*args, **kwargs):
+            barrier.wait()
+            return result
+        return send
+
+    monkeypatch.setattr(notifier, 'notify_email', concurrent(True))
+    monkeypatch.setattr(notifier, 'notify_wechat_work', concurrent(True))
+    monkeypatch.setattr(notifier, 'notify_wxpusher', concurrent(False))
+
+    results = notifier.notify("标题", "内容")
+    assert results == {'email': True, 'wechat_work': True, 'wxpusher': False}
+    assert not barrier.broken
+
+    monkeypatch.setattr(notifier, 'notify_email', lambda *args, **kwargs: True)
+    future = notifier.notify_async("标题", "内容", channels=['email'])
+    assert future.result(timeout=5) == {'email': True}
+
+    # 真实邮件渠道：后台发送并记录耗时
+    assert _sender().send_async("后台", "内容").result(timeout=5)
+    metrics = Notifier.get_metrics()['email']
+    assert metrics['count'] == 1 and metrics['success'] == 1 and metrics['max_ms'] >= metrics['mean_ms']
+
+    # 有界队列：worker 忙时 submit 阻塞，flush 等待全部完成
+    queue = DeliveryQueue(maxsize=1, workers=1)
+    release = threading.Event()
+    done = []
+    queue.submit(release.wait)
+    queue.submit(done.append, 1)
+    blocked = threading.Thread(target=queue.submit, args=(done.append, 2))
+    blocked.start()
+    blocked.join(timeout=0.1)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(timeout=5)
+    queue.flush()
+    assert done == [1, 2]
@@ -0,0 +1,102 @@
+"""
+CatBoost 低延迟评分测试
+
+覆盖：
+1. 编译后的对称树评分与 CatBoost predict_proba 一致（含 NaN、不同深度）
+2. 原始特征行的编码与生产预测路径（_latest_feature_row）一致
+3. 单行评分延迟在亚毫秒级；概率校准
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('catboost')
+from catboost import CatBoostClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from ml_services.fast_scorer import CompiledCatBoost, FastScorer
+
+
+def _train(depth=4, iterations=60, nan_mode='Min', seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.randn(500, 6).astype(np.float32)
+    X[:, 5] = rng.randint(0, 3, size=500)
+    X[rng.rand(500) < 0.1, 1] = np.nan
+    y = (X[:, 0] + 0.5 * np.nan_to_num(X[:, 1]) + 0.3 * X[:, 5] + 0.3 * rng.randn(500) > 0).astype(int)
+    model = CatBoostClassifier(iterations=iterations, depth=depth, nan_mode=nan_mode, random_seed=seed,
+                               verbose=False, thread_count=1, allow_writing_files=False)
+    model.fit(X, y)
+    return model, X, y
+
+
+@pytest.mark.parametrize('depth,nan_mode', [(1, 'Min'), (4, 'Min'), (6, 'Max')])
+def test_compiled_matches_catboost(depth, nan_mode):
+    """编译评分与 CatBoost predict_proba 一致"""
+    model, X, _ = _train(depth=depth, nan_mode=nan_mode)
+    compiled = CompiledCatBoost.from_model(model)
+    assert compiled is not None
+    X_test = X.copy()
+    X_test[:20, 0] = np.nan
+    np.testing.assert_allclose(compiled.predict_proba(X_test), model.predict_proba(X_test)[:, 1], atol=1e-9)
+
+
+def test_encoding_matches_production_path():
+    """原始特征行（分类列为字符串、含 NaN）编码与 _latest_feature_row 一致"""
+    from ml_services.ml_trading_model import CatBoostModel
+
+    catboost_model, X, _ = _train()
+    model = CatBoostModel()
+    model.catboost_model = catboost_model
+    model.feature_columns = ['F0', 'F1', 'F2', 'F3', 'F4', 'Sector']
+    model.categorical_encoders = {'Sector': LabelEncoder().fit(['bank', 'tech', 'utility'])}
+
+    sectors = np.array(['bank', 'tech', 'utility', 'energy', None], dtype=object)
+    frames = {}
+    for i in range(len(sectors)):
+        frame = pd.DataFrame(X[i:i + 2, :5], columns=model.feature_columns[:5],
+                             index=pd.date_range('2025-01-02', periods=2))
+        frame['Sector'] = sectors[i]
+        frame['Close'] = 10.0
+        frames[f'{i:04d}.HK'] = frame
+
+    scorer = model.get_fast_scorer()
+    assert model.get_fast_scorer() is scorer
+    for frame in frames.values():
+        _, expected_X = model._latest_feature_row(frame)
+        expected = catboost_model.predict_proba(expected_X)[:, 1]
+        np.testing.assert_array_equal(scorer.encode_values(frame.iloc[-1:].to_numpy(), list(frame.columns)),
+                                      expected_X.astype(np.float32))
+        np.testing.assert_allclose(scorer.score_frame(frame), expected, atol=1e-9)
+        np.testing.assert_allclose(scorer.score_row(frame.iloc[-1]), expected[0], atol=1e-9)
+
+    results = model.predict_from_frames(frames)
+    assert results['0000.HK']['probability'] == pytest.approx(scorer.score_frame(frames['0000.HK'])[0])
+
+    # 模型更换后重新编译
+    model.catboost_model = _train(seed=1)[0]
+    assert model.get_fast_scorer() is not scorer
+
+
+def test_single_row_latency_and_calibration():
+    """单行评分亚毫秒级；校准后概率单调且在 [0, 1]"""
+    model, X, y = _train(depth=6, iterations=300)
+    scorer = FastScorer(model, [f'F{i}' for i in range(6)])
+    columns = scorer.feature_columns
+    row = X[0]
+    scorer.score_values(row, columns)
+
+    n = 500
+    start = time.perf_counter()
+    for _ in range(n):
+        scorer.score_values(row, columns)
+    per_row = (time.perf_counter() - start) / n
+    assert per_row < 1e-3, f"单行评分耗时 {per_row * 1e3:.3f}ms"
+
+    scorer.fit_calibrator(X[400:], y[400:], method='isotonic')
+    calibrated = scorer.predict_encoded(X[:400])
+    assert np.all((calibrated >= 0) & (calibrated <= 1))
+    order = np.argsort(model.predict_proba(X[:400])[:, 1])
+    assert np.all(np.diff(calibrated[order]) >= -1e-12)
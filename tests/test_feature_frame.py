@@ -0,0 +1,290 @@
+"""
+特征帧批量装配测试
+
+覆盖：
+1. FeatureBatch 读写与逐列插入结果一致（读取暂存列、覆盖已有列保持位置、多列读取、pipe）
+2. assign_columns 与逐列赋值一致（标量广播、数组、Series、覆盖）
+3. float32 模式：行情列保持 float64，特征列转 float32，模型输入矩阵为 float32
+4. calculate_technical_features：OBV 等于带方向成交量的累加，输出不碎片化
+5. 真实特征流水线（港股、A股）：批量装配与逐列插入结果一致
+6. 53 只 A 股面板基准（RUN_BENCHMARKS=1）：逐列插入 vs 批量装配 vs float32 的耗时、峰值内存与面板大小
+"""
+
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_services.feature_engineering.feature_frame import (
+    FeatureBatch, assign_columns, downcast_features, feature_matrix
+)
+
+
+def _make_prices(n=500, seed=0):
+    """随机游走日线"""
+    rng = np.random.RandomState(seed)
+    close = 100 * np.exp(np.cumsum(rng.randn(n) * 0.02))
+    return pd.DataFrame({
+        'Open': close * (1 + rng.randn(n) * 0.003),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.randint(100000, 1000000, n).astype(float)
+    }, index=pd.bdate_range('2022-01-03', periods=n))
+
+
+def test_feature_batch_matches_column_inserts():
+    """暂存列可读，覆盖已有列保持原位置，结果与逐列插入相同"""
+    df = _make_prices(50)
+    expected = df.copy()
+    expected['Return'] = expected['Close'].pct_change()
+    expected['Close'] = expected['Close'] * 2
+    expected['Flag'] = np.where(expected['Return'] > 0, 1, 0)
+    expected['Const'] = 0.0
+    expected['Spread'] = expected[['Close', 'Return']].max(axis=1)
+
+    batch = FeatureBatch(df)
+    batch['Return'] = batch['Close'].pct_change()
+    batch['Close'] = batch['Close'] * 2
+    batch['Flag'] = np.where(batch['Return'] > 0, 1, 0)
+    batch['Const'] = 0.0
+    batch['Spread'] = batch[['Close', 'Return']].max(axis=1)
+    assert 'Flag' in batch and len(batch) == 50
+    assert list(batch.columns) == list(expected.columns)
+
+    result = batch.flush()
+    pd.testing.assert_frame_equal(result, expected)
+    assert result._mgr.nblocks <= 3
+    # 原 DataFrame 不被修改
+    assert list(df.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def test_feature_batch_pipe():
+    """pipe 先拼接暂存列再调用函数"""
+    batch = FeatureBatch(_make_prices(30))
+    batch['Double'] = batch['Close'] * 2
+
+    def add_triple(df, factor):
+        df['Triple'] = df['Double'] * factor
+        return df
+
+    batch.pipe(add_triple, 1.5)
+    batch['Last'] = batch['Triple'] + 1
+    result = batch.flush()
+    assert list(result.columns)[-3:] == ['Double', 'Triple', 'Last']
+    np.testing.assert_allclose(result['Last'], result['Close'] * 3 + 1)
+
+
+def test_assign_columns_matches_loop():
+    """一次写入与 for key, value in features.items(): df[key] = value 相同"""
+    df = _make_prices(40)
+    features = {
+        'Sector_Code': 3,
+        'Sentiment': 0.25,
+        'Name': 'tech',
+        'Volume': df['Volume'] / 2,
+        'Array_Feature': np.arange(40.0),
+    }
+    expected = df.copy()
+    for key, value in features.items():
+        expected[key] = value
+
+    pd.testing.assert_frame_equal(assign_columns(df, features), expected)
+    assert assign_columns(df, {}) is df
+
+
+def test_downcast_and_feature_matrix():
+    """float32 模式：行情列保持 float64，特征列为 float32，列顺序不变"""
+    df = assign_columns(_make_prices(20), {'RSI': 50.0, 'Flag': 1, 'Ratio': np.linspace(0, 1, 20)})
+    result = downcast_features(df)
+
+    assert list(result.columns) == list(df.columns)
+    assert result['Close'].dtype == np.float64
+    assert result['RSI'].dtype == np.float32 and result['Ratio'].dtype == np.float32
+    assert result['Flag'].dtype == df['Flag'].dtype
+
+    X = feature_matrix(result, ['RSI', 'Flag', 'Ratio'], float32=True)
+    assert X.dtype == np.float32 and X.shape == (20, 3)
+    assert feature_matrix(df, ['RSI', 'Ratio']).dtype == np.float64
+
+
+def test_technical_features_obv():
+    """OBV 非零，等于带方向成交量的累加（上涨 +Volume、下跌 -Volume、持平 0）"""
+    from ml_services.ml_trading_model import FeatureEngineer
+
+    df = _make_prices(300, seed=3)
+    df.iloc[100:103, df.columns.get_loc('Close')] = df['Close'].iloc[99]  # 收盘价持平
+    result = FeatureEngineer().calculate_technical_features(df.copy(), code='TEST')
+
+    close, volume = df['Close'].to_numpy(), df['Volume'].to_numpy()
+    signed_volume = np.concatenate([[0.0], np.sign(np.diff(close)) * volume[1:]])
+    np.testing.assert_allclose(result['OBV'].to_numpy(), np.cumsum(signed_volume))
+    assert (result['OBV'] != 0).mean() > 0.9
+    assert result['OBV'].iloc[100:103].nunique() == 1
+    # 由 OBV 派生的模型特征有值
+    assert result['OBV_Change_5d'].notna().sum() > 250
+    assert result['OBV_Trend'].nunique() == 2
+
+
+def test_technical_features_layout():
+    """技术指标结果不碎片化"""
+    from ml_services.ml_trading_model import FeatureEngineer
+
+    df = _make_prices(300, seed=3)
+    result = FeatureEngineer().calculate_technical_features(df.copy(), code='TEST')
+
+    assert result.shape[1] > 200
+    assert result._mgr.nblocks < 50
+
+
+class _ColumnInserts:
+    """批量装配之前的写法：每个特征列直接插入 DataFrame（FeatureBatch 的对照）"""
+
+    def __init__(self, df):
+        self._df = df
+
+    def __setitem__(self, key, value):
+        self._df[key] = value
+
+    def __getitem__(self, key):
+        return self._df[key]
+
+    def __contains__(self, key):
+        return key in self._df.columns
+
+    def __len__(self):
+        return len(self._df)
+
+    @property
+    def index(self):
+        return self._df.index
+
+    @property
+    def columns(self):
+        return self._df.columns
+
+    def update(self, columns):
+        for key, value in columns.items():
+            self._df[key] = value
+
+    def pipe(self, func, *args, **kwargs):
+        self._df = func(self._df, *args, **kwargs)
+        return self._df
+
+    def flush(self):
+        return self._df
+
+
+def _assign_loop(df, columns):
+    """批量装配之前的写法：for key, value in features.items(): df[key] = value"""
+    for key, value in columns.items():
+        df[key] = value
+    return df
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """真实特征流水线的构建函数；unbatched=True 时还原为逐列插入"""
+    import a_stock_ml_model
+    from data_services.a_stock_market_features import AStockMarketFeatures
+    from ml_services import ml_trading_model
+
+    # 跨市场特征（商品期货、汇率）需要联网，测试中跳过
+    monkeypatch.setattr(AStockMarketFeatures, 'calculate_cross_market_features',
+                        lambda self, df, use_shift=True: df)
+
+    def build(market, codes, n_rows, batched=True, float32=False):
+        with monkeypatch.context() as m:
+            if not batched:
+                m.setattr(ml_trading_model, 'FeatureBatch', _ColumnInserts)
+                m.setattr(ml_trading_model, 'assign_columns', _assign_loop)
+                m.setattr(a_stock_ml_model, 'assign_columns', _assign_loop)
+            return _build_panel(market, codes, n_rows, float32)
+
+    return build
+
+
+def _build_stock(market, code, df, indices):
+    """按 train 流水线的顺序调用真实特征函数（不含联网的基本面、情感、新闻特征）"""
+    import a_stock_ml_model
+    from ml_services import ml_trading_model
+
+    if market == 'hk':
+        fe, assign = ml_trading_model.FeatureEngineer(), ml_trading_model.assign_columns
+        df = fe.calculate_technical_features(df, code=code)
+        df = fe.calculate_multi_period_metrics(df)
+        df = fe.calculate_relative_strength(df, indices['hsi'])
+        df = fe.create_smart_money_features(df)
+        df = fe.create_market_environment_features(df, indices['hsi'], indices['us'])
+        df = assign(df, fe.create_stock_type_features(code, df))
+    else:
+        fe, assign = a_stock_ml_model.AStockFeatureEngineer(), a_stock_ml_model.assign_columns
+        df = fe.calculate_technical_features(df, code=code)
+        df = fe.calculate_multi_period_metrics(df)
+        df = fe.create_smart_money_features(df)
+        df = assign(df, fe.create_stock_type_features(code, df))
+        df = fe.create_a_stock_market_environment_features(df, indices['csi1000'], indices['cyb'], indices['us'])
+        df = assign(df, {'net_degree_centrality': 0.0, 'net_community_id': -1, 'net_constraint': 1.0})
+    df = fe.create_interaction_features(df)
+    return fe.create_market_network_interaction_features(df)
+
+
+def _build_panel(market, codes, n_rows, float32):
+    rng = np.random.RandomState(7)
+    indices = {name: _make_prices(n_rows, seed) for seed, name in enumerate(('hsi', 'csi1000', 'cyb'), 1000)}
+    indices['us'] = pd.DataFrame({
+        'SP500_Return': rng.randn(n_rows) * 0.01,
+        'VIX_Level': 20 + rng.randn(n_rows),
+    }, index=indices['hsi'].index)
+
+    frames = []
+    for seed, code in enumerate(codes):
+        df = _build_stock(market, code, _make_prices(n_rows, seed), indices)
+        if float32:
+            df = downcast_features(df)
+        df['Code'] = code
+        frames.append(df)
+    return pd.concat(frames)
+
+
+@pytest.mark.filterwarnings('ignore::pandas.errors.PerformanceWarning')
+@pytest.mark.parametrize('market,codes', [('hk', ['0700.HK', '0005.HK']), ('a', ['300440', '600800'])])
+def test_pipeline_matches_column_inserts(pipeline, market, codes):
+    """真实特征函数：批量装配与逐列插入的面板完全相同"""
+    batched = pipeline(market, codes, 300)
+    unbatched = pipeline(market, codes, 300, batched=False)
+
+    assert batched.shape[1] > 500
+    pd.testing.assert_frame_equal(batched, unbatched)
+
+
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='基准测试：设置 RUN_BENCHMARKS=1 运行')
+@pytest.mark.filterwarnings('ignore::pandas.errors.PerformanceWarning')
+def test_benchmark_panel_assembly(pipeline):
+    """基准：53 只 A 股面板（逐列插入 vs 批量装配 vs 批量装配 + float32），只打印耗时"""
+    from a_stock_ml_model import A_STOCK_SECTOR_MAPPING
+
+    codes = list(A_STOCK_SECTOR_MAPPING)
+    panels, stats = {}, {}
+    for name, batched, float32 in (('逐列插入', False, False), ('批量装配', True, False),
+                                   ('批量装配+float32', True, True)):
+        start = time.perf_counter()
+        panels[name] = pipeline('a', codes, 500, batched, float32)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        pipeline('a', codes, 500, batched, float32)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        stats[name] = (peak, panels[name].memory_usage().sum())
+        print(f"\n{name}: {elapsed:.1f} s, 峰值 {peak / 2 ** 20:.0f} MB, "
+              f"面板 {stats[name][1] / 2 ** 20:.0f} MB")
+
+    assert len(codes) == 53
+    pd.testing.assert_frame_equal(panels['批量装配'], panels['逐列插入'])
+    pd.testing.assert_frame_equal(panels['批量装配+float32'], panels['批量装配'], check_dtype=False, rtol=1e-5)
+    assert stats['批量装配+float32'][1] < stats['批量装配'][1] * 0.7
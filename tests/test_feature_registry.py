@@ -0,0 +1,149 @@
+"""
+特征依赖图注册表测试
+
+覆盖：
+1. 完整计算时记录节点产出列清单（新增列和被改写的列），按节点合并并持久化；按计划计算不改写清单
+2. resolve()：传递依赖、特征族只生成请求的列、被依赖的特征族完整生成、无法解析时返回 None
+3. 港股特征图：按 resolve() 计划计算的列与完整流水线一致（anomaly 依赖 technical）
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_services.feature_registry import FeatureRegistry
+
+
+def _frame(n=30):
+    return pd.DataFrame({'x': np.arange(1.0, n + 1)}, index=pd.bdate_range('2026-09-01', periods=n))
+
+
+def _cross(df, context, keys):
+    """特征族 X_<列> = 列 × x，keys 为 None 时生成全部"""
+    for key in sorted(keys) if keys is not None else ['A', 'E']:
+        df = df.assign(**{f'X_{key}': df[key] * df['x']})
+    return df
+
+
+def _other(df, context):
+    extra = {'F': df['x'] ** 2} if context.get('with_f') else {}
+    return df.assign(E=df['x'] - 1, **extra)
+
+
+def _toy_registry(manifest_path=None):
+    registry = FeatureRegistry(manifest_path)
+    registry.add('base', lambda df, context: df.assign(A=df['x'] + 1, B=df['x'] * 2))
+    registry.add('mid', lambda df, context: df.assign(C=df['A'] * 10), depends_on=['base'])
+    registry.add('top', lambda df, context: df.assign(D=df['C'] - 1, B=df['B'] + 1), depends_on=['mid'])
+    registry.add('other', _other)
+    registry.add_family('cross', _cross, parse=lambda c: c[2:] if c.startswith('X_') else None,
+                        inputs=lambda key: [key])
+    # 依赖完整特征族的节点同时声明特征族的输入节点
+    registry.add('agg', lambda df, context: df.assign(G=df['X_A'] + df['X_E']),
+                 depends_on=['base', 'other', 'cross'])
+    return registry
+
+
+def _plan_names(plan):
+    return [(node.name, keys) for node, keys in plan]
+
+
+def test_manifest_recording(tmp_path):
+    path = tmp_path / 'manifest.json'
+    registry = _toy_registry(str(path))
+    full = registry.evaluate(_frame(), {})
+
+    expected = {'base': ['A', 'B'], 'mid': ['C'], 'top': ['D', 'B'], 'other': ['E'], 'agg': ['G']}
+    assert json.loads(path.read_text(encoding='utf-8')) == expected  # 特征族按列解析，不记录
+    assert {'X_A', 'X_E', 'G'} <= set(full.columns)
+
+    # 另一只股票产出更多列时与已有记录合并；新实例从磁盘加载清单
+    registry = _toy_registry(str(path))
+    assert registry.manifest == expected
+    registry.evaluate(_frame(), {'with_f': True})
+    assert json.loads(path.read_text(encoding='utf-8'))['other'] == ['E', 'F']
+
+    # 按计划计算不改写清单
+    before = path.read_text(encoding='utf-8')
+    registry.evaluate(_frame(), {}, columns=['C'])
+    registry.evaluate(_frame(), {}, nodes=['other'])
+    assert path.read_text(encoding='utf-8') == before
+
+
+def test_resolve(tmp_path):
+    registry = _toy_registry(str(tmp_path / 'manifest.json'))
+    # 清单为空：非特征族的列无法解析，退回完整计算
+    assert registry.resolve(['C']) is None
+    assert registry.resolve(['X_A']) is None
+
+    registry.evaluate(_frame(), {})
+    assert _plan_names(registry.resolve(['C'])) == [('base', None), ('mid', None)]
+    # 传递依赖：top -> mid -> base；被改写的列归属最后写入的节点
+    assert _plan_names(registry.resolve(['D'])) == [('base', None), ('mid', None), ('top', None)]
+    assert _plan_names(registry.resolve(['B'])) == [('base', None), ('mid', None), ('top', None)]
+    # 特征族只生成请求的列，并解析输入列的节点
+    assert _plan_names(registry.resolve(['X_A', 'E'])) == [('base', None), ('other', None), ('cross', {'A'})]
+    # 输入数据已有的列不需要计算
+    assert _plan_names(registry.resolve(['X_x'], available=['x'])) == [('cross', {'x'})]
+    assert registry.resolve(['x'], available=['x']) == []
+    # 被其他节点依赖的特征族完整生成
+    assert _plan_names(registry.resolve(['G'])) == [('base', None), ('other', None), ('cross', None), ('agg', None)]
+    assert registry.resolve(['C', 'unknown']) is None
+
+
+def test_toy_plan_matches_full(tmp_path):
+    registry = _toy_registry(str(tmp_path / 'manifest.json'))
+    full = registry.evaluate(_frame(), {})
+    for columns in (['C'], ['D', 'B'], ['X_A', 'E'], ['G']):
+        plan = registry.resolve(columns)
+        assert plan is not None and len(plan) < len(registry.node_names)
+        partial = registry.evaluate(_frame(), {}, plan=plan)
+        pd.testing.assert_frame_equal(partial[columns], full[columns])
+
+
+def _prices(n=300, seed=0):
+    rng = np.random.RandomState(seed)
+    close = 100 * np.exp(np.cumsum(rng.randn(n) * 0.02))
+    return pd.DataFrame({'Open': close * (1 + rng.randn(n) * 0.003), 'High': close * 1.01, 'Low': close * 0.99,
+                         'Close': close, 'Volume': rng.randint(100_000, 1_000_000, n).astype(float)},
+                        index=pd.bdate_range('2025-06-02', periods=n))
+
+
+def test_plan_matches_full_pipeline(tmp_path, monkeypatch):
+    """按 resolve() 计划只计算部分节点，结果与完整流水线的同名列一致"""
+    from anomaly_detector.batch_isolation_forest import BatchIsolationForestEngine
+    from ml_services.ml_trading_model import FeatureEngineer, build_feature_registry
+
+    # 需要联网的节点返回空特征
+    monkeypatch.setattr(FeatureEngineer, 'create_fundamental_features', lambda self, code: {})
+    monkeypatch.setattr(FeatureEngineer, 'create_sector_features', lambda self, code, df: {})
+    monkeypatch.setattr(FeatureEngineer, 'create_event_driven_features', lambda self, code, df: df)
+
+    fe = FeatureEngineer()
+    fe._anomaly_engine = BatchIsolationForestEngine(model_dir=str(tmp_path / 'anomaly_models'), contamination=0.05,
+                                                    random_state=42, anomaly_type='stock', pooled=False)
+    registry = build_feature_registry(fe, manifest_path=str(tmp_path / 'feature_manifest.json'))
+    context = {'code': '0700.HK', 'use_shift': True}
+    df = _prices()
+    full = registry.evaluate(df.copy(), context)
+
+    manifest = registry.manifest
+    columns = ['RSI', 'MACD_Hist', 'Chip_Concentration', 'anomaly_if_score', 'anomaly_price_zscore']
+    columns += manifest['smart_money'][:3] + manifest['multi_period'][:2]
+    columns += [c for c in full.columns if c.startswith('Sector_') and c[len('Sector_'):] in manifest['technical']][:2]
+    plan = registry.resolve(columns, df.columns)
+    names = [node.name for node, _ in plan]
+    assert names.index('technical') < names.index('anomaly')
+    assert 'sentiment' not in names and 'network' not in names
+
+    partial = registry.evaluate(df.copy(), context, plan=plan)
+    pd.testing.assert_frame_equal(partial[columns], full[columns])
+
+    # 只请求异常特征：Isolation Forest 的技术指标输入由依赖的 technical 节点提供
+    anomaly_columns = manifest['anomaly']
+    plan = registry.resolve(anomaly_columns, df.columns)
+    assert [node.name for node, _ in plan] == ['technical', 'anomaly']
+    partial = registry.evaluate(df.copy(), context, plan=plan)
+    pd.testing.assert_frame_equal(partial[anomaly_columns], full[anomaly_columns])
@@ -0,0 +1,187 @@
+"""
+技术指标计算内核测试
+
+覆盖：
+1. 滚动统计、EMA 与 pandas rolling / ewm 一致（一维、二维、NaN、常数段、inf、min_periods）
+2. 各分析器原有的指标写法（简单平均/Wilder RSI、MACD 是否 adjust、布林带滞后、ATR 缺失处理）
+3. compute_indicators 与单独计算结果一致
+4. TechnicalAnalyzer 与 FeatureExtractor 的输出与 pandas 原写法一致
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_services import indicator_kernels as kernels
+from data_services.technical_analysis import TechnicalAnalyzer
+from anomaly_detector.feature_extractor import FeatureExtractor
+
+
+def _make_prices(n=400, seed=1, gaps=True):
+    """随机游走日线（可选缺失值和短暂停牌的常数段）"""
+    rng = np.random.RandomState(seed)
+    close = pd.Series(100 * np.exp(np.cumsum(rng.randn(n) * 0.02)),
+                      index=pd.bdate_range('2020-01-01', periods=n))
+    if gaps:
+        close.iloc[[0, 5, 50, 51, 52]] = np.nan
+        close.iloc[100:110] = close.iloc[99]
+    return pd.DataFrame({
+        'Open': close * (1 + rng.randn(n) * 0.003),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.randint(100000, 1000000, n).astype(float)
+    })
+
+
+def _assert_close(actual, expected, atol=1e-9):
+    np.testing.assert_allclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float),
+                               rtol=1e-9, atol=atol, equal_nan=True)
+
+
+@pytest.mark.parametrize('window,min_periods', [(5, None), (20, 1), (20, 10)])
+def test_rolling_matches_pandas(window, min_periods):
+    """滚动均值/求和/标准差/极值"""
+    close = _make_prices()['Close']
+    rolling = close.rolling(window, min_periods=min_periods)
+
+    _assert_close(kernels.rolling_mean(close, window, min_periods), rolling.mean())
+    _assert_close(kernels.rolling_sum(close, window, min_periods), rolling.sum())
+    _assert_close(kernels.rolling_std(close, window, min_periods), rolling.std())
+    _assert_close(kernels.rolling_min(close, window, min_periods), rolling.min())
+    _assert_close(kernels.rolling_max(close, window, min_periods), rolling.max())
+
+
+def test_rolling_edge_cases():
+    """窗口内含 inf 时为 NaN，常数窗口均值取原值、标准差为 0"""
+    values = pd.Series([1, 2, np.inf, 3, 4, 5, 6, 6, 6, 6.0])
+
+    _assert_close(kernels.rolling_mean(values, 3), values.rolling(3).mean())
+    _assert_close(kernels.rolling_std(values, 3), values.rolling(3).std())
+    assert kernels.rolling_std(values, 3).iloc[-1] == 0.0
+    assert kernels.rolling_mean(values, 3).iloc[-1] == 6.0
+
+
+@pytest.mark.parametrize('adjust', [True, False])
+def test_ewm_matches_pandas(adjust):
+    """EMA（含 NaN 和常数段，numba 与 numpy 两种实现）"""
+    close = _make_prices()['Close']
+    expected = close.ewm(span=12, adjust=adjust).mean()
+
+    _assert_close(kernels.ewm_mean(close, span=12, adjust=adjust), expected)
+    _assert_close(kernels._ewm_numpy(close.to_numpy().reshape(-1, 1), np.array([2 / 13]),
+                                     np.array([adjust]))[:, 0], expected)
+
+
+def test_two_dimensional_panel():
+    """二维（日期×股票）输入逐列与 pandas 一致，并保留 DataFrame 索引和列名"""
+    panel = pd.DataFrame({code: _make_prices(seed=seed, gaps=False)['Close'].to_numpy()
+                          for seed, code in enumerate(['0700.HK', '0005.HK', '1299.HK'])})
+
+    result = kernels.rolling_std(panel, 20)
+    assert list(result.columns) == list(panel.columns)
+    _assert_close(result, panel.rolling(20).std())
+    _assert_close(kernels.ewm_mean(panel.to_numpy(), span=26), panel.ewm(span=26).mean())
+    _assert_close(kernels.rsi(panel, 14, method='wilder')['0005.HK'],
+                  kernels.rsi(panel['0005.HK'], 14, method='wilder'))
+
+
+def test_indicator_variants_match_pandas():
+    """各分析器原有写法：简单平均 RSI、Wilder RSI、MACD、布林带、ATR、随机指标"""
+    df = _make_prices()
+    close, high, low = df['Close'], df['High'], df['Low']
+    delta = close.diff()
+
+    sma_gain = delta.where(delta > 0, 0).rolling(14).mean()
+    sma_loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+    _assert_close(kernels.rsi(close, 14), 100 - 100 / (1 + sma_gain / sma_loss))
+
+    wilder_gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    wilder_loss = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    _assert_close(kernels.rsi(close, 14, method='wilder'), 100 - 100 / (1 + wilder_gain / wilder_loss))
+
+    for adjust in (True, False):
+        macd_line = close.ewm(span=12, adjust=adjust).mean() - close.ewm(span=26, adjust=adjust).mean()
+        macd, signal, histogram = kernels.macd(close, adjust=adjust)
+        _assert_close(macd, macd_line)
+        _assert_close(signal, macd_line.ewm(span=9, adjust=adjust).mean())
+        _assert_close(histogram, macd_line - macd_line.ewm(span=9, adjust=adjust).mean())
+
+    middle, upper, lower, _ = kernels.bollinger_bands(close, 20, 2, shift=1)
+    _assert_close(middle, close.rolling(20).mean().shift(1))
+    _assert_close(upper, close.rolling(20).mean().shift(1) + close.rolling(20).std().shift(1) * 2)
+    _assert_close(lower, close.rolling(20).mean().shift(1) - close.rolling(20).std().shift(1) * 2)
+
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - close.shift()), np.abs(low - close.shift())))
+    _assert_close(kernels.atr(high, low, close, 14), true_range.rolling(14).mean())
+    _assert_close(kernels.atr(high, low, close, 14, min_periods=1), true_range.rolling(14, min_periods=1).mean())
+    true_range_skipna = pd.concat([high - low, (high - close.shift()).abs(), (low - close.shift()).abs()],
+                                  axis=1).max(axis=1)
+    _assert_close(kernels.atr(high, low, close, 14, method='wilder', skipna=True),
+                  true_range_skipna.ewm(alpha=1 / 14, adjust=False).mean())
+
+    lowest = low.rolling(14, min_periods=1).min()
+    highest = high.rolling(14, min_periods=1).max()
+    k_line = 100 * (close - lowest) / (highest - lowest)
+    k, d, _, _ = kernels.stochastic(high, low, close, 14, 3, min_periods=1)
+    _assert_close(k, k_line)
+    _assert_close(d, k_line.rolling(3, min_periods=1).mean())
+
+
+def test_compute_indicators_matches_single_kernels():
+    """一次计算的结果与单独调用各指标相同"""
+    df = _make_prices()
+    close, high, low = df['Close'], df['High'], df['Low']
+    results = kernels.compute_indicators(
+        close, high, low, ma_periods=(5, 20), rsi_period=14, rsi_method='wilder',
+        macd_params=(12, 26, 9), macd_adjust=False, bollinger_params=(20, 2), atr_period=14,
+        stochastic_params=(14, 3), min_periods=1)
+
+    _assert_close(results['MA20'], kernels.rolling_mean(close, 20, 1))
+    _assert_close(results['RSI'], kernels.rsi(close, 14, method='wilder'))
+    _assert_close(results['MACD_signal'], kernels.macd(close, adjust=False)[1])
+    _assert_close(results['EMA_fast'], close.ewm(span=12, adjust=False).mean())
+    _assert_close(results['BB_upper'], kernels.bollinger_bands(close, 20, 2, min_periods=1)[1])
+    _assert_close(results['ATR'], kernels.atr(high, low, close, 14, min_periods=1))
+    _assert_close(results['D'], kernels.stochastic(high, low, close, 14, 3, min_periods=1)[1])
+    assert isinstance(results['MA5'], pd.Series) and results['MA5'].index.equals(close.index)
+
+
+def test_technical_analyzer_matches_pandas():
+    """TechnicalAnalyzer 的核心指标与 pandas 原写法一致"""
+    df = _make_prices(gaps=False)
+    result = TechnicalAnalyzer().calculate_all_indicators(df.copy())
+    close = df['Close']
+    delta = close.diff()
+
+    _assert_close(result['MA50'], close.rolling(50).mean())
+    _assert_close(result['RSI'], 100 - 100 / (1 + delta.where(delta > 0, 0).rolling(14).mean()
+                                              / (-delta.where(delta < 0, 0)).rolling(14).mean()))
+    _assert_close(result['MACD'], close.ewm(span=12).mean() - close.ewm(span=26).mean())
+    _assert_close(result['BB_lower'], close.rolling(20).mean().shift(1) - close.rolling(20).std().shift(1) * 2)
+    _assert_close(result['D'], (100 * (close - df['Low'].rolling(14).min())
+                                / (df['High'].rolling(14).max() - df['Low'].rolling(14).min())).rolling(3).mean())
+
+    separate = TechnicalAnalyzer()
+    step_by_step = df.copy()
+    for method in (separate.calculate_moving_averages, separate.calculate_rsi, separate.calculate_macd,
+                   separate.calculate_bollinger_bands, separate.calculate_stochastic_oscillator,
+                   separate.calculate_atr):
+        step_by_step = method(step_by_step)
+    pd.testing.assert_frame_equal(TechnicalAnalyzer().calculate_core_indicators(df.copy()), step_by_step,
+                                  rtol=1e-9, atol=1e-9)
+
+
+def test_feature_extractor_matches_pandas():
+    """异常检测特征与 pandas 原写法一致"""
+    df = _make_prices(gaps=False)
+    features, _ = FeatureExtractor().extract_features(df)
+    close = df['Close']
+    macd_line = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    bb_middle, bb_std = close.rolling(20).mean(), close.rolling(20).std()
+    bb_position = ((close - (bb_middle - bb_std * 2)) / (bb_std * 4)).fillna(0.5)
+
+    _assert_close(features['volatility_20d'], close.pct_change().rolling(20).std().fillna(0))
+    _assert_close(features['macd_signal'], macd_line.ewm(span=9).mean())
+    _assert_close(features['bb_position'], bb_position)
+    _assert_close(features['ma50_diff'], ((close - close.rolling(50).mean()) / close.rolling(50).mean()).fillna(0))
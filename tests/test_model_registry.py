@@ -0,0 +1,129 @@
+"""
+进程级模型注册表测试
+
+覆盖：
+1. 原生格式（.cbm + .meta.json）与 pickle 的模型、特征列、分类编码一致
+2. 同一文件只加载一次，文件更新后重新加载
+3. pickle 比原生文件新时回退到 pickle；CatBoostModel 保存/加载走原生格式
+"""
+
+import os
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip('catboost')
+from catboost import CatBoostClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from ml_services.model_registry import (
+    ModelRegistry, convert_to_native, has_native, load_native, model_exists, native_paths
+)
+
+
+def _model_data(seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.randn(300, 4)
+    X[:, 3] = rng.randint(0, 3, size=300)
+    y = (X[:, 0] + 0.3 * X[:, 3] > 0).astype(int)
+    model = CatBoostClassifier(iterations=30, depth=3, random_seed=seed, verbose=False, thread_count=1,
+                               allow_writing_files=False)
+    model.fit(X, y)
+    encoder = LabelEncoder().fit(['bank', 'tech', 'utility'])
+    return {
+        'catboost_model': model,
+        'feature_columns': ['F0', 'F1', 'F2', 'Sector'],
+        'actual_n_estimators': int(model.tree_count_),
+        'horizon': 20,
+        'model_type': 'catboost',
+        'categorical_encoders': {'Sector': encoder},
+        'community_ids': [0, 2, 5],
+    }, X
+
+
+def _write_pickle(path, model_data):
+    with open(path, 'wb') as f:
+        pickle.dump(model_data, f)
+
+
+def test_native_round_trip(tmp_path):
+    """原生格式与 pickle 的预测、特征列和分类编码一致"""
+    model_data, X = _model_data()
+    path = str(tmp_path / 'ml_trading_model_catboost_20d.pkl')
+    _write_pickle(path, model_data)
+    assert not has_native(path)
+
+    assert convert_to_native(path)
+    assert has_native(path) and model_exists(path)
+    loaded = load_native(path)
+
+    np.testing.assert_allclose(loaded['catboost_model'].predict_proba(X),
+                               model_data['catboost_model'].predict_proba(X))
+    for key in ('feature_columns', 'actual_n_estimators', 'horizon', 'model_type', 'community_ids'):
+        assert loaded[key] == model_data[key]
+    encoder = loaded['categorical_encoders']['Sector']
+    np.testing.assert_array_equal(encoder.transform(['tech', 'bank']), [1, 0])
+
+
+def test_registry_caches_by_mtime(tmp_path):
+    """同一文件只加载一次；文件更新（修改时间变化）后重新加载"""
+    model_data, X = _model_data()
+    path = str(tmp_path / 'model.pkl')
+    _write_pickle(path, model_data)
+    convert_to_native(path)
+
+    registry = ModelRegistry()
+    first = registry.load_model_data(path)
+    assert registry.load_model_data(path) is first
+    assert registry.hits == 1 and registry.misses == 1
+
+    retrained, _ = _model_data(seed=1)
+    _write_pickle(path, retrained)
+    convert_to_native(path)
+    for native_file in native_paths(path):
+        os.utime(native_file, ns=(time.time_ns() + 10 ** 9,) * 2)
+    second = registry.load_model_data(path)
+    assert second is not first and registry.misses == 2
+    np.testing.assert_allclose(second['catboost_model'].predict_proba(X),
+                               retrained['catboost_model'].predict_proba(X))
+
+
+def test_falls_back_to_newer_pickle(tmp_path):
+    """pickle 比原生文件新（旧版本代码重新保存）时读取 pickle"""
+    model_data, _ = _model_data()
+    path = str(tmp_path / 'model.pkl')
+    _write_pickle(path, model_data)
+    convert_to_native(path)
+
+    future = time.time() + 10
+    os.utime(path, (future, future))
+    assert not has_native(path)
+    registry = ModelRegistry()
+    assert registry.load_model_data(path)['feature_columns'] == model_data['feature_columns']
+    assert [key[0] for key in registry._entries] == ['pickle']
+
+
+def test_catboost_model_save_load(tmp_path):
+    """CatBoostModel.save_model 同时写出原生格式，load_model 读取原生格式"""
+    from ml_services.ml_trading_model import CatBoostModel
+
+    model_data, X = _model_data()
+    model = CatBoostModel()
+    model.catboost_model = model_data['catboost_model']
+    model.feature_columns = model_data['feature_columns']
+    model.actual_n_estimators = model_data['actual_n_estimators']
+    model.horizon = 20
+    model.categorical_encoders = model_data['categorical_encoders']
+    model.community_ids = [1, 3]
+
+    path = str(tmp_path / 'ml_trading_model_catboost_20d.pkl')
+    model.save_model(path)
+    assert has_native(path)
+
+    loaded = CatBoostModel()
+    loaded.load_model(path)
+    assert loaded.feature_columns == model.feature_columns and loaded.community_ids == [1, 3]
+    assert loaded.horizon == 20 and list(loaded.categorical_encoders) == ['Sector']
+    np.testing.assert_allclose(loaded.catboost_model.predict_proba(X), model.catboost_model.predict_proba(X))
@@ -0,0 +1,99 @@
+"""
+多周期批量预测测试
+
+覆盖：
+1. predict_multi_horizon 与各周期模型单独 predict 的结果一致
+   （各周期模型训练时的社区 ID 不同，市场-网络交叉特征需按模型重新生成）
+2. predict_three_horizons_batch 使用同一批量结果
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('catboost')
+from catboost import CatBoostClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from ml_services.ml_trading_model import (
+    CatBoostModel, MARKET_LEVEL_FEATURES, NETWORK_INTERACTION_BASE_FEATURES, predict_multi_horizon
+)
+
+CODES = ['0005.HK', '0700.HK', '0939.HK']
+MARKET = MARKET_LEVEL_FEATURES[:2]
+SECTORS = ['bank', 'tech', 'bank']
+
+
+def _base_frame(i):
+    """构造第 i 只股票的特征帧（社区 ID 等于 i）"""
+    rng = np.random.RandomState(i)
+    dates = pd.bdate_range('2026-09-01', periods=30)
+    frame = pd.DataFrame(rng.randn(len(dates), len(NETWORK_INTERACTION_BASE_FEATURES)),
+                         columns=NETWORK_INTERACTION_BASE_FEATURES, index=dates)
+    frame['net_community_id'] = i
+    for col in MARKET:
+        frame[col] = np.linspace(-0.02, 0.03, len(dates))  # 市场级特征所有股票同值
+    frame['RSI'] = rng.uniform(20, 80, len(dates))
+    frame['Sector'] = SECTORS[i]
+    frame['Close'] = 10.0 + i
+    return frame
+
+
+def _fake_build_prediction_frame(self, code, predict_date=None, use_feature_cache=True, mode='production',
+                                 feature_columns=None):
+    """与真实管线相同：交叉特征使用本模型训练时的社区 ID 生成"""
+    frame = _base_frame(CODES.index(code))
+    return self.feature_engineer.create_market_network_interaction_features(frame, community_ids=self.community_ids)
+
+
+def _model(horizon, community_ids, seed):
+    """训练一个使用本周期社区交叉特征的小模型"""
+    model = CatBoostModel()
+    model.horizon = horizon
+    model.community_ids = community_ids
+    model.categorical_encoders = {'Sector': LabelEncoder().fit(['bank', 'tech'])}
+    model.feature_columns = (['RSI', 'net_composite_centrality', 'Sector'] +
+                             [f'net_comm_{c}_{col}' for c in community_ids for col in MARKET])
+
+    rng = np.random.RandomState(seed)
+    X = rng.randn(300, len(model.feature_columns))
+    X[:, 2] = rng.randint(0, 2, 300)
+    y = (X.sum(axis=1) + 0.5 * rng.randn(300) > 0).astype(int)
+    model.catboost_model = CatBoostClassifier(iterations=40, depth=3, random_seed=seed, verbose=False,
+                                              thread_count=1, allow_writing_files=False)
+    model.catboost_model.fit(X, y)
+    return model
+
+
+@pytest.fixture
+def models(monkeypatch):
+    monkeypatch.setattr(CatBoostModel, 'build_prediction_frame', _fake_build_prediction_frame)
+    return {1: _model(1, [0, 1], seed=1), 5: _model(5, [0, 1, 2], seed=5), 20: _model(20, [2], seed=20),
+            'loaded': True}
+
+
+def test_multi_horizon_matches_per_model_predict(models):
+    """批量多周期预测与每个模型单独 predict 一致"""
+    predictions = predict_multi_horizon(models, CODES)
+
+    for code in CODES:
+        assert set(predictions[code]) == {1, 5, 20}
+        for horizon in (1, 5, 20):
+            expected = models[horizon].predict(code)
+            actual = predictions[code][horizon]
+            assert actual['probability'] == pytest.approx(expected['probability'], abs=1e-9)
+            assert actual['prediction'] == expected['prediction']
+            assert actual['current_price'] == expected['current_price']
+            assert actual['date'] == expected['date']
+
+
+def test_three_horizons_batch_uses_multi_horizon(models):
+    """三周期批量预测与单模型预测一致"""
+    from comprehensive_analysis import predict_three_horizons_batch
+
+    results = predict_three_horizons_batch(CODES, models)
+    assert set(results) == set(CODES)
+    for code in CODES:
+        for horizon in (1, 5, 20):
+            assert results[code]['predictions'][horizon]['probability'] == \
+                pytest.approx(models[horizon].predict(code)['probability'], abs=1e-9)
@@ -0,0 +1,201 @@
+"""
+预测历史存储测试
+
+覆盖：
+1. append：追加记录、按 prediction_id 跳过已存在记录、额外字段往返
+2. update_records：按行标识回写评估结果，无行标识的记录追加
+3. migrate_from_json：旧 JSON 历史迁移到 SQLite，原文件重命名为 *.migrated
+4. JSONL 变更日志：数据库缺失时从日志重建，其他副本追加的日志行在打开时回放
+5. 并发运行的日志合并后按日志键回放，不互相覆盖；git 合并在已导入部分插入行时重建
+6. 评估回写只追加变化的字段，未变化的记录不写日志；旧格式（_row_id）日志可回放
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from ml_services.prediction_store import PredictionStore, history_exists
+
+
+def _record(i, stock_code='0700.HK', horizon=20, **extra):
+    record = {
+        'prediction_id': f'2026-09-0{i}_{stock_code}_{horizon}d',
+        'timestamp': f'2026-09-0{i}T16:30:00',
+        'stock_code': stock_code,
+        'horizon': horizon,
+        'predicted_direction': 'up',
+        'prediction_probability': 0.6 + i / 100,
+        'entry_price': 400.0 + i,
+        'data_date': f'2026-09-0{i}',
+        'target_date': f'2026-10-0{i}',
+        'outcome': None,
+        'actual_return': None,
+        'actual_direction': None,
+    }
+    record.update(extra)
+    return record
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'prediction_history.db')
+
+
+def test_append(db_path):
+    with PredictionStore(db_path) as store:
+        assert store.append([_record(1), _record(2, score_model={'score': 0.7})]) == 2
+        assert store.append([_record(2), _record(3)], skip_existing_ids=True) == 1
+        records = store.load_records()
+        frame = store.load_frame(horizon=20, start_date='2026-09-02')
+
+    assert [r['data_date'] for r in records] == ['2026-09-01', '2026-09-02', '2026-09-03']
+    assert records[1]['score_model'] == {'score': 0.7}
+    assert records[0]['outcome'] is None and 'sector' not in records[0]
+    assert list(frame['data_date']) == ['2026-09-02', '2026-09-03']
+    assert history_exists(db_path)
+
+
+def test_update_records(db_path):
+    with PredictionStore(db_path) as store:
+        store.append([_record(1), _record(2)])
+        records = store.load_records()
+        records[0].update(outcome='correct', actual_return=0.05, actual_direction='up', verified=True)
+        assert store.update_records([records[0], _record(3)]) == 2
+
+        updated = store.load_records()
+        assert len(updated) == 3
+        assert updated[0]['outcome'] == 'correct' and updated[0]['actual_return'] == pytest.approx(0.05)
+        assert updated[0]['verified'] is True
+        assert updated[1]['outcome'] is None
+        assert len(store.load_frame(evaluated_only=True)) == 1
+
+
+def test_migrate_from_json(db_path, tmp_path):
+    legacy = tmp_path / 'prediction_history.json'
+    history = {'predictions': [_record(1), _record(2, stock_code='0005.HK', catboost_model={'trend': '上涨'})],
+               'metadata': {'created_at': '2026-01-01', 'total_predictions': 2}}
+    legacy.write_text(json.dumps(history, ensure_ascii=False), encoding='utf-8')
+
+    with PredictionStore(db_path) as store:
+        records = store.load_records()
+        metadata = store.get_metadata()
+
+    assert not legacy.exists() and (tmp_path / 'prediction_history.json.migrated').exists()
+    assert len(records) == 2 and records[1]['catboost_model'] == {'trend': '上涨'}
+    assert metadata['created_at'] == '2026-01-01' and metadata['total_predictions'] == 2
+
+    # 迁移只执行一次：再次打开不重复导入
+    with PredictionStore(db_path) as store:
+        assert store.count() == 2
+
+
+def test_rebuild_from_log(db_path, tmp_path):
+    with PredictionStore(db_path) as store:
+        store.append([_record(1), _record(2)])
+        records = store.load_records()
+        records[1]['outcome'] = 'incorrect'
+        store.update_records([records[1]])
+        store.set_metadata(last_verified='2026-10-02T18:00:00')
+        expected = store.load_records()
+
+    # 纳入 git 的只有日志：删除数据库后从日志重建
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    with PredictionStore(db_path) as store:
+        assert store.load_records() == expected
+        assert store.get_metadata()['last_verified'] == '2026-10-02T18:00:00'
+
+    # 另一个副本（如 CI 提交后 git pull）追加的日志行在打开时回放
+    other_db = str(tmp_path / 'other' / 'prediction_history.db')
+    with PredictionStore(other_db, log_path=str(tmp_path / 'prediction_history.jsonl')) as other:
+        assert other.count() == 2
+        other.append([_record(3)])
+    with PredictionStore(db_path) as store:
+        assert [r['data_date'] for r in store.load_records()] == ['2026-09-01', '2026-09-02', '2026-09-03']
+
+
+def test_existing_db_is_exported_to_log(db_path, tmp_path):
+    with PredictionStore(db_path) as store:
+        store.append([_record(1), _record(2)])
+        expected = store.load_records()
+    os.remove(tmp_path / 'prediction_history.jsonl')
+
+    with PredictionStore(db_path) as store:
+        assert store.load_records() == expected
+    lines = (tmp_path / 'prediction_history.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line).get('data_date') for line in lines[:2]] == ['2026-09-01', '2026-09-02']
+
+
+def test_concurrent_runs_merge(tmp_path):
+    base = tmp_path / 'base'
+    base.mkdir()
+    with PredictionStore(str(base / 'prediction_history.db')) as store:
+        store.append([_record(1), _record(2)])
+
+    # 两个工作流从同一份日志开始，各自追加（行标识相同）
+    runs = {}
+    for name, code in (('run_a', '0005.HK'), ('run_b', '1398.HK')):
+        shutil.copytree(base, tmp_path / name)
+        with PredictionStore(str(tmp_path / name / 'prediction_history.db')) as store:
+            records = store.load_records()
+            if name == 'run_a':
+                records[0]['outcome'] = 'correct'
+                store.update_records(records)
+            store.append([_record(3, stock_code=code)])
+        runs[name] = (tmp_path / name / 'prediction_history.jsonl').read_text(encoding='utf-8')
+
+    # git 合并：run_a 的新行插在 run_b 已导入部分的末尾之前
+    base_log = (base / 'prediction_history.jsonl').read_text(encoding='utf-8')
+    merged = base_log + runs['run_a'][len(base_log):] + runs['run_b'][len(base_log):]
+    for name in runs:
+        (tmp_path / name / 'prediction_history.jsonl').write_text(merged, encoding='utf-8')
+        with PredictionStore(str(tmp_path / name / 'prediction_history.db')) as store:
+            records = store.load_records()
+        assert [r['stock_code'] for r in records] == ['0700.HK', '0700.HK', '0005.HK', '1398.HK']
+        assert [r['outcome'] for r in records] == ['correct', None, None, None]
+
+
+def test_update_logs_changed_fields(db_path, tmp_path):
+    log = tmp_path / 'prediction_history.jsonl'
+    with PredictionStore(db_path) as store:
+        store.append([_record(1), _record(2, score_model={'score': 0.7})])
+        records = store.load_records()
+        size = log.stat().st_size
+
+        # 整体回写未变化的记录不追加日志
+        assert store.update_records(records) == 0
+        assert log.stat().st_size == size
+
+        records[0].update(outcome='correct', actual_return=0.05)
+        del records[1]['score_model']
+        assert store.update_records(records) == 2
+        expected = store.load_records()
+
+    lines = [json.loads(line) for line in log.read_text(encoding='utf-8')[size:].splitlines()]
+    assert lines[0]['_update'] == {'outcome': 'correct', 'actual_return': 0.05}
+    assert lines[1]['_update'] == {} and lines[1]['_unset'] == ['score_model']
+    assert 'score_model' not in expected[1] and expected[0]['outcome'] == 'correct'
+
+    os.remove(db_path)
+    with PredictionStore(db_path) as store:
+        assert store.load_records() == expected
+
+
+def test_legacy_log_rows(db_path, tmp_path):
+    lines = [dict(_record(1), _row_id=1), dict(_record(2), _row_id=2),
+             dict(_record(1), _row_id=1, outcome='incorrect')]
+    (tmp_path / 'prediction_history.jsonl').write_text(
+        ''.join(json.dumps(line) + '\n' for line in lines), encoding='utf-8')
+
+    with PredictionStore(db_path) as store:
+        records = store.load_records()
+        assert [r['outcome'] for r in records] == ['incorrect', None]
+        records[1]['outcome'] = 'correct'
+        store.update_records([records[1]])
+
+    os.remove(db_path)
+    with PredictionStore(db_path) as store:
+        assert [r['outcome'] for r in store.load_records()] == ['incorrect', 'correct']
@@ -0,0 +1,99 @@
+"""
+逐日支撑阻力位和筹码分布测试
+
+覆盖：
+1. calculate_rolling_support_resistance 每行与截至该行调用 calculate_support_resistance 的最近支撑/阻力一致
+2. calculate_rolling_chip_distribution 每行与截至该行最近 window 行调用 get_chip_distribution 一致
+   （含价格不变、零成交量等无法计算的窗口）
+3. A股筹码阻力与特征流水线使用逐日结果
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_services.technical_analysis import (
+    TechnicalAnalyzer, calculate_rolling_chip_distribution, calculate_rolling_support_resistance,
+    calculate_support_resistance
+)
+
+
+def _bars(n=160, seed=5):
+    """随机游走日线，价格按 0.05 取整（制造相等的高低点），含停牌（价格不变、零成交量）区间"""
+    rng = np.random.RandomState(seed)
+    close = np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.02, n))) / 0.05) * 0.05
+    close[70:95] = close[69]
+    volume = rng.randint(100_000, 1_000_000, n).astype(float)
+    volume[70:95] = 0.0
+    spread = np.round(rng.uniform(0, 0.4, n) / 0.05) * 0.05
+    return pd.DataFrame({'Open': close, 'High': close + spread, 'Low': close - spread,
+                         'Close': close, 'Volume': volume}, index=pd.bdate_range('2026-01-05', periods=n))
+
+
+def _equal(actual, expected):
+    if expected is None:
+        return np.isnan(actual)
+    return actual == pytest.approx(expected, rel=1e-12)
+
+
+@pytest.mark.parametrize('lookback', [10, 20])
+def test_rolling_support_resistance_matches_snapshot(lookback):
+    df = _bars()
+    rolling = calculate_rolling_support_resistance(df, lookback=lookback)
+
+    assert rolling.iloc[:lookback - 1].isna().all().all()
+    for t in range(lookback - 1, len(df)):
+        snapshot = calculate_support_resistance(df.iloc[:t + 1], lookback=lookback)
+        row = rolling.iloc[t]
+        assert _equal(row['Support_Nearest'], snapshot['nearest_support']), t
+        assert _equal(row['Resistance_Nearest'], snapshot['nearest_resistance']), t
+
+
+@pytest.mark.parametrize('window', [20, 60])
+def test_rolling_chip_distribution_matches_snapshot(window):
+    df = _bars()
+    analyzer = TechnicalAnalyzer()
+    rolling = calculate_rolling_chip_distribution(df, window=window)
+
+    unavailable = 0
+    for t in range(window - 1, len(df)):
+        snapshot = analyzer.get_chip_distribution(df.iloc[t + 1 - window:t + 1])
+        row = rolling.iloc[t]
+        if snapshot is None:
+            unavailable += 1
+            assert row.isna().all(), t
+            continue
+        assert row['Chip_Concentration'] == pytest.approx(snapshot['concentration'], rel=1e-12), t
+        assert row['Chip_Resistance_Ratio'] == pytest.approx(snapshot['resistance_ratio'], rel=1e-12, abs=1e-15), t
+        assert (row['Chip_Peak_Low'], row['Chip_Peak_High']) == pytest.approx(snapshot['concentration_area']), t
+    if window <= 25:
+        assert unavailable > 0  # 完全落在停牌区间内的窗口无法计算
+
+
+def test_a_stock_chip_resistance_uses_rolling_chips(monkeypatch):
+    import a_stock_comprehensive_analysis
+
+    df = _bars().iloc[-45:]
+    monkeypatch.setattr(a_stock_comprehensive_analysis, 'get_a_stock_data', lambda code, period_days: df)
+    result = a_stock_comprehensive_analysis.calculate_chip_resistance('600519')
+
+    expected = TechnicalAnalyzer().get_chip_distribution(df)['resistance_ratio']
+    assert result['resistance_ratio'] == pytest.approx(expected)
+    assert result['resistance_level'] == ('低' if expected < 0.3 else '中' if expected < 0.6 else '高')
+
+
+def test_technical_features_include_rolling_levels():
+    """特征流水线的支撑阻力/筹码特征基于前一日K线（use_shift=True）"""
+    from ml_services.ml_trading_model import FeatureEngineer
+
+    df = _bars(n=200)
+    result = FeatureEngineer().calculate_technical_features(df.copy(), use_shift=True, code='TEST')
+    lagged = df.shift(1)
+    levels = calculate_rolling_support_resistance(lagged, lookback=20)
+    chips = calculate_rolling_chip_distribution(lagged, window=60)
+
+    pd.testing.assert_series_equal(result['Support_Distance_Pct'], levels['Support_Distance_Pct'])
+    pd.testing.assert_series_equal(result['Resistance_Distance_Pct'], levels['Resistance_Distance_Pct'])
+    pd.testing.assert_series_equal(result['Chip_Concentration'], chips['Chip_Concentration'])
+    pd.testing.assert_series_equal(result['Chip_Resistance_Ratio'], chips['Chip_Resistance_Ratio'])
+    assert result['Chip_Concentration'].iloc[-1] > 0
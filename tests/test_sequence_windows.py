@@ -0,0 +1,117 @@
+"""
+滑动窗口序列数据集测试
+
+覆盖：
+1. 窗口与标签与原逐个复制窗口的写法一致（含 NaN 收盘价、数据不足）
+2. 标准化：在训练窗口覆盖的行上拟合、对矩阵变换一次，与展开全部窗口后拟合/变换一致
+3. 多只股票拼接：窗口不跨越股票边界，顺序与逐个拼接一致，按股票取子集
+4. 内存：只保存一份特征矩阵
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import MinMaxScaler
+
+from ml_services.sequence_windows import SequenceWindows
+
+
+def _make_frame(n=300, n_features=8, seed=0):
+    rng = np.random.RandomState(seed)
+    close = 100 * np.exp(np.cumsum(rng.randn(n) * 0.02))
+    close[[10, 11]] = np.nan
+    features = rng.randn(n, n_features) * np.arange(1, n_features + 1)
+    df = pd.DataFrame(features, columns=[f'F{i}' for i in range(n_features)],
+                      index=pd.bdate_range('2022-01-03', periods=n))
+    df['Close'] = close
+    return df
+
+
+def _reference_sequences(df, sequence_length, horizon):
+    """原 create_sequences 的逐窗口写法"""
+    feature_data = df.values
+    sequences, labels = [], []
+    for i in range(len(feature_data) - sequence_length - horizon):
+        sequences.append(feature_data[i:i + sequence_length])
+        future_price = df['Close'].iloc[i + sequence_length + horizon - 1]
+        current_price = df['Close'].iloc[i + sequence_length - 1]
+        labels.append(1 if future_price > current_price else 0)
+    return np.array(sequences), np.array(labels)
+
+
+@pytest.mark.parametrize('sequence_length,horizon', [(30, 1), (60, 5), (10, 20)])
+def test_windows_match_reference(sequence_length, horizon):
+    """窗口和标签与逐个复制的写法一致"""
+    df = _make_frame()
+    expected_sequences, expected_labels = _reference_sequences(df, sequence_length, horizon)
+    windows = SequenceWindows.from_array(df.values, df['Close'].to_numpy(), sequence_length, horizon)
+
+    assert len(windows) == len(expected_labels)
+    assert windows.shape == expected_sequences.shape
+    np.testing.assert_array_equal(windows.labels, expected_labels)
+    np.testing.assert_allclose(windows.windows(), expected_sequences, rtol=1e-6)
+    np.testing.assert_allclose(windows.window(7), expected_sequences[7], rtol=1e-6)
+    assert np.shares_memory(windows.window(7), windows.data)
+
+    short = SequenceWindows.from_array(df.values[:20], df['Close'].to_numpy()[:20], 30, 1)
+    assert len(short) == 0 and short.labels.shape == (0,)
+
+
+def test_scaler_matches_flattened_windows():
+    """在训练窗口覆盖的行上拟合 MinMaxScaler，与展开训练窗口后拟合相同"""
+    df = _make_frame(n_features=12)
+    expected_sequences, _ = _reference_sequences(df, 30, 1)
+    windows = SequenceWindows.from_array(df.values, df['Close'].to_numpy(), 30, 1)
+
+    train_idx, test_idx = list(TimeSeriesSplit(n_splits=5).split(np.arange(len(windows))))[-1]
+    expected_scaler = MinMaxScaler().fit(expected_sequences[train_idx].reshape(-1, expected_sequences.shape[2]))
+    scaler = MinMaxScaler().fit(windows.subset(train_idx).rows())
+    np.testing.assert_allclose(scaler.data_min_, expected_scaler.data_min_, rtol=1e-6)
+    np.testing.assert_allclose(scaler.data_max_, expected_scaler.data_max_, rtol=1e-6)
+
+    expected_test = expected_scaler.transform(
+        expected_sequences[test_idx].reshape(-1, expected_sequences.shape[2])).reshape(
+        expected_sequences[test_idx].shape)
+    normalized = windows.transform(scaler).subset(test_idx)
+    np.testing.assert_allclose(normalized.windows(), expected_test, rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(normalized.labels, windows.labels[test_idx])
+
+
+def test_concat_respects_stock_boundaries():
+    """多只股票拼接：窗口不跨越边界，与逐个拼接各股票的窗口一致"""
+    frames = [_make_frame(n, seed=seed) for seed, n in enumerate((120, 90, 150))]
+    parts = [SequenceWindows.from_array(df.values, df['Close'].to_numpy(), 20, 3, stock_id=stock_id,
+                                        categorical={'stock_type': np.full(len(df), stock_id + 5)})
+             for stock_id, df in enumerate(frames)]
+    combined = SequenceWindows.concat(parts)
+
+    references = [_reference_sequences(df, 20, 3) for df in frames]
+    np.testing.assert_allclose(combined.windows(), np.concatenate([seq for seq, _ in references]), rtol=1e-6)
+    np.testing.assert_array_equal(combined.labels, np.concatenate([labels for _, labels in references]))
+    np.testing.assert_array_equal(combined.stock_ids,
+                                  np.concatenate([np.full(len(labels), i) for i, (_, labels) in enumerate(references)]))
+    assert combined.segments == [(0, 0, 120), (1, 120, 210), (2, 210, 360)]
+
+    # 每个窗口都落在所属股票的行范围内
+    for stock_id, start, end in combined.segments:
+        starts = combined.starts[combined.stock_ids == stock_id]
+        assert starts.min() >= start and starts.max() + combined.sequence_length <= end
+
+    second = combined.stock_subset(1)
+    np.testing.assert_allclose(second.windows(), references[1][0], rtol=1e-6)
+    np.testing.assert_array_equal(second.categorical_windows('stock_type'), np.full((len(second), 20), 6))
+    np.testing.assert_array_equal(second.window_stock_ids(slice(0, 2)), np.ones((2, 20)))
+
+
+def test_memory_is_single_matrix():
+    """只保存一份 (天数 × 特征数) 矩阵，子集共享同一矩阵"""
+    rng = np.random.RandomState(0)
+    features = rng.randn(1000, 200)
+    windows = SequenceWindows.from_array(features, 100 + np.cumsum(rng.randn(1000)), 60, 1)
+    materialized_bytes = len(windows) * 60 * 200 * 8
+
+    assert windows.data.nbytes == 1000 * 200 * 4
+    assert windows.data.nbytes * 50 < materialized_bytes
+    assert windows.subset(np.arange(100)).data is windows.data
+    assert [batch.stop for batch in windows.batches(400)] == [400, 800, 1200]
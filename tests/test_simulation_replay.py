@@ -0,0 +1,90 @@
+"""
+模拟交易离线回放测试
+
+覆盖：
+1. 同一K线和录制响应回放两次，交易记录完全一致
+2. 回放（包括最终报告）不访问网络：报价缺失时不回退到联网K线
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import simulation_trader
+from simulation_replay import HistoricalBarStore, RecordedLLM, ReplayClock, SimulationReplay
+
+CODES = ['0700.HK', '0005.HK']
+
+
+def _bars():
+    rng = np.random.RandomState(3)
+    dates = pd.bdate_range('2026-08-03', periods=40)
+    bars = {}
+    for i, code in enumerate(CODES):
+        close = (400.0 if i == 0 else 75.0) * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+        bars[code] = pd.DataFrame({'Open': close * (1 + rng.normal(0, 0.003, len(dates))),
+                                   'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                                   'Volume': rng.randint(1_000_000, 5_000_000, len(dates)).astype(float)},
+                                  index=dates)
+    return bars
+
+
+def _responses(path):
+    """第 25 个交易日买入两只股票，第 32 个交易日卖出一只"""
+    dates = pd.bdate_range('2026-08-03', periods=40)
+    buy = {'buy': [{'code': '0700.HK', 'name': '腾讯控股', 'reason': '突破', 'allocation_pct': 20,
+                    'stop_loss_price': 1.0, 'target_price': 500, 'validity_period': 7},
+                   {'code': '0005.HK', 'name': '汇丰银行', 'reason': '高息', 'allocation_pct': 10,
+                    'stop_loss_price': 1.0, 'target_price': 90, 'validity_period': 7}],
+           'sell': []}
+    sell = {'buy': [], 'sell': [{'code': '0700.HK', 'name': '腾讯控股', 'reason': '止盈',
+                                 'stop_loss_triggered': False}]}
+    records = []
+    for day, recommendation in [(24, buy), (31, sell)]:
+        timestamp = datetime.combine(dates[day].date(), datetime.min.time()).replace(hour=10).isoformat()
+        records.append({'timestamp': timestamp, 'kind': 'analysis', 'response': '分析报告'})
+        records.append({'timestamp': timestamp, 'kind': 'format',
+                        'response': json.dumps(recommendation, ensure_ascii=False)})
+    path.write_text('\n'.join(json.dumps(r, ensure_ascii=False) for r in records), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def network_calls(monkeypatch):
+    """记录回放过程中的联网取价调用"""
+    calls = []
+    monkeypatch.setattr(simulation_trader, 'get_hk_stock_data_tencent',
+                        lambda stock_code, period_days=90: calls.append(stock_code))
+    return calls
+
+
+def _replay(output_dir, responses):
+    clock = ReplayClock(datetime(2026, 8, 3))
+    replay = SimulationReplay(HistoricalBarStore(_bars(), clock), clock, llm=RecordedLLM(responses, clock),
+                              output_dir=str(output_dir), initial_capital=1000000)
+    summary = replay.run(datetime(2026, 8, 31), datetime(2026, 9, 25))
+    transactions = replay.trader.event_store.load_payloads('transaction')
+    return replay.trader, summary, transactions
+
+
+def test_replay_is_deterministic(tmp_path, network_calls):
+    responses = _responses(tmp_path / 'llm_responses.jsonl')
+    trader, first, first_transactions = _replay(tmp_path / 'run1', responses)
+    trader.event_store.close()
+    trader, second, second_transactions = _replay(tmp_path / 'run2', responses)
+
+    assert [(t['type'], t['code'], t['success']) for t in first_transactions] == \
+        [('BUY', '0700.HK', True), ('BUY', '0005.HK', True), ('SELL', '0700.HK', True)]
+    assert second_transactions == first_transactions
+    assert second == first
+    assert set(trader.positions) == {'0005.HK'}
+
+    # 报价缺失的股票（持仓中但没有本地K线）返回 None，最终报告不回退到联网K线
+    trader.positions['0388.HK'] = {'shares': 100, 'avg_price': 300.0, 'stop_loss_price': None}
+    assert trader.get_current_stock_price('0388.HK') is None
+    trader.generate_final_report()
+    assert network_calls == []
+    trader.event_store.close()
@@ -0,0 +1,104 @@
+"""
+模拟交易状态持久化测试
+
+覆盖：
+1. 快照 + 事件重放恢复资金和持仓（交易事件自带成交后持仓，不依赖 portfolio 事件）
+2. 快照只保留最近 KEEP_SNAPSHOTS 个，启动时使用最新快照
+3. 启动时不加载完整交易历史，首次访问时再读取
+"""
+
+from datetime import datetime
+
+import pytest
+
+from simulation_trader import SimulationEventStore, SimulationTrader
+
+PRICES = {'0700.HK': 400.0, '0939.HK': 6.0, '1398.HK': 5.0}
+
+
+class FixedQuotes:
+    """固定价格的报价服务（不访问网络）"""
+
+    def prefetch(self, stock_codes):
+        return {code: PRICES[code] for code in stock_codes if code in PRICES}
+
+    def get_price(self, stock_code, side=None):
+        return PRICES.get(stock_code)
+
+    def invalidate(self):
+        pass
+
+
+def _trader(data_dir, snapshot_interval=1000):
+    trader = SimulationTrader(initial_capital=100000, data_dir=str(data_dir),
+                              clock=lambda: datetime(2026, 9, 1, 10, 30), llm=lambda prompt, kind: '',
+                              analyzer=lambda code, name: None, quote_service=FixedQuotes(), notify=False)
+    trader.snapshot_interval = snapshot_interval
+    return trader
+
+
+def _trade(trader):
+    """买入三只股票后部分卖出一只、清仓一只"""
+    for code, shares in [('0700.HK', 100), ('0939.HK', 2000), ('1398.HK', 1000)]:
+        assert trader.buy_stock_by_shares(code, code, shares, reason='test', stop_loss_price=PRICES[code] * 0.9,
+                                          price_at_calculation=PRICES[code])
+    assert trader.sell_stock('0939.HK', '0939.HK', percentage=0.5, reason='test')
+    assert trader.sell_stock('1398.HK', '1398.HK', percentage=1.0, reason='test')
+
+
+def test_snapshot_and_replay_recovery(tmp_path, monkeypatch):
+    """快照之后的交易事件重放后资金和持仓与原进程一致"""
+    trader = _trader(tmp_path)
+    trader.save_state(force_snapshot=True)  # 快照在所有交易之前，恢复完全依赖事件重放
+
+    # 模拟交易事件写入后、portfolio 事件写入前进程中断
+    monkeypatch.setattr(SimulationTrader, '_record_portfolio_snapshot', lambda self: None)
+    _trade(trader)
+    expected_capital, expected_positions = trader.capital, trader.positions
+    assert set(expected_positions) == {'0700.HK', '0939.HK'}
+    assert expected_positions['0939.HK']['shares'] == 1000
+    trader.event_store.close()
+
+    restored = _trader(tmp_path)
+    assert restored.event_store.count('portfolio') == 0
+    assert restored.capital == pytest.approx(expected_capital)
+    assert restored.positions == expected_positions
+    restored.event_store.close()
+
+
+def test_snapshot_pruning(tmp_path):
+    """每笔交易后写快照，只保留最近 KEEP_SNAPSHOTS 个，恢复使用最新快照"""
+    trader = _trader(tmp_path, snapshot_interval=1)
+    _trade(trader)
+    trader.save_state(force_snapshot=True)
+    store = trader.event_store
+    snapshots = store._conn.execute("SELECT last_seq FROM snapshots ORDER BY id").fetchall()
+    assert len(snapshots) == SimulationEventStore.KEEP_SNAPSHOTS
+    assert snapshots[-1][0] == store.last_seq() and store.events_since_snapshot() == 0
+    expected_capital, expected_positions = trader.capital, trader.positions
+    store.close()
+
+    restored = _trader(tmp_path)
+    assert restored.capital == pytest.approx(expected_capital)
+    assert restored.positions == expected_positions
+    restored.event_store.close()
+
+
+def test_history_loaded_lazily(tmp_path):
+    """启动时只统计交易数，完整交易历史首次访问时读取"""
+    trader = _trader(tmp_path)
+    _trade(trader)
+    trader.event_store.close()
+
+    restored = _trader(tmp_path)
+    assert restored._transaction_history is None and restored._portfolio_history is None
+    assert restored.event_store.count('transaction', tags=['SELL']) == 2
+
+    # 未加载历史时的新交易只写事件日志，访问时一并读出
+    restored.sell_stock('0700.HK', '0700.HK', percentage=1.0, reason='test')
+    assert restored._transaction_history is None
+    history = restored.transaction_history
+    assert [t['type'] for t in history] == ['BUY', 'BUY', 'BUY', 'SELL', 'SELL', 'SELL']
+    assert all('position_after' not in t for t in history)
+    assert len(restored.portfolio_history) == restored.event_store.count('portfolio')
+    restored.event_store.close()
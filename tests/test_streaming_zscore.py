@@ -0,0 +1,135 @@
+"""
+Tests for streaming Z-Score detector.
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from anomaly_detector.streaming_zscore import StreamingZScoreDetector, RollingMoments
+from anomaly_detector.zscore_detector import ZScoreDetector
+
+
+@pytest.fixture
+def hourly_series():
+    """Create hourly series with a spike on the last bar."""
+    rng = np.random.RandomState(42)
+    index = pd.date_range(start='2026-01-01', periods=300, freq='h', tz='UTC')
+    values = 100 + rng.randn(len(index)).cumsum()
+    values[-1] += 40
+    return pd.Series(values, index=index)
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    """Temporary state file path."""
+    return str(tmp_path / 'zscore_state.json')
+
+
+def test_rolling_moments_match_pandas():
+    """Test running moments match pandas rolling mean/std after wrap-around."""
+    rng = np.random.RandomState(0)
+    values = rng.randn(500) * 10 + 50
+    moments = RollingMoments(30)
+    for value in values:
+        moments.push(value)
+
+    assert moments.mean == pytest.approx(values[-30:].mean())
+    assert moments.std == pytest.approx(values[-30:].std(ddof=1))
+
+
+def test_replace_last_value():
+    """Test replacing the latest value updates moments exactly."""
+    moments = RollingMoments.from_values(10, np.arange(20, dtype=float))
+    moments.replace_last(100.0)
+
+    expected = np.append(np.arange(10, 19, dtype=float), 100.0)
+    assert moments.mean == pytest.approx(expected.mean())
+    assert moments.std == pytest.approx(expected.std(ddof=1))
+
+
+def test_detect_anomaly_matches_stateless(hourly_series, state_file):
+    """Test streaming detection returns the same result as ZScoreDetector."""
+    streaming = StreamingZScoreDetector(window_size=72, time_interval='hour', state_file=state_file)
+    stateless = ZScoreDetector(window_size=72, time_interval='hour')
+    timestamp = datetime(2026, 1, 13)
+
+    expected = stateless.detect_anomaly('price', hourly_series.iloc[-1], hourly_series, timestamp)
+    actual = streaming.detect_anomaly('price', hourly_series.iloc[-1], hourly_series, timestamp, symbol='BTC-USD')
+
+    assert expected is not None
+    assert actual['z_score'] == pytest.approx(expected['z_score'])
+    assert actual['severity'] == expected['severity']
+    assert actual['time_interval'] == 'hour'
+
+
+def test_state_persists_and_updates_incrementally(hourly_series, state_file):
+    """Test a later run only applies new bars and matches a full recompute."""
+    first = StreamingZScoreDetector(window_size=72, time_interval='hour', state_file=state_file)
+    first.update('BTC-USD', 'price', hourly_series.iloc[:200])
+    first.save_state()
+
+    second = StreamingZScoreDetector(window_size=72, time_interval='hour', state_file=state_file)
+    assert second.has_state('BTC-USD', 'price')
+    # Only the last few days are passed in; the stored window is continued
+    window = second.update('BTC-USD', 'price', hourly_series.iloc[150:])
+
+    expected = hourly_series.tail(72)
+    assert window.mean == pytest.approx(expected.mean())
+    assert window.std == pytest.approx(expected.std())
+
+
+def test_changed_last_bar_is_replaced(hourly_series, state_file):
+    """Test a revised still-forming bar replaces the stored value."""
+    detector = StreamingZScoreDetector(window_size=72, time_interval='hour', state_file=state_file)
+    detector.update('ETH-USD', 'price', hourly_series.iloc[:200])
+
+    revised = hourly_series.iloc[:200].copy()
+    revised.iloc[-1] += 5.0
+    window = detector.update('ETH-USD', 'price', revised)
+
+    assert window.mean == pytest.approx(revised.tail(72).mean())
+
+
+def test_gap_reseeds_window(hourly_series, state_file):
+    """Test history that no longer contains the last seen bar reseeds the window."""
+    detector = StreamingZScoreDetector(window_size=72, time_interval='hour', state_file=state_file)
+    detector.update('BTC-USD', 'price', hourly_series.iloc[:100])
+    window = detector.update('BTC-USD', 'price', hourly_series.iloc[150:])
+
+    assert window.mean == pytest.approx(hourly_series.tail(72).mean())
+
+
+def test_series_are_keyed_by_interval(hourly_series, state_file):
+    """Test state is kept separately per (symbol, metric, interval)."""
+    detector = StreamingZScoreDetector(window_size=72, time_interval='hour', state_file=state_file)
+    detector.update('BTC-USD', 'price', hourly_series)
+    detector.save_state()
+
+    assert detector.has_state('BTC-USD', 'price', 'hour')
+    assert not detector.has_state('BTC-USD', 'price', 'day')
+    assert not detector.has_state('BTC-USD', 'volume')
+
+
+def test_detect_history_matches_bar_by_bar(hourly_series, state_file):
+    """Test vectorized backfill flags the same bars as bar-by-bar detection."""
+    detector = StreamingZScoreDetector(window_size=24, threshold=2.5, time_interval='hour', state_file=state_file)
+    stateless = ZScoreDetector(window_size=24, threshold=2.5, time_interval='hour')
+
+    flagged = detector.detect_history('price', hourly_series)
+    expected = [
+        ts for i, ts in enumerate(hourly_series.index)
+        if stateless.detect_anomaly('price', hourly_series.iloc[i], hourly_series.iloc[:i + 1], ts)
+    ]
+
+    assert list(flagged.index[flagged['is_anomaly']]) == expected
+    backfill = detector.backfill_anomalies('price', hourly_series)
+    assert [a['timestamp'] for a in backfill] == expected
+
+
+def test_insufficient_data(hourly_series, state_file):
+    """Test detection returns None until the window is full."""
+    detector = StreamingZScoreDetector(window_size=72, time_interval='hour', state_file=state_file)
+    result = detector.detect_anomaly('price', 500.0, hourly_series.iloc[:10], datetime(2026, 1, 1), symbol='BTC-USD')
+
+    assert result is None
@@ -0,0 +1,129 @@
+"""
+TAV 评分测试
+
+覆盖：
+1. TAVScorer.score_frame 每行与截至该行调用 calculate_tav_score 一致（各资产类型、各阈值配置）
+   （含历史不足 14/20 行、缺少 K/D 和量比列、MA200 尚未可用的行）
+2. 多只股票按 by 分组时每只股票单独计算
+3. 列式 _generate_tav_enhanced_signals 与原逐行实现的信号描述一致
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_services.technical_analysis import TAVConfig, TAVScorer, TechnicalAnalyzer, TechnicalAnalyzerV2
+
+ASSET_TYPES = ['stock', 'crypto', 'gold', 'hsi']
+CUSTOM_THRESHOLDS = {'strong_signal': 60, 'medium_signal': 45, 'weak_signal': 35}
+
+
+def _indicators(n=320, seed=0):
+    """随机游走日线（含成交量放大日）的全部技术指标"""
+    rng = np.random.RandomState(seed)
+    close = 100 * np.exp(np.cumsum(rng.randn(n) * 0.02))
+    volume = rng.randint(100_000, 1_000_000, n).astype(float)
+    volume[rng.rand(n) < 0.05] *= 3
+    df = pd.DataFrame({'Open': close * (1 + rng.randn(n) * 0.005), 'High': close * 1.01, 'Low': close * 0.99,
+                       'Close': close, 'Volume': volume}, index=pd.bdate_range('2024-01-01', periods=n))
+    return TechnicalAnalyzer().calculate_all_indicators(df)
+
+
+@pytest.fixture(scope='module')
+def indicators():
+    return _indicators()
+
+
+def _assert_rows_match(scorer, df, frame, asset_type, rows):
+    for t in rows:
+        score, detailed, status = scorer.calculate_tav_score(df.iloc[:t + 1], asset_type)
+        row = frame.iloc[t]
+        assert row['TAV_Score'] == pytest.approx(score), t
+        assert row['TAV_Trend_Score'] == detailed['trend'], t
+        assert row['TAV_Momentum_Score'] == detailed['momentum'], t
+        assert row['TAV_Volume_Score'] == detailed['volume'], t
+        assert row['TAV_Status'] == status, t
+
+
+@pytest.mark.parametrize('asset_type', ASSET_TYPES)
+@pytest.mark.parametrize('thresholds', ['asset', 'custom'])
+def test_score_frame_matches_per_row(indicators, asset_type, thresholds):
+    config = TAVConfig.get_config(asset_type)
+    config = dict(config, thresholds=CUSTOM_THRESHOLDS if thresholds == 'custom' else config['thresholds'])
+    scorer = TAVScorer(config)
+    frame = scorer.score_frame(indicators, asset_type)
+
+    _assert_rows_match(scorer, indicators, frame, asset_type, range(len(indicators)))
+    # 历史不足时趋势 / 动量评分为 0
+    assert (frame['TAV_Trend_Score'].iloc[:19] == 0).all() and (frame['TAV_Momentum_Score'].iloc[:13] == 0).all()
+    expected_signal = frame['TAV_Status'].map({'无共振': 0, '弱共振': 1, '中等共振': 2, '强共振': 3})
+    assert (frame['TAV_Signal'] == expected_signal).all()
+
+    # thresholds 参数覆盖实例阈值，与用该阈值构建的评分器一致
+    overridden = TAVScorer(TAVConfig.get_config(asset_type)).score_frame(indicators, asset_type,
+                                                                          thresholds=config['thresholds'])
+    pd.testing.assert_frame_equal(overridden, frame)
+
+
+@pytest.mark.parametrize('asset_type', ASSET_TYPES)
+def test_score_frame_missing_columns(indicators, asset_type):
+    """缺少随机振荡器、量比和价量配合列时与逐行计算一致"""
+    reduced = indicators.drop(columns=['K', 'D', 'Volume_Ratio', 'Price_Volume_Bullish_Strong',
+                                       'Price_Volume_Reversal_Bearish'])
+    reduced = reduced.assign(MA50=reduced['MA50'].where(reduced.index.dayofweek != 2))
+    scorer = TAVScorer(TAVConfig.get_config(asset_type))
+    frame = scorer.score_frame(reduced, asset_type)
+    _assert_rows_match(scorer, reduced, frame, asset_type, range(0, len(reduced), 3))
+
+
+def test_score_frame_grouped_by_stock(indicators):
+    """多只股票拼接时按股票分组，每只股票的结果与单独计算一致"""
+    other = _indicators(n=150, seed=1)
+    # 按日期交错排列，同一日期有两只股票
+    panel = pd.concat([indicators.assign(Code='A'), other.assign(Code='B')]).sort_index(kind='mergesort')
+    scorer = TAVScorer()
+    frame = scorer.score_frame(panel, 'stock', by='Code')
+
+    for code, single in [('A', indicators), ('B', other)]:
+        pd.testing.assert_frame_equal(frame[(panel['Code'] == code).to_numpy()],
+                                      scorer.score_frame(single, 'stock'), check_freq=False)
+
+
+def _reference_tav_signals(analyzer, df, asset_type):
+    """原 _generate_tav_enhanced_signals 的逐行写法（每个点用最近 201 行调用 calculate_tav_score）"""
+    df = TechnicalAnalyzer.generate_buy_sell_signals(analyzer, df)
+    tav_config = TAVConfig.get_config(asset_type)
+    tav_scorer = TAVScorer(tav_config)
+    for i in range(50, len(df)):
+        window_df = df.iloc[max(0, i - 200):i + 1].copy()
+        tav_score, _, _ = tav_scorer.calculate_tav_score(window_df, asset_type)
+        if tav_score >= tav_config['thresholds']['strong_signal']:
+            tav_tag = " [TAV强共振确认]"
+        elif tav_score >= tav_config['thresholds']['medium_signal']:
+            tav_tag = " [TAV中等共振]"
+        else:
+            tav_tag = " [TAV弱共振]"
+        buy, sell = df.iloc[i].get('Buy_Signal', False), df.iloc[i].get('Sell_Signal', False)
+        if buy:
+            df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')}{tav_tag}"
+        if sell:
+            df.at[df.index[i], 'Signal_Description'] = f"{df.iloc[i].get('Signal_Description', '')}{tav_tag}"
+        if buy and sell:
+            desc = df.iloc[i].get('Signal_Description', '')
+            if '买入信号:' not in desc or '卖出信号:' not in desc:
+                df.at[df.index[i], 'Signal_Description'] = \
+                    f"买入信号: RSI超卖反弹(成交量弱确认){tav_tag} | 卖出信号: RSI超买回落(成交量弱确认){tav_tag}"
+    return df
+
+
+@pytest.mark.parametrize('asset_type', ASSET_TYPES)
+def test_enhanced_signals_match_loop(indicators, asset_type):
+    analyzer = TechnicalAnalyzerV2(enable_tav=True)
+    result = analyzer.generate_buy_sell_signals(indicators.copy(), asset_type=asset_type)
+    expected = _reference_tav_signals(analyzer, indicators.copy(), asset_type)
+
+    signals = result['Buy_Signal'] | result['Sell_Signal']
+    assert signals.iloc[50:].sum() > 10 and (result['Buy_Signal'] & result['Sell_Signal']).any()
+    assert result['Signal_Description'].str.contains('[TAV', regex=False).sum() == signals.iloc[50:].sum()
+    pd.testing.assert_series_equal(result['Signal_Description'], expected['Signal_Description'])
+    pd.testing.assert_frame_equal(result, expected)
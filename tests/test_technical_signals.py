@@ -0,0 +1,157 @@
+"""
+技术分析买卖信号测试
+
+覆盖：
+1. 列式信号引擎与逐行规则（原实现）的输出一致（信号列与描述）
+2. describe=False 时只写位掩码，describe_signals 按需解码出相同描述
+3. 缺少指标列时不报错
+4. 10 年日线基准：列式引擎的耗时（设置 RUN_BENCHMARKS=1 时运行，只报告不断言）
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_services.technical_analysis import (
+    TechnicalAnalyzer, decode_signal_description,
+    SIGNAL_MACD, SIGNAL_PV_CONTINUATION
+)
+
+
+def _make_prices(n, seed=0):
+    """随机游走日线（含成交量放大日）"""
+    rng = np.random.RandomState(seed)
+    close = 100 * np.exp(np.cumsum(rng.randn(n) * 0.02))
+    volume = rng.randint(100000, 1000000, n).astype(float)
+    volume[rng.rand(n) < 0.05] *= 3
+    return pd.DataFrame({
+        'Open': close * (1 + rng.randn(n) * 0.005),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': volume
+    }, index=pd.bdate_range('2015-01-01', periods=n))
+
+
+def _reference_signals(df):
+    """逐行规则（列式引擎之前的实现），只返回 Buy_Signal / Sell_Signal / Signal_Description"""
+    analyzer = TechnicalAnalyzer()
+    rows = df.to_dict('records')
+    buy_flags, sell_flags, descriptions = [False], [False], ['']
+
+    def level4(row):
+        return "强" if row.get('Volume_Surge_Strong', False) else (
+            "中" if row.get('Volume_Surge_Medium', False) else ("弱" if row.get('Volume_Surge_Weak', False) else "普通"))
+
+    def level3(row):
+        return "强" if row.get('Volume_Surge_Strong', False) else ("中" if row.get('Volume_Surge_Medium', False) else "弱")
+
+    for prev, row in zip(rows[:-1], rows[1:]):
+        trend_ok = row.get('Volume_Surge_Weak', False) or row.get('Volume_Trend_Up', False) or row.get('Volume_Ratio', 0) > 0.9
+        momentum_ok = row.get('Volume_Surge_Weak', False) or row.get('Volume_Ratio', 0) > 1.0
+        price_action_ok = row.get('Volume_Surge_Medium', False)
+        parts = []
+        for prefix, names, above, macd, zone, band, moved, direction, word in (
+                ("买入信号: ", ("上升趋势形成", "MACD金叉", "RSI超卖反弹", "布林带下轨反弹"), 'MA20_above_MA50',
+                 'MACD_above_signal', 'RSI_oversold', 'Price_below_BB_lower',
+                 row['Close'] > prev['Close'], 'Bullish', "上涨"),
+                ("卖出信号: ", ("下降趋势形成", "MACD死叉", "RSI超买回落", "跌破布林带上轨"), 'MA20_below_MA50',
+                 'MACD_below_signal', 'RSI_overbought', 'Price_above_BB_upper',
+                 row['Close'] < prev['Close'], 'Bearish', "下跌")):
+            conditions = []
+            if row[above] and not prev[above] and trend_ok:
+                conditions.append(f"{names[0]}(成交量{level4(row)}确认)")
+            if row[macd] and not prev[macd] and momentum_ok:
+                conditions.append(f"{names[1]}(成交量{level3(row)}确认)")
+            if not row[zone] and prev[zone] and momentum_ok:
+                conditions.append(f"{names[2]}(成交量{level3(row)}确认)")
+            if not row[band] and prev[band] and price_action_ok:
+                conditions.append(f"{names[3]}(成交量{level3(row)}确认)")
+            if moved and row.get(f'Price_Volume_{direction}_Weak', False):
+                if row.get(f'Price_Volume_Reversal_{direction}', False):
+                    conditions.append(f"价量配合反转{analyzer._get_volume_level(row)}")
+                elif row.get(f'Price_Volume_Continuation_{direction}', False):
+                    conditions.append(f"价量配合延续{analyzer._get_volume_level(row)}")
+                elif row.get(f'Price_Volume_{direction}_Strong', False):
+                    conditions.append(f"价量配合{word}(强)")
+                elif row.get(f'Price_Volume_{direction}_Medium', False):
+                    conditions.append(f"价量配合{word}(中)")
+                else:
+                    conditions.append(f"价量配合{word}(弱)")
+            parts.append(prefix + ", ".join(conditions) if conditions else None)
+        buy_flags.append(parts[0] is not None)
+        sell_flags.append(parts[1] is not None)
+        descriptions.append(" | ".join(p for p in parts if p))
+
+    return pd.DataFrame({'Buy_Signal': buy_flags, 'Sell_Signal': sell_flags, 'Signal_Description': descriptions},
+                        index=df.index)
+
+
+@pytest.fixture(scope='module')
+def indicators():
+    """带全部技术指标的 10 年日线"""
+    return TechnicalAnalyzer().calculate_all_indicators(_make_prices(2520))
+
+
+def test_signals_match_row_rules(indicators):
+    """列式引擎与逐行规则的信号和描述一致"""
+    result = TechnicalAnalyzer().generate_buy_sell_signals(indicators.copy())
+    expected = _reference_signals(result)
+
+    np.testing.assert_array_equal(result['Buy_Signal'].to_numpy(), expected['Buy_Signal'].to_numpy())
+    np.testing.assert_array_equal(result['Sell_Signal'].to_numpy(), expected['Sell_Signal'].to_numpy())
+    assert result['Signal_Description'].tolist() == expected['Signal_Description'].tolist()
+    assert result['Buy_Signal'].any() and result['Sell_Signal'].any()
+    assert (result['Buy_Signal'] & result['Sell_Signal']).any()
+
+
+def test_lazy_descriptions(indicators):
+    """describe=False 只写位掩码，按需解码与完整描述相同"""
+    analyzer = TechnicalAnalyzer()
+    full = analyzer.generate_buy_sell_signals(indicators.copy())
+    lazy = analyzer.generate_buy_sell_signals(indicators.copy(), describe=False)
+
+    assert (lazy['Signal_Description'] == '').all()
+    np.testing.assert_array_equal(lazy['Buy_Signal_Code'].to_numpy(), full['Buy_Signal_Code'].to_numpy())
+
+    tail = lazy.tail(60)
+    rows = np.flatnonzero(tail['Buy_Signal'] | tail['Sell_Signal']) + len(lazy) - 60
+    decoded = analyzer.describe_signals(lazy, rows)
+    assert decoded.tolist() == full['Signal_Description'].iloc[rows].tolist()
+
+
+def test_decode_signal_description():
+    """位掩码解码格式"""
+    assert decode_signal_description(0, 0) == ''
+    assert decode_signal_description(SIGNAL_MACD | SIGNAL_PV_CONTINUATION, 0, 2) == \
+        "买入信号: MACD金叉(成交量中确认), 价量配合延续(中)"
+    assert decode_signal_description(SIGNAL_MACD, SIGNAL_MACD, 0) == \
+        "买入信号: MACD金叉(成交量弱确认) | 卖出信号: MACD死叉(成交量弱确认)"
+
+
+def test_missing_indicator_columns():
+    """只有收盘价列时不产生信号，也不报错"""
+    result = TechnicalAnalyzer().generate_buy_sell_signals(_make_prices(100)[['Close']].copy())
+
+    assert not result['Buy_Signal'].any()
+    assert not result['Sell_Signal'].any()
+    assert (result['Signal_Description'] == '').all()
+
+
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='基准测试：设置 RUN_BENCHMARKS=1 运行')
+def test_benchmark_ten_year_daily(indicators):
+    """基准：10 年日线（约 2520 行）的信号生成耗时"""
+    analyzer = TechnicalAnalyzer()
+    runs = []
+    for _ in range(5):
+        df = indicators.copy()
+        start = time.perf_counter()
+        analyzer.generate_buy_sell_signals(df)
+        runs.append(time.perf_counter() - start)
+
+    best = min(runs)
+    # 逐行实现约需数秒；耗时只报告，不作断言（共享 CI 机器上不稳定）
+    print(f"\ngenerate_buy_sell_signals, {len(indicators)} 行: 最快 {best * 1000:.1f} ms")
@@ -0,0 +1,132 @@
+"""
+腾讯财经批量报价测试
+
+覆盖：
+1. get_hk_quotes_tencent 字段解析（最新价/买一/卖一/时间/最高/最低的字段位置，无挂单回退）
+2. TencentQuoteService TTL 缓存：有效期内不重复请求，过期后重新请求
+3. 获取失败（无报价或请求异常）的股票短时负缓存
+"""
+
+import types
+
+import pytest
+
+from data_services import tencent_finance
+from data_services.tencent_finance import TencentQuoteService, get_hk_quotes_tencent
+
+
+def _quote_line(symbol, name, last, bid, ask, quote_time, high, low):
+    fields = [''] * 40
+    fields[0], fields[1], fields[2] = '100', name, symbol[2:]
+    fields[3], fields[4], fields[5], fields[6] = last, '398.0', '399.5', '1234567'
+    fields[9], fields[19], fields[30], fields[33], fields[34] = bid, ask, quote_time, high, low
+    return f'v_{symbol}="{"~".join(fields)}";'
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.encoding = None
+
+    def raise_for_status(self):
+        pass
+
+
+def test_quote_field_parsing(monkeypatch):
+    text = '\n'.join([
+        _quote_line('hk00700', '腾讯控股', '400.2', '400.0', '400.4', '2026/09/01 16:08:10', '405.6', '396.8'),
+        _quote_line('hk00005', '汇丰控股', '75.5', '', '0', '2026/09/01 16:08:10', '76.0', '75.0'),
+        _quote_line('hk01398', '工商银行', '', '', '', '', '', ''),
+    ])
+    urls = []
+
+    def fake_get(url, headers=None, timeout=None):
+        urls.append(url)
+        return FakeResponse(text)
+
+    monkeypatch.setattr(tencent_finance.requests, 'get', fake_get)
+    quotes = get_hk_quotes_tencent(['0700.HK', '00700', '5.HK', '1398.HK'])
+
+    assert len(urls) == 1 and urls[0].endswith('q=hk00700,hk00005,hk01398')
+    assert set(quotes) == {'0700.HK', '00700', '5.HK'}  # 无最新价的股票不返回
+    tencent = quotes['0700.HK']
+    assert tencent == quotes['00700']
+    assert tencent['name'] == '腾讯控股'
+    assert (tencent['last'], tencent['bid'], tencent['ask']) == (400.2, 400.0, 400.4)
+    assert (tencent['high'], tencent['low']) == (405.6, 396.8)
+    assert (tencent['prev_close'], tencent['open'], tencent['volume']) == (398.0, 399.5, 1234567.0)
+    assert tencent['quote_time'] == '2026/09/01 16:08:10'
+    # 无挂单时买卖价回退到最新价
+    assert quotes['5.HK']['bid'] == quotes['5.HK']['ask'] == 75.5
+
+
+class FakeFetcher:
+    """记录每次请求的批量报价桩函数"""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def __call__(self, codes):
+        self.calls.append(sorted(codes))
+        return {code: {'last': self.prices[code], 'bid': self.prices[code] - 0.1, 'ask': self.prices[code] + 0.1}
+                for code in codes if code in self.prices}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(tencent_finance, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_ttl_cache(clock):
+    fetcher = FakeFetcher({'0700.HK': 400.0, '0005.HK': 75.0})
+    service = TencentQuoteService(ttl_seconds=60, fetcher=fetcher)
+
+    assert set(service.prefetch(['0700.HK', '0005.HK'])) == {'0700.HK', '0005.HK'}
+    assert service.get_price('0700.HK', side='BUY') == pytest.approx(400.1)
+    assert service.get_price('0700', side='SELL') == pytest.approx(399.9)  # 同一报价代码命中缓存
+    clock[0] += 60
+    assert service.get_price('0005.HK') == 75.0
+    assert fetcher.calls == [['0005.HK', '0700.HK']] and service.request_count == 1
+
+    clock[0] += 1
+    fetcher.prices['0700.HK'] = 410.0
+    assert service.get_price('0700.HK') == 410.0
+    assert fetcher.calls[-1] == ['0700.HK'] and service.request_count == 2
+
+    service.invalidate()
+    service.prefetch(['0700.HK', '0005.HK'])
+    assert service.request_count == 3
+
+
+def test_negative_cache(clock):
+    fetcher = FakeFetcher({'0700.HK': 400.0})
+    service = TencentQuoteService(ttl_seconds=300, fetcher=fetcher, negative_ttl_seconds=30)
+
+    assert set(service.prefetch(['0700.HK', '9999.HK'])) == {'0700.HK'}
+    fetcher.calls.clear()
+    clock[0] += 10
+    assert service.get_price('9999.HK') is None
+    assert fetcher.calls == []  # 失败结果在负缓存有效期内不重复请求
+
+    clock[0] += 21
+    fetcher.prices['9999.HK'] = 1.5
+    assert service.get_price('9999.HK') == 1.5
+    assert fetcher.calls == [['9999.HK']]
+
+    # 请求异常同样负缓存，不影响缓存中仍有效的报价
+    def failing(codes):
+        failing.calls += 1
+        raise ConnectionError('timeout')
+    failing.calls = 0
+    service.fetcher = failing
+    assert service.get_price('0005.HK') is None
+    assert service.get_price('0005.HK') is None
+    assert failing.calls == 1
+    assert service.get_price('0700.HK') == 400.0
+
+    # 回放时 ttl_seconds=0，负缓存不长于正常缓存
+    assert TencentQuoteService(ttl_seconds=0, fetcher=fetcher).negative_ttl_seconds == 0
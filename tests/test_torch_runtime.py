@@ -0,0 +1,131 @@
+"""
+PyTorch CPU 运行配置测试
+
+覆盖：
+1. 命令行参数覆盖环境变量默认值，线程数按并行进程数分配
+2. run_parallel 多进程结果与顺序执行一致，两种方式下任务出错时结果都为 None
+3. 推理模型（需要 PyTorch）：TorchScript / torch.compile / 动态 int8 量化的输出与 eager 模型一致（容差内），
+   原模型不被修改
+4. make_loader（需要 PyTorch）：按批取样本的批次与逐个样本取出的 DataLoader 一致（含 worker 进程、打乱）
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pytest
+
+from ml_services.sequence_windows import SequenceWindows
+from ml_services.torch_runtime import (
+    CPUPerformanceConfig, add_cpu_performance_arguments, cpu_config_from_args, make_loader,
+    prepare_inference_model, run_parallel
+)
+
+
+def _square(value, offset=0):
+    if value < 0:
+        raise ValueError("negative")
+    return value * value + offset
+
+
+def test_config_from_args():
+    """命令行参数覆盖默认值，未指定的参数保持默认"""
+    parser = argparse.ArgumentParser()
+    add_cpu_performance_arguments(parser)
+
+    config = cpu_config_from_args(parser.parse_args(['--cpu-perf', '--threads', '3', '--quantize',
+                                                     '--inference-backend', 'compile']))
+    assert config.enabled and config.quantize
+    assert config.num_threads == 3 and config.inference_backend == 'compile'
+    assert config.threads_per_process(4) == 3
+
+    default = cpu_config_from_args(parser.parse_args([]))
+    assert default.threads_per_process(2) == max(1, (os.cpu_count() or 1) // 2)
+    with pytest.raises(ValueError):
+        CPUPerformanceConfig(inference_backend='onnx')
+
+
+def test_run_parallel_matches_sequential():
+    """多进程结果与顺序执行一致，并按任务顺序返回；任务出错时两种方式都返回 None"""
+    items = [3, 1, -1, 2]
+    sequential = run_parallel(_square, items, CPUPerformanceConfig(processes=1), offset=1)
+    assert list(sequential) == items
+    assert sequential == {3: 10, 1: 2, -1: None, 2: 5}
+
+    parallel = run_parallel(_square, items, CPUPerformanceConfig(enabled=True, processes=2), offset=1)
+    assert list(parallel) == items
+    assert parallel == sequential
+
+
+@pytest.mark.parametrize('backend,quantize,tolerance', [
+    ('script', False, 1e-4),
+    ('compile', False, 1e-4),
+    ('eager', True, 0.05),
+    ('script', True, 0.05),
+])
+def test_inference_model_matches_eager(backend, quantize, tolerance):
+    """各推理模式的输出与 eager 模型在容差内一致（量化为 int8 近似）"""
+    torch = pytest.importorskip('torch')
+    from ml_services.lstm_experiment import LSTMModel
+
+    torch.manual_seed(0)
+    model = LSTMModel(input_size=6, hidden_size=16, num_layers=2)
+    model.eval()
+    X = torch.randn(32, 20, 6)
+    with torch.no_grad():
+        expected = model(X)
+
+    config = CPUPerformanceConfig(enabled=True, inference_backend=backend, quantize=quantize)
+    inference = prepare_inference_model(model, (X,), config)
+    with torch.no_grad():
+        actual = inference(X)
+
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=tolerance), float((actual - expected).abs().max())
+    if backend == 'script':
+        assert isinstance(inference, torch.jit.ScriptModule)
+    # 原模型不被修改（量化作用在副本上）
+    assert type(model.fc4) is torch.nn.Linear and type(model.lstm) is torch.nn.LSTM
+    with torch.no_grad():
+        assert torch.equal(model(X), expected)
+
+    # 性能模式关闭时返回原模型
+    assert prepare_inference_model(model, (X,), CPUPerformanceConfig(enabled=False)) is model
+
+
+def _dataset(n=130, seed=0):
+    from ml_services.lstm_experiment import StockPriceDataset
+
+    rng = np.random.RandomState(seed)
+    features = rng.randn(n, 5).astype(np.float32)
+    close = 100 * np.exp(np.cumsum(rng.randn(n) * 0.02))
+    return StockPriceDataset(SequenceWindows.from_array(features, close, sequence_length=10))
+
+
+def test_make_loader_batches():
+    """按批取样本的批次与 DataLoader(dataset, batch_size) 逐个取样本一致"""
+    torch = pytest.importorskip('torch')
+
+    dataset = _dataset()
+    reference = list(torch.utils.data.DataLoader(dataset, batch_size=16))
+    for config in (CPUPerformanceConfig(), CPUPerformanceConfig(enabled=True, dataloader_workers=2)):
+        batches = list(make_loader(dataset, 16, config))
+        assert len(batches) == len(reference)
+        for batch, expected in zip(batches, reference):
+            assert len(batch) == len(expected) == 3
+            for actual, wanted in zip(batch, expected):
+                assert actual.dtype == wanted.dtype and torch.equal(actual, wanted)
+
+    # 打乱：每个样本恰好出现一次，窗口与标签仍然对应
+    torch.manual_seed(0)
+    shuffled = list(make_loader(dataset, 16, shuffle=True))
+    assert [len(x) for x, _, _ in shuffled] == [len(x) for x, _, _ in reference]
+    windows = torch.cat([x for x, _, _ in shuffled])
+    labels = torch.cat([y for _, y, _ in shuffled])
+    expected_windows = torch.cat([x for x, _, _ in reference])
+    expected_labels = torch.cat([y for _, y, _ in reference])
+    order = torch.argsort(windows[:, 0, 0])
+    expected_order = torch.argsort(expected_windows[:, 0, 0])
+    assert not torch.equal(windows, expected_windows)
+    assert torch.equal(windows[order], expected_windows[expected_order])
+    assert torch.equal(labels[order], expected_labels[expected_order])
@@ -0,0 +1,144 @@
+"""
+本地交易日历服务测试
+
+覆盖：
+1. 港股交易日计算与原 numpy busday + 港股假期表一致（含假期表覆盖范围外）
+2. 目标日期：与原逐日累加交易日的写法一致，A股使用A股休市日
+3. 下一个/上一个交易日、半日市、期权到期日
+4. 2026 年港股休市日（周日假期的补假），假期表未覆盖的年份告警
+5. 预测评估按股票代码选择港股 / A股日历计算目标日期
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_services.trading_calendar import (
+    HK_HOLIDAYS, TradingCalendar, get_trading_calendar, market_for_code
+)
+
+
+def _hk_holidays():
+    return np.array(sorted(d for dates in HK_HOLIDAYS.values() for d in dates), dtype='datetime64[D]')
+
+
+def _reference_target_date(date, horizon, trading_dates):
+    """原 get_target_date_trading_days 的逐日累加写法"""
+    current = datetime.strptime(date, '%Y-%m-%d')
+    count = 0
+    while count < horizon:
+        current += timedelta(days=1)
+        if current.strftime('%Y-%m-%d') in trading_dates:
+            count += 1
+    return current.strftime('%Y-%m-%d')
+
+
+def test_matches_busday_reference():
+    """count_between / add_trading_days 与 np.busday_count / busday_offset 一致"""
+    calendar = get_trading_calendar('hk')
+    holidays = _hk_holidays()
+    rng = np.random.RandomState(0)
+    starts = np.datetime64('2023-06-01') + rng.randint(0, 1100, size=300)
+    for start, span, days in zip(starts, rng.randint(0, 80, size=300), rng.randint(-25, 25, size=300)):
+        end = start + span
+        assert calendar.count_between(str(start), str(end)) == np.busday_count(start, end, holidays=holidays)
+        expected = np.busday_offset(start, days, roll='backward', holidays=holidays)
+        assert calendar.add_trading_days(str(start), int(days)) == str(expected)
+
+    # 假期表覆盖范围外按周一至周五外推
+    assert calendar.count_between('2010-01-01', '2010-02-01') == np.busday_count('2010-01-01', '2010-02-01')
+
+
+def test_target_date_matches_daily_loop():
+    """目标日期与逐日累加一致；A股按A股休市日计算"""
+    hk = get_trading_calendar('hk')
+    hk_dates = {str(d) for d in hk.sessions_between('2024-01-01', '2026-12-31').date}
+    for date in ['2025-01-24', '2025-01-25', '2025-04-17', '2025-12-23', '2026-02-13']:
+        for horizon in (1, 5, 20):
+            assert hk.add_trading_days(date, horizon) == _reference_target_date(date, horizon, hk_dates)
+
+    a_stock = get_trading_calendar('a_stock')
+    assert a_stock.add_trading_days('2025-09-30', 1) == '2025-10-09'
+    assert hk.add_trading_days('2025-09-30', 1) == '2025-10-02'
+    assert a_stock.count_between('2025-01-27', '2025-02-07') == 3
+    assert a_stock.count_between('2025-02-07', '2025-01-27') == -3
+
+    # 输入类型：字符串、datetime、Timestamp 结果相同
+    assert hk.add_trading_days(datetime(2025, 1, 24, 16, 0), 1) == '2025-01-27'
+    assert hk.add_trading_days(pd.Timestamp('2025-01-24'), 1) == '2025-01-27'
+
+    assert market_for_code('600519') == 'a_stock' and market_for_code('000001.SZ') == 'a_stock'
+    assert market_for_code('0700.HK') == 'hk' and market_for_code('^HSI') == 'hk'
+    with pytest.raises(ValueError):
+        get_trading_calendar('us')
+
+
+def test_sessions_half_days_and_expiry():
+    """下一个/上一个交易日、半日市、期权到期日"""
+    hk = get_trading_calendar('hk')
+    assert hk.next_session('2025-01-28') == '2025-02-03'
+    assert hk.next_session('2025-02-03', inclusive=True) == '2025-02-03'
+    assert hk.previous_session('2025-02-03') == '2025-01-28'
+    assert hk.previous_session('2025-02-01', inclusive=True) == '2025-01-28'
+    assert hk.is_session('2025-01-28') and not hk.is_session('2025-01-29')
+    assert hk.is_half_day('2025-01-28') and not hk.is_half_day('2025-01-27')
+
+    # 恒指期权：当月倒数第二个交易日
+    assert hk.options_expiry(2025, 1) == '2025-01-27'
+    assert hk.options_expiry(2025, 12) == '2025-12-30'
+    # A股ETF期权：第四个周三，遇休市顺延
+    a_stock = get_trading_calendar('a_stock')
+    assert a_stock.options_expiry(2025, 1) == '2025-01-22'
+    assert a_stock.options_expiry(2026, 2) == '2026-02-25'
+
+    assert hk.sessions.dtype == np.int32 and np.all(np.diff(hk.sessions) > 0)
+
+
+def test_hk_2026_closures():
+    """2026 年港股休市日：周日假期顺延到周一，落在周末的假期不休市"""
+    hk = get_trading_calendar('hk')
+    closures = ['2026-01-01', '2026-02-17', '2026-02-18', '2026-02-19', '2026-04-03', '2026-04-06', '2026-04-07',
+                '2026-05-01', '2026-05-25', '2026-06-19', '2026-07-01', '2026-10-01', '2026-10-19', '2026-12-25']
+    assert [d for d in closures if hk.is_session(d)] == []
+    assert hk.count_between('2026-01-01', '2027-01-01') == 261 - len(closures)
+    # 佛诞、重阳节为周日，中秋节翌日、圣诞节翌日为周六
+    for date in ['2026-05-26', '2026-09-28', '2026-10-06', '2026-10-20', '2026-12-28']:
+        assert hk.is_session(date), date
+    assert hk.next_session('2026-05-22') == '2026-05-26'
+    assert hk.next_session('2026-10-16') == '2026-10-20'
+    assert np.is_busday(np.array(HK_HOLIDAYS[2026], dtype='datetime64[D]')).all()
+
+
+def test_uncovered_year_warning(caplog):
+    """假期表未覆盖的年份按周一至周五近似，每年首次查询时告警"""
+    calendar = TradingCalendar('hk', HK_HOLIDAYS[2026], covered_until='2026-12-31')
+    with caplog.at_level('WARNING', logger='data_services.trading_calendar'):
+        assert calendar.is_session('2026-12-31')
+        assert calendar.add_trading_days('2026-12-24', 3) == '2026-12-30'
+        assert not caplog.records
+
+        assert calendar.add_trading_days('2026-12-30', 2) == '2027-01-01'
+        assert calendar.is_session('2027-02-08') and calendar.count_between('2027-01-01', '2027-12-31') == 260
+        calendar.next_session('2028-06-01')
+    messages = [r.getMessage() for r in caplog.records]
+    assert len(messages) == 2 and '2027' in messages[0] and '2028' in messages[1]
+
+
+def test_prediction_target_date_uses_stock_market(monkeypatch):
+    """A股预测的目标日期跳过A股国庆休市，港股预测按港股交易日"""
+    from ml_services import performance_monitor
+
+    requested = {}
+    monkeypatch.setattr(performance_monitor, 'load_price_panel', lambda ranges: requested.update(ranges) or {})
+    history = {'predictions': [
+        {'stock_code': '0700.HK', 'horizon': 1, 'data_date': '2026-09-30', 'entry_price': 500.0},
+        {'stock_code': '600519.SS', 'horizon': 1, 'data_date': '2026-09-30', 'entry_price': 1500.0},
+    ]}
+    performance_monitor.evaluate_predictions(history, horizon=1)
+
+    assert [p['target_date'] for p in history['predictions']] == ['2026-10-02', '2026-10-08']
+    assert requested == {'0700.HK': ('2026-10-02', '2026-10-02'), '600519.SS': ('2026-10-08', '2026-10-08')}
+    assert performance_monitor.add_trading_days('2026-09-30', 1) == '2026-10-02'
+    assert performance_monitor.add_trading_days('2026-09-30', 1, '600519') == '2026-10-08'
@@ -0,0 +1,129 @@
+"""
+向量化持有期回测测试
+
+覆盖：
+1. backtest_panel 的交易明细与逐股票 Backtest20DHoldPeriod 路径一致
+   （含数据不足 horizon+2 天的股票、结束日期截断）
+2. calculate_performance_metrics 在两条路径的交易列表上结果一致
+3. sweep_holding_period_backtest 单个场景的指标与 calculate_performance_metrics 一致
+4. 命令行 --vectorized 与逐股票引擎的持有期相同（默认参数和 --horizon 5）
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_services.backtest_20d_horizon import (
+    HOLD_DAYS, Backtest20DHoldPeriod, calculate_performance_metrics, create_backtester, parse_args
+)
+from ml_services.vectorized_backtest import VectorizedBacktest20D, sweep_holding_period_backtest
+
+FEATURES = ['feature_a', 'feature_b']
+
+
+class LogisticModel:
+    """按特征线性组合输出概率的确定性模型"""
+
+    def predict_proba(self, X):
+        z = 1.5 * X['feature_a'].to_numpy() - 0.8 * X['feature_b'].to_numpy()
+        p = 1 / (1 + np.exp(-z))
+        return np.column_stack([1 - p, p])
+
+
+def _panel():
+    """四只股票：60 天、40 天、22 天（仅 2 个交易机会）和 21 天（数据不足）"""
+    rng = np.random.RandomState(7)
+    frames = []
+    for code, n_days in [('0700.HK', 60), ('0939.HK', 40), ('1398.HK', 22), ('2318.HK', 21)]:
+        dates = pd.bdate_range('2026-01-05', periods=n_days)
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+        frames.append(pd.DataFrame({
+            'Code': code,
+            'Close': close,
+            'Label': (rng.rand(n_days) > 0.5).astype(int),
+            'feature_a': rng.normal(0, 1, n_days),
+            'feature_b': rng.normal(0, 1, n_days),
+            'Confidence_Threshold_Multiplier': rng.choice([0.91, 1.0, 1.09], n_days),
+        }, index=dates))
+    # 按日期交错排列，模拟 prepare_data 的多股票输出
+    return pd.concat(frames).sort_index(kind='mergesort')
+
+
+@pytest.mark.parametrize('end_date', ['2026-12-31', '2026-03-06'])
+def test_backtest_panel_matches_per_stock_loop(end_date):
+    """向量化交易明细和性能指标与逐股票循环一致"""
+    test_df = _panel()
+    model = LogisticModel()
+    loop = Backtest20DHoldPeriod(model, enable_dynamic_risk_control=False)
+    vectorized = VectorizedBacktest20D(model, enable_dynamic_risk_control=False)
+
+    expected = pd.DataFrame(loop.backtest_all_stocks(test_df, FEATURES, '2026-01-01', end_date))
+    trades = vectorized.backtest_panel(test_df, FEATURES, '2026-01-01', end_date)
+
+    assert '2318.HK' not in set(trades['stock_code'])
+    assert (trades['stock_code'] == '1398.HK').sum() == (expected['stock_code'] == '1398.HK').sum()
+
+    key = ['stock_code', 'buy_date']
+    expected = expected.sort_values(key).reset_index(drop=True)
+    trades = trades.sort_values(key).reset_index(drop=True)
+    assert list(trades.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(trades, expected, check_dtype=False)
+
+    expected_metrics = calculate_performance_metrics(expected.to_dict('records'))
+    metrics = calculate_performance_metrics(trades.to_dict('records'))
+    assert metrics.keys() == expected_metrics.keys()
+    for name, value in expected_metrics.items():
+        if name == 'daily_metrics':
+            assert metrics[name] == value
+        else:
+            assert metrics[name] == pytest.approx(value), name
+
+
+def test_sweep_matches_calculate_performance_metrics():
+    """参数扫描的单个场景与逐笔交易的 calculate_performance_metrics 一致
+
+    最大回撤从第一笔买入交易开始计算：首笔买入亏损且之前有未买入的交易机会时，
+    历史最高点不能包含首笔买入之前的初始净值
+    """
+    # 两只股票的日期区间不重叠，避免同一买入日多笔交易的排序差异
+    test_df = _panel()
+    test_df = test_df[test_df['Code'].isin(['0700.HK', '0939.HK'])]
+    falling = test_df[test_df['Code'] == '0700.HK'].copy()
+    falling['Close'] *= np.exp(-0.01 * np.arange(len(falling)))
+    falling.iloc[:3, falling.columns.get_loc('feature_a')] = -5.0  # 前几个交易机会不买入
+    test_df = pd.concat([falling, test_df[test_df['Code'] == '0939.HK'].shift(120, freq='B')])
+    model = LogisticModel()
+    backtester = VectorizedBacktest20D(model, confidence_threshold=0.5, enable_dynamic_risk_control=False)
+    trades = backtester.backtest_panel(test_df, FEATURES, '2026-01-01', '2026-12-31')
+    expected = calculate_performance_metrics(trades.to_dict('records'))
+    ordered = trades.sort_values('buy_date')
+    assert ordered['prediction'].iloc[0] == 0
+    assert ordered.loc[ordered['prediction'] == 1, 'actual_change'].iloc[0] < 0
+
+    sweep = sweep_holding_period_backtest(model, test_df, FEATURES, '2026-01-01', '2026-12-31',
+                                          thresholds=[0.5], horizons=(20,))
+    row = sweep.iloc[0]
+    assert row['total_trades'] == expected['total_trades']
+    assert row['buy_signals'] == expected['buy_signals']
+    for name, value in expected.items():
+        if name in ('daily_metrics', 'total_trades', 'buy_signals'):
+            continue
+        assert row[name] == pytest.approx(value), name
+
+
+@pytest.mark.parametrize('argv', [[], ['--horizon', '5']])
+def test_cli_engines_agree(argv):
+    """同一命令行下向量化引擎与逐股票引擎持有期相同、交易明细一致"""
+    test_df = _panel()
+    model = LogisticModel()
+    loop = create_backtester(model, parse_args(argv))
+    vectorized = create_backtester(model, parse_args(argv + ['--vectorized']))
+    assert isinstance(loop, Backtest20DHoldPeriod) and isinstance(vectorized, VectorizedBacktest20D)
+    assert vectorized.horizon == HOLD_DAYS == 20
+
+    args = parse_args(argv)
+    expected = pd.DataFrame(loop.backtest_all_stocks(test_df, FEATURES, args.start_date, '2026-12-31'))
+    trades = pd.DataFrame(vectorized.backtest_all_stocks(test_df, FEATURES, args.start_date, '2026-12-31'))
+    key = ['stock_code', 'buy_date']
+    pd.testing.assert_frame_equal(trades.sort_values(key).reset_index(drop=True),
+                                  expected.sort_values(key).reset_index(drop=True), check_dtype=False)
@@ -0,0 +1,124 @@
+"""
+CatBoost 增量训练（滚动窗口热启动）测试
+
+覆盖：
+1. 首次完整训练，之后在上一个模型上追加树
+2. 连续增量训练达到次数 / 树数量上限后完整重训
+3. 特征签名变化时退回完整训练
+4. 状态持久化：新实例从磁盘继续增量训练
+5. 漂移检查：超出容差时改用完整训练的模型
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('catboost')
+
+from ml_services.warm_start import WarmStartCatBoost, WarmStartPolicy
+
+PARAMS = {
+    'iterations': 80,
+    'learning_rate': 0.1,
+    'depth': 3,
+    'random_seed': 42,
+    'loss_function': 'Logloss',
+    'auto_class_weights': 'Balanced',
+    'verbose': False,
+    'thread_count': 1,
+    'allow_writing_files': False,
+}
+
+
+def _make_data(n=600, n_features=6, seed=0):
+    rng = np.random.RandomState(seed)
+    X = pd.DataFrame(rng.randn(n, n_features), columns=[f'F{i}' for i in range(n_features)])
+    y = (X['F0'] + 0.5 * X['F1'] + rng.randn(n) * 0.5 > 0).astype(int)
+    return X, y
+
+
+def _windows(X, y, steps, start=300, step=50):
+    """扩展窗口（与 walk-forward 相同：每次多出 step 行）"""
+    for i in range(steps):
+        end = start + i * step
+        yield X.iloc[:end], y.iloc[:end]
+
+
+def test_warm_start_appends_trees():
+    """首次完整训练，之后每次追加 added_trees 棵树"""
+    X, y = _make_data()
+    trainer = WarmStartCatBoost(WarmStartPolicy(added_trees=20, full_refit_every=0, drift_check_every=0))
+
+    trees = []
+    for X_train, y_train in _windows(X, y, 3):
+        model = trainer.fit(PARAMS, X_train, y_train)
+        trees.append(model.tree_count_)
+
+    assert [record['mode'] for record in trainer.history] == ['full', 'warm', 'warm']
+    assert trees == [80, 100, 120]
+    assert trainer.summary()['warm']['count'] == 2
+
+
+def test_periodic_full_refit():
+    """连续增量训练达到 full_refit_every 次、或树数量将超过上限时完整重训"""
+    X, y = _make_data()
+    trainer = WarmStartCatBoost(WarmStartPolicy(added_trees=10, full_refit_every=2, drift_check_every=0))
+    for X_train, y_train in _windows(X, y, 5):
+        trainer.fit(PARAMS, X_train, y_train)
+    assert [record['mode'] for record in trainer.history] == ['full', 'warm', 'warm', 'full', 'warm']
+
+    capped = WarmStartCatBoost(WarmStartPolicy(added_trees=30, full_refit_every=0, max_trees=120,
+                                               drift_check_every=0))
+    for X_train, y_train in _windows(X, y, 3):
+        capped.fit(PARAMS, X_train, y_train)
+    assert [record['mode'] for record in capped.history] == ['full', 'warm', 'full']
+
+
+def test_signature_change_forces_full_fit():
+    """特征列变化（如特征选择结果不同）时不能在旧模型上继续训练"""
+    X, y = _make_data()
+    trainer = WarmStartCatBoost(WarmStartPolicy(added_trees=10, drift_check_every=0))
+    trainer.fit(PARAMS, X.iloc[:300], y.iloc[:300])
+
+    assert trainer.will_continue(list(X.columns))
+    reduced = X.drop(columns=['F5'])
+    assert not trainer.will_continue(list(reduced.columns))
+    trainer.fit(PARAMS, reduced.iloc[:350], y.iloc[:350])
+    assert trainer.last_mode == 'full'
+
+
+def test_state_persists_across_instances(tmp_path):
+    """每日重训跨进程：新实例从磁盘读回模型和计数后继续增量训练"""
+    X, y = _make_data()
+    policy = WarmStartPolicy(added_trees=15, full_refit_every=5, drift_check_every=0)
+    first = WarmStartCatBoost(policy, state_dir=str(tmp_path), name='catboost_20d')
+    first.fit(PARAMS, X.iloc[:300], y.iloc[:300])
+    first.fit(PARAMS, X.iloc[:350], y.iloc[:350])
+
+    second = WarmStartCatBoost(policy, state_dir=str(tmp_path), name='catboost_20d')
+    assert second.steps_since_refit == 1 and second.model.tree_count_ == 95
+    model = second.fit(PARAMS, X.iloc[:400], y.iloc[:400])
+    assert second.last_mode == 'warm' and model.tree_count_ == 110
+    assert len(second.history) == 3
+
+    other = WarmStartCatBoost(policy, state_dir=str(tmp_path), name='catboost_5d')
+    assert other.model is None
+
+
+def test_drift_check_with_eval_set():
+    """漂移检查：与完整训练的模型比较验证集预测概率，超出容差时改用完整训练的模型"""
+    X, y = _make_data(n=800)
+    params = dict(PARAMS, early_stopping_rounds=20, use_best_model=True)
+    eval_set = (X.iloc[600:], y.iloc[600:])
+
+    strict = WarmStartCatBoost(WarmStartPolicy(added_trees=20, drift_check_every=1, drift_tolerance=0.0))
+    strict.fit(params, X.iloc[:400], y.iloc[:400], eval_set=eval_set)
+    strict.fit(params, X.iloc[:500], y.iloc[:500], eval_set=eval_set)
+    assert strict.last_mode == 'warm_drift_refit'
+    assert strict.history[-1]['drift'] > 0
+    assert strict.steps_since_refit == 0
+
+    loose = WarmStartCatBoost(WarmStartPolicy(added_trees=20, drift_check_every=1, drift_tolerance=1.0))
+    loose.fit(params, X.iloc[:400], y.iloc[:400], eval_set=eval_set)
+    loose.fit(params, X.iloc[:500], y.iloc[:500], eval_set=eval_set)
+    assert loose.last_mode == 'warm' and loose.steps_since_refit == 1